@@ -30,7 +30,7 @@ from app.measures.bald_contrib_models import BaldPeriodContribution  # noqa: F40
 from app.measures.ps_models import PSPeriodContribution  # noqa: F401
 from app.measures.ps_detail_models import PSPeriodDetail  # noqa: F401
 from app.objeciones.models import (  # noqa: F401
-    ObjecionAGRECL, ObjecionINCL, ObjecionCUPS, ObjecionCIL,
+    ObjecionAGRECL, ObjecionINCL, ObjecionCUPS, ObjecionCIL, ObjecionFicheroResumen,
 )
 from app.objeciones.automatizacion.models import (  # noqa: F401
     ObjecionesAutomatizacion, ObjecionesAlerta,
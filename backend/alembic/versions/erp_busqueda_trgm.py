@@ -0,0 +1,51 @@
+"""Índices pg_trgm para la búsqueda ERP (titular, suministro, contrato, equipo)
+
+Revision ID: erp_busqueda_trgm
+Revises: gisce_sync_marcas
+Create Date: 2026-10-19
+
+La búsqueda de app/erp/services_busqueda.py (y los listados con `search`)
+filtran con ILIKE '%texto%', que un índice btree no resuelve. Los índices
+GIN con gin_trgm_ops sí. Se crean CONCURRENTLY para no bloquear escrituras.
+El downgrade no quita la extensión pg_trgm: otras consultas pueden usarla.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+
+revision: str = "erp_busqueda_trgm"
+down_revision: Union[str, Sequence[str], None] = "gisce_sync_marcas"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_INDICES = [
+    ("ix_erp_titular_nombre_trgm", "erp_titular", "nombre"),
+    ("ix_erp_titular_identificador_trgm", "erp_titular", "identificador"),
+    ("ix_erp_titular_codigo_interno_trgm", "erp_titular", "codigo_interno"),
+    ("ix_erp_suministro_cups_trgm", "erp_suministro", "cups"),
+    ("ix_erp_contrato_numero_contrato_trgm", "erp_contrato", "numero_contrato"),
+    ("ix_erp_contrato_codigo_interno_trgm", "erp_contrato", "codigo_interno"),
+    ("ix_erp_equipo_medida_numero_serie_trgm", "erp_equipo_medida", "numero_serie"),
+]
+
+
+def upgrade() -> None:
+    op.execute("CREATE EXTENSION IF NOT EXISTS pg_trgm")
+    with op.get_context().autocommit_block():
+        for nombre, tabla, columna in _INDICES:
+            op.create_index(
+                nombre,
+                tabla,
+                [columna],
+                postgresql_using="gin",
+                postgresql_ops={columna: "gin_trgm_ops"},
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for nombre, tabla, _ in reversed(_INDICES):
+            op.drop_index(nombre, table_name=tabla, postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,38 @@
+"""stg_gisce_sync_marca: marcas de agua de la sincronización incremental GISCE
+
+Revision ID: gisce_sync_marcas
+Revises: perdidas_conciliacion
+Create Date: 2026-10-19
+
+Una fila por empresa y modelo XML-RPC con el mayor write_date leído. La
+primera sincronización tras la migración es completa y deja las marcas.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "gisce_sync_marcas"
+down_revision: Union[str, Sequence[str], None] = "perdidas_conciliacion"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stg_gisce_sync_marca",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("tenant_id", sa.Integer(), sa.ForeignKey("tenants.id"), nullable=False),
+        sa.Column("empresa_id", sa.Integer(), sa.ForeignKey("empresas.id"), nullable=False),
+        sa.Column("modelo", sa.String(length=64), nullable=False),
+        sa.Column("ultimo_write_date", sa.String(length=26), nullable=True),
+        sa.Column("ultima_sync_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.Column("registros_ultima_sync", sa.Integer(), nullable=False, server_default="0"),
+        sa.UniqueConstraint("empresa_id", "modelo", name="uq_stg_gisce_sync_marca_empresa_modelo"),
+    )
+    op.create_index("ix_stg_gisce_sync_marca_tenant_id", "stg_gisce_sync_marca", ["tenant_id"])
+
+
+def downgrade() -> None:
+    op.drop_index("ix_stg_gisce_sync_marca_tenant_id", table_name="stg_gisce_sync_marca")
+    op.drop_table("stg_gisce_sync_marca")
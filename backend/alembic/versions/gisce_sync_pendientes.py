@@ -0,0 +1,31 @@
+"""stg_gisce_sync_marca.ids_pendientes: registros GISCE a reintentar
+
+Revision ID: gisce_sync_pendientes
+Revises: pipeline_timings
+Create Date: 2026-10-19
+
+Ids GISCE leídos que el import no pudo aplicar (CUPS sin CT local,
+contadores sin CUPS local). La sincronización incremental los vuelve a
+pedir aunque la marca de agua ya haya pasado por encima de ellos.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "gisce_sync_pendientes"
+down_revision: Union[str, Sequence[str], None] = "pipeline_timings"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column(
+        "stg_gisce_sync_marca",
+        sa.Column("ids_pendientes", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("stg_gisce_sync_marca", "ids_pendientes")
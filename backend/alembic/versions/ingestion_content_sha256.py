@@ -0,0 +1,29 @@
+"""Ingestion: sha256 del contenido subido (detección de duplicados)
+
+Revision ID: ingestion_content_sha256
+Revises: perf_keyset_indexes
+Create Date: 2026-10-19
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "ingestion_content_sha256"
+down_revision: Union[str, Sequence[str], None] = "perf_keyset_indexes"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("ingestion_files", sa.Column("content_sha256", sa.String(length=64), nullable=True))
+    op.create_index(
+        "ix_ingestion_files_content_sha256",
+        "ingestion_files",
+        ["tenant_id", "empresa_id", "content_sha256"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_ingestion_files_content_sha256", table_name="ingestion_files")
+    op.drop_column("ingestion_files", "content_sha256")
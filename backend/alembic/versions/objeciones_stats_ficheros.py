@@ -0,0 +1,92 @@
+"""Objeciones: índice de estadísticas por fichero y tabla resumen
+
+Revision ID: objeciones_stats_ficheros
+Revises: ingestion_content_sha256
+Create Date: 2026-10-19
+
+Los listados de ficheros (agrecl/incl/cups/cil) pasan a agregarse con
+GROUP BY en SQL. El índice (tenant_id, empresa_id, nombre_fichero,
+aceptacion) INCLUDE (created_at, enviado_sftp_at) permite resolverlo con
+index-only scan. La tabla objeciones_ficheros_resumen se rellena aquí desde
+las objeciones existentes y a partir de ahora la mantienen los services.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "objeciones_stats_ficheros"
+down_revision: Union[str, Sequence[str], None] = "ingestion_content_sha256"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+_TABLAS = {
+    "agrecl": "objeciones_agrecl",
+    "incl": "objeciones_incl",
+    "cups": "objeciones_cups",
+    "cil": "objeciones_cil",
+}
+
+
+def upgrade() -> None:
+    op.create_table(
+        "objeciones_ficheros_resumen",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("tenant_id", sa.Integer(), sa.ForeignKey("tenants.id"), nullable=False),
+        sa.Column("empresa_id", sa.Integer(), sa.ForeignKey("empresas.id"), nullable=False),
+        sa.Column("tipo", sa.String(length=10), nullable=False),
+        sa.Column("nombre_fichero", sa.String(length=255), nullable=False),
+        sa.Column("total", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("pendientes", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("aceptadas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("rechazadas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("created_at", sa.DateTime(), nullable=True),
+        sa.Column("enviado_sftp_at", sa.DateTime(), nullable=True),
+        sa.UniqueConstraint("tenant_id", "empresa_id", "tipo", "nombre_fichero",
+                            name="uq_objeciones_ficheros_resumen"),
+    )
+    op.create_index(
+        "ix_objeciones_ficheros_resumen_tenant_tipo",
+        "objeciones_ficheros_resumen",
+        ["tenant_id", "tipo"],
+    )
+
+    for tipo, tabla in _TABLAS.items():
+        op.execute(sa.text(f"""
+            INSERT INTO objeciones_ficheros_resumen
+                (tenant_id, empresa_id, tipo, nombre_fichero, total, pendientes,
+                 aceptadas, rechazadas, created_at, enviado_sftp_at)
+            SELECT tenant_id, empresa_id, '{tipo}', COALESCE(nombre_fichero, 'desconocido'),
+                   COUNT(*),
+                   COUNT(*) FILTER (WHERE aceptacion IS DISTINCT FROM 'S' AND aceptacion IS DISTINCT FROM 'N'),
+                   COUNT(*) FILTER (WHERE aceptacion = 'S'),
+                   COUNT(*) FILTER (WHERE aceptacion = 'N'),
+                   MAX(created_at), MAX(enviado_sftp_at)
+            FROM {tabla}
+            GROUP BY tenant_id, empresa_id, COALESCE(nombre_fichero, 'desconocido')
+        """))
+
+    with op.get_context().autocommit_block():
+        for tipo, tabla in _TABLAS.items():
+            op.create_index(
+                f"ix_objeciones_{tipo}_stats_fichero",
+                tabla,
+                ["tenant_id", "empresa_id", "nombre_fichero", "aceptacion"],
+                postgresql_include=["created_at", "enviado_sftp_at"],
+                postgresql_concurrently=True,
+                if_not_exists=True,
+            )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        for tipo, tabla in _TABLAS.items():
+            op.drop_index(
+                f"ix_objeciones_{tipo}_stats_fichero",
+                table_name=tabla,
+                postgresql_concurrently=True,
+                if_exists=True,
+            )
+    op.drop_index("ix_objeciones_ficheros_resumen_tenant_tipo", table_name="objeciones_ficheros_resumen")
+    op.drop_table("objeciones_ficheros_resumen")
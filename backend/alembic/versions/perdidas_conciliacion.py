@@ -0,0 +1,79 @@
+"""Pérdidas: conciliación mensual S02 / BALD precalculada
+
+Revision ID: perdidas_conciliacion
+Revises: stg_medida_agregados
+Create Date: 2026-10-19
+
+perdidas_conciliacion guarda por empresa y mes las pérdidas calculadas con
+S02 (perdida_diaria) frente a las publicadas en BALD por ventana, y
+perdidas_conciliacion_ct la aportación de cada CT a la divergencia. Las
+mantiene app/perdidas/conciliacion.py; los periodos existentes se rellenan
+con POST /perdidas/conciliacion/recalcular.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "perdidas_conciliacion"
+down_revision: Union[str, Sequence[str], None] = "stg_medida_agregados"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.create_table(
+        "perdidas_conciliacion",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column("tenant_id", sa.Integer(), nullable=False),
+        sa.Column("empresa_id", sa.Integer(), nullable=False),
+        sa.Column("anio", sa.Integer(), nullable=False),
+        sa.Column("mes", sa.Integer(), nullable=False),
+        sa.Column("num_cts", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("dias_procesados", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("dias_completos", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("energia_s02_kwh", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("perdida_s02_kwh", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("perdida_s02_pct", sa.Float(), nullable=True),
+        *[
+            sa.Column(f"perdidas_{v}_{u}", sa.Float(), nullable=True)
+            for v in ("m2", "m7", "m11", "art15") for u in ("kwh", "pct")
+        ],
+        sa.Column("ventana_referencia", sa.String(length=10), nullable=True),
+        sa.Column("divergencia_pp", sa.Float(), nullable=True),
+        sa.Column("estado", sa.String(length=20), nullable=False, server_default="sin_bald"),
+        sa.Column("calculado_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+        sa.UniqueConstraint("tenant_id", "empresa_id", "anio", "mes", name="uq_perdidas_conciliacion_periodo"),
+    )
+    op.create_index("ix_perdidas_conciliacion_tenant_id", "perdidas_conciliacion", ["tenant_id"])
+
+    op.create_table(
+        "perdidas_conciliacion_ct",
+        sa.Column("id", sa.Integer(), primary_key=True),
+        sa.Column(
+            "conciliacion_id", sa.Integer(),
+            sa.ForeignKey("perdidas_conciliacion.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column(
+            "concentrador_id", sa.Integer(),
+            sa.ForeignKey("concentrador.id", ondelete="CASCADE"), nullable=False,
+        ),
+        sa.Column("dias_procesados", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("energia_kwh", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("perdida_kwh", sa.Float(), nullable=False, server_default="0"),
+        sa.Column("perdida_pct", sa.Float(), nullable=True),
+        sa.Column("exceso_kwh", sa.Float(), nullable=True),
+        sa.Column("aportacion_pct", sa.Float(), nullable=True),
+        sa.Column("marcado", sa.Boolean(), nullable=False, server_default=sa.false()),
+        sa.UniqueConstraint("conciliacion_id", "concentrador_id", name="uq_perdidas_conciliacion_ct"),
+    )
+    op.create_index(
+        "ix_perdidas_conciliacion_ct_conciliacion_id", "perdidas_conciliacion_ct", ["conciliacion_id"],
+    )
+
+
+def downgrade() -> None:
+    op.drop_index("ix_perdidas_conciliacion_ct_conciliacion_id", table_name="perdidas_conciliacion_ct")
+    op.drop_table("perdidas_conciliacion_ct")
+    op.drop_index("ix_perdidas_conciliacion_tenant_id", table_name="perdidas_conciliacion")
+    op.drop_table("perdidas_conciliacion")
@@ -0,0 +1,51 @@
+"""Índices para paginación por cursor (keyset) de medidas y curvas STG
+
+Revision ID: perf_keyset_indexes
+Revises: erp_m2_equipo_codigo_fases
+Create Date: 2026-10-19
+
+Los listados /medidas/general/page, /medidas/ps/page y /stg/curva/{meter_id}
+ordenan por columnas que no tenían índice compuesto en ese orden. Se crean
+CONCURRENTLY para no bloquear escrituras en tablas grandes (stg_medida).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "perf_keyset_indexes"
+down_revision: Union[str, Sequence[str], None] = "erp_m2_equipo_codigo_fases"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.create_index(
+            "ix_medidas_general_keyset",
+            "medidas_general",
+            ["tenant_id", sa.text("anio DESC"), sa.text("mes DESC"), "empresa_id", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_medidas_ps_keyset",
+            "medidas_ps",
+            ["tenant_id", sa.text("anio DESC"), sa.text("mes DESC"), "empresa_id", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+        op.create_index(
+            "ix_stg_medida_curva_keyset",
+            "stg_medida",
+            ["empresa_id", "meter_id", "tipo_fichero", "timestamp_dato", "id"],
+            postgresql_concurrently=True,
+            if_not_exists=True,
+        )
+
+
+def downgrade() -> None:
+    with op.get_context().autocommit_block():
+        op.drop_index("ix_stg_medida_curva_keyset", table_name="stg_medida", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_medidas_ps_keyset", table_name="medidas_ps", postgresql_concurrently=True, if_exists=True)
+        op.drop_index("ix_medidas_general_keyset", table_name="medidas_general", postgresql_concurrently=True, if_exists=True)
@@ -0,0 +1,34 @@
+"""Tiempos por etapa del procesado de ingestion_files y stg_fichero_recibido
+
+Revision ID: pipeline_timings
+Revises: erp_busqueda_trgm
+Create Date: 2026-10-19
+
+Guarda con cada fichero los tiempos por etapa de su último procesado
+(app/core/pipeline_timing.py): `ingestion_files.timings_json` como texto
+JSON, igual que `warnings_json`, y `stg_fichero_recibido.parse_timings`
+como JSONB.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+revision: str = "pipeline_timings"
+down_revision: Union[str, Sequence[str], None] = "erp_busqueda_trgm"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def upgrade() -> None:
+    op.add_column("ingestion_files", sa.Column("timings_json", sa.Text(), nullable=True))
+    op.add_column(
+        "stg_fichero_recibido",
+        sa.Column("parse_timings", postgresql.JSONB(astext_type=sa.Text()), nullable=True),
+    )
+
+
+def downgrade() -> None:
+    op.drop_column("stg_fichero_recibido", "parse_timings")
+    op.drop_column("ingestion_files", "timings_json")
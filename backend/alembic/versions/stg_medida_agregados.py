@@ -0,0 +1,143 @@
+"""stg_medida_diaria y stg_medida_mensual: agregados por contador de la curva S02
+
+Revision ID: stg_medida_agregados
+Revises: stg_medida_particionada
+Create Date: 2026-10-19
+
+Totales diarios y mensuales por contador (ai, ae, r1..r4, horas con dato,
+lecturas por calidad bc) que mantiene app/stg/agregados.py al parsear cada
+fichero S02. Aquí se rellenan desde las curvas ya cargadas con las mismas
+reglas: la lectura de 00:00 es la hora 24 del día anterior y, si una hora
+se repite en varios ficheros, cuenta la de mayor id.
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "stg_medida_agregados"
+down_revision: Union[str, Sequence[str], None] = "stg_medida_particionada"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+def _magnitudes():
+    return [sa.Column(m, sa.Float(), nullable=False, server_default="0")
+            for m in ("ai", "ae", "r1", "r2", "r3", "r4")]
+
+
+def _calidad():
+    return [
+        sa.Column("horas_con_dato", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("horas_esperadas", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("lecturas_bc_ok", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("lecturas_bc_incidencia", sa.Integer(), nullable=False, server_default="0"),
+        sa.Column("updated_at", sa.DateTime(), nullable=False, server_default=sa.func.now()),
+    ]
+
+
+# Horas del día/mes en Europe/Madrid (23/25 en los cambios de hora).
+_HORAS_DIA = (
+    "(EXTRACT(EPOCH FROM ((fecha + 1)::timestamp AT TIME ZONE 'Europe/Madrid') "
+    "- (fecha::timestamp AT TIME ZONE 'Europe/Madrid')) / 3600)::int"
+)
+_HORAS_MES = (
+    "(EXTRACT(EPOCH FROM ((make_date(anio, mes, 1) + interval '1 month')::timestamp AT TIME ZONE 'Europe/Madrid') "
+    "- (make_date(anio, mes, 1)::timestamp AT TIME ZONE 'Europe/Madrid')) / 3600)::int"
+)
+
+
+def upgrade() -> None:
+    op.create_table(
+        "stg_medida_diaria",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("tenant_id", sa.Integer(), sa.ForeignKey("tenants.id"), nullable=False),
+        sa.Column("empresa_id", sa.Integer(), sa.ForeignKey("empresas.id"), nullable=False),
+        sa.Column("meter_id", sa.String(length=50), nullable=False),
+        sa.Column("contador_id", sa.Integer(), sa.ForeignKey("stg_contador.id"), nullable=True),
+        sa.Column("concentrador_id", sa.Integer(), sa.ForeignKey("stg_concentrador.id"), nullable=True),
+        sa.Column("fecha", sa.Date(), nullable=False),
+        *_magnitudes(),
+        *_calidad(),
+        sa.UniqueConstraint("empresa_id", "meter_id", "fecha", name="uq_stg_medida_diaria_contador_fecha"),
+    )
+    op.create_index(
+        "ix_stg_medida_diaria_concentrador_fecha",
+        "stg_medida_diaria",
+        ["empresa_id", "concentrador_id", "fecha"],
+    )
+    op.create_table(
+        "stg_medida_mensual",
+        sa.Column("id", sa.BigInteger(), primary_key=True),
+        sa.Column("tenant_id", sa.Integer(), sa.ForeignKey("tenants.id"), nullable=False),
+        sa.Column("empresa_id", sa.Integer(), sa.ForeignKey("empresas.id"), nullable=False),
+        sa.Column("meter_id", sa.String(length=50), nullable=False),
+        sa.Column("anio", sa.Integer(), nullable=False),
+        sa.Column("mes", sa.Integer(), nullable=False),
+        *_magnitudes(),
+        sa.Column("dias_con_dato", sa.Integer(), nullable=False, server_default="0"),
+        *_calidad(),
+        sa.UniqueConstraint("empresa_id", "meter_id", "anio", "mes", name="uq_stg_medida_mensual_contador_mes"),
+    )
+
+    op.execute(sa.text(f"""
+        WITH lecturas AS (
+            SELECT DISTINCT ON (empresa_id, meter_id, timestamp_dato, datos->>'season')
+                   tenant_id, empresa_id, meter_id, contador_id, concentrador_id,
+                   timestamp_dato, (timestamp_dato - interval '1 hour')::date AS fecha, datos
+            FROM stg_medida
+            WHERE tipo_fichero = 'S02' AND meter_id IS NOT NULL AND timestamp_dato IS NOT NULL
+            ORDER BY empresa_id, meter_id, timestamp_dato, datos->>'season', id DESC
+        ),
+        dias AS (
+            SELECT tenant_id, empresa_id, meter_id, fecha,
+                   (array_agg(contador_id ORDER BY timestamp_dato DESC))[1] AS contador_id,
+                   (array_agg(concentrador_id ORDER BY timestamp_dato DESC))[1] AS concentrador_id,
+                   SUM(COALESCE((datos->>'ai')::float, 0)) AS ai,
+                   SUM(COALESCE((datos->>'ae')::float, 0)) AS ae,
+                   SUM(COALESCE((datos->>'r1')::float, 0)) AS r1,
+                   SUM(COALESCE((datos->>'r2')::float, 0)) AS r2,
+                   SUM(COALESCE((datos->>'r3')::float, 0)) AS r3,
+                   SUM(COALESCE((datos->>'r4')::float, 0)) AS r4,
+                   COUNT(*) AS horas_con_dato,
+                   COUNT(*) FILTER (WHERE COALESCE((datos->>'bc')::float, 0) = 0) AS lecturas_bc_ok,
+                   COUNT(*) FILTER (WHERE COALESCE((datos->>'bc')::float, 0) <> 0) AS lecturas_bc_incidencia
+            FROM lecturas
+            GROUP BY tenant_id, empresa_id, meter_id, fecha
+        )
+        INSERT INTO stg_medida_diaria
+            (tenant_id, empresa_id, meter_id, contador_id, concentrador_id, fecha,
+             ai, ae, r1, r2, r3, r4, horas_con_dato, horas_esperadas,
+             lecturas_bc_ok, lecturas_bc_incidencia)
+        SELECT tenant_id, empresa_id, meter_id, contador_id, concentrador_id, fecha,
+               ai, ae, r1, r2, r3, r4, horas_con_dato, {_HORAS_DIA},
+               lecturas_bc_ok, lecturas_bc_incidencia
+        FROM dias
+    """))
+    op.execute(sa.text(f"""
+        INSERT INTO stg_medida_mensual
+            (tenant_id, empresa_id, meter_id, anio, mes,
+             ai, ae, r1, r2, r3, r4, dias_con_dato, horas_con_dato, horas_esperadas,
+             lecturas_bc_ok, lecturas_bc_incidencia)
+        SELECT tenant_id, empresa_id, meter_id, anio, mes,
+               ai, ae, r1, r2, r3, r4, dias_con_dato, horas_con_dato, {_HORAS_MES},
+               lecturas_bc_ok, lecturas_bc_incidencia
+        FROM (
+            SELECT tenant_id, empresa_id, meter_id,
+                   EXTRACT(YEAR FROM fecha)::int AS anio, EXTRACT(MONTH FROM fecha)::int AS mes,
+                   SUM(ai) AS ai, SUM(ae) AS ae, SUM(r1) AS r1, SUM(r2) AS r2,
+                   SUM(r3) AS r3, SUM(r4) AS r4,
+                   COUNT(*) AS dias_con_dato, SUM(horas_con_dato) AS horas_con_dato,
+                   SUM(lecturas_bc_ok) AS lecturas_bc_ok,
+                   SUM(lecturas_bc_incidencia) AS lecturas_bc_incidencia
+            FROM stg_medida_diaria
+            GROUP BY tenant_id, empresa_id, meter_id,
+                     EXTRACT(YEAR FROM fecha), EXTRACT(MONTH FROM fecha)
+        ) m
+    """))
+
+
+def downgrade() -> None:
+    op.drop_table("stg_medida_mensual")
+    op.drop_index("ix_stg_medida_diaria_concentrador_fecha", table_name="stg_medida_diaria")
+    op.drop_table("stg_medida_diaria")
@@ -0,0 +1,237 @@
+"""stg_medida particionada por mes de timestamp_dato
+
+Revision ID: stg_medida_particionada
+Revises: objeciones_stats_ficheros
+Create Date: 2026-10-19
+
+stg_medida pasa a ser una tabla particionada por RANGE(timestamp_dato), una
+partición por mes (stg_medida_pYYYYMM) más stg_medida_default para
+timestamps NULL y meses sin partición. Las consultas de curva/eventos filtran
+por rango de timestamp_dato y solo leen las particiones del intervalo; el
+archivado de meses antiguos es un DETACH + DROP en vez de un DELETE masivo.
+El mantenimiento (crear meses futuros, archivar) lo hace app/stg/particiones.py.
+
+PostgreSQL exige que la clave de partición forme parte de cualquier clave
+primaria o UNIQUE, así que la tabla nueva no tiene PK: `id` sigue saliendo de
+la misma secuencia y queda indexado. Nadie referencia stg_medida por FK.
+
+Migración en línea, sin bloquear la ingestión más que en el cambio final:
+  1. Se crea stg_medida_part con sus particiones e índices.
+  2. Un trigger en stg_medida replica en la nueva los INSERT y DELETE que
+     lleguen mientras se copia (las filas no se actualizan nunca) y apunta
+     los id borrados en stg_medida_part_borradas.
+  3. Se copia por tramos de id, cada tramo en su propia transacción. Un
+     DELETE concurrente con un tramo (p. ej. un reparseo) no ve la fila que
+     el tramo aún no ha confirmado y la deja viva en stg_medida_part: al
+     acabar se quitan las de stg_medida_part_borradas y se comparan los
+     recuentos, todo sin bloqueo. Si no cuadran, se deshacen los pasos 1-2
+     y la migración falla con la tabla vieja intacta.
+  4. Con la tabla vieja bloqueada (solo operaciones baratas): se vuelven a
+     quitar los id borrados, se renombra, se pasa la secuencia y se borra
+     la vieja.
+
+Los pasos 1-2 son idempotentes: si el proceso muere a mitad de la copia se
+puede relanzar y continúa (la copia salta los id ya copiados).
+"""
+from typing import Sequence, Union
+
+from alembic import op
+import sqlalchemy as sa
+
+revision: str = "stg_medida_particionada"
+down_revision: Union[str, Sequence[str], None] = "objeciones_stats_ficheros"
+branch_labels: Union[str, Sequence[str], None] = None
+depends_on: Union[str, Sequence[str], None] = None
+
+
+# Filas por transacción en la copia.
+_TRAMO = 50_000
+# Meses futuros con partición creada (igual que STG_MEDIDA_PARTICIONES_ADELANTE).
+_ADELANTE = 3
+
+_COLUMNAS = (
+    "id, tenant_id, empresa_id, fichero_id, concentrador_id, contador_id, "
+    "tipo_fichero, timestamp_dato, concentrador_externo_id, meter_id, datos, created_at"
+)
+
+_INDICES = (
+    ("ix_stg_medida_id", "(id)"),
+    ("ix_stg_medida_curva_keyset", "(empresa_id, meter_id, tipo_fichero, timestamp_dato, id)"),
+    ("ix_stg_medida_empresa_tipo_ts", "(empresa_id, tipo_fichero, timestamp_dato, id)"),
+    ("ix_stg_medida_contador_ts", "(contador_id, timestamp_dato)"),
+    ("ix_stg_medida_fichero_id", "(fichero_id)"),
+    ("ix_stg_medida_concentrador_id", "(concentrador_id)"),
+)
+
+
+def _crear_tabla(nombre: str, *, particionada: bool) -> None:
+    op.execute(sa.text(f"""
+        CREATE TABLE {"IF NOT EXISTS " if particionada else ""}{nombre} (
+            id BIGINT NOT NULL DEFAULT nextval('stg_medida_id_seq'),
+            tenant_id INTEGER NOT NULL REFERENCES tenants(id),
+            empresa_id INTEGER NOT NULL REFERENCES empresas(id),
+            fichero_id INTEGER NOT NULL REFERENCES stg_fichero_recibido(id),
+            concentrador_id INTEGER REFERENCES stg_concentrador(id),
+            contador_id INTEGER REFERENCES stg_contador(id),
+            tipo_fichero VARCHAR(10) NOT NULL,
+            timestamp_dato TIMESTAMP WITHOUT TIME ZONE,
+            concentrador_externo_id VARCHAR(50),
+            meter_id VARCHAR(50),
+            datos JSONB,
+            created_at TIMESTAMP WITHOUT TIME ZONE NOT NULL DEFAULT now()
+            {"" if particionada else ", PRIMARY KEY (id)"}
+        ){" PARTITION BY RANGE (timestamp_dato)" if particionada else ""}
+    """))
+
+
+def _meses(conn) -> list:
+    """Meses con datos en stg_medida + desde el actual hasta _ADELANTE."""
+    return list(conn.execute(sa.text(f"""
+        SELECT generate_series(
+            LEAST(
+                COALESCE(date_trunc('month', MIN(timestamp_dato)), date_trunc('month', now())),
+                date_trunc('month', now())
+            ),
+            date_trunc('month', now()) + interval '{_ADELANTE} months',
+            interval '1 month'
+        )::date
+        FROM stg_medida
+        WHERE timestamp_dato IS NOT NULL
+    """)).scalars())
+
+
+def _purgar_borradas(conn) -> None:
+    """Quita de stg_medida_part las filas borradas en stg_medida durante la copia."""
+    conn.execute(sa.text("""
+        DELETE FROM stg_medida_part p
+        USING stg_medida_part_borradas b
+        WHERE p.id = b.id
+    """))
+
+
+def _deshacer_replicacion(conn) -> None:
+    """Deja la BD como antes del paso 1 (la tabla vieja no se ha tocado)."""
+    conn.execute(sa.text("DROP TRIGGER IF EXISTS stg_medida_replicar ON stg_medida"))
+    conn.execute(sa.text("DROP FUNCTION IF EXISTS stg_medida_replicar()"))
+    conn.execute(sa.text("DROP TABLE IF EXISTS stg_medida_part"))
+    conn.execute(sa.text("DROP TABLE IF EXISTS stg_medida_part_borradas"))
+
+
+def upgrade() -> None:
+    conn = op.get_bind()
+
+    # 1) Tabla nueva con particiones e índices (vacía: crear índices es inmediato).
+    _crear_tabla("stg_medida_part", particionada=True)
+    op.execute(sa.text("CREATE TABLE IF NOT EXISTS stg_medida_part_default PARTITION OF stg_medida_part DEFAULT"))
+    for mes in _meses(conn):
+        siguiente = f"(DATE '{mes.isoformat()}' + interval '1 month')"
+        op.execute(sa.text(
+            f"CREATE TABLE IF NOT EXISTS stg_medida_part_p{mes:%Y%m} PARTITION OF stg_medida_part "
+            f"FOR VALUES FROM ('{mes.isoformat()}') TO {siguiente}"
+        ))
+    for nombre, columnas in _INDICES:
+        op.execute(sa.text(f"CREATE INDEX IF NOT EXISTS {nombre}_part ON stg_medida_part {columnas}"))
+    op.execute(sa.text("CREATE TABLE IF NOT EXISTS stg_medida_part_borradas (id BIGINT PRIMARY KEY)"))
+
+    # 2) Replicación de cambios durante la copia.
+    op.execute(sa.text(f"""
+        CREATE OR REPLACE FUNCTION stg_medida_replicar() RETURNS trigger AS $$
+        BEGIN
+            IF TG_OP = 'INSERT' THEN
+                INSERT INTO stg_medida_part ({_COLUMNAS})
+                VALUES (NEW.id, NEW.tenant_id, NEW.empresa_id, NEW.fichero_id,
+                        NEW.concentrador_id, NEW.contador_id, NEW.tipo_fichero,
+                        NEW.timestamp_dato, NEW.concentrador_externo_id, NEW.meter_id,
+                        NEW.datos, NEW.created_at);
+                RETURN NEW;
+            END IF;
+            DELETE FROM stg_medida_part WHERE id = OLD.id;
+            INSERT INTO stg_medida_part_borradas (id) VALUES (OLD.id) ON CONFLICT DO NOTHING;
+            RETURN OLD;
+        END
+        $$ LANGUAGE plpgsql
+    """))
+    op.execute(sa.text("DROP TRIGGER IF EXISTS stg_medida_replicar ON stg_medida"))
+    op.execute(sa.text(
+        "CREATE TRIGGER stg_medida_replicar AFTER INSERT OR DELETE ON stg_medida "
+        "FOR EACH ROW EXECUTE FUNCTION stg_medida_replicar()"
+    ))
+
+    # 3) Copia por tramos y comprobación, fuera de la transacción de la migración.
+    with op.get_context().autocommit_block():
+        # CREATE TRIGGER espera a los INSERT en curso: todo lo que no haya
+        # pasado por el trigger tiene id <= max_id.
+        max_id = conn.execute(sa.text("SELECT COALESCE(MAX(id), 0) FROM stg_medida")).scalar()
+        desde = 0
+        while desde < max_id:
+            hasta = min(desde + _TRAMO, max_id)
+            conn.execute(sa.text(f"""
+                INSERT INTO stg_medida_part ({_COLUMNAS})
+                SELECT {_COLUMNAS} FROM stg_medida s
+                WHERE s.id > :desde AND s.id <= :hasta
+                  AND NOT EXISTS (SELECT 1 FROM stg_medida_part p WHERE p.id = s.id)
+            """), {"desde": desde, "hasta": hasta})
+            desde = hasta
+
+        # Sin tramos en curso, el trigger ya mantiene las dos tablas iguales:
+        # basta con quitar las filas que un DELETE concurrente no alcanzó.
+        _purgar_borradas(conn)
+        # Un solo SELECT: los dos recuentos salen de la misma instantánea.
+        viejas, nuevas = conn.execute(sa.text(
+            "SELECT (SELECT count(*) FROM stg_medida), (SELECT count(*) FROM stg_medida_part)"
+        )).one()
+        if viejas != nuevas:
+            _deshacer_replicacion(conn)
+            raise RuntimeError(
+                f"stg_medida: {viejas} filas en la tabla vieja y {nuevas} en la particionada; "
+                "migración deshecha, stg_medida sin cambios"
+            )
+
+    # 4) Cambio final con la tabla vieja bloqueada.
+    op.execute(sa.text("LOCK TABLE stg_medida IN ACCESS EXCLUSIVE MODE"))
+    _purgar_borradas(conn)
+    op.execute(sa.text("DROP TRIGGER stg_medida_replicar ON stg_medida"))
+    op.execute(sa.text("DROP FUNCTION stg_medida_replicar()"))
+    op.execute(sa.text("DROP TABLE stg_medida_part_borradas"))
+    op.execute(sa.text("ALTER SEQUENCE stg_medida_id_seq OWNED BY NONE"))
+    op.execute(sa.text("DROP TABLE stg_medida"))
+    op.execute(sa.text("ALTER TABLE stg_medida_part RENAME TO stg_medida"))
+    op.execute(sa.text("ALTER TABLE stg_medida_part_default RENAME TO stg_medida_default"))
+    # Las particiones que existan (una ejecución relanzada puede tener meses
+    # creados en la anterior).
+    particiones = conn.execute(sa.text("""
+        SELECT c.relname FROM pg_inherits i JOIN pg_class c ON c.oid = i.inhrelid
+        WHERE i.inhparent = 'stg_medida'::regclass AND c.relname LIKE 'stg_medida_part_p%'
+    """)).scalars().all()
+    for nombre in particiones:
+        op.execute(sa.text(f"ALTER TABLE {nombre} RENAME TO {nombre.replace('stg_medida_part_p', 'stg_medida_p', 1)}"))
+    for nombre, _ in _INDICES:
+        op.execute(sa.text(f"ALTER INDEX {nombre}_part RENAME TO {nombre}"))
+    op.execute(sa.text("ALTER SEQUENCE stg_medida_id_seq OWNED BY stg_medida.id"))
+
+
+def downgrade() -> None:
+    # Vuelta a tabla normal. Bloquea la ingestión durante la copia.
+    op.execute(sa.text("LOCK TABLE stg_medida IN ACCESS EXCLUSIVE MODE"))
+    _crear_tabla("stg_medida_plana", particionada=False)
+    op.execute(sa.text(
+        f"INSERT INTO stg_medida_plana ({_COLUMNAS}) SELECT {_COLUMNAS} FROM stg_medida"
+    ))
+    op.execute(sa.text("ALTER SEQUENCE stg_medida_id_seq OWNED BY NONE"))
+    op.execute(sa.text("DROP TABLE stg_medida"))
+    op.execute(sa.text("ALTER TABLE stg_medida_plana RENAME TO stg_medida"))
+    op.execute(sa.text("ALTER INDEX stg_medida_plana_pkey RENAME TO stg_medida_pkey"))
+    op.execute(sa.text("ALTER SEQUENCE stg_medida_id_seq OWNED BY stg_medida.id"))
+    for nombre, columnas in (
+        ("ix_stg_medida_tenant_id", "(tenant_id)"),
+        ("ix_stg_medida_empresa_id", "(empresa_id)"),
+        ("ix_stg_medida_fichero_id", "(fichero_id)"),
+        ("ix_stg_medida_concentrador_id", "(concentrador_id)"),
+        ("ix_stg_medida_contador_id", "(contador_id)"),
+        ("ix_stg_medida_tipo_fichero", "(tipo_fichero)"),
+        ("ix_stg_medida_timestamp_dato", "(timestamp_dato)"),
+        ("ix_stg_medida_meter_id", "(meter_id)"),
+        ("ix_stg_medida_contador_ts", "(contador_id, timestamp_dato)"),
+        ("ix_stg_medida_curva_keyset", "(empresa_id, meter_id, tipo_fichero, timestamp_dato, id)"),
+    ):
+        op.execute(sa.text(f"CREATE INDEX {nombre} ON stg_medida {columnas}"))
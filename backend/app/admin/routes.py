@@ -0,0 +1,67 @@
+# app/admin/routes.py
+# pyright: reportMissingImports=false
+"""
+Endpoints de plataforma (solo superusuario).
+
+  - GET  /admin/perf          → métricas por ruta (JSON) + violaciones de presupuesto
+  - GET  /admin/perf/metrics  → mismas métricas en formato texto de Prometheus
+  - POST /admin/perf/reset    → pone a cero los contadores del proceso
+  - GET  /admin/dashboard-precalentamiento → estado / obsolescencia por tenant
+  - POST /admin/dashboard-precalentamiento → precalienta ahora (todos o solo obsoletos)
+
+Las métricas son del proceso que atiende la petición: con varios workers
+cada uno tiene las suyas (Prometheus debe rascar cada worker).
+"""
+from __future__ import annotations
+
+from fastapi import APIRouter, Depends
+from fastapi.responses import PlainTextResponse
+from sqlalchemy.orm import Session
+
+from app.core import perf
+from app.core.auth import get_current_active_superuser
+from app.core.db import SessionLocal, get_db
+from app.core.response_cache import cache_stats
+from app.dashboard.precalentamiento import estado_precalentamiento, precalentar_todos
+from app.tenants.models import User
+
+router = APIRouter(prefix="/admin", tags=["admin"])
+
+
+@router.get("/perf")
+def get_perf(current_user: User = Depends(get_current_active_superuser)):
+    return {
+        "rutas": perf.registry.snapshot(),
+        "violaciones_presupuesto": perf.budget_violations(),
+        "response_cache": cache_stats(),
+    }
+
+
+@router.get("/perf/metrics", response_class=PlainTextResponse)
+def get_perf_metrics(current_user: User = Depends(get_current_active_superuser)):
+    return PlainTextResponse(
+        perf.registry.prometheus(),
+        media_type="text/plain; version=0.0.4; charset=utf-8",
+    )
+
+
+@router.post("/perf/reset")
+def reset_perf(current_user: User = Depends(get_current_active_superuser)):
+    perf.registry.reset()
+    return {"ok": True}
+
+
+@router.get("/dashboard-precalentamiento")
+def get_dashboard_precalentamiento(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_active_superuser),
+):
+    return estado_precalentamiento(db)
+
+
+@router.post("/dashboard-precalentamiento")
+def post_dashboard_precalentamiento(
+    solo_obsoletos: bool = True,
+    current_user: User = Depends(get_current_active_superuser),
+):
+    return precalentar_todos(SessionLocal, solo_obsoletos=solo_obsoletos)
@@ -0,0 +1,418 @@
+# app/alerts/engine.py
+# pyright: reportMissingImports=false, reportAttributeAccessIssue=false, reportCallIssue=false, reportArgumentType=false
+"""
+Motor vectorizado de alertas.
+
+Antes el recálculo iba empresa a empresa y periodo a periodo: tres queries a
+medidas_general, recarga del catálogo, DELETE + INSERT por cada combinación.
+Aquí se hace en una pasada para cualquier conjunto de (tenant, empresa,
+periodo):
+
+  1. Se cargan a un DataFrame las filas de MedidaGeneral del alcance y las de
+     sus periodos de referencia (mes anterior y mismo mes del año anterior).
+  2. Se pasan a formato largo (una fila por métrica) y se cruzan consigo
+     mismas desplazando el periodo -1 y -12 meses.
+  3. Se cruzan con la configuración efectiva de reglas (catálogo + overrides
+     por empresa) y se evalúan todos los umbrales a la vez.
+  4. Se reconcilia AlertResult con un único diff: se insertan las alertas
+     nuevas, se actualizan las "nueva" que siguen disparadas, se borran las
+     "nueva" que ya no aplican y NO se tocan las gestionadas (en_revision /
+     resuelta).
+
+La semántica es la misma que tenía `recalculate_alerts_for_period`: un
+(empresa, periodo) sin fila en medidas_general no se toca, y si hay varias
+filas para el mismo periodo se usa la de menor id.
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Any, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+import pandas as pd
+from sqlalchemy import tuple_
+from sqlalchemy.orm import Session
+
+from app.alerts.models import AlertResult, AlertRuleCatalog, EmpresaAlertRuleConfig
+from app.measures.models import MedidaGeneral
+
+
+_KEYS = ["tenant_id", "empresa_id", "periodo"]
+_MANAGED_STATUSES = ("en_revision", "resuelta")
+
+# Campos de AlertResult que se recalculan en cada pasada.
+_VALUE_FIELDS = (
+    "severity",
+    "current_value",
+    "previous_value",
+    "diff_value",
+    "diff_unit",
+    "threshold_value",
+    "message",
+)
+
+
+@dataclass
+class AlertEngineResult:
+    """Resumen de una pasada del motor."""
+    periodos_evaluados: int = 0
+    empresas_procesadas: int = 0
+    triggered: int = 0
+    insertadas: int = 0
+    actualizadas: int = 0
+    borradas: int = 0
+
+
+def _periodo(anio: int, mes: int) -> int:
+    return int(anio) * 12 + int(mes) - 1
+
+
+def _anio_mes(periodo: int) -> Tuple[int, int]:
+    return periodo // 12, periodo % 12 + 1
+
+
+# ── Carga ─────────────────────────────────────────────────────────────────
+
+def _load_catalog(db: Session) -> pd.DataFrame:
+    rows = db.query(
+        AlertRuleCatalog.code,
+        AlertRuleCatalog.nombre,
+        AlertRuleCatalog.metric_field,
+        AlertRuleCatalog.diff_unit,
+        AlertRuleCatalog.default_threshold,
+        AlertRuleCatalog.default_severity,
+        AlertRuleCatalog.active_by_default,
+        AlertRuleCatalog.comparison_type,
+    ).all()
+    catalog = pd.DataFrame(
+        rows,
+        columns=[
+            "alert_code", "nombre", "metric_field", "diff_unit",
+            "default_threshold", "default_severity", "active_by_default",
+            "comparison_type",
+        ],
+    )
+    # Solo métricas que existen en MedidaGeneral (defensivo ante catálogo mal cargado).
+    columnas = set(MedidaGeneral.__table__.columns.keys())
+    return catalog[catalog["metric_field"].isin(columnas)].reset_index(drop=True)
+
+
+def _load_medidas(
+    db: Session,
+    *,
+    metric_fields: Sequence[str],
+    tenant_ids: Optional[Sequence[int]],
+    empresa_ids: Optional[Sequence[int]],
+    periodos: Optional[Sequence[int]],
+) -> pd.DataFrame:
+    cols = [getattr(MedidaGeneral, f) for f in metric_fields]
+    q = db.query(
+        MedidaGeneral.id,
+        MedidaGeneral.tenant_id,
+        MedidaGeneral.empresa_id,
+        MedidaGeneral.anio,
+        MedidaGeneral.mes,
+        *cols,
+    )
+    if tenant_ids is not None:
+        q = q.filter(MedidaGeneral.tenant_id.in_(list(tenant_ids)))
+    if empresa_ids is not None:
+        q = q.filter(MedidaGeneral.empresa_id.in_(list(empresa_ids)))
+    if periodos is not None:
+        necesarios = set()
+        for p in periodos:
+            necesarios.update((p, p - 1, p - 12))
+        q = q.filter(
+            tuple_(MedidaGeneral.anio, MedidaGeneral.mes).in_(
+                [_anio_mes(p) for p in sorted(necesarios)]
+            )
+        )
+
+    df = pd.DataFrame(
+        q.all(),
+        columns=["id", "tenant_id", "empresa_id", "anio", "mes", *metric_fields],
+    )
+    if df.empty:
+        return df
+    df["periodo"] = df["anio"].astype("int64") * 12 + df["mes"].astype("int64") - 1
+    # Igual que el antiguo `.first()`: una fila por (empresa, periodo).
+    df = df.sort_values("id").drop_duplicates(_KEYS, keep="first")
+    for f in metric_fields:
+        df[f] = pd.to_numeric(df[f], errors="coerce").astype("float64")
+    return df.drop(columns=["id"])
+
+
+def _load_effective_rules(
+    db: Session,
+    *,
+    catalog: pd.DataFrame,
+    empresas: pd.DataFrame,
+) -> pd.DataFrame:
+    """Producto (empresa × regla) con los overrides de empresa aplicados."""
+    q = db.query(
+        EmpresaAlertRuleConfig.tenant_id,
+        EmpresaAlertRuleConfig.empresa_id,
+        EmpresaAlertRuleConfig.alert_code,
+        EmpresaAlertRuleConfig.is_enabled,
+        EmpresaAlertRuleConfig.threshold_value,
+        EmpresaAlertRuleConfig.severity,
+    ).filter(
+        EmpresaAlertRuleConfig.empresa_id.in_(empresas["empresa_id"].unique().tolist())
+    )
+    overrides = pd.DataFrame(
+        q.all(),
+        columns=["tenant_id", "empresa_id", "alert_code", "cfg_enabled", "cfg_threshold", "cfg_severity"],
+    )
+
+    rules = empresas.merge(catalog, how="cross")
+    rules = rules.merge(overrides, on=["tenant_id", "empresa_id", "alert_code"], how="left")
+
+    has_cfg = rules["cfg_enabled"].notna()
+    rules["is_enabled"] = np.where(
+        has_cfg, rules["cfg_enabled"].fillna(False).astype(bool), rules["active_by_default"].astype(bool)
+    )
+    rules["threshold_value"] = (
+        pd.to_numeric(rules["cfg_threshold"], errors="coerce")
+        .fillna(rules["default_threshold"])
+        .astype("float64")
+    )
+    severity = rules["cfg_severity"].where(rules["cfg_severity"].notna() & (rules["cfg_severity"] != ""))
+    rules["severity"] = severity.fillna(rules["default_severity"]).astype(str)
+    return rules[rules["is_enabled"]].drop(
+        columns=["cfg_enabled", "cfg_threshold", "cfg_severity", "active_by_default",
+                 "default_threshold", "default_severity", "is_enabled"],
+    )
+
+
+# ── Evaluación ────────────────────────────────────────────────────────────
+
+def _evaluate(
+    medidas: pd.DataFrame,
+    scope: pd.DataFrame,
+    rules: pd.DataFrame,
+    metric_fields: Sequence[str],
+) -> pd.DataFrame:
+    """Devuelve una fila por alerta disparada (sin filtrar gestionadas)."""
+    largo = medidas.melt(
+        id_vars=_KEYS, value_vars=list(metric_fields), var_name="metric_field", value_name="current_value"
+    )
+    ref = largo.rename(columns={"current_value": "ref"})
+
+    prev_m = ref.assign(periodo=ref["periodo"] + 1).rename(columns={"ref": "prev_month"})
+    prev_y = ref.assign(periodo=ref["periodo"] + 12).rename(columns={"ref": "prev_year"})
+
+    cur = largo.merge(scope[_KEYS], on=_KEYS, how="inner")
+    cur = cur.merge(prev_m, on=[*_KEYS, "metric_field"], how="left")
+    cur = cur.merge(prev_y, on=[*_KEYS, "metric_field"], how="left")
+
+    df = cur.merge(rules, on=["tenant_id", "empresa_id", "metric_field"], how="inner")
+    if df.empty:
+        return df
+
+    ct = df["comparison_type"]
+    current = df["current_value"]
+    thr = df["threshold_value"]
+    reference = pd.Series(
+        np.select(
+            [ct == "vs_prev_month", ct == "vs_prev_year"],
+            [df["prev_month"], df["prev_year"]],
+            default=np.nan,
+        ),
+        index=df.index,
+        dtype="float64",
+    )
+
+    is_pct = df["diff_unit"] == "%"
+    with np.errstate(divide="ignore", invalid="ignore"):
+        rel = (current - reference).abs() / reference.abs() * 100.0
+    diff_vs = pd.Series(
+        np.where(is_pct, np.where(reference == 0, np.nan, rel), (current - reference).abs()),
+        index=df.index,
+    )
+
+    is_vs = ct.isin(["vs_prev_month", "vs_prev_year"])
+    diff = pd.Series(np.where(is_vs, diff_vs, current), index=df.index, dtype="float64")
+
+    triggered = current.notna() & (
+        ((ct == "absolute_above") & (current > thr))
+        | ((ct == "absolute_below") & (current < thr))
+        | (is_vs & diff.notna() & (diff > thr))
+    )
+
+    out = df[triggered].copy()
+    out["previous_value"] = reference[triggered]
+    out["diff_value"] = diff[triggered]
+    return out
+
+
+def _messages(df: pd.DataFrame) -> List[str]:
+    # Import tardío: _build_message vive en services, que importa este módulo.
+    from app.alerts.services import _build_message
+
+    return [
+        _build_message(
+            nombre=nombre,
+            comparison_type=ct,
+            current_value=_none_if_nan(cur),
+            reference_value=_none_if_nan(ref),
+            diff_value=_none_if_nan(diff),
+            diff_unit=unit,
+            threshold=float(thr),
+        )
+        for nombre, ct, cur, ref, diff, unit, thr in zip(
+            df["nombre"], df["comparison_type"], df["current_value"], df["previous_value"],
+            df["diff_value"], df["diff_unit"], df["threshold_value"],
+        )
+    ]
+
+
+def _none_if_nan(value: Any) -> Optional[float]:
+    if value is None:
+        return None
+    v = float(value)
+    return None if np.isnan(v) else v
+
+
+# ── Reconciliación ────────────────────────────────────────────────────────
+
+def _load_existing(db: Session, scope: pd.DataFrame) -> pd.DataFrame:
+    cols = ["id", "tenant_id", "empresa_id", "alert_code", "anio", "mes", "lifecycle_status", *_VALUE_FIELDS]
+    q = db.query(*[getattr(AlertResult, c) for c in cols]).filter(
+        AlertResult.tenant_id.in_(scope["tenant_id"].unique().tolist()),
+        AlertResult.empresa_id.in_(scope["empresa_id"].unique().tolist()),
+    )
+    periodos = scope["periodo"].unique().tolist()
+    if len(periodos) <= 1000:
+        q = q.filter(tuple_(AlertResult.anio, AlertResult.mes).in_([_anio_mes(int(p)) for p in periodos]))
+    df = pd.DataFrame(q.all(), columns=cols)
+    if df.empty:
+        return df.assign(periodo=pd.Series(dtype="int64"))
+    df["periodo"] = df["anio"].astype("int64") * 12 + df["mes"].astype("int64") - 1
+    # Solo (empresa, periodo) del alcance: fuera de él no se toca nada.
+    return df.merge(scope[_KEYS], on=_KEYS, how="inner")
+
+
+def _row_changed(existing: Dict[str, Any], desired: Dict[str, Any]) -> bool:
+    for field in _VALUE_FIELDS:
+        a, b = existing.get(field), desired.get(field)
+        if isinstance(a, float) or isinstance(b, float):
+            if a is None or b is None:
+                if a is not b:
+                    return True
+                continue
+            if not np.isclose(float(a), float(b), rtol=0.0, atol=1e-9):
+                return True
+        elif a != b:
+            return True
+    return False
+
+
+def run_alert_engine(
+    db: Session,
+    *,
+    tenant_ids: Optional[Sequence[int]] = None,
+    empresa_ids: Optional[Sequence[int]] = None,
+    periodos: Optional[Sequence[Tuple[int, int]]] = None,
+    commit: bool = True,
+) -> AlertEngineResult:
+    """
+    Recalcula las alertas de todas las (empresa, periodo) del alcance.
+
+    - `tenant_ids` / `empresa_ids` None → sin filtro.
+    - `periodos` = [(anio, mes), ...]; None → todo el histórico.
+    """
+    result = AlertEngineResult()
+
+    catalog = _load_catalog(db)
+    if catalog.empty:
+        return result
+    metric_fields = sorted(catalog["metric_field"].unique().tolist())
+
+    periodos_idx = None if periodos is None else sorted({_periodo(a, m) for a, m in periodos})
+    medidas = _load_medidas(
+        db,
+        metric_fields=metric_fields,
+        tenant_ids=tenant_ids,
+        empresa_ids=empresa_ids,
+        periodos=periodos_idx,
+    )
+    if medidas.empty:
+        return result
+
+    scope = medidas[_KEYS]
+    if periodos_idx is not None:
+        scope = scope[scope["periodo"].isin(periodos_idx)]
+    if scope.empty:
+        return result
+    result.periodos_evaluados = len(scope)
+    result.empresas_procesadas = int(scope["empresa_id"].nunique())
+
+    empresas = scope[["tenant_id", "empresa_id"]].drop_duplicates()
+    rules = _load_effective_rules(db, catalog=catalog, empresas=empresas)
+
+    alerts = _evaluate(medidas, scope, rules, metric_fields)
+    existing = _load_existing(db, scope)
+
+    key_cols = ["tenant_id", "empresa_id", "periodo", "alert_code"]
+    managed = existing[existing["lifecycle_status"].isin(_MANAGED_STATUSES)]
+    nuevas = existing[existing["lifecycle_status"] == "nueva"]
+
+    if not alerts.empty and not managed.empty:
+        alerts = alerts.merge(managed[key_cols].assign(_managed=True), on=key_cols, how="left")
+        alerts = alerts[alerts["_managed"].isna()].drop(columns=["_managed"])
+
+    desired_by_key: Dict[Tuple[int, int, int, str], Dict[str, Any]] = {}
+    if not alerts.empty:
+        alerts = alerts.assign(message=_messages(alerts))
+        for rec in alerts.to_dict("records"):
+            anio, mes = _anio_mes(int(rec["periodo"]))
+            key = (int(rec["tenant_id"]), int(rec["empresa_id"]), int(rec["periodo"]), str(rec["alert_code"]))
+            desired_by_key[key] = {
+                "tenant_id": key[0],
+                "empresa_id": key[1],
+                "alert_code": key[3],
+                "anio": anio,
+                "mes": mes,
+                "status": "triggered",
+                "severity": str(rec["severity"]),
+                "current_value": _none_if_nan(rec["current_value"]),
+                "previous_value": _none_if_nan(rec["previous_value"]),
+                "diff_value": _none_if_nan(rec["diff_value"]),
+                "diff_unit": str(rec["diff_unit"]),
+                "threshold_value": float(rec["threshold_value"]),
+                "message": rec["message"],
+                "lifecycle_status": "nueva",
+            }
+    result.triggered = len(desired_by_key)
+
+    to_update: List[Dict[str, Any]] = []
+    to_delete: List[int] = []
+    for rec in nuevas.to_dict("records"):
+        key = (int(rec["tenant_id"]), int(rec["empresa_id"]), int(rec["periodo"]), str(rec["alert_code"]))
+        desired = desired_by_key.pop(key, None)
+        if desired is None:
+            to_delete.append(int(rec["id"]))
+        elif _row_changed(rec, desired):
+            to_update.append({"id": int(rec["id"]), **{f: desired[f] for f in _VALUE_FIELDS}})
+
+    to_insert = list(desired_by_key.values())
+
+    if to_delete:
+        for i in range(0, len(to_delete), 5000):
+            db.query(AlertResult).filter(
+                AlertResult.id.in_(to_delete[i:i + 5000])
+            ).delete(synchronize_session=False)
+    if to_update:
+        db.bulk_update_mappings(AlertResult, to_update)
+    if to_insert:
+        db.bulk_insert_mappings(AlertResult, to_insert)
+
+    result.borradas = len(to_delete)
+    result.actualizadas = len(to_update)
+    result.insertadas = len(to_insert)
+
+    if commit:
+        db.commit()
+    else:
+        db.flush()
+    return result
@@ -18,6 +18,8 @@ from app.alerts.schemas import (
     AlertLifecyclePayload,
     AlertRecalculateAllPayload,
     AlertRecalculateAllResponse,
+    AlertRecalculateHistoryPayload,
+    AlertRecalculateHistoryResponse,
     AlertRecalculatePayload,
     AlertRecalculateResponse,
     AlertResultRead,
@@ -35,6 +37,7 @@ from app.alerts.services import (
     list_alert_results,
     recalculate_alerts_all_empresas,
     recalculate_alerts_for_period,
+    recalculate_alerts_history,
     upsert_empresa_alert_config,
 )
 from app.core.auth import get_current_user
@@ -345,6 +348,25 @@ def recalculate_all(
     )
 
 
+@router.post("/admin/recalculate-history", response_model=AlertRecalculateHistoryResponse)
+def admin_recalculate_history(
+    payload: AlertRecalculateHistoryPayload,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Recalcula todo el histórico de alertas (un tenant o todos) en una sola
+    pasada del motor vectorizado. Solo superusuario.
+    """
+    if not _is_superuser(current_user):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo el superusuario puede usar esta operación.",
+        )
+    stats = recalculate_alerts_history(db, tenant_id=payload.tenant_id)
+    return AlertRecalculateHistoryResponse(tenant_id=payload.tenant_id, **stats)
+
+
 # ── Admin: Reset y Borrado (solo superusuario) ────────────────────────────
 
 @router.post("/admin/reset", response_model=AlertAdminResetResponse)
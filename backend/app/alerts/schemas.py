@@ -116,6 +116,18 @@ class AlertRecalculateAllResponse(BaseModel):
     empresas_procesadas: int
     total_triggered: int
 
+class AlertRecalculateHistoryPayload(BaseModel):
+    tenant_id: Optional[int] = None  # None → todos los tenants
+
+class AlertRecalculateHistoryResponse(BaseModel):
+    tenant_id: Optional[int]
+    periodos_evaluados: int
+    empresas_procesadas: int
+    triggered: int
+    insertadas: int
+    actualizadas: int
+    borradas: int
+
 # ── Periodos disponibles ──────────────────────────────────────────────────
 
 class AlertAvailablePeriodsRead(BaseModel):
@@ -5,6 +5,7 @@ from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple, cast
 
 from sqlalchemy.orm import Session
 
+from app.alerts.engine import run_alert_engine
 from app.alerts.models import AlertComment, AlertResult, AlertRuleCatalog, EmpresaAlertRuleConfig
 from app.core.datetime_utils import ahora_madrid
 from app.alerts.schemas import AlertCommentRead, AlertResultRead, EmpresaAlertRuleConfigItem
@@ -28,14 +29,6 @@ def _float_or_none(obj: Any, attr: str) -> Optional[float]:
     v = getattr(obj, attr, None)
     return None if v is None else float(v)
 
-def _to_float_or_none(value: Any) -> Optional[float]:
-    if value is None:
-        return None
-    try:
-        return float(value)
-    except Exception:
-        return None
-
 
 # ── Catálogo ──────────────────────────────────────────────────────────────
 
@@ -156,72 +149,6 @@ def upsert_empresa_alert_config(
 
 # ── Lógica de cálculo ─────────────────────────────────────────────────────
 
-def _get_medida_general(
-    db: Session,
-    *,
-    tenant_id: int,
-    empresa_id: int,
-    anio: int,
-    mes: int,
-) -> Optional[MedidaGeneral]:
-    return cast(
-        Optional[MedidaGeneral],
-        db.query(MedidaGeneral).filter(
-            MedidaGeneral.tenant_id == tenant_id,
-            MedidaGeneral.empresa_id == empresa_id,
-            MedidaGeneral.anio == anio,
-            MedidaGeneral.mes == mes,
-        ).first(),
-    )
-
-
-def _prev_month(anio: int, mes: int) -> Tuple[int, int]:
-    if mes == 1:
-        return anio - 1, 12
-    return anio, mes - 1
-
-
-def _prev_year(anio: int, mes: int) -> Tuple[int, int]:
-    return anio - 1, mes
-
-
-def _compute_alert(
-    *,
-    comparison_type: str,
-    current_value: Optional[float],
-    reference_value: Optional[float],
-    threshold: float,
-    diff_unit: str,
-) -> Tuple[bool, Optional[float]]:
-    if current_value is None:
-        return False, None
-
-    if comparison_type == "absolute_above":
-        if current_value > threshold:
-            return True, current_value
-        return False, None
-
-    if comparison_type == "absolute_below":
-        if current_value < threshold:
-            return True, current_value
-        return False, None
-
-    if comparison_type in ("vs_prev_month", "vs_prev_year"):
-        if reference_value is None:
-            return False, None
-        if diff_unit == "%":
-            if reference_value == 0:
-                return False, None
-            diff = abs((current_value - reference_value) / abs(reference_value)) * 100.0
-        else:
-            diff = abs(current_value - reference_value)
-        if diff > threshold:
-            return True, diff
-        return False, None
-
-    return False, None
-
-
 def _fmt(v: Optional[float]) -> str:
     return f"{v:.2f}" if v is not None else "—"
 
@@ -261,6 +188,10 @@ def _build_message(
 
 
 # ── Recálculo principal ───────────────────────────────────────────────────
+#
+# El cálculo vive en app/alerts/engine.py (vectorizado, una pasada para
+# cualquier conjunto de empresas/periodos). Estas funciones mantienen la
+# firma que usan las rutas y la ingestion.
 
 def recalculate_alerts_for_period(
     db: Session,
@@ -275,124 +206,15 @@ def recalculate_alerts_for_period(
     - Solo borra alertas con lifecycle_status = "nueva"
     - No toca "en_revision" ni "resuelta"
     - No guarda no_reference
-    - Devuelve el número de alertas triggered creadas
+    - Devuelve el número de alertas triggered vigentes en estado "nueva"
     """
-    current_row = _get_medida_general(
-        db, tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes
+    result = run_alert_engine(
+        db,
+        tenant_ids=[tenant_id],
+        empresa_ids=[empresa_id],
+        periodos=[(anio, mes)],
     )
-    if current_row is None:
-        return 0
-
-    prev_m_anio, prev_m_mes = _prev_month(anio, mes)
-    prev_y_anio, prev_y_mes = _prev_year(anio, mes)
-    prev_month_row = _get_medida_general(
-        db, tenant_id=tenant_id, empresa_id=empresa_id, anio=prev_m_anio, mes=prev_m_mes
-    )
-    prev_year_row = _get_medida_general(
-        db, tenant_id=tenant_id, empresa_id=empresa_id, anio=prev_y_anio, mes=prev_y_mes
-    )
-
-    effective_rules = get_empresa_alert_effective_config(
-        db, tenant_id=tenant_id, empresa_id=empresa_id
-    )
-
-    # Borrar solo las "nueva" — no tocar en_revision ni resuelta
-    db.query(AlertResult).filter(
-        AlertResult.tenant_id == tenant_id,
-        AlertResult.empresa_id == empresa_id,
-        AlertResult.anio == anio,
-        AlertResult.mes == mes,
-        AlertResult.lifecycle_status == "nueva",
-    ).delete(synchronize_session=False)
-    db.flush()
-
-    catalog = cast(List[AlertRuleCatalog], db.query(AlertRuleCatalog).all())
-    catalog_by_code: Dict[str, AlertRuleCatalog] = {_str(c, "code"): c for c in catalog}
-
-    # Códigos que ya tienen alerta gestionada — no tocar
-    existing_managed = cast(
-        List[AlertResult],
-        db.query(AlertResult).filter(
-            AlertResult.tenant_id == tenant_id,
-            AlertResult.empresa_id == empresa_id,
-            AlertResult.anio == anio,
-            AlertResult.mes == mes,
-            AlertResult.lifecycle_status.in_(["en_revision", "resuelta"]),
-        ).all(),
-    )
-    managed_codes = {_str(r, "alert_code") for r in existing_managed}
-
-    triggered_count = 0
-
-    for rule in effective_rules:
-        if not rule.is_enabled:
-            continue
-        if rule.alert_code in managed_codes:
-            continue
-
-        catalog_rule = catalog_by_code.get(rule.alert_code)
-        if catalog_rule is None:
-            continue
-
-        metric_field = _str(catalog_rule, "metric_field")
-        comparison_type = _str(catalog_rule, "comparison_type")
-        current_value = _to_float_or_none(getattr(current_row, metric_field, None))
-
-        if comparison_type == "vs_prev_month":
-            ref_value = (
-                _to_float_or_none(getattr(prev_month_row, metric_field, None))
-                if prev_month_row else None
-            )
-        elif comparison_type == "vs_prev_year":
-            ref_value = (
-                _to_float_or_none(getattr(prev_year_row, metric_field, None))
-                if prev_year_row else None
-            )
-        else:
-            ref_value = None
-
-        triggered, diff_value = _compute_alert(
-            comparison_type=comparison_type,
-            current_value=current_value,
-            reference_value=ref_value,
-            threshold=float(rule.threshold_value),
-            diff_unit=rule.diff_unit,
-        )
-
-        if not triggered:
-            continue
-
-        result = AlertResult()
-        r = _as_any(result)
-        r.tenant_id = tenant_id
-        r.empresa_id = empresa_id
-        r.alert_code = rule.alert_code
-        r.anio = anio
-        r.mes = mes
-        r.status = "triggered"
-        r.severity = rule.severity
-        r.current_value = current_value
-        r.previous_value = ref_value
-        r.diff_value = diff_value
-        r.diff_unit = rule.diff_unit
-        r.threshold_value = float(rule.threshold_value)
-        r.lifecycle_status = "nueva"
-        r.resolved_by = None
-        r.resolved_at = None
-        r.message = _build_message(
-            nombre=rule.nombre,
-            comparison_type=comparison_type,
-            current_value=current_value,
-            reference_value=ref_value,
-            diff_value=diff_value,
-            diff_unit=rule.diff_unit,
-            threshold=float(rule.threshold_value),
-        )
-        db.add(result)
-        triggered_count += 1
-
-    db.commit()
-    return triggered_count
+    return result.triggered
 
 
 def recalculate_alerts_all_empresas(
@@ -406,28 +228,45 @@ def recalculate_alerts_all_empresas(
     Recalcula alertas para todas las empresas activas del tenant en un periodo.
     Devuelve (empresas_procesadas, total_triggered).
     """
-    empresas = cast(
-        List[Empresa],
-        db.query(Empresa).filter(
+    empresa_ids = [
+        int(eid)
+        for (eid,) in db.query(Empresa.id).filter(
             Empresa.tenant_id == tenant_id,
             Empresa.activo.is_(True),
-        ).all(),
+        ).all()
+    ]
+    if not empresa_ids:
+        return 0, 0
+    result = run_alert_engine(
+        db,
+        tenant_ids=[tenant_id],
+        empresa_ids=empresa_ids,
+        periodos=[(anio, mes)],
     )
-    total_triggered = 0
-    empresas_procesadas = 0
-    for empresa in empresas:
-        empresa_id = _int(empresa, "id")
-        row = _get_medida_general(
-            db, tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes
-        )
-        if row is None:
-            continue
-        triggered = recalculate_alerts_for_period(
-            db, tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes
-        )
-        total_triggered += triggered
-        empresas_procesadas += 1
-    return empresas_procesadas, total_triggered
+    return result.empresas_procesadas, result.triggered
+
+
+def recalculate_alerts_history(
+    db: Session,
+    *,
+    tenant_id: Optional[int] = None,
+) -> Dict[str, int]:
+    """
+    Recalcula TODO el histórico de alertas (de un tenant o de todos si
+    `tenant_id` es None) en una sola pasada del motor.
+    """
+    result = run_alert_engine(
+        db,
+        tenant_ids=None if tenant_id is None else [tenant_id],
+    )
+    return {
+        "periodos_evaluados": result.periodos_evaluados,
+        "empresas_procesadas": result.empresas_procesadas,
+        "triggered": result.triggered,
+        "insertadas": result.insertadas,
+        "actualizadas": result.actualizadas,
+        "borradas": result.borradas,
+    }
 
 
 # ── Ciclo de vida ─────────────────────────────────────────────────────────
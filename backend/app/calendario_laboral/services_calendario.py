@@ -0,0 +1,189 @@
+# app/calendario_laboral/services_calendario.py
+# pyright: reportMissingImports=false
+"""
+Calendario laboral Madrid precalculado por tenant.
+
+Los plazos REE (4º / 11º día hábil del mes) se calculaban recorriendo el mes
+día a día contra un `set` de festivos, para cada empresa × M en cada
+ejecución de alertas y del dashboard. Aquí cada año se materializa una vez
+en un índice denso:
+
+  • habiles_hasta[d]: nº de días hábiles del año hasta el día d (incluido),
+    con d = día del año - 1. Da el ordinal de un día hábil y los días
+    hábiles entre dos fechas con una resta.
+  • por_mes[m]: tupla con los días hábiles del mes m. El n-ésimo es un
+    acceso por índice.
+
+Festivos de un año:
+  • Si el tenant tiene filas en dias_festivos_madrid para ese año: las
+    activas (AUTO + MANUAL; una AUTO desactivada deja de ser festivo).
+  • Si no tiene ninguna: los calculados (calcular_festivos_madrid), sin
+    guardarlos. La siembra en BD la siguen haciendo services_db y la
+    página de festivos.
+
+Caché en proceso por tenant, validada con la huella (nº filas,
+max(updated_at)) de dias_festivos_madrid del tenant: cualquier alta,
+edición, toggle, borrado o recálculo de festivos la invalida, también si
+lo hace otro worker. Cada `obtener_calendario` cuesta esa consulta; las
+búsquedas posteriores no tocan la BD.
+"""
+from __future__ import annotations
+
+import threading
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, Iterable, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.calendario_laboral.models import DiaFestivoMadrid
+from app.calendario_laboral.services_festivos import calcular_festivos_madrid
+
+
+# ── Índice de un año ─────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class IndiceAnio:
+    anio: int
+    festivos: frozenset
+    habiles_hasta: Tuple[int, ...]
+    por_mes: Tuple[Tuple[date, ...], ...]
+
+    @property
+    def total_habiles(self) -> int:
+        return self.habiles_hasta[-1]
+
+
+def construir_indice(anio: int, festivos: Iterable[date]) -> IndiceAnio:
+    festivos = frozenset(f for f in festivos if f.year == anio)
+    habiles_hasta = []
+    por_mes: list[list[date]] = [[] for _ in range(12)]
+    n = 0
+    d = date(anio, 1, 1)
+    while d.year == anio:
+        if d.weekday() < 5 and d not in festivos:
+            n += 1
+            por_mes[d.month - 1].append(d)
+        habiles_hasta.append(n)
+        d += timedelta(days=1)
+    return IndiceAnio(
+        anio=anio,
+        festivos=festivos,
+        habiles_hasta=tuple(habiles_hasta),
+        por_mes=tuple(tuple(m) for m in por_mes),
+    )
+
+
+# ── Calendario de un tenant ──────────────────────────────────────────────
+
+class CalendarioLaboral:
+    """
+    Días hábiles de un tenant. Los años se indexan la primera vez que se
+    consultan; los de `festivos_bd` usan los festivos de BD y el resto los
+    calculados.
+    """
+
+    def __init__(self, festivos_bd: Dict[int, frozenset]) -> None:
+        self._festivos_bd = festivos_bd
+        self._anios: Dict[int, IndiceAnio] = {}
+
+    def anio(self, anio: int) -> IndiceAnio:
+        indice = self._anios.get(anio)
+        if indice is None:
+            festivos = self._festivos_bd.get(anio)
+            if festivos is None:
+                festivos = frozenset(f.fecha for f in calcular_festivos_madrid(anio))
+            indice = construir_indice(anio, festivos)
+            self._anios[anio] = indice
+        return indice
+
+    def festivos(self, anio: int) -> frozenset:
+        return self.anio(anio).festivos
+
+    def es_habil(self, fecha: date) -> bool:
+        return fecha.weekday() < 5 and fecha not in self.anio(fecha.year).festivos
+
+    def dias_habiles_mes(self, anio: int, mes: int) -> Tuple[date, ...]:
+        return self.anio(anio).por_mes[mes - 1]
+
+    def nth_dia_habil(self, anio: int, mes: int, n: int) -> Optional[date]:
+        """n-ésimo día hábil del mes (1-based), None si no existe."""
+        if n < 1 or mes < 1 or mes > 12:
+            return None
+        dias = self.dias_habiles_mes(anio, mes)
+        return dias[n - 1] if n <= len(dias) else None
+
+    def ordinal(self, fecha: date) -> Optional[int]:
+        """Posición del día hábil dentro de su año (1 = primero). None si no es hábil."""
+        if not self.es_habil(fecha):
+            return None
+        return self.anio(fecha.year).habiles_hasta[fecha.timetuple().tm_yday - 1]
+
+    def _habiles_hasta(self, fecha: date) -> int:
+        """Días hábiles desde el 1-ene de `fecha.year` hasta `fecha` (incluida)."""
+        return self.anio(fecha.year).habiles_hasta[fecha.timetuple().tm_yday - 1]
+
+    def habiles_entre(self, desde: date, hasta: date) -> int:
+        """
+        Días hábiles en (desde, hasta]: cuenta `hasta` pero no `desde`, y
+        es negativo si hasta < desde. habiles_entre(lunes, viernes) = 4 en
+        una semana sin festivos.
+        """
+        if hasta < desde:
+            return -self.habiles_entre(hasta, desde)
+        total = self._habiles_hasta(hasta) - self._habiles_hasta(desde)
+        for anio in range(desde.year, hasta.year):
+            total += self.anio(anio).total_habiles
+        return total
+
+
+# ── Caché por tenant ─────────────────────────────────────────────────────
+
+_cache: Dict[int, Tuple[str, CalendarioLaboral]] = {}
+_cache_lock = threading.Lock()
+
+
+def _huella(db: Session, tenant_id: int) -> str:
+    n, ultimo = (
+        db.query(func.count(DiaFestivoMadrid.id), func.max(DiaFestivoMadrid.updated_at))
+        .filter(DiaFestivoMadrid.tenant_id == tenant_id)
+        .one()
+    )
+    return f"{int(n or 0)}:{ultimo.isoformat() if ultimo else '-'}"
+
+
+def _cargar(db: Session, tenant_id: int) -> CalendarioLaboral:
+    por_anio: Dict[int, set] = {}
+    rows = (
+        db.query(DiaFestivoMadrid.anio, DiaFestivoMadrid.fecha, DiaFestivoMadrid.activo)
+        .filter(DiaFestivoMadrid.tenant_id == tenant_id)
+        .all()
+    )
+    for anio, fecha, activo in rows:
+        festivos = por_anio.setdefault(int(anio), set())
+        if activo:
+            festivos.add(fecha)
+    return CalendarioLaboral({a: frozenset(f) for a, f in por_anio.items()})
+
+
+def obtener_calendario(db: Session, *, tenant_id: int) -> CalendarioLaboral:
+    """Calendario del tenant, reconstruido solo si sus festivos han cambiado."""
+    huella = _huella(db, tenant_id)
+    with _cache_lock:
+        entrada = _cache.get(tenant_id)
+        if entrada is not None and entrada[0] == huella:
+            return entrada[1]
+    calendario = _cargar(db, tenant_id)
+    with _cache_lock:
+        _cache[tenant_id] = (huella, calendario)
+    return calendario
+
+
+def invalidar(tenant_id: Optional[int] = None) -> None:
+    """Vacía la caché de un tenant (o toda). Para tests y scripts."""
+    with _cache_lock:
+        if tenant_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(tenant_id, None)
@@ -12,8 +12,11 @@ Capa intermedia entre los endpoints (routes.py) y la BD que se encarga de:
   • recalcular_anio(...): borra los festivos AUTO de un año, vuelve a
     calcularlos y los inserta. Mantiene los MANUAL.
 
-  • cargar_festivos_set_activos(...): util para el cálculo de plazos REE.
-    Devuelve un `set[date]` con los festivos activos del año.
+  • cargar_festivos_set_activos(...): `set[date]` con los festivos activos
+    del año.
+
+Los plazos REE no leen de aquí: usan el calendario precalculado y cacheado
+de services_calendario.obtener_calendario.
 """
 from __future__ import annotations
 
@@ -109,8 +112,7 @@ def cargar_festivos_set_activos(
     """
     Devuelve un `set[date]` con las fechas de los festivos ACTIVOS del año.
 
-    Optimizado para el cálculo de plazos REE (nth_dia_habil_madrid). Si no
-    hay festivos para ese año, los calcula y guarda automáticamente.
+    Si no hay festivos para ese año, los calcula y guarda automáticamente.
     """
     festivos, _ = cargar_festivos_anio(db, tenant_id=tenant_id, anio=anio)
     return {
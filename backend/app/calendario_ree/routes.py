@@ -13,6 +13,7 @@ from openpyxl import load_workbook
 from sqlalchemy import or_
 from sqlalchemy.orm import Query as SAQuery, Session
 
+from app.calendario_ree import services_indice
 from app.calendario_ree.models import ReeCalendarEvent, ReeCalendarFile
 from app.calendario_ree.schemas import (
     ReeCalendarDashboardHitosResponse,
@@ -537,6 +538,10 @@ def _replace_operativo_events_for_year(
     for item in items:
         db.refresh(item)
 
+    # Subida, activación y re-siembra pasan por aquí: se re-parsea el
+    # calendario del tenant para dashboards y jobs.
+    services_indice.recargar(db, tenant_id=tenant_id)
+
     return items
 
 
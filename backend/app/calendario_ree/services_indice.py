@@ -0,0 +1,343 @@
+# app/calendario_ree/services_indice.py
+# pyright: reportMissingImports=false
+"""
+Índice en memoria del calendario REE por tenant.
+
+El dashboard de tablas, la descarga de publicaciones y los jobs de
+objeciones consultaban ree_calendar_events cada vez y recorrían las filas
+buscando subcadenas en `evento` y parseando `mes_afectado` ("Junio 2026").
+Aquí cada evento se convierte una sola vez en un `HitoRee` tipado:
+
+  • tipo: el hito que representa (publicación M1/M2/M7/M11/ART15, fin de
+    recepción / resolución de objeciones) o None si no es ninguno de esos.
+  • mes_afectado: (anio, mes) ya parseado.
+
+y el índice guarda los hitos ordenados por fecha (globales y por tipo) y
+por (tipo, mes_afectado). Las preguntas habituales ("qué mes publica M7 en
+mayo", "hitos de los próximos N días") son una bisección o un acceso a dict.
+
+Caché por tenant validada con la huella de ree_calendar_files +
+ree_calendar_events (nº filas, max(id), max(updated_at)): subir, activar o
+re-sembrar un calendario la invalida, también en otros workers. Las rutas
+de subida/activación la reconstruyen al terminar (`recargar`).
+"""
+from __future__ import annotations
+
+import bisect
+import threading
+import unicodedata
+from dataclasses import dataclass
+from datetime import date, timedelta
+from typing import Dict, List, Optional, Tuple
+
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.calendario_ree.models import ReeCalendarEvent, ReeCalendarFile
+from app.core.datetime_utils import ahora_madrid
+
+
+# ── Tipos de hito ────────────────────────────────────────────────────────
+
+HITO_PUBLICACION_M1 = "publicacion_m1"
+HITO_PUBLICACION_M2 = "publicacion_m2"
+HITO_PUBLICACION_M7 = "publicacion_m7"
+HITO_PUBLICACION_M11 = "publicacion_m11"
+HITO_PUBLICACION_ART15 = "publicacion_art15"
+HITO_FIN_RECEPCION_OBJECIONES = "fin_recepcion_objeciones"
+HITO_FIN_RESOLUCION_OBJECIONES = "fin_resolucion_objeciones"
+
+# Reglas de clasificación, en orden (gana la primera). Texto normalizado:
+# minúsculas y sin tildes.
+#   (tipo, categoria exigida o None, texto, exacto)
+# Los FIN de objeciones son por texto EXACTO para no capturar
+# "FIN RECEPCIÓN AUTO-OBJECIONES". ART15 va antes que M7/M11 porque su
+# evento también habla de "cierre".
+_REGLAS: Tuple[Tuple[str, Optional[str], str, bool], ...] = (
+    (HITO_FIN_RECEPCION_OBJECIONES, None, "fin recepcion objeciones", True),
+    (HITO_FIN_RESOLUCION_OBJECIONES, None, "fin resolucion objeciones", True),
+    (HITO_PUBLICACION_M1, "m+1", "cierre m+1", False),
+    (HITO_PUBLICACION_M2, "m+2", "cierre m+2", False),
+    (HITO_PUBLICACION_ART15, "art. 15", "publicacion nuevo cierre", False),
+    (HITO_PUBLICACION_M7, None, "cierre provisional", False),
+    (HITO_PUBLICACION_M11, None, "cierre definitivo", False),
+)
+
+_MESES: Dict[str, int] = {
+    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
+    "julio": 7, "agosto": 8, "septiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
+}
+_MESES_ABREV: Dict[str, int] = {nombre[:3]: num for nombre, num in _MESES.items()}
+
+
+def _normalizar(texto: Optional[str]) -> str:
+    sin_tildes = unicodedata.normalize("NFKD", texto or "").encode("ascii", "ignore").decode("ascii")
+    return " ".join(sin_tildes.lower().split())
+
+
+def clasificar_evento(categoria: Optional[str], evento: Optional[str]) -> Optional[str]:
+    """Tipo de hito de un evento del calendario, o None si no es de los conocidos."""
+    cat = _normalizar(categoria)
+    ev = _normalizar(evento)
+    for tipo, categoria_req, texto, exacto in _REGLAS:
+        if categoria_req is not None and categoria_req not in cat:
+            continue
+        if (ev == texto) if exacto else (texto in ev):
+            return tipo
+    return None
+
+
+def parsear_mes_afectado(texto: Optional[str]) -> Optional[Tuple[int, int]]:
+    """'Junio 2025' o 'Jun 25' → (2025, 6). None si no parsea."""
+    partes = _normalizar(texto).split(" ")
+    if len(partes) != 2:
+        return None
+    nombre, anio_str = partes
+    mes = _MESES.get(nombre) or _MESES_ABREV.get(nombre[:3])
+    if mes is None or not anio_str.isdigit():
+        return None
+    anio = int(anio_str)
+    if anio < 100:
+        anio += 2000
+    return anio, mes
+
+
+# ── Hitos e índice ───────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class HitoRee:
+    id: int
+    calendar_file_id: Optional[int]
+    anio: int
+    fecha: date
+    sort_order: int
+    categoria: str
+    evento: str
+    tipo: Optional[str]
+    mes_afectado: Optional[Tuple[int, int]]
+    mes_afectado_texto: str
+
+    @property
+    def periodo_yyyymm(self) -> Optional[str]:
+        if self.mes_afectado is None:
+            return None
+        return f"{self.mes_afectado[0]:04d}{self.mes_afectado[1]:02d}"
+
+
+def _primer_dia_mes_siguiente(anio: int, mes: int) -> date:
+    return date(anio + 1, 1, 1) if mes == 12 else date(anio, mes + 1, 1)
+
+
+class _Serie:
+    """Hitos ordenados por (fecha, sort_order, id) con sus fechas para bisect."""
+
+    def __init__(self, hitos: List[HitoRee]) -> None:
+        self.hitos = sorted(hitos, key=lambda h: (h.fecha, h.sort_order, h.id))
+        self.fechas = [h.fecha for h in self.hitos]
+
+    def rango(self, desde: date, hasta: date) -> List[HitoRee]:
+        """Hitos con desde <= fecha <= hasta."""
+        i = bisect.bisect_left(self.fechas, desde)
+        j = bisect.bisect_right(self.fechas, hasta)
+        return self.hitos[i:j]
+
+
+class IndiceCalendarioRee:
+    """Calendario REE de un tenant, ya parseado y ordenado."""
+
+    def __init__(self, hitos: List[HitoRee], archivo_activo_id: Optional[int]) -> None:
+        # Fichero activo más reciente (mismo criterio que el dashboard).
+        self.archivo_activo_id = archivo_activo_id
+        self._todos = _Serie(hitos)
+        por_tipo: Dict[str, List[HitoRee]] = {}
+        for h in hitos:
+            if h.tipo is not None:
+                por_tipo.setdefault(h.tipo, []).append(h)
+        self._por_tipo = {tipo: _Serie(hs) for tipo, hs in por_tipo.items()}
+        # (tipo, anio, mes afectado) → hitos en orden de fecha.
+        self._por_afectado: Dict[Tuple[str, int, int], List[HitoRee]] = {}
+        for serie in self._por_tipo.values():
+            for h in serie.hitos:
+                if h.mes_afectado is not None:
+                    clave = (h.tipo or "", h.mes_afectado[0], h.mes_afectado[1])
+                    self._por_afectado.setdefault(clave, []).append(h)
+
+    def __len__(self) -> int:
+        return len(self._todos.hitos)
+
+    def _serie(self, tipo: Optional[str]) -> Optional[_Serie]:
+        return self._todos if tipo is None else self._por_tipo.get(tipo)
+
+    def en_rango(
+        self,
+        desde: date,
+        hasta: date,
+        *,
+        tipo: Optional[str] = None,
+        calendar_file_id: Optional[int] = None,
+    ) -> List[HitoRee]:
+        """Hitos con fecha en [desde, hasta], de un tipo o todos."""
+        serie = self._serie(tipo)
+        if serie is None or hasta < desde:
+            return []
+        hitos = serie.rango(desde, hasta)
+        if calendar_file_id is not None:
+            hitos = [h for h in hitos if h.calendar_file_id == calendar_file_id]
+        return hitos
+
+    def en_fecha(self, fecha: date, *, tipo: Optional[str] = None) -> List[HitoRee]:
+        return self.en_rango(fecha, fecha, tipo=tipo)
+
+    def en_mes(
+        self,
+        anio: int,
+        mes: int,
+        *,
+        tipo: Optional[str] = None,
+        calendar_file_id: Optional[int] = None,
+    ) -> List[HitoRee]:
+        """Hitos cuya fecha cae en el mes natural (anio, mes)."""
+        return self.en_rango(
+            date(anio, mes, 1),
+            _primer_dia_mes_siguiente(anio, mes) - timedelta(days=1),
+            tipo=tipo,
+            calendar_file_id=calendar_file_id,
+        )
+
+    def proximos(
+        self,
+        dias: int,
+        *,
+        desde: Optional[date] = None,
+        tipo: Optional[str] = None,
+    ) -> List[HitoRee]:
+        """Hitos en los próximos `dias` días: [desde, desde + dias - 1]."""
+        inicio = desde or ahora_madrid().date()
+        return self.en_rango(inicio, inicio + timedelta(days=dias - 1), tipo=tipo)
+
+    def mes_publicado_en(
+        self,
+        tipo: str,
+        anio: int,
+        mes: int,
+        *,
+        calendar_file_id: Optional[int] = None,
+    ) -> Optional[Tuple[int, int]]:
+        """
+        Mes afectado (anio, mes) del primer hito `tipo` que cae en el mes de
+        publicación (anio, mes). P. ej. qué mes publica M7 en mayo 2026.
+        """
+        for h in self.en_mes(anio, mes, tipo=tipo, calendar_file_id=calendar_file_id):
+            if h.mes_afectado is not None:
+                return h.mes_afectado
+        return None
+
+    def hito_de(
+        self,
+        tipo: str,
+        anio: int,
+        mes: int,
+        *,
+        calendar_file_id: Optional[int] = None,
+    ) -> Optional[HitoRee]:
+        """Primer hito `tipo` cuyo mes afectado es (anio, mes)."""
+        for h in self._por_afectado.get((tipo, anio, mes), ()):
+            if calendar_file_id is None or h.calendar_file_id == calendar_file_id:
+                return h
+        return None
+
+
+def construir_indice(
+    eventos: List[ReeCalendarEvent],
+    *,
+    archivo_activo_id: Optional[int] = None,
+) -> IndiceCalendarioRee:
+    hitos: List[HitoRee] = []
+    for ev in eventos:
+        fecha = ev.fecha
+        if fecha is None:
+            continue
+        categoria = str(ev.categoria or "")
+        evento = str(ev.evento or "")
+        mes_afectado_texto = str(ev.mes_afectado or "")
+        hitos.append(HitoRee(
+            id=int(ev.id),
+            calendar_file_id=int(ev.calendar_file_id) if ev.calendar_file_id is not None else None,
+            anio=int(ev.anio),
+            fecha=fecha,
+            sort_order=int(ev.sort_order or 0),
+            categoria=categoria,
+            evento=evento,
+            tipo=clasificar_evento(categoria, evento),
+            mes_afectado=parsear_mes_afectado(mes_afectado_texto),
+            mes_afectado_texto=mes_afectado_texto,
+        ))
+    return IndiceCalendarioRee(hitos, archivo_activo_id)
+
+
+# ── Caché por tenant ─────────────────────────────────────────────────────
+
+_cache: Dict[int, Tuple[str, IndiceCalendarioRee]] = {}
+_cache_lock = threading.Lock()
+
+
+def _huella(db: Session, tenant_id: int) -> str:
+    partes = []
+    for modelo in (ReeCalendarFile, ReeCalendarEvent):
+        n, max_id, ultimo = (
+            db.query(func.count(modelo.id), func.max(modelo.id), func.max(modelo.updated_at))
+            .filter(modelo.tenant_id == tenant_id)
+            .one()
+        )
+        partes.append(f"{int(n or 0)}:{int(max_id or 0)}:{ultimo.isoformat() if ultimo else '-'}")
+    return "|".join(partes)
+
+
+def _cargar(db: Session, tenant_id: int) -> IndiceCalendarioRee:
+    activo = (
+        db.query(ReeCalendarFile.id)
+        .filter(
+            ReeCalendarFile.tenant_id == tenant_id,
+            ReeCalendarFile.is_active.is_(True),
+        )
+        .order_by(
+            ReeCalendarFile.anio.desc(),
+            ReeCalendarFile.created_at.desc(),
+            ReeCalendarFile.id.desc(),
+        )
+        .first()
+    )
+    eventos = (
+        db.query(ReeCalendarEvent)
+        .filter(ReeCalendarEvent.tenant_id == tenant_id)
+        .all()
+    )
+    return construir_indice(eventos, archivo_activo_id=int(activo[0]) if activo else None)
+
+
+def obtener_indice(db: Session, *, tenant_id: int) -> IndiceCalendarioRee:
+    """Índice del tenant, reconstruido solo si el calendario ha cambiado."""
+    huella = _huella(db, tenant_id)
+    with _cache_lock:
+        entrada = _cache.get(tenant_id)
+        if entrada is not None and entrada[0] == huella:
+            return entrada[1]
+    indice = _cargar(db, tenant_id)
+    with _cache_lock:
+        _cache[tenant_id] = (huella, indice)
+    return indice
+
+
+def recargar(db: Session, *, tenant_id: int) -> IndiceCalendarioRee:
+    """Descarta el índice del tenant y lo reconstruye (tras subir/activar)."""
+    invalidar(tenant_id)
+    return obtener_indice(db, tenant_id=tenant_id)
+
+
+def invalidar(tenant_id: Optional[int] = None) -> None:
+    """Vacía la caché de un tenant (o toda)."""
+    with _cache_lock:
+        if tenant_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(tenant_id, None)
@@ -13,6 +13,7 @@ from sqlalchemy.orm import Session
 
 from app.core.auth import get_current_user
 from app.core.db import get_db
+from app.core.perf import perf_budget
 from app.tenants.models import User
 from app.comunicaciones import services
 from app.comunicaciones.schemas import (
@@ -43,6 +44,7 @@ def _assert_not_viewer(user: User) -> None:
 # ── Configuraciones ───────────────────────────────────────────────────────────
 
 @router.get("/configs", response_model=List[FtpConfigRead])
+@perf_budget(queries=6)
 def get_configs(db: Session = Depends(get_db), current_user: User = Depends(get_current_user)):
     _assert_not_viewer(current_user)
     return services.list_configs(db, tenant_id=_tenant_id(current_user))
@@ -269,6 +271,7 @@ def descargar_zip_navegador(config_id: int, payload: DescargarZipPayload,
 # ── Reglas de sync automática ─────────────────────────────────────────────────
 
 @router.get("/rules", response_model=List[FtpSyncRuleRead])
+@perf_budget(queries=6)
 def get_rules(config_id: Optional[int] = Query(None), db: Session = Depends(get_db),
               current_user: User = Depends(get_current_user)):
     _assert_not_viewer(current_user)
@@ -339,6 +342,7 @@ def count_logs(
 
 
 @router.get("/logs", response_model=List[FtpSyncLogRead])
+@perf_budget(queries=6)
 def get_logs(
     origen: Optional[str] = Query(None, description="'manual' o 'auto'"),
     limit: int = Query(500, ge=1, le=5000),
@@ -12,6 +12,7 @@ import logging
 from datetime import datetime, timedelta
 
 from apscheduler.schedulers.background import BackgroundScheduler
+from apscheduler.triggers.combining import OrTrigger
 from apscheduler.triggers.cron import CronTrigger
 from apscheduler.triggers.interval import IntervalTrigger
 
@@ -357,6 +358,67 @@ def _ejecutar_revisar_alertas_envios() -> None:
         logger.error(f"[env_revisar_alertas_envios_job] Error general: {e}")
 
 
+def _ejecutar_precalentamiento_dashboard() -> None:
+    """
+    Job que corre a las 00:15 y a las 08:05 (Europe/Madrid).
+    Precalienta la caché de /dashboard/summary, /dashboard/tablas/mensual y
+    /dashboard/envios-resumen para cada tenant y conjunto de empresas
+    permitidas. Ver app/dashboard/precalentamiento.py.
+    """
+    try:
+        from app.core.db import SessionLocal
+        from app.dashboard.precalentamiento import precalentar_todos
+        precalentar_todos(SessionLocal)
+    except Exception as e:
+        logger.error(f"[dashboard_precalentamiento_job] Error general: {e}")
+
+
+def _ejecutar_precalentamiento_obsoletos() -> None:
+    """
+    Job que corre cada 15 min de 00:00 a 07:59 (Europe/Madrid).
+    Vuelve a precalentar solo los tenants cuyos datos han cambiado desde el
+    último precalentamiento (ingestiones o envíos de madrugada).
+    """
+    try:
+        from app.core.db import SessionLocal
+        from app.dashboard.precalentamiento import precalentar_todos
+        precalentar_todos(SessionLocal, solo_obsoletos=True)
+    except Exception as e:
+        logger.error(f"[dashboard_precalentamiento_obsoletos_job] Error general: {e}")
+
+
+def _ejecutar_mantenimiento_particiones_stg() -> None:
+    """
+    Job que corre cada día a las 03:00 (Europe/Madrid).
+    Crea las particiones mensuales de stg_medida que falten y archiva las
+    que salen de la ventana de retención. Ver app/stg/particiones.py.
+    """
+    try:
+        from app.core.db import engine
+        from app.stg.particiones import mantenimiento_particiones
+        mantenimiento_particiones(engine)
+    except Exception as e:
+        logger.error(f"[stg_medida_particiones_job] Error general: {e}")
+
+
+def _ejecutar_sondeo_wsprime() -> None:
+    """
+    Job que corre cada WSPRIME_SONDEO_MINUTOS minutos.
+    Sondea en paralelo los concentradores con WS-PRIME activo y guarda el
+    resultado en ultima_conexion_*. Ver app/stg/wsprime/polling.py.
+    """
+    try:
+        from app.core.db import SessionLocal
+        from app.stg.wsprime.polling import sondear_concentradores
+        db = SessionLocal()
+        try:
+            sondear_concentradores(db)
+        finally:
+            db.close()
+    except Exception as e:
+        logger.error(f"[wsprime_sondeo_job] Error general: {e}")
+
+
 def _ejecutar_buscar_publicaciones_ree() -> None:
     """
     Job que corre cada día a las 22:00 (Europe/Madrid).
@@ -771,12 +833,70 @@ def start_scheduler() -> None:
         coalesce=True,
     )
 
+    # Precalentamiento del dashboard. Va DESPUÉS de los jobs nocturnos
+    # (22:00–23:30) y de los de primera hora (07:00/07:30), no justo tras
+    # ellos: las claves de caché de tablas/mensual y envios-resumen incluyen
+    # el día y el tramo horario de los plazos REE (08:00), así que lo
+    # calculado a las 23:45 no serviría a la mañana siguiente.
+    #   - 00:15 → ya con el día nuevo, tras los jobs nocturnos.
+    #   - 08:05 → tras las respuestas REE de 07:00/07:30 y el corte de plazos.
+    #   - cada 15 min de 00:00 a 07:59 → solo tenants con datos cambiados.
+    _scheduler.add_job(
+        _ejecutar_precalentamiento_dashboard,
+        trigger=OrTrigger([CronTrigger(hour=0, minute=15), CronTrigger(hour=8, minute=5)]),
+        id="dashboard_precalentamiento_job",
+        name="Dashboard — precalentar caché (00:15 y 08:05 diario)",
+        replace_existing=True,
+        max_instances=1,
+        misfire_grace_time=3600,
+        coalesce=True,
+    )
+    _scheduler.add_job(
+        _ejecutar_precalentamiento_obsoletos,
+        trigger=CronTrigger(hour="0-7", minute="*/15"),
+        id="dashboard_precalentamiento_obsoletos_job",
+        name="Dashboard — reprecalentar tenants obsoletos (cada 15 min, 00:00–07:59)",
+        replace_existing=True,
+        max_instances=1,
+        coalesce=True,
+    )
+
+    # Particiones de stg_medida: a las 03:00, fuera de las ventanas de
+    # ingestión de la noche y de la mañana (el DETACH necesita un lock breve).
+    _scheduler.add_job(
+        _ejecutar_mantenimiento_particiones_stg,
+        trigger=CronTrigger(hour=3, minute=0),
+        id="stg_medida_particiones_job",
+        name="STG — particiones mensuales de stg_medida (03:00 diario)",
+        replace_existing=True,
+        max_instances=1,
+        misfire_grace_time=3600,
+        coalesce=True,
+    )
+
+    # Sondeo WS-PRIME. Sin misfire_grace_time: si se pierde una vuelta,
+    # la siguiente llega en pocos minutos.
+    from app.core.config import get_settings
+    minutos_wsprime = get_settings().WSPRIME_SONDEO_MINUTOS
+    if minutos_wsprime > 0:
+        _scheduler.add_job(
+            _ejecutar_sondeo_wsprime,
+            trigger=IntervalTrigger(minutes=minutos_wsprime),
+            id="wsprime_sondeo_job",
+            name=f"STG — sondeo WS-PRIME (cada {minutos_wsprime} min)",
+            replace_existing=True,
+            max_instances=1,
+            coalesce=True,
+        )
+
     _scheduler.start()
     logger.info(
         "[Scheduler] Scheduler arrancado — FTP cada minuto + "
         "Objeciones FIN RECEPCIÓN 23:00 + FIN RESOLUCIÓN 23:30 + BUSCAR RESPUESTAS REE 07:00 + "
         "Envíos BUSCAR RESPUESTAS REE 07:30 + REVISAR ALERTAS 22:00 + "
-        "Publicaciones BUSCAR PUBLICACIONES REE 22:00"
+        "Publicaciones BUSCAR PUBLICACIONES REE 22:00 + "
+        "Dashboard PRECALENTAMIENTO 00:15/08:05 + STG PARTICIONES 03:00 + "
+        f"WS-PRIME SONDEO cada {minutos_wsprime} min"
     )
 
     # Catch-up: tras arrancar (posiblemente después de un reinicio), comprobar
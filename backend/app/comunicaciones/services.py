@@ -15,7 +15,7 @@ from sqlalchemy.orm import Session
 
 from app.comunicaciones.models import FtpConfig, FtpSyncLog, FtpSyncRule
 from app.core.datetime_utils import ahora_madrid
-from app.empresas.models import Empresa
+from app.empresas.services import nombre_empresa
 
 
 # ── Cifrado (centralizado en app.core.crypto desde Paquete 2) ─────────────
@@ -47,16 +47,11 @@ class _FTPNatPassive(ftplib.FTP):
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
-def _nombre_empresa(db: Session, empresa_id: int) -> str:
-    emp = db.query(Empresa).filter(Empresa.id == empresa_id).first()
-    return str(getattr(emp, "nombre", "") or f"Empresa {empresa_id}") if emp else f"Empresa {empresa_id}"
-
-
 def _config_to_dict(obj: FtpConfig, db: Session) -> dict:
     return {
         "id": obj.id,
         "empresa_id": obj.empresa_id,
-        "empresa_nombre": _nombre_empresa(db, int(obj.empresa_id)),
+        "empresa_nombre": nombre_empresa(db, int(obj.empresa_id), tenant_id=obj.tenant_id),
         "nombre": obj.nombre,
         "host": obj.host,
         "puerto": obj.puerto,
@@ -73,13 +68,17 @@ def _config_to_dict(obj: FtpConfig, db: Session) -> dict:
     }
 
 
-def _rule_to_dict(obj: FtpSyncRule, db: Session) -> dict:
-    config = db.query(FtpConfig).filter(FtpConfig.id == obj.config_id).first()
+def _rule_to_dict(obj: FtpSyncRule, db: Session, configs_by_id: Optional[Dict[int, FtpConfig]] = None) -> dict:
+    # list_rules pasa las configs precargadas; si no, se consulta la de la regla.
+    if configs_by_id is not None:
+        config = configs_by_id.get(int(obj.config_id))
+    else:
+        config = db.get(FtpConfig, obj.config_id)
     return {
         "id": obj.id,
         "config_id": obj.config_id,
         "config_nombre": getattr(config, "nombre", None) if config else None,
-        "empresa_nombre": _nombre_empresa(db, int(config.empresa_id)) if config else "—",
+        "empresa_nombre": nombre_empresa(db, int(config.empresa_id), tenant_id=config.tenant_id) if config else "—",
         "nombre": obj.nombre,
         "directorio": obj.directorio,
         "patron_nombre": obj.patron_nombre,
@@ -321,7 +320,13 @@ def list_rules(db: Session, *, tenant_id: int, config_id: Optional[int] = None)
     q = db.query(FtpSyncRule).filter(FtpSyncRule.tenant_id == tenant_id)
     if config_id:
         q = q.filter(FtpSyncRule.config_id == config_id)
-    return [_rule_to_dict(r, db) for r in q.all()]
+    rules = q.all()
+    # Configs de todas las reglas en una sola consulta.
+    config_ids = {int(r.config_id) for r in rules}
+    configs_by_id = {
+        int(c.id): c for c in db.query(FtpConfig).filter(FtpConfig.id.in_(config_ids)).all()
+    } if config_ids else {}
+    return [_rule_to_dict(r, db, configs_by_id) for r in rules]
 
 
 def create_rule(db: Session, *, tenant_id: int, config_id: int, nombre: Optional[str],
@@ -964,7 +969,7 @@ def list_logs(db: Session, *, tenant_id: int, origen: Optional[str] = None,
         result.append({
             "id": r.id,
             "empresa_id": r.empresa_id,
-            "empresa_nombre": _nombre_empresa(db, int(r.empresa_id)),
+            "empresa_nombre": nombre_empresa(db, int(r.empresa_id), tenant_id=r.tenant_id),
             "config_id": r.config_id,
             "rule_id": r.rule_id,
             "origen": r.origen,
@@ -1049,7 +1054,7 @@ def get_dashboard(db: Session, *, tenant_id: int) -> dict:
                                .order_by(FtpSyncLog.created_at.desc()).first())
         conexiones.append({
             "id": c.id, "nombre": c.nombre, "empresa_id": c.empresa_id,
-            "empresa_nombre": _nombre_empresa(db, int(c.empresa_id)),
+            "empresa_nombre": nombre_empresa(db, int(c.empresa_id), tenant_id=c.tenant_id),
             "host": c.host, "puerto": c.puerto, "usar_tls": c.usar_tls, "activo": c.activo,
             "reglas_activas": len(reglas_config), "sync_auto": len(reglas_config) > 0,
             "auto_hoy":    sum(1 for log in logs_config_hoy if log.estado == "ok" and log.origen == "auto"),
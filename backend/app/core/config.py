@@ -35,6 +35,52 @@ class Settings(BaseSettings):
     # Nunca cambiarla salvo migración consciente.
     APP_TIMEZONE: str = "Europe/Madrid"
 
+    # Caché de respuestas de lectura (dashboard, gráficos, filtros).
+    # Ver app/core/response_cache.py. El TTL es solo una red de seguridad:
+    # la invalidación real la hace la versión de datos por tenant.
+    RESPONSE_CACHE_ENABLED: bool = True
+    RESPONSE_CACHE_MAX_ENTRIES: int = 512
+    RESPONSE_CACHE_TTL_SECONDS: int = 3600
+
+    # Listados de ficheros de objeciones: leer de la tabla resumen
+    # (objeciones_ficheros_resumen) en vez de agregar las objeciones.
+    # La tabla se mantiene siempre; esto solo cambia la lectura.
+    OBJECIONES_RESUMEN_FICHEROS: bool = False
+
+    # Instrumentación por request (consultas, tiempo de BD, filas,
+    # serialización). Ver app/core/perf.py y /admin/perf.
+    PERF_INSTRUMENTATION_ENABLED: bool = True
+    # Requests más lentas que esto se registran en el log (0 = nunca).
+    PERF_SLOW_REQUEST_MS: int = 2000
+    # Perfiles cProfile de pipelines pedidos con ?perfil=true (ver
+    # app/core/pipeline_timing.py).
+    PIPELINE_PROFILE_DIR: str = "data/perfiles"
+
+    # Precalentamiento nocturno del dashboard (ver app/dashboard/precalentamiento.py).
+    DASHBOARD_PRECALENTAMIENTO_ENABLED: bool = True
+
+    # Particiones mensuales de stg_medida (ver app/stg/particiones.py).
+    # Meses futuros con partición creada de antemano.
+    STG_MEDIDA_PARTICIONES_ADELANTE: int = 3
+    # Meses completos que se conservan en BD; los anteriores se separan,
+    # se vuelcan a CSV gzip en STG_MEDIDA_ARCHIVO_DIR y se borran. 0 = nunca.
+    STG_MEDIDA_RETENCION_MESES: int = 0
+    STG_MEDIDA_ARCHIVO_DIR: str = "data/archivo/stg_medida"
+
+    # Sondeo periódico de concentradores WS-PRIME (ver app/stg/wsprime/polling.py).
+    # Cada cuántos minutos (0 = sin job; el sondeo manual sigue disponible).
+    WSPRIME_SONDEO_MINUTOS: int = 15
+    # Llamadas simultáneas por fabricante (y tamaño de su pool HTTP).
+    WSPRIME_SONDEO_CONCURRENCIA: int = 8
+    # Reintentos ante error de red/timeout, con espera base * 2^(n-1).
+    WSPRIME_SONDEO_REINTENTOS: int = 2
+    WSPRIME_SONDEO_BACKOFF_SEGUNDOS: float = 2.0
+
+    # Lectura de GISCE-ERP por XML-RPC (ver app/stg/gisce/sync.py).
+    # Ids por llamada read() y llamadas read() simultáneas.
+    GISCE_SYNC_TROZO: int = 500
+    GISCE_SYNC_HILOS: int = 4
+
     model_config = SettingsConfigDict(
         env_file=".env",
         env_file_encoding="utf-8",
@@ -0,0 +1,184 @@
+# app/core/exports.py
+"""
+Exportación masiva en streaming (CSV / XLSX).
+
+Los listados paginados sirven como mucho 500-2000 filas por petición; para
+sacar un año de medidas o una curva completa a Excel hacían falta cientos de
+peticiones. Estos helpers permiten exportar millones de filas con memoria
+constante:
+
+  - `iter_query(query)` recorre la query con `yield_per`, que en PostgreSQL
+    abre un cursor de servidor (stream_results) y trae las filas por bloques
+    en vez de materializarlas todas.
+  - `csv_chunks(...)` va escribiendo el CSV y cede bytes cada N filas.
+  - `xlsx_chunks(...)` usa openpyxl en modo write-only (las filas se vuelcan
+    a disco según se añaden) y al final cede el fichero por trozos. XLSX no
+    admite más de 1.048.576 filas por hoja: al llegar al límite se abre una
+    hoja nueva.
+  - `export_response(...)` envuelve todo en un `StreamingResponse`.
+
+Los permisos (tenant, empresas permitidas, assert_empresa_access) se
+comprueban en el endpoint ANTES de construir la respuesta; aquí solo se
+serializa.
+"""
+from __future__ import annotations
+
+import csv
+import io
+import math
+import tempfile
+from datetime import datetime
+from decimal import Decimal
+from typing import Any, Iterable, Iterator, Sequence
+
+from fastapi.responses import StreamingResponse
+from openpyxl import Workbook
+from sqlalchemy.orm import Query
+
+from app.core.datetime_utils import ahora_madrid
+
+
+__all__ = [
+    "EXPORT_FORMATS",
+    "csv_chunks",
+    "export_response",
+    "iter_query",
+    "xlsx_chunks",
+]
+
+
+EXPORT_FORMATS = ("csv", "xlsx")
+
+# Filas que se traen del cursor de servidor en cada viaje a la BD.
+EXPORT_YIELD_PER = 2000
+# Filas CSV acumuladas antes de ceder un bloque al cliente.
+CSV_FLUSH_ROWS = 1000
+# Tamaño de los trozos en que se sirve el XLSX ya generado.
+XLSX_READ_CHUNK = 64 * 1024
+# Límite de filas de una hoja XLSX (incluida la cabecera).
+XLSX_MAX_ROWS = 1_048_576
+
+_MEDIA_TYPES = {
+    "csv": "text/csv; charset=utf-8",
+    "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet",
+}
+
+
+def iter_query(query: Query[Any], chunk_size: int = EXPORT_YIELD_PER) -> Iterator[Any]:
+    """Itera la query por bloques con cursor de servidor."""
+    yield from query.yield_per(chunk_size)
+
+
+def _csv_value(value: Any) -> Any:
+    if value is None:
+        return ""
+    if isinstance(value, datetime):
+        return value.isoformat(sep=" ")
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return ""
+    return value
+
+
+def _xlsx_value(value: Any) -> Any:
+    if isinstance(value, Decimal):
+        return float(value)
+    if isinstance(value, float) and (math.isnan(value) or math.isinf(value)):
+        return None
+    if isinstance(value, datetime) and value.tzinfo is not None:
+        # Excel no admite datetimes con zona horaria.
+        return value.replace(tzinfo=None)
+    if isinstance(value, (dict, list)):
+        return str(value)
+    return value
+
+
+def csv_chunks(
+    headers: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    *,
+    flush_rows: int = CSV_FLUSH_ROWS,
+) -> Iterator[bytes]:
+    """
+    CSV separado por comas, UTF-8 con BOM (para que Excel detecte la
+    codificación al abrirlo con doble clic).
+    """
+    buf = io.StringIO()
+    writer = csv.writer(buf)
+    buf.write("\ufeff")
+    writer.writerow(headers)
+
+    pending = 0
+    for row in rows:
+        writer.writerow([_csv_value(v) for v in row])
+        pending += 1
+        if pending >= flush_rows:
+            yield buf.getvalue().encode("utf-8")
+            buf.seek(0)
+            buf.truncate(0)
+            pending = 0
+
+    tail = buf.getvalue()
+    if tail:
+        yield tail.encode("utf-8")
+
+
+def xlsx_chunks(
+    headers: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    *,
+    sheet_title: str,
+) -> Iterator[bytes]:
+    """XLSX generado en modo write-only sobre un fichero temporal."""
+    wb = Workbook(write_only=True)
+    title = sheet_title[:31]
+    ws = wb.create_sheet(title=title)
+    ws.append(list(headers))
+    rows_in_sheet = 1
+    sheet_n = 1
+
+    for row in rows:
+        if rows_in_sheet >= XLSX_MAX_ROWS:
+            sheet_n += 1
+            suffix = f" ({sheet_n})"
+            ws = wb.create_sheet(title=title[: 31 - len(suffix)] + suffix)
+            ws.append(list(headers))
+            rows_in_sheet = 1
+        ws.append([_xlsx_value(v) for v in row])
+        rows_in_sheet += 1
+
+    with tempfile.TemporaryFile() as tmp:
+        wb.save(tmp)
+        tmp.seek(0)
+        while True:
+            chunk = tmp.read(XLSX_READ_CHUNK)
+            if not chunk:
+                break
+            yield chunk
+
+
+def export_response(
+    *,
+    formato: str,
+    filename_base: str,
+    headers: Sequence[str],
+    rows: Iterable[Sequence[Any]],
+    sheet_title: str,
+) -> StreamingResponse:
+    """
+    StreamingResponse con el fichero `<filename_base>_<YYYY-MM-DD>.<formato>`.
+
+    `rows` debe ser un iterable perezoso (p.ej. generador sobre `iter_query`)
+    para que la memoria no dependa del número de filas.
+    """
+    if formato == "xlsx":
+        body = xlsx_chunks(headers, rows, sheet_title=sheet_title)
+    else:
+        body = csv_chunks(headers, rows)
+
+    fecha_str = ahora_madrid().strftime("%Y-%m-%d")
+    filename = f"{filename_base}_{fecha_str}.{formato}"
+    return StreamingResponse(
+        body,
+        media_type=_MEDIA_TYPES[formato],
+        headers={"Content-Disposition": f'attachment; filename="{filename}"'},
+    )
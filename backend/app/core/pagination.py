@@ -0,0 +1,182 @@
+# app/core/pagination.py
+"""
+Helpers de paginación por cursor (keyset) y conteos aproximados.
+
+La paginación OFFSET/LIMIT obliga a PostgreSQL a leer y descartar todas las
+filas anteriores a la página pedida, y el `count()` exacto repite el mismo
+escaneo. Para listados grandes (medidas, curvas STG) los endpoints aceptan
+además un `cursor` opaco que codifica los valores de la última fila servida
+y filtran "lo que va después" con un WHERE sobre las columnas del ORDER BY,
+que sí usa el índice.
+
+Contrato:
+  - `encode_cursor([...])` → token base64url (JSON). Los datetimes se
+    codifican en ISO y el caller los reconvierte con `parse_cursor_datetime`.
+  - `decode_cursor(token, n)` → lista de `n` valores, o HTTP 400 si el token
+    no es válido.
+  - `keyset_condition([(col, "asc"|"desc"), ...], valores)` → condición
+    "estrictamente después de" compatible con direcciones mixtas.
+  - `keyset_fetch(query, ...)` → (filas, next_cursor). Con cursor filtra
+    por keyset; sin cursor usa el offset clásico (compatibilidad con el
+    contrato page/page_size de la UI). En ambos casos devuelve el cursor
+    de la siguiente página, o None si no hay más filas.
+  - `count_rows(db, query, mode)` → total exacto, estimado por el planner
+    o None, según `mode` ∈ {"exact", "estimate", "none"}.
+"""
+from __future__ import annotations
+
+import base64
+import json
+from datetime import date, datetime
+from typing import Any, Callable, Sequence
+
+from fastapi import HTTPException, status
+from sqlalchemy import and_, func, or_, text
+from sqlalchemy.orm import Query, Session
+
+
+__all__ = [
+    "COUNT_MODES",
+    "count_rows",
+    "decode_cursor",
+    "encode_cursor",
+    "keyset_condition",
+    "keyset_fetch",
+    "parse_cursor_datetime",
+]
+
+
+COUNT_MODES = ("exact", "estimate", "none")
+
+
+def _json_default(value: Any) -> Any:
+    if isinstance(value, (datetime, date)):
+        return value.isoformat()
+    raise TypeError(f"Valor no serializable en cursor: {type(value).__name__}")
+
+
+def encode_cursor(values: Sequence[Any]) -> str:
+    raw = json.dumps(list(values), default=_json_default, separators=(",", ":"))
+    return base64.urlsafe_b64encode(raw.encode("utf-8")).decode("ascii").rstrip("=")
+
+
+def decode_cursor(token: str, expected_len: int) -> list[Any]:
+    try:
+        padded = token + "=" * (-len(token) % 4)
+        values = json.loads(base64.urlsafe_b64decode(padded.encode("ascii")))
+    except (ValueError, UnicodeError):
+        values = None
+    if not isinstance(values, list) or len(values) != expected_len:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación no válido.",
+        )
+    return values
+
+
+def parse_cursor_datetime(value: Any) -> datetime:
+    try:
+        return datetime.fromisoformat(str(value))
+    except (TypeError, ValueError) as exc:
+        raise HTTPException(
+            status_code=status.HTTP_400_BAD_REQUEST,
+            detail="Cursor de paginación no válido.",
+        ) from exc
+
+
+def keyset_condition(
+    columns: Sequence[tuple[Any, str]],
+    values: Sequence[Any],
+) -> Any:
+    """
+    Construye la condición "fila estrictamente posterior al cursor" para un
+    ORDER BY con direcciones mixtas, p.ej. (anio DESC, mes DESC, empresa_id
+    ASC, id ASC):
+
+        anio < a
+        OR (anio = a AND mes < m)
+        OR (anio = a AND mes = m AND empresa_id > e)
+        OR (anio = a AND mes = m AND empresa_id = e AND id > i)
+
+    PostgreSQL resuelve cada rama con el índice compuesto del mismo orden.
+    """
+    if len(columns) != len(values):
+        raise ValueError("keyset_condition: columnas y valores no cuadran")
+
+    ramas = []
+    for i, (col, direction) in enumerate(columns):
+        iguales = [c == v for (c, _), v in zip(columns[:i], values[:i])]
+        paso = col < values[i] if direction == "desc" else col > values[i]
+        ramas.append(and_(*iguales, paso))
+    return or_(*ramas)
+
+
+def keyset_fetch(
+    query: Query[Any],
+    *,
+    order_by: Sequence[tuple[Any, str]],
+    cursor: str | None,
+    offset: int,
+    limit: int,
+    cursor_values: Callable[[Any], Sequence[Any]],
+    parse_values: Callable[[list[Any]], Sequence[Any]] | None = None,
+) -> tuple[list[Any], str | None]:
+    """
+    Lee una página de `query` ordenada por `order_by` (que debe terminar en
+    una columna única, normalmente el id, para que el orden sea total).
+
+    `parse_values` reconvierte los valores del cursor decodificado (p.ej.
+    timestamps ISO → datetime) antes de compararlos con las columnas.
+
+    Se pide una fila de más para saber si hay página siguiente sin contar.
+    """
+    if cursor:
+        valores = decode_cursor(cursor, len(order_by))
+        if parse_values is not None:
+            valores = list(parse_values(valores))
+        query = query.filter(keyset_condition(order_by, valores))
+        offset = 0
+
+    ordered = query.order_by(
+        *[col.desc() if direction == "desc" else col.asc() for col, direction in order_by]
+    )
+    filas = ordered.offset(max(0, int(offset))).limit(int(limit) + 1).all()
+
+    next_cursor: str | None = None
+    if len(filas) > limit:
+        filas = filas[:limit]
+        next_cursor = encode_cursor(cursor_values(filas[-1]))
+    return filas, next_cursor
+
+
+def _estimate_rows(db: Session, query: Query[Any]) -> int | None:
+    """Filas estimadas por el planner de PostgreSQL (EXPLAIN, sin ejecutar)."""
+    bind = db.get_bind()
+    if bind.dialect.name != "postgresql":
+        return None
+    stmt = query.order_by(None).statement
+    sql = str(stmt.compile(dialect=bind.dialect, compile_kwargs={"literal_binds": True}))
+    plan_raw = db.execute(text("EXPLAIN (FORMAT JSON) " + sql)).scalar()
+    plan = json.loads(plan_raw) if isinstance(plan_raw, str) else plan_raw
+    try:
+        return int(plan[0]["Plan"]["Plan Rows"])
+    except (KeyError, IndexError, TypeError, ValueError):
+        return None
+
+
+def count_rows(db: Session, query: Query[Any], mode: str) -> int | None:
+    """
+    Total de filas de `query` según `mode`:
+      - "exact":    COUNT(*) sobre la propia query (sin ORDER BY).
+      - "estimate": estimación del planner; cae a exacto si no hay
+                    estimación (SQLite en tests, plan inesperado).
+      - "none":     no cuenta; devuelve None.
+    """
+    if mode == "none":
+        return None
+    if mode == "estimate":
+        estimado = _estimate_rows(db, query)
+        if estimado is not None:
+            return estimado
+    subq = query.order_by(None).subquery()
+    return int(db.query(func.count()).select_from(subq).scalar() or 0)
@@ -0,0 +1,377 @@
+# app/core/perf.py
+"""
+Instrumentación de rendimiento por request.
+
+Los N+1 y los agregados lentos (dashboard, envíos, objeciones, topología)
+solo se veían cuando alguien se quejaba. Aquí se mide cada request:
+
+  - `PerfMiddleware` (ASGI puro, no BaseHTTPMiddleware, para no romper los
+    StreamingResponse) abre un `RequestStats` en un ContextVar. Los
+    endpoints síncronos y los generadores de streaming corren en el
+    threadpool con una copia del contexto, así que ven el mismo objeto.
+  - `instrument_engine(engine)` engancha `before/after_cursor_execute` y
+    suma al request en curso: nº de consultas, tiempo de BD y filas
+    devueltas (`cursor.rowcount` de los SELECT; SQLite no lo informa).
+  - `MadridJSONResponse.render` llama a `record_serialization` con lo que
+    tarda en serializar el body.
+  - Al terminar, `PerfRegistry` agrega por (método, plantilla de ruta). La
+    plantilla (`/envios/{envio_id}`) viene de `scope["route"]`, que FastAPI
+    rellena al enrutar; así la cardinalidad no depende de los ids.
+
+Presupuestos: `@perf_budget(queries=..., db_ms=...)` bajo el decorador del
+router declara el máximo por request de ese endpoint. Si se supera se avisa
+en el log, se cuenta en las métricas y se guarda en `budget_violations()`;
+tests/conftest.py hace fallar el test que lo provoque.
+
+Exposición: `/admin/perf` (JSON) y `/admin/perf/metrics` (formato texto de
+Prometheus), ver app/admin/routes.py.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from collections import deque
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from typing import Any, Callable, Deque, Dict, List, Optional, Tuple, TypeVar
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import get_settings
+
+
+__all__ = [
+    "PerfBudget",
+    "PerfMiddleware",
+    "PerfRegistry",
+    "RequestStats",
+    "budget_violations",
+    "current_stats",
+    "instrument_engine",
+    "perf_budget",
+    "record_serialization",
+    "registry",
+    "reset_budget_violations",
+]
+
+
+logger = logging.getLogger(__name__)
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+# Buckets del histograma de latencia (segundos).
+LATENCY_BUCKETS: Tuple[float, ...] = (0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0)
+# Muestras recientes por ruta para los percentiles de /admin/perf.
+_RECENT_SAMPLES = 500
+_MAX_VIOLATIONS = 200
+
+
+# ---------------------------------------------------------------------------
+# Estado por request
+# ---------------------------------------------------------------------------
+
+@dataclass
+class RequestStats:
+    queries: int = 0
+    db_seconds: float = 0.0
+    rows: int = 0
+    serialization_seconds: float = 0.0
+
+
+_current: ContextVar[Optional[RequestStats]] = ContextVar("perf_request_stats", default=None)
+
+
+def current_stats() -> Optional[RequestStats]:
+    """Estadísticas del request en curso (None fuera de un request)."""
+    return _current.get()
+
+
+def record_serialization(seconds: float) -> None:
+    stats = _current.get()
+    if stats is not None:
+        stats.serialization_seconds += seconds
+
+
+# ---------------------------------------------------------------------------
+# SQLAlchemy
+# ---------------------------------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _current.get() is not None and context is not None:
+        context._perf_t0 = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    stats = _current.get()
+    t0 = getattr(context, "_perf_t0", None)
+    if stats is None or t0 is None:
+        return
+    stats.queries += 1
+    stats.db_seconds += time.perf_counter() - t0
+    if cursor.description is not None and (cursor.rowcount or 0) > 0:
+        stats.rows += cursor.rowcount
+
+
+def instrument_engine(engine: Engine) -> None:
+    """Engancha los eventos de cursor al engine (idempotente)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
+
+
+# ---------------------------------------------------------------------------
+# Presupuestos
+# ---------------------------------------------------------------------------
+
+@dataclass(frozen=True)
+class PerfBudget:
+    queries: Optional[int] = None
+    db_ms: Optional[float] = None
+
+
+def perf_budget(*, queries: Optional[int] = None, db_ms: Optional[float] = None) -> Callable[[F], F]:
+    """
+    Declara el presupuesto por request de un endpoint. Va DEBAJO del
+    decorador del router (que registra la función ya marcada):
+
+        @router.get("/historico")
+        @perf_budget(queries=6)
+        def get_historico(...): ...
+    """
+    budget = PerfBudget(queries=queries, db_ms=db_ms)
+
+    def deco(fn: F) -> F:
+        setattr(fn, "__perf_budget__", budget)
+        return fn
+
+    return deco
+
+
+def _budget_excesos(budget: PerfBudget, stats: RequestStats) -> List[str]:
+    excesos = []
+    if budget.queries is not None and stats.queries > budget.queries:
+        excesos.append(f"queries={stats.queries}>{budget.queries}")
+    if budget.db_ms is not None and stats.db_seconds * 1000 > budget.db_ms:
+        excesos.append(f"db_ms={stats.db_seconds * 1000:.1f}>{budget.db_ms:g}")
+    return excesos
+
+
+# ---------------------------------------------------------------------------
+# Agregación
+# ---------------------------------------------------------------------------
+
+@dataclass
+class _RouteMetrics:
+    requests: int = 0
+    errors: int = 0
+    seconds: float = 0.0
+    queries: int = 0
+    max_queries: int = 0
+    db_seconds: float = 0.0
+    rows: int = 0
+    serialization_seconds: float = 0.0
+    budget_exceeded: int = 0
+    buckets: List[int] = field(default_factory=lambda: [0] * len(LATENCY_BUCKETS))
+    recientes: Deque[Tuple[float, int]] = field(default_factory=lambda: deque(maxlen=_RECENT_SAMPLES))
+
+
+def _percentil(valores: List[float], p: float) -> float:
+    if not valores:
+        return 0.0
+    orden = sorted(valores)
+    return orden[min(len(orden) - 1, int(round(p * (len(orden) - 1))))]
+
+
+def _escape_label(v: str) -> str:
+    return v.replace("\\", "\\\\").replace('"', '\\"').replace("\n", "\\n")
+
+
+class PerfRegistry:
+    """Métricas acumuladas por (método, ruta) en el proceso."""
+
+    def __init__(self) -> None:
+        self._lock = threading.Lock()
+        self._routes: Dict[Tuple[str, str], _RouteMetrics] = {}
+        self._violations: Deque[dict] = deque(maxlen=_MAX_VIOLATIONS)
+
+    def observe(
+        self,
+        method: str,
+        route: str,
+        status_code: int,
+        seconds: float,
+        stats: RequestStats,
+        budget: Optional[PerfBudget] = None,
+    ) -> None:
+        excesos = _budget_excesos(budget, stats) if budget is not None else []
+        with self._lock:
+            m = self._routes.setdefault((method, route), _RouteMetrics())
+            m.requests += 1
+            m.errors += int(status_code >= 500)
+            m.seconds += seconds
+            m.queries += stats.queries
+            m.max_queries = max(m.max_queries, stats.queries)
+            m.db_seconds += stats.db_seconds
+            m.rows += stats.rows
+            m.serialization_seconds += stats.serialization_seconds
+            for i, limite in enumerate(LATENCY_BUCKETS):
+                if seconds <= limite:
+                    m.buckets[i] += 1
+            m.recientes.append((seconds, stats.queries))
+            if excesos:
+                m.budget_exceeded += 1
+                self._violations.append({
+                    "method": method,
+                    "route": route,
+                    "excesos": excesos,
+                    "queries": stats.queries,
+                    "db_ms": round(stats.db_seconds * 1000, 2),
+                })
+
+        if excesos:
+            logger.warning("[perf] %s %s supera su presupuesto: %s", method, route, ", ".join(excesos))
+        slow_ms = get_settings().PERF_SLOW_REQUEST_MS
+        if slow_ms and seconds * 1000 > slow_ms:
+            logger.warning(
+                "[perf] %s %s lenta: %.0f ms, %d consultas, %.0f ms BD",
+                method, route, seconds * 1000, stats.queries, stats.db_seconds * 1000,
+            )
+
+    def violations(self) -> List[dict]:
+        with self._lock:
+            return list(self._violations)
+
+    def reset_violations(self) -> None:
+        with self._lock:
+            self._violations.clear()
+
+    def reset(self) -> None:
+        with self._lock:
+            self._routes.clear()
+            self._violations.clear()
+
+    def snapshot(self) -> List[dict]:
+        """Resumen por ruta para /admin/perf, ordenado por tiempo de BD total."""
+        with self._lock:
+            items = [(k, m, list(m.recientes)) for k, m in self._routes.items()]
+        out = []
+        for (method, route), m, recientes in items:
+            n = max(m.requests, 1)
+            latencias = [s for s, _ in recientes]
+            out.append({
+                "method": method,
+                "route": route,
+                "requests": m.requests,
+                "errors": m.errors,
+                "avg_ms": round(m.seconds / n * 1000, 2),
+                "p95_ms": round(_percentil(latencias, 0.95) * 1000, 2),
+                "avg_queries": round(m.queries / n, 2),
+                "max_queries": m.max_queries,
+                "avg_db_ms": round(m.db_seconds / n * 1000, 2),
+                "total_db_ms": round(m.db_seconds * 1000, 2),
+                "avg_rows": round(m.rows / n, 1),
+                "avg_serialization_ms": round(m.serialization_seconds / n * 1000, 2),
+                "budget_exceeded": m.budget_exceeded,
+            })
+        out.sort(key=lambda r: r["total_db_ms"], reverse=True)
+        return out
+
+    def prometheus(self) -> str:
+        """Métricas en formato de exposición de texto de Prometheus."""
+        with self._lock:
+            items = sorted(
+                ((k, m, list(m.buckets)) for k, m in self._routes.items()),
+                key=lambda x: x[0],
+            )
+        lineas: List[str] = []
+
+        def _familia(nombre: str, tipo: str, ayuda: str) -> None:
+            lineas.append(f"# HELP {nombre} {ayuda}")
+            lineas.append(f"# TYPE {nombre} {tipo}")
+
+        def _labels(method: str, route: str, **extra: str) -> str:
+            pares = {"method": method, "route": route, **extra}
+            return "{" + ",".join(f'{k}="{_escape_label(v)}"' for k, v in pares.items()) + "}"
+
+        _familia("app_http_request_duration_seconds", "histogram", "Latencia de las requests HTTP.")
+        for (method, route), m, buckets in items:
+            for limite, n in zip(LATENCY_BUCKETS, buckets):
+                lineas.append(f"app_http_request_duration_seconds_bucket{_labels(method, route, le=f'{limite:g}')} {n}")
+            lineas.append(f"app_http_request_duration_seconds_bucket{_labels(method, route, le='+Inf')} {m.requests}")
+            lineas.append(f"app_http_request_duration_seconds_sum{_labels(method, route)} {m.seconds:.6f}")
+            lineas.append(f"app_http_request_duration_seconds_count{_labels(method, route)} {m.requests}")
+
+        contadores = [
+            ("app_http_request_errors_total", "Requests con respuesta 5xx.", lambda m: m.errors),
+            ("app_db_queries_total", "Consultas SQL ejecutadas.", lambda m: m.queries),
+            ("app_db_query_seconds_total", "Tiempo total en consultas SQL.", lambda m: f"{m.db_seconds:.6f}"),
+            ("app_db_rows_fetched_total", "Filas devueltas por los SELECT.", lambda m: m.rows),
+            ("app_response_serialization_seconds_total", "Tiempo serializando el body JSON.",
+             lambda m: f"{m.serialization_seconds:.6f}"),
+            ("app_perf_budget_exceeded_total", "Requests que superan el presupuesto del endpoint.",
+             lambda m: m.budget_exceeded),
+        ]
+        for nombre, ayuda, valor in contadores:
+            _familia(nombre, "counter", ayuda)
+            for (method, route), m, _ in items:
+                lineas.append(f"{nombre}{_labels(method, route)} {valor(m)}")
+
+        _familia("app_db_queries_per_request_max", "gauge", "Máximo de consultas en una sola request.")
+        for (method, route), m, _ in items:
+            lineas.append(f"app_db_queries_per_request_max{_labels(method, route)} {m.max_queries}")
+        return "\n".join(lineas) + "\n"
+
+
+registry = PerfRegistry()
+
+
+def budget_violations() -> List[dict]:
+    return registry.violations()
+
+
+def reset_budget_violations() -> None:
+    registry.reset_violations()
+
+
+# ---------------------------------------------------------------------------
+# Middleware
+# ---------------------------------------------------------------------------
+
+class PerfMiddleware:
+    """Middleware ASGI que mide cada request HTTP y lo agrega en `registry`."""
+
+    def __init__(self, app, perf_registry: Optional[PerfRegistry] = None) -> None:
+        self.app = app
+        self.registry = perf_registry or registry
+
+    async def __call__(self, scope, receive, send) -> None:
+        if scope["type"] != "http" or not get_settings().PERF_INSTRUMENTATION_ENABLED:
+            await self.app(scope, receive, send)
+            return
+
+        stats = RequestStats()
+        token = _current.set(stats)
+        status_code = 500
+        t0 = time.perf_counter()
+
+        async def _send(message) -> None:
+            nonlocal status_code
+            if message["type"] == "http.response.start":
+                status_code = int(message["status"])
+            await send(message)
+
+        try:
+            await self.app(scope, receive, _send)
+        finally:
+            _current.reset(token)
+            route = scope.get("route")
+            self.registry.observe(
+                scope.get("method", ""),
+                getattr(route, "path", None) or "(sin ruta)",
+                status_code,
+                time.perf_counter() - t0,
+                stats,
+                getattr(scope.get("endpoint"), "__perf_budget__", None),
+            )
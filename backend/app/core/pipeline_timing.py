@@ -0,0 +1,238 @@
+# app/core/pipeline_timing.py
+"""
+Tiempos por etapa de los pipelines de ingestión y parseo.
+
+`process_ingestion_file`, `stg.parsear_fichero`, `perdidas.procesar_s02` e
+`importar_topologia` eran opacos: si un BALD, un PS o un lote de S02 iba
+lento no se sabía si era la lectura, el mapeo a periodos, las escrituras o
+la reconstrucción de MedidaGeneral. Aquí se mide cada etapa:
+
+  - `medir_pipeline(nombre)` abre un `TiemposPipeline` en un ContextVar y lo
+    devuelve al salir con el total. Fuera de un pipeline, `etapa()` no mide
+    nada (un par de comprobaciones), así que los servicios pueden marcar sus
+    etapas sin saber quién los llama.
+  - `with etapa("lectura", bytes=n) as e: ...; e.filas = len(df)` mide una
+    etapa. Anidadas, el nombre es la ruta ("procesado/lectura"). Las que se
+    repiten (una por fichero o por registro) se acumulan en una sola
+    entrada con `veces`.
+  - `instrumentar_engine(engine)` suma a las etapas abiertas las consultas
+    SQL y su tiempo, igual que app/core/perf.py hace por request.
+
+Perfil: `medir_pipeline(..., perfil_id=...)` además captura un cProfile de
+todo el pipeline y lo guarda en PIPELINE_PROFILE_DIR como
+`<pipeline>_<perfil_id>_<AAAAMMDDHHMMSS>.prof` (`python -m pstats`,
+snakeviz...). Es opt-in por fichero: lo piden los endpoints de procesado con
+`?perfil=true`.
+
+Los tiempos se guardan con el registro procesado (IngestionFile.timings_json,
+FicheroRecibido.parse_timings) y se devuelven en la respuesta.
+"""
+from __future__ import annotations
+
+import cProfile
+import logging
+import re
+import time
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Union
+
+from sqlalchemy import event
+from sqlalchemy.engine import Engine
+
+from app.core.config import get_settings
+from app.core.datetime_utils import ahora_madrid
+
+
+__all__ = [
+    "Etapa",
+    "Medicion",
+    "TiemposPipeline",
+    "etapa",
+    "instrumentar_engine",
+    "medir_pipeline",
+    "pipeline_actual",
+]
+
+
+logger = logging.getLogger(__name__)
+
+
+@dataclass
+class Medicion:
+    """Lo que el código medido puede anotar dentro de `with etapa(...) as e`."""
+    filas: Optional[int] = None
+    bytes: Optional[int] = None
+    consultas: int = 0
+    db_seconds: float = 0.0
+
+
+@dataclass
+class Etapa:
+    """Acumulado de una etapa (todas sus repeticiones) dentro del pipeline."""
+    nombre: str
+    nivel: int
+    veces: int = 0
+    segundos: float = 0.0
+    filas: Optional[int] = None
+    bytes: Optional[int] = None
+    consultas: int = 0
+    db_seconds: float = 0.0
+
+    def sumar(self, segundos: float, m: Medicion) -> None:
+        self.veces += 1
+        self.segundos += segundos
+        self.consultas += m.consultas
+        self.db_seconds += m.db_seconds
+        if m.filas is not None:
+            self.filas = (self.filas or 0) + m.filas
+        if m.bytes is not None:
+            self.bytes = (self.bytes or 0) + m.bytes
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "etapa": self.nombre,
+            "nivel": self.nivel,
+            "veces": self.veces,
+            "ms": round(self.segundos * 1000, 2),
+            "filas": self.filas,
+            "bytes": self.bytes,
+            "consultas": self.consultas,
+            "db_ms": round(self.db_seconds * 1000, 2),
+        }
+
+
+class TiemposPipeline:
+    """Etapas medidas de una ejecución de un pipeline."""
+
+    def __init__(self, pipeline: str) -> None:
+        self.pipeline = pipeline
+        self.etapas: Dict[str, Etapa] = {}
+        self.segundos = 0.0
+        self.consultas = 0
+        self.db_seconds = 0.0
+        self.perfil: Optional[str] = None
+        self._t0 = time.perf_counter()
+        self._ruta: List[str] = []
+        self._abiertas: List[Medicion] = []
+
+    def as_dict(self) -> Dict[str, Any]:
+        en_etapas = sum(e.segundos for e in self.etapas.values() if e.nivel == 0)
+        return {
+            "pipeline": self.pipeline,
+            "total_ms": round(self.segundos * 1000, 2),
+            "sin_etapa_ms": round(max(self.segundos - en_etapas, 0.0) * 1000, 2),
+            "consultas": self.consultas,
+            "db_ms": round(self.db_seconds * 1000, 2),
+            "etapas": [e.as_dict() for e in self.etapas.values()],
+            "perfil": self.perfil,
+        }
+
+
+_actual: ContextVar[Optional[TiemposPipeline]] = ContextVar("pipeline_timing", default=None)
+
+
+def pipeline_actual() -> Optional[TiemposPipeline]:
+    """Pipeline medido en curso (None si no hay ninguno)."""
+    return _actual.get()
+
+
+@contextmanager
+def etapa(nombre: str, *, filas: Optional[int] = None, bytes: Optional[int] = None) -> Iterator[Medicion]:
+    """Mide una etapa del pipeline en curso; sin pipeline no hace nada."""
+    medicion = Medicion(filas=filas, bytes=bytes)
+    tiempos = _actual.get()
+    if tiempos is None:
+        yield medicion
+        return
+
+    tiempos._ruta.append(nombre)
+    tiempos._abiertas.append(medicion)
+    ruta = "/".join(tiempos._ruta)
+    nivel = len(tiempos._ruta) - 1
+    # Se registra al entrar para que el orden sea el de inicio, no el de fin.
+    acumulado = tiempos.etapas.setdefault(ruta, Etapa(nombre=ruta, nivel=nivel))
+    t0 = time.perf_counter()
+    try:
+        yield medicion
+    finally:
+        acumulado.sumar(time.perf_counter() - t0, medicion)
+        tiempos._abiertas.pop()
+        tiempos._ruta.pop()
+
+
+def _ruta_perfil(pipeline: str, perfil_id: Union[int, str]) -> Path:
+    base = re.sub(r"[^A-Za-z0-9_.-]+", "_", f"{pipeline}_{perfil_id}")
+    directorio = Path(get_settings().PIPELINE_PROFILE_DIR)
+    directorio.mkdir(parents=True, exist_ok=True)
+    return directorio / f"{base}_{ahora_madrid():%Y%m%d%H%M%S}.prof"
+
+
+@contextmanager
+def medir_pipeline(
+    pipeline: str,
+    *,
+    perfil_id: Optional[Union[int, str]] = None,
+) -> Iterator[TiemposPipeline]:
+    """
+    Mide un pipeline completo. Con `perfil_id` captura además un cProfile
+    y guarda la ruta del .prof en `TiemposPipeline.perfil`.
+    """
+    tiempos = TiemposPipeline(pipeline)
+    token = _actual.set(tiempos)
+    perfil: Optional[cProfile.Profile] = None
+    if perfil_id is not None:
+        perfil = cProfile.Profile()
+        try:
+            perfil.enable()
+        except ValueError:
+            # Solo puede haber un perfilador activo a la vez en el proceso.
+            logger.warning("[pipeline] %s %s: ya hay otro perfil en curso; se mide sin perfil",
+                           pipeline, perfil_id)
+            perfil = None
+    try:
+        yield tiempos
+    finally:
+        if perfil is not None:
+            perfil.disable()
+        tiempos.segundos = time.perf_counter() - tiempos._t0
+        _actual.reset(token)
+        if perfil is not None and perfil_id is not None:
+            try:
+                ruta = _ruta_perfil(pipeline, perfil_id)
+                perfil.dump_stats(str(ruta))
+                tiempos.perfil = str(ruta)
+                logger.info("[pipeline] perfil de %s %s guardado en %s", pipeline, perfil_id, ruta)
+            except OSError as exc:
+                logger.warning("[pipeline] no se pudo guardar el perfil de %s %s: %s", pipeline, perfil_id, exc)
+
+
+# ---------------------------------------------------------------------------
+# SQLAlchemy
+# ---------------------------------------------------------------------------
+
+def _before_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    if _actual.get() is not None and context is not None:
+        context._pipeline_t0 = time.perf_counter()
+
+
+def _after_cursor_execute(conn, cursor, statement, parameters, context, executemany) -> None:
+    tiempos = _actual.get()
+    t0 = getattr(context, "_pipeline_t0", None)
+    if tiempos is None or t0 is None:
+        return
+    segundos = time.perf_counter() - t0
+    tiempos.consultas += 1
+    tiempos.db_seconds += segundos
+    for medicion in tiempos._abiertas:
+        medicion.consultas += 1
+        medicion.db_seconds += segundos
+
+
+def instrumentar_engine(engine: Engine) -> None:
+    """Engancha los eventos de cursor al engine (idempotente)."""
+    if not event.contains(engine, "before_cursor_execute", _before_cursor_execute):
+        event.listen(engine, "before_cursor_execute", _before_cursor_execute)
+        event.listen(engine, "after_cursor_execute", _after_cursor_execute)
@@ -0,0 +1,476 @@
+# app/core/response_cache.py
+"""
+Caché de respuestas para endpoints de lectura con agregados pesados.
+
+Los endpoints del dashboard, las series de medidas_graficos y los filtros de
+medidas recalculan los mismos agregados cada vez que alguien abre la página,
+aunque los datos de MedidaGeneral/MedidaPS solo cambian cuando termina una
+ingestion, un borrado o se edita un comentario.
+
+Modelo:
+
+  - Clave = (namespace, tenant, conjunto de empresas permitidas, query params,
+    versión de datos global, versión de datos del tenant). La versión se
+    incrementa con `bump_data_version(tenant_id)` desde los puntos de
+    escritura; así nunca hay que borrar entradas: las viejas dejan de ser
+    alcanzables y el LRU las expulsa.
+  - Dos niveles: un LRU en memoria del proceso (siempre) y un backend
+    compartido opcional (`configure_shared_backend`) para cuando hay varios
+    workers. Sin backend compartido, las versiones viven en el proceso.
+  - ETag fuerte = sha256 del body serializado. Si el cliente manda
+    `If-None-Match` con el ETag vigente se responde 304 sin body.
+  - Métricas de hits/misses en `cache_stats()`.
+  - `warm_json_response` rellena por adelantado la entrada de una request
+    concreta (precalentamiento nocturno del dashboard), opcionalmente con un
+    TTL propio para que dure hasta la siguiente pasada.
+
+Importante: con varios workers uvicorn SIN backend compartido, un bump en un
+worker no invalida la caché de los demás hasta que caduque el TTL
+(RESPONSE_CACHE_TTL_SECONDS). En ese despliegue hay que configurar un
+backend compartido.
+"""
+from __future__ import annotations
+
+import hashlib
+import json
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass
+from typing import Any, Callable, Iterable
+
+from fastapi import Request, Response, status
+from fastapi.encoders import jsonable_encoder
+
+from app.core.config import get_settings
+from app.core.responses import MadridJSONResponse
+
+
+__all__ = [
+    "CacheBackend",
+    "MemoryCacheBackend",
+    "bump_data_version",
+    "cache_stats",
+    "cached_json_response",
+    "clear_response_cache",
+    "configure_shared_backend",
+    "get_data_version",
+    "warm_json_response",
+]
+
+
+# ---------------------------------------------------------------------------
+# Backends
+# ---------------------------------------------------------------------------
+
+
+class CacheBackend:
+    """
+    Interfaz mínima de un backend compartido (Redis, memcached...).
+
+    Se deja como clase base sin dependencias: la implementación concreta
+    se registra al arrancar con `configure_shared_backend(...)`.
+    """
+
+    def get(self, key: str) -> bytes | None:
+        raise NotImplementedError
+
+    def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        raise NotImplementedError
+
+    def incr(self, key: str) -> int:
+        raise NotImplementedError
+
+    def get_int(self, key: str) -> int:
+        raw = self.get(key)
+        if raw is None:
+            return 0
+        try:
+            return int(raw)
+        except (TypeError, ValueError):
+            return 0
+
+
+class MemoryCacheBackend(CacheBackend):
+    """Backend en memoria del proceso. Útil en tests y como referencia."""
+
+    def __init__(self) -> None:
+        self._data: dict[str, tuple[bytes, float | None]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, key: str) -> bytes | None:
+        with self._lock:
+            item = self._data.get(key)
+            if item is None:
+                return None
+            value, expires_at = item
+            if expires_at is not None and expires_at < time.monotonic():
+                self._data.pop(key, None)
+                return None
+            return value
+
+    def set(self, key: str, value: bytes, ttl_seconds: int) -> None:
+        expires_at = time.monotonic() + ttl_seconds if ttl_seconds > 0 else None
+        with self._lock:
+            self._data[key] = (value, expires_at)
+
+    def incr(self, key: str) -> int:
+        with self._lock:
+            current = self._data.get(key)
+            nuevo = (int(current[0]) if current else 0) + 1
+            self._data[key] = (str(nuevo).encode("ascii"), None)
+            return nuevo
+
+
+# ---------------------------------------------------------------------------
+# Estado del módulo
+# ---------------------------------------------------------------------------
+
+
+@dataclass
+class _Entry:
+    etag: str
+    body: bytes
+    stored_at: float
+    ttl_seconds: int | None = None  # TTL propio; None = el de la búsqueda
+
+
+class _LRU:
+    def __init__(self, max_entries: int) -> None:
+        self.max_entries = max(1, int(max_entries))
+        self._items: OrderedDict[str, _Entry] = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key: str, ttl_seconds: int) -> _Entry | None:
+        with self._lock:
+            entry = self._items.get(key)
+            if entry is None:
+                return None
+            if entry.ttl_seconds is not None:
+                ttl_seconds = entry.ttl_seconds
+            if ttl_seconds > 0 and time.monotonic() - entry.stored_at > ttl_seconds:
+                self._items.pop(key, None)
+                return None
+            self._items.move_to_end(key)
+            return entry
+
+    def set(self, key: str, entry: _Entry) -> None:
+        with self._lock:
+            self._items[key] = entry
+            self._items.move_to_end(key)
+            while len(self._items) > self.max_entries:
+                self._items.popitem(last=False)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._items.clear()
+
+    def __len__(self) -> int:
+        return len(self._items)
+
+
+_GLOBAL_SCOPE = "global"
+_VERSION_PREFIX = "respcache:version:"
+_ENTRY_PREFIX = "respcache:entry:"
+
+_lru = _LRU(get_settings().RESPONSE_CACHE_MAX_ENTRIES)
+_shared_backend: CacheBackend | None = None
+_local_versions: dict[str, int] = {}
+_versions_lock = threading.Lock()
+
+_stats_lock = threading.Lock()
+_stats: dict[str, int] = {
+    "hits_local": 0,
+    "hits_shared": 0,
+    "misses": 0,
+    "not_modified": 0,
+    "invalidations": 0,
+}
+
+
+def _incr_stat(name: str) -> None:
+    with _stats_lock:
+        _stats[name] = _stats.get(name, 0) + 1
+
+
+def configure_shared_backend(backend: CacheBackend | None) -> None:
+    """Registra (o quita, con None) el backend compartido entre workers."""
+    global _shared_backend
+    _shared_backend = backend
+    _lru.clear()
+
+
+def clear_response_cache() -> None:
+    """Vacía el LRU local y resetea versiones y métricas locales (tests)."""
+    _lru.clear()
+    with _versions_lock:
+        _local_versions.clear()
+    with _stats_lock:
+        for k in _stats:
+            _stats[k] = 0
+
+
+# ---------------------------------------------------------------------------
+# Versión de datos
+# ---------------------------------------------------------------------------
+
+
+def _version_scope(tenant_id: int | None) -> str:
+    return _GLOBAL_SCOPE if tenant_id is None else f"tenant:{int(tenant_id)}"
+
+
+def get_data_version(tenant_id: int | None) -> int:
+    scope = _version_scope(tenant_id)
+    if _shared_backend is not None:
+        try:
+            return _shared_backend.get_int(_VERSION_PREFIX + scope)
+        except Exception:
+            pass
+    with _versions_lock:
+        return _local_versions.get(scope, 0)
+
+
+def bump_data_version(tenant_id: int | None) -> None:
+    """
+    Invalida todas las respuestas cacheadas del tenant (o de todos los
+    tenants si `tenant_id` es None, p.ej. borrados de superusuario sin
+    filtro de tenant).
+
+    Llamar SIEMPRE después del commit de la escritura. Nunca lanza: un fallo
+    del backend compartido no debe romper la ingestion.
+    """
+    scope = _version_scope(tenant_id)
+    with _versions_lock:
+        _local_versions[scope] = _local_versions.get(scope, 0) + 1
+    if _shared_backend is not None:
+        try:
+            _shared_backend.incr(_VERSION_PREFIX + scope)
+        except Exception:
+            pass
+    _incr_stat("invalidations")
+
+
+# ---------------------------------------------------------------------------
+# Claves y ETags
+# ---------------------------------------------------------------------------
+
+
+def _build_key(
+    *,
+    namespace: str,
+    tenant_id: int,
+    allowed_empresa_ids: Iterable[int],
+    params: Iterable[tuple[str, str]],
+) -> str:
+    raw = json.dumps(
+        [
+            namespace,
+            int(tenant_id),
+            sorted({int(x) for x in allowed_empresa_ids}),
+            sorted((str(k), str(v)) for k, v in params),
+            get_data_version(None),
+            get_data_version(tenant_id),
+        ],
+        separators=(",", ":"),
+    )
+    return hashlib.sha256(raw.encode("utf-8")).hexdigest()
+
+
+def _etag_for(body: bytes) -> str:
+    return '"' + hashlib.sha256(body).hexdigest()[:32] + '"'
+
+
+def _if_none_match(request: Request, etag: str) -> bool:
+    header = request.headers.get("if-none-match")
+    if not header:
+        return False
+    candidates = [c.strip() for c in header.split(",")]
+    return "*" in candidates or etag in candidates
+
+
+def _pack(entry: _Entry) -> bytes:
+    return entry.etag.encode("ascii") + b"\n" + entry.body
+
+
+def _unpack(raw: bytes) -> _Entry | None:
+    etag, sep, body = raw.partition(b"\n")
+    if not sep:
+        return None
+    return _Entry(etag=etag.decode("ascii"), body=body, stored_at=time.monotonic())
+
+
+# ---------------------------------------------------------------------------
+# API pública
+# ---------------------------------------------------------------------------
+
+
+def _lookup(key: str, ttl: int) -> _Entry | None:
+    entry = _lru.get(key, ttl)
+    if entry is not None:
+        _incr_stat("hits_local")
+        return entry
+    if _shared_backend is not None:
+        try:
+            raw = _shared_backend.get(_ENTRY_PREFIX + key)
+        except Exception:
+            raw = None
+        entry = _unpack(raw) if raw else None
+        if entry is not None:
+            _incr_stat("hits_shared")
+            _lru.set(key, entry)
+    return entry
+
+
+def _keep(key: str, entry: _Entry, ttl: int) -> None:
+    _lru.set(key, entry)
+    if _shared_backend is not None:
+        try:
+            _shared_backend.set(_ENTRY_PREFIX + key, _pack(entry), ttl)
+        except Exception:
+            pass
+
+
+def _store(key: str, payload: Any, ttl: int, *, entry_ttl: int | None = None) -> _Entry:
+    body = MadridJSONResponse(content=jsonable_encoder(payload)).body
+    entry = _Entry(
+        etag=_etag_for(bytes(body)), body=bytes(body),
+        stored_at=time.monotonic(), ttl_seconds=entry_ttl,
+    )
+    _keep(key, entry, ttl if entry_ttl is None else entry_ttl)
+    return entry
+
+
+def cached_json_response(
+    request: Request,
+    *,
+    namespace: str,
+    tenant_id: int,
+    allowed_empresa_ids: Iterable[int],
+    build: Callable[[], Any],
+    extra_params: Iterable[tuple[str, str]] = (),
+) -> Response:
+    """
+    Devuelve la respuesta JSON de `build()` pasando por la caché.
+
+    `build` solo se ejecuta en un miss. Las comprobaciones de permisos deben
+    hacerse ANTES de llamar a esta función (el conjunto de empresas
+    permitidas forma parte de la clave, pero no sustituye a
+    `assert_empresa_access`). Las HTTPException que lance `build` se
+    propagan y no se cachean.
+
+    `extra_params` entra en la clave junto a los query params: sirve para
+    endpoints cuyo resultado depende de algo que no incrementa la versión
+    de datos (la fecha actual, una huella de otra tabla...).
+    """
+    settings = get_settings()
+    headers = {
+        "Cache-Control": "private, no-cache",
+        "Vary": "Authorization",
+    }
+
+    if not settings.RESPONSE_CACHE_ENABLED:
+        response = MadridJSONResponse(content=jsonable_encoder(build()))
+        response.headers.update(headers)
+        return response
+
+    ttl = int(settings.RESPONSE_CACHE_TTL_SECONDS)
+    key = _build_key(
+        namespace=namespace,
+        tenant_id=tenant_id,
+        allowed_empresa_ids=allowed_empresa_ids,
+        params=[*request.query_params.multi_items(), *extra_params],
+    )
+
+    entry = _lookup(key, ttl)
+    cache_state = "HIT"
+    if entry is None:
+        cache_state = "MISS"
+        _incr_stat("misses")
+        entry = _store(key, build(), ttl)
+
+    headers["ETag"] = entry.etag
+    headers["X-Cache"] = cache_state
+
+    if _if_none_match(request, entry.etag):
+        _incr_stat("not_modified")
+        return Response(status_code=status.HTTP_304_NOT_MODIFIED, headers=headers)
+
+    return Response(
+        content=entry.body,
+        media_type=MadridJSONResponse.media_type,
+        headers=headers,
+    )
+
+
+def warm_json_response(
+    *,
+    namespace: str,
+    tenant_id: int,
+    allowed_empresa_ids: Iterable[int],
+    params: Iterable[tuple[str, str]],
+    build: Callable[[], Any],
+    extra_params: Iterable[tuple[str, str]] = (),
+    ttl_seconds: int | None = None,
+) -> bool:
+    """
+    Precalienta la entrada que `cached_json_response` buscaría para una
+    request con esos query params (como strings, igual que llegan en la
+    URL). Devuelve True si ha tenido que construirla, False si ya estaba.
+
+    `ttl_seconds` fija la vida de la entrada en lugar de
+    RESPONSE_CACHE_TTL_SECONDS; si ya estaba, se renueva con ese TTL. Con
+    varios workers sin backend compartido, un TTL largo alarga también el
+    tiempo que los demás workers tardan en ver un bump (ver arriba).
+
+    No cuenta en los hits/misses de `cache_stats()`: esos miden lo que ven
+    los usuarios.
+    """
+    settings = get_settings()
+    if not settings.RESPONSE_CACHE_ENABLED:
+        return False
+
+    ttl = int(settings.RESPONSE_CACHE_TTL_SECONDS)
+    allowed = list(allowed_empresa_ids)
+    key = _build_key(
+        namespace=namespace,
+        tenant_id=tenant_id,
+        allowed_empresa_ids=allowed,
+        params=[*params, *extra_params],
+    )
+    entry = _lru.get(key, ttl)
+    if entry is None and _shared_backend is not None:
+        try:
+            raw = _shared_backend.get(_ENTRY_PREFIX + key)
+        except Exception:
+            raw = None
+        entry = _unpack(raw) if raw else None
+        if entry is not None:
+            _lru.set(key, entry)
+    if entry is not None:
+        if ttl_seconds is not None:
+            renovada = _Entry(
+                etag=entry.etag, body=entry.body,
+                stored_at=time.monotonic(), ttl_seconds=ttl_seconds,
+            )
+            _keep(key, renovada, ttl_seconds)
+        return False
+    _store(key, build(), ttl, entry_ttl=ttl_seconds)
+    return True
+
+
+def cache_stats() -> dict[str, Any]:
+    """Métricas de la caché de respuestas del proceso actual."""
+    with _stats_lock:
+        data: dict[str, Any] = dict(_stats)
+    lookups = data["hits_local"] + data["hits_shared"] + data["misses"]
+    data["hit_ratio"] = (
+        round((data["hits_local"] + data["hits_shared"]) / lookups, 4)
+        if lookups
+        else None
+    )
+    data["local_entries"] = len(_lru)
+    data["local_max_entries"] = _lru.max_entries
+    data["shared_backend"] = (
+        type(_shared_backend).__name__ if _shared_backend is not None else None
+    )
+    return data
@@ -0,0 +1,58 @@
+# app/core/responses.py
+"""
+Clases de respuesta HTTP compartidas.
+
+`MadridJSONResponse` es la `default_response_class` de la app (ver main.py).
+Vive aquí y no en main.py para que otros módulos (p.ej. la caché de
+respuestas de app/core/response_cache.py) puedan serializar exactamente
+igual que FastAPI sin importar main.py (import circular).
+"""
+from __future__ import annotations
+
+import re
+import time
+from datetime import datetime
+
+from fastapi.responses import JSONResponse
+
+from app.core.datetime_utils import TZ_MADRID
+from app.core.perf import record_serialization
+
+# ── Custom JSON response: añade offset Madrid a datetimes naive ──────────────
+# Los datetimes naive que escribe el backend ya están en hora Madrid local. JS
+# en el frontend interpreta strings ISO sin TZ como UTC y aplica +2h al
+# mostrarlas → mostraba 18:07 cuando eran las 16:07. Aquí post-procesamos cada
+# respuesta JSON añadiendo el offset Madrid correcto (CEST=+02:00 o CET=+01:00
+# según DST) a cada string datetime ISO naive.
+_RE_NAIVE_DT_IN_JSON = re.compile(r'"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?)"')
+
+
+def _add_madrid_offset_to_iso(match: "re.Match[str]") -> str:
+    """Toma un string ISO naive entre comillas y añade el offset Madrid (DST-aware)."""
+    iso = match.group(1)
+    try:
+        naive = datetime.fromisoformat(iso)
+        aware = naive.replace(tzinfo=TZ_MADRID)
+        return f'"{aware.isoformat()}"'
+    except (ValueError, TypeError):
+        return match.group(0)
+
+
+class MadridJSONResponse(JSONResponse):
+    """JSONResponse que añade offset Madrid a cualquier datetime naive ISO en el body."""
+
+    def render(self, content) -> bytes:
+        t0 = time.perf_counter()
+        try:
+            return self._render(content)
+        finally:
+            record_serialization(time.perf_counter() - t0)
+
+    def _render(self, content) -> bytes:
+        body = super().render(content)
+        try:
+            text = body.decode("utf-8")
+            transformed = _RE_NAIVE_DT_IN_JSON.sub(_add_madrid_offset_to_iso, text)
+            return transformed.encode("utf-8")
+        except (UnicodeDecodeError, ValueError):
+            return body
@@ -0,0 +1,301 @@
+# app/dashboard/precalentamiento.py
+# pyright: reportMissingImports=false
+"""
+Precalentamiento de la caché de respuestas del dashboard.
+
+La primera persona que abría el dashboard por la mañana pagaba el cálculo
+en frío de `/dashboard/summary`, `/dashboard/tablas/mensual` y
+`/dashboard/envios-resumen`. El scheduler (app/comunicaciones/scheduler.py)
+llama aquí cuando han terminado los jobs nocturnos y los de primera hora:
+para cada tenant y cada conjunto distinto de empresas permitidas de sus
+usuarios activos se construye la respuesta de la carga por defecto del
+frontend y se guarda con `warm_json_response` bajo la misma clave que
+usará la request.
+
+Huellas: los resultados de tablas/mensual y envios-resumen dependen de
+cosas que no incrementan la versión de datos del tenant (la fecha y hora
+actuales, envios_m, festivos, calendario REE). Las rutas añaden a la clave
+de caché la huella que devuelven `huella_tablas_mensual` /
+`huella_envios_resumen` (contador + último updated_at de cada tabla y el
+tramo horario), así que un cambio en esas tablas o el cambio de día deja
+la entrada vieja inalcanzable.
+
+Caducidad: las entradas precalentadas no usan RESPONSE_CACHE_TTL_SECONDS
+(1 h), que dejaría la de las 00:15 caducada a la 01:15, sino un TTL hasta
+la siguiente pasada completa del scheduler más un margen
+(`ttl_hasta_siguiente_pasada`).
+
+Obsolescencia: por tenant se guarda la versión de datos y las huellas con
+las que se precalentó, y cuándo caducan sus entradas. `estado_precalentamiento`
+compara con las actuales y `precalentar_todos(solo_obsoletos=True)` (job de
+madrugada cada 15 min) rehace solo los tenants cuyos datos han cambiado o
+cuyas entradas han caducado desde entonces.
+"""
+from __future__ import annotations
+
+import logging
+import threading
+import time
+from datetime import date, datetime, timedelta
+from typing import Any, Callable, Dict, List, Optional, Tuple
+
+from fastapi import HTTPException
+from sqlalchemy import func
+from sqlalchemy.orm import Session
+
+from app.calendario_laboral.models import DiaFestivoMadrid
+from app.calendario_ree.models import ReeCalendarEvent, ReeCalendarFile
+from app.core.config import get_settings
+from app.core.datetime_utils import ahora_madrid
+from app.core.response_cache import get_data_version, warm_json_response
+from app.envios.models import EnvioM
+
+
+logger = logging.getLogger(__name__)
+
+Params = List[Tuple[str, str]]
+
+# Hora de los plazos REE (ver services_envios.calcular_plazo): a esa hora
+# cambian los estados "vence_hoy" → "vencido"/"enviado".
+_HORA_PLAZO_REE = 8
+
+# Pasadas completas del scheduler (app/comunicaciones/scheduler.py), hora y
+# minuto en Europe/Madrid, y margen para que lo precalentado no caduque
+# mientras corre la siguiente.
+_PASADAS = ((0, 15), (8, 5))
+_MARGEN_TTL = timedelta(minutes=30)
+
+_estado: Dict[int, Dict[str, Any]] = {}
+_estado_lock = threading.Lock()
+
+
+# ── Huellas ──────────────────────────────────────────────────────────────────
+
+def _huella_tabla(db: Session, model, tenant_id: int) -> str:
+    n, ultimo = (
+        db.query(func.count(model.id), func.max(model.updated_at))
+        .filter(model.tenant_id == tenant_id)
+        .one()
+    )
+    return f"{int(n or 0)}:{ultimo.isoformat() if ultimo else '-'}"
+
+
+def huella_envios_resumen(db: Session, *, tenant_id: int, ahora: Optional[datetime] = None) -> Params:
+    ahora = ahora or ahora_madrid()
+    return [
+        ("_envios", _huella_tabla(db, EnvioM, tenant_id)),
+        ("_festivos", _huella_tabla(db, DiaFestivoMadrid, tenant_id)),
+        ("_dia", ahora.date().isoformat()),
+        ("_tras_plazo", "1" if ahora.hour >= _HORA_PLAZO_REE else "0"),
+    ]
+
+
+def huella_tablas_mensual(db: Session, *, tenant_id: int, hoy: Optional[date] = None) -> Params:
+    hoy = hoy or ahora_madrid().date()
+    return [
+        ("_mes", f"{hoy:%Y-%m}"),
+        ("_calendario_ree", _huella_tabla(db, ReeCalendarFile, tenant_id)),
+        ("_eventos_ree", _huella_tabla(db, ReeCalendarEvent, tenant_id)),
+    ]
+
+
+# ── Carga por defecto del frontend ───────────────────────────────────────────
+
+def _mes_anterior(hoy: date) -> Tuple[int, int]:
+    return (hoy.year - 1, 12) if hoy.month == 1 else (hoy.year, hoy.month - 1)
+
+
+def _conjuntos_empresas(db: Session, tenant_id: int) -> List[List[int]]:
+    """Conjuntos distintos de empresas permitidas entre los usuarios activos."""
+    from app.core.permissions import get_allowed_empresa_ids
+    from app.tenants.models import User
+
+    usuarios = (
+        db.query(User)
+        .filter(User.tenant_id == tenant_id, User.is_active.is_(True))
+        .all()
+    )
+    conjuntos = {frozenset(get_allowed_empresa_ids(db, u)) for u in usuarios}
+    return [sorted(c) for c in sorted(conjuntos, key=sorted) if c]
+
+
+def _entradas(db: Session, tenant_id: int) -> List[Tuple[str, Params, Params, bool, Callable[[List[int]], Any]]]:
+    """(namespace, params, huella, por_conjunto, build(allowed)) de cada endpoint."""
+    from app.dashboard.routes import _build_dashboard_summary_payload
+    from app.dashboard.schemas_envios import EnviosResumenResp
+    from app.dashboard.services_envios import build_envios_resumen
+    from app.dashboard_tablas.routes import build_tablas_mensual
+
+    ahora = ahora_madrid()
+    anio_carga, mes_carga = _mes_anterior(ahora.date())
+
+    return [
+        (
+            "dashboard.summary",
+            [("anio", str(anio_carga)), ("mes", str(mes_carga))],
+            [],
+            True,
+            lambda allowed: _build_dashboard_summary_payload(
+                db, tenant_id_int=tenant_id, allowed_empresa_ids=allowed,
+                empresa_id=None, anio=anio_carga, mes=mes_carga,
+            ),
+        ),
+        (
+            "dashboard_tablas.mensual",
+            [("carga_anio", str(anio_carga)), ("carga_mes", str(mes_carga))],
+            huella_tablas_mensual(db, tenant_id=tenant_id),
+            True,
+            lambda allowed: build_tablas_mensual(
+                db, tenant_id=tenant_id, allowed=allowed,
+                carga_anio=anio_carga, carga_mes=mes_carga,
+            ),
+        ),
+        (
+            "dashboard.envios_resumen",
+            [("anio", str(ahora.year)), ("mes", str(ahora.month)), ("modo", "mensual")],
+            huella_envios_resumen(db, tenant_id=tenant_id, ahora=ahora),
+            False,
+            lambda allowed: EnviosResumenResp.model_validate(
+                build_envios_resumen(db, tenant_id=tenant_id, anio=ahora.year, mes=ahora.month, modo="mensual")
+            ),
+        ),
+    ]
+
+
+# ── Precalentamiento ─────────────────────────────────────────────────────────
+
+def ttl_hasta_siguiente_pasada(ahora: Optional[datetime] = None) -> int:
+    """Segundos hasta la siguiente pasada completa más el margen; nunca menos que el TTL normal."""
+    ahora = ahora or ahora_madrid()
+    hoy = datetime.combine(ahora.date(), datetime.min.time())
+    siguiente = min(
+        p for p in (hoy + timedelta(days=d, hours=h, minutes=m) for d in (0, 1) for h, m in _PASADAS)
+        if p > ahora
+    )
+    ttl = int((siguiente - ahora + _MARGEN_TTL).total_seconds())
+    return max(ttl, int(get_settings().RESPONSE_CACHE_TTL_SECONDS))
+
+
+def _firma(db: Session, tenant_id: int) -> Dict[str, Any]:
+    """Lo que, si cambia, deja obsoleto lo precalentado del tenant."""
+    return {
+        "version": (get_data_version(None), get_data_version(tenant_id)),
+        "huellas": {
+            "dashboard_tablas.mensual": huella_tablas_mensual(db, tenant_id=tenant_id),
+            "dashboard.envios_resumen": huella_envios_resumen(db, tenant_id=tenant_id),
+        },
+    }
+
+
+def precalentar_tenant(db: Session, *, tenant_id: int) -> Dict[str, Any]:
+    """Precalienta los endpoints del dashboard de un tenant."""
+    t0 = time.monotonic()
+
+    # La firma se toma ANTES de calcular: si los datos cambian mientras tanto
+    # el tenant sale como obsoleto en la siguiente pasada.
+    firma = _firma(db, tenant_id)
+    conjuntos = _conjuntos_empresas(db, tenant_id)
+    ttl = ttl_hasta_siguiente_pasada()
+
+    construidas = 0
+    total = 0
+    for namespace, params, huella, por_conjunto, build in _entradas(db, tenant_id):
+        for allowed in (conjuntos if por_conjunto else [[]]):
+            total += 1
+            try:
+                if warm_json_response(
+                    namespace=namespace,
+                    tenant_id=tenant_id,
+                    allowed_empresa_ids=allowed,
+                    params=params,
+                    extra_params=huella,
+                    build=lambda allowed=allowed, build=build: build(allowed),
+                    ttl_seconds=ttl,
+                ):
+                    construidas += 1
+            except HTTPException:
+                # Sin datos para ese periodo: la request real también
+                # respondería el error, no hay nada que cachear.
+                continue
+
+    resultado = {
+        "tenant_id": tenant_id,
+        "precalentado_at": ahora_madrid(),
+        "conjuntos_empresas": len(conjuntos),
+        "entradas": total,
+        "construidas": construidas,
+        "segundos": round(time.monotonic() - t0, 3),
+    }
+    with _estado_lock:
+        _estado[tenant_id] = {**resultado, "firma": firma, "caduca": t0 + ttl}
+    return resultado
+
+
+def _motivo_obsoleto(db: Session, tenant_id: int) -> Optional[str]:
+    with _estado_lock:
+        previo = _estado.get(tenant_id)
+    if previo is None:
+        return "sin precalentar"
+    if time.monotonic() >= previo["caduca"]:
+        return "entradas caducadas"
+    actual = _firma(db, tenant_id)
+    if actual["version"] != previo["firma"]["version"]:
+        return "datos de medidas cambiados"
+    for namespace, huella in actual["huellas"].items():
+        if huella != previo["firma"]["huellas"].get(namespace):
+            return f"huella de {namespace} cambiada"
+    return None
+
+
+def estado_precalentamiento(db: Session) -> List[Dict[str, Any]]:
+    """Estado por tenant para /admin/dashboard-precalentamiento."""
+    from app.tenants.models import Tenant
+
+    out = []
+    for (tenant_id,) in db.query(Tenant.id).order_by(Tenant.id).all():
+        tid = int(tenant_id)
+        with _estado_lock:
+            previo = {k: v for k, v in _estado.get(tid, {}).items() if k not in ("firma", "caduca")}
+        motivo = _motivo_obsoleto(db, tid)
+        out.append({
+            "tenant_id": tid,
+            **previo,
+            "obsoleto": motivo is not None,
+            "motivo": motivo,
+        })
+    return out
+
+
+def precalentar_todos(SessionLocal, *, solo_obsoletos: bool = False) -> List[Dict[str, Any]]:
+    """
+    Función llamada por el scheduler. Un fallo en un tenant no para al
+    resto. Con `solo_obsoletos` se saltan los tenants sin cambios desde el
+    último precalentamiento.
+    """
+    if not get_settings().DASHBOARD_PRECALENTAMIENTO_ENABLED:
+        return []
+
+    from app.tenants.models import Tenant
+
+    resultados: List[Dict[str, Any]] = []
+    db: Session = SessionLocal()
+    try:
+        tenant_ids = [int(t) for (t,) in db.query(Tenant.id).order_by(Tenant.id).all()]
+        for tid in tenant_ids:
+            try:
+                if solo_obsoletos and _motivo_obsoleto(db, tid) is None:
+                    continue
+                res = precalentar_tenant(db, tenant_id=tid)
+                resultados.append(res)
+                logger.info(
+                    "precalentamiento dashboard tenant=%s: %d/%d entradas construidas en %.2fs",
+                    tid, res["construidas"], res["entradas"], res["segundos"],
+                )
+            except Exception as e:
+                logger.error(f"precalentamiento dashboard tenant={tid}: {e}")
+            finally:
+                # Solo lectura: cerrar la transacción entre tenants.
+                db.rollback()
+    finally:
+        db.close()
+    return resultados
@@ -1,14 +1,16 @@
 from __future__ import annotations
 
-from typing import Any, cast
+from typing import Any, Callable, cast
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Depends, HTTPException, Request, status
 from sqlalchemy import and_, false as sql_false, func, or_
 from sqlalchemy.orm import Query, Session
 
 from app.core.auth import get_current_user
 from app.core.db import get_db
 from app.core.permissions import assert_empresa_access, get_allowed_empresa_ids
+from app.core.response_cache import cached_json_response
+from app.dashboard.precalentamiento import huella_envios_resumen
 from app.dashboard.schemas_envios import EnviosHistoricoResp, EnviosResumenResp
 from app.dashboard.services_envios import build_envios_historico, build_envios_resumen
 from app.empresas.models import Empresa
@@ -562,23 +564,15 @@ def get_dashboard_filters(
     }
 
 
-@router.get("/summary")
-def get_dashboard_summary(
-    empresa_id: int | None = None,
-    anio: int | None = None,
-    mes: int | None = None,
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
-):
-    tenant_id_int = int(cast(int, current_user.tenant_id))
-    allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
-
-    _ensure_empresa_belongs_to_tenant(
-        db,
-        current_user=current_user,
-        empresa_id=empresa_id,
-    )
-
+def _build_dashboard_summary_payload(
+    db: Session,
+    *,
+    tenant_id_int: int,
+    allowed_empresa_ids: list[int],
+    empresa_id: int | None,
+    anio: int | None,
+    mes: int | None,
+) -> dict[str, Any]:
     periodo_anio, periodo_mes = _resolve_common_period(
         db,
         tenant_id=tenant_id_int,
@@ -729,8 +723,9 @@ def get_dashboard_summary(
     }
 
 
-@router.get("/energy-comparison-chart")
-def get_dashboard_energy_comparison_chart(
+@router.get("/summary")
+def get_dashboard_summary(
+    request: Request,
     empresa_id: int | None = None,
     anio: int | None = None,
     mes: int | None = None,
@@ -746,6 +741,32 @@ def get_dashboard_energy_comparison_chart(
         empresa_id=empresa_id,
     )
 
+    return cached_json_response(
+        request,
+        namespace="dashboard.summary",
+        tenant_id=tenant_id_int,
+        allowed_empresa_ids=allowed_empresa_ids,
+        build=lambda: _build_dashboard_summary_payload(
+            db,
+            tenant_id_int=tenant_id_int,
+            allowed_empresa_ids=allowed_empresa_ids,
+            empresa_id=empresa_id,
+            anio=anio,
+            mes=mes,
+        ),
+    )
+
+
+def _build_dashboard_chart_payload(
+    db: Session,
+    *,
+    tenant_id_int: int,
+    allowed_empresa_ids: list[int],
+    empresa_id: int | None,
+    anio: int | None,
+    mes: int | None,
+    series_builder: Callable[..., list[dict[str, float | int | str]]],
+) -> dict[str, Any]:
     periodo_anio, periodo_mes = _resolve_common_period(
         db,
         tenant_id=tenant_id_int,
@@ -764,7 +785,7 @@ def get_dashboard_energy_comparison_chart(
             detail="Mes no válido para construir la gráfica.",
         )
 
-    series = _build_energy_comparison_chart_series(
+    series = series_builder(
         db,
         tenant_id=tenant_id_int,
         allowed_empresa_ids=allowed_empresa_ids,
@@ -793,8 +814,9 @@ def get_dashboard_energy_comparison_chart(
     }
 
 
-@router.get("/energy-trend-chart")
-def get_dashboard_energy_trend_chart(
+@router.get("/energy-comparison-chart")
+def get_dashboard_energy_comparison_chart(
+    request: Request,
     empresa_id: int | None = None,
     anio: int | None = None,
     mes: int | None = None,
@@ -810,55 +832,61 @@ def get_dashboard_energy_trend_chart(
         empresa_id=empresa_id,
     )
 
-    periodo_anio, periodo_mes = _resolve_common_period(
-        db,
+    return cached_json_response(
+        request,
+        namespace="dashboard.energy_comparison_chart",
         tenant_id=tenant_id_int,
         allowed_empresa_ids=allowed_empresa_ids,
-        empresa_id=empresa_id,
-        anio=anio,
-        mes=mes,
+        build=lambda: _build_dashboard_chart_payload(
+            db,
+            tenant_id_int=tenant_id_int,
+            allowed_empresa_ids=allowed_empresa_ids,
+            empresa_id=empresa_id,
+            anio=anio,
+            mes=mes,
+            series_builder=_build_energy_comparison_chart_series,
+        ),
     )
 
-    chart_anio = periodo_anio
-    chart_max_mes = int(mes) if mes is not None else periodo_mes
 
-    if chart_max_mes < 1 or chart_max_mes > 12:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Mes no válido para construir la gráfica.",
-        )
+@router.get("/energy-trend-chart")
+def get_dashboard_energy_trend_chart(
+    request: Request,
+    empresa_id: int | None = None,
+    anio: int | None = None,
+    mes: int | None = None,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    tenant_id_int = int(cast(int, current_user.tenant_id))
+    allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
 
-    series = _build_energy_trend_chart_series(
+    _ensure_empresa_belongs_to_tenant(
         db,
-        tenant_id=tenant_id_int,
-        allowed_empresa_ids=allowed_empresa_ids,
+        current_user=current_user,
         empresa_id=empresa_id,
-        anio=chart_anio,
-        max_mes=chart_max_mes,
     )
 
-    return {
-        "filters": {
-            "tenant_id": tenant_id_int,
-            "empresa_id": empresa_id,
-            "anio": anio,
-            "mes": mes,
-        },
-        "resolved_period": {
-            "anio": periodo_anio,
-            "mes": periodo_mes,
-        },
-        "chart_scope": {
-            "anio": chart_anio,
-            "from_mes": 1,
-            "to_mes": chart_max_mes,
-        },
-        "series": series,
-    }
+    return cached_json_response(
+        request,
+        namespace="dashboard.energy_trend_chart",
+        tenant_id=tenant_id_int,
+        allowed_empresa_ids=allowed_empresa_ids,
+        build=lambda: _build_dashboard_chart_payload(
+            db,
+            tenant_id_int=tenant_id_int,
+            allowed_empresa_ids=allowed_empresa_ids,
+            empresa_id=empresa_id,
+            anio=anio,
+            mes=mes,
+            series_builder=_build_energy_trend_chart_series,
+        ),
+    )
 
 
 @router.get("/losses-trend-chart")
 def get_dashboard_losses_trend_chart(
+    request: Request,
     empresa_id: int | None = None,
     anio: int | None = None,
     mes: int | None = None,
@@ -874,52 +902,22 @@ def get_dashboard_losses_trend_chart(
         empresa_id=empresa_id,
     )
 
-    periodo_anio, periodo_mes = _resolve_common_period(
-        db,
-        tenant_id=tenant_id_int,
-        allowed_empresa_ids=allowed_empresa_ids,
-        empresa_id=empresa_id,
-        anio=anio,
-        mes=mes,
-    )
-
-    chart_anio = periodo_anio
-    chart_max_mes = int(mes) if mes is not None else periodo_mes
-
-    if chart_max_mes < 1 or chart_max_mes > 12:
-        raise HTTPException(
-            status_code=status.HTTP_400_BAD_REQUEST,
-            detail="Mes no válido para construir la gráfica.",
-        )
-
-    series = _build_losses_trend_chart_series(
-        db,
+    return cached_json_response(
+        request,
+        namespace="dashboard.losses_trend_chart",
         tenant_id=tenant_id_int,
         allowed_empresa_ids=allowed_empresa_ids,
-        empresa_id=empresa_id,
-        anio=chart_anio,
-        max_mes=chart_max_mes,
+        build=lambda: _build_dashboard_chart_payload(
+            db,
+            tenant_id_int=tenant_id_int,
+            allowed_empresa_ids=allowed_empresa_ids,
+            empresa_id=empresa_id,
+            anio=anio,
+            mes=mes,
+            series_builder=_build_losses_trend_chart_series,
+        ),
     )
 
-    return {
-        "filters": {
-            "tenant_id": tenant_id_int,
-            "empresa_id": empresa_id,
-            "anio": anio,
-            "mes": mes,
-        },
-        "resolved_period": {
-            "anio": periodo_anio,
-            "mes": periodo_mes,
-        },
-        "chart_scope": {
-            "anio": chart_anio,
-            "from_mes": 1,
-            "to_mes": chart_max_mes,
-        },
-        "series": series,
-    }
-
 
 # ── Dashboard de envíos REE ──────────────────────────────────────────────
 # Endpoint independiente del resto del dashboard. No mezcla datos de medidas
@@ -928,6 +926,7 @@ def get_dashboard_losses_trend_chart(
 
 @router.get("/envios-resumen", response_model=EnviosResumenResp)
 def get_dashboard_envios_resumen(
+    request: Request,
     anio: int,
     mes: int,
     modo: str = "mensual",
@@ -966,16 +965,27 @@ def get_dashboard_envios_resumen(
 
     tenant_id_int = int(cast(int, current_user.tenant_id))
 
-    payload = build_envios_resumen(
-        db,
+    # El resumen es de todo el tenant (no depende de las empresas del
+    # usuario): una sola entrada de caché para todos. Los plazos dependen de
+    # la hora y de envios_m/festivos, que no mueven la versión de datos:
+    # van en la huella.
+    return cached_json_response(
+        request,
+        namespace="dashboard.envios_resumen",
         tenant_id=tenant_id_int,
-        anio=anio,
-        mes=mes,
-        modo=modo,
+        allowed_empresa_ids=(),
+        extra_params=huella_envios_resumen(db, tenant_id=tenant_id_int),
+        build=lambda: EnviosResumenResp.model_validate(
+            build_envios_resumen(
+                db,
+                tenant_id=tenant_id_int,
+                anio=anio,
+                mes=mes,
+                modo=modo,
+            )
+        ),
     )
 
-    return EnviosResumenResp.model_validate(payload)
-
 @router.get("/envios-historico", response_model=EnviosHistoricoResp)
 def get_dashboard_envios_historico(
     db: Session = Depends(get_db),
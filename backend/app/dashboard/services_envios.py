@@ -23,11 +23,11 @@ from zoneinfo import ZoneInfo
 
 from sqlalchemy.orm import Session
 
-from app.calendario_laboral.services_db import cargar_festivos_set_activos
-from app.calendario_laboral.services_festivos import (
-    nth_dia_habil_madrid,
-    nth_dia_natural_mes,
+from app.calendario_laboral.services_calendario import (
+    CalendarioLaboral,
+    obtener_calendario,
 )
+from app.calendario_laboral.services_festivos import nth_dia_natural_mes
 from app.empresas.models import Empresa
 from app.envios.models import EnvioM
 
@@ -100,17 +100,17 @@ def calcular_plazo(
     mes_envio_anio: int,
     mes_envio_mes: int,
     m_clas: str,
-    festivos: set[date],
+    calendario: CalendarioLaboral,
 ) -> tuple[datetime, str]:
     """Calcula la fecha-hora límite REE para un M concreto en un mes_envio."""
     label = cast(str, PLAZOS_CONFIG[m_clas]["label"])
 
     if m_clas == "M1":
-        fecha = nth_dia_habil_madrid(mes_envio_anio, mes_envio_mes, 4, festivos)
+        fecha = calendario.nth_dia_habil(mes_envio_anio, mes_envio_mes, 4)
     elif m_clas == "M2":
         fecha = nth_dia_natural_mes(mes_envio_anio, mes_envio_mes, 12)
     elif m_clas == "M7":
-        fecha = nth_dia_habil_madrid(mes_envio_anio, mes_envio_mes, 11, festivos)
+        fecha = calendario.nth_dia_habil(mes_envio_anio, mes_envio_mes, 11)
     else:
         raise ValueError(f"M no soportada: {m_clas}")
 
@@ -195,7 +195,7 @@ def _build_alertas(
     tenant_id: int,
     mes_envio_anio: int,
     mes_envio_mes: int,
-    festivos: set[date],
+    calendario: CalendarioLaboral,
 ) -> dict[str, dict[str, Any]]:
     """Construye {"M1": ..., "M2": ..., "M7": ...} con AlertaPlazo."""
     ahora = _madrid_now()
@@ -203,7 +203,7 @@ def _build_alertas(
 
     for m_clas in ORDEN_MS:
         periodo_anio, periodo_mes = _periodo_para_m(mes_envio_anio, mes_envio_mes, m_clas)
-        plazo_dt, label = calcular_plazo(mes_envio_anio, mes_envio_mes, m_clas, festivos)
+        plazo_dt, label = calcular_plazo(mes_envio_anio, mes_envio_mes, m_clas, calendario)
         ficheros_enviados = _contar_enviados_total_M(
             db,
             tenant_id=tenant_id,
@@ -402,13 +402,13 @@ def build_envios_resumen(
     # Alertas: solo en modo "mensual"
     alertas: dict[str, dict[str, Any]] | None = None
     if modo == "mensual":
-        festivos = cargar_festivos_set_activos(db, tenant_id=tenant_id, anio=anio)
+        calendario = obtener_calendario(db, tenant_id=tenant_id)
         alertas = _build_alertas(
             db,
             tenant_id=tenant_id,
             mes_envio_anio=anio,
             mes_envio_mes=mes,
-            festivos=festivos,
+            calendario=calendario,
         )
 
     return {
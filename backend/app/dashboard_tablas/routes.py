@@ -5,16 +5,18 @@ from __future__ import annotations
 from collections import defaultdict
 from typing import Any, cast
 
-from fastapi import APIRouter, Depends
+from fastapi import APIRouter, Depends, Request
 from sqlalchemy import false as sql_false
 from sqlalchemy.orm import Session
 
 from datetime import date
 
-from app.calendario_ree.models import ReeCalendarEvent, ReeCalendarFile
+from app.calendario_ree import services_indice
 from app.core.auth import get_current_user
 from app.core.db import get_db
 from app.core.permissions import get_allowed_empresa_ids
+from app.core.response_cache import cached_json_response
+from app.dashboard.precalentamiento import huella_tablas_mensual
 from app.empresas.models import Empresa
 from app.measures.models import MedidaGeneral, MedidaPS
 from app.tenants.models import User
@@ -211,52 +213,15 @@ def _row_has_ventana(row: MedidaGeneral, ventana: VentanaCode) -> bool:
 #
 # Por ejemplo: si hoy es 27 abril 2026, M11 muestra el mes cuyo
 # CIERRE DEFINITIVO ocurre en abril 2026 (cae el 30/04 → Junio 2025).
-VENTANA_HITO_CALENDARIO: dict[VentanaCode, tuple[str, str]] = {
-    "m1":    ("M+1",         "Publicación del cierre M+1"),
-    "m2":    ("M+2",         "Publicación del cierre M+2"),
-    "m7":    ("Provisional", "CIERRE PROVISIONAL"),
-    "m11":   ("Definitivo",  "CIERRE DEFINITIVO"),
-    "art15": ("Art. 15",     "PUBLICACION NUEVO CIERRE DE ENERGÍA"),
+# La clasificación de eventos en hitos vive en app.calendario_ree.services_indice.
+VENTANA_HITO_CALENDARIO: dict[VentanaCode, str] = {
+    "m1":    services_indice.HITO_PUBLICACION_M1,
+    "m2":    services_indice.HITO_PUBLICACION_M2,
+    "m7":    services_indice.HITO_PUBLICACION_M7,
+    "m11":   services_indice.HITO_PUBLICACION_M11,
+    "art15": services_indice.HITO_PUBLICACION_ART15,
 }
 
-# "Enero" -> 1, etc. Necesario para parsear el campo `mes_afectado` del
-# calendario REE (formato "Mes Año" en castellano).
-_MES_NOMBRE_A_NUM: dict[str, int] = {
-    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
-    "julio": 7, "agosto": 8, "septiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
-}
-
-
-# Mapeo abreviaturas -> número de mes (formato 'Jun 25').
-_MES_ABREV_A_NUM: dict[str, int] = {
-    "ene": 1, "feb": 2, "mar": 3, "abr": 4, "may": 5, "jun": 6,
-    "jul": 7, "ago": 8, "sep": 9, "oct": 10, "nov": 11, "dic": 12,
-}
-
-
-def _parse_mes_afectado(texto: str) -> tuple[int, int] | None:
-    """Convierte 'Junio 2025' o 'Jun 25' -> (2025, 6). None si no parsea."""
-    if not texto:
-        return None
-    parts = texto.strip().split()
-    if len(parts) != 2:
-        return None
-    nombre, anio_str = parts
-    mes = _MES_NOMBRE_A_NUM.get(nombre.lower())
-    if mes is None:
-        # Intentar abreviatura (3 letras): 'Jun', 'Sep', ...
-        mes = _MES_ABREV_A_NUM.get(nombre.lower()[:3])
-    if mes is None:
-        return None
-    try:
-        anio = int(anio_str)
-        # Si viene en formato corto 'Jun 25' -> año 2025
-        if anio < 100:
-            anio += 2000
-        return anio, mes
-    except ValueError:
-        return None
-
 
 def _meses_objetivo_por_calendario_ree(
     db: Session,
@@ -284,52 +249,16 @@ def _meses_objetivo_por_calendario_ree(
         hoy = date.today()
         anio_p, mes_p = hoy.year, hoy.month
 
-    primer_dia_mes = date(anio_p, mes_p, 1)
-    if mes_p == 12:
-        primer_dia_mes_siguiente = date(anio_p + 1, 1, 1)
-    else:
-        primer_dia_mes_siguiente = date(anio_p, mes_p + 1, 1)
-
-    # Calendario activo del tenant. Si no hay → todas las ventanas a None.
-    active_file = (
-        db.query(ReeCalendarFile)
-        .filter(
-            ReeCalendarFile.tenant_id == tenant_id,
-            ReeCalendarFile.is_active.is_(True),
-        )
-        .order_by(
-            ReeCalendarFile.anio.desc(),
-            ReeCalendarFile.created_at.desc(),
-            ReeCalendarFile.id.desc(),
-        )
-        .first()
-    )
-    if active_file is None:
+    # Solo cuenta el calendario activo del tenant. Si no hay → todas a None.
+    indice = services_indice.obtener_indice(db, tenant_id=tenant_id)
+    if indice.archivo_activo_id is None:
         return resultado
 
-    # Traemos los hitos del mes vigente para ese calendario.
-    eventos = (
-        db.query(ReeCalendarEvent)
-        .filter(
-            ReeCalendarEvent.tenant_id == tenant_id,
-            ReeCalendarEvent.calendar_file_id == active_file.id,
-            ReeCalendarEvent.fecha >= primer_dia_mes,
-            ReeCalendarEvent.fecha < primer_dia_mes_siguiente,
-        )
-        .all()
-    )
-
     for ventana in VENTANAS:
-        categoria_esperada, evento_substring = VENTANA_HITO_CALENDARIO[ventana]
-        for ev in eventos:
-            if str(ev.categoria) != categoria_esperada:
-                continue
-            if evento_substring not in str(ev.evento):
-                continue
-            parsed = _parse_mes_afectado(str(ev.mes_afectado))
-            if parsed is not None:
-                resultado[ventana] = parsed
-                break
+        resultado[ventana] = indice.mes_publicado_en(
+            VENTANA_HITO_CALENDARIO[ventana], anio_p, mes_p,
+            calendar_file_id=indice.archivo_activo_id,
+        )
 
     return resultado
 
@@ -343,9 +272,8 @@ def _fecha_publicacion_por_grupo(
     Para cada (ventana, anio_objetivo, mes_objetivo) busca la fecha de
     publicación REAL en el calendario REE activo del tenant.
 
-    El calendario REE almacena un evento por hito. Para encontrar la fecha
-    de publicación de M11 jun 2025 buscamos: categoria='Definitivo',
-    evento contiene 'CIERRE DEFINITIVO', mes_afectado parsea a (2025, 6).
+    P. ej. la de M11 jun 2025 es la del hito CIERRE DEFINITIVO cuyo
+    mes_afectado es (2025, 6).
 
     Devuelve dict {(ventana, anio, mes): "30 abr 2026"} o None si no se
     encuentra.
@@ -357,54 +285,21 @@ def _fecha_publicacion_por_grupo(
         return resultado
 
     # Calendario activo del tenant (mismo criterio que en _meses_objetivo).
-    active_file = (
-        db.query(ReeCalendarFile)
-        .filter(
-            ReeCalendarFile.tenant_id == tenant_id,
-            ReeCalendarFile.is_active.is_(True),
-        )
-        .order_by(
-            ReeCalendarFile.anio.desc(),
-            ReeCalendarFile.created_at.desc(),
-            ReeCalendarFile.id.desc(),
-        )
-        .first()
-    )
-    if active_file is None:
+    indice = services_indice.obtener_indice(db, tenant_id=tenant_id)
+    if indice.archivo_activo_id is None:
         return resultado
 
-    # Traemos TODOS los hitos del fichero activo. Son ~50-60 al año, no es
-    # caro y evita una query por grupo.
-    eventos = (
-        db.query(ReeCalendarEvent)
-        .filter(
-            ReeCalendarEvent.tenant_id == tenant_id,
-            ReeCalendarEvent.calendar_file_id == active_file.id,
-        )
-        .all()
-    )
-
     for ventana, anio_v, mes_v, _ in grupos:
-        categoria_esperada, evento_substring = VENTANA_HITO_CALENDARIO[ventana]
-        for ev in eventos:
-            if str(ev.categoria) != categoria_esperada:
-                continue
-            if evento_substring not in str(ev.evento):
-                continue
-            parsed = _parse_mes_afectado(str(ev.mes_afectado))
-            if parsed != (anio_v, mes_v):
-                continue
-            # Match: formatear la fecha como '30 abr 2026'
-            fecha = ev.fecha
-            if fecha is None:
-                continue
-            try:
-                resultado[(ventana, anio_v, mes_v)] = (
-                    f"{fecha.day} {_MESES_CORTOS[fecha.month]} {fecha.year}"
-                )
-            except (AttributeError, IndexError):
-                pass
-            break
+        hito = indice.hito_de(
+            VENTANA_HITO_CALENDARIO[ventana], anio_v, mes_v,
+            calendar_file_id=indice.archivo_activo_id,
+        )
+        if hito is not None:
+            fecha = hito.fecha
+            # Formato '30 abr 2026'
+            resultado[(ventana, anio_v, mes_v)] = (
+                f"{fecha.day} {_MESES_CORTOS[fecha.month]} {fecha.year}"
+            )
 
     return resultado
 
@@ -415,11 +310,12 @@ def _fecha_publicacion_por_grupo(
 
 @router.get("/mensual", response_model=MensualResponse)
 def get_dashboard_tablas_mensual(
+    request: Request,
     carga_anio: int | None = None,
     carga_mes:  int | None = None,
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
-) -> MensualResponse:
+):
     """
     Si se pasan `carga_anio` y `carga_mes` (ambos), el endpoint usa ese periodo
     de carga forzado en lugar del calculado automáticamente. Útil para que el
@@ -428,10 +324,38 @@ def get_dashboard_tablas_mensual(
 
     Si NO se pasan (o solo se pasa uno), el comportamiento es el de siempre:
     se calcula la "carga" como ultimo_m1 - 1 mes.
+
+    Pasa por la caché de respuestas (la precalienta el scheduler de
+    madrugada, ver app/dashboard/precalentamiento.py).
     """
     tenant_id = int(cast(int, current_user.tenant_id))
     allowed = get_allowed_empresa_ids(db, current_user)
 
+    return cached_json_response(
+        request,
+        namespace="dashboard_tablas.mensual",
+        tenant_id=tenant_id,
+        allowed_empresa_ids=allowed,
+        extra_params=huella_tablas_mensual(db, tenant_id=tenant_id),
+        build=lambda: build_tablas_mensual(
+            db,
+            tenant_id=tenant_id,
+            allowed=allowed,
+            carga_anio=carga_anio,
+            carga_mes=carga_mes,
+        ),
+    )
+
+
+def build_tablas_mensual(
+    db: Session,
+    *,
+    tenant_id: int,
+    allowed: list[int],
+    carga_anio: int | None = None,
+    carga_mes: int | None = None,
+) -> MensualResponse:
+    """Construye la respuesta de /dashboard/tablas/mensual (sin caché)."""
     # Empresas visibles para el usuario
     empresas_q = (
         db.query(Empresa)
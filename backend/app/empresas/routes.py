@@ -7,7 +7,9 @@ from sqlalchemy.orm import Session
 
 from app.core.db import get_db
 from app.core.auth import get_current_user
+from app.core.perf import perf_budget
 from app.empresas.models import Empresa
+from app.empresas.services import invalidar_nombres_empresa
 from app.empresas.schemas import (
     EmpresaCreate,
     EmpresaRead,
@@ -66,6 +68,7 @@ def _get_empresa_or_404(
 
 
 @router.get("/", response_model=list[EmpresaRead])
+@perf_budget(queries=6)
 def list_empresas(
     solo_activas: bool = True,
     tenant_id: int | None = None,
@@ -130,6 +133,7 @@ def create_empresa(
     db.add(empresa)
     db.commit()
     db.refresh(empresa)
+    invalidar_nombres_empresa(empresa.tenant_id)
     return empresa
 
 
@@ -161,6 +165,7 @@ def update_empresa(
     Actualiza una empresa.
     """
     empresa = _get_empresa_or_404(empresa_id, current_user, db)
+    tenant_anterior = empresa.tenant_id
 
     update_data = data.model_dump(exclude_unset=True)
 
@@ -174,6 +179,9 @@ def update_empresa(
     db.add(empresa)
     db.commit()
     db.refresh(empresa)
+    invalidar_nombres_empresa(empresa.tenant_id)
+    if tenant_anterior != empresa.tenant_id:
+        invalidar_nombres_empresa(tenant_anterior)
     return empresa
 
 
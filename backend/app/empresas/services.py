@@ -0,0 +1,116 @@
+# app/empresas/services.py
+"""
+Resolución de nombres de empresa para serializadores de listados.
+
+Varios `_x_to_dict` (envíos, inventario, comunicaciones, pérdidas) ponían el
+nombre de la empresa con un SELECT por fila: un histórico de 500 filas eran
+500 consultas extra. Ahora:
+
+  - `nombre_empresa(db, empresa_id, tenant_id=...)` usa un resolutor ligado
+    a la sesión (`db.info`), es decir, uno por request.
+  - El resolutor carga de una vez todas las empresas del tenant y las guarda
+    en una caché de proceso. La clave incluye la versión de datos del tenant
+    (`app.core.response_cache`), así que `invalidar_nombres_empresa` (que la
+    incrementa) invalida también en otros workers si hay backend compartido.
+    Hay además un TTL como red de seguridad.
+  - Un id que no esté en la caché del tenant (empresa recién creada en otro
+    worker, datos incoherentes) se busca individualmente una sola vez por
+    request.
+"""
+from __future__ import annotations
+
+import threading
+import time
+from typing import Dict, Optional, Tuple
+
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.response_cache import bump_data_version, get_data_version
+from app.empresas.models import Empresa
+
+
+__all__ = [
+    "EmpresaNombres",
+    "empresa_nombres",
+    "invalidar_nombres_empresa",
+    "nombre_empresa",
+]
+
+
+_SESSION_KEY = "empresa_nombres"
+
+# tenant_id -> (versión de datos, instante de carga, {empresa_id: nombre})
+_cache: Dict[int, Tuple[int, float, Dict[int, str]]] = {}
+_cache_lock = threading.Lock()
+
+
+def _fallback(empresa_id: int) -> str:
+    return f"Empresa {empresa_id}"
+
+
+def _nombres_tenant(db: Session, tenant_id: int) -> Dict[int, str]:
+    version = get_data_version(tenant_id)
+    ttl = get_settings().RESPONSE_CACHE_TTL_SECONDS
+    ahora = time.monotonic()
+    with _cache_lock:
+        entrada = _cache.get(tenant_id)
+        if entrada is not None and entrada[0] == version and ahora - entrada[1] < ttl:
+            return entrada[2]
+
+    rows = db.query(Empresa.id, Empresa.nombre).filter(Empresa.tenant_id == tenant_id).all()
+    nombres = {int(eid): str(nombre or "") or _fallback(int(eid)) for eid, nombre in rows}
+    with _cache_lock:
+        _cache[tenant_id] = (version, ahora, nombres)
+    return nombres
+
+
+def invalidar_nombres_empresa(tenant_id: Optional[int] = None) -> None:
+    """
+    Llamar tras crear/editar/borrar una empresa (después del commit). Sin
+    tenant se vacía todo. Incrementa también la versión de datos del tenant,
+    con lo que se invalidan las respuestas cacheadas que muestran nombres.
+    """
+    with _cache_lock:
+        if tenant_id is None:
+            _cache.clear()
+        else:
+            _cache.pop(int(tenant_id), None)
+    bump_data_version(tenant_id)
+
+
+class EmpresaNombres:
+    """Resolutor id → nombre de empresa con vida de una sesión (request)."""
+
+    def __init__(self, db: Session) -> None:
+        self._db = db
+        self._tenants: Dict[int, Dict[int, str]] = {}
+        self._sueltos: Dict[int, str] = {}
+
+    def nombre(self, empresa_id: int, *, tenant_id: Optional[int] = None) -> str:
+        empresa_id = int(empresa_id)
+        if tenant_id is not None:
+            tid = int(tenant_id)
+            if tid not in self._tenants:
+                self._tenants[tid] = _nombres_tenant(self._db, tid)
+            hit = self._tenants[tid].get(empresa_id)
+            if hit is not None:
+                return hit
+
+        if empresa_id not in self._sueltos:
+            emp = self._db.query(Empresa.nombre).filter(Empresa.id == empresa_id).first()
+            self._sueltos[empresa_id] = (str(emp[0] or "") if emp else "") or _fallback(empresa_id)
+        return self._sueltos[empresa_id]
+
+
+def empresa_nombres(db: Session) -> EmpresaNombres:
+    """Resolutor de la sesión (se crea en el primer uso)."""
+    resolver = db.info.get(_SESSION_KEY)
+    if resolver is None:
+        resolver = EmpresaNombres(db)
+        db.info[_SESSION_KEY] = resolver
+    return resolver
+
+
+def nombre_empresa(db: Session, empresa_id: int, *, tenant_id: Optional[int] = None) -> str:
+    return empresa_nombres(db).nombre(empresa_id, tenant_id=tenant_id)
@@ -10,28 +10,33 @@ Detecta 4 tipos de alertas:
   3. plazo_vencido_pendiente: pasó plazo Y empresa sin envíos del M
   4. respuesta_ree:           respuestas REE recibidas (consolidada)
 
-La función pública `recalcular_alertas_envios_tenant` orquesta todo:
-  - Llama a las 4 funciones de detección
-  - Crea/actualiza alertas en BD
-  - Auto-resuelve plazo_proximo cuando se cumple la condición
+La función pública `recalcular_alertas_envios_tenant` orquesta las 3 de
+plazos, en bloque para todas las empresas del tenant:
+  - Calcula la matriz de plazos del mes_envio (un plazo por M, común a
+    todas las empresas) y la cruza con los envíos agrupados por
+    (empresa, M) y con las alertas existentes: una consulta cada una.
+  - Crea/actualiza alertas y auto-resuelve plazo_proximo con INSERT/UPDATE
+    en bloque.
   - Devuelve un dict con contadores
 """
 from __future__ import annotations
 
 import json
+from dataclasses import dataclass
 from datetime import date, datetime, time
 from typing import Any
 
 from zoneinfo import ZoneInfo
 
+from sqlalchemy import and_, case, func, insert, or_, update
 from sqlalchemy.orm import Session
 
 from app.core.datetime_utils import ahora_madrid
-from app.calendario_laboral.services_db import cargar_festivos_set_activos
-from app.calendario_laboral.services_festivos import (
-    nth_dia_habil_madrid,
-    nth_dia_natural_mes,
+from app.calendario_laboral.services_calendario import (
+    CalendarioLaboral,
+    obtener_calendario,
 )
+from app.calendario_laboral.services_festivos import nth_dia_natural_mes
 from app.empresas.models import Empresa
 from app.envios.automatizacion.models import (
     ESTADO_ACTIVA,
@@ -89,14 +94,14 @@ def _calcular_plazo(
     mes_envio_anio: int,
     mes_envio_mes: int,
     m_clas: str,
-    festivos: set[date],
+    calendario: CalendarioLaboral,
 ) -> datetime:
     if m_clas == "M1":
-        fecha = nth_dia_habil_madrid(mes_envio_anio, mes_envio_mes, 4, festivos)
+        fecha = calendario.nth_dia_habil(mes_envio_anio, mes_envio_mes, 4)
     elif m_clas == "M2":
         fecha = nth_dia_natural_mes(mes_envio_anio, mes_envio_mes, 12)
     elif m_clas == "M7":
-        fecha = nth_dia_habil_madrid(mes_envio_anio, mes_envio_mes, 11, festivos)
+        fecha = calendario.nth_dia_habil(mes_envio_anio, mes_envio_mes, 11)
     else:
         raise ValueError(f"M no soportada: {m_clas}")
     if fecha is None:
@@ -104,318 +109,276 @@ def _calcular_plazo(
     return _datetime_madrid(fecha, time(8, 0))
 
 
-def _empresa_tiene_envios(
-    db: Session,
-    *,
-    tenant_id: int,
-    empresa_id: int,
-    m_clas: str,
-    periodo_anio: int,
-    periodo_mes: int,
-) -> bool:
-    """¿La empresa ha enviado AL MENOS un fichero del M y periodo?"""
-    return db.query(EnvioM).filter(
-        EnvioM.tenant_id == tenant_id,
-        EnvioM.empresa_id == empresa_id,
-        EnvioM.m_clasificacion == m_clas,
-        EnvioM.periodo_anio == periodo_anio,
-        EnvioM.periodo_mes == periodo_mes,
-    ).count() > 0
+# ── Matriz de plazos del mes_envio ───────────────────────────────────────────
 
+TIPOS_PLAZO = (TIPO_PLAZO_PROXIMO, TIPO_PLAZO_VENCIDO_BAD, TIPO_PLAZO_VENCIDO_PENDIENTE)
 
-def _empresa_tiene_bads(
-    db: Session,
-    *,
-    tenant_id: int,
-    empresa_id: int,
-    m_clas: str,
-    periodo_anio: int,
-    periodo_mes: int,
-) -> int:
-    """Cuenta envíos en estado 'bad' para esa empresa+M+periodo."""
-    return db.query(EnvioM).filter(
-        EnvioM.tenant_id == tenant_id,
-        EnvioM.empresa_id == empresa_id,
-        EnvioM.m_clasificacion == m_clas,
-        EnvioM.periodo_anio == periodo_anio,
-        EnvioM.periodo_mes == periodo_mes,
-        EnvioM.estado_ree == "bad",
-    ).count()
 
+@dataclass(frozen=True)
+class PlazoM:
+    """Plazo REE de un M para el mes_envio: igual para todas las empresas."""
+    m_clas:         str
+    plazo:          datetime    # aware Europe/Madrid
+    periodo_anio:   int         # periodo del dato que se envía
+    periodo_mes:    int
+    dias_restantes: int
 
-# ── Upsert de alerta ─────────────────────────────────────────────────────────
+    @property
+    def periodo_dato(self) -> str:
+        return _periodo_str(self.periodo_anio, self.periodo_mes)
 
-def _upsert_alerta(
-    db: Session,
-    *,
-    tenant_id: int,
-    empresa_id: int,
-    tipo: str,
-    m_clas: str,
-    periodo: str,
-    plazo_fecha: datetime | None,
-    num_pendientes: int,
-    detalle: Any,
-    severidad: str,
-) -> tuple[bool, EnvioAlerta]:
-    """
-    Crea o actualiza una alerta. Devuelve (creada, alerta).
-    Si la alerta ya existe en estado "descartada", NO la reactiva.
-    """
-    existing = db.query(EnvioAlerta).filter(
-        EnvioAlerta.tenant_id == tenant_id,
-        EnvioAlerta.empresa_id == empresa_id,
-        EnvioAlerta.tipo == tipo,
-        EnvioAlerta.m_clas == m_clas,
-        EnvioAlerta.periodo == periodo,
-    ).first()
-
-    detalle_str = json.dumps(detalle, ensure_ascii=False, default=str) if detalle is not None else None
-
-    if existing is None:
-        nueva = EnvioAlerta()
-        nueva.tenant_id = tenant_id  # type: ignore[assignment]
-        nueva.empresa_id = empresa_id  # type: ignore[assignment]
-        nueva.tipo = tipo  # type: ignore[assignment]
-        nueva.m_clas = m_clas  # type: ignore[assignment]
-        nueva.periodo = periodo  # type: ignore[assignment]
-        nueva.plazo_fecha = plazo_fecha  # type: ignore[assignment]
-        nueva.num_pendientes = num_pendientes  # type: ignore[assignment]
-        nueva.detalle_json = detalle_str  # type: ignore[assignment]
-        nueva.severidad = severidad  # type: ignore[assignment]
-        nueva.estado = ESTADO_ACTIVA  # type: ignore[assignment]
-        db.add(nueva)
-        db.flush()
-        return True, nueva
-
-    # Ya existe: si está resuelta o descartada, NO la reactivamos
-    # (el usuario decidió que esa alerta queda gestionada).
-    # Tampoco actualizamos sus datos contextuales para que el rastro
-    # (num_pendientes, detalle) quede congelado al momento en que se resolvió.
-    # Si en el futuro el usuario quiere "re-activar" una alerta, lo hará
-    # manualmente desde la pantalla de gestión de alertas (Fase 2).
-    if existing.estado in ("descartada", "resuelta"):
-        return False, existing
-
-    # Estaba activa → actualizar datos contextuales del momento actual
-    existing.plazo_fecha = plazo_fecha  # type: ignore[assignment]
-    existing.num_pendientes = num_pendientes  # type: ignore[assignment]
-    existing.detalle_json = detalle_str  # type: ignore[assignment]
-    existing.severidad = severidad  # type: ignore[assignment]
 
-    db.flush()
-    return False, existing
+@dataclass
+class AlertaPlazo:
+    """Alerta de plazo que debe existir (activa) tras la detección."""
+    empresa_id:     int
+    tipo:           str
+    m_clas:         str
+    plazo_fecha:    datetime    # naive, para BD
+    num_pendientes: int
+    detalle:        dict[str, Any]
+    severidad:      str
 
 
-def _auto_resolver(
-    db: Session,
+def calcular_plazos_mes(
+    anio: int,
+    mes: int,
     *,
-    alerta: EnvioAlerta,
-) -> bool:
-    """Marca la alerta como 'resuelta' si está activa. Devuelve True si cambió."""
-    if alerta.estado != ESTADO_ACTIVA:
-        return False
-    alerta.estado = ESTADO_RESUELTA  # type: ignore[assignment]
-    alerta.resuelta_at = ahora_madrid()  # type: ignore[assignment]
-    db.flush()
-    return True
-
-
-# ── Detección — Alerta 1: plazo_proximo ──────────────────────────────────────
-
-def detectar_plazo_proximo(
+    calendario: CalendarioLaboral,
+    ahora: datetime,
+) -> list[PlazoM]:
+    plazos: list[PlazoM] = []
+    for m_clas in ORDEN_MS:
+        plazo = _calcular_plazo(anio, mes, m_clas, calendario)
+        p_anio, p_mes = _restar_meses(anio, mes, PLAZOS_CONFIG[m_clas]["meses_offset"])
+        plazos.append(PlazoM(
+            m_clas=m_clas,
+            plazo=plazo,
+            periodo_anio=p_anio,
+            periodo_mes=p_mes,
+            dias_restantes=(plazo.date() - ahora.date()).days,
+        ))
+    return plazos
+
+
+def _conteos_envios(
     db: Session,
     *,
     tenant_id: int,
-    empresas: list[Empresa],
-    festivos: set[date],
-    ahora: datetime,
-) -> tuple[int, int, int]:
+    plazos: list[PlazoM],
+) -> dict[tuple[int, str], tuple[int, int]]:
     """
-    Para el mes_envio actual: detecta empresas SIN envíos cuyo plazo está
-    a ≤3 días.
-
-    Si la empresa AHORA tiene envíos, auto-resolvemos la alerta antigua si
-    estaba activa.
-
-    Devuelve (creadas, actualizadas, auto_resueltas).
+    (empresa_id, M) → (nº envíos, nº .bad) del periodo que toca a cada M,
+    para todas las empresas del tenant en una sola consulta agrupada.
+    Las parejas sin envíos no aparecen.
     """
-    creadas, actualizadas, auto_resueltas = 0, 0, 0
-
-    me_anio = ahora.year
-    me_mes  = ahora.month
-    periodo_envio = _periodo_str(me_anio, me_mes)
-
-    for emp in empresas:
-        empresa_id = int(emp.id)  # type: ignore[arg-type]
-        for m_clas in ORDEN_MS:
-            plazo = _calcular_plazo(me_anio, me_mes, m_clas, festivos)
-            dias_restantes = (plazo.date() - ahora.date()).days
-            p_anio, p_mes = _restar_meses(me_anio, me_mes, PLAZOS_CONFIG[m_clas]["meses_offset"])
-            tiene = _empresa_tiene_envios(
-                db, tenant_id=tenant_id, empresa_id=empresa_id,
-                m_clas=m_clas, periodo_anio=p_anio, periodo_mes=p_mes,
-            )
-
-            # Buscar alerta existente para auto-resolver si procede
-            existing = db.query(EnvioAlerta).filter(
-                EnvioAlerta.tenant_id == tenant_id,
-                EnvioAlerta.empresa_id == empresa_id,
-                EnvioAlerta.tipo == TIPO_PLAZO_PROXIMO,
-                EnvioAlerta.m_clas == m_clas,
-                EnvioAlerta.periodo == periodo_envio,
-            ).first()
-
-            condicion = (
-                0 <= dias_restantes <= DIAS_AVISO_PROXIMO
-                and not tiene
-                and ahora < plazo
-            )
-
-            if condicion:
-                detalle = {
-                    "dias_restantes": dias_restantes,
-                    "periodo_dato": _periodo_str(p_anio, p_mes),
-                    "plazo_label": PLAZOS_CONFIG[m_clas]["label"],
-                }
-                created, _ = _upsert_alerta(
-                    db,
-                    tenant_id=tenant_id, empresa_id=empresa_id,
-                    tipo=TIPO_PLAZO_PROXIMO, m_clas=m_clas, periodo=periodo_envio,
-                    plazo_fecha=plazo.replace(tzinfo=None),
-                    num_pendientes=1, detalle=detalle,
-                    severidad=SEVERIDAD_WARNING,
-                )
-                if created:
-                    creadas += 1
-                else:
-                    actualizadas += 1
-            elif existing is not None and tiene:
-                if _auto_resolver(db, alerta=existing):
-                    auto_resueltas += 1
-
-    return creadas, actualizadas, auto_resueltas
-
+    if not plazos:
+        return {}
+    por_m = or_(*(
+        and_(
+            EnvioM.m_clasificacion == p.m_clas,
+            EnvioM.periodo_anio == p.periodo_anio,
+            EnvioM.periodo_mes == p.periodo_mes,
+        )
+        for p in plazos
+    ))
+    rows = (
+        db.query(
+            EnvioM.empresa_id,
+            EnvioM.m_clasificacion,
+            func.count(EnvioM.id),
+            func.sum(case((EnvioM.estado_ree == "bad", 1), else_=0)),
+        )
+        .filter(EnvioM.tenant_id == tenant_id, por_m)
+        .group_by(EnvioM.empresa_id, EnvioM.m_clasificacion)
+        .all()
+    )
+    return {
+        (int(empresa_id), str(m_clas)): (int(total or 0), int(bads or 0))
+        for empresa_id, m_clas, total, bads in rows
+    }
 
-# ── Detección — Alerta 2: plazo_vencido_bad ──────────────────────────────────
 
-def detectar_plazo_vencido_bad(
+def _alertas_existentes(
     db: Session,
     *,
     tenant_id: int,
-    empresas: list[Empresa],
-    festivos: set[date],
-    ahora: datetime,
-) -> tuple[int, int]:
-    """
-    Para el mes_envio actual: detecta empresas con .bad sin reenviar
-    cuyo plazo ya pasó.
+    periodo: str,
+) -> dict[tuple[int, str, str], tuple[int, str]]:
+    """(empresa_id, tipo, M) → (id, estado) de las alertas de plazo del periodo."""
+    rows = (
+        db.query(
+            EnvioAlerta.id, EnvioAlerta.empresa_id, EnvioAlerta.tipo,
+            EnvioAlerta.m_clas, EnvioAlerta.estado,
+        )
+        .filter(
+            EnvioAlerta.tenant_id == tenant_id,
+            EnvioAlerta.periodo == periodo,
+            EnvioAlerta.tipo.in_(TIPOS_PLAZO),
+        )
+        .all()
+    )
+    return {
+        (int(empresa_id), str(tipo), str(m_clas)): (int(alerta_id), str(estado))
+        for alerta_id, empresa_id, tipo, m_clas, estado in rows
+    }
 
-    NO auto-resuelve: el usuario debe reenviar y marcar manualmente.
 
-    Devuelve (creadas, actualizadas).
+# ── Detección (en memoria) ───────────────────────────────────────────────────
+
+def detectar_alertas_plazo(
+    *,
+    empresa_ids: list[int],
+    plazos: list[PlazoM],
+    conteos: dict[tuple[int, str], tuple[int, int]],
+    ahora: datetime,
+) -> tuple[list[AlertaPlazo], set[tuple[int, str]]]:
     """
-    creadas, actualizadas = 0, 0
-
-    # Solo revisar el mes_envio actual
-    meses_a_revisar: list[tuple[int, int]] = [(ahora.year, ahora.month)]
-
-    for me_anio, me_mes in meses_a_revisar:
-        periodo_envio = _periodo_str(me_anio, me_mes)
-        for emp in empresas:
-            empresa_id = int(emp.id)  # type: ignore[arg-type]
-            for m_clas in ORDEN_MS:
-                plazo = _calcular_plazo(me_anio, me_mes, m_clas, festivos)
-                if ahora < plazo:
-                    continue  # plazo no vencido todavía
-
-                p_anio, p_mes = _restar_meses(me_anio, me_mes, PLAZOS_CONFIG[m_clas]["meses_offset"])
-                num_bads = _empresa_tiene_bads(
-                    db, tenant_id=tenant_id, empresa_id=empresa_id,
-                    m_clas=m_clas, periodo_anio=p_anio, periodo_mes=p_mes,
-                )
-                if num_bads == 0:
-                    continue
-
-                detalle = {
-                    "num_bads": num_bads,
-                    "periodo_dato": _periodo_str(p_anio, p_mes),
-                    "plazo_label": PLAZOS_CONFIG[m_clas]["label"],
-                }
-                created, _ = _upsert_alerta(
-                    db,
-                    tenant_id=tenant_id, empresa_id=empresa_id,
-                    tipo=TIPO_PLAZO_VENCIDO_BAD, m_clas=m_clas, periodo=periodo_envio,
-                    plazo_fecha=plazo.replace(tzinfo=None),
-                    num_pendientes=num_bads, detalle=detalle,
+    Recorre la matriz empresa × M y devuelve:
+      - las alertas que deben quedar activas:
+          1. plazo_proximo:           ≤3 días al plazo, aún no vencido y sin envíos
+          2. plazo_vencido_bad:       plazo vencido y algún .bad
+          3. plazo_vencido_pendiente: plazo vencido y sin envíos
+      - las parejas (empresa_id, M) que ya tienen envíos, para auto-resolver
+        su plazo_proximo.
+
+    No consulta la BD: los envíos vienen ya agrupados en `conteos`.
+    """
+    alertas: list[AlertaPlazo] = []
+    con_envios: set[tuple[int, str]] = set()
+
+    for p in plazos:
+        label = PLAZOS_CONFIG[p.m_clas]["label"]
+        plazo_bd = p.plazo.replace(tzinfo=None)
+        vencido = ahora >= p.plazo
+        proximo = 0 <= p.dias_restantes <= DIAS_AVISO_PROXIMO and not vencido
+
+        for empresa_id in empresa_ids:
+            total, bads = conteos.get((empresa_id, p.m_clas), (0, 0))
+            if total:
+                con_envios.add((empresa_id, p.m_clas))
+
+            if proximo and not total:
+                alertas.append(AlertaPlazo(
+                    empresa_id=empresa_id, tipo=TIPO_PLAZO_PROXIMO, m_clas=p.m_clas,
+                    plazo_fecha=plazo_bd, num_pendientes=1,
+                    detalle={
+                        "dias_restantes": p.dias_restantes,
+                        "periodo_dato": p.periodo_dato,
+                        "plazo_label": label,
+                    },
+                    severidad=SEVERIDAD_WARNING,
+                ))
+            if vencido and bads:
+                alertas.append(AlertaPlazo(
+                    empresa_id=empresa_id, tipo=TIPO_PLAZO_VENCIDO_BAD, m_clas=p.m_clas,
+                    plazo_fecha=plazo_bd, num_pendientes=bads,
+                    detalle={
+                        "num_bads": bads,
+                        "periodo_dato": p.periodo_dato,
+                        "plazo_label": label,
+                    },
                     severidad=SEVERIDAD_CRITICAL,
-                )
-                if created:
-                    creadas += 1
-                else:
-                    actualizadas += 1
+                ))
+            if vencido and not total:
+                alertas.append(AlertaPlazo(
+                    empresa_id=empresa_id, tipo=TIPO_PLAZO_VENCIDO_PENDIENTE, m_clas=p.m_clas,
+                    plazo_fecha=plazo_bd, num_pendientes=1,
+                    detalle={
+                        "periodo_dato": p.periodo_dato,
+                        "plazo_label": label,
+                    },
+                    severidad=SEVERIDAD_CRITICAL,
+                ))
 
-    return creadas, actualizadas
+    return alertas, con_envios
 
 
-# ── Detección — Alerta 3: plazo_vencido_pendiente ────────────────────────────
+# ── Persistencia en bloque ───────────────────────────────────────────────────
 
-def detectar_plazo_vencido_pendiente(
+def aplicar_alertas_plazo(
     db: Session,
     *,
     tenant_id: int,
-    empresas: list[Empresa],
-    festivos: set[date],
-    ahora: datetime,
-) -> tuple[int, int]:
+    periodo: str,
+    alertas: list[AlertaPlazo],
+    con_envios: set[tuple[int, str]],
+) -> dict[str, Any]:
     """
-    Para el mes_envio actual: detecta empresas SIN ningún envío del M
-    cuyo plazo ya pasó.
+    Crea/actualiza las alertas detectadas y auto-resuelve los plazo_proximo
+    cuya empresa ya ha enviado, con un INSERT y dos UPDATE en bloque.
 
-    NO auto-resuelve: el usuario debe enviar y marcar manualmente.
+    Mismas reglas que el upsert de una en una:
+      - Sin alerta previa → se crea activa.
+      - Activa → se refrescan plazo_fecha, num_pendientes, detalle y severidad.
+      - Resuelta o descartada → no se reactiva ni se toca (el rastro queda
+        congelado al momento en que se gestionó), pero cuenta como actualizada.
+    plazo_vencido_* NO se auto-resuelven: el usuario los gestiona a mano.
 
-    Devuelve (creadas, actualizadas).
+    No hace commit.
     """
-    creadas, actualizadas = 0, 0
-
-    # Solo revisar el mes_envio actual
-    meses_a_revisar: list[tuple[int, int]] = [(ahora.year, ahora.month)]
-
-    for me_anio, me_mes in meses_a_revisar:
-        periodo_envio = _periodo_str(me_anio, me_mes)
-        for emp in empresas:
-            empresa_id = int(emp.id)  # type: ignore[arg-type]
-            for m_clas in ORDEN_MS:
-                plazo = _calcular_plazo(me_anio, me_mes, m_clas, festivos)
-                if ahora < plazo:
-                    continue
-
-                p_anio, p_mes = _restar_meses(me_anio, me_mes, PLAZOS_CONFIG[m_clas]["meses_offset"])
-                tiene = _empresa_tiene_envios(
-                    db, tenant_id=tenant_id, empresa_id=empresa_id,
-                    m_clas=m_clas, periodo_anio=p_anio, periodo_mes=p_mes,
-                )
-                if tiene:
-                    continue
-
-                detalle = {
-                    "periodo_dato": _periodo_str(p_anio, p_mes),
-                    "plazo_label": PLAZOS_CONFIG[m_clas]["label"],
-                }
-                created, _ = _upsert_alerta(
-                    db,
-                    tenant_id=tenant_id, empresa_id=empresa_id,
-                    tipo=TIPO_PLAZO_VENCIDO_PENDIENTE, m_clas=m_clas, periodo=periodo_envio,
-                    plazo_fecha=plazo.replace(tzinfo=None),
-                    num_pendientes=1, detalle=detalle,
-                    severidad=SEVERIDAD_CRITICAL,
-                )
-                if created:
-                    creadas += 1
-                else:
-                    actualizadas += 1
+    existentes = _alertas_existentes(db, tenant_id=tenant_id, periodo=periodo)
+
+    creadas = {t: 0 for t in TIPOS_PLAZO}
+    actualizadas = {t: 0 for t in TIPOS_PLAZO}
+    insertar: list[dict[str, Any]] = []
+    refrescar: list[dict[str, Any]] = []
+
+    for a in alertas:
+        detalle_json = json.dumps(a.detalle, ensure_ascii=False, default=str)
+        previa = existentes.get((a.empresa_id, a.tipo, a.m_clas))
+        if previa is None:
+            creadas[a.tipo] += 1
+            insertar.append({
+                "tenant_id": tenant_id,
+                "empresa_id": a.empresa_id,
+                "tipo": a.tipo,
+                "m_clas": a.m_clas,
+                "periodo": periodo,
+                "plazo_fecha": a.plazo_fecha,
+                "num_pendientes": a.num_pendientes,
+                "detalle_json": detalle_json,
+                "severidad": a.severidad,
+                "estado": ESTADO_ACTIVA,
+            })
+            continue
+        actualizadas[a.tipo] += 1
+        alerta_id, estado = previa
+        if estado == ESTADO_ACTIVA:
+            refrescar.append({
+                "id": alerta_id,
+                "plazo_fecha": a.plazo_fecha,
+                "num_pendientes": a.num_pendientes,
+                "detalle_json": detalle_json,
+                "severidad": a.severidad,
+            })
+
+    resolver = [
+        alerta_id
+        for (empresa_id, tipo, m_clas), (alerta_id, estado) in existentes.items()
+        if tipo == TIPO_PLAZO_PROXIMO
+        and estado == ESTADO_ACTIVA
+        and (empresa_id, m_clas) in con_envios
+    ]
+
+    if insertar:
+        db.execute(insert(EnvioAlerta), insertar)
+    if refrescar:
+        db.execute(update(EnvioAlerta), refrescar)
+    if resolver:
+        db.execute(
+            update(EnvioAlerta)
+            .where(EnvioAlerta.id.in_(resolver))
+            .values(estado=ESTADO_RESUELTA, resuelta_at=ahora_madrid()),
+            execution_options={"synchronize_session": False},
+        )
+    db.flush()
 
-    return creadas, actualizadas
+    return {
+        "creadas": creadas,
+        "actualizadas": actualizadas,
+        "auto_resueltas": len(resolver),
+    }
 
 
 # ── Alerta 4: respuesta_ree ──────────────────────────────────────────────────
@@ -586,48 +549,44 @@ def recalcular_alertas_envios_tenant(
 ) -> dict[str, Any]:
     """
     Recalcula las alertas de tipos plazo_* para un tenant.
-    Llama secuencialmente a las 3 funciones de detección de plazos.
     NO incluye respuesta_ree (se genera desde el job de respuestas).
 
+    Coste fijo en consultas, independiente del nº de empresas: ids de
+    empresas, envíos agrupados por (empresa, M), alertas existentes del
+    periodo y las escrituras en bloque.
+
     Devuelve un dict con contadores agregados.
     """
     ahora = _madrid_now()
-    festivos = cargar_festivos_set_activos(db, tenant_id=tenant_id, anio=ahora.year)
-    empresas = (
-        db.query(Empresa)
+    calendario = obtener_calendario(db, tenant_id=tenant_id)
+    empresa_ids = [
+        int(eid)
+        for (eid,) in db.query(Empresa.id)
         .filter(Empresa.tenant_id == tenant_id)
         .order_by(Empresa.nombre.asc())
         .all()
-    )
+    ]
 
-    detalle_por_tipo: dict[str, int] = {
-        TIPO_PLAZO_PROXIMO: 0,
-        TIPO_PLAZO_VENCIDO_BAD: 0,
-        TIPO_PLAZO_VENCIDO_PENDIENTE: 0,
-    }
+    # Solo se revisa el mes_envio actual.
+    periodo_envio = _periodo_str(ahora.year, ahora.month)
+    plazos = calcular_plazos_mes(ahora.year, ahora.month, calendario=calendario, ahora=ahora)
+    conteos = _conteos_envios(db, tenant_id=tenant_id, plazos=plazos) if empresa_ids else {}
 
-    c1, u1, ar1 = detectar_plazo_proximo(
-        db, tenant_id=tenant_id, empresas=empresas, festivos=festivos, ahora=ahora,
+    alertas, con_envios = detectar_alertas_plazo(
+        empresa_ids=empresa_ids, plazos=plazos, conteos=conteos, ahora=ahora,
     )
-    detalle_por_tipo[TIPO_PLAZO_PROXIMO] = c1 + u1
-
-    c2, u2 = detectar_plazo_vencido_bad(
-        db, tenant_id=tenant_id, empresas=empresas, festivos=festivos, ahora=ahora,
-    )
-    detalle_por_tipo[TIPO_PLAZO_VENCIDO_BAD] = c2 + u2
-
-    c3, u3 = detectar_plazo_vencido_pendiente(
-        db, tenant_id=tenant_id, empresas=empresas, festivos=festivos, ahora=ahora,
+    r = aplicar_alertas_plazo(
+        db, tenant_id=tenant_id, periodo=periodo_envio,
+        alertas=alertas, con_envios=con_envios,
     )
-    detalle_por_tipo[TIPO_PLAZO_VENCIDO_PENDIENTE] = c3 + u3
 
     db.commit()
 
     return {
-        "creadas": c1 + c2 + c3,
-        "actualizadas": u1 + u2 + u3,
-        "auto_resueltas": ar1,
-        "detalle": detalle_por_tipo,
+        "creadas": sum(r["creadas"].values()),
+        "actualizadas": sum(r["actualizadas"].values()),
+        "auto_resueltas": r["auto_resueltas"],
+        "detalle": {t: r["creadas"][t] + r["actualizadas"][t] for t in TIPOS_PLAZO},
     }
 
 
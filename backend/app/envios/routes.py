@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 
 from app.core.auth import get_current_user
 from app.core.db import get_db
+from app.core.perf import perf_budget
 from app.envios import services
 from app.envios.schemas import EnvioMRead
 from app.tenants.models import User
@@ -31,6 +32,7 @@ def _assert_not_viewer(user: User) -> None:
 # ── Histórico de envíos ──────────────────────────────────────────────────────
 
 @router.get("/historico", response_model=List[EnvioMRead])
+@perf_budget(queries=6)
 def get_historico(
     # ── Singulares (retrocompatibles) ──────────────────────────────────
     m_clasificacion: Optional[str] = Query(
@@ -10,6 +10,7 @@ from sqlalchemy.orm import Session
 
 from app.core.auth import get_current_user
 from app.core.db import get_db
+from app.core.perf import perf_budget
 from app.envios import services_inventario
 from app.envios.schemas_inventario import EnvioInventarioRead
 from app.tenants.models import User
@@ -80,6 +81,7 @@ def _csv_meses(raw: Optional[str]) -> Optional[list[tuple[int, int]]]:
 # ── Histórico de inventario ──────────────────────────────────────────────────
 
 @router.get("/historico", response_model=List[EnvioInventarioRead])
+@perf_budget(queries=6)
 def get_historico_inventario(
     empresa_ids: Optional[str] = Query(None, description="Lista CSV de empresa_id"),
     tipos:       Optional[str] = Query(None, description="Lista CSV de tipos (AUTOCONSUMO/CUPSCAU/CUPS45/CUPSDAT)"),
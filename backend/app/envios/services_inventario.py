@@ -7,17 +7,12 @@ from typing import List, Optional
 
 from sqlalchemy.orm import Session
 
-from app.empresas.models import Empresa
+from app.empresas.services import nombre_empresa
 from app.envios.models import EnvioInventario
 
 
 # ── Helper ────────────────────────────────────────────────────────────────────
 
-def _nombre_empresa(db: Session, empresa_id: int) -> str:
-    emp = db.query(Empresa).filter(Empresa.id == empresa_id).first()
-    return str(getattr(emp, "nombre", "") or f"Empresa {empresa_id}") if emp else f"Empresa {empresa_id}"
-
-
 def _envio_inventario_to_dict(db: Session, e: EnvioInventario) -> dict:
     """
     Convierte un EnvioInventario a dict listo para la API. Traduce
@@ -30,7 +25,7 @@ def _envio_inventario_to_dict(db: Session, e: EnvioInventario) -> dict:
     return {
         "id": e.id,
         "empresa_id": e.empresa_id,
-        "empresa_nombre": _nombre_empresa(db, empresa_id_int),
+        "empresa_nombre": nombre_empresa(db, empresa_id_int, tenant_id=e.tenant_id),
         "codigo_ree_empresa": e.codigo_ree_empresa,
         "tipo": e.tipo,
         "frecuencia": e.frecuencia,
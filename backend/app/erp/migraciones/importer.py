@@ -2,22 +2,37 @@
 """
 Importador de migración por entidad (E-12c).
 
-Para cada fila del Excel: valida con el MISMO schema de pantalla y crea vía el
-MISMO servicio (crear_titular, etc.), de modo que la migración y el alta manual
-comparten exactamente las mismas reglas. Insert-only: si la clave natural ya
-existe, la fila se cuenta como "omitida". Cada fila es independiente (los
-servicios hacen commit por fila); un fallo nunca arrastra a las demás.
+Cada fila del Excel se valida con el MISMO schema de pantalla y las MISMAS
+reglas que el alta manual (services.crear_titular, crear_contrato…), pero
+sin ir a BD por fila:
+
+  • Las claves naturales (NIF → titular, CUPS → suministro, código de
+    tarifa, código REE → comercializadora, nº de contrato…) se resuelven
+    contra mapas de la empresa precargados con una consulta cada uno.
+  • Las altas válidas se insertan por lotes (INSERT multi-fila en un
+    SAVEPOINT por lote) con un solo commit. Si un lote choca con una
+    restricción se repite fila a fila para señalar la culpable.
+
+Insert-only: si la clave natural ya existe (en BD o en una fila anterior del
+mismo Excel) la fila se cuenta como "omitida". Un fallo nunca arrastra a las
+demás filas.
 
 Corrección de migración (E-12 fase corrección): si la empresa tiene una
 migración en estado 'en_curso', en vez de OMITIR un duplicado se ACTUALIZAN sus
-campos no vacíos (sin versionar en contratos). Lo controla `correccion`.
+campos no vacíos (sin versionar en contratos). Lo controla `correccion`. Esas
+actualizaciones siguen pasando fila a fila por los servicios de pantalla.
 """
 from __future__ import annotations
 
 from dataclasses import dataclass, field
-from typing import Any
+from datetime import datetime
+from functools import cached_property
+from types import SimpleNamespace
+from typing import Any, Callable
+from zoneinfo import ZoneInfo
 
 from pydantic import ValidationError
+from sqlalchemy import insert
 from sqlalchemy.exc import IntegrityError
 from sqlalchemy.orm import Session
 
@@ -25,6 +40,8 @@ from app.core.permissions import assert_empresa_access
 from app.erp import schemas, services, services_contrato
 from app.erp.migraciones import estado as mig_estado
 from app.erp.migraciones.lectura import leer_excel
+from app.erp.normativa_atr import tipo_punto_medida_rpum
+from app.erp.validators import cargar_catalogos_cnmc, validar_codigos_cnmc_catalogos
 from app.tenants.models import User
 
 
@@ -64,11 +81,25 @@ class ResultadoImport:
         }
 
 
+TAM_LOTE = 500
+
+
 def _col_de_error(err: Any) -> str | None:
     loc = err.get("loc") or ()
     return str(loc[0]) if loc else None
 
 
+def _error_validacion(res: ResultadoImport, fila, datos: dict, e: ValidationError) -> None:
+    err = e.errors()[0]
+    col = _col_de_error(err)
+    res.errores.append(ErrorFila(fila.fila_excel, col, datos.get(col) if col else None,
+                                 err.get("msg", "valor inválido")))
+
+
+def _ahora_madrid_naive() -> datetime:
+    return datetime.now(ZoneInfo("Europe/Madrid")).replace(tzinfo=None)
+
+
 class _EnlaceNoResuelto(Exception):
     """Una clave natural de enlace no se pudo resolver (columna + motivo)."""
     def __init__(self, columna: str, valor, motivo: str):
@@ -77,73 +108,216 @@ class _EnlaceNoResuelto(Exception):
         self.motivo = motivo
 
 
-def _resolver_comercializadora_global(db: Session, codigo_ree):
+# ---------------------------------------------------------------------------
+# Mapas precargados: clave natural → id, una consulta por mapa e importación
+# ---------------------------------------------------------------------------
+class _Mapas:
+    """
+    Claves naturales de la empresa (y de los catálogos globales) resueltas en
+    memoria. Cada mapa se carga la primera vez que se usa; las altas del
+    propio fichero se añaden según se insertan, así una fila puede enlazar o
+    duplicar a otra anterior del mismo Excel.
+    """
+
+    def __init__(self, db: Session, empresa_id: int):
+        self.db = db
+        self.empresa_id = empresa_id
+
+    @cached_property
+    def titulares(self) -> dict[str, tuple[int, str | None]]:
+        """identificador → (id, nombre)."""
+        T = services.ErpTitular
+        rows = self.db.query(T.identificador, T.id, T.nombre).filter(T.empresa_id == self.empresa_id)
+        return {ident: (tid, nombre) for ident, tid, nombre in rows}
+
+    @cached_property
+    def suministros(self) -> dict[str, int]:
+        """cups → id."""
+        S = services.ErpSuministro
+        return dict(self.db.query(S.cups, S.id).filter(S.empresa_id == self.empresa_id))
+
+    @cached_property
+    def tarifas(self) -> dict[str, int]:
+        """codigo → id (catálogo global)."""
+        return dict(self.db.query(services.ErpTarifa.codigo, services.ErpTarifa.id))
+
+    @cached_property
+    def periodos_potencia(self) -> dict[int, set[str]]:
+        """tarifa_id → periodos de potencia admitidos."""
+        P = services.ErpTarifaPeriodo
+        out: dict[int, set[str]] = {}
+        for tarifa_id, periodo in self.db.query(P.tarifa_id, P.periodo).filter(P.tipo == "potencia"):
+            out.setdefault(tarifa_id, set()).add(periodo)
+        return out
+
+    @cached_property
+    def comercializadoras(self) -> dict[str, tuple[int, str]]:
+        """codigo_ree → (id, nombre) del catálogo global."""
+        C = services.ErpComercializadora
+        return {ree: (cid, nombre) for ree, cid, nombre in self.db.query(C.codigo_ree, C.id, C.nombre)}
+
+    @cached_property
+    def com_empresa(self) -> dict[int, int]:
+        """comercializadora_id → id de la relación con esta empresa."""
+        R = services.ErpComercializadoraEmpresa
+        return dict(self.db.query(R.comercializadora_id, R.id).filter(R.empresa_id == self.empresa_id))
+
+    @cached_property
+    def contratos(self) -> dict[str, int]:
+        """numero_contrato → id."""
+        C = services_contrato.ErpContrato
+        return dict(self.db.query(C.numero_contrato, C.id).filter(C.empresa_id == self.empresa_id))
+
+    @cached_property
+    def suministros_con_contrato_activo(self) -> set[int]:
+        C = services_contrato.ErpContrato
+        rows = self.db.query(C.suministro_id).filter(C.empresa_id == self.empresa_id, C.estado == "activo")
+        return {sid for (sid,) in rows}
+
+    @cached_property
+    def catalogos_cnmc(self) -> dict:
+        return cargar_catalogos_cnmc(self.db)
+
+    # Inversos para el display del snapshot del contrato (sin más consultas).
+    # Se construyen en el primer uso: el handler de contratos no da de alta
+    # titulares, suministros ni comercializadoras.
+    @cached_property
+    def _nombre_titular_por_id(self) -> dict[int, str | None]:
+        return {tid: nombre for tid, nombre in self.titulares.values()}
+
+    @cached_property
+    def _cups_por_id(self) -> dict[int, str]:
+        return {sid: cups for cups, sid in self.suministros.items()}
+
+    @cached_property
+    def _tarifa_por_id(self) -> dict[int, str]:
+        return {tid: codigo for codigo, tid in self.tarifas.items()}
+
+    @cached_property
+    def _comercializadora_por_rel(self) -> dict[int, str]:
+        nombres = {cid: nombre for cid, nombre in self.comercializadoras.values()}
+        return {rid: nombres.get(cid) for cid, rid in self.com_empresa.items()}
+
+    def nombre_titular(self, titular_id: int) -> str | None:
+        return self._nombre_titular_por_id.get(titular_id)
+
+    def cups(self, suministro_id: int) -> str | None:
+        return self._cups_por_id.get(suministro_id)
+
+    def codigo_tarifa(self, tarifa_id: int) -> str | None:
+        return self._tarifa_por_id.get(tarifa_id)
+
+    def nombre_comercializadora(self, rel_id: int | None) -> str | None:
+        return self._comercializadora_por_rel.get(rel_id) if rel_id else None
+
+
+def _resolver_comercializadora_global(mapas: _Mapas, codigo_ree):
     """codigo_ree (clave natural) → id de la comercializadora del catálogo global."""
     if not codigo_ree:
         raise _EnlaceNoResuelto("comercializadora_codigo_ree", codigo_ree,
                                 "Falta el código REE de la comercializadora")
-    com = (
-        db.query(services.ErpComercializadora)
-        .filter(services.ErpComercializadora.codigo_ree == str(codigo_ree).strip())
-        .first()
-    )
+    com = mapas.comercializadoras.get(str(codigo_ree).strip())
     if com is None:
         raise _EnlaceNoResuelto("comercializadora_codigo_ree", codigo_ree,
                                 f"No existe comercializadora con código REE {codigo_ree} en el catálogo global")
-    return com.id
+    return com[0]
 
 
-def _resolver_titular(db: Session, empresa_id: int, identificador, columna: str):
+def _resolver_titular(mapas: _Mapas, identificador, columna: str):
     """identificador (NIF/CIF) → titular_id dentro de la empresa."""
     if not identificador:
         raise _EnlaceNoResuelto(columna, identificador, "Falta el identificador del titular")
-    t = (db.query(services.ErpTitular)
-         .filter(services.ErpTitular.empresa_id == empresa_id,
-                 services.ErpTitular.identificador == str(identificador).strip())
-         .first())
+    t = mapas.titulares.get(str(identificador).strip())
     if t is None:
         raise _EnlaceNoResuelto(columna, identificador,
                                 f"No existe titular con documento {identificador} en esta empresa")
-    return t.id
+    return t[0]
 
 
-def _resolver_suministro(db: Session, empresa_id: int, cups):
+def _resolver_suministro(mapas: _Mapas, cups):
     """cups → suministro_id dentro de la empresa."""
     if not cups:
         raise _EnlaceNoResuelto("suministro_cups", cups, "Falta el CUPS del suministro")
-    s = (db.query(services.ErpSuministro)
-         .filter(services.ErpSuministro.empresa_id == empresa_id,
-                 services.ErpSuministro.cups == str(cups).strip().upper())
-         .first())
-    if s is None:
+    sid = mapas.suministros.get(str(cups).strip().upper())
+    if sid is None:
         raise _EnlaceNoResuelto("suministro_cups", cups,
                                 f"No existe suministro con CUPS {cups} en esta empresa")
-    return s.id
+    return sid
 
 
-def _resolver_tarifa(db: Session, codigo):
+def _resolver_tarifa(mapas: _Mapas, codigo):
     """codigo de tarifa (2.0TD, 3.0TD…) → tarifa_id (catálogo global)."""
     if not codigo:
         raise _EnlaceNoResuelto("tarifa_codigo", codigo, "Falta el código de tarifa")
-    t = (db.query(services.ErpTarifa)
-         .filter(services.ErpTarifa.codigo == str(codigo).strip())
-         .first())
-    if t is None:
+    tid = mapas.tarifas.get(str(codigo).strip())
+    if tid is None:
         raise _EnlaceNoResuelto("tarifa_codigo", codigo, f"No existe tarifa con código {codigo}")
-    return t.id
+    return tid
 
 
-def _resolver_comercializadora_empresa(db: Session, empresa_id: int, codigo_ree):
+def _resolver_comercializadora_empresa(mapas: _Mapas, codigo_ree):
     """REE → comercializadora global → relación de ESTA empresa (doble salto)."""
-    com_id = _resolver_comercializadora_global(db, codigo_ree)
-    rel = (db.query(services.ErpComercializadoraEmpresa)
-           .filter(services.ErpComercializadoraEmpresa.empresa_id == empresa_id,
-                   services.ErpComercializadoraEmpresa.comercializadora_id == com_id)
-           .first())
-    if rel is None:
+    com_id = _resolver_comercializadora_global(mapas, codigo_ree)
+    rel_id = mapas.com_empresa.get(com_id)
+    if rel_id is None:
         raise _EnlaceNoResuelto("comercializadora_codigo_ree", codigo_ree,
                                 f"La comercializadora REE {codigo_ree} no está dada de alta en esta empresa")
-    return rel.id
+    return rel_id
+
+
+# ---------------------------------------------------------------------------
+# Altas por lotes
+# ---------------------------------------------------------------------------
+@dataclass
+class _Alta:
+    fila_excel: int
+    clave: object                  # clave natural (mapas y mensajes de error)
+    valores: dict                  # columnas del INSERT
+    potencias: list[dict] = field(default_factory=list)   # solo contratos
+    snapshot: dict | None = None                          # solo contratos (v1 A3)
+
+
+def _insertar_por_lotes(db: Session, altas: list[_Alta], insertar: Callable[[list[_Alta]], None],
+                        res: ResultadoImport) -> None:
+    """
+    Inserta `altas` en lotes de TAM_LOTE filas, cada lote en un SAVEPOINT y
+    con un único commit al final. Si un lote choca con una restricción (p.ej.
+    un alta concurrente de la misma clave) se repite fila a fila para aislar
+    la culpable, con el mismo error que daba el alta individual.
+    """
+    for i in range(0, len(altas), TAM_LOTE):
+        lote = altas[i:i + TAM_LOTE]
+        try:
+            with db.begin_nested():
+                insertar(lote)
+            res.creadas += len(lote)
+            continue
+        except IntegrityError:
+            pass
+        for alta in lote:
+            try:
+                with db.begin_nested():
+                    insertar([alta])
+                res.creadas += 1
+            except IntegrityError as e:
+                res.errores.append(ErrorFila(alta.fila_excel, None, alta.clave,
+                                             "Conflicto de integridad en BD: " + str(getattr(e, "orig", e))[:120]))
+    db.commit()
+
+
+def _insertar_y_mapear(db: Session, modelo, clave: str, lote: list[_Alta]) -> dict:
+    """
+    INSERT del lote (executemany) y sus ids por clave natural en una consulta.
+    No se usa RETURNING: con varias filas no todos los drivers garantizan el
+    orden y SQLAlchemy recae en un INSERT por fila.
+    """
+    db.execute(insert(modelo), [a.valores for a in lote])
+    columna = getattr(modelo, clave)
+    return dict(
+        db.query(columna, modelo.id)
+        .filter(modelo.empresa_id == lote[0].valores["empresa_id"],
+                columna.in_([a.clave for a in lote]))
+    )
 
 
 # ---------------------------------------------------------------------------
@@ -160,38 +334,46 @@ def _update_parcial(db, user, entidad: str, registro_id: int, datos: dict, *, ve
         services_contrato.actualizar_contrato(db, user, registro_id, schemas.ErpContratoUpdate(**datos), versionar=versionar)
 
 
-def _existente_titular(db, empresa_id, identificador):
-    return (db.query(services.ErpTitular)
-            .filter(services.ErpTitular.empresa_id == empresa_id,
-                    services.ErpTitular.identificador == str(identificador).strip())
-            .first())
-
-
-def _existente_suministro(db, empresa_id, cups):
-    return (db.query(services.ErpSuministro)
-            .filter(services.ErpSuministro.empresa_id == empresa_id,
-                    services.ErpSuministro.cups == str(cups).strip().upper())
-            .first())
-
-
-def _existente_com_empresa(db, empresa_id, comercializadora_id):
-    return (db.query(services.ErpComercializadoraEmpresa)
-            .filter(services.ErpComercializadoraEmpresa.empresa_id == empresa_id,
-                    services.ErpComercializadoraEmpresa.comercializadora_id == comercializadora_id)
-            .first())
-
-
-def _existente_contrato(db, empresa_id, numero_contrato):
-    return (db.query(services_contrato.ErpContrato)
-            .filter(services_contrato.ErpContrato.empresa_id == empresa_id,
-                    services_contrato.ErpContrato.numero_contrato == str(numero_contrato).strip())
-            .first())
+@dataclass
+class _Existente:
+    fila_excel: int
+    clave: object
+    datos: dict
+
+
+def _tratar_existentes(
+    db: Session, user: User, res: ResultadoImport, entidad: str, existentes: list[_Existente],
+    *, correccion: bool, registro_id: Callable[[object], int | None], columna: str,
+    valor_error: Callable[[_Existente], object], errores: tuple, versionar: bool = True,
+) -> None:
+    """
+    Filas cuya clave natural ya existe (en BD o antes en el mismo Excel):
+    insert-only → omitidas; en corrección se actualizan una a una con el
+    servicio de pantalla, después de las altas para que también vean las del
+    propio fichero.
+    """
+    for ex in existentes:
+        rid = registro_id(ex.clave) if correccion else None
+        if rid is None:
+            res.omitidas += 1
+            continue
+        try:
+            _update_parcial(db, user, entidad, rid, ex.datos, versionar=versionar)  # type: ignore[arg-type]
+            res.actualizadas += 1
+        except errores as e:
+            res.errores.append(ErrorFila(ex.fila_excel, columna, valor_error(ex), str(e)))
 
 
 # ---------------------------------------------------------------------------
 # Handler: TITULARES (sin enlaces a otras entidades)
 # ---------------------------------------------------------------------------
 def _importar_titulares(db: Session, user: User, empresa_id: int, filas, res: ResultadoImport, correccion: bool = False) -> None:
+    mapas = _Mapas(db, empresa_id)
+    ahora = _ahora_madrid_naive()
+    altas: list[_Alta] = []
+    existentes: list[_Existente] = []
+    en_fichero: set[str] = set()
+
     for fila in filas:
         res.total += 1
         datos = {k: v for k, v in fila.valores.items() if v is not None}
@@ -199,46 +381,59 @@ def _importar_titulares(db: Session, user: User, empresa_id: int, filas, res: Re
         try:
             payload = schemas.ErpTitularCreate(**datos)
         except ValidationError as e:
-            err = e.errors()[0]
-            col = _col_de_error(err)
-            res.errores.append(ErrorFila(fila.fila_excel, col, datos.get(col) if col else None,
-                                         err.get("msg", "valor inválido")))
+            _error_validacion(res, fila, datos, e)
             continue
 
-        try:
-            services.crear_titular(db, user, empresa_id, payload)
-            res.creadas += 1
-        except services.DuplicateIdentificadorError:
-            if correccion:
-                existente = _existente_titular(db, empresa_id, payload.identificador)
-                if existente is not None:
-                    try:
-                        _update_parcial(db, user, "titulares", existente.id, datos)  # type: ignore[arg-type]
-                        res.actualizadas += 1
-                    except (services.ValidacionError, ValueError) as e:
-                        res.errores.append(ErrorFila(fila.fila_excel, "identificador", payload.identificador, str(e)))
-                else:
-                    res.omitidas += 1
-            else:
-                res.omitidas += 1
-        except ValueError as e:
-            res.errores.append(ErrorFila(fila.fila_excel, "identificador", payload.identificador, str(e)))
-        except IntegrityError as e:
-            db.rollback()
-            res.errores.append(ErrorFila(fila.fila_excel, None, payload.identificador,
-                                         "Conflicto de integridad en BD: " + str(getattr(e, "orig", e))[:120]))
+        if payload.identificador in mapas.titulares or payload.identificador in en_fichero:
+            existentes.append(_Existente(fila.fila_excel, payload.identificador, datos))
+            continue
+
+        ok, msg = validar_codigos_cnmc_catalogos(
+            mapas.catalogos_cnmc,
+            dir_tipo_via=payload.dir_tipo_via,
+            dir_tipo_aclarador=payload.dir_tipo_aclarador,
+        )
+        if not ok:
+            res.errores.append(ErrorFila(fila.fila_excel, "identificador", payload.identificador, msg))
+            continue
+
+        en_fichero.add(payload.identificador)
+        altas.append(_Alta(fila.fila_excel, payload.identificador, {
+            "tenant_id": user.tenant_id, "empresa_id": empresa_id,
+            "created_at": ahora, "updated_at": ahora,
+            **services.valores_alta_titular(payload),
+        }))
+
+    def insertar(lote: list[_Alta]) -> None:
+        ids = _insertar_y_mapear(db, services.ErpTitular, "identificador", lote)
+        for alta in lote:
+            mapas.titulares[alta.clave] = (ids[alta.clave], alta.valores["nombre"])
+
+    _insertar_por_lotes(db, altas, insertar, res)
+    _tratar_existentes(
+        db, user, res, "titulares", existentes, correccion=correccion,
+        registro_id=lambda clave: (mapas.titulares.get(clave) or (None,))[0],
+        columna="identificador", valor_error=lambda ex: ex.clave,
+        errores=(services.ValidacionError, ValueError),
+    )
 
 
 # ---------------------------------------------------------------------------
 # Handler: COMERCIALIZADORAS DE EMPRESA (1 enlace: codigo_ree → comercializadora global)
 # ---------------------------------------------------------------------------
 def _importar_comercializadoras_empresa(db: Session, user: User, empresa_id: int, filas, res: ResultadoImport, correccion: bool = False) -> None:
+    mapas = _Mapas(db, empresa_id)
+    ahora = _ahora_madrid_naive()
+    altas: list[_Alta] = []
+    existentes: list[_Existente] = []
+    en_fichero: set[int] = set()
+
     for fila in filas:
         res.total += 1
         datos = {k: v for k, v in fila.valores.items() if v is not None}
 
         try:
-            com_id = _resolver_comercializadora_global(db, datos.pop("comercializadora_codigo_ree", None))
+            com_id = _resolver_comercializadora_global(mapas, datos.pop("comercializadora_codigo_ree", None))
         except _EnlaceNoResuelto as e:
             res.errores.append(ErrorFila(fila.fila_excel, e.columna, e.valor, e.motivo))
             continue
@@ -247,40 +442,44 @@ def _importar_comercializadoras_empresa(db: Session, user: User, empresa_id: int
         try:
             payload = schemas.ErpComercializadoraEmpresaCreate(**datos)
         except ValidationError as e:
-            err = e.errors()[0]
-            col = _col_de_error(err)
-            res.errores.append(ErrorFila(fila.fila_excel, col, datos.get(col) if col else None,
-                                         err.get("msg", "valor inválido")))
+            _error_validacion(res, fila, datos, e)
             continue
 
-        try:
-            services.crear_comercializadora_empresa(db, user, empresa_id, payload)
-            res.creadas += 1
-        except services.DuplicateComercializadoraEmpresaError:
-            if correccion:
-                existente = _existente_com_empresa(db, empresa_id, com_id)
-                if existente is not None:
-                    try:
-                        _update_parcial(db, user, "comercializadoras_empresa", existente.id, datos)  # type: ignore[arg-type]
-                        res.actualizadas += 1
-                    except ValueError as e:
-                        res.errores.append(ErrorFila(fila.fila_excel, "comercializadora_codigo_ree", com_id, str(e)))
-                else:
-                    res.omitidas += 1
-            else:
-                res.omitidas += 1
-        except ValueError as e:
-            res.errores.append(ErrorFila(fila.fila_excel, "comercializadora_codigo_ree", com_id, str(e)))
-        except IntegrityError as e:
-            db.rollback()
-            res.errores.append(ErrorFila(fila.fila_excel, None, com_id,
-                                         "Conflicto de integridad en BD: " + str(getattr(e, "orig", e))[:120]))
+        if com_id in mapas.com_empresa or com_id in en_fichero:
+            existentes.append(_Existente(fila.fila_excel, com_id, datos))
+            continue
+
+        en_fichero.add(com_id)
+        altas.append(_Alta(fila.fila_excel, com_id, {
+            "tenant_id": user.tenant_id, "empresa_id": empresa_id,
+            "created_at": ahora, "updated_at": ahora,
+            **payload.model_dump(),
+        }))
+
+    def insertar(lote: list[_Alta]) -> None:
+        mapas.com_empresa.update(
+            _insertar_y_mapear(db, services.ErpComercializadoraEmpresa, "comercializadora_id", lote)
+        )
+
+    _insertar_por_lotes(db, altas, insertar, res)
+    _tratar_existentes(
+        db, user, res, "comercializadoras_empresa", existentes, correccion=correccion,
+        registro_id=mapas.com_empresa.get,
+        columna="comercializadora_codigo_ree", valor_error=lambda ex: ex.clave,
+        errores=(ValueError,),
+    )
 
 
 # ---------------------------------------------------------------------------
 # Handler: SUMINISTROS (sin enlaces; titular_id vive en el contrato, no aquí)
 # ---------------------------------------------------------------------------
 def _importar_suministros(db: Session, user: User, empresa_id: int, filas, res: ResultadoImport, correccion: bool = False) -> None:
+    mapas = _Mapas(db, empresa_id)
+    ahora = _ahora_madrid_naive()
+    altas: list[_Alta] = []
+    existentes: list[_Existente] = []
+    en_fichero: set[str] = set()
+
     for fila in filas:
         res.total += 1
         datos = {k: v for k, v in fila.valores.items() if v is not None}
@@ -288,40 +487,66 @@ def _importar_suministros(db: Session, user: User, empresa_id: int, filas, res:
         try:
             payload = schemas.ErpSuministroCreate(**datos)
         except ValidationError as e:
-            err = e.errors()[0]
-            col = _col_de_error(err)
-            res.errores.append(ErrorFila(fila.fila_excel, col, datos.get(col) if col else None,
-                                         err.get("msg", "valor inválido")))
+            _error_validacion(res, fila, datos, e)
             continue
 
-        try:
-            services.crear_suministro(db, user, empresa_id, payload)
-            res.creadas += 1
-        except services.DuplicateCupsError:
-            if correccion:
-                existente = _existente_suministro(db, empresa_id, payload.cups)
-                if existente is not None:
-                    try:
-                        _update_parcial(db, user, "suministros", existente.id, datos)  # type: ignore[arg-type]
-                        res.actualizadas += 1
-                    except (services.ValidacionError, ValueError) as e:
-                        res.errores.append(ErrorFila(fila.fila_excel, "cups", payload.cups, str(e)))
-                else:
-                    res.omitidas += 1
-            else:
-                res.omitidas += 1
-        except ValueError as e:
-            res.errores.append(ErrorFila(fila.fila_excel, "cups", payload.cups, str(e)))
-        except IntegrityError as e:
-            db.rollback()
-            res.errores.append(ErrorFila(fila.fila_excel, None, payload.cups,
-                                         "Conflicto de integridad en BD: " + str(getattr(e, "orig", e))[:120]))
+        if payload.cups in mapas.suministros or payload.cups in en_fichero:
+            existentes.append(_Existente(fila.fila_excel, payload.cups, datos))
+            continue
+
+        ok, msg = validar_codigos_cnmc_catalogos(
+            mapas.catalogos_cnmc,
+            dir_tipo_via=payload.dir_tipo_via,
+            dir_tipo_aclarador=payload.dir_tipo_aclarador,
+        )
+        if not ok:
+            res.errores.append(ErrorFila(fila.fila_excel, "cups", payload.cups, msg))
+            continue
+
+        en_fichero.add(payload.cups)
+        altas.append(_Alta(fila.fila_excel, payload.cups, {
+            "tenant_id": user.tenant_id, "empresa_id": empresa_id,
+            "created_at": ahora, "updated_at": ahora,
+            **payload.model_dump(),
+        }))
+
+    def insertar(lote: list[_Alta]) -> None:
+        mapas.suministros.update(_insertar_y_mapear(db, services.ErpSuministro, "cups", lote))
+
+    _insertar_por_lotes(db, altas, insertar, res)
+    _tratar_existentes(
+        db, user, res, "suministros", existentes, correccion=correccion,
+        registro_id=mapas.suministros.get,
+        columna="cups", valor_error=lambda ex: ex.clave,
+        errores=(services.ValidacionError, ValueError),
+    )
 
 
 # ---------------------------------------------------------------------------
 # Handler: CONTRATOS (4 enlaces + potencias P1-P6)
 # ---------------------------------------------------------------------------
+def _validar_contrato(mapas: _Mapas, data: dict, potencias: list[dict]) -> None:
+    """Reglas de services_contrato.crear_contrato contra los mapas (sin BD).
+    Las FKs ya son de la empresa: salen de sus mapas."""
+    permitidos = mapas.periodos_potencia.get(data["tarifa_id"], set())
+    if potencias:
+        services_contrato.comprobar_periodos_tarifa(permitidos, potencias)
+    services_contrato.validar_potencias_crecientes(potencias)
+    if data.get("estado", "activo") == "activo":
+        services_contrato.comprobar_potencias_completas(permitidos, potencias)
+        if data["suministro_id"] in mapas.suministros_con_contrato_activo:
+            raise services_contrato.ContratoSuministroActivoError(
+                "Ya existe un contrato activo para ese suministro"
+            )
+
+
 def _importar_contratos(db: Session, user: User, empresa_id: int, filas, res: ResultadoImport, correccion: bool = False) -> None:
+    mapas = _Mapas(db, empresa_id)
+    ahora = _ahora_madrid_naive()
+    altas: list[_Alta] = []
+    existentes: list[_Existente] = []
+    en_fichero: set[str] = set()
+
     for fila in filas:
         res.total += 1
         datos = {k: v for k, v in fila.valores.items() if v is not None}
@@ -339,13 +564,13 @@ def _importar_contratos(db: Session, user: User, empresa_id: int, filas, res: Re
                 pots.append({"periodo": periodo, "potencia_kw": val})
 
         try:
-            datos["titular_id"] = _resolver_titular(db, empresa_id, titular_ident, "titular_identificador")
-            datos["suministro_id"] = _resolver_suministro(db, empresa_id, suministro_cups)
-            datos["tarifa_id"] = _resolver_tarifa(db, tarifa_cod)
+            datos["titular_id"] = _resolver_titular(mapas, titular_ident, "titular_identificador")
+            datos["suministro_id"] = _resolver_suministro(mapas, suministro_cups)
+            datos["tarifa_id"] = _resolver_tarifa(mapas, tarifa_cod)
             if pagador_ident is not None:
-                datos["pagador_id"] = _resolver_titular(db, empresa_id, pagador_ident, "pagador_identificador")
+                datos["pagador_id"] = _resolver_titular(mapas, pagador_ident, "pagador_identificador")
             if com_ree is not None:
-                datos["comercializadora_empresa_id"] = _resolver_comercializadora_empresa(db, empresa_id, com_ree)
+                datos["comercializadora_empresa_id"] = _resolver_comercializadora_empresa(mapas, com_ree)
         except _EnlaceNoResuelto as e:
             res.errores.append(ErrorFila(fila.fila_excel, e.columna, e.valor, e.motivo))
             continue
@@ -355,38 +580,74 @@ def _importar_contratos(db: Session, user: User, empresa_id: int, filas, res: Re
         try:
             payload = schemas.ErpContratoCreate(**datos)
         except ValidationError as e:
-            err = e.errors()[0]
-            col = _col_de_error(err)
-            res.errores.append(ErrorFila(fila.fila_excel, col, datos.get(col) if col else None,
-                                         err.get("msg", "valor inválido")))
+            _error_validacion(res, fila, datos, e)
+            continue
+
+        data = payload.model_dump()
+        potencias = data.pop("potencias", []) or []
+        numero = data["numero_contrato"]
+        if numero in mapas.contratos or numero in en_fichero:
+            existentes.append(_Existente(fila.fila_excel, numero, datos))
             continue
 
         try:
-            services_contrato.crear_contrato(db, user, empresa_id, payload)
-            res.creadas += 1
-        except services_contrato.ContratoNumeroDuplicadoError:
-            if correccion:
-                existente = _existente_contrato(db, empresa_id, payload.numero_contrato)
-                if existente is not None:
-                    upd = dict(datos)
-                    upd["potencias"] = pots
-                    try:
-                        _update_parcial(db, user, "contratos", existente.id, upd, versionar=False)  # type: ignore[arg-type]
-                        res.actualizadas += 1
-                    except (services_contrato.ContratoValidacionError,
-                            services_contrato.ContratoSuministroActivoError, ValueError) as e:
-                        res.errores.append(ErrorFila(fila.fila_excel, "numero_contrato", payload.numero_contrato, str(e)))
-                else:
-                    res.omitidas += 1
-            else:
-                res.omitidas += 1
+            _validar_contrato(mapas, data, potencias)
         except (services_contrato.ContratoValidacionError,
                 services_contrato.ContratoSuministroActivoError, ValueError) as e:
-            res.errores.append(ErrorFila(fila.fila_excel, "numero_contrato", payload.numero_contrato, str(e)))
-        except IntegrityError as e:
-            db.rollback()
-            res.errores.append(ErrorFila(fila.fila_excel, None, payload.numero_contrato,
-                                         "Conflicto de integridad en BD: " + str(getattr(e, "orig", e))[:120]))
+            res.errores.append(ErrorFila(fila.fila_excel, "numero_contrato", numero, str(e)))
+            continue
+
+        # tipo_punto_medida se calcula automaticamente (RPUM) desde la potencia maxima contratada
+        p_max = max((p["potencia_kw"] for p in potencias), default=None)
+        data["tipo_punto_medida"] = tipo_punto_medida_rpum(p_max)
+        if data.get("estado", "activo") == "activo":
+            mapas.suministros_con_contrato_activo.add(data["suministro_id"])
+        en_fichero.add(numero)
+
+        snapshot = services_contrato.snapshot_contrato(
+            SimpleNamespace(**data),
+            titular_nombre=mapas.nombre_titular(data["titular_id"]),
+            cups=mapas.cups(data["suministro_id"]),
+            tarifa_codigo=mapas.codigo_tarifa(data["tarifa_id"]),
+            comercializadora_nombre=mapas.nombre_comercializadora(data.get("comercializadora_empresa_id")),
+            potencias={p["periodo"]: float(p["potencia_kw"]) for p in sorted(potencias, key=lambda p: p["periodo"])},
+        )
+        altas.append(_Alta(
+            fila.fila_excel, numero,
+            {"tenant_id": user.tenant_id, "empresa_id": empresa_id,
+             "created_at": ahora, "updated_at": ahora, **data},
+            potencias=potencias, snapshot=snapshot,
+        ))
+
+    def insertar(lote: list[_Alta]) -> None:
+        ids = _insertar_y_mapear(db, services_contrato.ErpContrato, "numero_contrato", lote)
+        comunes = {"tenant_id": user.tenant_id, "empresa_id": empresa_id,
+                   "created_at": ahora, "updated_at": ahora}
+        potencias = [
+            {**comunes, "contrato_id": ids[alta.clave], "periodo": p["periodo"], "potencia_kw": p["potencia_kw"]}
+            for alta in lote for p in alta.potencias
+        ]
+        if potencias:
+            db.execute(insert(services_contrato.ErpContratoPotencia), potencias)
+        # Histórico: v1 = alta (A3), foto del contrato recién creado, sin diff.
+        db.execute(insert(services_contrato.ErpContratoVersion), [
+            {**comunes, "contrato_id": ids[alta.clave], "suministro_id": alta.valores["suministro_id"],
+             "version": 1, "tipo_atr": "A3", "motivo": None, "referencia": None,
+             "fecha_alta": ahora.date(), "fecha_baja": None, "fecha_modificacion": ahora.date(),
+             "snapshot": alta.snapshot, "cambios": None}
+            for alta in lote
+        ])
+        mapas.contratos.update(ids)
+
+    _insertar_por_lotes(db, altas, insertar, res)
+    _tratar_existentes(
+        db, user, res, "contratos", existentes, correccion=correccion,
+        registro_id=mapas.contratos.get,
+        columna="numero_contrato", valor_error=lambda ex: ex.clave,
+        errores=(services_contrato.ContratoValidacionError,
+                 services_contrato.ContratoSuministroActivoError, ValueError),
+        versionar=False,
+    )
 
 
 _HANDLERS = {
@@ -414,4 +675,5 @@ def importar(db: Session, user: User, empresa_id: int, entidad: str, contenido:
 
     correccion = mig_estado.en_correccion(db, empresa_id)
     handler(db, user, empresa_id, lect.filas, res, correccion)
+    res.errores.sort(key=lambda e: e.fila_excel)
     return res
@@ -14,10 +14,11 @@ bloque Cliente del C1/A3) y RPUM (RD 1110/2007). Trazabilidad campo→norma en
 ERP_APP_Medidas_Diseno.md §6ter; esquemas en §7.7 y §8.1/§8.2.
 """
 from sqlalchemy import (
-    Boolean, Column, Date, Float, ForeignKey,
+    Boolean, Column, Date, Float, ForeignKey, Index,
     Integer, String, Text, UniqueConstraint,
 )
 from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.orm import relationship
 
 from app.core.models_base import Base, TimestampMixin
 
@@ -83,6 +84,22 @@ class ErpTitular(TimestampMixin, Base):
     codigo_interno = Column(String(50), nullable=True)
     activo         = Column(Boolean, nullable=False, default=True)
 
+    __table_args__ = (
+        # Búsqueda ILIKE '%texto%' (pg_trgm). Ver app/erp/services_busqueda.py.
+        Index(
+            "ix_erp_titular_nombre_trgm", "nombre",
+            postgresql_using="gin", postgresql_ops={"nombre": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_erp_titular_identificador_trgm", "identificador",
+            postgresql_using="gin", postgresql_ops={"identificador": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_erp_titular_codigo_interno_trgm", "codigo_interno",
+            postgresql_using="gin", postgresql_ops={"codigo_interno": "gin_trgm_ops"},
+        ),
+    )
+
 
 # ---------------------------------------------------------------------------
 # 2) ErpSuministro  -- punto de suministro físico (CUPS)
@@ -159,6 +176,11 @@ class ErpSuministro(TimestampMixin, Base):
 
     __table_args__ = (
         UniqueConstraint("empresa_id", "cups", name="uq_erp_suministro_empresa_cups"),
+        # Búsqueda ILIKE '%texto%' (pg_trgm). Ver app/erp/services_busqueda.py.
+        Index(
+            "ix_erp_suministro_cups_trgm", "cups",
+            postgresql_using="gin", postgresql_ops={"cups": "gin_trgm_ops"},
+        ),
     )
 
 
@@ -409,8 +431,29 @@ class ErpContrato(TimestampMixin, Base):
     notas  = Column(Text, nullable=True)
     activo = Column(Boolean, nullable=False, default=True)
 
+    # --- Lectura (display / snapshot) ---
+    # Solo lectura (viewonly): se escriben siempre los *_id. Carga perezosa por
+    # defecto; los listados y la foto por lotes usan
+    # services_contrato.opciones_lectura() (joined + selectin, consultas fijas).
+    titular = relationship("ErpTitular", foreign_keys=[titular_id], viewonly=True)
+    suministro = relationship("ErpSuministro", viewonly=True)
+    tarifa = relationship("ErpTarifa", viewonly=True)
+    comercializadora_empresa = relationship("ErpComercializadoraEmpresa", viewonly=True)
+    potencias = relationship(
+        "ErpContratoPotencia", viewonly=True, order_by="ErpContratoPotencia.periodo",
+    )
+
     __table_args__ = (
         UniqueConstraint("empresa_id", "numero_contrato", name="uq_erp_contrato_empresa_numero"),
+        # Búsqueda ILIKE '%texto%' (pg_trgm). Ver app/erp/services_busqueda.py.
+        Index(
+            "ix_erp_contrato_numero_contrato_trgm", "numero_contrato",
+            postgresql_using="gin", postgresql_ops={"numero_contrato": "gin_trgm_ops"},
+        ),
+        Index(
+            "ix_erp_contrato_codigo_interno_trgm", "codigo_interno",
+            postgresql_using="gin", postgresql_ops={"codigo_interno": "gin_trgm_ops"},
+        ),
     )
 
 
@@ -455,6 +498,8 @@ class ErpComercializadoraEmpresa(TimestampMixin, Base):
 
     activo = Column(Boolean, nullable=False, default=True)
 
+    comercializadora = relationship("ErpComercializadora", viewonly=True)
+
     __table_args__ = (
         UniqueConstraint("empresa_id", "comercializadora_id",
                          name="uq_erp_com_empresa_comercializadora"),
@@ -591,6 +636,11 @@ class ErpEquipoMedida(TimestampMixin, Base):
 
     __table_args__ = (
         UniqueConstraint("empresa_id", "numero_serie", name="uq_equipo_empresa_numserie"),
+        # Búsqueda ILIKE '%texto%' (pg_trgm). Ver app/erp/services_busqueda.py.
+        Index(
+            "ix_erp_equipo_medida_numero_serie_trgm", "numero_serie",
+            postgresql_using="gin", postgresql_ops={"numero_serie": "gin_trgm_ops"},
+        ),
     )
 
 
@@ -14,8 +14,9 @@ from sqlalchemy.orm import Session
 
 from app.core.auth import get_current_user
 from app.core.db import get_db
+from app.core.perf import perf_budget
 from app.core.permissions import assert_empresa_access
-from app.erp import schemas, services, services_contrato
+from app.erp import schemas, services, services_busqueda, services_contrato
 from app.erp.migraciones import plantillas as mig_plantillas
 from app.erp.migraciones import importer as mig_importer
 from app.erp.migraciones import informe as mig_informe
@@ -37,6 +38,55 @@ def ping(
     return {"status": "ok", "modulo": "erp"}
 
 
+# ---------------------------------------------------------------------------
+# Búsqueda (typeahead): ranking + paginado, índices pg_trgm
+# ---------------------------------------------------------------------------
+@router.get("/buscar", response_model=schemas.ErpBusquedaGlobal)
+@perf_budget(queries=8)
+def buscar_endpoint(
+    empresa_id: int = Query(...),
+    q: str = Query("", description="Texto a buscar (mínimo 3 caracteres)"),
+    entidades: Optional[list[schemas.EntidadBusqueda]] = Query(None),
+    limite: int = Query(5, ge=1, le=services_busqueda.LIMITE_GLOBAL_MAX),
+    solo_activos: bool = Query(False),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Búsqueda unificada de una empresa: los mejores de cada entidad."""
+    grupos = services_busqueda.buscar(
+        db, user, empresa_id, q, entidades=entidades, limite=limite, solo_activos=solo_activos,
+    )
+    return {
+        "q": q,
+        "grupos": [
+            {"entidad": entidad, "has_more": has_more, "items": items}
+            for entidad, (items, has_more) in grupos.items()
+        ],
+    }
+
+
+@router.get("/buscar/{entidad}", response_model=schemas.ErpBusquedaPagina)
+@perf_budget(queries=4)
+def buscar_entidad_endpoint(
+    entidad: schemas.EntidadBusqueda,
+    empresa_id: int = Query(...),
+    q: str = Query("", description="Texto a buscar (mínimo 3 caracteres)"),
+    page: int = Query(1, ge=1),
+    page_size: int = Query(20, ge=1, le=services_busqueda.PAGE_SIZE_MAX),
+    solo_activos: bool = Query(False),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    items, has_more = services_busqueda.buscar_entidad(
+        db, user, empresa_id, entidad, q,
+        page=page, page_size=page_size, solo_activos=solo_activos,
+    )
+    return {
+        "entidad": entidad, "q": q, "page": page, "page_size": page_size,
+        "has_more": has_more, "items": items,
+    }
+
+
 # ---------------------------------------------------------------------------
 # Titulares
 # ---------------------------------------------------------------------------
@@ -335,6 +385,7 @@ def desactivar_comercializadora_empresa_endpoint(
 # Contratos (E-6b)
 # ---------------------------------------------------------------------------
 @router.get("/contratos", response_model=list[schemas.ErpContratoOut])
+@perf_budget(queries=6)
 def listar_contratos_endpoint(
     empresa_id: int = Query(...),
     search: Optional[str] = Query(None),
@@ -444,6 +495,17 @@ def obtener_version_contrato_endpoint(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail=str(e))
 
 
+@router.post("/contratos/versiones/sembrar")
+def sembrar_versiones_contratos_endpoint(
+    empresa_id: int = Query(...),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Crea la v1 (alta A3) de los contratos de la empresa sin histórico."""
+    creadas = services_contrato.sembrar_versiones(db, user, empresa_id)
+    return {"empresa_id": empresa_id, "creadas": creadas}
+
+
 # ---------------------------------------------------------------------------
 # Migraciones (E-12): descarga de plantillas Excel
 # ---------------------------------------------------------------------------
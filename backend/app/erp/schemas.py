@@ -973,3 +973,39 @@ class RecibirAlmacenPayload(BaseModel):
     fecha_garantia: Optional[date] = None
     fecha_entrada: Optional[date] = None
     notas: Optional[str] = None
+
+
+# ===========================================================================
+# Búsqueda (typeahead por empresa)
+# ===========================================================================
+EntidadBusqueda = Literal["titular", "suministro", "contrato", "equipo"]
+
+
+class ErpBusquedaItem(BaseModel):
+    model_config = ConfigDict(from_attributes=True)
+
+    entidad: EntidadBusqueda
+    id: int
+    etiqueta: str
+    detalle: Optional[str] = None
+    score: float
+
+
+class ErpBusquedaPagina(BaseModel):
+    entidad: EntidadBusqueda
+    q: str
+    page: int
+    page_size: int
+    has_more: bool
+    items: list[ErpBusquedaItem]
+
+
+class ErpBusquedaGrupo(BaseModel):
+    entidad: EntidadBusqueda
+    has_more: bool
+    items: list[ErpBusquedaItem]
+
+
+class ErpBusquedaGlobal(BaseModel):
+    q: str
+    grupos: list[ErpBusquedaGrupo]
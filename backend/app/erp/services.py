@@ -140,6 +140,20 @@ class DuplicateIdentificadorError(ValueError):
     """Identificador ya existente para esa empresa (mismo NIF/CIF/NIE)."""
 
 
+def valores_alta_titular(payload: ErpTitularCreate) -> dict:
+    """Columnas de un titular nuevo a partir del payload, con `nombre` autocompuesto."""
+    data = payload.model_dump()
+    nombre_calc = _componer_nombre(
+        data.get("tipo_persona"),
+        data.get("razon_social"),
+        data.get("nombre_de_pila"),
+        data.get("primer_apellido"),
+        data.get("segundo_apellido"),
+    )
+    data["nombre"] = nombre_calc or data.get("nombre") or data.get("razon_social") or ""
+    return data
+
+
 def crear_titular(
     db: Session, user: User, empresa_id: int, payload: ErpTitularCreate
 ) -> ErpTitular:
@@ -173,23 +187,12 @@ def crear_titular(
         raise ValueError(msg)
 
     now = _ahora_madrid_naive()
-    data = payload.model_dump()
-
-    nombre_calc = _componer_nombre(
-        data.get("tipo_persona"),
-        data.get("razon_social"),
-        data.get("nombre_de_pila"),
-        data.get("primer_apellido"),
-        data.get("segundo_apellido"),
-    )
-    data["nombre"] = nombre_calc or data.get("nombre") or data.get("razon_social") or ""
-
     titular = ErpTitular(
         tenant_id=user.tenant_id,
         empresa_id=empresa_id,
         created_at=now,
         updated_at=now,
-        **data,
+        **valores_alta_titular(payload),
     )
     db.add(titular)
     db.commit()
@@ -0,0 +1,234 @@
+# app/erp/services_busqueda.py
+# pyright: reportArgumentType=false, reportGeneralTypeIssues=false, reportAttributeAccessIssue=false
+"""
+Búsqueda ERP (typeahead) de titulares, suministros, contratos y equipos.
+
+Los listados de services.py / services_contrato.py filtran con
+`ilike('%texto%')` y devuelven todas las filas ordenadas por nombre: con
+100k titulares era un seq scan por pulsación. Aquí:
+
+  • El filtro sigue siendo ILIKE '%texto%' sobre las columnas clave, pero
+    en PostgreSQL lo resuelven los índices GIN `gin_trgm_ops` de pg_trgm
+    (migración erp_busqueda_trgm). Con menos de 3 caracteres pg_trgm no
+    extrae trigramas y el índice no sirve, así que se exige ese mínimo.
+  • Ranking: 3 si alguna columna coincide exacta, 2 si alguna empieza por
+    el texto, 1 si solo lo contiene. En PostgreSQL se desempata por
+    `similarity()` (la mayor de las columnas). Después etiqueta e id, para
+    que el orden sea estable entre páginas.
+  • Paginado por página con LIMIT n+1: no se cuenta el total (un COUNT
+    recorrería todas las coincidencias), solo si hay más.
+  • Se leen solo las columnas que se muestran, sin cargar el ORM.
+
+`buscar_entidad` pagina una entidad; `buscar` hace la búsqueda unificada de
+una empresa (top N de cada entidad, una consulta por entidad).
+"""
+from __future__ import annotations
+
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from sqlalchemy import case, func, literal, or_
+from sqlalchemy.orm import Session
+
+from app.core.permissions import assert_empresa_access
+from app.erp.models import ErpContrato, ErpEquipoMedida, ErpSuministro, ErpTitular
+from app.tenants.models import User
+
+
+LONGITUD_MINIMA = 3
+PAGE_SIZE_MAX = 50
+LIMITE_GLOBAL_MAX = 20
+
+
+@dataclass(frozen=True)
+class _Entidad:
+    modelo: type
+    campos: Tuple[str, ...]                 # columnas en las que se busca
+    columnas: Tuple[str, ...]               # columnas leídas para mostrar
+    etiqueta: Callable[[dict], str]
+    detalle: Callable[[dict], Optional[str]]
+
+
+def _unir(*partes: Optional[str]) -> Optional[str]:
+    texto = " · ".join(p for p in partes if p)
+    return texto or None
+
+
+ENTIDADES: Dict[str, _Entidad] = {
+    "titular": _Entidad(
+        modelo=ErpTitular,
+        campos=("nombre", "identificador", "codigo_interno"),
+        columnas=("nombre", "razon_social", "identificador", "codigo_interno"),
+        etiqueta=lambda r: r["nombre"] or r["razon_social"] or r["identificador"],
+        detalle=lambda r: _unir(r["identificador"], r["codigo_interno"]),
+    ),
+    "suministro": _Entidad(
+        modelo=ErpSuministro,
+        campos=("cups",),
+        columnas=("cups", "dir_municipio"),
+        etiqueta=lambda r: r["cups"],
+        detalle=lambda r: r["dir_municipio"],
+    ),
+    "contrato": _Entidad(
+        modelo=ErpContrato,
+        campos=("numero_contrato", "codigo_interno"),
+        columnas=("numero_contrato", "codigo_interno", "estado"),
+        etiqueta=lambda r: r["numero_contrato"],
+        detalle=lambda r: _unir(r["codigo_interno"], r["estado"]),
+    ),
+    "equipo": _Entidad(
+        modelo=ErpEquipoMedida,
+        campos=("numero_serie",),
+        columnas=("numero_serie", "fabricante", "modelo", "estado"),
+        etiqueta=lambda r: r["numero_serie"],
+        detalle=lambda r: _unir(r["fabricante"], r["modelo"], r["estado"]),
+    ),
+}
+
+
+@dataclass(frozen=True)
+class ResultadoBusqueda:
+    entidad: str
+    id: int
+    etiqueta: str
+    detalle: Optional[str]
+    score: float
+
+
+def normalizar_termino(q: Optional[str]) -> Optional[str]:
+    """Texto recortado, o None si es demasiado corto para buscar."""
+    texto = " ".join((q or "").split())
+    return texto if len(texto) >= LONGITUD_MINIMA else None
+
+
+def _escapar_like(texto: str) -> str:
+    return texto.replace("\\", "\\\\").replace("%", "\\%").replace("_", "\\_")
+
+
+def _consulta(
+    db: Session,
+    entidad: str,
+    *,
+    empresa_id: int,
+    termino: str,
+    solo_activos: bool,
+):
+    spec = ENTIDADES[entidad]
+    modelo = spec.modelo
+    campos = [getattr(modelo, c) for c in spec.campos]
+    texto = _escapar_like(termino)
+    bajo = termino.lower()
+    prefijo = f"{_escapar_like(bajo)}%"
+
+    rango = case(
+        (or_(*[func.lower(c) == bajo for c in campos]), 3),
+        (or_(*[func.lower(c).like(prefijo, escape="\\") for c in campos]), 2),
+        else_=1,
+    )
+    if db.get_bind().dialect.name == "postgresql":
+        similitud = func.greatest(*[func.coalesce(func.similarity(c, termino), 0) for c in campos])
+    else:
+        similitud = literal(0.0)
+
+    orden_etiqueta = getattr(modelo, spec.columnas[0])
+    q = (
+        db.query(
+            modelo.id,
+            *[getattr(modelo, c) for c in spec.columnas],
+            rango.label("rango"),
+            similitud.label("similitud"),
+        )
+        .filter(modelo.empresa_id == empresa_id)
+        .filter(or_(*[c.ilike(f"%{texto}%", escape="\\") for c in campos]))
+    )
+    if solo_activos:
+        q = q.filter(modelo.activo.is_(True))
+    return q.order_by(
+        rango.desc(), similitud.desc(), orden_etiqueta.asc(), modelo.id.asc()
+    )
+
+
+def _resultados(entidad: str, filas: Sequence) -> List[ResultadoBusqueda]:
+    spec = ENTIDADES[entidad]
+    out = []
+    for fila in filas:
+        r = fila._asdict()
+        out.append(ResultadoBusqueda(
+            entidad=entidad,
+            id=r["id"],
+            etiqueta=spec.etiqueta(r),
+            detalle=spec.detalle(r),
+            score=float(r["rango"]) + float(r["similitud"] or 0),
+        ))
+    return out
+
+
+def buscar_entidad(
+    db: Session,
+    user: User,
+    empresa_id: int,
+    entidad: str,
+    q: Optional[str],
+    *,
+    page: int = 1,
+    page_size: int = 20,
+    solo_activos: bool = False,
+) -> Tuple[List[ResultadoBusqueda], bool]:
+    """
+    Página `page` (1-based) de resultados de una entidad, ordenados por
+    relevancia. Devuelve (resultados, hay_mas). Lanza ValueError si la
+    entidad no existe.
+    """
+    if entidad not in ENTIDADES:
+        raise ValueError(f"Entidad de búsqueda desconocida: {entidad}")
+    assert_empresa_access(db, user, empresa_id)
+
+    termino = normalizar_termino(q)
+    if termino is None:
+        return [], False
+
+    page = max(1, page)
+    page_size = max(1, min(page_size, PAGE_SIZE_MAX))
+    filas = (
+        _consulta(db, entidad, empresa_id=empresa_id, termino=termino, solo_activos=solo_activos)
+        .offset((page - 1) * page_size)
+        .limit(page_size + 1)
+        .all()
+    )
+    return _resultados(entidad, filas[:page_size]), len(filas) > page_size
+
+
+def buscar(
+    db: Session,
+    user: User,
+    empresa_id: int,
+    q: Optional[str],
+    *,
+    entidades: Optional[Sequence[str]] = None,
+    limite: int = 5,
+    solo_activos: bool = False,
+) -> Dict[str, Tuple[List[ResultadoBusqueda], bool]]:
+    """
+    Búsqueda unificada de una empresa: los `limite` mejores de cada entidad
+    pedida (todas por defecto), en el orden de ENTIDADES.
+    """
+    pedidas = [e for e in ENTIDADES if entidades is None or e in entidades]
+    desconocidas = set(entidades or ()) - set(ENTIDADES)
+    if desconocidas:
+        raise ValueError(f"Entidad de búsqueda desconocida: {', '.join(sorted(desconocidas))}")
+    assert_empresa_access(db, user, empresa_id)
+
+    termino = normalizar_termino(q)
+    if termino is None:
+        return {e: ([], False) for e in pedidas}
+
+    limite = max(1, min(limite, LIMITE_GLOBAL_MAX))
+    out: Dict[str, Tuple[List[ResultadoBusqueda], bool]] = {}
+    for entidad in pedidas:
+        filas = (
+            _consulta(db, entidad, empresa_id=empresa_id, termino=termino, solo_activos=solo_activos)
+            .limit(limite + 1)
+            .all()
+        )
+        out[entidad] = (_resultados(entidad, filas[:limite]), len(filas) > limite)
+    return out
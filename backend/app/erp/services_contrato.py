@@ -12,7 +12,8 @@ Reglas de negocio:
      a la empresa; tarifa/comercializadora deben existir (catálogo global).
 
 El `Out` se construye con campos derivados de display (titular_nombre, cups,
-tarifa_codigo, comercializadora_nombre) vía join.
+tarifa_codigo, comercializadora_nombre) desde las relaciones del contrato;
+los listados las cargan con opciones_lectura() (consultas fijas, no por fila).
 """
 from __future__ import annotations
 
@@ -20,17 +21,17 @@ from datetime import datetime
 from typing import Optional
 from zoneinfo import ZoneInfo
 
-from sqlalchemy import or_
-from sqlalchemy.orm import Session
+from sqlalchemy import insert, or_
+from sqlalchemy.orm import Session, joinedload, selectinload
 
 from app.core.permissions import assert_empresa_access
 from app.erp.models import (
     ErpContrato, ErpContratoPotencia, ErpContratoVersion,
-    ErpTitular, ErpSuministro, ErpTarifa, ErpTarifaPeriodo, ErpComercializadora,
+    ErpTitular, ErpSuministro, ErpTarifa, ErpTarifaPeriodo,
     ErpComercializadoraEmpresa,
 )
 from app.erp.schemas import (
-    ErpContratoCreate, ErpContratoUpdate, ErpContratoOut, ErpContratoPotenciaOut,
+    ErpContratoCreate, ErpContratoUpdate, ErpContratoOut,
     ErpContratoVersionListItem, ErpContratoVersionOut,
 )
 from app.erp.normativa_atr import tipo_punto_medida_rpum
@@ -60,8 +61,10 @@ class ContratoSuministroActivoError(ValueError):
 # ============================================================
 # Helpers
 # ============================================================
-def _cargar_contrato_con_acceso(db: Session, user: User, contrato_id: int) -> ErpContrato:
-    c = db.query(ErpContrato).filter(ErpContrato.id == contrato_id).first()
+def _cargar_contrato_con_acceso(
+    db: Session, user: User, contrato_id: int, opciones: tuple = ()
+) -> ErpContrato:
+    c = db.query(ErpContrato).options(*opciones).filter(ErpContrato.id == contrato_id).first()
     if c is None:
         raise ValueError(f"Contrato {contrato_id} no encontrado")
     assert_empresa_access(db, user, c.empresa_id)
@@ -95,16 +98,19 @@ def _validar_fks(
             )
 
 
-def _validar_periodos_tarifa(db: Session, tarifa_id: int, potencias: list[dict]) -> None:
-    if not potencias:
-        return
-    permitidos = {
+def periodos_potencia(db: Session, tarifa_id: int) -> set[str]:
+    """Periodos de potencia (P1..P6) que admite la tarifa."""
+    return {
         p.periodo
         for p in db.query(ErpTarifaPeriodo).filter(
             ErpTarifaPeriodo.tarifa_id == tarifa_id,
             ErpTarifaPeriodo.tipo == "potencia",
         ).all()
     }
+
+
+def comprobar_periodos_tarifa(permitidos: set[str], potencias: list[dict]) -> None:
+    """Sin BD: cada periodo una vez y dentro de los `permitidos` de la tarifa."""
     vistos: set[str] = set()
     for p in potencias:
         per = p["periodo"]
@@ -118,7 +124,13 @@ def _validar_periodos_tarifa(db: Session, tarifa_id: int, potencias: list[dict])
             )
 
 
-def _validar_potencias_crecientes(potencias: list[dict]) -> None:
+def _validar_periodos_tarifa(db: Session, tarifa_id: int, potencias: list[dict]) -> None:
+    if not potencias:
+        return
+    comprobar_periodos_tarifa(periodos_potencia(db, tarifa_id), potencias)
+
+
+def validar_potencias_crecientes(potencias: list[dict]) -> None:
     """Regla CNMC Circular 3/2020 (BOE-A-2020-1066): Pn+1 >= Pn.
 
     La potencia contratada en un periodo debe ser >= a la del periodo anterior
@@ -140,19 +152,12 @@ def _validar_potencias_crecientes(potencias: list[dict]) -> None:
         anterior_per = p["periodo"]
 
 
-def _validar_potencias_completas(db: Session, tarifa_id: int, potencias: list[dict]) -> None:
+def comprobar_potencias_completas(requeridos: set[str], potencias: list[dict]) -> None:
     """Contrato activo: deben estar TODOS los periodos de potencia de la tarifa.
 
     La potencia contratada se define para cada periodo de la tarifa
     (CNMC Circular 3/2020); un contrato activo no puede dejar periodos sin potencia.
     """
-    requeridos = {
-        p.periodo
-        for p in db.query(ErpTarifaPeriodo).filter(
-            ErpTarifaPeriodo.tarifa_id == tarifa_id,
-            ErpTarifaPeriodo.tipo == "potencia",
-        ).all()
-    }
     presentes = {p["periodo"] for p in potencias}
     faltan = requeridos - presentes
     if faltan:
@@ -163,6 +168,10 @@ def _validar_potencias_completas(db: Session, tarifa_id: int, potencias: list[di
         )
 
 
+def _validar_potencias_completas(db: Session, tarifa_id: int, potencias: list[dict]) -> None:
+    comprobar_potencias_completas(periodos_potencia(db, tarifa_id), potencias)
+
+
 def _validar_suministro_unico_activo(
     db: Session, empresa_id: int, suministro_id: int, exclude_id: Optional[int] = None
 ) -> None:
@@ -179,31 +188,44 @@ def _validar_suministro_unico_activo(
         )
 
 
-def _contrato_out(db: Session, c: ErpContrato) -> ErpContratoOut:
-    out = ErpContratoOut.model_validate(c)
-    potencias = (
-        db.query(ErpContratoPotencia)
-        .filter(ErpContratoPotencia.contrato_id == c.id)
-        .order_by(ErpContratoPotencia.periodo)
-        .all()
+_RELACIONES_LECTURA = ("titular", "suministro", "tarifa", "comercializadora_empresa", "potencias")
+
+
+def opciones_lectura() -> tuple:
+    """Opciones de carga del modelo de lectura del contrato.
+
+    Titular, suministro, tarifa y comercializadora (vía la relación con la
+    empresa) van en el mismo SELECT (joins N:1); las potencias en un único
+    SELECT ... IN adicional. Listar N contratos cuesta 2 consultas, no 6·N.
+    """
+    return (
+        joinedload(ErpContrato.titular),
+        joinedload(ErpContrato.suministro),
+        joinedload(ErpContrato.tarifa),
+        joinedload(ErpContrato.comercializadora_empresa)
+        .joinedload(ErpComercializadoraEmpresa.comercializadora),
+        selectinload(ErpContrato.potencias),
     )
-    out.potencias = [ErpContratoPotenciaOut.model_validate(p) for p in potencias]
-
-    titular = db.query(ErpTitular).filter(ErpTitular.id == c.titular_id).first()
-    out.titular_nombre = titular.nombre if titular else None
-    suministro = db.query(ErpSuministro).filter(ErpSuministro.id == c.suministro_id).first()
-    out.cups = suministro.cups if suministro else None
-    tarifa = db.query(ErpTarifa).filter(ErpTarifa.id == c.tarifa_id).first()
-    out.tarifa_codigo = tarifa.codigo if tarifa else None
-    if c.comercializadora_empresa_id:
-        rel = db.query(ErpComercializadoraEmpresa).filter(
-            ErpComercializadoraEmpresa.id == c.comercializadora_empresa_id
-        ).first()
-        if rel is not None:
-            com = db.query(ErpComercializadora).filter(
-                ErpComercializadora.id == rel.comercializadora_id
-            ).first()
-            out.comercializadora_nombre = com.nombre if com else None
+
+
+def _display(c: ErpContrato) -> dict:
+    """Valores de display de los FK, leídos de las relaciones del contrato."""
+    rel = c.comercializadora_empresa
+    com = rel.comercializadora if rel is not None else None
+    return {
+        "titular_nombre": c.titular.nombre if c.titular else None,
+        "cups": c.suministro.cups if c.suministro else None,
+        "tarifa_codigo": c.tarifa.codigo if c.tarifa else None,
+        "comercializadora_nombre": com.nombre if com else None,
+    }
+
+
+def _contrato_out(c: ErpContrato) -> ErpContratoOut:
+    """Out con los campos de display. Sin consultas si `c` se cargó con
+    opciones_lectura(); si no, cada relación se carga al primer acceso."""
+    out = ErpContratoOut.model_validate(c)
+    for campo, valor in _display(c).items():
+        setattr(out, campo, valor)
     return out
 
 
@@ -236,44 +258,32 @@ _CAMPOS_DIFF: list[tuple[str, str]] = [
 ]
 
 
-def _componer_snapshot(db: Session, c: ErpContrato) -> dict:
-    """Foto del contrato para guardar en erp_contrato_version.snapshot (JSON).
+def snapshot_contrato(
+    c, *,
+    titular_nombre: Optional[str],
+    cups: Optional[str],
+    tarifa_codigo: Optional[str],
+    comercializadora_nombre: Optional[str],
+    potencias: dict,
+) -> dict:
+    """Foto (JSON) de `c` con los valores de display ya resueltos.
 
-    Guarda id + nombre de display de los FK (para ser fiel aunque luego se
-    renombre el catálogo) y las potencias por periodo.
+    `c` es un ErpContrato o cualquier objeto con sus atributos (el importer
+    por lotes la compone sin tener el contrato cargado en la sesión).
     """
-    titular = db.query(ErpTitular).filter(ErpTitular.id == c.titular_id).first()
-    suministro = db.query(ErpSuministro).filter(ErpSuministro.id == c.suministro_id).first()
-    tarifa = db.query(ErpTarifa).filter(ErpTarifa.id == c.tarifa_id).first()
-    com = None
-    if c.comercializadora_empresa_id:
-        rel = db.query(ErpComercializadoraEmpresa).filter(
-            ErpComercializadoraEmpresa.id == c.comercializadora_empresa_id
-        ).first()
-        if rel is not None:
-            com = db.query(ErpComercializadora).filter(
-                ErpComercializadora.id == rel.comercializadora_id
-            ).first()
-    potencias = {
-        p.periodo: (float(p.potencia_kw) if p.potencia_kw is not None else None)
-        for p in db.query(ErpContratoPotencia)
-        .filter(ErpContratoPotencia.contrato_id == c.id)
-        .order_by(ErpContratoPotencia.periodo)
-        .all()
-    }
     return {
         "numero_contrato": c.numero_contrato,
         "tipo_contrato_atr": c.tipo_contrato_atr,
         "estado": c.estado,
         "titular_id": c.titular_id,
-        "titular_nombre": titular.nombre if titular else None,
+        "titular_nombre": titular_nombre,
         "suministro_id": c.suministro_id,
-        "cups": suministro.cups if suministro else None,
+        "cups": cups,
         "comercializadora_empresa_id": c.comercializadora_empresa_id,
-        "comercializadora_nombre": com.nombre if com else None,
+        "comercializadora_nombre": comercializadora_nombre,
         "cnae": c.cnae,
         "tarifa_id": c.tarifa_id,
-        "tarifa_codigo": tarifa.codigo if tarifa else None,
+        "tarifa_codigo": tarifa_codigo,
         "modo_control_potencia": c.modo_control_potencia,
         "tension_v": c.tension_v,
         "tension_normalizada": c.tension_normalizada,
@@ -290,6 +300,42 @@ def _componer_snapshot(db: Session, c: ErpContrato) -> dict:
     }
 
 
+def _componer_snapshot(c: ErpContrato) -> dict:
+    """Foto del contrato para guardar en erp_contrato_version.snapshot (JSON).
+
+    Guarda id + nombre de display de los FK (para ser fiel aunque luego se
+    renombre el catálogo) y las potencias por periodo.
+    """
+    potencias = {
+        p.periodo: (float(p.potencia_kw) if p.potencia_kw is not None else None)
+        for p in c.potencias
+    }
+    return snapshot_contrato(c, potencias=potencias, **_display(c))
+
+
+# Tamaño de cada IN (...) al cargar contratos por lotes.
+TAM_LOTE_LECTURA = 1000
+
+
+def cargar_contratos_lectura(db: Session, contrato_ids) -> list[ErpContrato]:
+    """Contratos `contrato_ids` con opciones_lectura(), en el orden pedido.
+
+    Dos consultas por cada TAM_LOTE_LECTURA ids, sea cual sea N.
+    """
+    ids = list(dict.fromkeys(contrato_ids))
+    por_id: dict[int, ErpContrato] = {}
+    for i in range(0, len(ids), TAM_LOTE_LECTURA):
+        lote = ids[i:i + TAM_LOTE_LECTURA]
+        for c in db.query(ErpContrato).options(*opciones_lectura()).filter(ErpContrato.id.in_(lote)):
+            por_id[c.id] = c
+    return [por_id[i] for i in ids if i in por_id]
+
+
+def componer_snapshots(db: Session, contrato_ids) -> dict[int, dict]:
+    """Fotos de varios contratos ({contrato_id: snapshot}) con consultas fijas."""
+    return {c.id: _componer_snapshot(c) for c in cargar_contratos_lectura(db, contrato_ids)}
+
+
 def _calcular_diff(antes: Optional[dict], despues: dict) -> list[dict]:
     """Diff [{campo, etiqueta, antes, despues}] entre dos snapshots."""
     antes = antes or {}
@@ -354,7 +400,11 @@ def listar_contratos(
     suministro_id: Optional[int] = None, solo_activos: bool = False,
 ) -> list[ErpContratoOut]:
     assert_empresa_access(db, user, empresa_id)
-    q = db.query(ErpContrato).filter(ErpContrato.empresa_id == empresa_id)
+    q = (
+        db.query(ErpContrato)
+        .options(*opciones_lectura())
+        .filter(ErpContrato.empresa_id == empresa_id)
+    )
     if solo_activos:
         q = q.filter(ErpContrato.activo.is_(True))
     if estado:
@@ -370,12 +420,12 @@ def listar_contratos(
             )
         )
     contratos = q.order_by(ErpContrato.numero_contrato).all()
-    return [_contrato_out(db, c) for c in contratos]
+    return [_contrato_out(c) for c in contratos]
 
 
 def obtener_contrato(db: Session, user: User, contrato_id: int) -> ErpContratoOut:
-    c = _cargar_contrato_con_acceso(db, user, contrato_id)
-    return _contrato_out(db, c)
+    c = _cargar_contrato_con_acceso(db, user, contrato_id, opciones_lectura())
+    return _contrato_out(c)
 
 
 def crear_contrato(
@@ -405,7 +455,7 @@ def crear_contrato(
         data["tarifa_id"], data.get("comercializadora_empresa_id"),
     )
     _validar_periodos_tarifa(db, data["tarifa_id"], potencias)
-    _validar_potencias_crecientes(potencias)
+    validar_potencias_crecientes(potencias)
     if data.get("estado", "activo") == "activo":
         _validar_potencias_completas(db, data["tarifa_id"], potencias)
         _validar_suministro_unico_activo(db, empresa_id, data["suministro_id"])
@@ -436,21 +486,21 @@ def crear_contrato(
         contrato_id=c.id, suministro_id=c.suministro_id,
         version=1, tipo_atr="A3", motivo=None, referencia=None,
         fecha_alta=ahora.date(), fecha_baja=None, fecha_modificacion=ahora.date(),
-        snapshot=_componer_snapshot(db, c), cambios=None,
+        snapshot=_componer_snapshot(c), cambios=None,
         created_at=ahora, updated_at=ahora,
     ))
 
     db.commit()
     db.refresh(c)
-    return _contrato_out(db, c)
+    return _contrato_out(c)
 
 
 def actualizar_contrato(
     db: Session, user: User, contrato_id: int, payload: ErpContratoUpdate,
     versionar: bool = True,
 ) -> ErpContratoOut:
-    c = _cargar_contrato_con_acceso(db, user, contrato_id)
-    snap_antes = _componer_snapshot(db, c)   # foto ANTES de tocar nada (para el diff)
+    c = _cargar_contrato_con_acceso(db, user, contrato_id, opciones_lectura())
+    snap_antes = _componer_snapshot(c)   # foto ANTES de tocar nada (para el diff)
     data = payload.model_dump(exclude_unset=True)
     potencias = data.pop("potencias", None)  # None = no tocar; lista = reemplazar
 
@@ -482,21 +532,19 @@ def actualizar_contrato(
     if eff_estado == "activo":
         _validar_suministro_unico_activo(db, c.empresa_id, eff_suministro, exclude_id=c.id)
         pots_efectivas = potencias if potencias is not None else [
-            {"periodo": p.periodo, "potencia_kw": p.potencia_kw}
-            for p in db.query(ErpContratoPotencia).filter(ErpContratoPotencia.contrato_id == c.id).all()
+            {"periodo": p.periodo, "potencia_kw": p.potencia_kw} for p in c.potencias
         ]
         _validar_potencias_completas(db, eff_tarifa, pots_efectivas)
     if potencias is not None:
         _validar_periodos_tarifa(db, eff_tarifa, potencias)
-        _validar_potencias_crecientes(potencias)
+        validar_potencias_crecientes(potencias)
 
     # tipo_punto_medida automatico (RPUM): recalcular desde la potencia maxima efectiva
     if potencias is not None:
         pots_para_tipo = potencias
     else:
         pots_para_tipo = [
-            {"periodo": p.periodo, "potencia_kw": p.potencia_kw}
-            for p in db.query(ErpContratoPotencia).filter(ErpContratoPotencia.contrato_id == c.id).all()
+            {"periodo": p.periodo, "potencia_kw": p.potencia_kw} for p in c.potencias
         ]
     p_max = max((p["potencia_kw"] for p in pots_para_tipo), default=None)
     data["tipo_punto_medida"] = tipo_punto_medida_rpum(p_max)
@@ -518,7 +566,9 @@ def actualizar_contrato(
     # Histórico: si hubo cambios reales, se cierra la versión activa y se crea vN+1 (M1).
     # En corrección de migración (versionar=False) NO se versiona: es corrección de carga.
     db.flush()  # potencias nuevas consultables para la foto
-    snap_despues = _componer_snapshot(db, c)
+    # Las relaciones (viewonly) siguen con lo cargado antes del cambio.
+    db.expire(c, list(_RELACIONES_LECTURA))
+    snap_despues = _componer_snapshot(c)
     diff = _calcular_diff(snap_antes, snap_despues)
     if versionar and diff:
         ahora_v = _ahora_madrid_naive()
@@ -555,7 +605,7 @@ def actualizar_contrato(
 
     db.commit()
     db.refresh(c)
-    return _contrato_out(db, c)
+    return _contrato_out(c)
 
 
 def desactivar_contrato(db: Session, user: User, contrato_id: int) -> ErpContratoOut:
@@ -566,7 +616,42 @@ def desactivar_contrato(db: Session, user: User, contrato_id: int) -> ErpContrat
     c.updated_at = _ahora_madrid_naive()
     db.commit()
     db.refresh(c)
-    return _contrato_out(db, c)
+    return _contrato_out(c)
+
+
+def sembrar_versiones(db: Session, user: User, empresa_id: int) -> int:
+    """v1 (alta A3) con la foto actual para los contratos de la empresa que
+    aún no tienen histórico (p. ej. dados de alta antes de existir). Por
+    lotes: consultas e INSERT fijos por cada TAM_LOTE_LECTURA contratos.
+    Devuelve cuántas versiones se han creado.
+    """
+    assert_empresa_access(db, user, empresa_id)
+    sin_historico = [
+        cid for (cid,) in db.query(ErpContrato.id)
+        .filter(
+            ErpContrato.empresa_id == empresa_id,
+            ~db.query(ErpContratoVersion.id)
+            .filter(ErpContratoVersion.contrato_id == ErpContrato.id)
+            .exists(),
+        )
+        .order_by(ErpContrato.id)
+    ]
+    ahora = _ahora_madrid_naive()
+    for i in range(0, len(sin_historico), TAM_LOTE_LECTURA):
+        contratos = cargar_contratos_lectura(db, sin_historico[i:i + TAM_LOTE_LECTURA])
+        db.execute(insert(ErpContratoVersion), [
+            dict(
+                tenant_id=c.tenant_id, empresa_id=c.empresa_id,
+                contrato_id=c.id, suministro_id=c.suministro_id,
+                version=1, tipo_atr="A3", motivo=None, referencia=None,
+                fecha_alta=c.fecha_alta, fecha_baja=None, fecha_modificacion=ahora.date(),
+                snapshot=_componer_snapshot(c), cambios=None,
+                created_at=ahora, updated_at=ahora,
+            )
+            for c in contratos
+        ])
+    db.commit()
+    return len(sin_historico)
 
 
 # ============================================================
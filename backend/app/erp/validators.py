@@ -147,31 +147,71 @@ def validar_formatos_suministro(dir_cp, municipio_codigo_ine, ref_catastral) ->
     return True, ""
 
 
+def _modelos_catalogo_direccion() -> dict:
+    """{campo: (modelo, etiqueta)} de los códigos de dirección con catálogo CNMC."""
+    from app.erp.models import (
+        ErpCnmcTipoVia, ErpCnmcPiso, ErpCnmcPuerta, ErpCnmcAclaradorFinca,
+    )
+    return {
+        "dir_tipo_via": (ErpCnmcTipoVia, "tipo de via"),
+        "dir_piso": (ErpCnmcPiso, "piso"),
+        "dir_puerta": (ErpCnmcPuerta, "puerta"),
+        "dir_tipo_aclarador": (ErpCnmcAclaradorFinca, "tipo de aclarador"),
+    }
+
+
+def _error_codigo_cnmc(etiqueta: str, cod: str, activo) -> str | None:
+    """Mensaje de rechazo de un código (activo=None si no existe), o None si vale."""
+    if activo is None:
+        return f"El codigo de {etiqueta} '{cod}' no existe en el catalogo CNMC"
+    if not activo:
+        return f"El codigo de {etiqueta} '{cod}' esta dado de baja en el catalogo CNMC"
+    return None
+
+
 def validar_codigos_cnmc(db, dir_tipo_via=None, dir_piso=None, dir_puerta=None, dir_tipo_aclarador=None) -> tuple[bool, str]:
     """Valida que los codigos de direccion existan y esten activos en su catalogo CNMC.
 
     Bloqueante: solo comprueba los campos que traen valor. Devuelve (False, msg) al primer fallo.
     Import local de los modelos para evitar import circular (validators -> models).
     """
-    from app.erp.models import (
-        ErpCnmcTipoVia, ErpCnmcPiso, ErpCnmcPuerta, ErpCnmcAclaradorFinca,
-    )
+    valores = {
+        "dir_tipo_via": dir_tipo_via, "dir_piso": dir_piso,
+        "dir_puerta": dir_puerta, "dir_tipo_aclarador": dir_tipo_aclarador,
+    }
+    for campo, (modelo, etiqueta) in _modelos_catalogo_direccion().items():
+        cod = (valores[campo] or "").strip()
+        if not cod:
+            continue
+        fila = db.query(modelo).filter(modelo.codigo == cod).first()
+        msg = _error_codigo_cnmc(etiqueta, cod, None if fila is None else fila.activo)
+        if msg:
+            return False, msg
+    return True, ""
+
 
-    comprobaciones = [
-        (dir_tipo_via, ErpCnmcTipoVia, "tipo de via"),
-        (dir_piso, ErpCnmcPiso, "piso"),
-        (dir_puerta, ErpCnmcPuerta, "puerta"),
-        (dir_tipo_aclarador, ErpCnmcAclaradorFinca, "tipo de aclarador"),
-    ]
-    for valor, modelo, etiqueta in comprobaciones:
+def cargar_catalogos_cnmc(db, campos=("dir_tipo_via", "dir_tipo_aclarador")) -> dict:
+    """{campo: {codigo: activo}} de los catálogos de dirección pedidos (una consulta cada uno).
+
+    Para validar muchas filas seguidas (importer de migración) sin ir a BD por fila.
+    """
+    modelos = _modelos_catalogo_direccion()
+    return {
+        campo: {cod: bool(activo) for cod, activo in db.query(modelos[campo][0].codigo, modelos[campo][0].activo)}
+        for campo in campos
+    }
+
+
+def validar_codigos_cnmc_catalogos(catalogos: dict, **codigos) -> tuple[bool, str]:
+    """Como `validar_codigos_cnmc` pero contra `cargar_catalogos_cnmc`, sin BD."""
+    etiquetas = {campo: etiqueta for campo, (_, etiqueta) in _modelos_catalogo_direccion().items()}
+    for campo, valor in codigos.items():
         cod = (valor or "").strip()
         if not cod:
             continue
-        fila = db.query(modelo).filter(modelo.codigo == cod).first()
-        if fila is None:
-            return False, f"El codigo de {etiqueta} '{cod}' no existe en el catalogo CNMC"
-        if not fila.activo:
-            return False, f"El codigo de {etiqueta} '{cod}' esta dado de baja en el catalogo CNMC"
+        msg = _error_codigo_cnmc(etiquetas[campo], cod, catalogos[campo].get(cod))
+        if msg:
+            return False, msg
     return True, ""
 
 
@@ -6,8 +6,24 @@ from __future__ import annotations
 from typing import Any, cast
 
 from fastapi import HTTPException, status
+from sqlalchemy import (
+    Column,
+    Integer,
+    MetaData,
+    Table,
+    and_,
+    delete,
+    func,
+    insert,
+    or_,
+    select,
+    text,
+    true,
+    union,
+)
 from sqlalchemy.orm import Query, Session
 
+from app.core.response_cache import bump_data_version
 from app.empresas.models import Empresa
 from app.ingestion.models import IngestionFile
 from app.measures.bald_contrib_models import BaldPeriodContribution
@@ -186,571 +202,313 @@ def period_sort_key(item: tuple[int, int, int, int]) -> tuple[int, int, int, int
 
 
 # ---------------------------------------------------------------------------
-# Ítem 2 — función genérica para construir candidatos a borrar
+# Motor de borrado por conjuntos
 # ---------------------------------------------------------------------------
+# Borrar un año de ficheros PS cargaba en Python cada fila M1/General/BALD/
+# PSPeriodDetail/PSPeriodContribution afectada solo para contarla y restar
+# sus ids. Ahora los ids de los ficheros y los periodos afectados se vuelcan
+# a dos tablas temporales (por conexión) y el resto son agregados, NOT EXISTS
+# y DELETE ... USING contra ellas: el nº de consultas no depende del volumen.
 
-def _build_delete_candidates(
-    db: Session,
-    model: Any,
-    *,
-    ingestion_file_ids: list[int],
-    tenant_id: int | None = None,
-    empresa_id: int | None = None,
-    anio: int | None = None,
-    mes: int | None = None,
-) -> dict[int, Any]:
-    result: dict[int, Any] = {}
-
-    if ingestion_file_ids:
-        rows = (
-            db.query(model)
-            .filter(model.ingestion_file_id.in_(ingestion_file_ids))
-            .all()
-        )
-        for row in rows:
-            result[cast(int, row.id)] = row
+GENERAL_CONTRIB_MODELS: tuple[Any, ...] = (
+    M1PeriodContribution,
+    GeneralPeriodContribution,
+    BaldPeriodContribution,
+)
+PS_CONTRIB_MODELS: tuple[Any, ...] = (PSPeriodDetail, PSPeriodContribution)
 
-    rows_target = target_contribution_filters(
-        db.query(model),
-        model,
-        tenant_id=tenant_id,
-        empresa_id=empresa_id,
-        anio=anio,
-        mes=mes,
-    ).all()
-    for row in rows_target:
-        result[cast(int, row.id)] = row
+_tmp_metadata = MetaData()
 
-    return result
+_TMP_FILE_IDS = Table(
+    "tmp_delete_ingestion_ids",
+    _tmp_metadata,
+    Column("id", Integer, primary_key=True, autoincrement=False),
+    prefixes=["TEMPORARY"],
+)
 
+_TMP_PERIODS = Table(
+    "tmp_delete_periods",
+    _tmp_metadata,
+    Column("tenant_id", Integer, nullable=False),
+    Column("empresa_id", Integer, nullable=False),
+    Column("anio", Integer, nullable=False),
+    Column("mes", Integer, nullable=False),
+    prefixes=["TEMPORARY"],
+)
 
-def build_m1_delete_candidates(
-    db: Session,
-    *,
-    ingestion_file_ids: list[int],
-    tenant_id: int | None = None,
-    empresa_id: int | None = None,
-    anio: int | None = None,
-    mes: int | None = None,
-) -> dict[int, M1PeriodContribution]:
-    return cast(
-        dict[int, M1PeriodContribution],
-        _build_delete_candidates(
-            db,
-            M1PeriodContribution,
-            ingestion_file_ids=ingestion_file_ids,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        ),
-    )
 
+def _reset_tmp_tables(db: Session) -> None:
+    # Un fallo a mitad deja las tablas en la conexión (SQLite no deshace el
+    # DDL): se recrean siempre vacías al empezar.
+    conn = db.connection()
+    for table in (_TMP_FILE_IDS, _TMP_PERIODS):
+        table.drop(conn, checkfirst=True)
+        table.create(conn)
 
-def build_general_delete_candidates(
-    db: Session,
-    *,
-    ingestion_file_ids: list[int],
-    tenant_id: int | None = None,
-    empresa_id: int | None = None,
-    anio: int | None = None,
-    mes: int | None = None,
-) -> dict[int, GeneralPeriodContribution]:
-    return cast(
-        dict[int, GeneralPeriodContribution],
-        _build_delete_candidates(
-            db,
-            GeneralPeriodContribution,
-            ingestion_file_ids=ingestion_file_ids,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        ),
-    )
 
+def _drop_tmp_tables(db: Session) -> None:
+    conn = db.connection()
+    for table in (_TMP_PERIODS, _TMP_FILE_IDS):
+        table.drop(conn, checkfirst=True)
 
-def build_bald_delete_candidates(
-    db: Session,
-    *,
-    ingestion_file_ids: list[int],
-    tenant_id: int | None = None,
-    empresa_id: int | None = None,
-    anio: int | None = None,
-    mes: int | None = None,
-) -> dict[int, BaldPeriodContribution]:
-    return cast(
-        dict[int, BaldPeriodContribution],
-        _build_delete_candidates(
-            db,
-            BaldPeriodContribution,
-            ingestion_file_ids=ingestion_file_ids,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        ),
-    )
 
+def _uses_delete_using(db: Session) -> bool:
+    return db.get_bind().dialect.name == "postgresql"
 
-def build_ps_detail_delete_candidates(
-    db: Session,
-    *,
-    ingestion_file_ids: list[int],
-    tenant_id: int | None = None,
-    empresa_id: int | None = None,
-    anio: int | None = None,
-    mes: int | None = None,
-) -> dict[int, PSPeriodDetail]:
-    return cast(
-        dict[int, PSPeriodDetail],
-        _build_delete_candidates(
-            db,
-            PSPeriodDetail,
-            ingestion_file_ids=ingestion_file_ids,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        ),
-    )
 
+def _analyze_tmp_table(db: Session, table: Table) -> None:
+    # autovacuum no analiza tablas temporales: sin esto el planner de
+    # PostgreSQL supone un tamaño por defecto al elegir entre hash y nested loop.
+    if _uses_delete_using(db):
+        db.execute(text(f"ANALYZE {table.name}"))
 
-def build_ps_contrib_delete_candidates(
-    db: Session,
-    *,
-    ingestion_file_ids: list[int],
-    tenant_id: int | None = None,
-    empresa_id: int | None = None,
-    anio: int | None = None,
-    mes: int | None = None,
-) -> dict[int, PSPeriodContribution]:
-    return cast(
-        dict[int, PSPeriodContribution],
-        _build_delete_candidates(
-            db,
-            PSPeriodContribution,
-            ingestion_file_ids=ingestion_file_ids,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        ),
+
+def _in_tmp_file_ids(column: Any) -> Any:
+    return column.in_(select(_TMP_FILE_IDS.c.id))
+
+
+def _delete_by_tmp_file_ids(db: Session, model: Any, column: Any) -> int:
+    """DELETE de las filas de `model` cuyo `column` está en la tabla de ids.
+
+    En PostgreSQL la condición de join hace que SQLAlchemy emita
+    `DELETE ... USING`; SQLite no admite DELETE multitabla y usa IN.
+    """
+    if _uses_delete_using(db):
+        condition = column == _TMP_FILE_IDS.c.id
+    else:
+        condition = _in_tmp_file_ids(column)
+    result = db.execute(
+        delete(model).where(condition).execution_options(synchronize_session=False)
     )
+    return int(result.rowcount or 0)
 
 
-# ---------------------------------------------------------------------------
-# Ítem 3 — función genérica para recoger periodos afectados
-# ---------------------------------------------------------------------------
+def _period_match(model: Any) -> list[Any]:
+    return [
+        model.tenant_id == _TMP_PERIODS.c.tenant_id,
+        model.empresa_id == _TMP_PERIODS.c.empresa_id,
+        model.anio == _TMP_PERIODS.c.anio,
+        model.mes == _TMP_PERIODS.c.mes,
+    ]
 
-def _collect_periods_from_model(
-    db: Session,
+
+def _target_clause(
     model: Any,
     *,
-    file_id_field: str,
-    ingestion_file_ids: list[int],
     tenant_id: int | None,
     empresa_id: int | None,
     anio: int | None,
     mes: int | None,
-    result: set[tuple[int, int, int, int]],
-) -> None:
-    """Añade al set `result` los periodos (t_id, e_id, anio, mes) del modelo dado.
+) -> Any:
+    conditions = []
+    if tenant_id is not None:
+        conditions.append(model.tenant_id == tenant_id)
+    if empresa_id is not None:
+        conditions.append(model.empresa_id == empresa_id)
+    if anio is not None:
+        conditions.append(model.anio == anio)
+    if mes is not None:
+        conditions.append(model.mes == mes)
+    return and_(true(), *conditions)
 
-    Recoge dos fuentes:
-    - Filas vinculadas a `ingestion_file_ids` via `file_id_field`.
-    - Filas que coincidan con los filtros tenant/empresa/anio/mes.
-    """
-    file_col = getattr(model, file_id_field)
-
-    if ingestion_file_ids:
-        rows = (
-            db.query(
-                model.tenant_id,
-                model.empresa_id,
-                model.anio,
-                model.mes,
-            )
-            .filter(file_col.in_(ingestion_file_ids))
-            .distinct()
-            .all()
-        )
-        for t_id, e_id, a, m in rows:
-            result.add((int(t_id), int(e_id), int(a), int(m)))
 
-    rows_target = target_contribution_filters(
-        db.query(
-            model.tenant_id,
-            model.empresa_id,
-            model.anio,
-            model.mes,
-        ).distinct(),
-        model,
-        tenant_id=tenant_id,
-        empresa_id=empresa_id,
-        anio=anio,
-        mes=mes,
-    ).all()
-    for t_id, e_id, a, m in rows_target:
-        result.add((int(t_id), int(e_id), int(a), int(m)))
+def _delete_set_clause(model: Any, file_column: Any, **filters: Any) -> Any:
+    """Filas que borra el filtro: las de los ficheros o las del objetivo."""
+    return or_(_in_tmp_file_ids(file_column), _target_clause(model, **filters))
 
 
-def collect_general_affected_periods(
+def _ingestion_files_query(
     db: Session,
     *,
-    ingestion_file_ids: list[int],
-    tenant_id: int | None = None,
-    empresa_id: int | None = None,
-    anio: int | None = None,
-    mes: int | None = None,
-) -> set[tuple[int, int, int, int]]:
-    result: set[tuple[int, int, int, int]] = set()
-
-    _collect_periods_from_model(
-        db, M1PeriodContribution,
-        file_id_field="ingestion_file_id",
-        ingestion_file_ids=ingestion_file_ids,
-        tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes,
-        result=result,
-    )
-    _collect_periods_from_model(
-        db, GeneralPeriodContribution,
-        file_id_field="ingestion_file_id",
-        ingestion_file_ids=ingestion_file_ids,
-        tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes,
-        result=result,
-    )
-    _collect_periods_from_model(
-        db, BaldPeriodContribution,
-        file_id_field="ingestion_file_id",
-        ingestion_file_ids=ingestion_file_ids,
-        tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes,
-        result=result,
-    )
-    _collect_periods_from_model(
-        db, MedidaGeneral,
-        file_id_field="file_id",
-        ingestion_file_ids=ingestion_file_ids,
-        tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes,
-        result=result,
+    tenant_id: int | None,
+    empresa_id: int | None,
+    tipo_norm: str | None,
+    delete_family: str | None,
+    status_: str | None,
+    anio: int | None,
+    mes: int | None,
+) -> Query[Any]:
+    query = apply_ingestion_filters(
+        db.query(IngestionFile),
+        tenant_id=tenant_id,
+        empresa_id=empresa_id,
+        tipo=tipo_norm if _is_concrete_ingestion_tipo(tipo_norm) else None,
+        status_=status_,
+        anio=anio,
+        mes=mes,
     )
-
-    return result
+    if not _is_concrete_ingestion_tipo(tipo_norm):
+        query = _apply_delete_family_ingestion_filter(query, delete_family=delete_family)
+    return query
 
 
-def collect_ps_affected_periods(
-    db: Session,
-    *,
-    ingestion_file_ids: list[int],
-    tenant_id: int | None = None,
-    empresa_id: int | None = None,
-    anio: int | None = None,
-    mes: int | None = None,
-) -> set[tuple[int, int, int, int]]:
-    result: set[tuple[int, int, int, int]] = set()
-
-    _collect_periods_from_model(
-        db, PSPeriodDetail,
-        file_id_field="ingestion_file_id",
-        ingestion_file_ids=ingestion_file_ids,
-        tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes,
-        result=result,
-    )
-    _collect_periods_from_model(
-        db, PSPeriodContribution,
-        file_id_field="ingestion_file_id",
-        ingestion_file_ids=ingestion_file_ids,
-        tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes,
-        result=result,
-    )
-    _collect_periods_from_model(
-        db, MedidaPS,
-        file_id_field="file_id",
-        ingestion_file_ids=ingestion_file_ids,
-        tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes,
-        result=result,
-    )
+def _fill_tmp_file_ids(db: Session, query: Query[Any]) -> None:
+    ids = query.with_entities(IngestionFile.id).order_by(None)
+    db.execute(insert(_TMP_FILE_IDS).from_select(["id"], ids.statement))
+    _analyze_tmp_table(db, _TMP_FILE_IDS)
 
-    return result
 
+def _period_sources(delete_family: str | None) -> list[tuple[Any, str]]:
+    if delete_family == "general":
+        return [(model, "ingestion_file_id") for model in GENERAL_CONTRIB_MODELS] + [
+            (MedidaGeneral, "file_id")
+        ]
+    if delete_family == "ps":
+        return [(model, "ingestion_file_id") for model in PS_CONTRIB_MODELS] + [
+            (MedidaPS, "file_id")
+        ]
+    return []
 
-# ---------------------------------------------------------------------------
-# Resto del fichero — sin cambios
-# ---------------------------------------------------------------------------
 
-def cleanup_orphan_medidas_general(
+def _fill_tmp_periods(
     db: Session,
     *,
-    periods: set[tuple[int, int, int, int]],
-) -> int:
-    deleted = 0
-
-    for tenant_id, empresa_id, anio, mes in sorted(periods, key=period_sort_key):
-        has_m1 = (
-            db.query(M1PeriodContribution.id)
-            .filter(
-                M1PeriodContribution.tenant_id == tenant_id,
-                M1PeriodContribution.empresa_id == empresa_id,
-                M1PeriodContribution.anio == anio,
-                M1PeriodContribution.mes == mes,
-            )
-            .first()
-            is not None
-        )
-
-        has_general = (
-            db.query(GeneralPeriodContribution.id)
-            .filter(
-                GeneralPeriodContribution.tenant_id == tenant_id,
-                GeneralPeriodContribution.empresa_id == empresa_id,
-                GeneralPeriodContribution.anio == anio,
-                GeneralPeriodContribution.mes == mes,
-            )
-            .first()
-            is not None
-        )
-
-        has_bald = (
-            db.query(BaldPeriodContribution.id)
-            .filter(
-                BaldPeriodContribution.tenant_id == tenant_id,
-                BaldPeriodContribution.empresa_id == empresa_id,
-                BaldPeriodContribution.anio == anio,
-                BaldPeriodContribution.mes == mes,
-            )
-            .first()
-            is not None
-        )
-
-        if not has_m1 and not has_general and not has_bald:
-            deleted += (
-                db.query(MedidaGeneral)
-                .filter(
-                    MedidaGeneral.tenant_id == tenant_id,
-                    MedidaGeneral.empresa_id == empresa_id,
-                    MedidaGeneral.anio == anio,
-                    MedidaGeneral.mes == mes,
-                )
-                .delete(synchronize_session=False)
-            )
-
-    return deleted
+    delete_family: str | None,
+    **filters: Any,
+) -> set[tuple[int, int, int, int]]:
+    """Vuelca (UNION) los periodos afectados a la tabla temporal y los devuelve.
 
+    Un periodo está afectado si alguna contribución o medida de la familia
+    pertenece a un fichero a borrar o cae en el objetivo tenant/empresa/anio/mes.
+    """
+    sources = _period_sources(delete_family)
+    if not sources:
+        return set()
 
-def cleanup_orphan_medidas_ps(
-    db: Session,
-    *,
-    periods: set[tuple[int, int, int, int]],
-) -> int:
-    deleted = 0
-
-    for tenant_id, empresa_id, anio, mes in sorted(periods, key=period_sort_key):
-        has_detail = (
-            db.query(PSPeriodDetail.id)
-            .filter(
-                PSPeriodDetail.tenant_id == tenant_id,
-                PSPeriodDetail.empresa_id == empresa_id,
-                PSPeriodDetail.anio == anio,
-                PSPeriodDetail.mes == mes,
-            )
-            .first()
-            is not None
+    selects = [
+        select(model.tenant_id, model.empresa_id, model.anio, model.mes).where(
+            _delete_set_clause(model, getattr(model, file_field), **filters)
         )
-
-        has_contrib = (
-            db.query(PSPeriodContribution.id)
-            .filter(
-                PSPeriodContribution.tenant_id == tenant_id,
-                PSPeriodContribution.empresa_id == empresa_id,
-                PSPeriodContribution.anio == anio,
-                PSPeriodContribution.mes == mes,
-            )
-            .first()
-            is not None
+        for model, file_field in sources
+    ]
+    db.execute(
+        insert(_TMP_PERIODS).from_select(
+            ["tenant_id", "empresa_id", "anio", "mes"], union(*selects)
         )
+    )
+    _analyze_tmp_table(db, _TMP_PERIODS)
+    rows = db.execute(select(_TMP_PERIODS)).all()
+    return {(int(t_id), int(e_id), int(a), int(m)) for t_id, e_id, a, m in rows}
 
-        if not has_detail and not has_contrib:
-            deleted += (
-                db.query(MedidaPS)
-                .filter(
-                    MedidaPS.tenant_id == tenant_id,
-                    MedidaPS.empresa_id == empresa_id,
-                    MedidaPS.anio == anio,
-                    MedidaPS.mes == mes,
-                )
-                .delete(synchronize_session=False)
-            )
-
-    return deleted
-
-
-def preview_orphan_general_periods(
-    db: Session,
-    *,
-    periods: set[tuple[int, int, int, int]],
-    deleted_m1_ids: set[int],
-    deleted_general_ids: set[int],
-    deleted_bald_ids: set[int],
-) -> list[dict[str, int]]:
-    out: list[dict[str, int]] = []
-
-    for tenant_id, empresa_id, anio, mes in sorted(periods, key=period_sort_key):
-        remaining_m1_rows = (
-            db.query(M1PeriodContribution.id)
-            .filter(
-                M1PeriodContribution.tenant_id == tenant_id,
-                M1PeriodContribution.empresa_id == empresa_id,
-                M1PeriodContribution.anio == anio,
-                M1PeriodContribution.mes == mes,
-            )
-            .all()
-        )
-        has_m1_remaining = any(cast(int, row[0]) not in deleted_m1_ids for row in remaining_m1_rows)
-
-        remaining_general_rows = (
-            db.query(GeneralPeriodContribution.id)
-            .filter(
-                GeneralPeriodContribution.tenant_id == tenant_id,
-                GeneralPeriodContribution.empresa_id == empresa_id,
-                GeneralPeriodContribution.anio == anio,
-                GeneralPeriodContribution.mes == mes,
-            )
-            .all()
-        )
-        has_general_remaining = any(
-            cast(int, row[0]) not in deleted_general_ids for row in remaining_general_rows
-        )
 
-        remaining_bald_rows = (
-            db.query(BaldPeriodContribution.id)
-            .filter(
-                BaldPeriodContribution.tenant_id == tenant_id,
-                BaldPeriodContribution.empresa_id == empresa_id,
-                BaldPeriodContribution.anio == anio,
-                BaldPeriodContribution.mes == mes,
-            )
-            .all()
-        )
-        has_bald_remaining = any(
-            cast(int, row[0]) not in deleted_bald_ids for row in remaining_bald_rows
-        )
+def _count_delete_set(db: Session, model: Any, **filters: Any) -> int:
+    return int(
+        db.query(func.count(model.id))
+        .filter(_delete_set_clause(model, model.ingestion_file_id, **filters))
+        .scalar()
+        or 0
+    )
 
-        if not has_m1_remaining and not has_general_remaining and not has_bald_remaining:
-            out.append(serialize_period(tenant_id, empresa_id, anio, mes))
 
-    return out
+def _remaining_in_period(model: Any, **filters: Any) -> Any:
+    """EXISTS de filas de `model` en el periodo de la tabla temporal que
+    sobreviven al borrado."""
+    return (
+        select(model.id)
+        .where(*_period_match(model))
+        .where(~_delete_set_clause(model, model.ingestion_file_id, **filters))
+        .exists()
+    )
 
 
-def preview_orphan_ps_periods(
+def _preview_orphan_periods(
     db: Session,
-    *,
-    periods: set[tuple[int, int, int, int]],
-    deleted_ps_detail_ids: set[int],
-    deleted_ps_contrib_ids: set[int],
+    models: tuple[Any, ...],
+    **filters: Any,
 ) -> list[dict[str, int]]:
-    out: list[dict[str, int]] = []
-
-    for tenant_id, empresa_id, anio, mes in sorted(periods, key=period_sort_key):
-        remaining_detail_rows = (
-            db.query(PSPeriodDetail.id)
-            .filter(
-                PSPeriodDetail.tenant_id == tenant_id,
-                PSPeriodDetail.empresa_id == empresa_id,
-                PSPeriodDetail.anio == anio,
-                PSPeriodDetail.mes == mes,
-            )
-            .all()
-        )
-        has_detail_remaining = any(
-            cast(int, row[0]) not in deleted_ps_detail_ids for row in remaining_detail_rows
-        )
-
-        remaining_contrib_rows = (
-            db.query(PSPeriodContribution.id)
-            .filter(
-                PSPeriodContribution.tenant_id == tenant_id,
-                PSPeriodContribution.empresa_id == empresa_id,
-                PSPeriodContribution.anio == anio,
-                PSPeriodContribution.mes == mes,
-            )
-            .all()
-        )
-        has_contrib_remaining = any(
-            cast(int, row[0]) not in deleted_ps_contrib_ids for row in remaining_contrib_rows
-        )
-
-        if not has_detail_remaining and not has_contrib_remaining:
-            out.append(serialize_period(tenant_id, empresa_id, anio, mes))
-
-    return out
-
-
-def build_refacturas_preview(
-    db: Session,
-    *,
-    deleted_m1_rows: list[M1PeriodContribution],
-) -> list[dict[str, Any]]:
-    if not deleted_m1_rows:
-        return []
-
-    file_ids = sorted(
-        {
-            cast(int, row.ingestion_file_id)
-            for row in deleted_m1_rows
-            if getattr(row, "ingestion_file_id", None) is not None
-        }
+    """Periodos afectados que se quedarían sin ninguna contribución."""
+    rows = db.execute(
+        select(_TMP_PERIODS)
+        .where(*[~_remaining_in_period(model, **filters) for model in models])
+    ).all()
+    periods = [(int(t_id), int(e_id), int(a), int(m)) for t_id, e_id, a, m in rows]
+    return [serialize_period(*period) for period in sorted(periods, key=period_sort_key)]
+
+
+def _cleanup_orphan_medidas(db: Session, medida_model: Any, models: tuple[Any, ...]) -> int:
+    """Borra de una vez las medidas de los periodos afectados sin contribuciones."""
+    in_periods: Any
+    if _uses_delete_using(db):
+        in_periods = and_(*_period_match(medida_model))
+    else:
+        in_periods = select(_TMP_PERIODS).where(*_period_match(medida_model)).exists()
+
+    no_contributions = [
+        ~select(model.id)
+        .where(
+            model.tenant_id == medida_model.tenant_id,
+            model.empresa_id == medida_model.empresa_id,
+            model.anio == medida_model.anio,
+            model.mes == medida_model.mes,
+        )
+        .exists()
+        for model in models
+    ]
+    result = db.execute(
+        delete(medida_model)
+        .where(in_periods, *no_contributions)
+        .execution_options(synchronize_session=False)
     )
+    return int(result.rowcount or 0)
 
-    files_by_id: dict[int, IngestionFile] = {}
-    if file_ids:
-        rows = db.query(IngestionFile).filter(IngestionFile.id.in_(file_ids)).all()
-        files_by_id = {cast(int, row.id): row for row in rows}
-
-    result: list[dict[str, Any]] = []
 
-    for row in deleted_m1_rows:
-        file_id = cast(int, row.ingestion_file_id)
-        ingestion_file = files_by_id.get(file_id)
-        if ingestion_file is None:
-            continue
-
-        source_anio = cast(int | None, getattr(ingestion_file, "anio", None))
-        source_mes = cast(int | None, getattr(ingestion_file, "mes", None))
-        affected_anio = cast(int, row.anio)
-        affected_mes = cast(int, row.mes)
-
-        if source_anio is None or source_mes is None:
-            continue
-
-        if (source_anio, source_mes) == (affected_anio, affected_mes):
-            continue
-
-        result.append(
-            {
-                "source_period": {
-                    "anio": int(source_anio),
-                    "mes": int(source_mes),
-                },
-                "affected_period": {
-                    "anio": int(affected_anio),
-                    "mes": int(affected_mes),
-                },
-                "energia_kwh": float(cast(float | None, getattr(row, "energia_kwh", None)) or 0.0),
-                "filename": getattr(ingestion_file, "filename", None),
-                "ingestion_file_id": file_id,
-            }
+def build_refacturas_preview(db: Session, **filters: Any) -> list[dict[str, Any]]:
+    """M1 a borrar cuyo periodo afectado no es el del fichero que las aportó."""
+    rows = (
+        db.query(
+            M1PeriodContribution.anio,
+            M1PeriodContribution.mes,
+            M1PeriodContribution.energia_kwh,
+            M1PeriodContribution.ingestion_file_id,
+            IngestionFile.anio,
+            IngestionFile.mes,
+            IngestionFile.filename,
+        )
+        .join(IngestionFile, IngestionFile.id == M1PeriodContribution.ingestion_file_id)
+        .filter(
+            _delete_set_clause(
+                M1PeriodContribution, M1PeriodContribution.ingestion_file_id, **filters
+            ),
+            or_(
+                IngestionFile.anio != M1PeriodContribution.anio,
+                IngestionFile.mes != M1PeriodContribution.mes,
+            ),
         )
-
-    result.sort(
-        key=lambda item: (
-            int(item["affected_period"]["anio"]),
-            int(item["affected_period"]["mes"]),
-            int(item["source_period"]["anio"]),
-            int(item["source_period"]["mes"]),
-            int(item.get("ingestion_file_id") or 0),
+        .order_by(
+            M1PeriodContribution.anio,
+            M1PeriodContribution.mes,
+            IngestionFile.anio,
+            IngestionFile.mes,
+            M1PeriodContribution.ingestion_file_id,
+            M1PeriodContribution.id,
         )
+        .all()
     )
-    return result
+
+    return [
+        {
+            "source_period": {
+                "anio": int(source_anio),
+                "mes": int(source_mes),
+            },
+            "affected_period": {
+                "anio": int(affected_anio),
+                "mes": int(affected_mes),
+            },
+            "energia_kwh": float(energia_kwh or 0.0),
+            "filename": filename,
+            "ingestion_file_id": int(file_id),
+        }
+        for (
+            affected_anio,
+            affected_mes,
+            energia_kwh,
+            file_id,
+            source_anio,
+            source_mes,
+            filename,
+        ) in rows
+    ]
 
 
 def build_delete_preview(
@@ -771,129 +529,82 @@ def build_delete_preview(
 
     tipo_norm = _normalize_tipo(tipo)
     delete_family = _resolve_delete_family(tipo_norm)
+    filters: dict[str, Any] = {
+        "tenant_id": tenant_id,
+        "empresa_id": empresa_id,
+        "anio": anio,
+        "mes": mes,
+    }
 
-    base_query = db.query(IngestionFile)
-
-    base_query = apply_ingestion_filters(
-        base_query,
+    files_query = _ingestion_files_query(
+        db,
         tenant_id=tenant_id,
         empresa_id=empresa_id,
-        tipo=tipo_norm if _is_concrete_ingestion_tipo(tipo_norm) else None,
+        tipo_norm=tipo_norm,
+        delete_family=delete_family,
         status_=status_,
         anio=anio,
         mes=mes,
     )
-
-    if not _is_concrete_ingestion_tipo(tipo_norm):
-        base_query = _apply_delete_family_ingestion_filter(
-            base_query,
-            delete_family=delete_family,
-        )
-
-    ingestion_files = cast(
-        list[IngestionFile],
-        base_query.order_by(
+    ingestion_files = (
+        files_query.with_entities(
+            IngestionFile.id,
+            IngestionFile.tenant_id,
+            IngestionFile.empresa_id,
+            IngestionFile.tipo,
+            IngestionFile.anio,
+            IngestionFile.mes,
+            IngestionFile.filename,
+            IngestionFile.status,
+        )
+        .order_by(
             IngestionFile.empresa_id.asc(),
             IngestionFile.anio.asc(),
             IngestionFile.mes.asc(),
             IngestionFile.id.asc(),
-        ).all(),
+        )
+        .all()
     )
-    ids_to_delete = [cast(int, row.id) for row in ingestion_files]
 
-    affected_general_periods: set[tuple[int, int, int, int]] = set()
-    affected_ps_periods: set[tuple[int, int, int, int]] = set()
+    _reset_tmp_tables(db)
+    _fill_tmp_file_ids(db, files_query)
+    affected_periods = _fill_tmp_periods(db, delete_family=delete_family, **filters)
 
-    deleted_m1_map: dict[int, M1PeriodContribution] = {}
-    deleted_general_map: dict[int, GeneralPeriodContribution] = {}
-    deleted_bald_map: dict[int, BaldPeriodContribution] = {}
-    deleted_ps_detail_map: dict[int, PSPeriodDetail] = {}
-    deleted_ps_contrib_map: dict[int, PSPeriodContribution] = {}
+    counts = {model: 0 for model in GENERAL_CONTRIB_MODELS + PS_CONTRIB_MODELS}
     orphan_general_candidates: list[dict[str, int]] = []
     orphan_ps_candidates: list[dict[str, int]] = []
     refacturas_m1: list[dict[str, Any]] = []
+    medidas_direct_count = 0
 
     if delete_family == "general":
-        affected_general_periods = collect_general_affected_periods(
-            db,
-            ingestion_file_ids=ids_to_delete,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        )
-
-        deleted_m1_map = build_m1_delete_candidates(
-            db,
-            ingestion_file_ids=ids_to_delete,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        )
-        deleted_general_map = build_general_delete_candidates(
-            db,
-            ingestion_file_ids=ids_to_delete,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        )
-        deleted_bald_map = build_bald_delete_candidates(
-            db,
-            ingestion_file_ids=ids_to_delete,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        )
-
-        orphan_general_candidates = preview_orphan_general_periods(
-            db,
-            periods=affected_general_periods,
-            deleted_m1_ids=set(deleted_m1_map.keys()),
-            deleted_general_ids=set(deleted_general_map.keys()),
-            deleted_bald_ids=set(deleted_bald_map.keys()),
+        for model in GENERAL_CONTRIB_MODELS:
+            counts[model] = _count_delete_set(db, model, **filters)
+        medidas_direct_count = int(
+            db.query(func.count(MedidaGeneral.id))
+            .filter(_in_tmp_file_ids(MedidaGeneral.file_id))
+            .scalar()
+            or 0
         )
-
-        refacturas_m1 = build_refacturas_preview(
-            db,
-            deleted_m1_rows=list(deleted_m1_map.values()),
+        orphan_general_candidates = _preview_orphan_periods(
+            db, GENERAL_CONTRIB_MODELS, **filters
         )
+        refacturas_m1 = build_refacturas_preview(db, **filters)
 
     elif delete_family == "ps":
-        affected_ps_periods = collect_ps_affected_periods(
-            db,
-            ingestion_file_ids=ids_to_delete,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
+        for model in PS_CONTRIB_MODELS:
+            counts[model] = _count_delete_set(db, model, **filters)
+        medidas_direct_count = int(
+            db.query(func.count(MedidaPS.id))
+            .filter(_in_tmp_file_ids(MedidaPS.file_id))
+            .scalar()
+            or 0
         )
+        orphan_ps_candidates = _preview_orphan_periods(db, PS_CONTRIB_MODELS, **filters)
 
-        deleted_ps_detail_map = build_ps_detail_delete_candidates(
-            db,
-            ingestion_file_ids=ids_to_delete,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        )
-        deleted_ps_contrib_map = build_ps_contrib_delete_candidates(
-            db,
-            ingestion_file_ids=ids_to_delete,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        )
+    _drop_tmp_tables(db)
 
-        orphan_ps_candidates = preview_orphan_ps_periods(
-            db,
-            periods=affected_ps_periods,
-            deleted_ps_detail_ids=set(deleted_ps_detail_map.keys()),
-            deleted_ps_contrib_ids=set(deleted_ps_contrib_map.keys()),
-        )
+    affected_general_periods = affected_periods if delete_family == "general" else set()
+    affected_ps_periods = affected_periods if delete_family == "ps" else set()
 
     return {
         "filters": {
@@ -906,26 +617,16 @@ def build_delete_preview(
         },
         "delete_family": delete_family,
         "summary": {
-            "ingestion_files_count": len(ids_to_delete),
-            "m1_period_contributions_count": len(deleted_m1_map),
-            "general_period_contributions_count": len(deleted_general_map),
-            "bald_period_contributions_count": len(deleted_bald_map),
-            "ps_period_detail_count": len(deleted_ps_detail_map),
-            "ps_period_contributions_count": len(deleted_ps_contrib_map),
+            "ingestion_files_count": len(ingestion_files),
+            "m1_period_contributions_count": counts[M1PeriodContribution],
+            "general_period_contributions_count": counts[GeneralPeriodContribution],
+            "bald_period_contributions_count": counts[BaldPeriodContribution],
+            "ps_period_detail_count": counts[PSPeriodDetail],
+            "ps_period_contributions_count": counts[PSPeriodContribution],
             "medidas_general_direct_count": (
-                db.query(MedidaGeneral)
-                .filter(MedidaGeneral.file_id.in_(ids_to_delete))
-                .count()
-                if ids_to_delete and delete_family == "general"
-                else 0
-            ),
-            "medidas_ps_direct_count": (
-                db.query(MedidaPS)
-                .filter(MedidaPS.file_id.in_(ids_to_delete))
-                .count()
-                if ids_to_delete and delete_family == "ps"
-                else 0
+                medidas_direct_count if delete_family == "general" else 0
             ),
+            "medidas_ps_direct_count": medidas_direct_count if delete_family == "ps" else 0,
             "affected_general_periods_count": len(affected_general_periods),
             "affected_ps_periods_count": len(affected_ps_periods),
             "orphan_medidas_general_candidate_count": len(orphan_general_candidates),
@@ -934,12 +635,12 @@ def build_delete_preview(
         },
         "ingestion_files": [
             {
-                "id": cast(int, row.id),
-                "tenant_id": cast(int, row.tenant_id),
-                "empresa_id": cast(int, row.empresa_id),
+                "id": int(row.id),
+                "tenant_id": int(row.tenant_id),
+                "empresa_id": int(row.empresa_id),
                 "tipo": cast(str, row.tipo),
-                "anio": cast(int, row.anio),
-                "mes": cast(int, row.mes),
+                "anio": int(row.anio),
+                "mes": int(row.mes),
                 "filename": cast(str, row.filename),
                 "status": cast(str | None, row.status),
             }
@@ -977,191 +678,84 @@ def execute_delete(
 
     tipo_norm = _normalize_tipo(tipo)
     delete_family = _resolve_delete_family(tipo_norm)
+    filters: dict[str, Any] = {
+        "tenant_id": tenant_id,
+        "empresa_id": empresa_id,
+        "anio": anio,
+        "mes": mes,
+    }
 
-    base_query = db.query(IngestionFile)
-
-    base_query = apply_ingestion_filters(
-        base_query,
+    files_query = _ingestion_files_query(
+        db,
         tenant_id=tenant_id,
         empresa_id=empresa_id,
-        tipo=tipo_norm if _is_concrete_ingestion_tipo(tipo_norm) else None,
+        tipo_norm=tipo_norm,
+        delete_family=delete_family,
         status_=status_,
         anio=anio,
         mes=mes,
     )
 
-    if not _is_concrete_ingestion_tipo(tipo_norm):
-        base_query = _apply_delete_family_ingestion_filter(
-            base_query,
-            delete_family=delete_family,
-        )
+    _reset_tmp_tables(db)
+    _fill_tmp_file_ids(db, files_query)
+    # Periodos afectados ANTES de borrar: las filas que los delatan se van.
+    periodos = _fill_tmp_periods(db, delete_family=delete_family, **filters)
 
-    rows_to_delete = cast(list[IngestionFile], base_query.all())
-    ids_to_delete = [cast(int, row.id) for row in rows_to_delete]
-
-    affected_general_periods: set[tuple[int, int, int, int]] = set()
-    affected_ps_periods: set[tuple[int, int, int, int]] = set()
-
-    deleted_m1_contrib_by_file = 0
-    deleted_general_contrib_by_file = 0
-    deleted_bald_contrib_by_file = 0
-    deleted_ps_detail_by_file = 0
-    deleted_ps_contrib_by_file = 0
+    deleted_by_file = {model: 0 for model in GENERAL_CONTRIB_MODELS + PS_CONTRIB_MODELS}
+    deleted_target = dict(deleted_by_file)
     deleted_medidas_general_direct = 0
     deleted_medidas_ps_direct = 0
-    deleted_files = 0
-
-    deleted_m1_contrib_target = 0
-    deleted_general_contrib_target = 0
-    deleted_bald_contrib_target = 0
-    deleted_ps_detail_target = 0
-    deleted_ps_contrib_target = 0
     deleted_medidas_general_orphan = 0
     deleted_medidas_ps_orphan = 0
 
     if delete_family == "general":
-        affected_general_periods = collect_general_affected_periods(
-            db,
-            ingestion_file_ids=ids_to_delete,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
+        for model in GENERAL_CONTRIB_MODELS:
+            deleted_by_file[model] = _delete_by_tmp_file_ids(db, model, model.ingestion_file_id)
+        deleted_medidas_general_direct = _delete_by_tmp_file_ids(
+            db, MedidaGeneral, MedidaGeneral.file_id
         )
     elif delete_family == "ps":
-        affected_ps_periods = collect_ps_affected_periods(
-            db,
-            ingestion_file_ids=ids_to_delete,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        )
-
-    if ids_to_delete:
-        if delete_family == "general":
-            deleted_m1_contrib_by_file = (
-                db.query(M1PeriodContribution)
-                .filter(M1PeriodContribution.ingestion_file_id.in_(ids_to_delete))
-                .delete(synchronize_session=False)
-            )
-
-            deleted_general_contrib_by_file = (
-                db.query(GeneralPeriodContribution)
-                .filter(GeneralPeriodContribution.ingestion_file_id.in_(ids_to_delete))
-                .delete(synchronize_session=False)
-            )
-
-            deleted_bald_contrib_by_file = (
-                db.query(BaldPeriodContribution)
-                .filter(BaldPeriodContribution.ingestion_file_id.in_(ids_to_delete))
-                .delete(synchronize_session=False)
-            )
+        for model in PS_CONTRIB_MODELS:
+            deleted_by_file[model] = _delete_by_tmp_file_ids(db, model, model.ingestion_file_id)
+        deleted_medidas_ps_direct = _delete_by_tmp_file_ids(db, MedidaPS, MedidaPS.file_id)
 
-            deleted_medidas_general_direct = (
-                db.query(MedidaGeneral)
-                .filter(MedidaGeneral.file_id.in_(ids_to_delete))
-                .delete(synchronize_session=False)
-            )
-
-        elif delete_family == "ps":
-            deleted_ps_detail_by_file = (
-                db.query(PSPeriodDetail)
-                .filter(PSPeriodDetail.ingestion_file_id.in_(ids_to_delete))
-                .delete(synchronize_session=False)
-            )
-
-            deleted_ps_contrib_by_file = (
-                db.query(PSPeriodContribution)
-                .filter(PSPeriodContribution.ingestion_file_id.in_(ids_to_delete))
-                .delete(synchronize_session=False)
-            )
-
-            deleted_medidas_ps_direct = (
-                db.query(MedidaPS)
-                .filter(MedidaPS.file_id.in_(ids_to_delete))
-                .delete(synchronize_session=False)
-            )
-
-        deleted_files = (
-            db.query(IngestionFile)
-            .filter(IngestionFile.id.in_(ids_to_delete))
-            .delete(synchronize_session=False)
-        )
+    deleted_files = _delete_by_tmp_file_ids(db, IngestionFile, IngestionFile.id)
 
     if delete_family == "general":
-        deleted_m1_contrib_target = target_contribution_filters(
-            db.query(M1PeriodContribution),
-            M1PeriodContribution,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        ).delete(synchronize_session=False)
-
-        deleted_general_contrib_target = target_contribution_filters(
-            db.query(GeneralPeriodContribution),
-            GeneralPeriodContribution,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        ).delete(synchronize_session=False)
-
-        deleted_bald_contrib_target = target_contribution_filters(
-            db.query(BaldPeriodContribution),
-            BaldPeriodContribution,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        ).delete(synchronize_session=False)
-
-        deleted_medidas_general_orphan = cleanup_orphan_medidas_general(
-            db,
-            periods=affected_general_periods,
+        for model in GENERAL_CONTRIB_MODELS:
+            deleted_target[model] = target_contribution_filters(
+                db.query(model), model, **filters
+            ).delete(synchronize_session=False)
+        deleted_medidas_general_orphan = _cleanup_orphan_medidas(
+            db, MedidaGeneral, GENERAL_CONTRIB_MODELS
         )
-
     elif delete_family == "ps":
-        deleted_ps_detail_target = target_contribution_filters(
-            db.query(PSPeriodDetail),
-            PSPeriodDetail,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        ).delete(synchronize_session=False)
-
-        deleted_ps_contrib_target = target_contribution_filters(
-            db.query(PSPeriodContribution),
-            PSPeriodContribution,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        ).delete(synchronize_session=False)
-
-        deleted_medidas_ps_orphan = cleanup_orphan_medidas_ps(
-            db,
-            periods=affected_ps_periods,
-        )
+        for model in PS_CONTRIB_MODELS:
+            deleted_target[model] = target_contribution_filters(
+                db.query(model), model, **filters
+            ).delete(synchronize_session=False)
+        deleted_medidas_ps_orphan = _cleanup_orphan_medidas(db, MedidaPS, PS_CONTRIB_MODELS)
 
+    _drop_tmp_tables(db)
     db.commit()
+    bump_data_version(tenant_id)
+
+    if delete_family == "general" and periodos:
+        # La conciliación S02/BALD precalculada lee medidas_general.
+        from app.perdidas.conciliacion import recalcular_tras_borrado
+        recalcular_tras_borrado(db, periodos=periodos)
+
+    def _total(model: Any) -> int:
+        return deleted_by_file[model] + deleted_target[model]
 
     return {
         "delete_family": delete_family,
         "deleted_ingestion_files": deleted_files,
-        "deleted_m1_period_contributions": deleted_m1_contrib_by_file + deleted_m1_contrib_target,
-        "deleted_general_period_contributions": (
-            deleted_general_contrib_by_file + deleted_general_contrib_target
-        ),
-        "deleted_bald_period_contributions": (
-            deleted_bald_contrib_by_file + deleted_bald_contrib_target
-        ),
-        "deleted_ps_period_detail": deleted_ps_detail_by_file + deleted_ps_detail_target,
-        "deleted_ps_period_contributions": (
-            deleted_ps_contrib_by_file + deleted_ps_contrib_target
-        ),
+        "deleted_m1_period_contributions": _total(M1PeriodContribution),
+        "deleted_general_period_contributions": _total(GeneralPeriodContribution),
+        "deleted_bald_period_contributions": _total(BaldPeriodContribution),
+        "deleted_ps_period_detail": _total(PSPeriodDetail),
+        "deleted_ps_period_contributions": _total(PSPeriodContribution),
         "deleted_medidas_general_direct": deleted_medidas_general_direct,
         "deleted_medidas_general_orphan": deleted_medidas_general_orphan,
         "deleted_medidas_ps_direct": deleted_medidas_ps_direct,
@@ -1174,4 +768,4 @@ def execute_delete(
             "anio": anio,
             "mes": mes,
         },
-    }
\ No newline at end of file
+    }
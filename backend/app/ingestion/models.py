@@ -11,6 +11,7 @@ from sqlalchemy import (
     String,
     ForeignKey,
     DateTime,
+    Index,
     Text,
 )
 
@@ -68,6 +69,21 @@ class IngestionFile(TimestampMixin, Base):
     # ✅ NUEVO: avisos/no bloqueante (JSON serializado)
     warnings_json = Column(Text, nullable=True)
 
+    # Tiempos por etapa del último procesado (JSON, ver app/core/pipeline_timing.py)
+    timings_json = Column(Text, nullable=True)
+
+    # sha256 del contenido subido: detecta re-subidas idénticas sin reprocesar
+    content_sha256 = Column(String(64), nullable=True)
+
+    __table_args__ = (
+        Index(
+            "ix_ingestion_files_content_sha256",
+            "tenant_id",
+            "empresa_id",
+            "content_sha256",
+        ),
+    )
+
     @property
     def warnings(self) -> list[Any]:
         """
@@ -83,4 +99,16 @@ class IngestionFile(TimestampMixin, Base):
         except Exception:
             return []
 
+    @property
+    def timings(self) -> dict[str, Any] | None:
+        """Tiempos por etapa parseados desde timings_json (None si no hay)."""
+        raw = getattr(self, "timings_json", None)
+        if not raw:
+            return None
+        try:
+            parsed = json.loads(raw)
+            return parsed if isinstance(parsed, dict) else None
+        except Exception:
+            return None
+
     # created_at y updated_at vienen de TimestampMixin
\ No newline at end of file
@@ -10,6 +10,7 @@ from fastapi import (
     Form,
     HTTPException,
     Query,
+    Response,
     UploadFile,
     status,
 )
@@ -29,9 +30,11 @@ from app.ingestion.models import IngestionFile
 from app.ingestion.schemas import IngestionFileCreate, IngestionFileRead
 from app.ingestion.services import process_ingestion_file
 from app.ingestion.utils import (
+    find_duplicate_by_hash,
     find_existing_ingestion_file,
     infer_period_from_filename,
     safe_unlink,
+    stream_to_disk_with_hash,
 )
 from app.tenants.models import User
 
@@ -123,13 +126,24 @@ def _extract_codigo_from_filename(tipo: str, filename: str) -> str | None:
     response_model=IngestionFileRead,
     status_code=status.HTTP_201_CREATED,
 )
-async def upload_file(
+def upload_file(
+    response: Response,
     empresa_id: int = Form(...),
     tipo: str = Form(...),
     file: UploadFile = File(...),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    """
+    Sube un fichero de medidas y lo registra como pending.
+
+    Es `def` (no `async def`) a propósito: las queries de SQLAlchemy y la
+    copia a disco son bloqueantes, así que FastAPI lo ejecuta en el
+    threadpool y el event loop sigue atendiendo otras peticiones durante
+    subidas grandes. El contenido se hashea mientras se copia; si ya hay un
+    fichero idéntico de la misma empresa/tipo que no acabó en error, se
+    devuelve ese (200 + cabecera X-Ingestion-Duplicate) sin reprocesar.
+    """
     tipo_norm = (tipo or "").upper()
     tenant_id_int = int(cast(int, current_user.tenant_id))
     allowed_empresa_ids = _allowed_empresa_ids(db, current_user)
@@ -199,13 +213,24 @@ async def upload_file(
         / tipo_norm
         / f"{anio}{mes:02d}"
     )
-    dest_dir.mkdir(parents=True, exist_ok=True)
     dest_path = dest_dir / file.filename
 
-    with dest_path.open("wb") as buffer:
-        import shutil
-        shutil.copyfileobj(file.file, buffer)
+    tmp_path, content_sha256, _size = stream_to_disk_with_hash(file.file, dest_dir)
 
+    duplicate = find_duplicate_by_hash(
+        db,
+        tenant_id=tenant_id_int,
+        empresa_id=empresa_id,
+        tipo=tipo_norm,
+        content_sha256=content_sha256,
+    )
+    if duplicate is not None:
+        safe_unlink(str(tmp_path))
+        response.status_code = status.HTTP_200_OK
+        response.headers["X-Ingestion-Duplicate"] = "true"
+        return duplicate
+
+    tmp_path.replace(dest_path)
     storage_key = str(dest_path)
 
     if existing:
@@ -223,6 +248,7 @@ async def upload_file(
         ex.processed_at = None
         ex.updated_at = ahora_madrid()
         ex.warnings_json = None
+        ex.content_sha256 = content_sha256
         db.commit()
         db.refresh(existing)
         if old_storage_key and old_storage_key != storage_key:
@@ -240,6 +266,7 @@ async def upload_file(
         "status": IngestionFile.STATUS_PENDING,
         "uploaded_by": int(cast(int, current_user.id)),
         "warnings_json": None,
+        "content_sha256": content_sha256,
     }
     ingestion = IngestionFile(**ingestion_data)  # type: ignore[arg-type]
     db.add(ingestion)
@@ -486,9 +513,18 @@ def delete_files(
 )
 def process_file(
     file_id: int,
+    perfil: bool = Query(
+        False,
+        description="Guarda un perfil cProfile del procesado en PIPELINE_PROFILE_DIR (solo superusuario)",
+    ),
     db: Session = Depends(get_db),
     current_user: User = Depends(get_current_user),
 ):
+    if perfil and not bool(getattr(current_user, "is_superuser", False)):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo un superusuario puede pedir el perfil del procesado",
+        )
     tenant_id_int = int(cast(int, current_user.tenant_id))
     allowed_empresa_ids = _allowed_empresa_ids(db, current_user)
 
@@ -517,4 +553,5 @@ def process_file(
         db=db,
         ingestion=ingestion,
         tenant_id=tenant_id_int,
+        perfil=perfil,
     )
\ No newline at end of file
@@ -49,8 +49,11 @@ class IngestionFileRead(IngestionFileBase):
     rows_ok: int | None = None
     rows_error: int | None = None
     error_message: str | None = None
+    content_sha256: str | None = None
 
     warnings: list[Any] = Field(default_factory=list)
+    # Tiempos por etapa del último procesado (ver app/core/pipeline_timing.py)
+    timings: dict[str, Any] | None = None
 
     created_at: datetime
     updated_at: datetime | None = None
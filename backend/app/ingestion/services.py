@@ -13,6 +13,8 @@ from sqlalchemy.orm import Session
 
 from app.core.config import get_settings
 from app.core.datetime_utils import ahora_madrid
+from app.core.pipeline_timing import TiemposPipeline, etapa, medir_pipeline
+from app.core.response_cache import bump_data_version
 from app.ingestion.models import IngestionFile
 from app.measures.services import (
     procesar_acum_h2_gen_generacion as procesar_acum_h2_gen_generacion_core,
@@ -109,6 +111,13 @@ def _safe_unlink(storage_key: str | None) -> None:
         return
 
 
+def _tamano(path: Path) -> int | None:
+    try:
+        return path.stat().st_size
+    except OSError:
+        return None
+
+
 def _extract_ingestion_warnings(obj: Any) -> list[Any]:
     try:
         warnings = getattr(obj, "_ingestion_warnings", None)
@@ -247,6 +256,56 @@ def _finalize_ingestion_processing(
         return
 
 
+def _guardar_tiempos_ingestion(
+    db: Session,
+    *,
+    ingestion_id: int,
+    tenant_id: int,
+    tiempos: TiemposPipeline,
+) -> None:
+    """Guarda los tiempos por etapa en el fichero. Nunca propaga excepciones."""
+    try:
+        (
+            db.query(IngestionFile)
+            .filter(
+                IngestionFile.id == ingestion_id,
+                IngestionFile.tenant_id == tenant_id,
+            )
+            .update(
+                {IngestionFile.timings_json: json.dumps(tiempos.as_dict(), ensure_ascii=False)},
+                synchronize_session=False,
+            )
+        )
+        db.commit()
+    except Exception:
+        try:
+            db.rollback()
+        except Exception:
+            pass
+
+
+def _try_recalcular_conciliacion_perdidas(
+    *,
+    db: Session,
+    ingestion: IngestionFile,
+) -> None:
+    """
+    Tras un BALD, rehace la conciliación de pérdidas S02/BALD del periodo
+    del fichero (app/perdidas/conciliacion.py). Nunca propaga excepciones.
+    """
+    ing = cast(Any, ingestion)
+    if (ing.tipo or "").upper() != "BALD" or ing.anio is None or ing.mes is None:
+        return
+    from app.perdidas.conciliacion import recalcular_tras_bald
+    recalcular_tras_bald(
+        db,
+        tenant_id=int(ing.tenant_id),
+        empresa_id=int(ing.empresa_id),
+        anio=int(ing.anio),
+        mes=int(ing.mes),
+    )
+
+
 def _try_recalculate_alerts(
     *,
     db: Session,
@@ -388,7 +447,13 @@ def process_ingestion_file(
     db: Session,
     ingestion: IngestionFile,
     tenant_id: int,
+    perfil: bool = False,
 ) -> IngestionFile:
+    """
+    Procesa el fichero según su tipo y guarda en él los tiempos por etapa
+    (`timings_json`). Con `perfil=True` guarda además un cProfile del
+    procesado (ver app/core/pipeline_timing.py).
+    """
     ing = cast(Any, ingestion)
     if ing.status not in (IngestionFile.STATUS_PENDING, IngestionFile.STATUS_ERROR):
         raise HTTPException(
@@ -400,38 +465,59 @@ def process_ingestion_file(
             status_code=status.HTTP_400_BAD_REQUEST,
             detail="El fichero no tiene storage_key; no se puede procesar",
         )
-    ingestion = _mark_ingestion_processing(db, ingestion)
-    storage_key_for_cleanup = cast(str, getattr(ingestion, "storage_key", None) or "")
-    try:
-        result_obj = _dispatch_ingestion_processing_by_tipo(
-            db=db,
-            ingestion=ingestion,
-        )
-        ingestion = _mark_ingestion_ok(
-            db,
-            ingestion,
-            result_obj=result_obj,
-        )
-        # Recalcular alertas automáticamente para BALD y M1
-        # Se hace tras el commit de _mark_ingestion_ok — nunca bloquea la ingestion
-        _try_recalculate_alerts(
-            db=db,
-            ingestion=ingestion,
-        )
-    except Exception as exc:
-        ingestion = _mark_ingestion_error(
-            db,
-            ingestion_id=cast(int, getattr(ingestion, "id")),
-            tenant_id=tenant_id,
-            exc=exc,
-        )
-    finally:
-        _finalize_ingestion_processing(
-            db,
-            ingestion_id=cast(int, getattr(ingestion, "id")),
-            tenant_id=tenant_id,
-            storage_key_for_cleanup=storage_key_for_cleanup,
-        )
+    ingestion_id = cast(int, ing.id)
+    with medir_pipeline(
+        f"ingestion.{(ing.tipo or '').upper()}",
+        perfil_id=ingestion_id if perfil else None,
+    ) as tiempos:
+        ingestion = _mark_ingestion_processing(db, ingestion)
+        storage_key_for_cleanup = cast(str, getattr(ingestion, "storage_key", None) or "")
+        try:
+            result_obj = _dispatch_ingestion_processing_by_tipo(
+                db=db,
+                ingestion=ingestion,
+            )
+            with etapa("commit"):
+                ingestion = _mark_ingestion_ok(
+                    db,
+                    ingestion,
+                    result_obj=result_obj,
+                )
+            # Recalcular alertas automáticamente para BALD y M1
+            # Se hace tras el commit de _mark_ingestion_ok — nunca bloquea la ingestion
+            with etapa("alertas"):
+                _try_recalculate_alerts(
+                    db=db,
+                    ingestion=ingestion,
+                )
+            with etapa("conciliacion_perdidas"):
+                _try_recalcular_conciliacion_perdidas(
+                    db=db,
+                    ingestion=ingestion,
+                )
+        except Exception as exc:
+            ingestion = _mark_ingestion_error(
+                db,
+                ingestion_id=ingestion_id,
+                tenant_id=tenant_id,
+                exc=exc,
+            )
+        finally:
+            _finalize_ingestion_processing(
+                db,
+                ingestion_id=ingestion_id,
+                tenant_id=tenant_id,
+                storage_key_for_cleanup=storage_key_for_cleanup,
+            )
+            # Tanto si ha ido bien como si no, los agregados de medidas del
+            # tenant pueden haber cambiado: invalidamos la caché de respuestas.
+            bump_data_version(tenant_id)
+    _guardar_tiempos_ingestion(
+        db,
+        ingestion_id=ingestion_id,
+        tenant_id=tenant_id,
+        tiempos=tiempos,
+    )
     # Blinda: garantizamos que la sesión está limpia antes del query final.
     # Si algún paso previo (_mark_error, _finalize) dejó la transacción rota,
     # hacer rollback aquí evita un InFailedSqlTransaction.
@@ -442,7 +528,7 @@ def process_ingestion_file(
     refreshed = (
         db.query(IngestionFile)
         .filter(
-            IngestionFile.id == cast(int, getattr(ingestion, "id")),
+            IngestionFile.id == ingestion_id,
             IngestionFile.tenant_id == tenant_id,
         )
         .first()
@@ -464,19 +550,21 @@ def _leer_fichero_m1_desde_excel_o_csv(
 ) -> list[dict[str, Any]]:
     path = Path(file_path)
     suffix = path.suffix.lower()
-    if suffix in {".xls", ".xlsx", ".xlsm"}:
-        try:
-            df = pd.read_excel(path, sheet_name="cabeceras")
-        except Exception:
-            df = pd.read_excel(path)
-    else:
-        df = pd.read_csv(
-            path,
-            sep=";",
-            dtype=str,
-            engine="python",
-        )
-    return cast(list[dict[str, Any]], df.to_dict(orient="records"))
+    with etapa("lectura", bytes=_tamano(path)) as medicion:
+        if suffix in {".xls", ".xlsx", ".xlsm"}:
+            try:
+                df = pd.read_excel(path, sheet_name="cabeceras")
+            except Exception:
+                df = pd.read_excel(path)
+        else:
+            df = pd.read_csv(
+                path,
+                sep=";",
+                dtype=str,
+                engine="python",
+            )
+        medicion.filas = len(df)
+        return cast(list[dict[str, Any]], df.to_dict(orient="records"))
 
 
 def procesar_fichero_m1(
@@ -566,15 +654,17 @@ def _leer_fichero_ps_desde_excel_o_csv(
 ) -> list[dict[str, Any]]:
     path = Path(file_path)
     suffix = path.suffix.lower()
-    if suffix in {".xls", ".xlsx", ".xlsm"}:
-        df = pd.read_excel(path)
-    else:
-        df = pd.read_csv(
-            path,
-            sep=";",
-            dtype=str,
-            engine="python",
-        )
+    with etapa("lectura", bytes=_tamano(path)) as medicion:
+        if suffix in {".xls", ".xlsx", ".xlsm"}:
+            df = pd.read_excel(path)
+        else:
+            df = pd.read_csv(
+                path,
+                sep=";",
+                dtype=str,
+                engine="python",
+            )
+        medicion.filas = len(df)
     rename_map = {
         "Energía facturada": "Energia_facturada",
         "Energia facturada": "Energia_facturada",
@@ -631,15 +721,17 @@ def _leer_fichero_csv_sin_cabeceras(
     columnas: list[str],
 ) -> list[dict[str, Any]]:
     path = Path(file_path)
-    df = pd.read_csv(
-        path,
-        sep=";",
-        header=None,
-        names=columnas,
-        dtype=str,
-        engine="python",
-    )
-    return cast(list[dict[str, Any]], df.to_dict(orient="records"))
+    with etapa("lectura", bytes=_tamano(path)) as medicion:
+        df = pd.read_csv(
+            path,
+            sep=";",
+            header=None,
+            names=columnas,
+            dtype=str,
+            engine="python",
+        )
+        medicion.filas = len(df)
+        return cast(list[dict[str, Any]], df.to_dict(orient="records"))
 
 
 # ---------------------------------------------------------------------------
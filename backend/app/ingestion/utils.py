@@ -1,8 +1,11 @@
 # app/ingestion/utils.py
 from __future__ import annotations
 
+import hashlib
 import re
+import uuid
 from pathlib import Path
+from typing import BinaryIO
 
 from sqlalchemy.orm import Session
 
@@ -95,6 +98,70 @@ def find_existing_ingestion_file(
     )
 
 
+def find_duplicate_by_hash(
+    db: Session,
+    *,
+    tenant_id: int,
+    empresa_id: int,
+    tipo: str,
+    content_sha256: str,
+) -> IngestionFile | None:
+    """
+    Busca un IngestionFile de la misma empresa y tipo con idéntico contenido
+    (sha256) que no haya terminado en error. Si existe, volver a subir el
+    fichero no aporta nada: no se reprocesa.
+    """
+    return (
+        db.query(IngestionFile)
+        .filter(
+            IngestionFile.tenant_id == tenant_id,
+            IngestionFile.empresa_id == empresa_id,
+            IngestionFile.tipo == (tipo or "").upper(),
+            IngestionFile.content_sha256 == content_sha256,
+            IngestionFile.status != IngestionFile.STATUS_ERROR,
+        )
+        .order_by(IngestionFile.id.desc())
+        .first()
+    )
+
+
+UPLOAD_CHUNK_SIZE = 1024 * 1024
+
+
+def stream_to_disk_with_hash(
+    src: BinaryIO,
+    dest_dir: Path,
+    *,
+    chunk_size: int = UPLOAD_CHUNK_SIZE,
+) -> tuple[Path, str, int]:
+    """
+    Copia `src` por bloques a un fichero temporal `.part` dentro de
+    `dest_dir`, calculando el sha256 mientras se escribe (una sola lectura).
+
+    Devuelve (ruta_temporal, sha256_hex, bytes). El caller decide si lo
+    renombra a su nombre final (`Path.replace`, atómico en el mismo
+    directorio) o lo borra. Es bloqueante: llamarlo desde un endpoint `def`
+    o con `run_in_threadpool`, nunca directamente en el event loop.
+    """
+    dest_dir.mkdir(parents=True, exist_ok=True)
+    tmp_path = dest_dir / f".upload-{uuid.uuid4().hex}.part"
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with tmp_path.open("wb") as out:
+            while True:
+                chunk = src.read(chunk_size)
+                if not chunk:
+                    break
+                digest.update(chunk)
+                out.write(chunk)
+                size += len(chunk)
+    except Exception:
+        safe_unlink(str(tmp_path))
+        raise
+    return tmp_path, digest.hexdigest(), size
+
+
 def safe_unlink(storage_key: str | None) -> None:
     """
     Elimina un fichero del disco de forma segura, sin lanzar excepciones.
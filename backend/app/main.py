@@ -30,12 +30,15 @@ from fastapi.staticfiles import StaticFiles
 from sqlalchemy import text
 from sqlalchemy.orm import Session
 
+from app.admin.routes import router as admin_router
 from app.alerts.routes import router as alerts_router
 from app.calendario_laboral.routes import router as calendario_laboral_router
 from app.calendario_ree.routes import router as calendario_ree_router
 from app.comunicaciones.routes import router as comunicaciones_router
 from app.core.config import get_settings
-from app.core.db import get_db
+from app.core.db import engine, get_db
+from app.core.perf import PerfMiddleware, instrument_engine
+from app.core.pipeline_timing import instrumentar_engine as instrumentar_engine_pipelines
 from app.dashboard.routes import router as dashboard_router
 from app.dashboard_tablas.routes import router as dashboard_tablas_router
 from app.empresas.routes import router as empresas_router
@@ -62,41 +65,9 @@ from app.stg.wsprime.routes import router as wsprime_router
 from app.erp.routes import router as erp_router
 
 # ── Custom JSON response: añade offset Madrid a datetimes naive ──────────────
-# Los datetimes naive que escribe el backend ya están en hora Madrid local. JS
-# en el frontend interpreta strings ISO sin TZ como UTC y aplica +2h al
-# mostrarlas → mostraba 18:07 cuando eran las 16:07. Aquí post-procesamos cada
-# respuesta JSON añadiendo el offset Madrid correcto (CEST=+02:00 o CET=+01:00
-# según DST) a cada string datetime ISO naive.
-import re
-from datetime import datetime
-from fastapi.responses import JSONResponse
-from app.core.datetime_utils import TZ_MADRID
-
-_RE_NAIVE_DT_IN_JSON = re.compile(r'"(\d{4}-\d{2}-\d{2}T\d{2}:\d{2}:\d{2}(?:\.\d+)?)"')
-
-
-def _add_madrid_offset_to_iso(match: "re.Match[str]") -> str:
-    """Toma un string ISO naive entre comillas y añade el offset Madrid (DST-aware)."""
-    iso = match.group(1)
-    try:
-        naive = datetime.fromisoformat(iso)
-        aware = naive.replace(tzinfo=TZ_MADRID)
-        return f'"{aware.isoformat()}"'
-    except (ValueError, TypeError):
-        return match.group(0)
-
-
-class MadridJSONResponse(JSONResponse):
-    """JSONResponse que añade offset Madrid a cualquier datetime naive ISO en el body."""
-
-    def render(self, content) -> bytes:
-        body = super().render(content)
-        try:
-            text = body.decode("utf-8")
-            transformed = _RE_NAIVE_DT_IN_JSON.sub(_add_madrid_offset_to_iso, text)
-            return transformed.encode("utf-8")
-        except (UnicodeDecodeError, ValueError):
-            return body
+# La clase vive en app/core/responses.py para poder reutilizarla desde otros
+# módulos (caché de respuestas) sin importar main.py.
+from app.core.responses import MadridJSONResponse
 
 
 # Importamos los modelos SOLO para que se registren en Base.metadata
@@ -110,7 +81,7 @@ from app.measures.general_contrib_models import GeneralPeriodContribution  # noq
 from app.measures.bald_contrib_models import BaldPeriodContribution  # noqa: F401
 from app.measures.ps_models import PSPeriodContribution  # noqa: F401
 from app.measures.ps_detail_models import PSPeriodDetail  # noqa: F401
-from app.objeciones.models import ObjecionAGRECL, ObjecionINCL, ObjecionCUPS, ObjecionCIL  # noqa: F401
+from app.objeciones.models import ObjecionAGRECL, ObjecionINCL, ObjecionCUPS, ObjecionCIL, ObjecionFicheroResumen  # noqa: F401
 from app.objeciones.automatizacion.models import ObjecionesAutomatizacion, ObjecionesAlerta  # noqa: F401
 from app.measures.descarga.automatizacion.models import PublicacionesAutomatizacion, PublicacionesAlerta  # noqa: F401
 from app.envios.automatizacion.models import EnviosAutomatizacion, EnvioAlerta  # noqa: F401
@@ -179,6 +150,15 @@ app.add_middleware(
     expose_headers=["Content-Disposition"],
 )
 
+# ---------- Instrumentación de rendimiento ----------
+# Consultas / tiempo de BD / serialización por request. Se añade después de
+# CORS para quedar por fuera y medir la request completa. Ver app/core/perf.py.
+instrument_engine(engine)
+app.add_middleware(PerfMiddleware)
+# Consultas por etapa de los pipelines de ingestión/parseo
+# (ver app/core/pipeline_timing.py).
+instrumentar_engine_pipelines(engine)
+
 # ---------- Healthcheck ----------
 @app.get("/health")
 def health_check(db: Session = Depends(get_db)):
@@ -214,3 +194,4 @@ app.include_router(stg_router)
 app.include_router(gisce_router)
 app.include_router(wsprime_router)
 app.include_router(erp_router)
+app.include_router(admin_router)
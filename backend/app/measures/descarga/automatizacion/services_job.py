@@ -30,7 +30,8 @@ from typing import Dict, List, Optional, Tuple, cast
 
 from sqlalchemy.orm import Session
 
-from app.calendario_ree.models import ReeCalendarEvent
+from app.calendario_ree import services_indice
+from app.calendario_ree.services_indice import HitoRee
 from app.empresas.models import Empresa
 from app.measures.descarga.automatizacion.models import (
     TIPO_BUSCAR_PUBLICACIONES_REE,
@@ -48,15 +49,14 @@ logger = logging.getLogger(__name__)
 # Constantes — los 5 hitos REE (M1 + M2/M7/M11/ART15)
 # ═════════════════════════════════════════════════════════════════════════════
 
-# Mapeo de eventos REE a tipo de alerta. El `evento_contains` debe coincidir
-# exactamente con los nombres reales del calendario REE — son los mismos que
-# usa /calendario-ree/dashboard-hitos y se han verificado en producción.
+# Mapeo de hitos REE a tipo de alerta. Qué eventos del calendario son cada
+# hito (categoría + texto del evento, los mismos que usa
+# /calendario-ree/dashboard-hitos) lo decide app.calendario_ree.services_indice.
 #
 # Campos por hito:
 #   tipo_alerta     → string único para identificar el tipo de alerta en BD.
 #   label           → texto mostrado en logs.
-#   categoria       → filtro adicional sobre ReeCalendarEvent.categoria (None = no filtra).
-#   evento_contains → substring que debe contener ReeCalendarEvent.evento.
+#   hito_ree        → tipo de hito en el índice del calendario REE.
 #   tipos_fichero   → tipos del SFTP que pertenecen a este hito (filtra los
 #                     resultados de buscar_ftp). Vacío = no filtra por tipo.
 #   dias_antes      → cuántos días ANTES del hito empieza la ventana de detección.
@@ -72,8 +72,7 @@ _HITOS_PUBLICACION: List[Dict] = [
     {
         "tipo_alerta":     "publicacion_m1",
         "label":           "M1",
-        "categoria":       "M+1",
-        "evento_contains": "cierre m+1",
+        "hito_ree":        services_indice.HITO_PUBLICACION_M1,
         "tipos_fichero":   ["ACUMCIL", "ACUM_H2_GRD", "ACUM_H2_RDD_P1", "ACUM_H2_RDD_P2"],
         "dias_antes":      2,
         "dias_despues":    2,
@@ -81,8 +80,7 @@ _HITOS_PUBLICACION: List[Dict] = [
     {
         "tipo_alerta":     "publicacion_m2",
         "label":           "M2",
-        "categoria":       "M+2",
-        "evento_contains": "cierre m+2",
+        "hito_ree":        services_indice.HITO_PUBLICACION_M2,
         "tipos_fichero":   ["BALD"],
         "dias_antes":      0,
         "dias_despues":    2,
@@ -90,8 +88,7 @@ _HITOS_PUBLICACION: List[Dict] = [
     {
         "tipo_alerta":     "publicacion_m7",
         "label":           "M7",
-        "categoria":       None,
-        "evento_contains": "cierre provisional",
+        "hito_ree":        services_indice.HITO_PUBLICACION_M7,
         "tipos_fichero":   ["BALD"],
         "dias_antes":      0,
         "dias_despues":    2,
@@ -99,8 +96,7 @@ _HITOS_PUBLICACION: List[Dict] = [
     {
         "tipo_alerta":     "publicacion_m11",
         "label":           "M11",
-        "categoria":       None,
-        "evento_contains": "cierre definitivo",
+        "hito_ree":        services_indice.HITO_PUBLICACION_M11,
         "tipos_fichero":   ["BALD"],
         "dias_antes":      0,
         "dias_despues":    2,
@@ -108,8 +104,7 @@ _HITOS_PUBLICACION: List[Dict] = [
     {
         "tipo_alerta":     "publicacion_art15",
         "label":           "ART15",
-        "categoria":       "Art. 15",
-        "evento_contains": "publicacion nuevo cierre",
+        "hito_ree":        services_indice.HITO_PUBLICACION_ART15,
         "tipos_fichero":   ["BALD"],
         "dias_antes":      0,
         "dias_despues":    2,
@@ -121,42 +116,15 @@ _HITOS_PUBLICACION: List[Dict] = [
 # Helpers
 # ═════════════════════════════════════════════════════════════════════════════
 
-# Meses ES → número (espejo del helper de objeciones).
-_MESES_ES_A_NUM: Dict[str, int] = {
-    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
-    "julio": 7, "agosto": 8, "septiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
-}
-
-
-def _parsear_mes_afectado(mes_afectado: Optional[str]) -> Optional[Tuple[int, int, str]]:
-    """
-    Convierte "Junio 2025" → (2025, 6, "202506").
-    Devuelve None si no se puede parsear.
-    """
-    if not mes_afectado:
-        return None
-    partes = str(mes_afectado).strip().split()
-    if len(partes) != 2:
-        return None
-    nombre_mes = partes[0].lower()
-    anio_str = partes[1]
-    mes_num = _MESES_ES_A_NUM.get(nombre_mes)
-    if mes_num is None or not anio_str.isdigit() or len(anio_str) != 4:
-        return None
-    anio = int(anio_str)
-    periodo_yyyymm = f"{anio:04d}{mes_num:02d}"
-    return anio, mes_num, periodo_yyyymm
-
-
 def _hitos_publicacion_en_ventana(
     db: Session,
     *,
     tenant_id: int,
-) -> List[Tuple[ReeCalendarEvent, Dict]]:
+) -> List[Tuple[HitoRee, Dict]]:
     """
-    Busca eventos del calendario REE que sean hitos de publicación
-    (M1 / M2 / M7 / M11 / ART15) y caigan dentro de la ventana definida por
-    el propio hito (`dias_antes` / `dias_despues`).
+    Busca hitos de publicación del calendario REE (M1 / M2 / M7 / M11 /
+    ART15) que caigan dentro de la ventana definida por el propio hito
+    (`dias_antes` / `dias_despues`).
 
     Cada hito define su propia ventana porque:
       - BALD (M2/M7/M11/ART15): solo futuro (hoy → hoy+2) — REE publica con margen.
@@ -164,63 +132,24 @@ def _hitos_publicacion_en_ventana(
                                 publicar el mismo día del hito y conviene seguir
                                 detectándolo 1-2 días después.
 
-    Para limitar la consulta SQL hacemos un primer filtro amplio con la
-    ventana MÁXIMA de cualquier hito, y luego validamos hito a hito.
+    El hito está "en ventana" si hoy ∈ [fecha - dias_antes, fecha + dias_despues],
+    es decir, fecha ∈ [hoy - dias_despues, hoy + dias_antes]: un rango por
+    tipo de hito sobre el índice del calendario.
 
-    Devuelve lista de (evento, hito_meta) para no perder la asociación
-    de qué tipo de alerta corresponde.
+    Devuelve lista de (hito, hito_meta), por fecha, para no perder la
+    asociación de qué tipo de alerta corresponde.
     """
     hoy = date.today()
+    indice = services_indice.obtener_indice(db, tenant_id=tenant_id)
 
-    # Ventana SQL amplia: el máximo `dias_antes` y `dias_despues` de cualquier hito.
-    max_dias_antes   = max(int(h.get("dias_antes",   0)) for h in _HITOS_PUBLICACION) if _HITOS_PUBLICACION else 0
-    max_dias_despues = max(int(h.get("dias_despues", 0)) for h in _HITOS_PUBLICACION) if _HITOS_PUBLICACION else 0
-    fecha_desde_sql  = hoy - timedelta(days=max_dias_antes)
-    fecha_hasta_sql  = hoy + timedelta(days=max_dias_despues)
-
-    eventos = (
-        db.query(ReeCalendarEvent)
-        .filter(
-            ReeCalendarEvent.tenant_id == tenant_id,
-            ReeCalendarEvent.fecha     >= fecha_desde_sql,
-            ReeCalendarEvent.fecha     <= fecha_hasta_sql,
-        )
-        .order_by(ReeCalendarEvent.fecha.asc(), ReeCalendarEvent.id.asc())
-        .all()
-    )
-
-    matches: List[Tuple[ReeCalendarEvent, Dict]] = []
-    for ev in eventos:
-        ev_evento_lower    = (cast(str, getattr(ev, "evento", "")) or "").lower()
-        ev_categoria_lower = (cast(str, getattr(ev, "categoria", "")) or "").lower()
-        ev_fecha           = cast(date, getattr(ev, "fecha", None))
-
-        for hito in _HITOS_PUBLICACION:
-            evento_contains  = hito["evento_contains"].lower()
-            categoria_filtro = hito.get("categoria")
-
-            if evento_contains not in ev_evento_lower:
-                continue
-            # Si el hito requiere una categoría específica, validarla.
-            if categoria_filtro is not None:
-                if str(categoria_filtro).lower() not in ev_categoria_lower:
-                    continue
-
-            # Ventana específica de este hito: hito ya tiene una fecha concreta
-            # en el calendario (ev_fecha). El hito está "en ventana" si
-            # hoy está dentro de [ev_fecha - dias_antes, ev_fecha + dias_despues].
-            if ev_fecha is None:
-                continue
-            dias_antes   = int(hito.get("dias_antes",   0))
-            dias_despues = int(hito.get("dias_despues", 0))
-            ventana_desde = ev_fecha - timedelta(days=dias_antes)
-            ventana_hasta = ev_fecha + timedelta(days=dias_despues)
-            if not (ventana_desde <= hoy <= ventana_hasta):
-                continue
-
-            matches.append((ev, hito))
-            break  # un evento corresponde a 1 solo tipo de hito
+    matches: List[Tuple[HitoRee, Dict]] = []
+    for hito_meta in _HITOS_PUBLICACION:
+        desde = hoy - timedelta(days=int(hito_meta.get("dias_despues", 0)))
+        hasta = hoy + timedelta(days=int(hito_meta.get("dias_antes", 0)))
+        for hito in indice.en_rango(desde, hasta, tipo=hito_meta["hito_ree"]):
+            matches.append((hito, hito_meta))
 
+    matches.sort(key=lambda m: (m[0].fecha, m[0].id))
     return matches
 
 
@@ -336,14 +265,13 @@ def ejecutar_chequeo_publicaciones_tenant(
     errores: List[str] = []
 
     for hito_event, hito_meta in hitos:
-        parsed = _parsear_mes_afectado(getattr(hito_event, "mes_afectado", None))
-        if parsed is None:
+        periodo_yyyymm = hito_event.periodo_yyyymm
+        if periodo_yyyymm is None:
             errores.append(
-                f"No se pudo parsear mes_afectado='{hito_event.mes_afectado}' (hito id={hito_event.id})"
+                f"No se pudo parsear mes_afectado='{hito_event.mes_afectado_texto}' (hito id={hito_event.id})"
             )
             continue
 
-        anio_periodo, mes_periodo, periodo_yyyymm = parsed
         tipo_alerta   = hito_meta["tipo_alerta"]
         label_hito    = hito_meta["label"]
         tipos_fichero = hito_meta.get("tipos_fichero") or []
@@ -19,6 +19,7 @@ que la subida manual desde "Carga de datos".
 from __future__ import annotations
 
 import bz2
+import hashlib
 from concurrent.futures import ThreadPoolExecutor
 from dataclasses import dataclass
 from datetime import date, datetime, timedelta
@@ -120,85 +121,28 @@ def _calcular_fecha_desde_calendario_ree(db: Session, *, tenant_id: int) -> Opti
     basándose en las fechas oficiales de publicación del calendario REE
     para el mes en curso + mes anterior.
 
-    Devuelve la fecha más antigua de las 4 fechas REE (M2/M7/M11/ART15) de
-    los 2 meses en formato 'YYYY-MM-DD', o None si no hay calendario cargado
-    para el tenant — en cuyo caso el caller cae al filtro genérico de 20 días.
+    Devuelve la fecha más antigua de los hitos REE de esos 2 meses en
+    formato 'YYYY-MM-DD', o None si no hay calendario cargado para el
+    tenant — en cuyo caso el caller cae al filtro genérico de 20 días.
 
     Cubrir mes en curso + mes anterior evita perder ficheros publicados en
     las últimas semanas que correspondían al ciclo del mes pasado.
     """
-    from app.calendario_ree.models import ReeCalendarEvent
+    from app.calendario_ree.services_indice import obtener_indice
 
     hoy = date.today()
-    target_anio = hoy.year
 
-    # Mes en curso y mes anterior.
-    mes_actual = hoy.month
-    if mes_actual == 1:
-        mes_anterior_anio = hoy.year - 1
-        mes_anterior_mes  = 12
-    else:
-        mes_anterior_anio = hoy.year
-        mes_anterior_mes  = hoy.month - 1
-
-    # Si el mes anterior está en otro año, hacemos 2 consultas; si no, 1 sola
-    # con anio = hoy.year y filtramos por mes (mes_anterior, mes_actual).
-    fechas_relevantes: List[date] = []
-
-    if mes_anterior_anio == target_anio:
-        # Misma consulta — un solo año, dos meses
-        rows = (
-            db.query(ReeCalendarEvent.fecha)
-            .filter(
-                ReeCalendarEvent.tenant_id == tenant_id,
-                ReeCalendarEvent.anio == target_anio,
-            )
-            .all()
-        )
-        for (fecha_evt,) in rows:
-            if fecha_evt is None:
-                continue
-            f = cast(date, fecha_evt)
-            if (f.year == hoy.year and f.month == mes_actual) \
-               or (f.year == mes_anterior_anio and f.month == mes_anterior_mes):
-                fechas_relevantes.append(f)
-    else:
-        # Cruce de año (enero → diciembre del año anterior).
-        rows_actual = (
-            db.query(ReeCalendarEvent.fecha)
-            .filter(
-                ReeCalendarEvent.tenant_id == tenant_id,
-                ReeCalendarEvent.anio == target_anio,
-            )
-            .all()
-        )
-        for (fecha_evt,) in rows_actual:
-            if fecha_evt is None:
-                continue
-            f = cast(date, fecha_evt)
-            if f.year == hoy.year and f.month == mes_actual:
-                fechas_relevantes.append(f)
-
-        rows_anterior = (
-            db.query(ReeCalendarEvent.fecha)
-            .filter(
-                ReeCalendarEvent.tenant_id == tenant_id,
-                ReeCalendarEvent.anio == mes_anterior_anio,
-            )
-            .all()
-        )
-        for (fecha_evt,) in rows_anterior:
-            if fecha_evt is None:
-                continue
-            f = cast(date, fecha_evt)
-            if f.year == mes_anterior_anio and f.month == mes_anterior_mes:
-                fechas_relevantes.append(f)
+    # Del día 1 del mes anterior al último día del mes en curso.
+    primer_dia_mes = hoy.replace(day=1)
+    desde = (primer_dia_mes - timedelta(days=1)).replace(day=1)
+    hasta = (primer_dia_mes + timedelta(days=32)).replace(day=1) - timedelta(days=1)
 
-    if not fechas_relevantes:
+    # Los hitos del índice están ordenados por fecha: el primero es el mínimo.
+    hitos = obtener_indice(db, tenant_id=tenant_id).en_rango(desde, hasta)
+    if not hitos:
         return None
 
-    fecha_min = min(fechas_relevantes)
-    return fecha_min.isoformat()
+    return hitos[0].fecha.isoformat()
 
 
 # ── Listado SFTP ──────────────────────────────────────────────────────────────
@@ -858,6 +802,7 @@ def _procesar_item(
         ex.processed_at  = None
         ex.updated_at    = ahora_madrid()
         ex.warnings_json = None
+        ex.content_sha256 = hashlib.sha256(contenido).hexdigest()
         db.commit()
         db.refresh(existing)
         if old_storage_key and old_storage_key != storage_key:
@@ -876,6 +821,7 @@ def _procesar_item(
             "status":        IngestionFile.STATUS_PENDING,
             "uploaded_by":   uploaded_by,
             "warnings_json": None,
+            "content_sha256": hashlib.sha256(contenido).hexdigest(),
         }
         ingestion = IngestionFile(**ingestion_data)  # type: ignore[arg-type]
         db.add(ingestion)
@@ -166,6 +166,16 @@ class MedidaGeneral(TimestampMixin, Base):
             "ix_medidas_general_punto_id",
             "punto_id",
         ),
+        # Mismo orden que los listados paginados (/page): permite paginar
+        # por cursor (keyset) sin OFFSET. Ver app/core/pagination.py.
+        Index(
+            "ix_medidas_general_keyset",
+            tenant_id,
+            anio.desc(),
+            mes.desc(),
+            empresa_id,
+            id,
+        ),
     )
 
 
@@ -268,4 +278,14 @@ class MedidaPS(TimestampMixin, Base):
             "ix_medidas_ps_punto_id",
             "punto_id",
         ),
+        # Mismo orden que los listados paginados (/page): permite paginar
+        # por cursor (keyset) sin OFFSET. Ver app/core/pagination.py.
+        Index(
+            "ix_medidas_ps_keyset",
+            tenant_id,
+            anio.desc(),
+            mes.desc(),
+            empresa_id,
+            id,
+        ),
     )
\ No newline at end of file
@@ -2,14 +2,18 @@ from __future__ import annotations
 
 from typing import Any, cast
 
-from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, Response, status
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
-from sqlalchemy import func, or_, and_, select
+from sqlalchemy import or_, and_, select
 from sqlalchemy.orm import Session
 
 from app.core.auth import get_current_active_superuser, get_current_user
 from app.core.db import get_db
+from app.core.exports import export_response, iter_query
+from app.core.pagination import count_rows, keyset_fetch
 from app.core.permissions import get_allowed_empresa_ids
+from app.core.response_cache import bump_data_version, cached_json_response
 from app.empresas.models import Empresa
 from app.ingestion.models import IngestionFile
 from app.measures.m1_models import M1PeriodContribution
@@ -18,6 +22,7 @@ from app.measures.ps_detail_models import PSPeriodDetail
 from app.measures.ps_models import PSPeriodContribution
 from app.measures.router.utils import (
     build_empresa_codigo,
+    empresa_codigo_map,
     paginate,
     sanitize_medida,
 )
@@ -230,6 +235,7 @@ def borrar_medidas_generales_todos_tenants(
     )
 
     db.commit()
+    bump_data_version(tenant_id)
 
     return {
         "mode": "deep",
@@ -277,6 +283,7 @@ def borrar_medidas_generales_todos_tenants_por_ids(
     )
 
     db.commit()
+    bump_data_version(None)
 
     return {
         "ids": ids,
@@ -285,13 +292,12 @@ def borrar_medidas_generales_todos_tenants_por_ids(
     }
 
 
-@router.get("/filters")
-def medidas_general_filters(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+def _medidas_general_filters_payload(
+    db: Session,
+    *,
+    tenant_id: int,
+    allowed_empresa_ids: list[int],
 ) -> dict[str, Any]:
-    tenant_id = int(cast(int, current_user.tenant_id))
-    allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
 
     if not allowed_empresa_ids:
         return {"empresas": [], "anios": [], "meses": [], "ultimo_periodo": None}
@@ -363,6 +369,27 @@ def medidas_general_filters(
     return {"empresas": empresas, "anios": anios, "meses": meses, "ultimo_periodo": ultimo_periodo}
 
 
+@router.get("/filters")
+def medidas_general_filters(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Response:
+    tenant_id = int(cast(int, current_user.tenant_id))
+    allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
+    return cached_json_response(
+        request,
+        namespace="medidas.general.filters",
+        tenant_id=tenant_id,
+        allowed_empresa_ids=allowed_empresa_ids,
+        build=lambda: _medidas_general_filters_payload(
+            db,
+            tenant_id=tenant_id,
+            allowed_empresa_ids=allowed_empresa_ids,
+        ),
+    )
+
+
 @router.get("/all/filters")
 def medidas_general_filters_all(
     db: Session = Depends(get_db),
@@ -433,6 +460,8 @@ def listar_medidas_generales_page(
     periodos: str | None = Query(default=None, description="Pares año-mes exactos: 2025-10,2025-11,2026-01"),
     page: int = Query(default=0, ge=0),
     page_size: int = Query(default=50, ge=1, le=500),
+    cursor: str | None = Query(default=None, description="Cursor opaco devuelto en next_cursor; si se envía, se ignora page"),
+    count: str = Query(default="exact", pattern="^(exact|estimate|none)$"),
 ) -> dict[str, Any]:
     tenant_id = int(cast(int, current_user.tenant_id))
     allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
@@ -477,26 +506,21 @@ def listar_medidas_generales_page(
         base = base.filter(MedidaGeneral.empresa_id.in_(empresa_ids_list))
     base = _apply_period_filter(base, MedidaGeneral, periodos_list, anios_list, meses_list)
 
-    total = db.query(func.count(MedidaGeneral.id)).filter(
-        MedidaGeneral.tenant_id == tenant_id,
-        MedidaGeneral.empresa_id.in_(allowed_empresa_ids),
-    )
-    if empresa_ids_list:
-        total = total.filter(MedidaGeneral.empresa_id.in_(empresa_ids_list))
-    total = _apply_period_filter(total, MedidaGeneral, periodos_list, anios_list, meses_list)
-
-    total_int = int(total.scalar() or 0)
-    pg = paginate(total_int, page, page_size)
-
-    filas = (
-        base.order_by(
-            MedidaGeneral.anio.desc(),
-            MedidaGeneral.mes.desc(),
-            MedidaGeneral.empresa_id.asc(),
-        )
-        .offset(pg["offset"])
-        .limit(pg["limit"])
-        .all()
+    total = count_rows(db, base, count)
+    pg = paginate(total, page, page_size, estimated=(count == "estimate"))
+
+    filas, next_cursor = keyset_fetch(
+        base,
+        order_by=[
+            (MedidaGeneral.anio, "desc"),
+            (MedidaGeneral.mes, "desc"),
+            (MedidaGeneral.empresa_id, "asc"),
+            (MedidaGeneral.id, "asc"),
+        ],
+        cursor=cursor,
+        offset=pg["offset"],
+        limit=pg["limit"],
+        cursor_values=lambda row: [row[0].anio, row[0].mes, row[0].empresa_id, row[0].id],
     )
 
     items: list[dict[str, Any]] = []
@@ -511,6 +535,8 @@ def listar_medidas_generales_page(
         "page_size": pg["page_size"],
         "total": pg["total"],
         "total_pages": pg["total_pages"],
+        "total_estimated": count == "estimate",
+        "next_cursor": next_cursor,
     }
 
 
@@ -529,6 +555,8 @@ def listar_medidas_generales_all_page(
     periodos: str | None = Query(default=None, description="Pares año-mes exactos: 2025-10,2025-11,2026-01"),
     page: int = Query(default=0, ge=0),
     page_size: int = Query(default=50, ge=1, le=500),
+    cursor: str | None = Query(default=None, description="Cursor opaco devuelto en next_cursor; si se envía, se ignora page"),
+    count: str = Query(default="exact", pattern="^(exact|estimate|none)$"),
 ) -> dict[str, Any]:
     _ = current_user
 
@@ -549,26 +577,22 @@ def listar_medidas_generales_all_page(
         base = base.filter(MedidaGeneral.empresa_id.in_(empresa_ids_list))
     base = _apply_period_filter(base, MedidaGeneral, periodos_list, anios_list, meses_list)
 
-    total_q = db.query(func.count(MedidaGeneral.id))
-    if tenant_ids_list:
-        total_q = total_q.filter(MedidaGeneral.tenant_id.in_(tenant_ids_list))
-    if empresa_ids_list:
-        total_q = total_q.filter(MedidaGeneral.empresa_id.in_(empresa_ids_list))
-    total_q = _apply_period_filter(total_q, MedidaGeneral, periodos_list, anios_list, meses_list)
-
-    total_int = int(total_q.scalar() or 0)
-    pg = paginate(total_int, page, page_size)
-
-    filas = (
-        base.order_by(
-            MedidaGeneral.anio.desc(),
-            MedidaGeneral.mes.desc(),
-            MedidaGeneral.tenant_id.asc(),
-            MedidaGeneral.empresa_id.asc(),
-        )
-        .offset(pg["offset"])
-        .limit(pg["limit"])
-        .all()
+    total = count_rows(db, base, count)
+    pg = paginate(total, page, page_size, estimated=(count == "estimate"))
+
+    filas, next_cursor = keyset_fetch(
+        base,
+        order_by=[
+            (MedidaGeneral.anio, "desc"),
+            (MedidaGeneral.mes, "desc"),
+            (MedidaGeneral.tenant_id, "asc"),
+            (MedidaGeneral.empresa_id, "asc"),
+            (MedidaGeneral.id, "asc"),
+        ],
+        cursor=cursor,
+        offset=pg["offset"],
+        limit=pg["limit"],
+        cursor_values=lambda row: [row[0].anio, row[0].mes, row[0].tenant_id, row[0].empresa_id, row[0].id],
     )
 
     items: list[dict[str, Any]] = []
@@ -583,8 +607,69 @@ def listar_medidas_generales_all_page(
         "page_size": pg["page_size"],
         "total": pg["total"],
         "total_pages": pg["total_pages"],
+        "total_estimated": count == "estimate",
+        "next_cursor": next_cursor,
     }
 
+
+@router.get("/export")
+def exportar_medidas_generales(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    formato: str = Query(default="csv", pattern="^(csv|xlsx)$"),
+    empresa_id: int | None = Query(default=None),
+    anio: int | None = Query(default=None),
+    mes: int | None = Query(default=None),
+    empresa_ids: str | None = Query(default=None),
+    anios: str | None = Query(default=None),
+    meses: str | None = Query(default=None),
+    periodos: str | None = Query(default=None, description="Pares año-mes exactos: 2025-10,2025-11,2026-01"),
+) -> StreamingResponse:
+    """
+    Exporta en streaming (CSV o XLSX) las medidas generales con los mismos
+    filtros y permisos que /page, sin límite de filas.
+    """
+    tenant_id = int(cast(int, current_user.tenant_id))
+    allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
+
+    empresa_ids_list = _merge_single_and_multi(single_value=empresa_id, multi_value=empresa_ids)
+    anios_list = _merge_single_and_multi(single_value=anio, multi_value=anios)
+    meses_list = _merge_single_and_multi(single_value=mes, multi_value=meses)
+    periodos_list = _parse_periodos(periodos)
+
+    if empresa_ids_list:
+        empresa_ids_list = [eid for eid in empresa_ids_list if eid in allowed_empresa_ids]
+    else:
+        empresa_ids_list = list(allowed_empresa_ids)
+
+    columnas = list(MedidaGeneral.__table__.columns)
+    query = db.query(*columnas).filter(
+        MedidaGeneral.tenant_id == tenant_id,
+        MedidaGeneral.empresa_id.in_(empresa_ids_list or [-1]),
+    )
+    query = _apply_period_filter(query, MedidaGeneral, periodos_list, anios_list, meses_list)
+    query = query.order_by(
+        MedidaGeneral.anio.desc(),
+        MedidaGeneral.mes.desc(),
+        MedidaGeneral.empresa_id.asc(),
+        MedidaGeneral.id.asc(),
+    )
+
+    codigos = empresa_codigo_map(db, empresa_ids_list)
+    idx_empresa = [c.name for c in columnas].index("empresa_id")
+
+    def _rows():
+        for row in iter_query(query):
+            yield (*row, codigos.get(row[idx_empresa]))
+
+    return export_response(
+        formato=formato,
+        filename_base="medidas_general",
+        headers=[c.name for c in columnas] + ["empresa_codigo"],
+        rows=_rows(),
+        sheet_title="Medidas general",
+    )
+
 # ═════════════════════════════════════════════════════════════════════════════
 # PATCH de comentarios libres por ventana (M1/M2/M7/M11/ART15)
 # ═════════════════════════════════════════════════════════════════════════════
@@ -632,5 +717,6 @@ def actualizar_comentarios_medida_general(
 
     db.commit()
     db.refresh(mg)
+    bump_data_version(tenant_id)
 
     return sanitize_medida(mg)
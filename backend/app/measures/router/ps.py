@@ -4,20 +4,25 @@ import re
 from decimal import Decimal
 from typing import Any, Optional, cast
 
-from fastapi import APIRouter, Body, Depends, Query
+from fastapi import APIRouter, Body, Depends, Query, Request, Response
+from fastapi.responses import StreamingResponse
 from pydantic import BaseModel
 from sqlalchemy import and_, func, or_, select
 from sqlalchemy.orm import Session
 
 from app.core.auth import get_current_active_superuser, get_current_user
 from app.core.db import get_db
+from app.core.exports import export_response, iter_query
+from app.core.pagination import count_rows, keyset_fetch
 from app.core.permissions import get_allowed_empresa_ids
+from app.core.response_cache import bump_data_version, cached_json_response
 from app.empresas.models import Empresa
 from app.ingestion.models import IngestionFile
 from app.measures.m1_models import M1PeriodContribution
 from app.measures.models import MedidaGeneral, MedidaPS
 from app.measures.ps_detail_models import PSPeriodDetail
 from app.measures.ps_models import PSPeriodContribution
+from app.measures.router.utils import empresa_codigo_map
 from app.tenants.models import User
 
 router = APIRouter(prefix="/ps", tags=["medidas_ps"])
@@ -151,12 +156,37 @@ def _build_empresa_codigo(empresa: Empresa) -> str | None:
     return raw
 
 
-def _paginate(total: int, page: int, page_size: int) -> dict[str, int]:
+def _paginate(
+    total: int | None,
+    page: int,
+    page_size: int,
+    *,
+    estimated: bool = False,
+) -> dict:
+    """
+    Calcula offset/limit para la página pedida.
+
+    Con `total=None` (conteo desactivado) o `estimated=True` (estimación del
+    planner) no se recorta la página al último número de página, porque el
+    total no es fiable.
+    """
     page_size_safe = max(1, min(int(page_size), 500))
     page_safe = max(0, int(page))
+
+    if total is None:
+        return {
+            "page": page_safe,
+            "page_size": page_size_safe,
+            "total": None,
+            "total_pages": None,
+            "offset": int(page_safe * page_size_safe),
+            "limit": int(page_size_safe),
+        }
+
     total_pages = max(1, math.ceil(total / page_size_safe)) if total > 0 else 1
-    if page_safe > total_pages - 1:
+    if not estimated and page_safe > total_pages - 1:
         page_safe = total_pages - 1
+
     return {
         "page": page_safe,
         "page_size": page_size_safe,
@@ -348,6 +378,7 @@ def borrar_medidas_ps_todos_tenants(
             file_ids_select=cast(Any, file_ids_select),
         )
         db.commit()
+        bump_data_version(None)
         return {
             "mode": "deep_ids",
             "ids": payload.ids,
@@ -376,6 +407,7 @@ def borrar_medidas_ps_todos_tenants(
         file_ids_select=cast(Any, file_ids_select),
     )
     db.commit()
+    bump_data_version(tenant_id)
     return {
         "mode": "deep_filters",
         "filters": {
@@ -389,13 +421,12 @@ def borrar_medidas_ps_todos_tenants(
     }
 
 
-@router.get("/filters")
-def medidas_ps_filters(
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+def _medidas_ps_filters_payload(
+    db: Session,
+    *,
+    tenant_id: int,
+    allowed_empresa_ids: list[int],
 ) -> dict[str, Any]:
-    tenant_id = int(cast(int, current_user.tenant_id))
-    allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
     if not allowed_empresa_ids:
         return {"empresas": [], "anios": [], "meses": [], "tarifas": [], "ultimo_periodo": None}
     empresas_rows = (
@@ -487,6 +518,27 @@ def medidas_ps_filters(
     return {"empresas": empresas, "anios": anios, "meses": meses, "tarifas": tarifas, "ultimo_periodo": ultimo_periodo}
 
 
+@router.get("/filters")
+def medidas_ps_filters(
+    request: Request,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Response:
+    tenant_id = int(cast(int, current_user.tenant_id))
+    allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
+    return cached_json_response(
+        request,
+        namespace="medidas.ps.filters",
+        tenant_id=tenant_id,
+        allowed_empresa_ids=allowed_empresa_ids,
+        build=lambda: _medidas_ps_filters_payload(
+            db,
+            tenant_id=tenant_id,
+            allowed_empresa_ids=allowed_empresa_ids,
+        ),
+    )
+
+
 @router.get("/all/filters")
 def medidas_ps_filters_all(
     db: Session = Depends(get_db),
@@ -576,6 +628,8 @@ def listar_medidas_ps_page(
     periodos: str | None = Query(default=None, description="Pares año-mes exactos: 2025-10,2025-11,2026-01"),
     page: int = Query(default=0, ge=0),
     page_size: int = Query(default=50, ge=1, le=500),
+    cursor: str | None = Query(default=None, description="Cursor opaco devuelto en next_cursor; si se envía, se ignora page"),
+    count: str = Query(default="exact", pattern="^(exact|estimate|none)$"),
 ) -> dict[str, Any]:
     tenant_id = int(cast(int, current_user.tenant_id))
     allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
@@ -613,27 +667,20 @@ def listar_medidas_ps_page(
     if tarifa:
         base = _ps_tarifa_filter(base, tarifa)
 
-    total_q = db.query(func.count(MedidaPS.id)).filter(
-        MedidaPS.tenant_id == tenant_id,
-        MedidaPS.empresa_id.in_(allowed_empresa_ids),
-    )
-    if empresa_ids_list:
-        total_q = total_q.filter(MedidaPS.empresa_id.in_(empresa_ids_list))
-    total_q = _apply_period_filter(total_q, MedidaPS, periodos_list, anios_list, meses_list)
-    if tarifa:
-        total_q = _ps_tarifa_filter(total_q, tarifa)
-
-    total_int = int(total_q.scalar() or 0)
-    pg = _paginate(total_int, page, page_size)
-    filas = (
-        base.order_by(
-            MedidaPS.anio.desc(),
-            MedidaPS.mes.desc(),
-            MedidaPS.empresa_id.asc(),
-        )
-        .offset(pg["offset"])
-        .limit(pg["limit"])
-        .all()
+    total = count_rows(db, base, count)
+    pg = _paginate(total, page, page_size, estimated=(count == "estimate"))
+    filas, next_cursor = keyset_fetch(
+        base,
+        order_by=[
+            (MedidaPS.anio, "desc"),
+            (MedidaPS.mes, "desc"),
+            (MedidaPS.empresa_id, "asc"),
+            (MedidaPS.id, "asc"),
+        ],
+        cursor=cursor,
+        offset=pg["offset"],
+        limit=pg["limit"],
+        cursor_values=lambda row: [row[0].anio, row[0].mes, row[0].empresa_id, row[0].id],
     )
     items: list[dict[str, Any]] = []
     for mp, empresa in filas:
@@ -646,6 +693,8 @@ def listar_medidas_ps_page(
         "page_size": pg["page_size"],
         "total": pg["total"],
         "total_pages": pg["total_pages"],
+        "total_estimated": count == "estimate",
+        "next_cursor": next_cursor,
     }
 
 
@@ -665,6 +714,8 @@ def listar_medidas_ps_all_page(
     periodos: str | None = Query(default=None, description="Pares año-mes exactos: 2025-10,2025-11,2026-01"),
     page: int = Query(default=0, ge=0),
     page_size: int = Query(default=50, ge=1, le=500),
+    cursor: str | None = Query(default=None, description="Cursor opaco devuelto en next_cursor; si se envía, se ignora page"),
+    count: str = Query(default="exact", pattern="^(exact|estimate|none)$"),
 ) -> dict[str, Any]:
     _ = current_user
     tenant_ids_list = _merge_single_and_multi(single_value=tenant_id, multi_value=tenant_ids)
@@ -685,27 +736,21 @@ def listar_medidas_ps_all_page(
     if tarifa:
         base = _ps_tarifa_filter(base, tarifa)
 
-    total_q = db.query(func.count(MedidaPS.id))
-    if tenant_ids_list:
-        total_q = total_q.filter(MedidaPS.tenant_id.in_(tenant_ids_list))
-    if empresa_ids_list:
-        total_q = total_q.filter(MedidaPS.empresa_id.in_(empresa_ids_list))
-    total_q = _apply_period_filter(total_q, MedidaPS, periodos_list, anios_list, meses_list)
-    if tarifa:
-        total_q = _ps_tarifa_filter(total_q, tarifa)
-
-    total_int = int(total_q.scalar() or 0)
-    pg = _paginate(total_int, page, page_size)
-    filas = (
-        base.order_by(
-            MedidaPS.anio.desc(),
-            MedidaPS.mes.desc(),
-            MedidaPS.tenant_id.asc(),
-            MedidaPS.empresa_id.asc(),
-        )
-        .offset(pg["offset"])
-        .limit(pg["limit"])
-        .all()
+    total = count_rows(db, base, count)
+    pg = _paginate(total, page, page_size, estimated=(count == "estimate"))
+    filas, next_cursor = keyset_fetch(
+        base,
+        order_by=[
+            (MedidaPS.anio, "desc"),
+            (MedidaPS.mes, "desc"),
+            (MedidaPS.tenant_id, "asc"),
+            (MedidaPS.empresa_id, "asc"),
+            (MedidaPS.id, "asc"),
+        ],
+        cursor=cursor,
+        offset=pg["offset"],
+        limit=pg["limit"],
+        cursor_values=lambda row: [row[0].anio, row[0].mes, row[0].tenant_id, row[0].empresa_id, row[0].id],
     )
     items: list[dict[str, Any]] = []
     for mp, empresa in filas:
@@ -718,4 +763,143 @@ def listar_medidas_ps_all_page(
         "page_size": pg["page_size"],
         "total": pg["total"],
         "total_pages": pg["total_pages"],
+        "total_estimated": count == "estimate",
+        "next_cursor": next_cursor,
     }
+
+
+def _export_empresa_ids(
+    allowed_empresa_ids: list[int],
+    empresa_id: int | None,
+    empresa_ids: str | None,
+) -> list[int]:
+    empresa_ids_list = _merge_single_and_multi(single_value=empresa_id, multi_value=empresa_ids)
+    if empresa_ids_list:
+        return [eid for eid in empresa_ids_list if eid in allowed_empresa_ids]
+    return list(allowed_empresa_ids)
+
+
+@router.get("/export")
+def exportar_medidas_ps(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    formato: str = Query(default="csv", pattern="^(csv|xlsx)$"),
+    empresa_id: int | None = Query(default=None),
+    anio: int | None = Query(default=None),
+    mes: int | None = Query(default=None),
+    tarifa: str | None = Query(default=None),
+    empresa_ids: str | None = Query(default=None),
+    anios: str | None = Query(default=None),
+    meses: str | None = Query(default=None),
+    periodos: str | None = Query(default=None, description="Pares año-mes exactos: 2025-10,2025-11,2026-01"),
+) -> StreamingResponse:
+    """
+    Exporta en streaming (CSV o XLSX) las medidas PS con los mismos filtros
+    y permisos que /page, sin límite de filas.
+    """
+    tenant_id = int(cast(int, current_user.tenant_id))
+    allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
+    empresa_ids_list = _export_empresa_ids(allowed_empresa_ids, empresa_id, empresa_ids)
+    anios_list = _merge_single_and_multi(single_value=anio, multi_value=anios)
+    meses_list = _merge_single_and_multi(single_value=mes, multi_value=meses)
+    periodos_list = _parse_periodos(periodos)
+
+    columnas = list(MedidaPS.__table__.columns)
+    query = db.query(*columnas).filter(
+        MedidaPS.tenant_id == tenant_id,
+        MedidaPS.empresa_id.in_(empresa_ids_list or [-1]),
+    )
+    query = _apply_period_filter(query, MedidaPS, periodos_list, anios_list, meses_list)
+    if tarifa:
+        query = _ps_tarifa_filter(query, tarifa)
+    query = query.order_by(
+        MedidaPS.anio.desc(),
+        MedidaPS.mes.desc(),
+        MedidaPS.empresa_id.asc(),
+        MedidaPS.id.asc(),
+    )
+
+    codigos = empresa_codigo_map(db, empresa_ids_list)
+    idx_empresa = [c.name for c in columnas].index("empresa_id")
+
+    def _rows():
+        for row in iter_query(query):
+            yield (*row, codigos.get(row[idx_empresa]))
+
+    return export_response(
+        formato=formato,
+        filename_base="medidas_ps",
+        headers=[c.name for c in columnas] + ["empresa_codigo"],
+        rows=_rows(),
+        sheet_title="Medidas PS",
+    )
+
+
+@router.get("/detail/export")
+def exportar_ps_period_detail(
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+    formato: str = Query(default="csv", pattern="^(csv|xlsx)$"),
+    empresa_id: int | None = Query(default=None),
+    anio: int | None = Query(default=None),
+    mes: int | None = Query(default=None),
+    empresa_ids: str | None = Query(default=None),
+    anios: str | None = Query(default=None),
+    meses: str | None = Query(default=None),
+    periodos: str | None = Query(default=None, description="Pares año-mes exactos: 2025-10,2025-11,2026-01"),
+    tarifa_acceso: str | None = Query(default=None),
+    cups: str | None = Query(default=None),
+) -> StreamingResponse:
+    """
+    Exporta en streaming el detalle PS por CUPS (ps_period_detail), con los
+    mismos permisos por empresa que los listados de medidas PS.
+    """
+    tenant_id = int(cast(int, current_user.tenant_id))
+    allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
+    empresa_ids_list = _export_empresa_ids(allowed_empresa_ids, empresa_id, empresa_ids)
+    anios_list = _merge_single_and_multi(single_value=anio, multi_value=anios)
+    meses_list = _merge_single_and_multi(single_value=mes, multi_value=meses)
+    periodos_list = _parse_periodos(periodos)
+
+    columnas = [
+        PSPeriodDetail.empresa_id,
+        PSPeriodDetail.anio,
+        PSPeriodDetail.mes,
+        PSPeriodDetail.cups,
+        PSPeriodDetail.poliza,
+        PSPeriodDetail.tarifa_acceso,
+        PSPeriodDetail.energia_facturada_kwh,
+        PSPeriodDetail.importe_total_eur,
+        PSPeriodDetail.is_principal,
+        PSPeriodDetail.ingestion_file_id,
+    ]
+    query = db.query(*columnas).filter(
+        PSPeriodDetail.tenant_id == tenant_id,
+        PSPeriodDetail.empresa_id.in_(empresa_ids_list or [-1]),
+    )
+    query = _apply_period_filter(query, PSPeriodDetail, periodos_list, anios_list, meses_list)
+    if tarifa_acceso:
+        query = query.filter(PSPeriodDetail.tarifa_acceso == tarifa_acceso.strip())
+    if cups:
+        query = query.filter(PSPeriodDetail.cups == cups.strip())
+    query = query.order_by(
+        PSPeriodDetail.anio.desc(),
+        PSPeriodDetail.mes.desc(),
+        PSPeriodDetail.empresa_id.asc(),
+        PSPeriodDetail.cups.asc(),
+        PSPeriodDetail.id.asc(),
+    )
+
+    codigos = empresa_codigo_map(db, empresa_ids_list)
+
+    def _rows():
+        for row in iter_query(query):
+            yield (codigos.get(row[0]), *row)
+
+    return export_response(
+        formato=formato,
+        filename_base="ps_detalle_cups",
+        headers=["empresa_codigo"] + [c.key for c in columnas],
+        rows=_rows(),
+        sheet_title="Detalle PS",
+    )
@@ -6,6 +6,7 @@ import re
 from typing import Any, Optional, cast
 
 from pydantic import BaseModel
+from sqlalchemy.orm import Session
 
 from app.empresas.models import Empresa
 from app.measures.models import MedidaPS
@@ -66,12 +67,46 @@ def build_empresa_codigo(empresa: Empresa) -> str | None:
     return raw
 
 
-def paginate(total: int, page: int, page_size: int) -> dict:
+def empresa_codigo_map(db: Session, empresa_ids: list[int]) -> dict[int, str | None]:
+    """
+    {empresa_id: código corto} para las empresas dadas, en una sola query.
+    Lo usan las exportaciones para no hacer JOIN con empresas fila a fila.
+    """
+    if not empresa_ids:
+        return {}
+    empresas = db.query(Empresa).filter(Empresa.id.in_(empresa_ids)).all()
+    return {int(cast(int, e.id)): build_empresa_codigo(e) for e in empresas}
+
+
+def paginate(
+    total: int | None,
+    page: int,
+    page_size: int,
+    *,
+    estimated: bool = False,
+) -> dict:
+    """
+    Calcula offset/limit para la página pedida.
+
+    Con `total=None` (conteo desactivado) o `estimated=True` (estimación del
+    planner) no se recorta la página al último número de página, porque el
+    total no es fiable.
+    """
     page_size_safe = max(1, min(int(page_size), 500))
     page_safe = max(0, int(page))
 
+    if total is None:
+        return {
+            "page": page_safe,
+            "page_size": page_size_safe,
+            "total": None,
+            "total_pages": None,
+            "offset": int(page_safe * page_size_safe),
+            "limit": int(page_size_safe),
+        }
+
     total_pages = max(1, math.ceil(total / page_size_safe)) if total > 0 else 1
-    if page_safe > total_pages - 1:
+    if not estimated and page_safe > total_pages - 1:
         page_safe = total_pages - 1
 
     return {
@@ -8,6 +8,7 @@ from typing import Dict, Any
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
+from app.core.pipeline_timing import etapa
 from app.measures.models import MedidaGeneral
 from app.measures.bald_contrib_models import BaldPeriodContribution
 from app.ingestion.models import IngestionFile
@@ -174,55 +175,57 @@ def _save_bald_period_contribution_and_rebuild(
         ventana_publicacion=ventana_publicacion,
     )
 
-    (
-        db.query(BaldPeriodContribution)
-        .filter(
-            BaldPeriodContribution.tenant_id == tenant_id,
-            BaldPeriodContribution.empresa_id == empresa_id,
-            BaldPeriodContribution.anio == anio,
-            BaldPeriodContribution.mes == mes,
-            BaldPeriodContribution.ventana_publicacion == ventana_publicacion,
+    with etapa("contribuciones", filas=1):
+        (
+            db.query(BaldPeriodContribution)
+            .filter(
+                BaldPeriodContribution.tenant_id == tenant_id,
+                BaldPeriodContribution.empresa_id == empresa_id,
+                BaldPeriodContribution.anio == anio,
+                BaldPeriodContribution.mes == mes,
+                BaldPeriodContribution.ventana_publicacion == ventana_publicacion,
+            )
+            .delete(synchronize_session=False)
         )
-        .delete(synchronize_session=False)
-    )
 
-    db.flush()
+        db.flush()
 
-    contrib = BaldPeriodContribution(  # type: ignore[call-arg]
-        tenant_id=tenant_id,
-        empresa_id=empresa_id,
-        ingestion_file_id=_file_id(fichero),
-        anio=anio,
-        mes=mes,
-        ventana_publicacion=ventana_publicacion,
-        energia_publicada_kwh=float(energia_publicada_kwh),
-        energia_autoconsumo_kwh=float(energia_autoconsumo_kwh),
-        energia_pf_kwh=float(energia_pf_kwh),
-        energia_frontera_dd_kwh=float(energia_frontera_dd_kwh),
-        energia_generada_kwh=float(energia_generada_kwh),
-        is_principal=True,
-    )
-    db.add(contrib)
-    db.flush()
+        contrib = BaldPeriodContribution(  # type: ignore[call-arg]
+            tenant_id=tenant_id,
+            empresa_id=empresa_id,
+            ingestion_file_id=_file_id(fichero),
+            anio=anio,
+            mes=mes,
+            ventana_publicacion=ventana_publicacion,
+            energia_publicada_kwh=float(energia_publicada_kwh),
+            energia_autoconsumo_kwh=float(energia_autoconsumo_kwh),
+            energia_pf_kwh=float(energia_pf_kwh),
+            energia_frontera_dd_kwh=float(energia_frontera_dd_kwh),
+            energia_generada_kwh=float(energia_generada_kwh),
+            is_principal=True,
+        )
+        db.add(contrib)
+        db.flush()
 
     afectados = set(previos) | {(anio, mes, ventana_publicacion)}
 
     mg_result: MedidaGeneral | None = None
-    for anio_af, mes_af, ventana_af in sorted(afectados):
-        mg = _rebuild_medida_general_bald_window(
-            db=db,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio_af,
-            mes=mes_af,
-            ventana_publicacion=ventana_af,
-            fichero=fichero,
-            punto_id_default="BALD",
-        )
-        if (anio_af, mes_af, ventana_af) == (anio, mes, ventana_publicacion):
-            mg_result = mg
+    with etapa("medida_general", filas=len(afectados)):
+        for anio_af, mes_af, ventana_af in sorted(afectados):
+            mg = _rebuild_medida_general_bald_window(
+                db=db,
+                tenant_id=tenant_id,
+                empresa_id=empresa_id,
+                anio=anio_af,
+                mes=mes_af,
+                ventana_publicacion=ventana_af,
+                fichero=fichero,
+                punto_id_default="BALD",
+            )
+            if (anio_af, mes_af, ventana_af) == (anio, mes, ventana_publicacion):
+                mg_result = mg
 
-    db.flush()
+        db.flush()
 
     if mg_result is None:
         mg_result = (
@@ -6,6 +6,7 @@ from __future__ import annotations
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
+from app.core.pipeline_timing import etapa
 from app.measures.models import MedidaGeneral
 from app.measures.general_contrib_models import GeneralPeriodContribution
 from app.ingestion.models import IngestionFile
@@ -148,51 +149,53 @@ def _save_general_period_contribution_and_rebuild(
         ingestion_file_id=_file_id(fichero),
     )
 
-    (
-        db.query(GeneralPeriodContribution)
-        .filter(
-            GeneralPeriodContribution.tenant_id == tenant_id,
-            GeneralPeriodContribution.empresa_id == empresa_id,
-            GeneralPeriodContribution.ingestion_file_id == _file_id(fichero),
-            GeneralPeriodContribution.source_tipo == source_tipo,
+    with etapa("contribuciones", filas=1):
+        (
+            db.query(GeneralPeriodContribution)
+            .filter(
+                GeneralPeriodContribution.tenant_id == tenant_id,
+                GeneralPeriodContribution.empresa_id == empresa_id,
+                GeneralPeriodContribution.ingestion_file_id == _file_id(fichero),
+                GeneralPeriodContribution.source_tipo == source_tipo,
+            )
+            .delete(synchronize_session=False)
         )
-        .delete(synchronize_session=False)
-    )
 
-    db.flush()
+        db.flush()
 
-    contrib = GeneralPeriodContribution(  # type: ignore[call-arg]
-        tenant_id=tenant_id,
-        empresa_id=empresa_id,
-        ingestion_file_id=_file_id(fichero),
-        anio=anio,
-        mes=mes,
-        source_tipo=source_tipo,
-        energia_generada_kwh=float(energia_generada_kwh),
-        energia_frontera_dd_kwh=float(energia_frontera_dd_kwh),
-        energia_pf_kwh=float(energia_pf_kwh),
-        is_principal=True,
-    )
-    db.add(contrib)
-    db.flush()
+        contrib = GeneralPeriodContribution(  # type: ignore[call-arg]
+            tenant_id=tenant_id,
+            empresa_id=empresa_id,
+            ingestion_file_id=_file_id(fichero),
+            anio=anio,
+            mes=mes,
+            source_tipo=source_tipo,
+            energia_generada_kwh=float(energia_generada_kwh),
+            energia_frontera_dd_kwh=float(energia_frontera_dd_kwh),
+            energia_pf_kwh=float(energia_pf_kwh),
+            is_principal=True,
+        )
+        db.add(contrib)
+        db.flush()
 
     periodos_afectados = set(periodos_previos) | {(anio, mes)}
 
     mg_result: MedidaGeneral | None = None
-    for anio_af, mes_af in sorted(periodos_afectados):
-        mg = _rebuild_medida_general_from_contributions(
-            db=db,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio_af,
-            mes=mes_af,
-            fichero=fichero,
-            punto_id_default=punto_id_default,
-        )
-        if (anio_af, mes_af) == (anio, mes):
-            mg_result = mg
+    with etapa("medida_general", filas=len(periodos_afectados)):
+        for anio_af, mes_af in sorted(periodos_afectados):
+            mg = _rebuild_medida_general_from_contributions(
+                db=db,
+                tenant_id=tenant_id,
+                empresa_id=empresa_id,
+                anio=anio_af,
+                mes=mes_af,
+                fichero=fichero,
+                punto_id_default=punto_id_default,
+            )
+            if (anio_af, mes_af) == (anio, mes):
+                mg_result = mg
 
-    db.flush()
+        db.flush()
 
     if mg_result is None:
         mg_result = (
@@ -10,6 +10,7 @@ import re
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
+from app.core.pipeline_timing import etapa
 from app.measures.models import MedidaGeneral
 from app.measures.m1_models import M1PeriodContribution
 from app.ingestion.models import IngestionFile
@@ -115,52 +116,53 @@ def procesar_m1(
     )
     db.flush()
 
-    for f in filas:
-        try:
-            fecha_final = _to_date(f.get("Fecha_final"))
-        except Exception:
-            continue
-
-        fecha_inicio: date | None = None
-        try:
-            if "Fecha_inicio" in f:
-                fecha_inicio = _to_date(f.get("Fecha_inicio"))
-        except Exception:
-            fecha_inicio = None
-
-        anio_obj, mes_obj, motivo = _periodo_objetivo_m1_desde_periodo_principal(
-            fecha_final,
-            anio_principal=anio_principal,
-            mes_principal=mes_principal,
-        )
-
-        if motivo == "future_out_of_window":
-            warnings.append(
-                {
-                    "type": "future_out_of_window",
-                    "fecha_final": fecha_final.isoformat(),
-                    "periodo_asignado": f"{anio_obj:04d}{mes_obj:02d}",
-                    "periodo_principal": f"{anio_principal:04d}{mes_principal:02d}",
-                }
+    with etapa("mapeo_periodos", filas=len(filas)):
+        for f in filas:
+            try:
+                fecha_final = _to_date(f.get("Fecha_final"))
+            except Exception:
+                continue
+
+            fecha_inicio: date | None = None
+            try:
+                if "Fecha_inicio" in f:
+                    fecha_inicio = _to_date(f.get("Fecha_inicio"))
+            except Exception:
+                fecha_inicio = None
+
+            anio_obj, mes_obj, motivo = _periodo_objetivo_m1_desde_periodo_principal(
+                fecha_final,
+                anio_principal=anio_principal,
+                mes_principal=mes_principal,
             )
 
-        if fecha_inicio is not None:
-            if (fecha_inicio.year, fecha_inicio.month) != (fecha_final.year, fecha_final.month):
+            if motivo == "future_out_of_window":
                 warnings.append(
                     {
-                        "type": "fecha_inicio_fecha_final_distinto_mes",
-                        "fecha_inicio": fecha_inicio.isoformat(),
+                        "type": "future_out_of_window",
                         "fecha_final": fecha_final.isoformat(),
                         "periodo_asignado": f"{anio_obj:04d}{mes_obj:02d}",
                         "periodo_principal": f"{anio_principal:04d}{mes_principal:02d}",
                     }
                 )
 
-        energia = _to_float(f.get("Energia_Kwh", 0.0))
-        energia_por_periodo[(anio_obj, mes_obj)] = (
-            energia_por_periodo.get((anio_obj, mes_obj), 0.0) + energia
-        )
-        periodos_nuevos.add((anio_obj, mes_obj))
+            if fecha_inicio is not None:
+                if (fecha_inicio.year, fecha_inicio.month) != (fecha_final.year, fecha_final.month):
+                    warnings.append(
+                        {
+                            "type": "fecha_inicio_fecha_final_distinto_mes",
+                            "fecha_inicio": fecha_inicio.isoformat(),
+                            "fecha_final": fecha_final.isoformat(),
+                            "periodo_asignado": f"{anio_obj:04d}{mes_obj:02d}",
+                            "periodo_principal": f"{anio_principal:04d}{mes_principal:02d}",
+                        }
+                    )
+
+            energia = _to_float(f.get("Energia_Kwh", 0.0))
+            energia_por_periodo[(anio_obj, mes_obj)] = (
+                energia_por_periodo.get((anio_obj, mes_obj), 0.0) + energia
+            )
+            periodos_nuevos.add((anio_obj, mes_obj))
 
     if not energia_por_periodo:
         raise ValueError(
@@ -168,87 +170,89 @@ def procesar_m1(
             "(todas NaT/NaN/None/vacías)"
         )
 
-    for (anio, mes), energia_total in sorted(energia_por_periodo.items()):
-        es_principal = (anio, mes) == (anio_principal, mes_principal)
+    with etapa("contribuciones", filas=len(energia_por_periodo)):
+        for (anio, mes), energia_total in sorted(energia_por_periodo.items()):
+            es_principal = (anio, mes) == (anio_principal, mes_principal)
 
-        contrib = M1PeriodContribution(  # type: ignore[call-arg]
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            ingestion_file_id=_file_id(fichero),
-            anio=anio,
-            mes=mes,
-            energia_kwh=float(energia_total),
-            is_principal=bool(es_principal),
-        )
-        db.add(contrib)
-
-        if not es_principal:
-            warnings.append(
-                {
-                    "type": "refactura_detectada",
-                    "periodo": f"{anio:04d}{mes:02d}",
-                    "energia_kwh": float(energia_total),
-                    "periodo_principal": f"{anio_principal:04d}{mes_principal:02d}",
-                }
+            contrib = M1PeriodContribution(  # type: ignore[call-arg]
+                tenant_id=tenant_id,
+                empresa_id=empresa_id,
+                ingestion_file_id=_file_id(fichero),
+                anio=anio,
+                mes=mes,
+                energia_kwh=float(energia_total),
+                is_principal=bool(es_principal),
             )
+            db.add(contrib)
 
-    db.flush()
+            if not es_principal:
+                warnings.append(
+                    {
+                        "type": "refactura_detectada",
+                        "periodo": f"{anio:04d}{mes:02d}",
+                        "energia_kwh": float(energia_total),
+                        "periodo_principal": f"{anio_principal:04d}{mes_principal:02d}",
+                    }
+                )
+
+        db.flush()
 
     periodos_afectados = set(periodos_previos) | set(periodos_nuevos)
     mg_principal: MedidaGeneral | None = None
 
-    for (anio, mes) in sorted(periodos_afectados):
-        mg = (
-            db.query(MedidaGeneral)
-            .filter_by(
-                tenant_id=tenant_id,
-                empresa_id=empresa_id,
-                anio=anio,
-                mes=mes,
+    with etapa("medida_general", filas=len(periodos_afectados)):
+        for (anio, mes) in sorted(periodos_afectados):
+            mg = (
+                db.query(MedidaGeneral)
+                .filter_by(
+                    tenant_id=tenant_id,
+                    empresa_id=empresa_id,
+                    anio=anio,
+                    mes=mes,
+                )
+                .first()
             )
-            .first()
-        )
 
-        creado = False
-        if mg is None:
-            mg = MedidaGeneral(  # type: ignore[call-arg]
+            creado = False
+            if mg is None:
+                mg = MedidaGeneral(  # type: ignore[call-arg]
+                    tenant_id=tenant_id,
+                    empresa_id=empresa_id,
+                    punto_id="M1",
+                    anio=anio,
+                    mes=mes,
+                )
+                db.add(mg)
+                creado = True
+
+            es_principal = (anio, mes) == (anio_principal, mes_principal)
+
+            energia_periodo = _sum_contribuciones_m1(
+                db,
                 tenant_id=tenant_id,
                 empresa_id=empresa_id,
-                punto_id="M1",
                 anio=anio,
                 mes=mes,
             )
-            db.add(mg)
-            creado = True
-
-        es_principal = (anio, mes) == (anio_principal, mes_principal)
-
-        energia_periodo = _sum_contribuciones_m1(
-            db,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
-        )
 
-        if creado and not es_principal and energia_periodo != 0.0:
-            warnings.append(
-                {
-                    "type": "missing_period_created",
-                    "periodo": f"{anio:04d}{mes:02d}",
-                    "energia_kwh": float(energia_periodo),
-                }
-            )
+            if creado and not es_principal and energia_periodo != 0.0:
+                warnings.append(
+                    {
+                        "type": "missing_period_created",
+                        "periodo": f"{anio:04d}{mes:02d}",
+                        "energia_kwh": float(energia_periodo),
+                    }
+                )
 
-        mg.energia_bruta_facturada = float(energia_periodo)  # type: ignore[assignment]
-        mg.file_id = _file_id(fichero)  # type: ignore[assignment]
+            mg.energia_bruta_facturada = float(energia_periodo)  # type: ignore[assignment]
+            mg.file_id = _file_id(fichero)  # type: ignore[assignment]
 
-        if es_principal:
-            mg_principal = mg
+            if es_principal:
+                mg_principal = mg
 
-        _recalcular_energia_neta_y_perdidas(mg)
+            _recalcular_energia_neta_y_perdidas(mg)
 
-    db.flush()
+        db.flush()
 
     if mg_principal is None:
         (anio_ret, mes_ret), _ = max(energia_por_periodo.items(), key=lambda kv: kv[1])
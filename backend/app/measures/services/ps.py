@@ -10,6 +10,7 @@ import re
 from sqlalchemy.orm import Session
 from sqlalchemy import func
 
+from app.core.pipeline_timing import etapa
 from app.measures.models import MedidaPS
 from app.measures.ps_models import PSPeriodContribution
 from app.measures.ps_detail_models import PSPeriodDetail
@@ -595,287 +596,290 @@ def procesar_ps(
     cups_total_set_by_period: dict[tuple[int, int], set[str]] = {}
     cups_tarifa_by_period: dict[tuple[int, int], dict[str, set[str]]] = {}
 
-    for f in filas:
-        try:
-            fecha_final = _to_date(f.get("Fecha_final"))
-        except Exception:
-            continue
-
-        anio_obj, mes_obj, motivo = _periodo_objetivo_m1_desde_periodo_principal(
-            fecha_final,
-            anio_principal=anio_principal,
-            mes_principal=mes_principal,
-        )
-
-        if motivo == "future_out_of_window":
-            warnings.append(
-                {
-                    "type": "future_out_of_window_ps",
-                    "fecha_final": fecha_final.isoformat(),
-                    "periodo_asignado": f"{anio_obj:04d}{mes_obj:02d}",
-                    "periodo_principal": f"{anio_principal:04d}{mes_principal:02d}",
-                }
-            )
-
-        if motivo == "refactura":
-            warnings.append(
-                {
-                    "type": "refactura_detectada_ps",
-                    "fecha_final": fecha_final.isoformat(),
-                    "periodo_asignado": f"{anio_obj:04d}{mes_obj:02d}",
-                    "periodo_principal": f"{anio_principal:04d}{mes_principal:02d}",
-                }
-            )
-
-        period_key = (anio_obj, mes_obj)
-        periodos_nuevos.add(period_key)
-
-        cups = _ps_cups(f)
-        if not cups:
-            warnings.append(
-                {
-                    "type": "ps_row_without_cups",
-                    "periodo_asignado": f"{anio_obj:04d}{mes_obj:02d}",
-                }
+    with etapa("mapeo_periodos", filas=len(filas)):
+        for f in filas:
+            try:
+                fecha_final = _to_date(f.get("Fecha_final"))
+            except Exception:
+                continue
+
+            anio_obj, mes_obj, motivo = _periodo_objetivo_m1_desde_periodo_principal(
+                fecha_final,
+                anio_principal=anio_principal,
+                mes_principal=mes_principal,
             )
-            continue
-
-        poliza = _ps_poliza(f)
-        tarifa = _ps_tarifa(f)
-        energia = _to_float(f.get("Energia_facturada"))
-        importe = _to_float(f.get("Total"))
-
-        agregado = aggregate_by_period.get(period_key)
-        if agregado is None:
-            agregado = _empty_ps_aggregate()
-            aggregate_by_period[period_key] = agregado
-
-        cups_sets_tipo = cups_sets_tipo_by_period.get(period_key)
-        if cups_sets_tipo is None:
-            cups_sets_tipo = {i: set() for i in range(1, 6)}
-            cups_sets_tipo_by_period[period_key] = cups_sets_tipo
-
-        cups_total_set = cups_total_set_by_period.get(period_key)
-        if cups_total_set is None:
-            cups_total_set = set()
-            cups_total_set_by_period[period_key] = cups_total_set
 
-        cups_tarifa = cups_tarifa_by_period.get(period_key)
-        if cups_tarifa is None:
-            cups_tarifa = {k: set() for k in TARIFA_MAP.values()}
-            cups_tarifa_by_period[period_key] = cups_tarifa
-
-        agregado["energia_ps_total_kwh"] = float(agregado["energia_ps_total_kwh"]) + energia
-        agregado["importe_total_eur"] = float(agregado["importe_total_eur"]) + importe
-
-        if cups:
-            cups_total_set.add(cups)
+            if motivo == "future_out_of_window":
+                warnings.append(
+                    {
+                        "type": "future_out_of_window_ps",
+                        "fecha_final": fecha_final.isoformat(),
+                        "periodo_asignado": f"{anio_obj:04d}{mes_obj:02d}",
+                        "periodo_principal": f"{anio_principal:04d}{mes_principal:02d}",
+                    }
+                )
 
-        if poliza in {"1", "2", "3", "4", "5"}:
-            tipo_int = int(poliza)
-            energia_key = f"energia_ps_tipo_{tipo_int}_kwh"
-            importe_key = f"importe_tipo_{tipo_int}_eur"
-            agregado[energia_key] = float(agregado[energia_key]) + energia
-            agregado[importe_key] = float(agregado[importe_key]) + importe
-            cups_sets_tipo[tipo_int].add(cups)
-
-        sufijo_tarifa = TARIFA_MAP.get(tarifa)
-        if sufijo_tarifa is not None:
-            energia_tarifa_key = f"energia_tarifa_{sufijo_tarifa}_kwh"
-            importe_tarifa_key = f"importe_tarifa_{sufijo_tarifa}_eur"
-            agregado[energia_tarifa_key] = float(agregado[energia_tarifa_key]) + energia
-            agregado[importe_tarifa_key] = float(agregado[importe_tarifa_key]) + importe
-            cups_tarifa[sufijo_tarifa].add(cups)
-
-        detail_key = (anio_obj, mes_obj, cups)
-        existing = detail_map.get(detail_key)
-
-        if existing is None:
-            detail_map[detail_key] = {
-                "anio": anio_obj,
-                "mes": mes_obj,
-                "cups": cups,
-                "poliza": poliza,
-                "tarifa_acceso": tarifa,
-                "energia_facturada_kwh": energia,
-                "importe_total_eur": importe,
-                "is_principal": period_key == (anio_principal, mes_principal),
-            }
-        else:
-            old_poliza = cast(str | None, existing.get("poliza"))
-            old_tarifa = cast(str | None, existing.get("tarifa_acceso"))
-
-            existing["energia_facturada_kwh"] = float(existing.get("energia_facturada_kwh", 0.0)) + energia
-            existing["importe_total_eur"] = float(existing.get("importe_total_eur", 0.0)) + importe
-
-            if not old_poliza and poliza:
-                existing["poliza"] = poliza
-            if not old_tarifa and tarifa:
-                existing["tarifa_acceso"] = tarifa
-
-            current_poliza = cast(str | None, existing.get("poliza"))
-            current_tarifa = cast(str | None, existing.get("tarifa_acceso"))
-
-            if poliza and current_poliza and poliza != current_poliza:
+            if motivo == "refactura":
                 warnings.append(
                     {
-                        "type": "ps_conflicting_poliza_same_cups",
-                        "cups": cups,
+                        "type": "refactura_detectada_ps",
+                        "fecha_final": fecha_final.isoformat(),
                         "periodo_asignado": f"{anio_obj:04d}{mes_obj:02d}",
-                        "poliza_existente": current_poliza,
-                        "poliza_nueva": poliza,
+                        "periodo_principal": f"{anio_principal:04d}{mes_principal:02d}",
                     }
                 )
-            if tarifa and current_tarifa and tarifa != current_tarifa:
+
+            period_key = (anio_obj, mes_obj)
+            periodos_nuevos.add(period_key)
+
+            cups = _ps_cups(f)
+            if not cups:
                 warnings.append(
                     {
-                        "type": "ps_conflicting_tarifa_same_cups",
-                        "cups": cups,
+                        "type": "ps_row_without_cups",
                         "periodo_asignado": f"{anio_obj:04d}{mes_obj:02d}",
-                        "tarifa_existente": current_tarifa,
-                        "tarifa_nueva": tarifa,
                     }
                 )
+                continue
 
-    if not aggregate_by_period:
-        raise ValueError(
-            "No hay filas con Fecha_final válida para calcular PS (todas NaT/NaN/None/vacías)"
-        )
+            poliza = _ps_poliza(f)
+            tarifa = _ps_tarifa(f)
+            energia = _to_float(f.get("Energia_facturada"))
+            importe = _to_float(f.get("Total"))
 
-    for period_key, agregado in aggregate_by_period.items():
-        cups_sets_tipo = cups_sets_tipo_by_period.get(period_key, {i: set() for i in range(1, 6)})
-        cups_total_set = cups_total_set_by_period.get(period_key, set())
-        cups_tarifa = cups_tarifa_by_period.get(
-            period_key,
-            {k: set() for k in TARIFA_MAP.values()},
-        )
+            agregado = aggregate_by_period.get(period_key)
+            if agregado is None:
+                agregado = _empty_ps_aggregate()
+                aggregate_by_period[period_key] = agregado
 
-        agregado["cups_tipo_1"] = len(cups_sets_tipo[1])
-        agregado["cups_tipo_2"] = len(cups_sets_tipo[2])
-        agregado["cups_tipo_3"] = len(cups_sets_tipo[3])
-        agregado["cups_tipo_4"] = len(cups_sets_tipo[4])
-        agregado["cups_tipo_5"] = len(cups_sets_tipo[5])
-        agregado["cups_total"] = len(cups_total_set)
-        agregado["cups_tarifa_20td"] = len(cups_tarifa["20td"])
-        agregado["cups_tarifa_30td"] = len(cups_tarifa["30td"])
-        agregado["cups_tarifa_30tdve"] = len(cups_tarifa["30tdve"])
-        agregado["cups_tarifa_61td"] = len(cups_tarifa["61td"])
-        agregado["cups_tarifa_62td"] = len(cups_tarifa["62td"])
-        agregado["cups_tarifa_63td"] = len(cups_tarifa["63td"])
-        agregado["cups_tarifa_64td"] = len(cups_tarifa["64td"])
+            cups_sets_tipo = cups_sets_tipo_by_period.get(period_key)
+            if cups_sets_tipo is None:
+                cups_sets_tipo = {i: set() for i in range(1, 6)}
+                cups_sets_tipo_by_period[period_key] = cups_sets_tipo
 
-    periodos_afectados = set(periodos_previos) | set(periodos_nuevos)
+            cups_total_set = cups_total_set_by_period.get(period_key)
+            if cups_total_set is None:
+                cups_total_set = set()
+                cups_total_set_by_period[period_key] = cups_total_set
 
-    (
-        db.query(PSPeriodDetail)
-        .filter(
-            PSPeriodDetail.tenant_id == tenant_id,
-            PSPeriodDetail.empresa_id == empresa_id,
-            PSPeriodDetail.ingestion_file_id == _file_id(fichero),
-        )
-        .delete(synchronize_session=False)
-    )
+            cups_tarifa = cups_tarifa_by_period.get(period_key)
+            if cups_tarifa is None:
+                cups_tarifa = {k: set() for k in TARIFA_MAP.values()}
+                cups_tarifa_by_period[period_key] = cups_tarifa
 
-    (
-        db.query(PSPeriodContribution)
-        .filter(
-            PSPeriodContribution.tenant_id == tenant_id,
-            PSPeriodContribution.empresa_id == empresa_id,
-            PSPeriodContribution.ingestion_file_id == _file_id(fichero),
-        )
-        .delete(synchronize_session=False)
-    )
+            agregado["energia_ps_total_kwh"] = float(agregado["energia_ps_total_kwh"]) + energia
+            agregado["importe_total_eur"] = float(agregado["importe_total_eur"]) + importe
 
-    db.flush()
+            if cups:
+                cups_total_set.add(cups)
+
+            if poliza in {"1", "2", "3", "4", "5"}:
+                tipo_int = int(poliza)
+                energia_key = f"energia_ps_tipo_{tipo_int}_kwh"
+                importe_key = f"importe_tipo_{tipo_int}_eur"
+                agregado[energia_key] = float(agregado[energia_key]) + energia
+                agregado[importe_key] = float(agregado[importe_key]) + importe
+                cups_sets_tipo[tipo_int].add(cups)
+
+            sufijo_tarifa = TARIFA_MAP.get(tarifa)
+            if sufijo_tarifa is not None:
+                energia_tarifa_key = f"energia_tarifa_{sufijo_tarifa}_kwh"
+                importe_tarifa_key = f"importe_tarifa_{sufijo_tarifa}_eur"
+                agregado[energia_tarifa_key] = float(agregado[energia_tarifa_key]) + energia
+                agregado[importe_tarifa_key] = float(agregado[importe_tarifa_key]) + importe
+                cups_tarifa[sufijo_tarifa].add(cups)
+
+            detail_key = (anio_obj, mes_obj, cups)
+            existing = detail_map.get(detail_key)
+
+            if existing is None:
+                detail_map[detail_key] = {
+                    "anio": anio_obj,
+                    "mes": mes_obj,
+                    "cups": cups,
+                    "poliza": poliza,
+                    "tarifa_acceso": tarifa,
+                    "energia_facturada_kwh": energia,
+                    "importe_total_eur": importe,
+                    "is_principal": period_key == (anio_principal, mes_principal),
+                }
+            else:
+                old_poliza = cast(str | None, existing.get("poliza"))
+                old_tarifa = cast(str | None, existing.get("tarifa_acceso"))
+
+                existing["energia_facturada_kwh"] = float(existing.get("energia_facturada_kwh", 0.0)) + energia
+                existing["importe_total_eur"] = float(existing.get("importe_total_eur", 0.0)) + importe
+
+                if not old_poliza and poliza:
+                    existing["poliza"] = poliza
+                if not old_tarifa and tarifa:
+                    existing["tarifa_acceso"] = tarifa
+
+                current_poliza = cast(str | None, existing.get("poliza"))
+                current_tarifa = cast(str | None, existing.get("tarifa_acceso"))
+
+                if poliza and current_poliza and poliza != current_poliza:
+                    warnings.append(
+                        {
+                            "type": "ps_conflicting_poliza_same_cups",
+                            "cups": cups,
+                            "periodo_asignado": f"{anio_obj:04d}{mes_obj:02d}",
+                            "poliza_existente": current_poliza,
+                            "poliza_nueva": poliza,
+                        }
+                    )
+                if tarifa and current_tarifa and tarifa != current_tarifa:
+                    warnings.append(
+                        {
+                            "type": "ps_conflicting_tarifa_same_cups",
+                            "cups": cups,
+                            "periodo_asignado": f"{anio_obj:04d}{mes_obj:02d}",
+                            "tarifa_existente": current_tarifa,
+                            "tarifa_nueva": tarifa,
+                        }
+                    )
+
+        if not aggregate_by_period:
+            raise ValueError(
+                "No hay filas con Fecha_final válida para calcular PS (todas NaT/NaN/None/vacías)"
+            )
 
-    detail_mappings: list[dict[str, Any]] = []
-    for item in detail_map.values():
-        detail_mappings.append(
-            _make_ps_period_detail_mapping(
-                tenant_id=tenant_id,
-                empresa_id=empresa_id,
-                ingestion_file_id=_file_id(fichero),
-                anio=int(item["anio"]),
-                mes=int(item["mes"]),
-                is_principal=bool(item["is_principal"]),
-                cups=str(item["cups"]),
-                poliza=str(item["poliza"]) if item.get("poliza") else None,
-                tarifa_acceso=str(item["tarifa_acceso"]) if item.get("tarifa_acceso") else None,
-                energia_facturada_kwh=float(item["energia_facturada_kwh"]),
-                importe_total_eur=float(item["importe_total_eur"]),
+        for period_key, agregado in aggregate_by_period.items():
+            cups_sets_tipo = cups_sets_tipo_by_period.get(period_key, {i: set() for i in range(1, 6)})
+            cups_total_set = cups_total_set_by_period.get(period_key, set())
+            cups_tarifa = cups_tarifa_by_period.get(
+                period_key,
+                {k: set() for k in TARIFA_MAP.values()},
             )
-        )
 
-    if detail_mappings:
-        db.bulk_insert_mappings(cast(Any, PSPeriodDetail), detail_mappings)
-
-    for (anio, mes), agregado in sorted(aggregate_by_period.items()):
-        es_principal = (anio, mes) == (anio_principal, mes_principal)
-        contrib = _make_ps_period_contribution(
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            ingestion_file_id=_file_id(fichero),
-            anio=anio,
-            mes=mes,
-            is_principal=bool(es_principal),
-            agregado=agregado,
-        )
-        db.add(contrib)
+            agregado["cups_tipo_1"] = len(cups_sets_tipo[1])
+            agregado["cups_tipo_2"] = len(cups_sets_tipo[2])
+            agregado["cups_tipo_3"] = len(cups_sets_tipo[3])
+            agregado["cups_tipo_4"] = len(cups_sets_tipo[4])
+            agregado["cups_tipo_5"] = len(cups_sets_tipo[5])
+            agregado["cups_total"] = len(cups_total_set)
+            agregado["cups_tarifa_20td"] = len(cups_tarifa["20td"])
+            agregado["cups_tarifa_30td"] = len(cups_tarifa["30td"])
+            agregado["cups_tarifa_30tdve"] = len(cups_tarifa["30tdve"])
+            agregado["cups_tarifa_61td"] = len(cups_tarifa["61td"])
+            agregado["cups_tarifa_62td"] = len(cups_tarifa["62td"])
+            agregado["cups_tarifa_63td"] = len(cups_tarifa["63td"])
+            agregado["cups_tarifa_64td"] = len(cups_tarifa["64td"])
 
-    db.flush()
+    periodos_afectados = set(periodos_previos) | set(periodos_nuevos)
 
-    mp_principal: MedidaPS | None = None
+    with etapa("contribuciones", filas=len(detail_map)):
+        (
+            db.query(PSPeriodDetail)
+            .filter(
+                PSPeriodDetail.tenant_id == tenant_id,
+                PSPeriodDetail.empresa_id == empresa_id,
+                PSPeriodDetail.ingestion_file_id == _file_id(fichero),
+            )
+            .delete(synchronize_session=False)
+        )
 
-    for (anio, mes) in sorted(periodos_afectados):
-        agregado = _sum_contribuciones_ps(
-            db,
-            tenant_id=tenant_id,
-            empresa_id=empresa_id,
-            anio=anio,
-            mes=mes,
+        (
+            db.query(PSPeriodContribution)
+            .filter(
+                PSPeriodContribution.tenant_id == tenant_id,
+                PSPeriodContribution.empresa_id == empresa_id,
+                PSPeriodContribution.ingestion_file_id == _file_id(fichero),
+            )
+            .delete(synchronize_session=False)
         )
 
-        mp = (
-            db.query(MedidaPS)
-            .filter_by(
+        db.flush()
+
+        detail_mappings: list[dict[str, Any]] = []
+        for item in detail_map.values():
+            detail_mappings.append(
+                _make_ps_period_detail_mapping(
+                    tenant_id=tenant_id,
+                    empresa_id=empresa_id,
+                    ingestion_file_id=_file_id(fichero),
+                    anio=int(item["anio"]),
+                    mes=int(item["mes"]),
+                    is_principal=bool(item["is_principal"]),
+                    cups=str(item["cups"]),
+                    poliza=str(item["poliza"]) if item.get("poliza") else None,
+                    tarifa_acceso=str(item["tarifa_acceso"]) if item.get("tarifa_acceso") else None,
+                    energia_facturada_kwh=float(item["energia_facturada_kwh"]),
+                    importe_total_eur=float(item["importe_total_eur"]),
+                )
+            )
+
+        if detail_mappings:
+            db.bulk_insert_mappings(cast(Any, PSPeriodDetail), detail_mappings)
+
+        for (anio, mes), agregado in sorted(aggregate_by_period.items()):
+            es_principal = (anio, mes) == (anio_principal, mes_principal)
+            contrib = _make_ps_period_contribution(
                 tenant_id=tenant_id,
                 empresa_id=empresa_id,
-                punto_id="PS",
+                ingestion_file_id=_file_id(fichero),
                 anio=anio,
                 mes=mes,
+                is_principal=bool(es_principal),
+                agregado=agregado,
             )
-            .first()
-        )
+            db.add(contrib)
+
+        db.flush()
 
-        creado = False
-        if mp is None:
-            mp = MedidaPS(  # type: ignore[call-arg]
+    mp_principal: MedidaPS | None = None
+
+    with etapa("medida_ps", filas=len(periodos_afectados)):
+        for (anio, mes) in sorted(periodos_afectados):
+            agregado = _sum_contribuciones_ps(
+                db,
                 tenant_id=tenant_id,
                 empresa_id=empresa_id,
-                punto_id="PS",
                 anio=anio,
                 mes=mes,
             )
-            db.add(mp)
-            creado = True
 
-        es_principal = (anio, mes) == (anio_principal, mes_principal)
-
-        if creado and not es_principal:
-            warnings.append(
-                {
-                    "type": "missing_period_created_ps",
-                    "periodo": f"{anio:04d}{mes:02d}",
-                    "energia_ps_total_kwh": float(agregado["energia_ps_total_kwh"]),
-                }
+            mp = (
+                db.query(MedidaPS)
+                .filter_by(
+                    tenant_id=tenant_id,
+                    empresa_id=empresa_id,
+                    punto_id="PS",
+                    anio=anio,
+                    mes=mes,
+                )
+                .first()
             )
 
-        _apply_ps_aggregate_to_medida(mp, agregado=agregado, fichero=fichero)
+            creado = False
+            if mp is None:
+                mp = MedidaPS(  # type: ignore[call-arg]
+                    tenant_id=tenant_id,
+                    empresa_id=empresa_id,
+                    punto_id="PS",
+                    anio=anio,
+                    mes=mes,
+                )
+                db.add(mp)
+                creado = True
+
+            es_principal = (anio, mes) == (anio_principal, mes_principal)
+
+            if creado and not es_principal:
+                warnings.append(
+                    {
+                        "type": "missing_period_created_ps",
+                        "periodo": f"{anio:04d}{mes:02d}",
+                        "energia_ps_total_kwh": float(agregado["energia_ps_total_kwh"]),
+                    }
+                )
+
+            _apply_ps_aggregate_to_medida(mp, agregado=agregado, fichero=fichero)
 
-        if es_principal:
-            mp_principal = mp
+            if es_principal:
+                mp_principal = mp
 
-    db.flush()
+        db.flush()
 
     if mp_principal is None:
         mejor_periodo = max(
@@ -4,13 +4,14 @@ from __future__ import annotations
 
 from typing import Any, cast
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlalchemy import func, false as sql_false
 from sqlalchemy.orm import Query as SAQuery, Session
 
 from app.core.auth import get_current_user
 from app.core.db import get_db
 from app.core.permissions import get_allowed_empresa_ids
+from app.core.response_cache import cached_json_response
 from app.empresas.models import Empresa
 from app.measures.models import MedidaGeneral
 from app.medidas_graficos import schemas as graficos_schemas
@@ -436,20 +437,16 @@ def get_medidas_graficos_filters(
     )
 
 
-@router.get(
-    "/series",
-    response_model=graficos_schemas.GraficosSeriesResponse,
-)
-def get_medidas_graficos_series(
-    empresa_ids: list[int] | None = Query(default=None),
-    anios: list[int] | None = Query(default=None),
-    meses: list[int] | None = Query(default=None),
-    aggregation: str = Query(default="avg"),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+def _build_graficos_series_payload(
+    db: Session,
+    *,
+    tenant_id_int: int,
+    allowed_empresa_ids: list[int],
+    empresa_ids: list[int] | None,
+    anios: list[int] | None,
+    meses: list[int] | None,
+    aggregation: str,
 ) -> graficos_schemas.GraficosSeriesResponse:
-    tenant_id_int = int(cast(int, current_user.tenant_id))
-    allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
     tenant_empresas = _get_tenant_empresas(
         db,
         tenant_id=tenant_id_int,
@@ -666,4 +663,36 @@ def get_medidas_graficos_series(
         energia_generada=graficos_schemas.GraficoSeriesGroup(series=energia_generada_series),
         adquisicion=graficos_schemas.GraficoSeriesGroup(series=[adquisicion_serie]),
         adquisicion_ventanas=graficos_schemas.GraficoSeriesGroup(series=adquisicion_ventanas_series),
-    )
\ No newline at end of file
+    )
+
+
+@router.get(
+    "/series",
+    response_model=graficos_schemas.GraficosSeriesResponse,
+)
+def get_medidas_graficos_series(
+    request: Request,
+    empresa_ids: list[int] | None = Query(default=None),
+    anios: list[int] | None = Query(default=None),
+    meses: list[int] | None = Query(default=None),
+    aggregation: str = Query(default="avg"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Response:
+    tenant_id_int = int(cast(int, current_user.tenant_id))
+    allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
+    return cached_json_response(
+        request,
+        namespace="medidas_graficos.series",
+        tenant_id=tenant_id_int,
+        allowed_empresa_ids=allowed_empresa_ids,
+        build=lambda: _build_graficos_series_payload(
+            db,
+            tenant_id_int=tenant_id_int,
+            allowed_empresa_ids=allowed_empresa_ids,
+            empresa_ids=empresa_ids,
+            anios=anios,
+            meses=meses,
+            aggregation=aggregation,
+        ),
+    )
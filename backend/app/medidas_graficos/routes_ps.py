@@ -4,13 +4,14 @@ from __future__ import annotations
 
 from typing import Any, cast
 
-from fastapi import APIRouter, Depends, Query
+from fastapi import APIRouter, Depends, Query, Request, Response
 from sqlalchemy import func, false as sql_false
 from sqlalchemy.orm import Query as SAQuery, Session
 
 from app.core.auth import get_current_user
 from app.core.db import get_db
 from app.core.permissions import get_allowed_empresa_ids
+from app.core.response_cache import cached_json_response
 from app.empresas.models import Empresa
 from app.measures.models import MedidaPS
 from app.medidas_graficos import schemas as graficos_schemas
@@ -152,19 +153,15 @@ def _build_ps_serie_sum(
     )
 
 
-@router.get(
-    "/series-cups",
-    response_model=graficos_schemas.GraficosPsSeriesResponse,
-)
-def get_medidas_graficos_ps_cups(
-    empresa_ids: list[int] | None = Query(default=None),
-    anios: list[int] | None = Query(default=None),
-    meses: list[int] | None = Query(default=None),
-    db: Session = Depends(get_db),
-    current_user: User = Depends(get_current_user),
+def _build_graficos_ps_cups_payload(
+    db: Session,
+    *,
+    tenant_id_int: int,
+    allowed_empresa_ids: list[int],
+    empresa_ids: list[int] | None,
+    anios: list[int] | None,
+    meses: list[int] | None,
 ) -> graficos_schemas.GraficosPsSeriesResponse:
-    tenant_id_int = int(cast(int, current_user.tenant_id))
-    allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
 
     tenant_empresa_rows = (
         db.query(Empresa.id)
@@ -325,4 +322,34 @@ def get_medidas_graficos_ps_cups(
         energia_por_tarifa=graficos_schemas.GraficoSeriesGroup(series=energia_tarifa_series),
         cups_por_tarifa=graficos_schemas.GraficoSeriesGroup(series=cups_tarifa_series),
         importe_por_tarifa=graficos_schemas.GraficoSeriesGroup(series=importe_tarifa_series),
-    )
\ No newline at end of file
+    )
+
+
+@router.get(
+    "/series-cups",
+    response_model=graficos_schemas.GraficosPsSeriesResponse,
+)
+def get_medidas_graficos_ps_cups(
+    request: Request,
+    empresa_ids: list[int] | None = Query(default=None),
+    anios: list[int] | None = Query(default=None),
+    meses: list[int] | None = Query(default=None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+) -> Response:
+    tenant_id_int = int(cast(int, current_user.tenant_id))
+    allowed_empresa_ids = get_allowed_empresa_ids(db, current_user)
+    return cached_json_response(
+        request,
+        namespace="medidas_graficos.ps_cups",
+        tenant_id=tenant_id_int,
+        allowed_empresa_ids=allowed_empresa_ids,
+        build=lambda: _build_graficos_ps_cups_payload(
+            db,
+            tenant_id_int=tenant_id_int,
+            allowed_empresa_ids=allowed_empresa_ids,
+            empresa_ids=empresa_ids,
+            anios=anios,
+            meses=meses,
+        ),
+    )
@@ -30,7 +30,8 @@ from typing import Dict, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
-from app.calendario_ree.models import ReeCalendarEvent
+from app.calendario_ree import services_indice
+from app.calendario_ree.services_indice import HitoRee
 from app.objeciones.automatizacion.models import TIPO_FIN_RECEPCION
 from app.objeciones.automatizacion.services_alertas import upsert_alerta
 from app.objeciones.automatizacion.services_config import (
@@ -45,30 +46,14 @@ logger = logging.getLogger(__name__)
 # Helpers
 # ═════════════════════════════════════════════════════════════════════════════
 
-# Meses en español → número. Se usa para parsear "mes_afectado" del calendario
-# (ej. "Julio 2025" → (2025, 7)).
-_MESES_ES_A_NUM: Dict[str, int] = {
-    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
-    "julio": 7, "agosto": 8, "septiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
-}
-
-
-def _parsear_mes_afectado(mes_afectado: Optional[str]) -> Optional[Tuple[int, int, str]]:
+def _periodos_hito(hito: HitoRee) -> Optional[Tuple[int, int, str]]:
     """
-    Convierte "Julio 2025" → (2025, 7, "202507").
-    Devuelve None si no se puede parsear.
+    Mes afectado del hito ("Julio 2025", ya parseado en el índice) →
+    (2025, 7, "202507"). None si no se pudo parsear.
     """
-    if not mes_afectado:
-        return None
-    partes = str(mes_afectado).strip().split()
-    if len(partes) != 2:
+    if hito.mes_afectado is None:
         return None
-    nombre_mes = partes[0].lower()
-    anio_str = partes[1]
-    mes_num = _MESES_ES_A_NUM.get(nombre_mes)
-    if mes_num is None or not anio_str.isdigit() or len(anio_str) != 4:
-        return None
-    anio = int(anio_str)
+    anio, mes_num = hito.mes_afectado
     periodo_yyyymm = f"{anio:04d}{mes_num:02d}"
     return anio, mes_num, periodo_yyyymm
 
@@ -77,9 +62,9 @@ def _hitos_fin_recepcion_de_ayer(
     db: Session,
     *,
     tenant_id: int,
-) -> List[ReeCalendarEvent]:
+) -> List[HitoRee]:
     """
-    Busca eventos de calendario_ree cuyo `evento` coincida EXACTAMENTE con
+    Busca hitos del calendario REE cuyo `evento` coincida EXACTAMENTE con
     "FIN RECEPCIÓN OBJECIONES" y cuya fecha sea AYER (hoy - 1).
 
     Lógica de negocio:
@@ -93,16 +78,8 @@ def _hitos_fin_recepcion_de_ayer(
     """
     ayer = date.today() - timedelta(days=1)
 
-    eventos = (
-        db.query(ReeCalendarEvent)
-        .filter(
-            ReeCalendarEvent.tenant_id == tenant_id,
-            ReeCalendarEvent.evento    == "FIN RECEPCIÓN OBJECIONES",
-            ReeCalendarEvent.fecha     == ayer,
-        )
-        .all()
-    )
-    return eventos
+    indice = services_indice.obtener_indice(db, tenant_id=tenant_id)
+    return indice.en_fecha(ayer, tipo=services_indice.HITO_FIN_RECEPCION_OBJECIONES)
 
 
 # ═════════════════════════════════════════════════════════════════════════════
@@ -181,9 +158,9 @@ def ejecutar_chequeo_fin_recepcion_tenant(
     errores: List[str] = []
 
     for hito in hitos:
-        parsed = _parsear_mes_afectado(getattr(hito, "mes_afectado", None))
+        parsed = _periodos_hito(hito)
         if parsed is None:
-            errores.append(f"No se pudo parsear mes_afectado='{hito.mes_afectado}' (hito id={hito.id})")
+            errores.append(f"No se pudo parsear mes_afectado='{hito.mes_afectado_texto}' (hito id={hito.id})")
             continue
 
         anio, mes_num, periodo_yyyymm = parsed
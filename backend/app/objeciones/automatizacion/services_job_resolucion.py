@@ -29,12 +29,13 @@ Comportamiento del flag `forzar`:
 from __future__ import annotations
 
 import logging
-from datetime import date, datetime, timedelta
+from datetime import date, datetime
 from typing import Dict, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
-from app.calendario_ree.models import ReeCalendarEvent
+from app.calendario_ree import services_indice
+from app.calendario_ree.services_indice import HitoRee
 from app.empresas.models import Empresa
 from app.objeciones.automatizacion.models import TIPO_FIN_RESOLUCION
 from app.objeciones.automatizacion.services_alertas import upsert_alerta
@@ -50,33 +51,17 @@ logger = logging.getLogger(__name__)
 # Helpers
 # ═════════════════════════════════════════════════════════════════════════════
 
-# Meses en español → número. Idéntico al de services_job.py — usado para
-# parsear "mes_afectado" del calendario (ej. "Julio 2025" → (2025, 7)).
-_MESES_ES_A_NUM: Dict[str, int] = {
-    "enero": 1, "febrero": 2, "marzo": 3, "abril": 4, "mayo": 5, "junio": 6,
-    "julio": 7, "agosto": 8, "septiembre": 9, "octubre": 10, "noviembre": 11, "diciembre": 12,
-}
-
-
-def _parsear_mes_afectado(mes_afectado: Optional[str]) -> Optional[Tuple[int, int, str, str]]:
+def _periodos_hito(hito: HitoRee) -> Optional[Tuple[int, int, str, str]]:
     """
-    Convierte "Julio 2025" → (2025, 7, "202507", "2025/07").
-    Devuelve None si no se puede parsear.
+    Mes afectado del hito ("Julio 2025", ya parseado en el índice) →
+    (2025, 7, "202507", "2025/07"). None si no se pudo parsear.
 
     El último elemento "2025/07" es el formato en el que está guardado el campo
     `periodo` en las tablas de objeciones — se usa para cruzar contra BD.
     """
-    if not mes_afectado:
-        return None
-    partes = str(mes_afectado).strip().split()
-    if len(partes) != 2:
+    if hito.mes_afectado is None:
         return None
-    nombre_mes = partes[0].lower()
-    anio_str = partes[1]
-    mes_num = _MESES_ES_A_NUM.get(nombre_mes)
-    if mes_num is None or not anio_str.isdigit() or len(anio_str) != 4:
-        return None
-    anio = int(anio_str)
+    anio, mes_num = hito.mes_afectado
     periodo_yyyymm = f"{anio:04d}{mes_num:02d}"
     periodo_slash  = f"{anio:04d}/{mes_num:02d}"
     return anio, mes_num, periodo_yyyymm, periodo_slash
@@ -87,9 +72,9 @@ def _hitos_fin_resolucion_proximos_dias(
     *,
     tenant_id: int,
     dias_adelante: int = 3,
-) -> List[ReeCalendarEvent]:
+) -> List[HitoRee]:
     """
-    Busca eventos de calendario_ree cuyo `evento` coincida con
+    Busca hitos del calendario REE cuyo `evento` coincida con
     "FIN RESOLUCIÓN OBJECIONES" y cuya fecha esté en los PRÓXIMOS `dias_adelante`
     días (desde HOY hacia adelante: [hoy, hoy+dias_adelante-1]).
 
@@ -98,21 +83,12 @@ def _hitos_fin_resolucion_proximos_dias(
       ANTES de que llegue, para que el usuario tenga tiempo de reaccionar.
       Si la fecha ya pasó, no re-alertamos (evita ruido).
     """
-    hoy = date.today()
-    fecha_desde = hoy
-    fecha_hasta = hoy + timedelta(days=dias_adelante - 1)
-
-    eventos = (
-        db.query(ReeCalendarEvent)
-        .filter(
-            ReeCalendarEvent.tenant_id == tenant_id,
-            ReeCalendarEvent.evento    == "FIN RESOLUCIÓN OBJECIONES",
-            ReeCalendarEvent.fecha     >= fecha_desde,
-            ReeCalendarEvent.fecha     <= fecha_hasta,
-        )
-        .all()
+    indice = services_indice.obtener_indice(db, tenant_id=tenant_id)
+    return indice.proximos(
+        dias_adelante,
+        desde=date.today(),
+        tipo=services_indice.HITO_FIN_RESOLUCION_OBJECIONES,
     )
-    return eventos
 
 
 def _contar_pendientes_por_empresa(
@@ -211,9 +187,9 @@ def ejecutar_chequeo_fin_resolucion_tenant(
     errores: List[str] = []
 
     for hito in hitos:
-        parsed = _parsear_mes_afectado(getattr(hito, "mes_afectado", None))
+        parsed = _periodos_hito(hito)
         if parsed is None:
-            errores.append(f"No se pudo parsear mes_afectado='{hito.mes_afectado}' (hito id={hito.id})")
+            errores.append(f"No se pudo parsear mes_afectado='{hito.mes_afectado_texto}' (hito id={hito.id})")
             continue
 
         anio, mes_num, periodo_yyyymm, periodo_slash = parsed
@@ -25,6 +25,7 @@ from dataclasses import dataclass
 from datetime import date, datetime, timedelta
 from typing import Any, Dict, List, Optional, Tuple
 
+from sqlalchemy import func
 from sqlalchemy.orm import Session
 
 from app.comunicaciones.models import FtpConfig
@@ -37,10 +38,6 @@ from app.objeciones.models import (
     ObjecionINCL,
 )
 from app.objeciones.services import (
-    delete_agrecl_fichero,
-    delete_cil_fichero,
-    delete_cups_fichero,
-    delete_incl_fichero,
     import_agrecl,
     import_cil,
     import_cups,
@@ -613,13 +610,14 @@ def _sort_key_resultado(r: dict) -> Tuple[int, float, str, int]:
 # FASE 4 — Ejecución: descargar-e-importar
 # ══════════════════════════════════════════════════════════════════════════════
 
-# Mapeo tipo AOB → funciones de import + delete_fichero de objeciones/services.py.
+# Mapeo tipo AOB → función de import de objeciones/services.py (el reemplazo de
+# versión anterior lo hace el propio import con `reemplazar=`).
 # Se construye aquí para localizar las funciones de cada tipo en un solo sitio.
 _TIPO_OPS = {
-    "AOBAGRECL": {"import": import_agrecl, "delete": delete_agrecl_fichero},
-    "OBJEINCL":  {"import": import_incl,   "delete": delete_incl_fichero},
-    "AOBCUPS":   {"import": import_cups,   "delete": delete_cups_fichero},
-    "AOBCIL":    {"import": import_cil,    "delete": delete_cil_fichero},
+    "AOBAGRECL": {"import": import_agrecl},
+    "OBJEINCL":  {"import": import_incl},
+    "AOBCUPS":   {"import": import_cups},
+    "AOBCIL":    {"import": import_cil},
 }
 
 
@@ -670,7 +668,7 @@ def _procesar_item(
 
     Reglas del spec V8 · puntos 26-30:
       ⚪ Nuevo                       → importar
-      🟠 Actualizable + replace=True → DELETE antigua + INSERT nueva
+      🟠 Actualizable + replace=True → DELETE antigua + INSERT nueva (misma transacción)
       🟠 Actualizable + replace=False→ ERROR
       Igual o inferior ya en BD      → ERROR
 
@@ -782,24 +780,19 @@ def _procesar_item(
     else:
         contenido = contenido_bruto
 
-    # 5) Si es reemplazo: borrar la versión antigua (con sus respuestas).
+    # 5) Importar el fichero nuevo. Usamos parsed.nombre_sin_bz2 para que en BD
+    #    los nombres queden consistentes con los de la subida manual.
+    #    Si es reemplazo, el borrado de la versión antigua (con sus respuestas)
+    #    va en la misma transacción que la carga: si la importación falla, la
+    #    versión anterior sigue intacta.
     filas_borradas = 0
     if es_reemplazo and nombre_antiguo:
-        try:
-            filas_borradas = ops["delete"](
-                db, nombre_fichero=nombre_antiguo,
-                tenant_id=tenant_id, empresa_id=empresa_id,
-            )
-        except Exception as e:
-            msg = f"Error borrando versión antigua: {str(e)[:200]}"
-            _log(db, tenant_id=tenant_id, empresa_id=empresa_id, config_id=config_id,
-                 rule_id=None, origen="manual", nombre_fichero=parsed.nombre_sin_bz2,
-                 tamanio=tamanio_original,
-                 estado="error", mensaje_error=msg, modulo="objeciones")
-            return {"nombre": parsed.nombre_sin_bz2, "resultado": "error", "mensaje": msg}
+        filas_borradas = db.query(func.count(modelo.id)).filter(
+            modelo.tenant_id == tenant_id,
+            modelo.empresa_id == empresa_id,
+            modelo.nombre_fichero == nombre_antiguo,
+        ).scalar() or 0
 
-    # 6) Importar el fichero nuevo. Usamos parsed.nombre_sin_bz2 para que en BD
-    #    los nombres queden consistentes con los de la subida manual.
     try:
         filas_importadas = ops["import"](
             db,
@@ -807,6 +800,7 @@ def _procesar_item(
             empresa_id=empresa_id,
             nombre_fichero=parsed.nombre_sin_bz2,
             content=contenido,
+            reemplazar=nombre_antiguo if es_reemplazo else None,
         )
     except Exception as e:
         msg = f"Error importando contenido: {str(e)[:200]}"
@@ -816,7 +810,7 @@ def _procesar_item(
              estado="error", mensaje_error=msg, modulo="objeciones")
         return {"nombre": parsed.nombre_sin_bz2, "resultado": "error", "mensaje": msg}
 
-    # 7) Log OK + respuesta.
+    # 6) Log OK + respuesta.
     if es_reemplazo:
         resultado = "reemplazado"
         mensaje = f"Reemplazada versión .{importado[0] if importado else '?'} " \
@@ -10,6 +10,7 @@ from sqlalchemy import (
     String,
     Text,
     Index,
+    UniqueConstraint,
 )
 from app.core.models_base import Base, TimestampMixin
 
@@ -66,6 +67,10 @@ class ObjecionAGRECL(TimestampMixin, Base):
     __table_args__ = (
         Index("ix_objeciones_agrecl_tenant_empresa_periodo",
               "tenant_id", "empresa_id", "periodo"),
+        # Cubre el GROUP BY de estadísticas por fichero (index-only scan en PG).
+        Index("ix_objeciones_agrecl_stats_fichero",
+              "tenant_id", "empresa_id", "nombre_fichero", "aceptacion",
+              postgresql_include=["created_at", "enviado_sftp_at"]),
     )
 
 
@@ -114,6 +119,10 @@ class ObjecionINCL(TimestampMixin, Base):
     __table_args__ = (
         Index("ix_objeciones_incl_tenant_empresa_cups",
               "tenant_id", "empresa_id", "cups"),
+        # Cubre el GROUP BY de estadísticas por fichero (index-only scan en PG).
+        Index("ix_objeciones_incl_stats_fichero",
+              "tenant_id", "empresa_id", "nombre_fichero", "aceptacion",
+              postgresql_include=["created_at", "enviado_sftp_at"]),
     )
 
 
@@ -163,6 +172,10 @@ class ObjecionCUPS(TimestampMixin, Base):
     __table_args__ = (
         Index("ix_objeciones_cups_tenant_empresa_periodo",
               "tenant_id", "empresa_id", "periodo"),
+        # Cubre el GROUP BY de estadísticas por fichero (index-only scan en PG).
+        Index("ix_objeciones_cups_stats_fichero",
+              "tenant_id", "empresa_id", "nombre_fichero", "aceptacion",
+              postgresql_include=["created_at", "enviado_sftp_at"]),
     )
 
 
@@ -214,6 +227,10 @@ class ObjecionCIL(TimestampMixin, Base):
     __table_args__ = (
         Index("ix_objeciones_cil_tenant_empresa_periodo",
               "tenant_id", "empresa_id", "periodo"),
+        # Cubre el GROUP BY de estadísticas por fichero (index-only scan en PG).
+        Index("ix_objeciones_cil_stats_fichero",
+              "tenant_id", "empresa_id", "nombre_fichero", "aceptacion",
+              postgresql_include=["created_at", "enviado_sftp_at"]),
     )
 
 
@@ -239,4 +256,34 @@ class ReobGenerado(TimestampMixin, Base):
 
     __table_args__ = (
         Index("ix_reob_generados_tenant_empresa", "tenant_id", "empresa_id"),
-    )
\ No newline at end of file
+    )
+
+
+class ObjecionFicheroResumen(Base):
+    """
+    Resumen por fichero AOB (una fila por tenant + empresa + tipo + fichero).
+
+    Lo mantienen los services de objeciones en la misma transacción que
+    importan, responden, marcan como enviadas o borran objeciones; se lee en
+    los listados de ficheros cuando OBJECIONES_RESUMEN_FICHEROS está activo.
+    """
+
+    __tablename__ = "objeciones_ficheros_resumen"
+
+    id              = Column(Integer, primary_key=True)
+    tenant_id       = Column(Integer, ForeignKey("tenants.id"),  nullable=False)
+    empresa_id      = Column(Integer, ForeignKey("empresas.id"), nullable=False)
+    tipo            = Column(String(10),  nullable=False)   # agrecl / incl / cups / cil
+    nombre_fichero  = Column(String(255), nullable=False)
+    total           = Column(Integer, nullable=False, default=0)
+    pendientes      = Column(Integer, nullable=False, default=0)
+    aceptadas       = Column(Integer, nullable=False, default=0)
+    rechazadas      = Column(Integer, nullable=False, default=0)
+    created_at      = Column(DateTime, nullable=True)   # max(created_at) de las objeciones
+    enviado_sftp_at = Column(DateTime, nullable=True)   # max(enviado_sftp_at)
+
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "empresa_id", "tipo", "nombre_fichero",
+                         name="uq_objeciones_ficheros_resumen"),
+        Index("ix_objeciones_ficheros_resumen_tenant_tipo", "tenant_id", "tipo"),
+    )
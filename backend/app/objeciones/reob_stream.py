@@ -0,0 +1,113 @@
+# app/objeciones/reob_stream.py
+"""
+Escritura en streaming de ficheros REOB (CSV ';' latin-1 → bz2 → zip).
+
+Antes se construía el CSV entero en un StringIO, se comprimía de una vez y,
+para AGRECL/CUPS, se volvía a meter en un zip en memoria; el envío SFTP
+además descomprimía el zip para subir cada .bz2. Aquí cada etapa es un
+generador de bytes:
+
+  - `iter_bz2_csv(rows)` escribe las filas por bloques en un
+    `bz2.BZ2Compressor` incremental (la salida es idéntica a `bz2.compress`
+    del CSV completo).
+  - `iter_zip(miembros)` escribe un zip sobre un destino no seekable
+    (zipfile usa data descriptors) y cede lo que se va escribiendo.
+  - `spool(chunks)` vuelca un generador entero a un SpooledTemporaryFile
+    (memoria hasta REOB_SPOOL_BYTES, luego disco) para el envío SFTP, que
+    solo sube un fichero si se ha generado completo.
+
+La memoria queda acotada por el tamaño de bloque y el primer byte sale antes
+de leer la última fila.
+"""
+from __future__ import annotations
+
+import bz2
+import csv
+import io
+import tempfile
+import zipfile
+from typing import Iterable, Iterator, List, Sequence, Tuple
+
+
+__all__ = ["iter_bz2_csv", "iter_zip", "spool"]
+
+
+# Filas CSV acumuladas antes de pasarlas al compresor.
+REOB_FLUSH_ROWS = 1000
+# Bytes que `spool` guarda en memoria antes de pasar a fichero temporal.
+REOB_SPOOL_BYTES = 8 * 1024 * 1024
+
+
+def iter_bz2_csv(rows: Iterable[Sequence], *, flush_rows: int = REOB_FLUSH_ROWS) -> Iterator[bytes]:
+    """CSV ';' sin cabeceras, latin-1, comprimido bz2 por bloques."""
+    comp = bz2.BZ2Compressor()
+    buf = io.StringIO()
+    writer = csv.writer(buf, delimiter=";", lineterminator="\n")
+
+    pending = 0
+    for row in rows:
+        writer.writerow(row)
+        pending += 1
+        if pending >= flush_rows:
+            data = comp.compress(buf.getvalue().encode("latin-1", errors="replace"))
+            buf.seek(0)
+            buf.truncate(0)
+            pending = 0
+            if data:
+                yield data
+
+    data = comp.compress(buf.getvalue().encode("latin-1", errors="replace"))
+    if data:
+        yield data
+    yield comp.flush()
+
+
+class _ChunkSink(io.RawIOBase):
+    """Destino de escritura no seekable que acumula bytes hasta `drain()`."""
+
+    def __init__(self) -> None:
+        self._chunks: List[bytes] = []
+
+    def writable(self) -> bool:
+        return True
+
+    def write(self, b) -> int:
+        self._chunks.append(bytes(b))
+        return len(b)
+
+    def drain(self) -> bytes:
+        data = b"".join(self._chunks)
+        self._chunks.clear()
+        return data
+
+
+def iter_zip(miembros: Iterable[Tuple[str, Iterable[bytes]]]) -> Iterator[bytes]:
+    """Zip (DEFLATE) con un miembro por (nombre, generador de bytes)."""
+    sink = _ChunkSink()
+    with zipfile.ZipFile(sink, "w", zipfile.ZIP_DEFLATED) as zf:
+        for nombre, chunks in miembros:
+            with zf.open(nombre, "w") as dest:
+                for chunk in chunks:
+                    dest.write(chunk)
+                    data = sink.drain()
+                    if data:
+                        yield data
+            data = sink.drain()
+            if data:
+                yield data
+    data = sink.drain()
+    if data:
+        yield data
+
+
+def spool(chunks: Iterable[bytes], *, max_size: int = REOB_SPOOL_BYTES) -> tempfile.SpooledTemporaryFile:
+    """Consume `chunks` en un SpooledTemporaryFile rebobinado (el llamador lo cierra)."""
+    f = tempfile.SpooledTemporaryFile(max_size=max_size)
+    try:
+        for chunk in chunks:
+            f.write(chunk)
+    except BaseException:
+        f.close()
+        raise
+    f.seek(0)
+    return f
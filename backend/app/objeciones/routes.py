@@ -13,6 +13,7 @@ from sqlalchemy.orm import Session
 
 from app.core.auth import get_current_user
 from app.core.db import get_db
+from app.core.perf import perf_budget
 from app.empresas.models import Empresa
 from app.tenants.models import User
 
@@ -657,6 +658,7 @@ async def import_agrecl(
 
 
 @router.get("/agrecl/ficheros", response_model=List[FicheroStats])
+@perf_budget(queries=8)
 def get_ficheros_agrecl(
     empresa_id: Optional[int] = Query(None),
     db: Session = Depends(get_db),
@@ -748,8 +750,8 @@ def generate_agrecl(
 ):
     empresa = _get_empresa_or_404(db, empresa_id)
     _assert_empresa_access(user=current_user, empresa=empresa)
-    content, filename = services.generate_reobagrecl_zip(db, tenant_id=_effective_tenant(current_user), empresa_id=empresa_id, nombre_fichero=nombre_fichero)
-    return Response(content=content, media_type="application/zip", headers={"Content-Disposition": f"attachment; filename={filename}"})
+    chunks, filename = services.stream_reobagrecl_zip(db, tenant_id=_effective_tenant(current_user), empresa_id=empresa_id, nombre_fichero=nombre_fichero)
+    return StreamingResponse(chunks, media_type="application/zip", headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 
 @router.post("/agrecl/generate-one")
@@ -788,6 +790,7 @@ async def import_incl(
 
 
 @router.get("/incl/ficheros", response_model=List[FicheroStats])
+@perf_budget(queries=8)
 def get_ficheros_incl(
     empresa_id: Optional[int] = Query(None),
     db: Session = Depends(get_db),
@@ -879,8 +882,8 @@ def generate_incl(
 ):
     empresa = _get_empresa_or_404(db, empresa_id)
     _assert_empresa_access(user=current_user, empresa=empresa)
-    content, filename = services.generate_reobjeincl(db, tenant_id=_effective_tenant(current_user), empresa_id=empresa_id, nombre_fichero=nombre_fichero)
-    return Response(content=content, media_type="application/x-bzip2", headers={"Content-Disposition": f"attachment; filename={filename}"})
+    chunks, filename = services.stream_reobjeincl(db, tenant_id=_effective_tenant(current_user), empresa_id=empresa_id, nombre_fichero=nombre_fichero)
+    return StreamingResponse(chunks, media_type="application/x-bzip2", headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -903,6 +906,7 @@ async def import_cups(
 
 
 @router.get("/cups/ficheros", response_model=List[FicheroStats])
+@perf_budget(queries=8)
 def get_ficheros_cups(
     empresa_id: Optional[int] = Query(None),
     db: Session = Depends(get_db),
@@ -994,8 +998,8 @@ def generate_cups(
 ):
     empresa = _get_empresa_or_404(db, empresa_id)
     _assert_empresa_access(user=current_user, empresa=empresa)
-    content, filename = services.generate_reobcups(db, tenant_id=_effective_tenant(current_user), empresa_id=empresa_id, nombre_fichero=nombre_fichero)
-    return Response(content=content, media_type="application/x-bzip2", headers={"Content-Disposition": f"attachment; filename={filename}"})
+    chunks, filename = services.stream_reobcups(db, tenant_id=_effective_tenant(current_user), empresa_id=empresa_id, nombre_fichero=nombre_fichero)
+    return StreamingResponse(chunks, media_type="application/x-bzip2", headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -1018,6 +1022,7 @@ async def import_cil(
 
 
 @router.get("/cil/ficheros", response_model=List[FicheroStats])
+@perf_budget(queries=8)
 def get_ficheros_cil(
     empresa_id: Optional[int] = Query(None),
     db: Session = Depends(get_db),
@@ -1481,8 +1486,8 @@ def generate_cil(
 ):
     empresa = _get_empresa_or_404(db, empresa_id)
     _assert_empresa_access(user=current_user, empresa=empresa)
-    content, filename = services.generate_reobcil(db, tenant_id=_effective_tenant(current_user), empresa_id=empresa_id, nombre_fichero=nombre_fichero)
-    return Response(content=content, media_type="application/x-bzip2", headers={"Content-Disposition": f"attachment; filename={filename}"})
+    chunks, filename = services.stream_reobcil(db, tenant_id=_effective_tenant(current_user), empresa_id=empresa_id, nombre_fichero=nombre_fichero)
+    return StreamingResponse(chunks, media_type="application/x-bzip2", headers={"Content-Disposition": f"attachment; filename={filename}"})
 
 
 # ═══════════════════════════════════════════════════════════════════════════════
@@ -3,32 +3,30 @@
 
 from __future__ import annotations
 
-import bz2
-import io
-import csv
-import zipfile
 from datetime import datetime
-from decimal import Decimal, InvalidOperation
-from typing import Dict, List, Optional, Tuple
+from itertools import groupby
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
 
+from sqlalchemy import case, func
 from sqlalchemy.orm import Session
 
+from app.core.config import get_settings
 from app.core.datetime_utils import ahora_madrid
-from app.objeciones.models import ObjecionAGRECL, ObjecionCIL, ObjecionCUPS, ObjecionINCL, ReobGenerado
+from app.core.exports import iter_query
+from app.objeciones.models import (
+    ObjecionAGRECL,
+    ObjecionCIL,
+    ObjecionCUPS,
+    ObjecionFicheroResumen,
+    ObjecionINCL,
+    ReobGenerado,
+)
+from app.objeciones.reob_stream import iter_bz2_csv, iter_zip, spool
+from app.objeciones.services_importacion import LayoutCol, cargar_objeciones, parsear_objeciones
 
 
 # ── Helpers generales ─────────────────────────────────────────────────────────
 
-def _dec(value: str) -> Optional[Decimal]:
-    v = (value or "").strip().replace(",", ".")
-    if not v:
-        return None
-    try:
-        return Decimal(v)
-    except InvalidOperation:
-        return None
-
-
 def _num(value) -> str:
     """Convierte Decimal a entero si no tiene decimales, o string vacío si es None."""
     if value is None:
@@ -39,29 +37,9 @@ def _num(value) -> str:
         return str(int(d))
     return str(d)
 
-def _str(value: str) -> Optional[str]:
-    v = (value or "").strip()
-    return v if v else None
-
-
-def _parse_rows(content: bytes) -> List[List[str]]:
-    """Parsea fichero .0 (CSV ';', sin cabeceras)."""
-    text = content.decode("latin-1", errors="replace")
-    reader = csv.reader(io.StringIO(text), delimiter=";")
-    return [[c.strip() for c in row] for row in reader if any(c.strip() for c in row)]
-
-
-def _col(row: List[str], idx: int) -> str:
-    return row[idx] if idx < len(row) else ""
-
-
 def _csv_to_bz2(rows_data: List[List]) -> bytes:
     """CSV ';' sin cabeceras, comprimido bz2, encoding latin-1."""
-    output = io.StringIO()
-    writer = csv.writer(output, delimiter=";", lineterminator="\n")
-    for row in rows_data:
-        writer.writerow(row)
-    return bz2.compress(output.getvalue().encode("latin-1", errors="replace"))
+    return b"".join(iter_bz2_csv(rows_data))
 
 
 # ── Helpers de nombres de fichero ─────────────────────────────────────────────
@@ -119,11 +97,11 @@ def _parse_nombre_cil(nombre: str) -> Tuple[str, str, str, str]:
 
 
 def _cccc_from_id_objecion(id_objecion: Optional[str]) -> str:
-    """AG_0921_0277_202506_C05E → 0921"""
+    """AG_0921_0277_202506_C05E → 0921 (misma regla que `_cccc_sql`)"""
     if not id_objecion:
         return "0000"
     partes = id_objecion.split("_")
-    return partes[1] if len(partes) > 1 else "0000"
+    return (partes[1] if len(partes) > 1 else "") or "0000"
 
 
 # ── Validación de nombre de fichero ───────────────────────────────────────────
@@ -182,51 +160,179 @@ def validar_nombre_fichero(
 
 # ── Stats de ficheros ─────────────────────────────────────────────────────────
 
-def _stats_ficheros(db: Session, model, *, tenant_id: int, empresa_id: Optional[int]) -> List[dict]:
-    q = db.query(model).filter(model.tenant_id == tenant_id)
+_TIPO_POR_MODELO = {
+    ObjecionAGRECL: "agrecl",
+    ObjecionINCL:   "incl",
+    ObjecionCUPS:   "cups",
+    ObjecionCIL:    "cil",
+}
+
+_SIN_NOMBRE = "desconocido"
+
+
+def _stats_query(
+    db: Session, model, *,
+    tenant_id: int,
+    empresa_id: Optional[int],
+    nombres: Optional[Iterable[str]] = None,
+    por_empresa: bool = False,
+):
+    """
+    GROUP BY nombre_fichero (y empresa_id si `por_empresa`) con los contadores
+    por estado de aceptación. Lo resuelve PostgreSQL con el índice
+    ix_objeciones_<tipo>_stats_fichero sin traer las filas a Python.
+
+    Pendientes = todo lo que no es "S" ni "N" (NULL, "" u otros valores).
+    """
+    nombre = func.coalesce(model.nombre_fichero, _SIN_NOMBRE)
+    cols = [
+        nombre.label("nombre_fichero"),
+        func.count().label("total"),
+        func.sum(case((model.aceptacion == "S", 1), else_=0)).label("aceptadas"),
+        func.sum(case((model.aceptacion == "N", 1), else_=0)).label("rechazadas"),
+        func.max(model.created_at).label("created_at"),
+        func.max(model.enviado_sftp_at).label("enviado_sftp_at"),
+    ]
+    group = [nombre]
+    if por_empresa:
+        cols.insert(0, model.empresa_id.label("empresa_id"))
+        group.insert(0, model.empresa_id)
+
+    q = db.query(*cols).filter(model.tenant_id == tenant_id)
     if empresa_id:
         q = q.filter(model.empresa_id == empresa_id)
-    rows = q.order_by(model.created_at.desc()).all()
-
-    ficheros: Dict[str, dict] = {}
-    for r in rows:
-        nombre = getattr(r, "nombre_fichero") or "desconocido"
-        if nombre not in ficheros:
-            # `aaaamm`: periodo del fichero, extraído del nombre (no del campo
-            # `periodo` de la fila, que en INCL viene como rango "20250701 - 20250731").
-            # El nombre tiene formato AOB{TIPO}_..._AAAAMM_FECHA.0[.bz2] y la
-            # posición de AAAAMM depende del tipo:
-            #   AOBAGRECL_DDDD_AAAAMM_FECHA   → posición 2
-            #   OBJEINCL_CCCC_DDDD_AAAAMM_F   → posición 3
-            #   AOBCUPS_DDDD_CCCC_AAAAMM_F    → posición 3
-            #   AOBCIL_DDDD_CCCC_AAAAMM_F     → posición 3
-            ficheros[nombre] = {
-                "nombre_fichero": nombre,
-                "aaaamm": _extraer_aaaamm_de_nombre(nombre),
-                "created_at": getattr(r, "created_at"),
-                "total": 0,
-                "pendientes": 0,
-                "aceptadas": 0,
-                "rechazadas": 0,
-                "enviado_sftp_at": None,
-            }
-        f = ficheros[nombre]
-        f["total"] += 1
-        aceptacion = getattr(r, "aceptacion") or ""
-        if aceptacion == "S":
-            f["aceptadas"] += 1
-        elif aceptacion == "N":
-            f["rechazadas"] += 1
-        else:
-            f["pendientes"] += 1
-        row_created = getattr(r, "created_at")
-        if row_created and (f["created_at"] is None or row_created > f["created_at"]):
-            f["created_at"] = row_created
-        enviado = getattr(r, "enviado_sftp_at", None)
-        if enviado and (f["enviado_sftp_at"] is None or enviado > f["enviado_sftp_at"]):
-            f["enviado_sftp_at"] = enviado
+    if nombres is not None:
+        q = q.filter(nombre.in_(list(nombres)))
+    return q.group_by(*group)
+
+
+def _fichero_stats_dict(row) -> dict:
+    # `aaaamm`: periodo del fichero, extraído del nombre (no del campo
+    # `periodo` de la fila, que en INCL viene como rango "20250701 - 20250731").
+    total = int(row.total or 0)
+    aceptadas = int(row.aceptadas or 0)
+    rechazadas = int(row.rechazadas or 0)
+    return {
+        "nombre_fichero": row.nombre_fichero,
+        "aaaamm": _extraer_aaaamm_de_nombre(row.nombre_fichero),
+        "created_at": row.created_at,
+        "total": total,
+        "pendientes": total - aceptadas - rechazadas,
+        "aceptadas": aceptadas,
+        "rechazadas": rechazadas,
+        "enviado_sftp_at": row.enviado_sftp_at,
+    }
 
-    return list(ficheros.values())
+
+def _stats_ficheros(db: Session, model, *, tenant_id: int, empresa_id: Optional[int]) -> List[dict]:
+    """
+    Estadísticas por fichero AOB de un tipo, ordenadas por la última carga.
+
+    Sin empresa se agregan todas las del tenant por nombre de fichero. Si
+    OBJECIONES_RESUMEN_FICHEROS está activo se lee de la tabla resumen
+    (una fila por fichero) en vez de agrupar las objeciones.
+    """
+    if get_settings().OBJECIONES_RESUMEN_FICHEROS:
+        R = ObjecionFicheroResumen
+        q = db.query(
+            R.nombre_fichero.label("nombre_fichero"),
+            func.sum(R.total).label("total"),
+            func.sum(R.aceptadas).label("aceptadas"),
+            func.sum(R.rechazadas).label("rechazadas"),
+            func.max(R.created_at).label("created_at"),
+            func.max(R.enviado_sftp_at).label("enviado_sftp_at"),
+        ).filter(R.tenant_id == tenant_id, R.tipo == _TIPO_POR_MODELO[model])
+        if empresa_id:
+            q = q.filter(R.empresa_id == empresa_id)
+        q = q.group_by(R.nombre_fichero).order_by(func.max(R.created_at).desc())
+    else:
+        q = _stats_query(db, model, tenant_id=tenant_id, empresa_id=empresa_id)
+        q = q.order_by(func.max(model.created_at).desc())
+    return [_fichero_stats_dict(r) for r in q.all()]
+
+
+def _nombres_de_ids(db: Session, model, *, ids: List[int], tenant_id: int, empresa_id: int) -> List[Optional[str]]:
+    """Ficheros afectados por un borrado por IDs (para refrescar su resumen)."""
+    if not ids:
+        return []
+    rows = db.query(model.nombre_fichero).filter(
+        model.id.in_(ids),
+        model.tenant_id == tenant_id,
+        model.empresa_id == empresa_id,
+    ).distinct().all()
+    return [r[0] for r in rows]
+
+
+def _refrescar_resumen(
+    db: Session, model, *,
+    tenant_id: int,
+    empresa_id: int,
+    nombres: Iterable[Optional[str]],
+) -> None:
+    """
+    Recalcula las filas de objeciones_ficheros_resumen de los ficheros dados
+    (borra y vuelve a insertar con el GROUP BY de esos ficheros). No hace
+    commit: va en la misma transacción que el cambio de objeciones.
+
+    Hace flush antes del GROUP BY: SessionLocal usa autoflush=False y, sin
+    él, los cambios pendientes (p. ej. la nueva `aceptacion`) no contarían.
+    """
+    claves = {n or _SIN_NOMBRE for n in nombres}
+    if not claves:
+        return
+    db.flush()
+    tipo = _TIPO_POR_MODELO[model]
+    R = ObjecionFicheroResumen
+    db.query(R).filter(
+        R.tenant_id == tenant_id,
+        R.empresa_id == empresa_id,
+        R.tipo == tipo,
+        R.nombre_fichero.in_(claves),
+    ).delete(synchronize_session=False)
+
+    for row in _stats_query(db, model, tenant_id=tenant_id, empresa_id=empresa_id, nombres=claves):
+        d = _fichero_stats_dict(row)
+        db.add(R(
+            tenant_id=tenant_id, empresa_id=empresa_id, tipo=tipo,
+            nombre_fichero=d["nombre_fichero"],
+            total=d["total"], pendientes=d["pendientes"],
+            aceptadas=d["aceptadas"], rechazadas=d["rechazadas"],
+            created_at=d["created_at"], enviado_sftp_at=d["enviado_sftp_at"],
+        ))
+
+
+def reconstruir_resumen_ficheros(db: Session, *, tenant_id: Optional[int] = None) -> int:
+    """
+    Regenera objeciones_ficheros_resumen desde cero (todas las empresas y
+    tipos, o solo un tenant). Para el alta inicial o si se sospecha desfase.
+    Devuelve el número de filas de resumen creadas.
+    """
+    R = ObjecionFicheroResumen
+    q = db.query(R)
+    if tenant_id is not None:
+        q = q.filter(R.tenant_id == tenant_id)
+    q.delete(synchronize_session=False)
+
+    tenant_ids = [tenant_id] if tenant_id is not None else None
+    creadas = 0
+    for model, tipo in _TIPO_POR_MODELO.items():
+        if tenant_ids is None:
+            tids = [t for (t,) in db.query(model.tenant_id).distinct().all()]
+        else:
+            tids = tenant_ids
+        for tid in tids:
+            for row in _stats_query(db, model, tenant_id=tid, empresa_id=None, por_empresa=True):
+                d = _fichero_stats_dict(row)
+                db.add(R(
+                    tenant_id=tid, empresa_id=row.empresa_id, tipo=tipo,
+                    nombre_fichero=d["nombre_fichero"],
+                    total=d["total"], pendientes=d["pendientes"],
+                    aceptadas=d["aceptadas"], rechazadas=d["rechazadas"],
+                    created_at=d["created_at"], enviado_sftp_at=d["enviado_sftp_at"],
+                ))
+                creadas += 1
+    db.commit()
+    return creadas
 
 
 def _extraer_aaaamm_de_nombre(nombre: str) -> Optional[str]:
@@ -256,42 +362,140 @@ def _extraer_aaaamm_de_nombre(nombre: str) -> Optional[str]:
     return None
 
 
+# ── Import masivo ─────────────────────────────────────────────────────────────
+
+def _importar_bulk(
+    db: Session, model, layout: List[LayoutCol], *,
+    tenant_id: int,
+    empresa_id: int,
+    nombre_fichero: str,
+    content: bytes,
+    reemplazar: Optional[str] = None,
+) -> int:
+    """
+    Importa un fichero AOB con COPY (ver services_importacion).
+
+    Si `reemplazar` trae el nombre de una versión anterior ya importada, se
+    borran sus objeciones en la MISMA transacción que la carga de la nueva:
+    o queda la versión nueva completa o, si algo falla, sigue la antigua.
+    """
+    frame = parsear_objeciones(content, layout)
+    nombres = [nombre_fichero]
+    try:
+        if reemplazar:
+            db.query(model).filter(
+                model.nombre_fichero == reemplazar,
+                model.tenant_id == tenant_id,
+                model.empresa_id == empresa_id,
+            ).delete(synchronize_session=False)
+            nombres.append(reemplazar)
+        nuevos = cargar_objeciones(
+            db, model, frame, layout,
+            tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero,
+        )
+        _refrescar_resumen(db, model, tenant_id=tenant_id, empresa_id=empresa_id, nombres=nombres)
+        db.commit()
+    except Exception:
+        db.rollback()
+        raise
+    return nuevos
+
+
+# ── Generación REOB en streaming ──────────────────────────────────────────────
+
+def _cccc_sql(db: Session, id_col):
+    """
+    Expresión SQL con la comercializadora del ID de objeción (segundo token
+    de AG_0921_0277_..., "0000" si no hay o está vacío). Se selecciona como
+    columna y se usa tanto para ordenar como para agrupar: así las filas de
+    cada .bz2 llegan contiguas y se escribe un miembro detrás de otro en
+    una sola pasada.
+    """
+    if db.get_bind().dialect.name == "postgresql":
+        token = func.split_part(id_col, "_", 2)
+    else:
+        # SQLite (tests): sin split_part; el mismo token con instr/substr.
+        resto = func.substr(id_col, func.instr(id_col, "_") + 1)
+        token = case(
+            (func.instr(id_col, "_") == 0, ""),
+            (func.instr(resto, "_") == 0, resto),
+            else_=func.substr(resto, 1, func.instr(resto, "_") - 1),
+        )
+    return func.coalesce(func.nullif(token, ""), "0000")
+
+
+def _reob_miembros(
+    db: Session, model, *,
+    tenant_id: int,
+    empresa_id: int,
+    nombre_fichero: str,
+    to_list: Callable[[Any], List],
+    por_cccc: bool,
+    nombre_bz2: Callable[[Optional[str]], str],
+) -> Iterator[Tuple[str, Iterator[bytes], Dict[str, int]]]:
+    """
+    Cede (nombre_bz2, bytes_bz2, contador) por cada fichero REOB.
+
+    Las filas salen de un cursor de servidor (`iter_query`) y se comprimen
+    según se leen. `por_cccc=True` (AGRECL/CUPS): solo objeciones con
+    respuesta S/N y un .bz2 por comercializadora; si no, un único .bz2 con
+    todas. `contador` ({"filas", "respondidas"}) queda completo cuando se
+    ha consumido el generador de bytes de ese miembro.
+    """
+    q = db.query(model).filter(
+        model.tenant_id == tenant_id,
+        model.empresa_id == empresa_id,
+        model.nombre_fichero == nombre_fichero,
+    )
+
+    def _filas(rows, contador: Dict[str, int]):
+        for r in rows:
+            contador["filas"] += 1
+            if r.aceptacion in ("S", "N"):
+                contador["respondidas"] += 1
+            yield to_list(r)
+
+    if por_cccc:
+        cccc_col = _cccc_sql(db, model.id_objecion).label("cccc")
+        q = q.add_columns(cccc_col).filter(model.aceptacion.in_(("S", "N")))
+        q = q.order_by(cccc_col, model.id.desc())
+        for cccc, grupo in groupby(iter_query(q), key=lambda fila: fila.cccc):
+            contador = {"filas": 0, "respondidas": 0}
+            objeciones = (fila[0] for fila in grupo)
+            yield nombre_bz2(cccc), iter_bz2_csv(_filas(objeciones, contador)), contador
+    else:
+        q = q.order_by(model.id.desc())
+        contador = {"filas": 0, "respondidas": 0}
+        yield nombre_bz2(None), iter_bz2_csv(_filas(iter_query(q), contador)), contador
+
+
 # ── AOBAGRECL ─────────────────────────────────────────────────────────────────
 # Posiciones: 0=ID 1=Distrib 2=Comer 3=NivTen 4=Tarifa 5=Disc 6=TipPunto
 #             7=Prov 8=TipDem 9=Periodo 10=Motivo 11=Magnitud
 #             12=E_pub 13=E_prop 14=Comentario 15=Autoobj
 #             16=Aceptacion 17=MotivoNoAcept 18=ComentResp
 
-def import_agrecl(db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str, content: bytes) -> int:
-    rows = _parse_rows(content)
-    nuevos = 0
-    for row in rows:
-        obj = ObjecionAGRECL(
-            tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero,
-            id_objecion=_str(_col(row, 0)),
-            distribuidor=_str(_col(row, 1)),
-            comercializador=_str(_col(row, 2)),
-            nivel_tension=_str(_col(row, 3)),
-            tarifa_acceso=_str(_col(row, 4)),
-            disc_horaria=_str(_col(row, 5)),
-            tipo_punto=_str(_col(row, 6)),
-            provincia=_str(_col(row, 7)),
-            tipo_demanda=_str(_col(row, 8)),
-            periodo=_str(_col(row, 9)),
-            motivo=_str(_col(row, 10)),
-            magnitud=_str(_col(row, 11)),
-            e_publicada=_dec(_col(row, 12)),
-            e_propuesta=_dec(_col(row, 13)),
-            comentario_emisor=_str(_col(row, 14)),
-            autoobjecion=_str(_col(row, 15)),
-            aceptacion=_str(_col(row, 16)),
-            motivo_no_aceptacion=_str(_col(row, 17)),
-            comentario_respuesta=_str(_col(row, 18)),
-        )
-        db.add(obj)
-        nuevos += 1
-    db.commit()
-    return nuevos
+_LAYOUT_AGRECL: List[LayoutCol] = [
+    ("id_objecion", 0, "str"), ("distribuidor", 1, "str"), ("comercializador", 2, "str"),
+    ("nivel_tension", 3, "str"), ("tarifa_acceso", 4, "str"), ("disc_horaria", 5, "str"),
+    ("tipo_punto", 6, "str"), ("provincia", 7, "str"), ("tipo_demanda", 8, "str"),
+    ("periodo", 9, "str"), ("motivo", 10, "str"), ("magnitud", 11, "str"),
+    ("e_publicada", 12, "dec"), ("e_propuesta", 13, "dec"),
+    ("comentario_emisor", 14, "str"), ("autoobjecion", 15, "str"),
+    ("aceptacion", 16, "str"), ("motivo_no_aceptacion", 17, "str"),
+    ("comentario_respuesta", 18, "str"),
+]
+
+
+def import_agrecl(
+    db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str, content: bytes,
+    reemplazar: Optional[str] = None,
+) -> int:
+    return _importar_bulk(
+        db, ObjecionAGRECL, _LAYOUT_AGRECL,
+        tenant_id=tenant_id, empresa_id=empresa_id,
+        nombre_fichero=nombre_fichero, content=content, reemplazar=reemplazar,
+    )
 
 
 def list_agrecl(
@@ -335,6 +539,7 @@ def update_agrecl_respuesta(
     obj.comentario_respuesta = comentario_respuesta  # type: ignore
     obj.respuesta_publicada = respuesta_publicada  # type: ignore
     obj.updated_at = ahora_madrid()  # type: ignore
+    _refrescar_resumen(db, ObjecionAGRECL, tenant_id=tenant_id, empresa_id=empresa_id, nombres=[obj.nombre_fichero])
     db.commit()
     db.refresh(obj)
     return obj
@@ -342,11 +547,13 @@ def update_agrecl_respuesta(
 
 def delete_agrecl(db: Session, *, ids: List[int], tenant_id: int, empresa_id: int) -> int:
     """Borra objeciones por IDs — verifica tenant_id Y empresa_id."""
+    nombres = _nombres_de_ids(db, ObjecionAGRECL, ids=ids, tenant_id=tenant_id, empresa_id=empresa_id)
     deleted = db.query(ObjecionAGRECL).filter(
         ObjecionAGRECL.id.in_(ids),
         ObjecionAGRECL.tenant_id == tenant_id,
         ObjecionAGRECL.empresa_id == empresa_id,
     ).delete(synchronize_session=False)
+    _refrescar_resumen(db, ObjecionAGRECL, tenant_id=tenant_id, empresa_id=empresa_id, nombres=nombres)
     db.commit()
     return deleted
 
@@ -378,6 +585,7 @@ def delete_agrecl_fichero(
             ReobGenerado.nombre_fichero_aob == nombre_fichero,
         ).delete(synchronize_session=False)
 
+    _refrescar_resumen(db, ObjecionAGRECL, tenant_id=tenant_id, empresa_id=empresa_id, nombres=[nombre_fichero])
     db.commit()
     return deleted
 
@@ -395,29 +603,26 @@ def _agrecl_row_to_list(r: ObjecionAGRECL) -> List:
     ]
 
 
-def generate_reobagrecl_zip(db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str) -> Tuple[bytes, str]:
-    """ZIP con un .bz2 por ID de objeción que tenga respuesta S o N."""
-    dddd, aaaamm, fecha = _parse_nombre_agrecl(nombre_fichero)
-    rows = list_agrecl(db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero)
-    rows_con_respuesta = [r for r in rows if r.aceptacion in ("S", "N")]
-
+def _reob_miembros_agrecl(
+    db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str,
+) -> Iterator[Tuple[str, Iterator[bytes], Dict[str, int]]]:
+    dddd, aaaamm, _ = _parse_nombre_agrecl(nombre_fichero)
     fecha_hoy = ahora_madrid().strftime("%Y%m%d")
-    por_cccc: Dict[str, List[ObjecionAGRECL]] = {}
-    for r in rows_con_respuesta:
-        cccc = _cccc_from_id_objecion(r.id_objecion)
-        if cccc not in por_cccc:
-            por_cccc[cccc] = []
-        por_cccc[cccc].append(r)
-
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-        for cccc, filas in por_cccc.items():
-            nombre_bz2 = f"REOBAGRECL_{dddd}_{cccc}_9999_{aaaamm}_{fecha_hoy}.0.bz2"
-            data = [_agrecl_row_to_list(r) for r in filas]
-            zf.writestr(nombre_bz2, _csv_to_bz2(data))
+    return _reob_miembros(
+        db, ObjecionAGRECL,
+        tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero,
+        to_list=_agrecl_row_to_list, por_cccc=True,
+        nombre_bz2=lambda cccc: f"REOBAGRECL_{dddd}_{cccc}_9999_{aaaamm}_{fecha_hoy}.0.bz2",
+    )
+
 
+def stream_reobagrecl_zip(db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str) -> Tuple[Iterator[bytes], str]:
+    """ZIP con un .bz2 por ID de objeción que tenga respuesta S o N (streaming)."""
+    dddd, aaaamm, _ = _parse_nombre_agrecl(nombre_fichero)
+    fecha_hoy = ahora_madrid().strftime("%Y%m%d")
+    miembros = _reob_miembros_agrecl(db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero)
     nombre_zip = f"REOBAGRECL_{dddd}_{aaaamm}_{fecha_hoy}.zip"
-    return zip_buffer.getvalue(), nombre_zip
+    return iter_zip((nombre, chunks) for nombre, chunks, _ in miembros), nombre_zip
 
 
 def generate_reobagrecl_one(db: Session, *, tenant_id: int, empresa_id: int, objecion_id: int, nombre_fichero: str) -> Tuple[bytes, str]:
@@ -440,29 +645,23 @@ def generate_reobagrecl_one(db: Session, *, tenant_id: int, empresa_id: int, obj
 # 0=CUPS 1=Periodo_inicio 2=Periodo_fin 3=Motivo
 # 4=AE_pub 5=AE_prop 6=AS_pub 7=AS_prop 8=Comentario 9=Autoobj
 
-def import_incl(db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str, content: bytes) -> int:
-    rows = _parse_rows(content)
-    nuevos = 0
-    for row in rows:
-        inicio = _col(row, 1)
-        fin    = _col(row, 2)
-        periodo = f"{inicio} - {fin}" if inicio else None
-        obj = ObjecionINCL(
-            tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero,
-            cups=_str(_col(row, 0)),
-            periodo=periodo,
-            motivo=_str(_col(row, 3)),
-            ae_publicada=_dec(_col(row, 4)),
-            ae_propuesta=_dec(_col(row, 5)),
-            as_publicada=_dec(_col(row, 6)),
-            as_propuesta=_dec(_col(row, 7)),
-            comentario_emisor=_str(_col(row, 8)),
-            autoobjecion=_str(_col(row, 9)),
-        )
-        db.add(obj)
-        nuevos += 1
-    db.commit()
-    return nuevos
+_LAYOUT_INCL: List[LayoutCol] = [
+    ("cups", 0, "str"), ("periodo", (1, 2), "rango"), ("motivo", 3, "str"),
+    ("ae_publicada", 4, "dec"), ("ae_propuesta", 5, "dec"),
+    ("as_publicada", 6, "dec"), ("as_propuesta", 7, "dec"),
+    ("comentario_emisor", 8, "str"), ("autoobjecion", 9, "str"),
+]
+
+
+def import_incl(
+    db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str, content: bytes,
+    reemplazar: Optional[str] = None,
+) -> int:
+    return _importar_bulk(
+        db, ObjecionINCL, _LAYOUT_INCL,
+        tenant_id=tenant_id, empresa_id=empresa_id,
+        nombre_fichero=nombre_fichero, content=content, reemplazar=reemplazar,
+    )
 
 
 def list_incl(
@@ -502,6 +701,7 @@ def update_incl_respuesta(
     obj.comentario_respuesta = comentario_respuesta  # type: ignore
     obj.respuesta_publicada = respuesta_publicada  # type: ignore
     obj.updated_at = ahora_madrid()  # type: ignore
+    _refrescar_resumen(db, ObjecionINCL, tenant_id=tenant_id, empresa_id=empresa_id, nombres=[obj.nombre_fichero])
     db.commit()
     db.refresh(obj)
     return obj
@@ -509,11 +709,13 @@ def update_incl_respuesta(
 
 def delete_incl(db: Session, *, ids: List[int], tenant_id: int, empresa_id: int) -> int:
     """Borra objeciones por IDs — verifica tenant_id Y empresa_id."""
+    nombres = _nombres_de_ids(db, ObjecionINCL, ids=ids, tenant_id=tenant_id, empresa_id=empresa_id)
     deleted = db.query(ObjecionINCL).filter(
         ObjecionINCL.id.in_(ids),
         ObjecionINCL.tenant_id == tenant_id,
         ObjecionINCL.empresa_id == empresa_id,
     ).delete(synchronize_session=False)
+    _refrescar_resumen(db, ObjecionINCL, tenant_id=tenant_id, empresa_id=empresa_id, nombres=nombres)
     db.commit()
     return deleted
 
@@ -542,33 +744,47 @@ def delete_incl_fichero(
             ReobGenerado.nombre_fichero_aob == nombre_fichero,
         ).delete(synchronize_session=False)
 
+    _refrescar_resumen(db, ObjecionINCL, tenant_id=tenant_id, empresa_id=empresa_id, nombres=[nombre_fichero])
     db.commit()
     return deleted
 
 
-def generate_reobjeincl(db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str) -> Tuple[bytes, str]:
-    """REOBJEINCL — sin cabeceras, sin ID, bz2. Periodo se divide en inicio y fin."""
-    cccc, dddd, aaaamm, fecha = _parse_nombre_incl(nombre_fichero)
-    rows = list_incl(db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero)
-    data = []
-    for r in rows:
-        periodo_str = r.periodo or ""
-        if " - " in periodo_str:
-            inicio, fin = periodo_str.split(" - ", 1)
-        else:
-            inicio, fin = periodo_str, ""
-        data.append([
-            r.cups or "", inicio, fin, r.motivo or "",
-            _num(r.ae_publicada),
-            _num(r.ae_propuesta),
-            _num(r.as_publicada),
-            _num(r.as_propuesta),
-            r.comentario_emisor or "", r.autoobjecion or "",
-            r.aceptacion or "", r.motivo_no_aceptacion or "", r.comentario_respuesta or "",
-        ])
+def _incl_row_to_list(r: ObjecionINCL) -> List:
+    periodo_str = r.periodo or ""
+    if " - " in periodo_str:
+        inicio, fin = periodo_str.split(" - ", 1)
+    else:
+        inicio, fin = periodo_str, ""
+    return [
+        r.cups or "", inicio, fin, r.motivo or "",
+        _num(r.ae_publicada),
+        _num(r.ae_propuesta),
+        _num(r.as_publicada),
+        _num(r.as_propuesta),
+        r.comentario_emisor or "", r.autoobjecion or "",
+        r.aceptacion or "", r.motivo_no_aceptacion or "", r.comentario_respuesta or "",
+    ]
+
+
+def _reob_miembros_incl(
+    db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str,
+) -> Iterator[Tuple[str, Iterator[bytes], Dict[str, int]]]:
+    cccc, dddd, aaaamm, _ = _parse_nombre_incl(nombre_fichero)
     fecha_hoy = ahora_madrid().strftime("%Y%m%d")
-    nombre_bz2 = f"REOBJEINCL_{dddd}_{cccc}_9999_{aaaamm}_{fecha_hoy}.0.bz2"
-    return _csv_to_bz2(data), nombre_bz2
+    return _reob_miembros(
+        db, ObjecionINCL,
+        tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero,
+        to_list=_incl_row_to_list, por_cccc=False,
+        nombre_bz2=lambda _: f"REOBJEINCL_{dddd}_{cccc}_9999_{aaaamm}_{fecha_hoy}.0.bz2",
+    )
+
+
+def stream_reobjeincl(db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str) -> Tuple[Iterator[bytes], str]:
+    """REOBJEINCL — sin cabeceras, sin ID, bz2. Periodo se divide en inicio y fin."""
+    nombre_bz2, chunks, _ = next(_reob_miembros_incl(
+        db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero,
+    ))
+    return chunks, nombre_bz2
 
 
 # ── AOBCUPS ───────────────────────────────────────────────────────────────────
@@ -576,29 +792,24 @@ def generate_reobjeincl(db: Session, *, tenant_id: int, empresa_id: int, nombre_
 #             6=Comentario 7=Autoobj 8=Aceptacion 9=MotivoNoAcept
 #             10=ComentResp 11=Magnitud
 
-def import_cups(db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str, content: bytes) -> int:
-    rows = _parse_rows(content)
-    nuevos = 0
-    for row in rows:
-        obj = ObjecionCUPS(
-            tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero,
-            id_objecion=_str(_col(row, 0)),
-            cups=_str(_col(row, 1)),
-            periodo=_str(_col(row, 2)),
-            motivo=_str(_col(row, 3)),
-            e_publicada=_dec(_col(row, 4)),
-            e_propuesta=_dec(_col(row, 5)),
-            comentario_emisor=_str(_col(row, 6)),
-            autoobjecion=_str(_col(row, 7)),
-            aceptacion=_str(_col(row, 8)),
-            motivo_no_aceptacion=_str(_col(row, 9)),
-            comentario_respuesta=_str(_col(row, 10)),
-            magnitud=_str(_col(row, 11)),
-        )
-        db.add(obj)
-        nuevos += 1
-    db.commit()
-    return nuevos
+_LAYOUT_CUPS: List[LayoutCol] = [
+    ("id_objecion", 0, "str"), ("cups", 1, "str"), ("periodo", 2, "str"),
+    ("motivo", 3, "str"), ("e_publicada", 4, "dec"), ("e_propuesta", 5, "dec"),
+    ("comentario_emisor", 6, "str"), ("autoobjecion", 7, "str"),
+    ("aceptacion", 8, "str"), ("motivo_no_aceptacion", 9, "str"),
+    ("comentario_respuesta", 10, "str"), ("magnitud", 11, "str"),
+]
+
+
+def import_cups(
+    db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str, content: bytes,
+    reemplazar: Optional[str] = None,
+) -> int:
+    return _importar_bulk(
+        db, ObjecionCUPS, _LAYOUT_CUPS,
+        tenant_id=tenant_id, empresa_id=empresa_id,
+        nombre_fichero=nombre_fichero, content=content, reemplazar=reemplazar,
+    )
 
 
 def list_cups(
@@ -639,6 +850,7 @@ def update_cups_respuesta(
     obj.comentario_respuesta = comentario_respuesta  # type: ignore
     obj.respuesta_publicada = respuesta_publicada  # type: ignore
     obj.updated_at = ahora_madrid()  # type: ignore
+    _refrescar_resumen(db, ObjecionCUPS, tenant_id=tenant_id, empresa_id=empresa_id, nombres=[obj.nombre_fichero])
     db.commit()
     db.refresh(obj)
     return obj
@@ -646,11 +858,13 @@ def update_cups_respuesta(
 
 def delete_cups(db: Session, *, ids: List[int], tenant_id: int, empresa_id: int) -> int:
     """Borra objeciones por IDs — verifica tenant_id Y empresa_id."""
+    nombres = _nombres_de_ids(db, ObjecionCUPS, ids=ids, tenant_id=tenant_id, empresa_id=empresa_id)
     deleted = db.query(ObjecionCUPS).filter(
         ObjecionCUPS.id.in_(ids),
         ObjecionCUPS.tenant_id == tenant_id,
         ObjecionCUPS.empresa_id == empresa_id,
     ).delete(synchronize_session=False)
+    _refrescar_resumen(db, ObjecionCUPS, tenant_id=tenant_id, empresa_id=empresa_id, nombres=nombres)
     db.commit()
     return deleted
 
@@ -679,47 +893,42 @@ def delete_cups_fichero(
             ReobGenerado.nombre_fichero_aob == nombre_fichero,
         ).delete(synchronize_session=False)
 
+    _refrescar_resumen(db, ObjecionCUPS, tenant_id=tenant_id, empresa_id=empresa_id, nombres=[nombre_fichero])
     db.commit()
     return deleted
 
 
-def _cccc_from_id_cups(id_objecion: Optional[str]) -> str:
-    """CU_0750_0336_202507_1044 → 0750"""
-    if not id_objecion:
-        return "0000"
-    partes = id_objecion.split("_")
-    return partes[1] if len(partes) > 1 else "0000"
+def _cups_row_to_list(r: ObjecionCUPS) -> List:
+    return [
+        r.cups or "", r.periodo or "", r.motivo or "",
+        _num(r.e_publicada),
+        _num(r.e_propuesta),
+        r.comentario_emisor or "", r.autoobjecion or "",
+        r.aceptacion or "", r.motivo_no_aceptacion or "", r.comentario_respuesta or "",
+        r.magnitud or "",
+    ]
 
 
-def generate_reobcups(db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str) -> Tuple[bytes, str]:
-    """ZIP con un .bz2 por comercializadora, con fecha de generación hoy."""
-    dddd, cccc, aaaamm, _ = _parse_nombre_cups(nombre_fichero)
+def _reob_miembros_cups(
+    db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str,
+) -> Iterator[Tuple[str, Iterator[bytes], Dict[str, int]]]:
+    dddd, _, aaaamm, _ = _parse_nombre_cups(nombre_fichero)
     fecha_hoy = ahora_madrid().strftime("%Y%m%d")
-    rows = list_cups(db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero)
-    rows = [r for r in rows if r.aceptacion in ("S", "N")]
-
-    por_cccc: Dict[str, list] = {}
-    for r in rows:
-        comercializadora = _cccc_from_id_cups(r.id_objecion)
-        if comercializadora not in por_cccc:
-            por_cccc[comercializadora] = []
-        por_cccc[comercializadora].append([
-            r.cups or "", r.periodo or "", r.motivo or "",
-            _num(r.e_publicada),
-            _num(r.e_propuesta),
-            r.comentario_emisor or "", r.autoobjecion or "",
-            r.aceptacion or "", r.motivo_no_aceptacion or "", r.comentario_respuesta or "",
-            r.magnitud or "",
-        ])
-
-    zip_buffer = io.BytesIO()
-    with zipfile.ZipFile(zip_buffer, "w", zipfile.ZIP_DEFLATED) as zf:
-        for comercializadora, data in por_cccc.items():
-            nombre_bz2 = f"REOBCUPS_{dddd}_{comercializadora}_9999_{aaaamm}_{fecha_hoy}.0.bz2"
-            zf.writestr(nombre_bz2, _csv_to_bz2(data))
+    return _reob_miembros(
+        db, ObjecionCUPS,
+        tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero,
+        to_list=_cups_row_to_list, por_cccc=True,
+        nombre_bz2=lambda comercializadora: f"REOBCUPS_{dddd}_{comercializadora}_9999_{aaaamm}_{fecha_hoy}.0.bz2",
+    )
+
 
+def stream_reobcups(db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str) -> Tuple[Iterator[bytes], str]:
+    """ZIP con un .bz2 por comercializadora, con fecha de generación hoy (streaming)."""
+    dddd, _, aaaamm, _ = _parse_nombre_cups(nombre_fichero)
+    fecha_hoy = ahora_madrid().strftime("%Y%m%d")
+    miembros = _reob_miembros_cups(db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero)
     nombre_zip = f"REOBCUPS_{dddd}_{aaaamm}_{fecha_hoy}.zip"
-    return zip_buffer.getvalue(), nombre_zip
+    return iter_zip((nombre, chunks) for nombre, chunks, _ in miembros), nombre_zip
 
 
 # ── AOBCIL ────────────────────────────────────────────────────────────────────
@@ -727,29 +936,24 @@ def generate_reobcups(db: Session, *, tenant_id: int, empresa_id: int, nombre_fi
 #             6=EQ2_pub 7=EQ2_prop 8=EQ3_pub 9=EQ3_prop
 #             10=Comentario 11=Autoobj
 
-def import_cil(db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str, content: bytes) -> int:
-    rows = _parse_rows(content)
-    nuevos = 0
-    for row in rows:
-        obj = ObjecionCIL(
-            tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero,
-            id_objecion=_str(_col(row, 0)),
-            cil=_str(_col(row, 1)),
-            periodo=_str(_col(row, 2)),
-            motivo=_str(_col(row, 3)),
-            eas_publicada=_dec(_col(row, 4)),
-            eas_propuesta=_dec(_col(row, 5)),
-            eq2_publicada=_dec(_col(row, 6)),
-            eq2_propuesta=_dec(_col(row, 7)),
-            eq3_publicada=_dec(_col(row, 8)),
-            eq3_propuesta=_dec(_col(row, 9)),
-            comentario_emisor=_str(_col(row, 10)),
-            autoobjecion=_str(_col(row, 11)),
-        )
-        db.add(obj)
-        nuevos += 1
-    db.commit()
-    return nuevos
+_LAYOUT_CIL: List[LayoutCol] = [
+    ("id_objecion", 0, "str"), ("cil", 1, "str"), ("periodo", 2, "str"),
+    ("motivo", 3, "str"), ("eas_publicada", 4, "dec"), ("eas_propuesta", 5, "dec"),
+    ("eq2_publicada", 6, "dec"), ("eq2_propuesta", 7, "dec"),
+    ("eq3_publicada", 8, "dec"), ("eq3_propuesta", 9, "dec"),
+    ("comentario_emisor", 10, "str"), ("autoobjecion", 11, "str"),
+]
+
+
+def import_cil(
+    db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str, content: bytes,
+    reemplazar: Optional[str] = None,
+) -> int:
+    return _importar_bulk(
+        db, ObjecionCIL, _LAYOUT_CIL,
+        tenant_id=tenant_id, empresa_id=empresa_id,
+        nombre_fichero=nombre_fichero, content=content, reemplazar=reemplazar,
+    )
 
 
 def list_cil(
@@ -790,6 +994,7 @@ def update_cil_respuesta(
     obj.comentario_respuesta = comentario_respuesta  # type: ignore
     obj.respuesta_publicada = respuesta_publicada  # type: ignore
     obj.updated_at = ahora_madrid()  # type: ignore
+    _refrescar_resumen(db, ObjecionCIL, tenant_id=tenant_id, empresa_id=empresa_id, nombres=[obj.nombre_fichero])
     db.commit()
     db.refresh(obj)
     return obj
@@ -797,11 +1002,13 @@ def update_cil_respuesta(
 
 def delete_cil(db: Session, *, ids: List[int], tenant_id: int, empresa_id: int) -> int:
     """Borra objeciones por IDs — verifica tenant_id Y empresa_id."""
+    nombres = _nombres_de_ids(db, ObjecionCIL, ids=ids, tenant_id=tenant_id, empresa_id=empresa_id)
     deleted = db.query(ObjecionCIL).filter(
         ObjecionCIL.id.in_(ids),
         ObjecionCIL.tenant_id == tenant_id,
         ObjecionCIL.empresa_id == empresa_id,
     ).delete(synchronize_session=False)
+    _refrescar_resumen(db, ObjecionCIL, tenant_id=tenant_id, empresa_id=empresa_id, nombres=nombres)
     db.commit()
     return deleted
 
@@ -830,15 +1037,13 @@ def delete_cil_fichero(
             ReobGenerado.nombre_fichero_aob == nombre_fichero,
         ).delete(synchronize_session=False)
 
+    _refrescar_resumen(db, ObjecionCIL, tenant_id=tenant_id, empresa_id=empresa_id, nombres=[nombre_fichero])
     db.commit()
     return deleted
 
 
-def generate_reobcil(db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str) -> Tuple[bytes, str]:
-    """REOBCIL — sin cabeceras, sin ID, bz2."""
-    dddd, cccc, aaaamm, fecha = _parse_nombre_cil(nombre_fichero)
-    rows = list_cil(db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero)
-    data = [[
+def _cil_row_to_list(r: ObjecionCIL) -> List:
+    return [
         r.cil or "", r.periodo or "", r.motivo or "",
         _num(r.eas_publicada),
         _num(r.eas_propuesta),
@@ -848,10 +1053,29 @@ def generate_reobcil(db: Session, *, tenant_id: int, empresa_id: int, nombre_fic
         _num(r.eq3_propuesta),
         r.comentario_emisor or "", r.autoobjecion or "",
         r.aceptacion or "", r.motivo_no_aceptacion or "", r.comentario_respuesta or "",
-    ] for r in rows]
+    ]
+
+
+def _reob_miembros_cil(
+    db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str,
+) -> Iterator[Tuple[str, Iterator[bytes], Dict[str, int]]]:
+    dddd, cccc, aaaamm, _ = _parse_nombre_cil(nombre_fichero)
     fecha_hoy = ahora_madrid().strftime("%Y%m%d")
-    nombre_bz2 = f"REOBCIL_{dddd}_{cccc}_9999_{aaaamm}_{fecha_hoy}.0.bz2"
-    return _csv_to_bz2(data), nombre_bz2
+    return _reob_miembros(
+        db, ObjecionCIL,
+        tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero,
+        to_list=_cil_row_to_list, por_cccc=False,
+        nombre_bz2=lambda _: f"REOBCIL_{dddd}_{cccc}_9999_{aaaamm}_{fecha_hoy}.0.bz2",
+    )
+
+
+def stream_reobcil(db: Session, *, tenant_id: int, empresa_id: int, nombre_fichero: str) -> Tuple[Iterator[bytes], str]:
+    """REOBCIL — sin cabeceras, sin ID, bz2."""
+    nombre_bz2, chunks, _ = next(_reob_miembros_cil(
+        db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero,
+    ))
+    return chunks, nombre_bz2
+
 
 def _parse_nombre_reob(nombre_bz2: str) -> tuple:
     """REOBAGRECL_DDDD_CCCC_9999_AAAAMM_FECHA.0.bz2 → (cccc, aaaamm)"""
@@ -935,6 +1159,7 @@ def toggle_enviado_sftp(
         model.empresa_id == empresa_id,
         model.nombre_fichero == nombre_fichero,
     ).update({"enviado_sftp_at": nuevo_valor}, synchronize_session=False)
+    _refrescar_resumen(db, model, tenant_id=tenant_id, empresa_id=empresa_id, nombres=[nombre_fichero])
     db.commit()
     return nuevo_valor
 
@@ -949,106 +1174,63 @@ def enviar_al_sftp(
     directorio_destino: str,
 ) -> str:
     from app.comunicaciones.services import _get_config_by_id_activa, _conectar_en_path
-    import io as _io
-    import zipfile as _zipfile
+
+    REOB_POR_TIPO = {
+        "agrecl": (ObjecionAGRECL, _reob_miembros_agrecl),
+        "cups":   (ObjecionCUPS,   _reob_miembros_cups),
+        "incl":   (ObjecionINCL,   _reob_miembros_incl),
+        "cil":    (ObjecionCIL,    _reob_miembros_cil),
+    }
+    if tipo not in REOB_POR_TIPO:
+        raise ValueError(f"Tipo desconocido: {tipo}")
+    model, miembros_fn = REOB_POR_TIPO[tipo]
 
     config = _get_config_by_id_activa(db, config_id=config_id, tenant_id=tenant_id)
     ahora = ahora_madrid()
 
-    if tipo == "agrecl":
-        # agrecl genera un ZIP con un .bz2 por ID — subimos cada .bz2 por separado
-        zip_content, _ = generate_reobagrecl_zip(db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero)
-        ftp = _conectar_en_path(config, directorio_destino)
-        ficheros_subidos = []
-        try:
-            with _zipfile.ZipFile(_io.BytesIO(zip_content)) as zf:
-                for nombre_bz2 in zf.namelist():
-                    datos_bz2 = zf.read(nombre_bz2)
-                    ftp.storbinary(f"STOR {nombre_bz2}", _io.BytesIO(datos_bz2))
-                    ficheros_subidos.append(nombre_bz2)
-        finally:
-            try:
-                ftp.quit()
-            except Exception:
-                pass
-        db.query(ObjecionAGRECL).filter(
-            ObjecionAGRECL.tenant_id == tenant_id,
-            ObjecionAGRECL.empresa_id == empresa_id,
-            ObjecionAGRECL.nombre_fichero == nombre_fichero,
-        ).update({"enviado_sftp_at": ahora, "enviado_sftp_config_id": config_id}, synchronize_session=False)
-        db.commit()
-        # Registrar cada bz2 enviado
-        for nombre_bz2 in ficheros_subidos:
-            cccc, aaaamm = _parse_nombre_reob(nombre_bz2)
-            num = sum(1 for r in list_agrecl(db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero)
-                      if r.aceptacion in ("S", "N") and _cccc_from_id_objecion(r.id_objecion) == cccc)
-            registrar_reob_enviado(db, tenant_id=tenant_id, empresa_id=empresa_id, tipo="agrecl",
-                nombre_fichero_aob=nombre_fichero, nombre_fichero_reob=nombre_bz2,
-                comercializadora=cccc, aaaamm=aaaamm, num_registros=num, config_id=config_id)
-        return ", ".join(ficheros_subidos) if ficheros_subidos else "sin ficheros"
-
-    elif tipo == "cups":
-        zip_content, _ = generate_reobcups(db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero)
+    # Cada .bz2 se genera entero (cursor → bz2 → SpooledTemporaryFile) antes
+    # de conectar: un error de BD o de compresión a mitad no deja un REOB
+    # truncado con su nombre definitivo en el SFTP de la comercializadora.
+    # agrecl/cups suben un .bz2 por comercializadora; incl/cil, uno solo.
+    ficheros: List[Tuple[str, Any, int]] = []
+    try:
+        for nombre_bz2, chunks, contador in miembros_fn(
+            db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero,
+        ):
+            ficheros.append((nombre_bz2, spool(chunks), contador["respondidas"]))
+
         ftp = _conectar_en_path(config, directorio_destino)
-        ficheros_subidos = []
         try:
-            with _zipfile.ZipFile(_io.BytesIO(zip_content)) as zf:
-                for nombre_bz2 in zf.namelist():
-                    datos_bz2 = zf.read(nombre_bz2)
-                    ftp.storbinary(f"STOR {nombre_bz2}", _io.BytesIO(datos_bz2))
-                    ficheros_subidos.append(nombre_bz2)
+            for nombre_bz2, fichero, _ in ficheros:
+                ftp.storbinary(f"STOR {nombre_bz2}", fichero)
         finally:
             try:
                 ftp.quit()
             except Exception:
                 pass
-        db.query(ObjecionCUPS).filter(
-            ObjecionCUPS.tenant_id == tenant_id,
-            ObjecionCUPS.empresa_id == empresa_id,
-            ObjecionCUPS.nombre_fichero == nombre_fichero,
-        ).update({"enviado_sftp_at": ahora, "enviado_sftp_config_id": config_id}, synchronize_session=False)
-        db.commit()
-        for nombre_bz2 in ficheros_subidos:
-            cccc, aaaamm = _parse_nombre_reob(nombre_bz2)
-            num = sum(1 for r in list_cups(db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero)
-                      if r.aceptacion in ("S", "N") and _cccc_from_id_cups(r.id_objecion) == cccc)
-            registrar_reob_enviado(db, tenant_id=tenant_id, empresa_id=empresa_id, tipo="cups",
-                nombre_fichero_aob=nombre_fichero, nombre_fichero_reob=nombre_bz2,
-                comercializadora=cccc, aaaamm=aaaamm, num_registros=num, config_id=config_id)
-        return ", ".join(ficheros_subidos) if ficheros_subidos else "sin ficheros"
+    finally:
+        for _, fichero, _ in ficheros:
+            fichero.close()
+    ficheros_subidos = [(nombre_bz2, num) for nombre_bz2, _, num in ficheros]
 
-    else:
-        if tipo == "incl":
-            content, filename = generate_reobjeincl(db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero)
-            model = ObjecionINCL
-        elif tipo == "cil":
-            content, filename = generate_reobcil(db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero)
-            model = ObjecionCIL
-        else:
-            raise ValueError(f"Tipo desconocido: {tipo}")
+    db.query(model).filter(
+        model.tenant_id == tenant_id,
+        model.empresa_id == empresa_id,
+        model.nombre_fichero == nombre_fichero,
+    ).update({"enviado_sftp_at": ahora, "enviado_sftp_config_id": config_id}, synchronize_session=False)
+    _refrescar_resumen(db, model, tenant_id=tenant_id, empresa_id=empresa_id, nombres=[nombre_fichero])
+    db.commit()
 
-        ftp = _conectar_en_path(config, directorio_destino)
-        try:
-            ftp.storbinary(f"STOR {filename}", _io.BytesIO(content))
-        finally:
-            try:
-                ftp.quit()
-            except Exception:
-                pass
-        db.query(model).filter(
-            model.tenant_id == tenant_id,
-            model.empresa_id == empresa_id,
-            model.nombre_fichero == nombre_fichero,
-        ).update({"enviado_sftp_at": ahora, "enviado_sftp_config_id": config_id}, synchronize_session=False)
-        db.commit()
-        cccc, aaaamm = _parse_nombre_reob(filename)
-        rows_tipo = (list_incl if tipo == "incl" else list_cil)(
-            db, tenant_id=tenant_id, empresa_id=empresa_id, nombre_fichero=nombre_fichero)
-        num = sum(1 for r in rows_tipo if r.aceptacion in ("S", "N"))
+    # Registrar cada bz2 enviado
+    for nombre_bz2, num in ficheros_subidos:
+        cccc, aaaamm = _parse_nombre_reob(nombre_bz2)
         registrar_reob_enviado(db, tenant_id=tenant_id, empresa_id=empresa_id, tipo=tipo,
-            nombre_fichero_aob=nombre_fichero, nombre_fichero_reob=filename,
+            nombre_fichero_aob=nombre_fichero, nombre_fichero_reob=nombre_bz2,
             comercializadora=cccc, aaaamm=aaaamm, num_registros=num, config_id=config_id)
-        return filename
+
+    if tipo in ("agrecl", "cups"):
+        return ", ".join(n for n, _ in ficheros_subidos) if ficheros_subidos else "sin ficheros"
+    return ficheros_subidos[0][0]
 
 
 # ── Borrar sólo un REOB generado (deja AOB y objeciones intactas) ────────────
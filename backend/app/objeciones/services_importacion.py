@@ -0,0 +1,122 @@
+# app/objeciones/services_importacion.py
+# pyright: reportMissingImports=false, reportAttributeAccessIssue=false
+"""
+Carga masiva de ficheros AOB (AGRECL / INCL / CUPS / CIL).
+
+El import original creaba un objeto ORM por fila y convertía los campos
+uno a uno; con ficheros de decenas de miles de filas eso bloqueaba la
+petición. Aquí:
+
+  1. `parsear_objeciones` lee el CSV ';' latin-1 con el lector C de `csv` y
+     convierte cada columna de golpe con pandas (strip, vacío → NULL,
+     decimales con coma → punto validados con una regex).
+  2. `cargar_objeciones` vuelca el DataFrame con `COPY ... FROM STDIN` dentro
+     de la transacción de la sesión (PostgreSQL). En otros motores (tests
+     con SQLite) cae a un INSERT executemany.
+
+La transacción (borrado de la versión anterior, commit, resumen de
+ficheros) la gestiona quien llama: ver `services._importar_bulk`.
+"""
+from __future__ import annotations
+
+import csv
+import io
+from decimal import Decimal
+from typing import List, Sequence, Tuple, Union
+
+import pandas as pd
+from sqlalchemy.orm import Session
+
+from app.core.datetime_utils import ahora_madrid
+
+
+# (columna, posición en el CSV, tipo). Tipos:
+#   "str"   → texto con strip; vacío = NULL
+#   "dec"   → decimal; admite coma decimal; inválido o vacío = NULL
+#   "rango" → posición (inicio, fin) → "inicio - fin" (NULL si no hay inicio)
+LayoutCol = Tuple[str, Union[int, Tuple[int, int]], str]
+
+_DEC_RE = r"[+-]?(?:\d+\.?\d*|\.\d+)(?:[eE][+-]?\d+)?"
+
+
+def _columnas_csv(content: bytes) -> pd.DataFrame:
+    """CSV ';' sin cabeceras → DataFrame de strings ya sin espacios.
+
+    Las filas pueden tener distinto número de campos (se rellenan con "").
+    Se descartan las filas completamente vacías.
+    """
+    text = content.decode("latin-1", errors="replace")
+    rows = list(csv.reader(io.StringIO(text), delimiter=";"))
+    if not rows:
+        return pd.DataFrame()
+    df = pd.DataFrame(rows, dtype=object).fillna("")
+    df = df.apply(lambda s: s.str.strip())
+    return df[(df != "").any(axis=1)].reset_index(drop=True)
+
+
+def parsear_objeciones(content: bytes, layout: Sequence[LayoutCol]) -> pd.DataFrame:
+    """Devuelve un DataFrame con una columna por campo del layout (NULL = None)."""
+    raw = _columnas_csv(content)
+    ancho = 1 + max(
+        max(pos) if isinstance(pos, tuple) else pos for _, pos, _ in layout
+    )
+    raw = raw.reindex(columns=range(max(ancho, raw.shape[1])), fill_value="")
+
+    out = {}
+    for columna, pos, tipo in layout:
+        if tipo == "rango":
+            ini, fin = raw[pos[0]], raw[pos[1]]
+            out[columna] = (ini + " - " + fin).where(ini != "", None)
+        elif tipo == "dec":
+            valor = raw[pos].str.replace(",", ".", regex=False)
+            out[columna] = valor.where(valor.str.fullmatch(_DEC_RE), None)
+        else:
+            valor = raw[pos]
+            out[columna] = valor.where(valor != "", None)
+    return pd.DataFrame(out, index=raw.index, dtype=object)
+
+
+def cargar_objeciones(
+    db: Session,
+    model,
+    frame: pd.DataFrame,
+    layout: Sequence[LayoutCol],
+    *,
+    tenant_id: int,
+    empresa_id: int,
+    nombre_fichero: str,
+) -> int:
+    """Inserta las filas parseadas en la tabla del modelo. No hace commit."""
+    if frame.empty:
+        return 0
+
+    ahora = ahora_madrid().replace(microsecond=0)
+    frame = frame.copy()
+    frame.insert(0, "nombre_fichero", nombre_fichero)
+    frame.insert(0, "empresa_id", empresa_id)
+    frame.insert(0, "tenant_id", tenant_id)
+    frame["respuesta_publicada"] = 0
+    frame["created_at"] = ahora
+    frame["updated_at"] = ahora
+
+    table = model.__table__
+    bind = db.get_bind()
+    if bind.dialect.name == "postgresql":
+        buf = io.StringIO()
+        frame.to_csv(buf, header=False, index=False, na_rep="", date_format="%Y-%m-%d %H:%M:%S")
+        buf.seek(0)
+        quote = bind.dialect.identifier_preparer.quote
+        cols = ", ".join(quote(c) for c in frame.columns)
+        sql = f"COPY {quote(table.name)} ({cols}) FROM STDIN WITH (FORMAT csv)"
+        # La conexión DBAPI de la sesión: el COPY va en su misma transacción.
+        raw = db.connection().connection
+        with raw.cursor() as cur:
+            cur.copy_expert(sql, buf)
+    else:
+        decimales = [c for c, _, tipo in layout if tipo == "dec"]
+        for c in decimales:
+            frame[c] = [Decimal(v) if v is not None else None for v in frame[c]]
+        records: List[dict] = frame.to_dict("records")
+        db.execute(table.insert(), records)
+
+    return len(frame)
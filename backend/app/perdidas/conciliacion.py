@@ -0,0 +1,408 @@
+# app/perdidas/conciliacion.py
+# pyright: reportMissingImports=false, reportArgumentType=false, reportCallIssue=false
+"""
+Conciliación mensual de pérdidas S02 (perdida_diaria) con las pérdidas
+publicadas en BALD (medidas_general, ventanas M2/M7/M11/ART15).
+
+El resultado se guarda en perdidas_conciliacion (una fila por empresa y
+mes) y perdidas_conciliacion_ct (aportación de cada CT) y se recalcula solo
+para los periodos tocados:
+  - `recalcular_tras_s02`: al final de `services.procesar_s02`, con las
+    fechas procesadas.
+  - `recalcular_tras_bald`: tras ingerir un BALD (app/ingestion/services.py),
+    con el periodo del fichero.
+  - `recalcular_tras_borrado`: tras borrar ficheros de la familia general
+    (app/ingestion/delete_services.py), con los periodos afectados.
+Ninguno de ellos propaga errores: la conciliación nunca bloquea el
+procesado. Los listados leen las tablas precalculadas.
+
+Cálculo por periodo:
+  perdida_s02_pct = Σ perdida / Σ energía neta supervisores × 100
+  pct BALD        = Σ perdidas_e_facturada_{v}_kwh
+                    / Σ (energia_neta_facturada_{v} + energia_frontera_dd_{v}) × 100
+                    (misma fórmula que _recalcular_energia_neta_y_perdidas)
+  divergencia_pp  = perdida_s02_pct - pct BALD de la ventana de referencia
+Con |divergencia_pp| > UMBRAL_DIVERGENCIA_PP el periodo queda "divergente"
+y se marcan los CTs que explican CUOTA_MARCADO de la divergencia.
+"""
+from __future__ import annotations
+
+import logging
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Set, Tuple
+
+from sqlalchemy import Integer, cast, func
+from sqlalchemy.orm import Session
+
+from app.core.datetime_utils import ahora_madrid
+from app.measures.models import MedidaGeneral
+from app.perdidas.models import (
+    Concentrador,
+    ConciliacionPerdidas,
+    ConciliacionPerdidasCT,
+    PerdidaDiaria,
+)
+
+
+logger = logging.getLogger(__name__)
+
+# De la más reciente (definitiva) a la más antigua.
+VENTANAS = ("art15", "m11", "m7", "m2")
+UMBRAL_DIVERGENCIA_PP = 2.0
+CUOTA_MARCADO = 0.8
+
+Periodo = Tuple[int, int, int]   # (empresa_id, anio, mes)
+
+
+def _pct(perdida: float, energia: float) -> Optional[float]:
+    return perdida / energia * 100.0 if energia > 0 else None
+
+
+def _rango_mes(anio: int, mes: int) -> Tuple[date, date]:
+    inicio = date(anio, mes, 1)
+    fin = date(anio + 1, 1, 1) if mes == 12 else date(anio, mes + 1, 1)
+    return inicio, fin
+
+
+# ── Cálculo (puro) ───────────────────────────────────────────────────────────
+
+def calcular(
+    cts: List[Dict[str, Any]],
+    bald: Dict[str, Tuple[Optional[float], Optional[float]]],
+) -> Tuple[Dict[str, Any], List[Dict[str, Any]]]:
+    """
+    cts: [{concentrador_id, dias_procesados, dias_completos, energia_kwh, perdida_kwh}]
+    bald: {ventana: (perdidas_kwh, perdidas_pct)}; ventana sin publicar → (None, None)
+
+    Devuelve los campos de la cabecera y las filas por CT.
+    """
+    energia = sum(c["energia_kwh"] for c in cts)
+    perdida = sum(c["perdida_kwh"] for c in cts)
+    cabecera: Dict[str, Any] = {
+        "num_cts": len(cts),
+        "dias_procesados": sum(c["dias_procesados"] for c in cts),
+        "dias_completos": sum(c["dias_completos"] for c in cts),
+        "energia_s02_kwh": energia,
+        "perdida_s02_kwh": perdida,
+        "perdida_s02_pct": _pct(perdida, energia),
+        "ventana_referencia": None,
+        "divergencia_pp": None,
+    }
+    for v in VENTANAS:
+        kwh, pct = bald.get(v, (None, None))
+        cabecera[f"perdidas_{v}_kwh"] = kwh
+        cabecera[f"perdidas_{v}_pct"] = pct
+        if cabecera["ventana_referencia"] is None and pct is not None:
+            cabecera["ventana_referencia"] = v.upper()
+
+    filas = [
+        {
+            "concentrador_id": c["concentrador_id"],
+            "dias_procesados": c["dias_procesados"],
+            "energia_kwh": c["energia_kwh"],
+            "perdida_kwh": c["perdida_kwh"],
+            "perdida_pct": _pct(c["perdida_kwh"], c["energia_kwh"]),
+            "exceso_kwh": None,
+            "aportacion_pct": None,
+            "marcado": False,
+        }
+        for c in cts
+    ]
+
+    if not cts:
+        cabecera["estado"] = "sin_s02"
+        return cabecera, filas
+    ref = cabecera["ventana_referencia"]
+    if ref is None or cabecera["perdida_s02_pct"] is None:
+        cabecera["estado"] = "sin_bald"
+        return cabecera, filas
+
+    pct_ref = cabecera[f"perdidas_{ref.lower()}_pct"]
+    divergencia_pp = cabecera["perdida_s02_pct"] - pct_ref
+    cabecera["divergencia_pp"] = divergencia_pp
+    divergente = abs(divergencia_pp) > UMBRAL_DIVERGENCIA_PP
+    cabecera["estado"] = "divergente" if divergente else "ok"
+
+    for f in filas:
+        f["exceso_kwh"] = f["perdida_kwh"] - f["energia_kwh"] * pct_ref / 100.0
+    total_exceso = sum(f["exceso_kwh"] for f in filas)
+    if total_exceso:
+        for f in filas:
+            f["aportacion_pct"] = f["exceso_kwh"] / total_exceso * 100.0
+
+    if divergente and total_exceso:
+        # CTs que empujan en el sentido de la divergencia, de mayor a menor,
+        # hasta cubrir CUOTA_MARCADO del total.
+        signo = 1 if total_exceso > 0 else -1
+        cubierto = 0.0
+        for f in sorted(filas, key=lambda f: signo * f["exceso_kwh"], reverse=True):
+            if signo * f["exceso_kwh"] <= 0 or cubierto >= CUOTA_MARCADO * abs(total_exceso):
+                break
+            f["marcado"] = True
+            cubierto += signo * f["exceso_kwh"]
+    return cabecera, filas
+
+
+# ── Recalculo ────────────────────────────────────────────────────────────────
+
+def _cts_del_periodo(db: Session, *, tenant_id: int, empresa_id: int, anio: int, mes: int) -> List[Dict[str, Any]]:
+    inicio, fin = _rango_mes(anio, mes)
+    rows = (
+        db.query(
+            PerdidaDiaria.concentrador_id,
+            func.count(PerdidaDiaria.id).label("dias_procesados"),
+            func.sum(cast(PerdidaDiaria.estado == "ok", Integer)).label("dias_completos"),
+            func.sum(PerdidaDiaria.energia_neta_wh).label("energia_wh"),
+            func.sum(PerdidaDiaria.perdida_wh).label("perdida_wh"),
+        )
+        .filter(
+            PerdidaDiaria.tenant_id == tenant_id,
+            PerdidaDiaria.empresa_id == empresa_id,
+            PerdidaDiaria.fecha >= inicio,
+            PerdidaDiaria.fecha < fin,
+        )
+        .group_by(PerdidaDiaria.concentrador_id)
+        .order_by(PerdidaDiaria.concentrador_id)
+        .all()
+    )
+    return [
+        {
+            "concentrador_id": int(r.concentrador_id),
+            "dias_procesados": int(r.dias_procesados or 0),
+            "dias_completos": int(r.dias_completos or 0),
+            "energia_kwh": int(r.energia_wh or 0) / 1000.0,
+            "perdida_kwh": int(r.perdida_wh or 0) / 1000.0,
+        }
+        for r in rows
+    ]
+
+
+def _bald_del_periodo(
+    db: Session, *, tenant_id: int, empresa_id: int, anio: int, mes: int,
+) -> Dict[str, Tuple[Optional[float], Optional[float]]]:
+    columnas = []
+    for v in VENTANAS:
+        columnas += [
+            func.sum(getattr(MedidaGeneral, f"perdidas_e_facturada_{v}_kwh")),
+            func.sum(
+                getattr(MedidaGeneral, f"energia_neta_facturada_{v}_kwh")
+                + func.coalesce(getattr(MedidaGeneral, f"energia_frontera_dd_{v}_kwh"), 0.0)
+            ),
+            func.count(getattr(MedidaGeneral, f"perdidas_e_facturada_{v}_pct")),
+        ]
+    row = (
+        db.query(*columnas)
+        .filter(
+            MedidaGeneral.tenant_id == tenant_id,
+            MedidaGeneral.empresa_id == empresa_id,
+            MedidaGeneral.anio == anio,
+            MedidaGeneral.mes == mes,
+        )
+        .one()
+    )
+    out: Dict[str, Tuple[Optional[float], Optional[float]]] = {}
+    for i, v in enumerate(VENTANAS):
+        kwh, denom, publicadas = row[3 * i], row[3 * i + 1], row[3 * i + 2]
+        # Ventana publicada = alguna fila con pct calculado (denominador > 0).
+        if not publicadas:
+            out[v] = (None, None)
+        else:
+            out[v] = (float(kwh or 0.0), _pct(float(kwh or 0.0), float(denom or 0.0)))
+    return out
+
+
+def recalcular_periodo(
+    db: Session, *, tenant_id: int, empresa_id: int, anio: int, mes: int,
+) -> Optional[ConciliacionPerdidas]:
+    """Rehace la conciliación de un periodo. No hace commit."""
+    cts = _cts_del_periodo(db, tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes)
+    bald = _bald_del_periodo(db, tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes)
+
+    conc = (
+        db.query(ConciliacionPerdidas)
+        .filter_by(tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes)
+        .first()
+    )
+    if not cts and all(pct is None for _, pct in bald.values()):
+        if conc is not None:
+            db.query(ConciliacionPerdidasCT).filter(
+                ConciliacionPerdidasCT.conciliacion_id == conc.id
+            ).delete(synchronize_session=False)
+            db.delete(conc)
+        return None
+
+    cabecera, filas = calcular(cts, bald)
+    if conc is None:
+        conc = ConciliacionPerdidas(tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes)
+        db.add(conc)
+    for k, v in cabecera.items():
+        setattr(conc, k, v)
+    conc.calculado_at = ahora_madrid()
+    db.flush()
+
+    db.query(ConciliacionPerdidasCT).filter(
+        ConciliacionPerdidasCT.conciliacion_id == conc.id
+    ).delete(synchronize_session=False)
+    db.bulk_insert_mappings(ConciliacionPerdidasCT, [{"conciliacion_id": conc.id, **f} for f in filas])
+    return conc
+
+
+def recalcular_periodos(db: Session, *, tenant_id: int, periodos: Iterable[Periodo]) -> int:
+    n = 0
+    for empresa_id, anio, mes in sorted(set(periodos)):
+        recalcular_periodo(db, tenant_id=tenant_id, empresa_id=empresa_id, anio=anio, mes=mes)
+        n += 1
+    db.commit()
+    return n
+
+
+def recalcular_tras_s02(db: Session, *, tenant_id: int, procesados: Iterable[Tuple[int, date]]) -> None:
+    """(empresa_id, fecha) procesados por procesar_s02. Nunca propaga."""
+    periodos: Set[Periodo] = {(e, f.year, f.month) for e, f in procesados}
+    if not periodos:
+        return
+    try:
+        recalcular_periodos(db, tenant_id=tenant_id, periodos=periodos)
+    except Exception as e:
+        db.rollback()
+        logger.error(f"conciliación de pérdidas tenant={tenant_id} tras S02: {e}")
+
+
+def recalcular_tras_bald(db: Session, *, tenant_id: int, empresa_id: int, anio: int, mes: int) -> None:
+    """Periodo de un fichero BALD recién ingerido. Nunca propaga."""
+    try:
+        recalcular_periodos(db, tenant_id=tenant_id, periodos=[(empresa_id, anio, mes)])
+    except Exception as e:
+        db.rollback()
+        logger.error(f"conciliación de pérdidas tenant={tenant_id} empresa={empresa_id} {anio}-{mes:02d} tras BALD: {e}")
+
+
+def recalcular_tras_borrado(db: Session, *, periodos: Iterable[Tuple[int, int, int, int]]) -> None:
+    """(tenant_id, empresa_id, anio, mes) afectados por un borrado de ficheros. Nunca propaga."""
+    por_tenant: Dict[int, Set[Periodo]] = {}
+    for tenant_id, empresa_id, anio, mes in periodos:
+        por_tenant.setdefault(tenant_id, set()).add((empresa_id, anio, mes))
+    for tenant_id, periodos_tenant in sorted(por_tenant.items()):
+        try:
+            recalcular_periodos(db, tenant_id=tenant_id, periodos=periodos_tenant)
+        except Exception as e:
+            db.rollback()
+            logger.error(f"conciliación de pérdidas tenant={tenant_id} tras borrado: {e}")
+
+
+def periodos_pendientes(db: Session, *, tenant_id: int, empresa_ids: List[int]) -> Set[Periodo]:
+    """
+    Periodos con S02, BALD o una conciliación ya guardada (que puede haber
+    quedado vacía) de esas empresas, para recalcular en bloque.
+    """
+    anio = func.extract("year", PerdidaDiaria.fecha)
+    mes = func.extract("month", PerdidaDiaria.fecha)
+    s02 = (
+        db.query(PerdidaDiaria.empresa_id, anio, mes)
+        .filter(PerdidaDiaria.tenant_id == tenant_id, PerdidaDiaria.empresa_id.in_(empresa_ids))
+        .group_by(PerdidaDiaria.empresa_id, anio, mes)
+        .all()
+    )
+    bald = (
+        db.query(MedidaGeneral.empresa_id, MedidaGeneral.anio, MedidaGeneral.mes)
+        .filter(MedidaGeneral.tenant_id == tenant_id, MedidaGeneral.empresa_id.in_(empresa_ids))
+        .distinct()
+        .all()
+    )
+    previas = (
+        db.query(ConciliacionPerdidas.empresa_id, ConciliacionPerdidas.anio, ConciliacionPerdidas.mes)
+        .filter(ConciliacionPerdidas.tenant_id == tenant_id, ConciliacionPerdidas.empresa_id.in_(empresa_ids))
+        .all()
+    )
+    return {(int(e), int(a), int(m)) for e, a, m in [*s02, *bald, *previas]}
+
+
+# ── Lectura ──────────────────────────────────────────────────────────────────
+
+def _conciliacion_to_dict(obj: ConciliacionPerdidas) -> dict:
+    return {
+        "id": obj.id,
+        "empresa_id": obj.empresa_id,
+        "anio": obj.anio,
+        "mes": obj.mes,
+        "num_cts": obj.num_cts,
+        "dias_procesados": obj.dias_procesados,
+        "dias_completos": obj.dias_completos,
+        "energia_s02_kwh": obj.energia_s02_kwh,
+        "perdida_s02_kwh": obj.perdida_s02_kwh,
+        "perdida_s02_pct": obj.perdida_s02_pct,
+        **{f"perdidas_{v}_{u}": getattr(obj, f"perdidas_{v}_{u}") for v in VENTANAS for u in ("kwh", "pct")},
+        "ventana_referencia": obj.ventana_referencia,
+        "divergencia_pp": obj.divergencia_pp,
+        "estado": obj.estado,
+        "calculado_at": obj.calculado_at,
+    }
+
+
+def list_conciliaciones(
+    db: Session, *,
+    tenant_id: int,
+    allowed_empresa_ids: List[int],
+    empresa_id: Optional[int] = None,
+    anio: Optional[int] = None,
+    estado: Optional[str] = None,
+) -> List[dict]:
+    if not allowed_empresa_ids:
+        return []
+    q = db.query(ConciliacionPerdidas).filter(
+        ConciliacionPerdidas.tenant_id == tenant_id,
+        ConciliacionPerdidas.empresa_id.in_(allowed_empresa_ids),
+    )
+    if empresa_id:
+        q = q.filter(ConciliacionPerdidas.empresa_id == empresa_id)
+    if anio:
+        q = q.filter(ConciliacionPerdidas.anio == anio)
+    if estado:
+        q = q.filter(ConciliacionPerdidas.estado == estado)
+    q = q.order_by(
+        ConciliacionPerdidas.anio.desc(),
+        ConciliacionPerdidas.mes.desc(),
+        ConciliacionPerdidas.empresa_id,
+    )
+    return [_conciliacion_to_dict(c) for c in q.all()]
+
+
+def list_cts_conciliacion(
+    db: Session, *,
+    tenant_id: int,
+    allowed_empresa_ids: List[int],
+    conciliacion_id: int,
+) -> Optional[List[dict]]:
+    """CTs de una conciliación, los que más aportan primero. None si no existe."""
+    conc = (
+        db.query(ConciliacionPerdidas)
+        .filter(
+            ConciliacionPerdidas.id == conciliacion_id,
+            ConciliacionPerdidas.tenant_id == tenant_id,
+            ConciliacionPerdidas.empresa_id.in_(allowed_empresa_ids or [-1]),
+        )
+        .first()
+    )
+    if conc is None:
+        return None
+    rows = (
+        db.query(ConciliacionPerdidasCT, Concentrador.nombre_ct)
+        .join(Concentrador, ConciliacionPerdidasCT.concentrador_id == Concentrador.id)
+        .filter(ConciliacionPerdidasCT.conciliacion_id == conc.id)
+        .order_by(ConciliacionPerdidasCT.marcado.desc(), ConciliacionPerdidasCT.exceso_kwh.desc())
+        .all()
+    )
+    return [
+        {
+            "concentrador_id": ct.concentrador_id,
+            "nombre_ct": nombre_ct,
+            "dias_procesados": ct.dias_procesados,
+            "energia_kwh": ct.energia_kwh,
+            "perdida_kwh": ct.perdida_kwh,
+            "perdida_pct": ct.perdida_pct,
+            "exceso_kwh": ct.exceso_kwh,
+            "aportacion_pct": ct.aportacion_pct,
+            "marcado": bool(ct.marcado),
+        }
+        for ct, nombre_ct in rows
+    ]
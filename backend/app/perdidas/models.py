@@ -4,7 +4,7 @@
 from __future__ import annotations
 
 from sqlalchemy import (
-    BigInteger, Boolean, Column, Date, DateTime,
+    BigInteger, Boolean, Column, Date, DateTime, Float,
     ForeignKey, Integer, Numeric, String, UniqueConstraint,
 )
 
@@ -63,3 +63,76 @@ class PerdidaDiaria(TenantMixin, Base):
     estado           = Column(String(20), nullable=False, default="ok")  # ok / incompleto / sin_datos
     created_at       = Column(DateTime, nullable=False, default=ahora_madrid)
 
+
+
+class ConciliacionPerdidas(TenantMixin, Base):
+    """
+    Cruce mensual por empresa entre las pérdidas calculadas con S02
+    (suma de perdida_diaria de sus CTs) y las pérdidas publicadas en BALD
+    (medidas_general, ventanas M2/M7/M11/ART15). Lo mantiene
+    app/perdidas/conciliacion.py tras procesar S02 o ingerir un BALD.
+
+    `ventana_referencia` es la ventana más reciente publicada (ART15 > M11 >
+    M7 > M2) y `divergencia_pp` = perdida_s02_pct - pct BALD de esa ventana,
+    en puntos porcentuales.
+
+    estado: ok / divergente / sin_bald / sin_s02
+    """
+    __tablename__ = "perdidas_conciliacion"
+    __table_args__ = (
+        UniqueConstraint("tenant_id", "empresa_id", "anio", "mes", name="uq_perdidas_conciliacion_periodo"),
+    )
+
+    id          = Column(Integer, primary_key=True)
+    empresa_id  = Column(Integer, nullable=False)
+    anio        = Column(Integer, nullable=False)
+    mes         = Column(Integer, nullable=False)
+
+    # S02 (kWh)
+    num_cts           = Column(Integer, nullable=False, default=0)
+    dias_procesados   = Column(Integer, nullable=False, default=0)
+    dias_completos    = Column(Integer, nullable=False, default=0)
+    energia_s02_kwh   = Column(Float, nullable=False, default=0)
+    perdida_s02_kwh   = Column(Float, nullable=False, default=0)
+    perdida_s02_pct   = Column(Float, nullable=True)
+
+    # BALD por ventana (copiado de medidas_general)
+    perdidas_m2_kwh    = Column(Float, nullable=True)
+    perdidas_m2_pct    = Column(Float, nullable=True)
+    perdidas_m7_kwh    = Column(Float, nullable=True)
+    perdidas_m7_pct    = Column(Float, nullable=True)
+    perdidas_m11_kwh   = Column(Float, nullable=True)
+    perdidas_m11_pct   = Column(Float, nullable=True)
+    perdidas_art15_kwh = Column(Float, nullable=True)
+    perdidas_art15_pct = Column(Float, nullable=True)
+
+    ventana_referencia = Column(String(10), nullable=True)
+    divergencia_pp     = Column(Float, nullable=True)
+    estado             = Column(String(20), nullable=False, default="sin_bald")
+    calculado_at       = Column(DateTime, nullable=False, default=ahora_madrid)
+
+
+class ConciliacionPerdidasCT(Base):
+    """
+    Aportación de cada CT a la divergencia de su conciliación mensual.
+
+    exceso_kwh = perdida_kwh - energia_kwh × pct BALD / 100: lo que pierde el
+    CT por encima de lo que le correspondería con el % publicado. La suma de
+    los excesos es la divergencia de la empresa en kWh; `marcado` señala los
+    CTs que, ordenados por exceso, explican al menos el 80 % de ella.
+    """
+    __tablename__ = "perdidas_conciliacion_ct"
+    __table_args__ = (
+        UniqueConstraint("conciliacion_id", "concentrador_id", name="uq_perdidas_conciliacion_ct"),
+    )
+
+    id               = Column(Integer, primary_key=True)
+    conciliacion_id  = Column(Integer, ForeignKey("perdidas_conciliacion.id", ondelete="CASCADE"), nullable=False, index=True)
+    concentrador_id  = Column(Integer, ForeignKey("concentrador.id", ondelete="CASCADE"), nullable=False)
+    dias_procesados  = Column(Integer, nullable=False, default=0)
+    energia_kwh      = Column(Float, nullable=False, default=0)
+    perdida_kwh      = Column(Float, nullable=False, default=0)
+    perdida_pct      = Column(Float, nullable=True)
+    exceso_kwh       = Column(Float, nullable=True)
+    aportacion_pct   = Column(Float, nullable=True)   # % de la divergencia total
+    marcado          = Column(Boolean, nullable=False, default=False)
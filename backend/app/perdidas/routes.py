@@ -12,11 +12,16 @@ from sqlalchemy.orm import Session
 from app.comunicaciones.models import FtpConfig
 from app.core.auth import get_current_user
 from app.core.db import get_db
+from app.core.exports import export_response
+from app.core.perf import perf_budget
 from app.core.permissions import assert_empresa_access, get_allowed_empresa_ids
+from app.core.pipeline_timing import medir_pipeline
 from app.tenants.models import User
-from app.perdidas import services
+from app.perdidas import conciliacion, services
 from app.perdidas.models import Concentrador
 from app.perdidas.schemas import (
+    ConciliacionCTRead,
+    ConciliacionRead,
     ConcentradorCreate,
     ConcentradorRead,
     ConcentradorUpdate,
@@ -25,6 +30,8 @@ from app.perdidas.schemas import (
     PerdidaMensualRead,
     ProcesarS02Request,
     ProcesarS02Response,
+    RecalcularConciliacionRequest,
+    RecalcularConciliacionResponse,
 )
 
 router = APIRouter(prefix="/perdidas", tags=["perdidas"])
@@ -44,6 +51,7 @@ def _assert_not_viewer(user: User) -> None:
 # ── Concentradores — CRUD ─────────────────────────────────────────────────────
 
 @router.get("/concentradores", response_model=List[ConcentradorRead])
+@perf_budget(queries=6)
 def get_concentradores(
     empresa_id: Optional[int] = Query(None),
     db: Session = Depends(get_db),
@@ -249,19 +257,21 @@ def procesar_s02(
         empresas_implicadas = {int(c.empresa_id) for c in concentradores}
         for emp_id in empresas_implicadas:
             assert_empresa_access(db, current_user, emp_id)
-    procesados, errores, omitidos, detalle = services.procesar_s02(
-        db,
-        tenant_id=tid,
-        allowed_empresa_ids=get_allowed_empresa_ids(db, current_user),
-        concentrador_ids=payload.concentrador_ids,
-        fecha_desde=payload.fecha_desde,
-        fecha_hasta=payload.fecha_hasta,
-    )
+    with medir_pipeline("perdidas_s02") as tiempos:
+        procesados, errores, omitidos, detalle = services.procesar_s02(
+            db,
+            tenant_id=tid,
+            allowed_empresa_ids=get_allowed_empresa_ids(db, current_user),
+            concentrador_ids=payload.concentrador_ids,
+            fecha_desde=payload.fecha_desde,
+            fecha_hasta=payload.fecha_hasta,
+        )
     return ProcesarS02Response(
         procesados=procesados,
         errores=errores,
         omitidos=omitidos,
         detalle=detalle,
+        tiempos=tiempos.as_dict(),
     )
 
 
@@ -292,6 +302,38 @@ def get_perdidas_diarias(
     )
 
 
+@router.get("/diarias/export")
+def export_perdidas_diarias(
+    formato: str = Query("csv", pattern="^(csv|xlsx)$"),
+    empresa_id: Optional[int] = Query(None),
+    concentrador_id: Optional[int] = Query(None),
+    fecha_desde: Optional[date] = Query(None),
+    fecha_hasta: Optional[date] = Query(None),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Igual que /diarias pero sin límite de filas, en CSV o XLSX (streaming)."""
+    _assert_not_viewer(current_user)
+    if empresa_id is not None:
+        assert_empresa_access(db, current_user, empresa_id)
+    rows = services.iter_perdidas_diarias_export(
+        db,
+        tenant_id=_tenant_id(current_user),
+        allowed_empresa_ids=get_allowed_empresa_ids(db, current_user),
+        empresa_id=empresa_id,
+        concentrador_id=concentrador_id,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+    )
+    return export_response(
+        formato=formato,
+        filename_base="perdidas_diarias",
+        headers=services.PERDIDAS_DIARIAS_EXPORT_COLUMNS,
+        rows=rows,
+        sheet_title="Pérdidas diarias",
+    )
+
+
 # ── Pérdidas mensuales ────────────────────────────────────────────────────────
 
 @router.get("/mensuales", response_model=List[PerdidaMensualRead])
@@ -313,3 +355,80 @@ def get_perdidas_mensuales(
         concentrador_id=concentrador_id,
         anio=anio,
     )
+
+
+# ── Conciliación S02 / BALD ───────────────────────────────────────────────────
+
+@router.get("/conciliacion", response_model=List[ConciliacionRead])
+@perf_budget(queries=6)
+def get_conciliaciones(
+    empresa_id: Optional[int] = Query(None),
+    anio: Optional[int] = Query(None),
+    estado: Optional[str] = Query(None, pattern="^(ok|divergente|sin_bald|sin_s02)$"),
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Pérdidas S02 frente a las publicadas en BALD por empresa y mes, leídas de
+    la tabla precalculada (se actualiza al procesar S02 y al ingerir BALD).
+    """
+    _assert_not_viewer(current_user)
+    if empresa_id is not None:
+        assert_empresa_access(db, current_user, empresa_id)
+    return conciliacion.list_conciliaciones(
+        db,
+        tenant_id=_tenant_id(current_user),
+        allowed_empresa_ids=get_allowed_empresa_ids(db, current_user),
+        empresa_id=empresa_id,
+        anio=anio,
+        estado=estado,
+    )
+
+
+@router.get("/conciliacion/{conciliacion_id}/cts", response_model=List[ConciliacionCTRead])
+@perf_budget(queries=6)
+def get_conciliacion_cts(
+    conciliacion_id: int,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """Aportación de cada CT a la divergencia; los marcados primero."""
+    _assert_not_viewer(current_user)
+    filas = conciliacion.list_cts_conciliacion(
+        db,
+        tenant_id=_tenant_id(current_user),
+        allowed_empresa_ids=get_allowed_empresa_ids(db, current_user),
+        conciliacion_id=conciliacion_id,
+    )
+    if filas is None:
+        raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Conciliación no encontrada")
+    return filas
+
+
+@router.post("/conciliacion/recalcular", response_model=RecalcularConciliacionResponse)
+def recalcular_conciliacion(
+    payload: RecalcularConciliacionRequest,
+    db: Session = Depends(get_db),
+    current_user: User = Depends(get_current_user),
+):
+    """
+    Recalcula la conciliación a mano: un periodo concreto o todos los que
+    tengan S02 o BALD (carga inicial, borrados de ficheros BALD).
+    """
+    _assert_not_viewer(current_user)
+    tid = _tenant_id(current_user)
+    if payload.empresa_id is not None:
+        assert_empresa_access(db, current_user, payload.empresa_id)
+        empresa_ids = [payload.empresa_id]
+    else:
+        empresa_ids = get_allowed_empresa_ids(db, current_user)
+    if not empresa_ids:
+        return RecalcularConciliacionResponse(periodos=0)
+
+    periodos = conciliacion.periodos_pendientes(db, tenant_id=tid, empresa_ids=empresa_ids)
+    if payload.anio is not None:
+        periodos = {p for p in periodos if p[1] == payload.anio}
+        if payload.mes is not None:
+            periodos = {p for p in periodos if p[2] == payload.mes}
+    n = conciliacion.recalcular_periodos(db, tenant_id=tid, periodos=periodos)
+    return RecalcularConciliacionResponse(periodos=n)
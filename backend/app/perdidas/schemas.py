@@ -5,7 +5,7 @@ from __future__ import annotations
 
 from datetime import date, datetime
 from decimal import Decimal
-from typing import Optional
+from typing import Any, Dict, Optional
 
 from pydantic import BaseModel
 
@@ -124,3 +124,54 @@ class ProcesarS02Response(BaseModel):
     errores:     int
     omitidos:    int    # ya existían y no se reprocesaron
     detalle:     list[str]
+    # Tiempos por etapa del lote (ver app/core/pipeline_timing.py)
+    tiempos:     Optional[Dict[str, Any]] = None
+
+
+# ── Conciliación S02 / BALD (precalculada) ────────────────────────────────────
+
+class ConciliacionRead(BaseModel):
+    id:                 int
+    empresa_id:         int
+    anio:               int
+    mes:                int
+    num_cts:            int
+    dias_procesados:    int
+    dias_completos:     int
+    energia_s02_kwh:    float
+    perdida_s02_kwh:    float
+    perdida_s02_pct:    Optional[float]
+    perdidas_m2_kwh:    Optional[float]
+    perdidas_m2_pct:    Optional[float]
+    perdidas_m7_kwh:    Optional[float]
+    perdidas_m7_pct:    Optional[float]
+    perdidas_m11_kwh:   Optional[float]
+    perdidas_m11_pct:   Optional[float]
+    perdidas_art15_kwh: Optional[float]
+    perdidas_art15_pct: Optional[float]
+    ventana_referencia: Optional[str]
+    divergencia_pp:     Optional[float]   # perdida_s02_pct - pct BALD (puntos)
+    estado:             str               # ok / divergente / sin_bald / sin_s02
+    calculado_at:       datetime
+
+
+class ConciliacionCTRead(BaseModel):
+    concentrador_id: int
+    nombre_ct:       str
+    dias_procesados: int
+    energia_kwh:     float
+    perdida_kwh:     float
+    perdida_pct:     Optional[float]
+    exceso_kwh:      Optional[float]   # pérdida por encima del % BALD
+    aportacion_pct:  Optional[float]   # % de la divergencia de la empresa
+    marcado:         bool
+
+
+class RecalcularConciliacionRequest(BaseModel):
+    empresa_id: Optional[int] = None   # None = todas las permitidas
+    anio:       Optional[int] = None
+    mes:        Optional[int] = None
+
+
+class RecalcularConciliacionResponse(BaseModel):
+    periodos: int
@@ -10,30 +10,27 @@ import xml.etree.ElementTree as ET
 from datetime import date
 from decimal import Decimal, ROUND_HALF_UP
 from pathlib import Path
-from typing import List, Optional, Tuple
+from typing import Iterator, List, Optional, Tuple
 
 from sqlalchemy.orm import Session
 
 from app.comunicaciones.models import FtpConfig
 from app.comunicaciones.services import _conectar_en_path
 from app.core.datetime_utils import ahora_madrid
-from app.empresas.models import Empresa
+from app.core.exports import iter_query
+from app.core.pipeline_timing import etapa
+from app.empresas.services import nombre_empresa
 from app.perdidas.models import Concentrador, PerdidaDiaria
 
 
 # ── Helpers ───────────────────────────────────────────────────────────────────
 
-def _nombre_empresa(db: Session, empresa_id: int) -> str:
-    emp = db.query(Empresa).filter(Empresa.id == empresa_id).first()
-    return str(getattr(emp, "nombre", "") or f"Empresa {empresa_id}") if emp else f"Empresa {empresa_id}"
-
-
 def _concentrador_to_dict(obj: Concentrador, db: Session) -> dict:
     return {
         "id":                   obj.id,
         "tenant_id":            obj.tenant_id,
         "empresa_id":           obj.empresa_id,
-        "empresa_nombre":       _nombre_empresa(db, int(obj.empresa_id)),
+        "empresa_nombre":       nombre_empresa(db, int(obj.empresa_id), tenant_id=obj.tenant_id),
         "nombre_ct":            obj.nombre_ct,
         "id_concentrador":      obj.id_concentrador,
         "id_supervisor":        obj.id_supervisor,
@@ -404,6 +401,7 @@ def procesar_s02(
     errores    = 0
     omitidos   = 0
     detalle: List[str] = []
+    fechas_procesadas: List[Tuple[int, date]] = []
 
     base_dir = _directorio_descarga()
 
@@ -417,16 +415,18 @@ def procesar_s02(
         patron = re.compile(rf"^{re.escape(conc.id_concentrador)}_0_S02_0_(\d{{8}})")
 
         ficheros_encontrados = []
-        for f in empresa_dir.iterdir():
-            m = patron.match(f.name)
-            if m:
-                ts = m.group(1)
-                try:
-                    fecha_f = date(int(ts[:4]), int(ts[4:6]), int(ts[6:8]))
-                    if fecha_desde <= fecha_f <= fecha_hasta:
-                        ficheros_encontrados.append((fecha_f, f))
-                except ValueError:
-                    continue
+        with etapa("busqueda_ficheros") as medicion:
+            for f in empresa_dir.iterdir():
+                m = patron.match(f.name)
+                if m:
+                    ts = m.group(1)
+                    try:
+                        fecha_f = date(int(ts[:4]), int(ts[4:6]), int(ts[6:8]))
+                        if fecha_desde <= fecha_f <= fecha_hasta:
+                            ficheros_encontrados.append((fecha_f, f))
+                    except ValueError:
+                        continue
+            medicion.filas = len(ficheros_encontrados)
 
         if not ficheros_encontrados:
             detalle.append(f"OMITIDO: {conc.nombre_ct} — sin ficheros S02 en el rango")
@@ -435,8 +435,12 @@ def procesar_s02(
 
         for fecha_f, fichero_path in sorted(ficheros_encontrados):
             try:
-                content = fichero_path.read_bytes()
-                datos   = _parse_s02(content)
+                with etapa("lectura") as medicion:
+                    content = fichero_path.read_bytes()
+                    medicion.bytes = len(content)
+                with etapa("parseo_s02") as medicion:
+                    datos   = _parse_s02(content)
+                    medicion.filas = datos["num_contadores"]
 
                 # Usar siempre el supervisor definido en la ficha del concentrador
                 # Buscarlo entre los contadores del fichero para obtener su energía real
@@ -450,42 +454,45 @@ def procesar_s02(
                 else:
                     detalle.append(f"AVISO: {conc.nombre_ct} {fecha_f} — supervisor {conc.id_supervisor} no encontrado en S02")
 
-                calculo = _calcular_perdida(
-                    supervisor=sup or {
-                        "id": conc.id_supervisor, "magn": conc.magn_supervisor,
-                        "ai": 0, "ae": 0, "horas": 0,
-                    },
-                    clientes=datos["clientes"],
-                    magn=conc.magn_supervisor,
-                )
-
-                existing = db.query(PerdidaDiaria).filter(
-                    PerdidaDiaria.concentrador_id == conc.id,
-                    PerdidaDiaria.fecha == fecha_f,
-                ).first()
-                if existing:
-                    db.delete(existing)
-                    db.flush()
-
-                perdida = PerdidaDiaria(
-                    tenant_id=conc.tenant_id,
-                    empresa_id=conc.empresa_id,
-                    concentrador_id=conc.id,
-                    fecha=fecha_f,
-                    nombre_fichero_s02=fichero_path.name,
-                    num_contadores=datos["num_contadores"],
-                    created_at=ahora_madrid(),
-                    **calculo,
-                )
-                db.add(perdida)
-                db.commit()
-
-                if conc.fecha_ultimo_proceso is None or fecha_f > conc.fecha_ultimo_proceso:
-                    conc.fecha_ultimo_proceso = fecha_f  # type: ignore
-                    conc.updated_at = ahora_madrid()  # type: ignore
+                with etapa("calculo_perdida"):
+                    calculo = _calcular_perdida(
+                        supervisor=sup or {
+                            "id": conc.id_supervisor, "magn": conc.magn_supervisor,
+                            "ai": 0, "ae": 0, "horas": 0,
+                        },
+                        clientes=datos["clientes"],
+                        magn=conc.magn_supervisor,
+                    )
+
+                with etapa("escritura"):
+                    existing = db.query(PerdidaDiaria).filter(
+                        PerdidaDiaria.concentrador_id == conc.id,
+                        PerdidaDiaria.fecha == fecha_f,
+                    ).first()
+                    if existing:
+                        db.delete(existing)
+                        db.flush()
+
+                    perdida = PerdidaDiaria(
+                        tenant_id=conc.tenant_id,
+                        empresa_id=conc.empresa_id,
+                        concentrador_id=conc.id,
+                        fecha=fecha_f,
+                        nombre_fichero_s02=fichero_path.name,
+                        num_contadores=datos["num_contadores"],
+                        created_at=ahora_madrid(),
+                        **calculo,
+                    )
+                    db.add(perdida)
                     db.commit()
 
+                    if conc.fecha_ultimo_proceso is None or fecha_f > conc.fecha_ultimo_proceso:
+                        conc.fecha_ultimo_proceso = fecha_f  # type: ignore
+                        conc.updated_at = ahora_madrid()  # type: ignore
+                        db.commit()
+
                 procesados += 1
+                fechas_procesadas.append((int(conc.empresa_id), fecha_f))
                 detalle.append(
                     f"OK: {conc.nombre_ct} {fecha_f} — "
                     f"perdida={calculo['perdida_wh']} Wh ({calculo['perdida_pct']}%)"
@@ -495,12 +502,17 @@ def procesar_s02(
                 errores += 1
                 detalle.append(f"ERROR: {conc.nombre_ct} {fecha_f} — {str(e)[:200]}")
 
+    # Conciliación con BALD de los meses tocados (nunca falla el procesado).
+    from app.perdidas.conciliacion import recalcular_tras_s02
+    with etapa("conciliacion", filas=len(fechas_procesadas)):
+        recalcular_tras_s02(db, tenant_id=tenant_id, procesados=fechas_procesadas)
+
     return procesados, errores, omitidos, detalle
 
 
 # ── Consulta pérdidas diarias ─────────────────────────────────────────────────
 
-def list_perdidas_diarias(
+def _perdidas_diarias_query(
     db: Session, *,
     tenant_id: int,
     allowed_empresa_ids: List[int],
@@ -508,10 +520,7 @@ def list_perdidas_diarias(
     concentrador_id: Optional[int] = None,
     fecha_desde: Optional[date] = None,
     fecha_hasta: Optional[date] = None,
-    limit: int = 500,
-) -> List[dict]:
-    if not allowed_empresa_ids:
-        return []
+):
     q = db.query(PerdidaDiaria, Concentrador).join(
         Concentrador, PerdidaDiaria.concentrador_id == Concentrador.id
     ).filter(
@@ -528,10 +537,86 @@ def list_perdidas_diarias(
     if fecha_hasta:
         q = q.filter(PerdidaDiaria.fecha <= fecha_hasta)
 
-    rows = q.order_by(PerdidaDiaria.fecha.desc(), Concentrador.nombre_ct).limit(limit).all()
+    return q.order_by(PerdidaDiaria.fecha.desc(), Concentrador.nombre_ct)
+
+
+def list_perdidas_diarias(
+    db: Session, *,
+    tenant_id: int,
+    allowed_empresa_ids: List[int],
+    empresa_id: Optional[int] = None,
+    concentrador_id: Optional[int] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+    limit: int = 500,
+) -> List[dict]:
+    if not allowed_empresa_ids:
+        return []
+    q = _perdidas_diarias_query(
+        db,
+        tenant_id=tenant_id,
+        allowed_empresa_ids=allowed_empresa_ids,
+        empresa_id=empresa_id,
+        concentrador_id=concentrador_id,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+    )
+    rows = q.limit(limit).all()
     return [_perdida_to_dict(p, c.nombre_ct) for p, c in rows]
 
 
+PERDIDAS_DIARIAS_EXPORT_COLUMNS = [
+    "fecha", "empresa_id", "concentrador_id", "nombre_ct", "nombre_fichero_s02",
+    "ai_supervisor", "ae_supervisor", "ai_clientes", "ae_clientes",
+    "energia_neta_wh", "perdida_wh", "perdida_pct",
+    "num_contadores", "horas_con_datos", "estado",
+]
+
+
+def iter_perdidas_diarias_export(
+    db: Session, *,
+    tenant_id: int,
+    allowed_empresa_ids: List[int],
+    empresa_id: Optional[int] = None,
+    concentrador_id: Optional[int] = None,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+) -> Iterator[tuple]:
+    """
+    Filas de pérdidas diarias para exportar (columnas en el orden de
+    PERDIDAS_DIARIAS_EXPORT_COLUMNS), sin límite y leídas por bloques.
+    """
+    if not allowed_empresa_ids:
+        return
+    q = _perdidas_diarias_query(
+        db,
+        tenant_id=tenant_id,
+        allowed_empresa_ids=allowed_empresa_ids,
+        empresa_id=empresa_id,
+        concentrador_id=concentrador_id,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+    ).with_entities(
+        PerdidaDiaria.fecha,
+        PerdidaDiaria.empresa_id,
+        PerdidaDiaria.concentrador_id,
+        Concentrador.nombre_ct,
+        PerdidaDiaria.nombre_fichero_s02,
+        PerdidaDiaria.ai_supervisor,
+        PerdidaDiaria.ae_supervisor,
+        PerdidaDiaria.ai_clientes,
+        PerdidaDiaria.ae_clientes,
+        PerdidaDiaria.energia_neta_wh,
+        PerdidaDiaria.perdida_wh,
+        PerdidaDiaria.perdida_pct,
+        PerdidaDiaria.num_contadores,
+        PerdidaDiaria.horas_con_datos,
+        PerdidaDiaria.estado,
+    )
+    for row in iter_query(q):
+        yield tuple(row)
+
+
 # ── Pérdidas mensuales (calculadas en tiempo real) ────────────────────────────
 
 def list_perdidas_mensuales(
@@ -0,0 +1,384 @@
+# app/stg/agregados.py
+# pyright: reportMissingImports=false
+"""
+Agregados diarios y mensuales por contador a partir de la curva S02.
+
+stg_medida guarda cada lectura horaria como JSONB; sumar un año de un
+contador son ~8.760 filas y otras tantas extracciones de JSON. Al parsear un
+fichero S02, `parsear_fichero` llama a `recalcular` con los (contador, día)
+que contiene (y los que contenía antes, si es un reproceso) y aquí se
+rehacen esas filas de stg_medida_diaria y los meses afectados de
+stg_medida_mensual, en la misma transacción que las medidas.
+
+Se recalcula desde stg_medida en vez de sumar incrementalmente: un mismo
+contador/hora puede llegar en varios ficheros (reenvíos del concentrador) y
+solo cuenta la lectura más reciente (mayor id).
+
+Las lecturas de solo agregados (`serie_*`) son una consulta indexada por
+(empresa_id, meter_id, fecha) o (empresa_id, concentrador_id, fecha).
+
+S05 (cierres) no se agrega: trae lecturas de registro acumuladas por
+periodo, no energía por intervalo.
+"""
+from __future__ import annotations
+
+from collections import defaultdict
+from datetime import date, datetime, time, timedelta, timezone
+from typing import Any, Dict, Iterable, Optional, Set, Tuple
+from zoneinfo import ZoneInfo
+
+from sqlalchemy import func, insert, tuple_
+from sqlalchemy.orm import Session
+
+from app.core.datetime_utils import ahora_madrid
+from app.core.permissions import assert_empresa_access
+from app.stg.models import Medida, MedidaDiaria, MedidaMensual
+from app.tenants.models import User
+
+
+TIPO_CURVA = "S02"
+MAGNITUDES = ("ai", "ae", "r1", "r2", "r3", "r4")
+MAX_DIAS_SERIE = 731
+
+_TZ = ZoneInfo("Europe/Madrid")
+_LOTE_CONTADORES = 500
+
+Clave = Tuple[str, date]
+
+
+# ── Calendario ───────────────────────────────────────────────────────────────
+
+def dia_de_lectura(ts: datetime) -> date:
+    """Día al que pertenece una lectura horaria (00:00 = hora 24 del anterior)."""
+    return (ts - timedelta(hours=1)).date()
+
+
+def horas_del_dia(fecha: date) -> int:
+    """Horas del día en Europe/Madrid: 23 o 25 en los cambios de hora."""
+    inicio = datetime.combine(fecha, time(), _TZ).astimezone(timezone.utc)
+    fin = datetime.combine(fecha + timedelta(days=1), time(), _TZ).astimezone(timezone.utc)
+    return int((fin - inicio).total_seconds() // 3600)
+
+
+def horas_del_mes(anio: int, mes: int) -> int:
+    d = date(anio, mes, 1)
+    total = 0
+    while d.month == mes:
+        total += horas_del_dia(d)
+        d += timedelta(days=1)
+    return total
+
+
+def _num(v: Any) -> float:
+    try:
+        return float(v)
+    except (TypeError, ValueError):
+        return 0.0
+
+
+# ── Cálculo (puro) ───────────────────────────────────────────────────────────
+
+def agregar_lecturas(
+    filas: Iterable[Tuple[int, str, datetime, Optional[int], Optional[int], Optional[dict]]],
+) -> Dict[Clave, Dict[str, Any]]:
+    """
+    Agrega lecturas S02 (id, meter_id, timestamp, contador_id,
+    concentrador_id, datos) por (meter_id, día). Si una hora se repite se
+    queda la lectura de mayor id. La hora repetida del cambio de horario de
+    octubre llega con el mismo timestamp y distinta `season` (S/W): cuenta
+    como dos horas.
+    """
+    ultimas: Dict[Tuple[str, datetime, Any], tuple] = {}
+    for fila in filas:
+        clave = (fila[1], fila[2], (fila[5] or {}).get("season"))
+        previa = ultimas.get(clave)
+        if previa is None or fila[0] > previa[0]:
+            ultimas[clave] = fila
+
+    out: Dict[Clave, Dict[str, Any]] = {}
+    for (meter_id, ts, _), (_, _, _, contador_id, concentrador_id, datos) in sorted(
+        ultimas.items(), key=lambda kv: kv[0][1]
+    ):
+        fecha = dia_de_lectura(ts)
+        agg = out.get((meter_id, fecha))
+        if agg is None:
+            agg = out[(meter_id, fecha)] = {
+                "meter_id": meter_id,
+                "fecha": fecha,
+                **{m: 0.0 for m in MAGNITUDES},
+                "horas_con_dato": 0,
+                "horas_esperadas": horas_del_dia(fecha),
+                "lecturas_bc_ok": 0,
+                "lecturas_bc_incidencia": 0,
+            }
+        d = datos or {}
+        for m in MAGNITUDES:
+            agg[m] += _num(d.get(m))
+        agg["horas_con_dato"] += 1
+        if _num(d.get("bc")) == 0:
+            agg["lecturas_bc_ok"] += 1
+        else:
+            agg["lecturas_bc_incidencia"] += 1
+        # Recorrido en orden de timestamp: queda el contador/concentrador
+        # de la última lectura del día.
+        agg["contador_id"] = contador_id
+        agg["concentrador_id"] = concentrador_id
+    return out
+
+
+def agregar_meses(diarias: Iterable[MedidaDiaria]) -> Dict[Tuple[str, int, int], Dict[str, Any]]:
+    out: Dict[Tuple[str, int, int], Dict[str, Any]] = {}
+    for d in diarias:
+        clave = (d.meter_id, d.fecha.year, d.fecha.month)
+        agg = out.get(clave)
+        if agg is None:
+            agg = out[clave] = {
+                "meter_id": d.meter_id,
+                "anio": d.fecha.year,
+                "mes": d.fecha.month,
+                **{m: 0.0 for m in MAGNITUDES},
+                "dias_con_dato": 0,
+                "horas_con_dato": 0,
+                "horas_esperadas": horas_del_mes(d.fecha.year, d.fecha.month),
+                "lecturas_bc_ok": 0,
+                "lecturas_bc_incidencia": 0,
+            }
+        for m in MAGNITUDES:
+            agg[m] += getattr(d, m) or 0.0
+        agg["dias_con_dato"] += 1
+        agg["horas_con_dato"] += d.horas_con_dato
+        agg["lecturas_bc_ok"] += d.lecturas_bc_ok
+        agg["lecturas_bc_incidencia"] += d.lecturas_bc_incidencia
+    return out
+
+
+# ── Mantenimiento ────────────────────────────────────────────────────────────
+
+def claves_de_fichero(db: Session, fichero_id: int) -> Set[Clave]:
+    """(meter_id, día) de las lecturas S02 que tiene un fichero en stg_medida."""
+    rows = (
+        db.query(Medida.meter_id, Medida.timestamp_dato)
+        .filter(
+            Medida.fichero_id == fichero_id,
+            Medida.tipo_fichero == TIPO_CURVA,
+            Medida.meter_id.isnot(None),
+            Medida.timestamp_dato.isnot(None),
+        )
+        .distinct()
+        .all()
+    )
+    return {(meter_id, dia_de_lectura(ts)) for meter_id, ts in rows}
+
+
+def _recalcular_lote(
+    db: Session, *, tenant_id: int, empresa_id: int, claves: Set[Clave],
+) -> Tuple[int, int]:
+    meters = sorted({m for m, _ in claves})
+    fechas = sorted({f for _, f in claves})
+    desde = datetime.combine(fechas[0], time()) + timedelta(hours=1)
+    hasta = datetime.combine(fechas[-1] + timedelta(days=1), time())
+
+    filas = (
+        db.query(
+            Medida.id, Medida.meter_id, Medida.timestamp_dato,
+            Medida.contador_id, Medida.concentrador_id, Medida.datos,
+        )
+        .filter(
+            Medida.empresa_id == empresa_id,
+            Medida.tipo_fichero == TIPO_CURVA,
+            Medida.meter_id.in_(meters),
+            Medida.timestamp_dato >= desde,
+            Medida.timestamp_dato <= hasta,
+        )
+        .all()
+    )
+    diarias = {k: v for k, v in agregar_lecturas(filas).items() if k in claves}
+
+    db.query(MedidaDiaria).filter(
+        MedidaDiaria.empresa_id == empresa_id,
+        tuple_(MedidaDiaria.meter_id, MedidaDiaria.fecha).in_(sorted(claves)),
+    ).delete(synchronize_session=False)
+    if diarias:
+        db.execute(
+            insert(MedidaDiaria),
+            [{"tenant_id": tenant_id, "empresa_id": empresa_id, **v} for v in diarias.values()],
+        )
+
+    # Meses tocados: se vuelven a sumar enteros desde el diario.
+    meses = {(m, f.year, f.month) for m, f in claves}
+    inicio = fechas[0].replace(day=1)
+    fin = (fechas[-1].replace(day=1) + timedelta(days=32)).replace(day=1)
+    dias_mes = (
+        db.query(MedidaDiaria)
+        .filter(
+            MedidaDiaria.empresa_id == empresa_id,
+            MedidaDiaria.meter_id.in_(meters),
+            MedidaDiaria.fecha >= inicio,
+            MedidaDiaria.fecha < fin,
+        )
+        .all()
+    )
+    mensuales = {k: v for k, v in agregar_meses(dias_mes).items() if k in meses}
+
+    db.query(MedidaMensual).filter(
+        MedidaMensual.empresa_id == empresa_id,
+        tuple_(MedidaMensual.meter_id, MedidaMensual.anio, MedidaMensual.mes).in_(sorted(meses)),
+    ).delete(synchronize_session=False)
+    if mensuales:
+        db.execute(
+            insert(MedidaMensual),
+            [{"tenant_id": tenant_id, "empresa_id": empresa_id, **v} for v in mensuales.values()],
+        )
+    return len(diarias), len(mensuales)
+
+
+def recalcular(
+    db: Session, *, tenant_id: int, empresa_id: int, claves: Iterable[Clave],
+) -> Dict[str, int]:
+    """
+    Rehace los agregados diarios de `claves` y los mensuales de sus meses.
+    No hace commit: va en la transacción del parseo.
+    """
+    por_contador: Dict[str, Set[date]] = defaultdict(set)
+    for meter_id, fecha in claves:
+        por_contador[meter_id].add(fecha)
+
+    meters = sorted(por_contador)
+    dias = meses = 0
+    for i in range(0, len(meters), _LOTE_CONTADORES):
+        lote = {(m, f) for m in meters[i:i + _LOTE_CONTADORES] for f in por_contador[m]}
+        d, m = _recalcular_lote(db, tenant_id=tenant_id, empresa_id=empresa_id, claves=lote)
+        dias += d
+        meses += m
+    return {"agregados_dias": dias, "agregados_meses": meses}
+
+
+# ── Lectura ──────────────────────────────────────────────────────────────────
+
+def _rango(fecha_desde: Optional[date], fecha_hasta: Optional[date]) -> Tuple[date, date]:
+    """Por defecto el último año; como mucho MAX_DIAS_SERIE días."""
+    hasta = fecha_hasta or ahora_madrid().date()
+    desde = fecha_desde or (hasta - timedelta(days=364))
+    if desde > hasta:
+        raise ValueError("fecha_desde posterior a fecha_hasta")
+    if (hasta - desde).days + 1 > MAX_DIAS_SERIE:
+        raise ValueError(f"rango máximo {MAX_DIAS_SERIE} días")
+    return desde, hasta
+
+
+def _fila_dia(fecha: date, valores: Dict[str, Any]) -> Dict[str, Any]:
+    return {"fecha": fecha.isoformat(), **valores}
+
+
+def serie_diaria_contador(
+    db: Session,
+    user: User,
+    *,
+    empresa_id: int,
+    meter_id: str,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+) -> Dict[str, Any]:
+    assert_empresa_access(db, user, empresa_id)
+    desde, hasta = _rango(fecha_desde, fecha_hasta)
+
+    rows = (
+        db.query(
+            MedidaDiaria.fecha,
+            *[getattr(MedidaDiaria, m) for m in MAGNITUDES],
+            MedidaDiaria.horas_con_dato,
+            MedidaDiaria.horas_esperadas,
+            MedidaDiaria.lecturas_bc_ok,
+            MedidaDiaria.lecturas_bc_incidencia,
+        )
+        .filter(
+            MedidaDiaria.empresa_id == empresa_id,
+            MedidaDiaria.meter_id == meter_id,
+            MedidaDiaria.fecha >= desde,
+            MedidaDiaria.fecha <= hasta,
+        )
+        .order_by(MedidaDiaria.fecha.asc())
+        .all()
+    )
+    return {
+        "meter_id": meter_id,
+        "fecha_desde": desde.isoformat(),
+        "fecha_hasta": hasta.isoformat(),
+        "dias": [_fila_dia(r.fecha, {k: v for k, v in r._mapping.items() if k != "fecha"}) for r in rows],
+    }
+
+
+def serie_mensual_contador(
+    db: Session,
+    user: User,
+    *,
+    empresa_id: int,
+    meter_id: str,
+    anio: Optional[int] = None,
+) -> Dict[str, Any]:
+    assert_empresa_access(db, user, empresa_id)
+    q = db.query(MedidaMensual).filter(
+        MedidaMensual.empresa_id == empresa_id,
+        MedidaMensual.meter_id == meter_id,
+    )
+    if anio is not None:
+        q = q.filter(MedidaMensual.anio == anio)
+    meses = q.order_by(MedidaMensual.anio.asc(), MedidaMensual.mes.asc()).all()
+    return {
+        "meter_id": meter_id,
+        "anio": anio,
+        "meses": [
+            {
+                "anio": m.anio,
+                "mes": m.mes,
+                **{k: getattr(m, k) for k in MAGNITUDES},
+                "dias_con_dato": m.dias_con_dato,
+                "horas_con_dato": m.horas_con_dato,
+                "horas_esperadas": m.horas_esperadas,
+                "lecturas_bc_ok": m.lecturas_bc_ok,
+                "lecturas_bc_incidencia": m.lecturas_bc_incidencia,
+            }
+            for m in meses
+        ],
+    }
+
+
+def serie_diaria_concentrador(
+    db: Session,
+    user: User,
+    *,
+    empresa_id: int,
+    concentrador_id: int,
+    fecha_desde: Optional[date] = None,
+    fecha_hasta: Optional[date] = None,
+) -> Dict[str, Any]:
+    """Suma por día de los contadores que colgaban del concentrador ese día."""
+    assert_empresa_access(db, user, empresa_id)
+    desde, hasta = _rango(fecha_desde, fecha_hasta)
+
+    rows = (
+        db.query(
+            MedidaDiaria.fecha,
+            *[func.sum(getattr(MedidaDiaria, m)).label(m) for m in MAGNITUDES],
+            func.count(MedidaDiaria.id).label("contadores"),
+            func.sum(MedidaDiaria.horas_con_dato).label("horas_con_dato"),
+            func.sum(MedidaDiaria.horas_esperadas).label("horas_esperadas"),
+            func.sum(MedidaDiaria.lecturas_bc_ok).label("lecturas_bc_ok"),
+            func.sum(MedidaDiaria.lecturas_bc_incidencia).label("lecturas_bc_incidencia"),
+        )
+        .filter(
+            MedidaDiaria.empresa_id == empresa_id,
+            MedidaDiaria.concentrador_id == concentrador_id,
+            MedidaDiaria.fecha >= desde,
+            MedidaDiaria.fecha <= hasta,
+        )
+        .group_by(MedidaDiaria.fecha)
+        .order_by(MedidaDiaria.fecha.asc())
+        .all()
+    )
+    return {
+        "concentrador_id": concentrador_id,
+        "fecha_desde": desde.isoformat(),
+        "fecha_hasta": hasta.isoformat(),
+        "dias": [_fila_dia(r.fecha, {k: v for k, v in r._mapping.items() if k != "fecha"}) for r in rows],
+    }
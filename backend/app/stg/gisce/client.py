@@ -44,6 +44,16 @@ class GisceClient:
         self._object: Optional[xmlrpc.client.ServerProxy] = None
         self._uid: Optional[int] = None
 
+    def clonar(self) -> "GisceClient":
+        """
+        Cliente con las mismas credenciales y el uid ya obtenido, pero con
+        sus propios proxies: un ServerProxy no se puede compartir entre
+        hilos. Lo usa la lectura en paralelo de app/stg/gisce/sync.py.
+        """
+        otro = GisceClient(self.url, self.database, self.usuario, self.password)
+        otro._uid = self._uid
+        return otro
+
     def _make_proxy(self, endpoint: str) -> xmlrpc.client.ServerProxy:
         url = f"{self.url}/xmlrpc/{endpoint}"
         try:
@@ -58,7 +68,7 @@ class GisceClient:
             self._common = self._make_proxy("common")
         try:
             uid = self._common.login(self.database, self.usuario, self.password)
-        except (xmlrpc.client.Fault, ConnectionError, OSError) as exc:
+        except (xmlrpc.client.Error, ConnectionError, OSError) as exc:
             raise GisceConnectionError(
                 f"Fallo al contactar GISCE en {self.url}: {exc}"
             ) from exc
@@ -93,7 +103,7 @@ class GisceClient:
                 self.database, uid, self.password,
                 modelo, metodo, *args,
             )
-        except (xmlrpc.client.Fault, ConnectionError, OSError) as exc:
+        except (xmlrpc.client.Error, ConnectionError, OSError) as exc:
             raise GisceError(
                 f"Error ejecutando {modelo}.{metodo}: {exc}"
             ) from exc
@@ -131,7 +141,12 @@ class GisceClient:
         fields: Optional[list] = None,
         limit: Optional[int] = None,
     ) -> list[dict]:
-        """search + read en dos llamadas (OpenERP 5/6 no tiene search_read)."""
+        """
+        search + read en dos llamadas (OpenERP 5/6 no tiene search_read).
+
+        Todo en un único read(): para modelos grandes usar
+        sync.LectorGisce, que lee por trozos.
+        """
         ids = self.search(modelo, domain=domain, limit=limit)
         return self.read(modelo, ids, fields=fields)
 
@@ -89,6 +89,7 @@ def post_preview(
 @router.post("/execute", response_model=GisceExecuteResult)
 def post_execute(
     empresa_id: int = Query(...),
+    incremental: bool = Query(False),
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
@@ -96,6 +97,8 @@ def post_execute(
 
     Alcance Paquete 8f-4 inicial: solo CTs. CUPS se aplicaran cuando
     exista la pestana 'Equipos de Medida'.
+
+    incremental=true: solo lo cambiado en GISCE desde el ultimo import.
     """
     _check_empresa_acceso(user, empresa_id)
-    return services.execute_import(db, empresa_id)
+    return services.execute_import(db, empresa_id, incremental=incremental)
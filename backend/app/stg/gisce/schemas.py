@@ -94,8 +94,13 @@ class GisceExecuteResult(BaseModel):
     ok: bool
     error: Optional[str] = None
 
+    # Solo registros cambiados desde la ultima sincronizacion (sync.py).
+    # *_remoto_total cuenta todo GISCE; *_leidos, lo leido en esta ejecucion.
+    incremental: bool = False
+
     # Totales
     cts_remoto_total: int = 0
+    cts_leidos: int = 0
     cts_local_total: int = 0
 
     # Aplicados CTs
@@ -112,6 +117,7 @@ class GisceExecuteResult(BaseModel):
 
     # -- Paquete 8g-B2: counts CUPS --
     cups_remoto_total: int = 0
+    cups_leidos: int = 0
     cups_local_total: int = 0
     cups_creados: int = 0
     cups_actualizados: int = 0
@@ -123,6 +129,7 @@ class GisceExecuteResult(BaseModel):
 
     # -- Paquete 8g-C: counts enlace contador <-> CUPS --
     contadores_remoto_total: int = 0
+    contadores_leidos: int = 0
     contadores_local_total: int = 0
     contadores_enlazados: int = 0        # contadores que recibieron cups_id por primera vez
     contadores_actualizados: int = 0     # contadores con cups_id que cambio
@@ -5,12 +5,14 @@ from __future__ import annotations
 
 from typing import Optional
 
+from sqlalchemy import insert, update
 from sqlalchemy.orm import Session
 
 from app.core.crypto import cifrar_password, descifrar_password
 from app.core.datetime_utils import ahora_madrid
 from app.stg.models import StgGisceConfig
 
+from . import sync
 from .client import (
     GisceAuthError,
     GisceClient,
@@ -26,6 +28,18 @@ from .schemas import (
     GisceTestResult,
 )
 
+
+# Modelos y campos que lee el import real (execute_import).
+_MODELOS_IMPORT = {
+    "giscedata.cts": ["id", "name", "active", "adreca"],
+    "giscedata.cups.ps": ["id", "name", "et", "titular", "active",
+                          "direccio", "dp", "data_baixa",
+                          "polissa_comptador", "meter_technology"],
+    # Paquete 8g-C: contadores fisicos para enlazar a CUPS
+    "giscedata.lectures.comptador": ["id", "meter", "meter_tg_name", "cups_id", "active"],
+}
+
+
 def _limpiar_host(host: str) -> str:
     """Quita esquema (http://, https://) y trailing slash del host."""
     h = (host or "").strip()
@@ -163,15 +177,15 @@ def preview_import(db: Session, empresa_id: int) -> "GiscePreviewResult":
             error="No hay configuracion GISCE guardada para esta empresa.",
         )
 
-    cli = _build_client_from_config(cfg)
+    lector = sync.LectorGisce(_build_client_from_config(cfg))
 
-    # 1. Traer datos remotos (login lazy)
+    # 1. Traer datos remotos por trozos (login lazy)
     try:
-        cts_remoto = cli.search_read(
+        cts_remoto = lector.leer(
             "giscedata.cts",
             fields=["id", "name", "active", "adreca"],
         )
-        cups_remoto = cli.search_read(
+        cups_remoto = lector.leer(
             "giscedata.cups.ps",
             fields=["id", "name", "et", "titular", "active", "direccio", "data_baixa"],
         )
@@ -195,7 +209,7 @@ def preview_import(db: Session, empresa_id: int) -> "GiscePreviewResult":
         .all()
     )
     cups_local = (
-        db.query(Cups)
+        db.query(Cups.cups, Cups.titular, Cups.direccion, Cups.activo)
         .filter(Cups.empresa_id == empresa_id)
         .all()
     )
@@ -321,7 +335,9 @@ def preview_import(db: Session, empresa_id: int) -> "GiscePreviewResult":
     )
 
 
-def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
+def execute_import(
+    db: Session, empresa_id: int, *, incremental: bool = False
+) -> "GisceExecuteResult":
     """Aplica el import real desde GISCE: UPDATE id_externo_gisce en CTs.
 
     Alcance Paquete 8f-4 inicial:
@@ -337,6 +353,16 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
     Idempotente: re-ejecutar es seguro, los ya enlazados van a
     cts_sin_cambios.
 
+    Lectura por trozos y en paralelo (sync.LectorGisce). Con
+    incremental=True solo se leen los registros creados o modificados desde
+    la ultima sincronizacion (marcas en stg_gisce_sync_marca), mas los que
+    quedaron pendientes en la anterior (CUPS sin CT local, contadores sin
+    CUPS local); un modelo sin marca se lee entero. En incremental los huerfanos locales se cuentan
+    solo por id_externo_gisce (los nombres remotos no leidos no se conocen).
+
+    CUPS y contadores se cargan por columnas y se escriben con INSERT/UPDATE
+    masivos, sin instanciar un objeto ORM por fila.
+
     Transaccion unica: si algo falla, rollback total.
     """
     from app.stg.models import Contador, Cups, StgConcentrador
@@ -349,25 +375,19 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
             error="No hay configuracion GISCE guardada para esta empresa.",
         )
 
-    cli = _build_client_from_config(cfg)
+    lector = sync.LectorGisce(_build_client_from_config(cfg))
+    marcas = sync.leer_marcas(db, empresa_id) if incremental else {}
+    pendientes = sync.leer_pendientes(db, empresa_id) if incremental else {}
 
-    # 1. Traer datos remotos (CTs + CUPS + Comptadors, una sola conexion)
+    # 1. Traer datos remotos (CTs + CUPS + Comptadors, login una sola vez)
     try:
-        cts_remoto = cli.search_read(
-            "giscedata.cts",
-            fields=["id", "name", "active", "adreca"],
-        )
-        cups_remoto = cli.search_read(
-            "giscedata.cups.ps",
-            fields=["id", "name", "et", "titular", "active",
-                    "direccio", "dp", "data_baixa",
-                    "polissa_comptador", "meter_technology"],
-        )
-        # Paquete 8g-C: traer contadores fisicos para enlazar a CUPS
-        comptadors_remoto = cli.search_read(
-            "giscedata.lectures.comptador",
-            fields=["id", "meter", "meter_tg_name", "cups_id", "active"],
-        )
+        desc_cts, desc_cups, desc_comptadors = [
+            sync.descargar(
+                lector, modelo, campos,
+                marca=marcas.get(modelo), pendientes=pendientes.get(modelo, ()),
+            )
+            for modelo, campos in _MODELOS_IMPORT.items()
+        ]
     except GisceAuthError as exc:
         return GisceExecuteResult(ok=False, error=f"Credenciales rechazadas: {exc}")
     except GisceConnectionError as exc:
@@ -375,6 +395,16 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
     except GisceError as exc:
         return GisceExecuteResult(ok=False, error=f"Error GISCE: {exc}")
 
+    cts_remoto = desc_cts.registros
+    cups_remoto = desc_cups.registros
+    comptadors_remoto = desc_comptadors.registros
+
+    # Helper: OpenERP 5/6 devuelve False para char vacio; normalizamos a None
+    def _norm(v):
+        if v is False or v == "":
+            return None
+        return v
+
     # 2. Cargar CTs locales
     cts_local = (
         db.query(StgConcentrador)
@@ -388,7 +418,7 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
     }
     cts_local_by_id_ct = {c.id_ct: c for c in cts_local if c.id_ct is not None}
 
-    cts_remoto_ids = {ct["id"] for ct in cts_remoto}
+    cts_remoto_ids = set(desc_cts.ids_remotos)
     cts_remoto_codigos = {ct["name"] for ct in cts_remoto}
 
     # 4. Recorrer GISCE y aplicar UPDATEs
@@ -413,12 +443,6 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
                     ))
                 continue
 
-            # Helper local: normalizar False/'' a None (OpenERP 5/6)
-            def _norm(v):
-                if v is False or v == "":
-                    return None
-                return v
-
             adreca_gisce = _norm(ct.get("adreca"))
             id_externo_difiere = local.id_externo_gisce != ct["id"]
             direccion_difiere = _norm(local.direccion) != adreca_gisce
@@ -462,9 +486,13 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
         )
 
         # 6. Paquete 8g-B2 — UPSERT de CUPS desde GISCE
-        # 6.1. Cargar CUPS locales e indexarlos
+        # 6.1. Cargar CUPS locales (solo las columnas comparadas) e indexarlos
         cups_local_list = (
-            db.query(Cups)
+            db.query(
+                Cups.id, Cups.cups, Cups.id_externo_gisce, Cups.concentrador_id,
+                Cups.direccion, Cups.cp, Cups.titular, Cups.numero_contador,
+                Cups.activo,
+            )
             .filter(Cups.empresa_id == empresa_id)
             .all()
         )
@@ -475,45 +503,43 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
         }
         cups_local_by_name = {c.cups: c for c in cups_local_list}
 
-        cups_remoto_ids = {cu["id"] for cu in cups_remoto}
+        cups_remoto_ids = set(desc_cups.ids_remotos)
         cups_remoto_names = {cu["name"] for cu in cups_remoto}
 
         # 6.2. Indice de CTs locales por id_ct (para resolver et -> concentrador_id)
         # Solo CTs con id_ct poblado (los que matchean con GISCE).
         ct_by_id_ct = {c.id_ct: c for c in cts_local if c.id_ct is not None}
 
-        # 6.3. Helper para normalizar OpenERP False/'' a None
-        def _norm_cu(v):
-            if v is False or v == "":
-                return None
-            return v
-
-        # 6.4. Recorrer CUPS GISCE
+        # 6.3. Recorrer CUPS GISCE acumulando INSERTs y UPDATEs
         cups_creados = 0
         cups_actualizados = 0
         cups_sin_cambios = 0
         cups_skipped_sin_ct = 0
         cups_creados_muestra: list[GiscePreviewItem] = []
         cups_actualizados_muestra: list[GiscePreviewItem] = []
+        cups_insertar: list[dict] = []
+        cups_cambiar: list[dict] = []
 
         for cu in cups_remoto:
             cu_name = cu["name"]
             cu_id = cu["id"]
-            cu_et = _norm_cu(cu.get("et"))
+            cu_et = _norm(cu.get("et"))
 
             # Resolver concentrador local via et -> id_ct
             concentrador_local = ct_by_id_ct.get(cu_et) if cu_et else None
 
-            # Si no hay match con CT local, skip (no creamos CUPS huerfanos)
+            # Si no hay match con CT local, skip (no creamos CUPS huerfanos).
+            # Queda pendiente: la marca de agua ya lo ha pasado.
             if concentrador_local is None:
                 cups_skipped_sin_ct += 1
+                desc_cups.pendientes.append(cu_id)
                 continue
 
             # Datos GISCE normalizados
-            direccio_gisce = _norm_cu(cu.get("direccio"))
-            titular_gisce = _norm_cu(cu.get("titular"))
-            cp_gisce = _norm_cu(cu.get("dp"))
-            polissa_comptador = _norm_cu(cu.get("polissa_comptador"))
+            direccio_gisce = _norm(cu.get("direccio"))
+            titular_gisce = _norm(cu.get("titular"))
+            cp_gisce = _norm(cu.get("dp"))
+            polissa_comptador = _norm(cu.get("polissa_comptador"))
             activo_gisce = bool(cu.get("active"))
 
             # Buscar local: por id_externo (preferente) o por cups (fallback)
@@ -524,19 +550,18 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
 
             if local is None:
                 # INSERT nuevo
-                nuevo = Cups(
-                    tenant_id=cfg.tenant_id,
-                    empresa_id=empresa_id,
-                    cups=cu_name,
-                    id_externo_gisce=cu_id,
-                    concentrador_id=concentrador_local.id,
-                    direccion=direccio_gisce,
-                    cp=cp_gisce,
-                    titular=titular_gisce,
-                    numero_contador=polissa_comptador,
-                    activo=activo_gisce,
-                )
-                db.add(nuevo)
+                cups_insertar.append({
+                    "tenant_id": cfg.tenant_id,
+                    "empresa_id": empresa_id,
+                    "cups": cu_name,
+                    "id_externo_gisce": cu_id,
+                    "concentrador_id": concentrador_local.id,
+                    "direccion": direccio_gisce,
+                    "cp": cp_gisce,
+                    "titular": titular_gisce,
+                    "numero_contador": polissa_comptador,
+                    "activo": activo_gisce,
+                })
                 cups_creados += 1
                 if len(cups_creados_muestra) < 10:
                     cups_creados_muestra.append(GiscePreviewItem(
@@ -545,31 +570,25 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
                     ))
                 continue
 
-            # UPDATE: comparar y aplicar diffs
-            cambios = []
+            # UPDATE: comparar y acumular diffs
+            cambios: dict = {}
             if local.id_externo_gisce != cu_id:
-                local.id_externo_gisce = cu_id
-                cambios.append("id_externo_gisce")
+                cambios["id_externo_gisce"] = cu_id
             if local.concentrador_id != concentrador_local.id:
-                local.concentrador_id = concentrador_local.id
-                cambios.append("concentrador_id")
-            if _norm_cu(local.direccion) != direccio_gisce:
-                local.direccion = direccio_gisce
-                cambios.append("direccion")
-            if _norm_cu(local.cp) != cp_gisce:
-                local.cp = cp_gisce
-                cambios.append("cp")
-            if _norm_cu(local.titular) != titular_gisce:
-                local.titular = titular_gisce
-                cambios.append("titular")
-            if _norm_cu(local.numero_contador) != polissa_comptador:
-                local.numero_contador = polissa_comptador
-                cambios.append("numero_contador")
+                cambios["concentrador_id"] = concentrador_local.id
+            if _norm(local.direccion) != direccio_gisce:
+                cambios["direccion"] = direccio_gisce
+            if _norm(local.cp) != cp_gisce:
+                cambios["cp"] = cp_gisce
+            if _norm(local.titular) != titular_gisce:
+                cambios["titular"] = titular_gisce
+            if _norm(local.numero_contador) != polissa_comptador:
+                cambios["numero_contador"] = polissa_comptador
             if local.activo != activo_gisce:
-                local.activo = activo_gisce
-                cambios.append("activo")
+                cambios["activo"] = activo_gisce
 
             if cambios:
+                cups_cambiar.append({"id": local.id, **cambios})
                 cups_actualizados += 1
                 if len(cups_actualizados_muestra) < 10:
                     cups_actualizados_muestra.append(GiscePreviewItem(
@@ -579,7 +598,12 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
             else:
                 cups_sin_cambios += 1
 
-        # 6.5. Contar huerfanos locales (CUPS local no presentes en GISCE)
+        if cups_insertar:
+            db.execute(insert(Cups), cups_insertar)
+        if cups_cambiar:
+            db.execute(update(Cups), cups_cambiar)
+
+        # 6.4. Contar huerfanos locales (CUPS local no presentes en GISCE)
         cups_huerfanos = sum(
             1 for c in cups_local_list
             if (c.id_externo_gisce is None or c.id_externo_gisce not in cups_remoto_ids)
@@ -587,25 +611,17 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
         )
 
         # 7. Paquete 8g-C — Enlazar stg_contador.cups_id con stg_cups.id
-        # 7.1. Flush para asignar IDs a los CUPS recien creados en la sec. 6
-        #      (necesario antes de poder referenciarlos por id en contador.cups_id)
-        db.flush()
-
-        # 7.2. Re-cargar CUPS locales (incluye los recien creados con id ya asignado)
-        cups_local_list = (
-            db.query(Cups)
-            .filter(Cups.empresa_id == empresa_id)
-            .all()
-        )
+        # 7.1. Indice id GISCE -> CUPS local (incluye los recien insertados)
         cups_local_by_id_externo = {
             c.id_externo_gisce: c
-            for c in cups_local_list
-            if c.id_externo_gisce is not None
+            for c in db.query(Cups.id, Cups.cups, Cups.id_externo_gisce)
+            .filter(Cups.empresa_id == empresa_id, Cups.id_externo_gisce.isnot(None))
+            .all()
         }
 
-        # 7.3. Cargar contadores locales e indexar por meter_id
+        # 7.2. Cargar contadores locales e indexar por meter_id
         contadores_local_list = (
-            db.query(Contador)
+            db.query(Contador.id, Contador.meter_id, Contador.cups_id)
             .filter(Contador.empresa_id == empresa_id)
             .all()
         )
@@ -613,16 +629,17 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
             c.meter_id: c for c in contadores_local_list if c.meter_id
         }
 
-        # 7.4. Recorrer comptadors GISCE
+        # 7.3. Recorrer comptadors GISCE
         contadores_enlazados = 0
         contadores_actualizados = 0
         contadores_sin_cambios = 0
         contadores_sin_match_meter = 0
         contadores_sin_cups_local = 0
         contadores_enlazados_muestra: list[GiscePreviewItem] = []
+        contadores_cambiar: list[dict] = []
 
         for comp in comptadors_remoto:
-            meter_gisce = _norm_cu(comp.get("meter"))
+            meter_gisce = _norm(comp.get("meter"))
             if not meter_gisce:
                 continue
 
@@ -642,9 +659,10 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
             local_cups = cups_local_by_id_externo.get(cups_gisce_id)
             if local_cups is None:
                 contadores_sin_cups_local += 1
+                desc_comptadors.pendientes.append(comp["id"])
                 continue
 
-            # Comparar y aplicar UPDATE si difiere
+            # Comparar y acumular UPDATE si difiere
             cups_id_actual = local_contador.cups_id
             cups_id_nuevo = local_cups.id
 
@@ -652,7 +670,7 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
                 contadores_sin_cambios += 1
                 continue
 
-            local_contador.cups_id = cups_id_nuevo
+            contadores_cambiar.append({"id": local_contador.id, "cups_id": cups_id_nuevo})
             if cups_id_actual is None:
                 contadores_enlazados += 1
             else:
@@ -669,11 +687,15 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
                     detalle=detalle_link,
                 ))
 
-        # 8. Actualizar metadata de la config
+        if contadores_cambiar:
+            db.execute(update(Contador), contadores_cambiar)
+
+        # 8. Actualizar metadata de la config y marcas de agua
         ahora = ahora_madrid()
         cfg.ultimo_import = ahora
         cfg.estado = "ok"
         cfg.ultimo_error = None
+        sync.guardar_marcas(db, cfg, [desc_cts, desc_cups, desc_comptadors])
 
         db.commit()
 
@@ -686,7 +708,9 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
 
     return GisceExecuteResult(
         ok=True,
-        cts_remoto_total=len(cts_remoto),
+        incremental=incremental,
+        cts_remoto_total=len(desc_cts.ids_remotos),
+        cts_leidos=len(cts_remoto),
         cts_local_total=len(cts_local),
         cts_actualizados=cts_actualizados,
         cts_sin_cambios=cts_sin_cambios,
@@ -695,8 +719,9 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
         cts_actualizados_muestra=actualizados_muestra,
         cts_skipped_nuevos_muestra=skipped_nuevos_muestra,
         # -- Paquete 8g-B2: CUPS --
-        cups_remoto_total=len(cups_remoto),
-        cups_local_total=len(cups_local_list),
+        cups_remoto_total=len(desc_cups.ids_remotos),
+        cups_leidos=len(cups_remoto),
+        cups_local_total=len(cups_local_list) + cups_creados,
         cups_creados=cups_creados,
         cups_actualizados=cups_actualizados,
         cups_sin_cambios=cups_sin_cambios,
@@ -705,7 +730,8 @@ def execute_import(db: Session, empresa_id: int) -> "GisceExecuteResult":
         cups_creados_muestra=cups_creados_muestra,
         cups_actualizados_muestra=cups_actualizados_muestra,
         # -- Paquete 8g-C: enlace contador <-> CUPS --
-        contadores_remoto_total=len(comptadors_remoto),
+        contadores_remoto_total=len(desc_comptadors.ids_remotos),
+        contadores_leidos=len(comptadors_remoto),
         contadores_local_total=len(contadores_local_list),
         contadores_enlazados=contadores_enlazados,
         contadores_actualizados=contadores_actualizados,
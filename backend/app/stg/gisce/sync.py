@@ -0,0 +1,188 @@
+# app/stg/gisce/sync.py
+# pyright: reportMissingImports=false, reportAttributeAccessIssue=false
+"""
+Lectura de GISCE-ERP por trozos, en paralelo e incremental.
+
+`GisceClient.search_read` hace un search de todos los ids y un único
+read() con todos: con 100k+ CUPS es un XML enorme, lento de parsear y que
+acaba en timeout. Aquí:
+
+  - `LectorGisce` trocea los ids en bloques de GISCE_SYNC_TROZO y los lee
+    con un pool de GISCE_SYNC_HILOS hilos, cada uno con su propio proxy
+    XML-RPC (GisceClient.clonar; el login se hace una sola vez).
+  - `descargar` con marca de agua pide solo los registros creados o
+    modificados desde la marca (write_date/create_date >= marca, con >=
+    para no perder los escritos en el mismo segundo; releerlos es
+    inocuo porque el import es idempotente). Los ids de todo el modelo se
+    piden igualmente (solo ids, barato) para el recuento de huérfanos.
+  - Las marcas se guardan por empresa y modelo en stg_gisce_sync_marca y
+    se escriben en la misma transacción que los cambios (services.execute_import).
+  - Los registros leídos que el import no pudo aplicar (CUPS sin CT local,
+    contadores sin CUPS local) quedan en ids_pendientes de su marca y se
+    vuelven a pedir en la siguiente incremental aunque no hayan cambiado:
+    la marca ya ha pasado por encima de ellos.
+"""
+from __future__ import annotations
+
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass, field
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.core.datetime_utils import ahora_madrid
+from app.stg.models import StgGisceConfig, StgGisceSyncMarca
+
+from .client import GisceClient
+
+
+# Campos de auditoría de OpenERP que se añaden a cada lectura.
+CAMPOS_FECHA = ["write_date", "create_date"]
+
+
+class LectorGisce:
+    """Lectura por trozos de ids con un pool de hilos, un proxy por hilo."""
+
+    def __init__(
+        self,
+        cliente: GisceClient,
+        *,
+        trozo: Optional[int] = None,
+        hilos: Optional[int] = None,
+    ) -> None:
+        settings = get_settings()
+        self.cliente = cliente
+        self.trozo = max(1, trozo or settings.GISCE_SYNC_TROZO)
+        self.hilos = max(1, hilos or settings.GISCE_SYNC_HILOS)
+        self._local = threading.local()
+
+    def _cliente_hilo(self) -> GisceClient:
+        cli = getattr(self._local, "cliente", None)
+        if cli is None:
+            cli = self.cliente.clonar()
+            self._local.cliente = cli
+        return cli
+
+    def ids(self, modelo: str, domain: Optional[list] = None) -> List[int]:
+        return list(self.cliente.search(modelo, domain=domain))
+
+    def leer_ids(self, modelo: str, ids: List[int], fields: List[str]) -> List[dict]:
+        """read() por trozos; devuelve los registros en el orden de `ids`."""
+        if not ids:
+            return []
+        # Login antes de repartir: los clones heredan el uid.
+        self.cliente._ensure_uid()
+        trozos = [ids[i:i + self.trozo] for i in range(0, len(ids), self.trozo)]
+        if self.hilos == 1 or len(trozos) == 1:
+            partes = [self.cliente.read(modelo, t, fields=fields) for t in trozos]
+        else:
+            with ThreadPoolExecutor(
+                max_workers=min(self.hilos, len(trozos)),
+                thread_name_prefix="gisce-read",
+            ) as pool:
+                partes = list(pool.map(
+                    lambda t: self._cliente_hilo().read(modelo, t, fields=fields),
+                    trozos,
+                ))
+        return [r for parte in partes for r in parte]
+
+    def leer(self, modelo: str, fields: List[str], domain: Optional[list] = None) -> List[dict]:
+        """search_read por trozos."""
+        return self.leer_ids(modelo, self.ids(modelo, domain), fields)
+
+
+@dataclass
+class Descarga:
+    modelo:      str
+    registros:   List[dict]
+    ids_remotos: List[int]       # todos los ids del modelo en GISCE
+    incremental: bool
+    marca:       Optional[str]   # nueva marca de agua tras esta lectura
+    # ids leídos que el import no pudo aplicar; los rellena execute_import.
+    pendientes:  List[int] = field(default_factory=list)
+
+
+def dominio_desde(marca: str) -> list:
+    return ["|", ("write_date", ">=", marca), ("create_date", ">=", marca)]
+
+
+def _fecha_registro(r: dict) -> Optional[str]:
+    # OpenERP devuelve False en los campos vacíos.
+    fechas = [r.get(c) for c in CAMPOS_FECHA if r.get(c)]
+    return max(fechas) if fechas else None
+
+
+def descargar(
+    lector: LectorGisce,
+    modelo: str,
+    fields: List[str],
+    *,
+    marca: Optional[str] = None,
+    pendientes: Iterable[int] = (),
+) -> Descarga:
+    """
+    Registros del modelo (todos, o desde `marca` si se indica). En
+    incremental se añaden los `pendientes` de la sincronización anterior
+    que sigan existiendo en GISCE.
+    """
+    ids_remotos = lector.ids(modelo)
+    if marca is None:
+        ids = ids_remotos
+    else:
+        ids = lector.ids(modelo, dominio_desde(marca))
+        remotos, leidos = set(ids_remotos), set(ids)
+        ids += [i for i in pendientes if i in remotos and i not in leidos]
+    registros = lector.leer_ids(modelo, ids, list(fields) + CAMPOS_FECHA)
+    fechas = [f for f in map(_fecha_registro, registros) if f]
+    nueva = max(fechas + ([marca] if marca else []), default=None)
+    return Descarga(
+        modelo=modelo,
+        registros=registros,
+        ids_remotos=ids_remotos,
+        incremental=marca is not None,
+        marca=nueva,
+    )
+
+
+# ── Marcas de agua ───────────────────────────────────────────────────────────
+
+def leer_marcas(db: Session, empresa_id: int) -> Dict[str, Optional[str]]:
+    rows = (
+        db.query(StgGisceSyncMarca.modelo, StgGisceSyncMarca.ultimo_write_date)
+        .filter(StgGisceSyncMarca.empresa_id == empresa_id)
+        .all()
+    )
+    return {modelo: marca for modelo, marca in rows}
+
+
+def leer_pendientes(db: Session, empresa_id: int) -> Dict[str, List[int]]:
+    rows = (
+        db.query(StgGisceSyncMarca.modelo, StgGisceSyncMarca.ids_pendientes)
+        .filter(StgGisceSyncMarca.empresa_id == empresa_id)
+        .all()
+    )
+    return {modelo: ids or [] for modelo, ids in rows}
+
+
+def guardar_marcas(db: Session, cfg: StgGisceConfig, descargas: List[Descarga]) -> None:
+    """Actualiza las marcas de agua. No hace commit (va con el import)."""
+    existentes = {
+        m.modelo: m
+        for m in db.query(StgGisceSyncMarca)
+        .filter(StgGisceSyncMarca.empresa_id == cfg.empresa_id)
+        .all()
+    }
+    ahora = ahora_madrid()
+    for d in descargas:
+        m = existentes.get(d.modelo)
+        if m is None:
+            m = StgGisceSyncMarca(
+                tenant_id=cfg.tenant_id, empresa_id=cfg.empresa_id, modelo=d.modelo,
+            )
+            db.add(m)
+        m.ultimo_write_date = d.marca
+        m.ultima_sync_at = ahora
+        m.registros_ultima_sync = len(d.registros)
+        m.ids_pendientes = sorted(set(d.pendientes))
@@ -15,7 +15,7 @@ igual que el resto de tablas de la app.
 """
 from sqlalchemy import (
     BigInteger, Boolean, Column, Date, DateTime, Float, ForeignKey,
-    Integer, JSON, String, Text, UniqueConstraint,
+    Index, Integer, JSON, String, Text, UniqueConstraint,
 )
 from sqlalchemy.dialects.postgresql import JSONB
 from sqlalchemy.orm import relationship
@@ -287,6 +287,8 @@ class FicheroRecibido(TimestampMixin, Base):
     parsed_at  = Column(DateTime, nullable=True)
     # Mensaje de error si falló el parseo (Paquete 6). NULL si OK o aún no intentado.
     parse_error = Column(Text, nullable=True)
+    # Tiempos por etapa del último parseo (ver app/core/pipeline_timing.py).
+    parse_timings = Column(JSONB, nullable=True)
 
     solicitud  = relationship("SolicitudFichero", lazy="joined")
     cups       = relationship("Cups", lazy="joined")
@@ -354,25 +356,133 @@ class Medida(Base):
 
     Diseño deliberadamente genérico (JSONB en `datos`) para soportar
     cualquier tipo de informe sin migración por cada tipo nuevo.
+
+    En PostgreSQL la tabla está particionada por mes de `timestamp_dato`
+    (RANGE, una partición `stg_medida_pYYYYMM` por mes más
+    `stg_medida_default` para NULL y meses sin partición). La DDL la llevan
+    la migración `stg_medida_particionada` y app/stg/particiones.py, no este
+    modelo: una tabla particionada no admite PRIMARY KEY (id) sin la clave
+    de partición, así que en BD `id` es solo índice (valores de la secuencia).
+    Filtrar por rango de `timestamp_dato` permite podar particiones.
     """
     __tablename__ = "stg_medida"
 
     id          = Column(BigInteger, primary_key=True)
-    tenant_id   = Column(Integer, ForeignKey("tenants.id"), nullable=False, index=True)
-    empresa_id  = Column(Integer, ForeignKey("empresas.id"), nullable=False, index=True)
+    tenant_id   = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    empresa_id  = Column(Integer, ForeignKey("empresas.id"), nullable=False)
     fichero_id  = Column(Integer, ForeignKey("stg_fichero_recibido.id"), nullable=False, index=True)
 
     concentrador_id = Column(Integer, ForeignKey("stg_concentrador.id"), nullable=True, index=True)
-    contador_id     = Column(Integer, ForeignKey("stg_contador.id"), nullable=True, index=True)
+    contador_id     = Column(Integer, ForeignKey("stg_contador.id"), nullable=True)
 
-    tipo_fichero       = Column(String(10), nullable=False, index=True)
-    timestamp_dato     = Column(DateTime, nullable=True, index=True)
+    tipo_fichero       = Column(String(10), nullable=False)
+    timestamp_dato     = Column(DateTime, nullable=True)
     concentrador_externo_id = Column(String(50), nullable=True)
-    meter_id           = Column(String(50), nullable=True, index=True)
+    meter_id           = Column(String(50), nullable=True)
 
     datos      = Column(JSONB, nullable=True)
     created_at = Column(DateTime, nullable=False, default=ahora_madrid)
 
+    __table_args__ = (
+        # Curva de un contador paginada por cursor (timestamp_dato, id).
+        Index(
+            "ix_stg_medida_curva_keyset",
+            "empresa_id", "meter_id", "tipo_fichero", "timestamp_dato", "id",
+        ),
+        # Eventos / medidas de una empresa por tipo en una ventana temporal
+        # (listar_eventos_humanizados sin contador).
+        Index(
+            "ix_stg_medida_empresa_tipo_ts",
+            "empresa_id", "tipo_fichero", "timestamp_dato", "id",
+        ),
+        Index("ix_stg_medida_contador_ts", "contador_id", "timestamp_dato"),
+    )
+
+
+# ---------------------------------------------------------------------------
+# 7b) MedidaDiaria / MedidaMensual  -- agregados por contador de la curva S02
+# ---------------------------------------------------------------------------
+class MedidaDiaria(Base):
+    """
+    Totales diarios por contador calculados a partir de la curva horaria S02
+    (ver app/stg/agregados.py). Se recalculan al parsear cada fichero S02,
+    así que las lecturas de curva, pérdidas o enlaces ERP no tienen que
+    sumar el JSONB de stg_medida hora a hora.
+
+    `fecha` es el día al que pertenece la energía: la lectura con
+    timestamp 00:00 es la hora 24 del día anterior.
+
+    Calidad:
+      horas_con_dato  -> horas distintas con lectura (23/24/25 según el día)
+      horas_esperadas -> horas del día en Europe/Madrid
+      lecturas_bc_ok / lecturas_bc_incidencia -> lecturas con bc == 0 / != 0
+
+    Sobreviven al archivado de particiones de stg_medida.
+    """
+    __tablename__ = "stg_medida_diaria"
+
+    id          = Column(BigInteger, primary_key=True)
+    tenant_id   = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    empresa_id  = Column(Integer, ForeignKey("empresas.id"), nullable=False)
+    meter_id    = Column(String(50), nullable=False)
+    contador_id     = Column(Integer, ForeignKey("stg_contador.id"), nullable=True)
+    concentrador_id = Column(Integer, ForeignKey("stg_concentrador.id"), nullable=True)
+    fecha       = Column(Date, nullable=False)
+
+    ai = Column(Float, nullable=False, default=0)
+    ae = Column(Float, nullable=False, default=0)
+    r1 = Column(Float, nullable=False, default=0)
+    r2 = Column(Float, nullable=False, default=0)
+    r3 = Column(Float, nullable=False, default=0)
+    r4 = Column(Float, nullable=False, default=0)
+
+    horas_con_dato         = Column(Integer, nullable=False, default=0)
+    horas_esperadas        = Column(Integer, nullable=False, default=24)
+    lecturas_bc_ok         = Column(Integer, nullable=False, default=0)
+    lecturas_bc_incidencia = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, nullable=False, default=ahora_madrid, onupdate=ahora_madrid)
+
+    __table_args__ = (
+        UniqueConstraint("empresa_id", "meter_id", "fecha", name="uq_stg_medida_diaria_contador_fecha"),
+        Index("ix_stg_medida_diaria_concentrador_fecha", "empresa_id", "concentrador_id", "fecha"),
+    )
+
+
+class MedidaMensual(Base):
+    """
+    Totales mensuales por contador, sumados desde stg_medida_diaria para
+    los meses tocados por cada recálculo. Mismas magnitudes y contadores de
+    calidad que el diario, más `dias_con_dato`.
+    """
+    __tablename__ = "stg_medida_mensual"
+
+    id          = Column(BigInteger, primary_key=True)
+    tenant_id   = Column(Integer, ForeignKey("tenants.id"), nullable=False)
+    empresa_id  = Column(Integer, ForeignKey("empresas.id"), nullable=False)
+    meter_id    = Column(String(50), nullable=False)
+    anio        = Column(Integer, nullable=False)
+    mes         = Column(Integer, nullable=False)
+
+    ai = Column(Float, nullable=False, default=0)
+    ae = Column(Float, nullable=False, default=0)
+    r1 = Column(Float, nullable=False, default=0)
+    r2 = Column(Float, nullable=False, default=0)
+    r3 = Column(Float, nullable=False, default=0)
+    r4 = Column(Float, nullable=False, default=0)
+
+    dias_con_dato          = Column(Integer, nullable=False, default=0)
+    horas_con_dato         = Column(Integer, nullable=False, default=0)
+    horas_esperadas        = Column(Integer, nullable=False, default=0)
+    lecturas_bc_ok         = Column(Integer, nullable=False, default=0)
+    lecturas_bc_incidencia = Column(Integer, nullable=False, default=0)
+
+    updated_at = Column(DateTime, nullable=False, default=ahora_madrid, onupdate=ahora_madrid)
+
+    __table_args__ = (
+        UniqueConstraint("empresa_id", "meter_id", "anio", "mes", name="uq_stg_medida_mensual_contador_mes"),
+    )
+
 
 
 # ---------------------------------------------------------------------------
@@ -457,6 +567,36 @@ class StgGisceConfig(TimestampMixin, Base):
     )
 
 
+class StgGisceSyncMarca(Base):
+    """
+    Marca de agua de la sincronización incremental con GISCE, una por
+    empresa y modelo XML-RPC (giscedata.cts, giscedata.cups.ps, ...).
+
+    ultimo_write_date es el mayor write_date/create_date leído, tal cual lo
+    devuelve OpenERP ("YYYY-MM-DD HH:MM:SS"). La siguiente sincronización
+    pide los registros con fecha >= marca (ver app/stg/gisce/sync.py).
+
+    ids_pendientes: ids GISCE leídos que el import no pudo aplicar (p. ej.
+    CUPS sin CT local). Se vuelven a pedir en la siguiente sincronización
+    aunque su fecha quede por debajo de la marca.
+    """
+    __tablename__ = "stg_gisce_sync_marca"
+
+    id          = Column(Integer, primary_key=True)
+    tenant_id   = Column(Integer, ForeignKey("tenants.id"), nullable=False, index=True)
+    empresa_id  = Column(Integer, ForeignKey("empresas.id"), nullable=False)
+    modelo      = Column(String(64), nullable=False)
+
+    ultimo_write_date     = Column(String(26), nullable=True)
+    ultima_sync_at        = Column(DateTime, nullable=False, default=ahora_madrid)
+    registros_ultima_sync = Column(Integer, nullable=False, default=0)
+    ids_pendientes        = Column(JSONB, nullable=True)
+
+    __table_args__ = (
+        UniqueConstraint("empresa_id", "modelo", name="uq_stg_gisce_sync_marca_empresa_modelo"),
+    )
+
+
 # ---------------------------------------------------------------------------
 # Constantes para tipo_dispositivo en stg_concentrador (Paquete 8f-tipo-dispositivo)
 # ---------------------------------------------------------------------------
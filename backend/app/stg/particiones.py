@@ -0,0 +1,235 @@
+# app/stg/particiones.py
+# pyright: reportMissingImports=false
+"""
+Mantenimiento de las particiones mensuales de `stg_medida` (PostgreSQL).
+
+La tabla está particionada por RANGE de `timestamp_dato`, un mes por
+partición (`stg_medida_p202601` = [2026-01-01, 2026-02-01)), más
+`stg_medida_default` para timestamps NULL y meses sin partición. Ver la
+migración `stg_medida_particionada`.
+
+Job diario (`mantenimiento_particiones`, scheduler de comunicaciones):
+
+  1. `asegurar_particiones`: crea las particiones del mes actual y de los
+     STG_MEDIDA_PARTICIONES_ADELANTE siguientes, y las de cualquier mes que
+     haya acabado en la default (ficheros antiguos reprocesados). Si la
+     default tiene filas de ese mes se mueven en la misma transacción: se
+     separa la default, se crea la partición, se pasan las filas y se
+     vuelve a adjuntar.
+  2. `archivar_particiones`: con STG_MEDIDA_RETENCION_MESES > 0, las
+     particiones más antiguas que la ventana se separan (DETACH con
+     lock_timeout: si hay consultas largas se reintenta al día siguiente),
+     se vuelcan con COPY a `<archivo_dir>/stg_medida_pYYYYMM.csv.gz` y se
+     borran. Una partición separada pero sin archivar (fallo a mitad) se
+     recoge en la siguiente ejecución.
+
+Los parsers no crean particiones: si llega un mes sin partición las filas
+caen en la default y el job siguiente las coloca.
+"""
+from __future__ import annotations
+
+import gzip
+import logging
+import os
+import re
+from datetime import date
+from pathlib import Path
+from typing import Dict, Iterable, List, Optional
+
+from sqlalchemy import text
+from sqlalchemy.engine import Connection, Engine
+
+from app.core.config import get_settings
+from app.core.datetime_utils import ahora_madrid
+
+
+logger = logging.getLogger(__name__)
+
+TABLA = "stg_medida"
+DEFAULT = "stg_medida_default"
+_RE_PARTICION = re.compile(r"^stg_medida_p(\d{4})(\d{2})$")
+# Tiempo máximo esperando el lock del padre en DDL (DETACH/CREATE).
+_LOCK_TIMEOUT = "5s"
+
+
+# ── Calendario de particiones (puro) ────────────────────────────────────────
+
+def inicio_mes(d: date) -> date:
+    return d.replace(day=1)
+
+
+def sumar_meses(d: date, n: int) -> date:
+    total = d.year * 12 + (d.month - 1) + n
+    return date(total // 12, total % 12 + 1, 1)
+
+
+def nombre_particion(mes: date) -> str:
+    return f"{TABLA}_p{mes:%Y%m}"
+
+
+def mes_de_particion(nombre: str) -> Optional[date]:
+    m = _RE_PARTICION.match(nombre)
+    return date(int(m.group(1)), int(m.group(2)), 1) if m else None
+
+
+def meses_a_crear(existentes: Iterable[date], *, hoy: date, adelante: int) -> List[date]:
+    """Mes actual y `adelante` siguientes que aún no tienen partición."""
+    ya = set(existentes)
+    actual = inicio_mes(hoy)
+    return [m for m in (sumar_meses(actual, i) for i in range(adelante + 1)) if m not in ya]
+
+
+def meses_a_archivar(existentes: Iterable[date], *, hoy: date, retencion_meses: int) -> List[date]:
+    """
+    Particiones enteramente anteriores a la ventana de retención. Con
+    retención 12 en 2026-10 se conservan 2025-10 … 2026-10 (12 meses
+    completos + el actual) y se archiva hasta 2025-09.
+    """
+    if retencion_meses <= 0:
+        return []
+    limite = sumar_meses(inicio_mes(hoy), -retencion_meses)
+    return sorted(m for m in existentes if m < limite)
+
+
+# ── Catálogo ─────────────────────────────────────────────────────────────────
+
+def particiones_adjuntas(conn: Connection) -> Dict[date, str]:
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_inherits i "
+        "JOIN pg_class c ON c.oid = i.inhrelid "
+        "JOIN pg_class p ON p.oid = i.inhparent "
+        "WHERE p.relname = :tabla"
+    ), {"tabla": TABLA}).scalars().all()
+    out: Dict[date, str] = {}
+    for nombre in rows:
+        mes = mes_de_particion(nombre)
+        if mes is not None:
+            out[mes] = nombre
+    return out
+
+
+def _particiones_sueltas(conn: Connection) -> List[str]:
+    """Tablas stg_medida_pYYYYMM que existen pero no están adjuntas."""
+    rows = conn.execute(text(
+        "SELECT c.relname FROM pg_class c "
+        "WHERE c.relkind = 'r' AND c.relname ~ '^stg_medida_p[0-9]{6}$' "
+        "AND NOT c.relispartition"
+    )).scalars().all()
+    return sorted(rows)
+
+
+def _meses_en_default(conn: Connection) -> List[date]:
+    rows = conn.execute(text(
+        f"SELECT DISTINCT date_trunc('month', timestamp_dato)::date FROM {DEFAULT} "
+        "WHERE timestamp_dato IS NOT NULL"
+    )).scalars().all()
+    return sorted(rows)
+
+
+# ── Crear ────────────────────────────────────────────────────────────────────
+
+def _crear_particion(conn: Connection, mes: date, *, mover_desde_default: bool) -> None:
+    nombre = nombre_particion(mes)
+    desde, hasta = mes.isoformat(), sumar_meses(mes, 1).isoformat()
+    with conn.begin():
+        conn.exec_driver_sql(f"SET LOCAL lock_timeout = '{_LOCK_TIMEOUT}'")
+        if not mover_desde_default:
+            conn.exec_driver_sql(
+                f"CREATE TABLE IF NOT EXISTS {nombre} PARTITION OF {TABLA} "
+                f"FOR VALUES FROM ('{desde}') TO ('{hasta}')"
+            )
+            return
+        # PostgreSQL no deja crear la partición mientras la default tenga
+        # filas de ese rango: se separa la default durante el movimiento.
+        conn.exec_driver_sql(f"ALTER TABLE {TABLA} DETACH PARTITION {DEFAULT}")
+        conn.exec_driver_sql(
+            f"CREATE TABLE {nombre} PARTITION OF {TABLA} "
+            f"FOR VALUES FROM ('{desde}') TO ('{hasta}')"
+        )
+        rango = f"timestamp_dato >= '{desde}' AND timestamp_dato < '{hasta}'"
+        conn.exec_driver_sql(f"INSERT INTO {TABLA} SELECT * FROM {DEFAULT} WHERE {rango}")
+        conn.exec_driver_sql(f"DELETE FROM {DEFAULT} WHERE {rango}")
+        conn.exec_driver_sql(f"ALTER TABLE {TABLA} ATTACH PARTITION {DEFAULT} DEFAULT")
+
+
+def asegurar_particiones(engine: Engine, *, hoy: Optional[date] = None) -> List[str]:
+    """Crea las particiones que falten. Devuelve los nombres creados."""
+    hoy = hoy or ahora_madrid().date()
+    adelante = get_settings().STG_MEDIDA_PARTICIONES_ADELANTE
+    creadas: List[str] = []
+    with engine.connect() as conn:
+        existentes = particiones_adjuntas(conn)
+        conn.rollback()
+        en_default = [m for m in _meses_en_default(conn) if m not in existentes]
+        conn.rollback()
+
+        for mes in meses_a_crear(existentes, hoy=hoy, adelante=adelante):
+            if mes not in en_default:
+                _crear_particion(conn, mes, mover_desde_default=False)
+                creadas.append(nombre_particion(mes))
+        for mes in en_default:
+            _crear_particion(conn, mes, mover_desde_default=True)
+            creadas.append(nombre_particion(mes))
+    if creadas:
+        logger.info("[stg_medida] particiones creadas: %s", ", ".join(creadas))
+    return creadas
+
+
+# ── Archivar ─────────────────────────────────────────────────────────────────
+
+def _volcar_y_borrar(conn: Connection, nombre: str, archivo_dir: Path) -> Dict[str, object]:
+    """COPY de una partición ya separada a CSV gzip y DROP. Idempotente."""
+    archivo_dir.mkdir(parents=True, exist_ok=True)
+    destino = archivo_dir / f"{nombre}.csv.gz"
+    tmp = destino.with_suffix(".gz.tmp")
+    raw = conn.connection.dbapi_connection
+    with gzip.open(tmp, "wb") as gz, raw.cursor() as cur:
+        cur.copy_expert(f"COPY {nombre} TO STDOUT WITH (FORMAT csv, HEADER)", gz)
+        filas = cur.rowcount
+    with open(tmp, "rb") as fh:
+        os.fsync(fh.fileno())
+    os.replace(tmp, destino)
+    conn.exec_driver_sql(f"DROP TABLE {nombre}")
+    return {"particion": nombre, "filas": filas, "archivo": str(destino)}
+
+
+def archivar_particiones(engine: Engine, *, hoy: Optional[date] = None) -> List[Dict[str, object]]:
+    settings = get_settings()
+    retencion = settings.STG_MEDIDA_RETENCION_MESES
+    archivo_dir = Path(settings.STG_MEDIDA_ARCHIVO_DIR)
+    hoy = hoy or ahora_madrid().date()
+    archivadas: List[Dict[str, object]] = []
+
+    with engine.connect().execution_options(isolation_level="AUTOCOMMIT") as conn:
+        # Restos de una ejecución anterior que separó pero no llegó a volcar.
+        for nombre in _particiones_sueltas(conn):
+            mes = mes_de_particion(nombre)
+            if mes is not None and mes in meses_a_archivar([mes], hoy=hoy, retencion_meses=retencion):
+                archivadas.append(_volcar_y_borrar(conn, nombre, archivo_dir))
+
+        existentes = particiones_adjuntas(conn)
+        for mes in meses_a_archivar(existentes, hoy=hoy, retencion_meses=retencion):
+            nombre = existentes[mes]
+            try:
+                conn.exec_driver_sql(f"SET lock_timeout = '{_LOCK_TIMEOUT}'")
+                conn.exec_driver_sql(f"ALTER TABLE {TABLA} DETACH PARTITION {nombre}")
+            except Exception as e:
+                logger.warning("[stg_medida] no se pudo separar %s (se reintentará): %s", nombre, e)
+                break
+            finally:
+                conn.exec_driver_sql("RESET lock_timeout")
+            archivadas.append(_volcar_y_borrar(conn, nombre, archivo_dir))
+
+    for a in archivadas:
+        logger.info("[stg_medida] archivada %s (%s filas) en %s", a["particion"], a["filas"], a["archivo"])
+    return archivadas
+
+
+def mantenimiento_particiones(engine: Engine) -> Dict[str, object]:
+    """Función llamada por el scheduler. No hace nada fuera de PostgreSQL."""
+    if engine.dialect.name != "postgresql":
+        return {"creadas": [], "archivadas": []}
+    return {
+        "creadas": asegurar_particiones(engine),
+        "archivadas": archivar_particiones(engine),
+    }
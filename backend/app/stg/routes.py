@@ -8,7 +8,7 @@ permisos multi-empresa del usuario.
 """
 from __future__ import annotations
 
-from datetime import datetime
+from datetime import date, datetime
 from io import BytesIO
 from typing import Optional
 
@@ -22,7 +22,9 @@ from openpyxl.styles import Font, PatternFill
 from app.core.auth import get_current_user
 from app.core.datetime_utils import ahora_madrid
 from app.core.db import get_db
-from app.stg import schemas, services
+from app.core.exports import export_response
+from app.core.perf import perf_budget
+from app.stg import agregados, schemas, services
 from app.stg.models import (
     StgConcentrador,
     Cups,
@@ -461,7 +463,6 @@ def descargar_ficheros(
     try:
         return services.descargar_ficheros_nuevos(db, user, empresa_id, limite=limite)
     except ValueError as e:
-        from fastapi import HTTPException
         raise HTTPException(status_code=400, detail=str(e))
 
 
@@ -471,6 +472,10 @@ def descargar_ficheros(
 @router.post("/parsear/{fichero_id}", response_model=schemas.ParseoResponse)
 def parsear_fichero(
     fichero_id: int,
+    perfil: bool = Query(
+        False,
+        description="Guarda un perfil cProfile del parseo en PIPELINE_PROFILE_DIR (solo superusuario)",
+    ),
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
@@ -481,11 +486,16 @@ def parsear_fichero(
     - G97 marcado como pendiente (parser propio en futuro paquete).
     - Idempotente: si el fichero ya estaba parsed, se borran las medidas previas
       y se re-parsea.
+    - Devuelve los tiempos por etapa en `tiempos`.
     """
+    if perfil and not bool(getattr(user, "is_superuser", False)):
+        raise HTTPException(
+            status_code=status.HTTP_403_FORBIDDEN,
+            detail="Solo un superusuario puede pedir el perfil del parseo",
+        )
     try:
-        return services.parsear_fichero(db, user, fichero_id)
+        return services.parsear_fichero(db, user, fichero_id, perfil=perfil)
     except ValueError as e:
-        from fastapi import HTTPException
         raise HTTPException(status_code=404, detail=str(e))
 
 
@@ -503,7 +513,6 @@ def parsear_pendientes(
     try:
         return services.parsear_pendientes(db, user, empresa_id, limite=limite)
     except ValueError as e:
-        from fastapi import HTTPException
         raise HTTPException(status_code=400, detail=str(e))
 
 
@@ -709,6 +718,8 @@ def obtener_curva_endpoint(
     fecha_hasta: Optional[datetime] = Query(None, description="Curva hasta esta fecha (inclusive)"),
     offset: int = Query(0, ge=0, description="Offset de paginación"),
     limite: int = Query(200, ge=1, le=2000, description="Tamaño de página (def. 200, max 2000)"),
+    cursor: Optional[str] = Query(None, description="Cursor devuelto en next_cursor; si se envía, se ignora offset"),
+    count: str = Query("exact", pattern="^(exact|estimate|none)$", description="Modo de conteo del total"),
     db: Session = Depends(get_db),
     user: User = Depends(get_current_user),
 ):
@@ -716,7 +727,8 @@ def obtener_curva_endpoint(
     Curva (S02 por defecto) de un contador, leída de stg_medida.
     Cada fila: timestamp + magnitudes del JSONB (ai, ae, r1..r4, status, season, bc).
     Valores en kWh por tramo (sin transformar). Filtra por empresa + meter_id + tipo + rango.
-    Paginación offset/limite (mismo patrón que /eventos y /contadores-detectados).
+    Paginación offset/limite (mismo patrón que /eventos y /contadores-detectados),
+    o por cursor (next_cursor) para recorrer curvas largas sin OFFSET.
     """
     return services.obtener_curva(
         db=db,
@@ -728,9 +740,109 @@ def obtener_curva_endpoint(
         fecha_hasta=fecha_hasta,
         offset=offset,
         limite=limite,
+        cursor=cursor,
+        count=count,
     )
 
 
+@router.get("/curva/{meter_id}/export")
+def exportar_curva_endpoint(
+    meter_id: str,
+    empresa_id: int = Query(..., description="ID de la empresa"),
+    tipo_fichero: str = Query("S02", description="Tipo de fichero de curva (S02 por defecto)"),
+    fecha_desde: Optional[datetime] = Query(None, description="Curva desde esta fecha (inclusive)"),
+    fecha_hasta: Optional[datetime] = Query(None, description="Curva hasta esta fecha (inclusive)"),
+    formato: str = Query("csv", pattern="^(csv|xlsx)$"),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """
+    Curva completa de un contador en CSV o XLSX, en streaming y sin el
+    límite de 2000 filas de /curva/{meter_id}.
+    """
+    rows = services.iter_curva_export(
+        db=db,
+        user=user,
+        empresa_id=empresa_id,
+        meter_id=meter_id,
+        tipo_fichero=tipo_fichero,
+        fecha_desde=fecha_desde,
+        fecha_hasta=fecha_hasta,
+    )
+    return export_response(
+        formato=formato,
+        filename_base=f"curva_{tipo_fichero}_{meter_id}",
+        headers=services.CURVA_EXPORT_COLUMNS,
+        rows=rows,
+        sheet_title=f"Curva {tipo_fichero}",
+    )
+
+
+
+# ---------------------------------------------------------------------------
+# Agregados diarios / mensuales de la curva S02 (stg_medida_diaria/mensual)
+# ---------------------------------------------------------------------------
+@router.get("/agregados/contador/{meter_id}/diario")
+@perf_budget(queries=4)
+def agregados_diarios_contador(
+    meter_id: str,
+    empresa_id: int = Query(..., description="ID de la empresa"),
+    fecha_desde: Optional[date] = Query(None, description="Desde (inclusive); por defecto hace un año"),
+    fecha_hasta: Optional[date] = Query(None, description="Hasta (inclusive); por defecto hoy"),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """
+    Totales diarios (kWh ai/ae/r1..r4), horas con dato y lecturas por
+    calidad (bc) de un contador. Máximo dos años por llamada.
+    """
+    try:
+        return agregados.serie_diaria_contador(
+            db, user, empresa_id=empresa_id, meter_id=meter_id,
+            fecha_desde=fecha_desde, fecha_hasta=fecha_hasta,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
+@router.get("/agregados/contador/{meter_id}/mensual")
+@perf_budget(queries=4)
+def agregados_mensuales_contador(
+    meter_id: str,
+    empresa_id: int = Query(..., description="ID de la empresa"),
+    anio: Optional[int] = Query(None, ge=2000, le=2100, description="Solo este año"),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Totales mensuales de un contador (todos los meses o los de `anio`)."""
+    return agregados.serie_mensual_contador(
+        db, user, empresa_id=empresa_id, meter_id=meter_id, anio=anio,
+    )
+
+
+@router.get("/agregados/concentrador/{concentrador_id}/diario")
+@perf_budget(queries=4)
+def agregados_diarios_concentrador(
+    concentrador_id: int,
+    empresa_id: int = Query(..., description="ID de la empresa"),
+    fecha_desde: Optional[date] = Query(None, description="Desde (inclusive); por defecto hace un año"),
+    fecha_hasta: Optional[date] = Query(None, description="Hasta (inclusive); por defecto hoy"),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """
+    Suma diaria de los contadores de un concentrador (según el concentrador
+    de su última lectura de cada día), con el número de contadores.
+    """
+    try:
+        return agregados.serie_diaria_concentrador(
+            db, user, empresa_id=empresa_id, concentrador_id=concentrador_id,
+            fecha_desde=fecha_desde, fecha_hasta=fecha_hasta,
+        )
+    except ValueError as e:
+        raise HTTPException(status_code=400, detail=str(e))
+
+
 # ---------------------------------------------------------------------------
 # Import Config — Paquete 8e-2a
 # ---------------------------------------------------------------------------
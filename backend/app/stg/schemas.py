@@ -356,7 +356,12 @@ class ParseoResponse(BaseModel):
     medidas_insertadas: int = 0
     concentradores_upsert: int = 0
     contadores_upsert: int = 0
+    # Solo S02: filas de stg_medida_diaria / stg_medida_mensual recalculadas.
+    agregados_dias: int = 0
+    agregados_meses: int = 0
     error: Optional[str] = None
+    # Tiempos por etapa del parseo (ver app/core/pipeline_timing.py).
+    tiempos: Optional[Dict[str, Any]] = None
 
 
 class ParseoPendientesResponse(BaseModel):
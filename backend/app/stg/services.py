@@ -25,7 +25,11 @@ from app.core.permissions import (
     get_allowed_empresa_ids,
 )
 from app.core.crypto import cifrar_password, descifrar_password
+from app.core.exports import iter_query
+from app.core.pagination import count_rows, keyset_fetch, parse_cursor_datetime
 from app.core.datetime_utils import ahora_madrid
+from app.core.pipeline_timing import etapa, medir_pipeline
+from app.stg import agregados
 from app.stg.adapters.base import StgAdapter
 from app.stg.adapters.mock_adapter import MockStgAdapter
 from app.stg.adapters.gisce_adapter import GisceAdapter
@@ -800,6 +804,29 @@ _FABRICANTES = {
     "ITR": "Itron",
 }
 
+def _curva_query(
+    db: Session,
+    empresa_id: int,
+    meter_id: str,
+    tipo_fichero: str,
+    fecha_desde: Optional[datetime],
+    fecha_hasta: Optional[datetime],
+):
+    q = (
+        db.query(Medida)
+        .filter(
+            Medida.empresa_id == empresa_id,
+            Medida.meter_id == meter_id,
+            Medida.tipo_fichero == tipo_fichero,
+        )
+    )
+    if fecha_desde is not None:
+        q = q.filter(Medida.timestamp_dato >= fecha_desde)
+    if fecha_hasta is not None:
+        q = q.filter(Medida.timestamp_dato <= fecha_hasta)
+    return q
+
+
 def obtener_curva(
     db: Session,
     user: User,
@@ -810,42 +837,42 @@ def obtener_curva(
     fecha_hasta: Optional[datetime] = None,
     offset: int = 0,
     limite: int = 200,
+    cursor: Optional[str] = None,
+    count: str = "exact",
 ) -> dict:
     """
     Devuelve la curva (S02 por defecto) de un contador, leyendo stg_medida.
     Cada fila: timestamp + magnitudes del JSONB (ai, ae, r1..r4, status, season, bc).
     Valor en kWh por tramo (no se transforma aquí).
     Filtra por empresa (multi-tenant) + meter_id + tipo_fichero + rango de fechas.
+
+    Paginación: `cursor` (devuelto como `next_cursor`) avanza por keyset
+    sobre (timestamp_dato, id) y no degrada con el número de página; sin
+    cursor se respeta `offset`. `count` ∈ exact/estimate/none controla el
+    coste del total (ver app/core/pagination.py).
     """
     from app.core.permissions import assert_empresa_access
     assert_empresa_access(db, user, empresa_id)
 
-    q = (
-        db.query(Medida)
-        .filter(
-            Medida.empresa_id == empresa_id,
-            Medida.meter_id == meter_id,
-            Medida.tipo_fichero == tipo_fichero,
-        )
-    )
-    if fecha_desde is not None:
-        q = q.filter(Medida.timestamp_dato >= fecha_desde)
-    if fecha_hasta is not None:
-        q = q.filter(Medida.timestamp_dato <= fecha_hasta)
+    q = _curva_query(db, empresa_id, meter_id, tipo_fichero, fecha_desde, fecha_hasta)
 
     # Límites defensivos (mismo patrón que listar_contadores_detectados / eventos)
     limite = max(1, min(int(limite), 2000))
     offset = max(0, int(offset))
 
     # Total filtrado (sin paginar), para que el frontend pinte la paginación
-    total = q.count()
-
-    # Página actual: orden estable por timestamp ascendente
-    filas_raw = (
-        q.order_by(Medida.timestamp_dato.asc())
-        .offset(offset)
-        .limit(limite)
-        .all()
+    total = count_rows(db, q, count)
+
+    # Página actual: orden estable por timestamp ascendente (id desempata).
+    # El timestamp del cursor viaja en ISO; se reconvierte a datetime.
+    filas_raw, next_cursor = keyset_fetch(
+        q,
+        order_by=[(Medida.timestamp_dato, "asc"), (Medida.id, "asc")],
+        cursor=cursor,
+        offset=offset,
+        limit=limite,
+        cursor_values=lambda m: [m.timestamp_dato, m.id],
+        parse_values=lambda v: [parse_cursor_datetime(v[0]), int(v[1])],
     )
 
     filas = []
@@ -868,12 +895,57 @@ def obtener_curva(
         "meter_id": meter_id,
         "tipo_fichero": tipo_fichero,
         "total": total,
-        "offset": offset,
+        "total_estimated": count == "estimate",
+        "offset": 0 if cursor else offset,
         "limite": limite,
+        "next_cursor": next_cursor,
         "filas": filas,
     }
 
 
+CURVA_EXPORT_COLUMNS = [
+    "timestamp", "ai", "ae", "r1", "r2", "r3", "r4", "status", "season", "bc",
+]
+
+
+def iter_curva_export(
+    db: Session,
+    user: User,
+    empresa_id: int,
+    meter_id: str,
+    tipo_fichero: str = "S02",
+    fecha_desde: Optional[datetime] = None,
+    fecha_hasta: Optional[datetime] = None,
+):
+    """
+    Curva completa de un contador para exportar, sin paginar.
+
+    Comprueba permisos al llamarla (no al iterar) y devuelve un generador
+    que lee stg_medida por bloques con cursor de servidor; solo se traen
+    las dos columnas necesarias, no la entidad completa.
+    """
+    from app.core.permissions import assert_empresa_access
+    assert_empresa_access(db, user, empresa_id)
+
+    q = (
+        _curva_query(db, empresa_id, meter_id, tipo_fichero, fecha_desde, fecha_hasta)
+        .with_entities(Medida.timestamp_dato, Medida.datos)
+        .order_by(Medida.timestamp_dato.asc(), Medida.id.asc())
+    )
+
+    def _rows():
+        for ts, datos in iter_query(q):
+            d = datos or {}
+            yield (
+                ts,
+                d.get("ai"), d.get("ae"),
+                d.get("r1"), d.get("r2"), d.get("r3"), d.get("r4"),
+                d.get("status"), d.get("season"), d.get("bc"),
+            )
+
+    return _rows()
+
+
 
 def _extraer_fabricante(meter_id: str) -> Optional[str]:
     """
@@ -1079,66 +1151,69 @@ def _parsear_s24(
     concentradores_set = set()    # cnc_names que hemos hecho upsert
     contadores_set = set()         # meter_ids únicos que hemos hecho upsert
 
-    with open(fichero.path, "rb") as f:
-        report = Report(f)
-
-    for cnc in report.concentrators:
-        for value in cnc.values:
-            cnc_name = value.get("cnc_name")
-            cnc_ts = _parsear_iso(value.get("timestamp"))
+    with etapa("lectura", bytes=fichero.tamano_bytes):
+        with open(fichero.path, "rb") as f:
+            report = Report(f)
 
-            # UPSERT concentrador
-            concentrador_obj = _upsert_concentrador(
-                db, fichero.tenant_id, fichero.empresa_id, cnc_name, cnc_ts,
-            )
-            concentradores_set.add(cnc_name)
-
-            for meter in value.get("meters", []):
-                meter_id = meter.get("name")
-                if not meter_id:
-                    continue
-                meter_ts = _parsear_iso(meter.get("timestamp"))
-                status = meter.get("status")
-                active = bool(meter.get("active"))
-                estado_com = _mapear_status(status)
-                fabricante = _extraer_fabricante(meter_id)
-
-                # UPSERT contador
-                contador_obj = _upsert_contador(
-                    db,
-                    tenant_id=fichero.tenant_id,
-                    empresa_id=fichero.empresa_id,
-                    meter_id=meter_id,
-                    concentrador_id=concentrador_obj.id,
-                    fabricante=fabricante,
-                    ultimo_contacto=meter_ts,
-                    estado_comunicacion=estado_com,
-                    activo=active,
-                )
-                contadores_set.add(meter_id)
+    with etapa("medidas") as medicion:
+        for cnc in report.concentrators:
+            for value in cnc.values:
+                cnc_name = value.get("cnc_name")
+                cnc_ts = _parsear_iso(value.get("timestamp"))
 
-                # INSERT medida
-                medida = Medida(
-                    tenant_id=fichero.tenant_id,
-                    empresa_id=fichero.empresa_id,
-                    fichero_id=fichero.id,
-                    concentrador_id=concentrador_obj.id,
-                    contador_id=contador_obj.id,
-                    tipo_fichero="S24",
-                    timestamp_dato=cnc_ts,
-                    concentrador_externo_id=cnc_name,
-                    meter_id=meter_id,
-                    datos={
-                        "cnc_timestamp": value.get("timestamp"),
-                        "cnc_season": value.get("season"),
-                        "meter_timestamp": meter.get("timestamp"),
-                        "meter_season": meter.get("season"),
-                        "status": meter.get("status"),
-                        "active": meter.get("active"),
-                    },
+                # UPSERT concentrador
+                concentrador_obj = _upsert_concentrador(
+                    db, fichero.tenant_id, fichero.empresa_id, cnc_name, cnc_ts,
                 )
-                db.add(medida)
-                medidas_insertadas += 1
+                concentradores_set.add(cnc_name)
+
+                for meter in value.get("meters", []):
+                    meter_id = meter.get("name")
+                    if not meter_id:
+                        continue
+                    meter_ts = _parsear_iso(meter.get("timestamp"))
+                    status = meter.get("status")
+                    active = bool(meter.get("active"))
+                    estado_com = _mapear_status(status)
+                    fabricante = _extraer_fabricante(meter_id)
+
+                    # UPSERT contador
+                    contador_obj = _upsert_contador(
+                        db,
+                        tenant_id=fichero.tenant_id,
+                        empresa_id=fichero.empresa_id,
+                        meter_id=meter_id,
+                        concentrador_id=concentrador_obj.id,
+                        fabricante=fabricante,
+                        ultimo_contacto=meter_ts,
+                        estado_comunicacion=estado_com,
+                        activo=active,
+                    )
+                    contadores_set.add(meter_id)
+
+                    # INSERT medida
+                    medida = Medida(
+                        tenant_id=fichero.tenant_id,
+                        empresa_id=fichero.empresa_id,
+                        fichero_id=fichero.id,
+                        concentrador_id=concentrador_obj.id,
+                        contador_id=contador_obj.id,
+                        tipo_fichero="S24",
+                        timestamp_dato=cnc_ts,
+                        concentrador_externo_id=cnc_name,
+                        meter_id=meter_id,
+                        datos={
+                            "cnc_timestamp": value.get("timestamp"),
+                            "cnc_season": value.get("season"),
+                            "meter_timestamp": meter.get("timestamp"),
+                            "meter_season": meter.get("season"),
+                            "status": meter.get("status"),
+                            "active": meter.get("active"),
+                        },
+                    )
+                    db.add(medida)
+                    medidas_insertadas += 1
+        medicion.filas = medidas_insertadas
 
     return {
         "medidas_insertadas": medidas_insertadas,
@@ -1189,78 +1264,81 @@ def _parsear_via_meter_values(
     concentradores_set = set()
     contadores_set = set()
 
-    with open(fichero.path, "rb") as f:
-        report = Report(f)
-
-    for cnc in report.concentrators:
-        # cnc_name puede venir como atributo del objeto Cnc, o dentro del value.
-        cnc_name = getattr(cnc, "name", None)
-        cnc_obj = None
-        if cnc_name:
-            cnc_obj = _upsert_concentrador(
-                db, fichero.tenant_id, fichero.empresa_id, cnc_name,
-            )
-            concentradores_set.add(cnc_name)
-
-        meters = getattr(cnc, "meters", None) or []
-        if not meters:
-            continue
-
-        for meter in meters:
-            # meter.values puede dar [] si el contador tiene ErrCat/ErrCode.
-            try:
-                values = meter.values
-            except Exception:
-                values = []
+    with etapa("lectura", bytes=fichero.tamano_bytes):
+        with open(fichero.path, "rb") as f:
+            report = Report(f)
+
+    with etapa("medidas") as medicion:
+        for cnc in report.concentrators:
+            # cnc_name puede venir como atributo del objeto Cnc, o dentro del value.
+            cnc_name = getattr(cnc, "name", None)
+            cnc_obj = None
+            if cnc_name:
+                cnc_obj = _upsert_concentrador(
+                    db, fichero.tenant_id, fichero.empresa_id, cnc_name,
+                )
+                concentradores_set.add(cnc_name)
 
-            if not values:
+            meters = getattr(cnc, "meters", None) or []
+            if not meters:
                 continue
 
-            for value in values:
-                meter_name = value.get("name")
-                if not meter_name:
+            for meter in meters:
+                # meter.values puede dar [] si el contador tiene ErrCat/ErrCode.
+                try:
+                    values = meter.values
+                except Exception:
+                    values = []
+
+                if not values:
                     continue
 
-                # cnc_name puede venir también dentro del value (fallback)
-                cnc_name_value = value.get("cnc_name") or cnc_name
-                if cnc_name_value and cnc_obj is None:
-                    cnc_obj = _upsert_concentrador(
-                        db, fichero.tenant_id, fichero.empresa_id, cnc_name_value,
+                for value in values:
+                    meter_name = value.get("name")
+                    if not meter_name:
+                        continue
+
+                    # cnc_name puede venir también dentro del value (fallback)
+                    cnc_name_value = value.get("cnc_name") or cnc_name
+                    if cnc_name_value and cnc_obj is None:
+                        cnc_obj = _upsert_concentrador(
+                            db, fichero.tenant_id, fichero.empresa_id, cnc_name_value,
+                        )
+                        concentradores_set.add(cnc_name_value)
+
+                    fabricante = _extraer_fabricante(meter_name)
+                    contador_obj = _upsert_contador_basico(
+                        db,
+                        tenant_id=fichero.tenant_id,
+                        empresa_id=fichero.empresa_id,
+                        meter_id=meter_name,
+                        concentrador_id=cnc_obj.id if cnc_obj else None,
+                        fabricante=fabricante,
                     )
-                    concentradores_set.add(cnc_name_value)
-
-                fabricante = _extraer_fabricante(meter_name)
-                contador_obj = _upsert_contador_basico(
-                    db,
-                    tenant_id=fichero.tenant_id,
-                    empresa_id=fichero.empresa_id,
-                    meter_id=meter_name,
-                    concentrador_id=cnc_obj.id if cnc_obj else None,
-                    fabricante=fabricante,
-                )
-                contadores_set.add(meter_name)
-
-                # Timestamp del dato: la mayoría de tipos usa 'timestamp',
-                # S05 usa 'date_begin' (inicio del cierre).
-                ts = _parsear_iso(value.get("timestamp") or value.get("date_begin"))
-
-                # Sanitizar datos para JSONB (convertir tipos no JSON-serializables)
-                datos_serializables = _sanitizar_para_json(value)
-
-                medida = Medida(
-                    tenant_id=fichero.tenant_id,
-                    empresa_id=fichero.empresa_id,
-                    fichero_id=fichero.id,
-                    concentrador_id=cnc_obj.id if cnc_obj else None,
-                    contador_id=contador_obj.id,
-                    tipo_fichero=tipo,
-                    timestamp_dato=ts,
-                    concentrador_externo_id=cnc_name_value,
-                    meter_id=meter_name,
-                    datos=datos_serializables,
-                )
-                db.add(medida)
-                medidas_insertadas += 1
+                    contadores_set.add(meter_name)
+
+                    # Timestamp del dato: la mayoría de tipos usa 'timestamp',
+                    # S05 usa 'date_begin' (inicio del cierre).
+                    ts = _parsear_iso(value.get("timestamp") or value.get("date_begin"))
+
+                    # Sanitizar datos para JSONB (convertir tipos no JSON-serializables)
+                    datos_serializables = _sanitizar_para_json(value)
+
+                    medida = Medida(
+                        tenant_id=fichero.tenant_id,
+                        empresa_id=fichero.empresa_id,
+                        fichero_id=fichero.id,
+                        concentrador_id=cnc_obj.id if cnc_obj else None,
+                        contador_id=contador_obj.id,
+                        tipo_fichero=tipo,
+                        timestamp_dato=ts,
+                        concentrador_externo_id=cnc_name_value,
+                        meter_id=meter_name,
+                        datos=datos_serializables,
+                    )
+                    db.add(medida)
+                    medidas_insertadas += 1
+        medicion.filas = medidas_insertadas
 
     return {
         "medidas_insertadas": medidas_insertadas,
@@ -1300,6 +1378,33 @@ def parsear_fichero(
     db: Session,
     user: User,
     fichero_id: int,
+    perfil: bool = False,
+) -> dict:
+    """
+    Parsea un fichero (ver `_parsear_fichero`) midiendo sus etapas. Los
+    tiempos se devuelven en `tiempos` y se guardan en
+    `FicheroRecibido.parse_timings`. Con `perfil=True` guarda además un
+    cProfile del parseo (ver app/core/pipeline_timing.py).
+    """
+    with medir_pipeline("stg", perfil_id=fichero_id if perfil else None) as tiempos:
+        resultado = _parsear_fichero(db, user, fichero_id)
+    resultado["tiempos"] = tiempos.as_dict()
+    try:
+        (
+            db.query(FicheroRecibido)
+            .filter(FicheroRecibido.id == fichero_id)
+            .update({FicheroRecibido.parse_timings: resultado["tiempos"]}, synchronize_session=False)
+        )
+        db.commit()
+    except Exception:
+        db.rollback()
+    return resultado
+
+
+def _parsear_fichero(
+    db: Session,
+    user: User,
+    fichero_id: int,
 ) -> dict:
     """
     Parsea un fichero descargado y guarda las medidas en BD.
@@ -1363,10 +1468,15 @@ def parsear_fichero(
             "error": f"tipo {tipo} pendiente",
         }
 
-    # Si ya estaba parsed, borrar medidas previas (idempotencia)
+    # Si ya estaba parsed, borrar medidas previas (idempotencia). Los días
+    # que tenía el fichero se recalculan en los agregados aunque ya no estén.
+    claves_agregados: set = set()
     if fichero.parsed:
-        db.query(Medida).filter(Medida.fichero_id == fichero.id).delete()
-        db.flush()
+        with etapa("borrado_previas"):
+            if tipo == agregados.TIPO_CURVA:
+                claves_agregados = agregados.claves_de_fichero(db, fichero.id)
+            db.query(Medida).filter(Medida.fichero_id == fichero.id).delete()
+            db.flush()
 
     try:
         if tipo in TIPOS_PRIMESTG_CNC_VALUES:
@@ -1377,10 +1487,23 @@ def parsear_fichero(
             # Defensivo, no debería llegar
             raise RuntimeError(f"dispatcher inválido para tipo '{tipo}'")
 
+        if tipo == agregados.TIPO_CURVA:
+            with etapa("escritura"):
+                db.flush()
+            with etapa("agregados"):
+                claves_agregados |= agregados.claves_de_fichero(db, fichero.id)
+                resultado.update(agregados.recalcular(
+                    db,
+                    tenant_id=fichero.tenant_id,
+                    empresa_id=fichero.empresa_id,
+                    claves=claves_agregados,
+                ))
+
         fichero.parsed = True
         fichero.parsed_at = ahora_madrid()
         fichero.parse_error = None
-        db.commit()
+        with etapa("commit"):
+            db.commit()
 
         return {
             "fichero_id": fichero.id,
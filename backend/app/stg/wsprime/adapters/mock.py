@@ -3,9 +3,18 @@ MockAdapter: simula un concentrador PRIME real para tests sin credenciales.
 
 Util para validar endpoints, frontend y flujos sin depender de la red
 real de San Jose, ZIV, etc. Genera respuestas plausibles y deterministas.
+
+Para probar el sondeo concurrente, `sondear()` lee de la query string de la
+URL cómo debe comportarse:
+    latencia_ms=N   espera N ms antes de responder
+    fallos=N        las N primeras llamadas lanzan ConnectionError
+    error=1         responde ok=False (credenciales rechazadas)
+Ej.: https://mock.local/ct1?latencia_ms=200&fallos=1
 """
 
+import asyncio
 from datetime import datetime
+from urllib.parse import parse_qs, urlsplit
 from zoneinfo import ZoneInfo
 
 from app.stg.wsprime.client import WSPrimeAdapter
@@ -14,6 +23,10 @@ from app.stg.wsprime.client import WSPrimeAdapter
 class MockAdapter(WSPrimeAdapter):
     """Adapter simulado para tests. NO HACE I/O real."""
 
+    def __init__(self, *args, **kwargs) -> None:
+        super().__init__(*args, **kwargs)
+        self.llamadas_sondeo = 0
+
     def test_conexion(self) -> dict:
         # Reglas de simulacion:
         #   - url vacia o usuario/password vacios -> fallo
@@ -74,4 +87,25 @@ class MockAdapter(WSPrimeAdapter):
                 else f"Info meter {meter_id} leida (MockAdapter)"
             ),
             "info": info,
-        }
\ No newline at end of file
+        }
+
+    async def sondear(self, http) -> dict:
+        # No usa `http`: simula latencia y fallos según la URL.
+        self.llamadas_sondeo += 1
+        params = parse_qs(urlsplit(self.url or "").query)
+        latencia_ms = int(params.get("latencia_ms", ["0"])[0])
+        fallos = int(params.get("fallos", ["0"])[0])
+
+        if latencia_ms:
+            await asyncio.sleep(latencia_ms / 1000)
+        if self.llamadas_sondeo <= fallos:
+            raise ConnectionError(
+                f"Fallo simulado {self.llamadas_sondeo}/{fallos} (MockAdapter)"
+            )
+        if params.get("error") == ["1"]:
+            return {
+                "ok": False,
+                "mensaje": "Credenciales rechazadas (MockAdapter)",
+                "info": None,
+            }
+        return self.leer_info_general()
@@ -7,9 +7,17 @@ implementar (Circutor, ZIV, Sagemcom, Landis, Mock).
 Iteración 1 del Paq 11 — alcance mínimo:
 - test_conexion(): comprueba que las credenciales/URL son válidas
 - leer_info_general(): equivalente a la petición B11 del estándar PRIME
+- sondear(): comprobación asíncrona usada por el sondeo periódico
+  (app/stg/wsprime/polling.py)
 """
 
 from abc import ABC, abstractmethod
+from xml.etree import ElementTree
+
+import httpx
+
+
+_WSDL_NS = "{http://schemas.xmlsoap.org/wsdl/}"
 
 
 class WSPrimeAdapter(ABC):
@@ -62,4 +70,48 @@ class WSPrimeAdapter(ABC):
                     # fecha_hora, total_meters, ...
             }
         """
-        raise NotImplementedError
\ No newline at end of file
+        raise NotImplementedError
+
+    async def sondear(self, http: httpx.AsyncClient) -> dict:
+        """
+        Sondeo asíncrono del concentrador para el motor de polling.
+
+        `http` es el cliente compartido por todos los concentradores del
+        mismo fabricante (pool keep-alive, límite de conexiones). Por
+        defecto descarga el WSDL con auth BASIC y lista sus servicios; los
+        adapters con operación B11 real pueden sobrescribirlo.
+
+        Los errores de red y de timeout se propagan como excepción para que
+        el motor reintente; las respuestas del concentrador (401, WSDL
+        inválido) vuelven como ok=False y no se reintentan.
+
+        Returns:
+            dict con el mismo shape que test_conexion().
+        """
+        if not self.url or not self.usuario or not self.password:
+            return {"ok": False, "mensaje": "URL, usuario o password vacios", "info": None}
+
+        resp = await http.get(
+            self.url,
+            auth=(self.usuario, self.password),
+            timeout=self.timeout,
+        )
+        if resp.status_code >= 500:
+            resp.raise_for_status()
+        if resp.status_code != 200:
+            return {
+                "ok": False,
+                "mensaje": f"HTTP {resp.status_code} leyendo el WSDL",
+                "info": None,
+            }
+        try:
+            raiz = ElementTree.fromstring(resp.content)
+        except ElementTree.ParseError as e:
+            return {"ok": False, "mensaje": f"WSDL no valido: {e}", "info": None}
+
+        servicios = [s.get("name") for s in raiz.iter(f"{_WSDL_NS}service")]
+        return {
+            "ok": True,
+            "mensaje": f"WSDL accesible ({len(servicios)} servicios)",
+            "info": {"url": self.url, "servicios_disponibles": servicios},
+        }
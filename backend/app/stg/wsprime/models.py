@@ -16,7 +16,8 @@ fabricante:
     "mock"      -> adapter simulado para tests sin credenciales reales
 
 ultima_conexion_*:
-    Diagnóstico del último test de conexión (rellenado por services.test_conexion).
+    Diagnóstico del último test de conexión (rellenado por services.test_conexion
+    y por el sondeo periódico de polling.py).
 """
 from sqlalchemy import (
     Boolean, Column, DateTime, ForeignKey, Integer, String, Text,
@@ -0,0 +1,263 @@
+# app/stg/wsprime/polling.py
+# pyright: reportMissingImports=false, reportArgumentType=false, reportAttributeAccessIssue=false
+"""
+Sondeo concurrente de concentradores WS-PRIME.
+
+`test_conexion` / `leer_info_general` (services.py) atienden peticiones
+puntuales de un usuario, una llamada síncrona cada vez. Para recorrer
+cientos de concentradores se usa este motor asyncio:
+
+  - Un `asyncio.Semaphore` por fabricante limita las llamadas simultáneas
+    (WSPRIME_SONDEO_CONCURRENCIA): los concentradores de un mismo
+    fabricante suelen compartir red/VPN y no toleran ráfagas.
+  - Un `httpx.AsyncClient` por fabricante (y verify_ssl) con pool
+    keep-alive del mismo tamaño, compartido por todas sus llamadas.
+  - Cada intento tiene el timeout del concentrador (timeout_segundos).
+    Errores de red y timeouts se reintentan WSPRIME_SONDEO_REINTENTOS
+    veces con backoff exponencial, liberando el semáforo mientras se
+    espera. Un ok=False del concentrador (credenciales, WSDL) no se
+    reintenta.
+  - Los resultados se escriben al final en una sola transacción:
+    ultima_conexion_* en stg_wsprime_config y firmware/modelo/número de
+    serie en stg_concentrador si el concentrador los informa.
+
+La parte async no toca la sesión de BD: los objetivos se cargan antes y
+los resultados se guardan después, en el hilo del llamador.
+"""
+from __future__ import annotations
+
+import asyncio
+import logging
+import time
+from dataclasses import dataclass
+from typing import Any, Dict, Iterable, List, Optional, Tuple
+
+import httpx
+from sqlalchemy import update
+from sqlalchemy.orm import Session
+
+from app.core.config import get_settings
+from app.stg.models import StgConcentrador
+from app.stg.wsprime.client import WSPrimeAdapter
+from app.stg.wsprime.models import StgWsPrimeConfig
+from app.stg.wsprime.services import _ahora_madrid_naive, _build_adapter_from_config
+
+
+logger = logging.getLogger(__name__)
+
+# Tope de la espera entre reintentos.
+_BACKOFF_MAX_SEGUNDOS = 60.0
+
+
+@dataclass
+class Objetivo:
+    config_id:       int
+    concentrador_id: int
+    fabricante:      str
+    verify_ssl:      bool
+    timeout:         float
+    adapter:         WSPrimeAdapter
+
+
+@dataclass
+class ResultadoSondeo:
+    config_id:       int
+    concentrador_id: int
+    fabricante:      str
+    ok:              bool
+    mensaje:         str
+    info:            Optional[Dict[str, Any]]
+    intentos:        int
+    duracion_ms:     int
+
+
+# ── Motor async ──────────────────────────────────────────────────────────────
+
+def espera_backoff(intento: int, base: float) -> float:
+    """Espera tras el intento fallido número `intento` (1, 2, ...)."""
+    return min(base * 2 ** (intento - 1), _BACKOFF_MAX_SEGUNDOS)
+
+
+async def _sondear_uno(
+    obj: Objetivo,
+    http: httpx.AsyncClient,
+    semaforo: asyncio.Semaphore,
+    *,
+    reintentos: int,
+    backoff: float,
+) -> ResultadoSondeo:
+    inicio = time.perf_counter()
+    intento = 0
+    while True:
+        intento += 1
+        async with semaforo:
+            try:
+                r = await asyncio.wait_for(obj.adapter.sondear(http), timeout=obj.timeout)
+                ok, mensaje, info = bool(r.get("ok")), str(r.get("mensaje", "")), r.get("info")
+                break
+            except asyncio.TimeoutError:
+                ok, mensaje, info = False, f"Timeout tras {obj.timeout:g} s", None
+            except Exception as e:
+                ok, mensaje, info = False, f"{type(e).__name__}: {e}", None
+        if intento > reintentos:
+            break
+        await asyncio.sleep(espera_backoff(intento, backoff))
+
+    return ResultadoSondeo(
+        config_id=obj.config_id,
+        concentrador_id=obj.concentrador_id,
+        fabricante=obj.fabricante,
+        ok=ok,
+        mensaje=mensaje,
+        info=info,
+        intentos=intento,
+        duracion_ms=int((time.perf_counter() - inicio) * 1000),
+    )
+
+
+async def sondear_objetivos(
+    objetivos: Iterable[Objetivo],
+    *,
+    concurrencia: int,
+    reintentos: int,
+    backoff: float,
+) -> List[ResultadoSondeo]:
+    """Sondea todos los objetivos; devuelve los resultados en el mismo orden."""
+    objetivos = list(objetivos)
+    semaforos: Dict[str, asyncio.Semaphore] = {}
+    clientes: Dict[Tuple[str, bool], httpx.AsyncClient] = {}
+    limites = httpx.Limits(max_connections=concurrencia, max_keepalive_connections=concurrencia)
+    try:
+        tareas = []
+        for obj in objetivos:
+            semaforo = semaforos.setdefault(obj.fabricante, asyncio.Semaphore(concurrencia))
+            clave = (obj.fabricante, obj.verify_ssl)
+            if clave not in clientes:
+                clientes[clave] = httpx.AsyncClient(verify=obj.verify_ssl, limits=limites)
+            tareas.append(_sondear_uno(
+                obj, clientes[clave], semaforo, reintentos=reintentos, backoff=backoff,
+            ))
+        return list(await asyncio.gather(*tareas))
+    finally:
+        await asyncio.gather(*(c.aclose() for c in clientes.values()))
+
+
+# ── Carga y volcado (síncrono) ───────────────────────────────────────────────
+
+def cargar_objetivos(
+    db: Session, *, empresa_ids: Optional[List[int]] = None
+) -> Tuple[List[Objetivo], List[ResultadoSondeo]]:
+    """
+    Configs activas (de `empresa_ids` si se indica) con su adapter ya
+    construido. Las que no se pueden preparar (password que no descifra,
+    fabricante desconocido) vuelven como resultado fallido sin sondear.
+    """
+    q = db.query(StgWsPrimeConfig).filter(StgWsPrimeConfig.activo.is_(True))
+    if empresa_ids is not None:
+        q = q.filter(StgWsPrimeConfig.empresa_id.in_(empresa_ids))
+
+    objetivos: List[Objetivo] = []
+    fallidos: List[ResultadoSondeo] = []
+    for cfg in q.order_by(StgWsPrimeConfig.id).all():
+        try:
+            adapter = _build_adapter_from_config(cfg)
+        except Exception as e:
+            fallidos.append(ResultadoSondeo(
+                config_id=cfg.id, concentrador_id=cfg.concentrador_id,
+                fabricante=cfg.fabricante, ok=False,
+                mensaje=f"Configuracion no valida: {type(e).__name__}: {e}",
+                info=None, intentos=0, duracion_ms=0,
+            ))
+            continue
+        objetivos.append(Objetivo(
+            config_id=cfg.id,
+            concentrador_id=cfg.concentrador_id,
+            fabricante=cfg.fabricante,
+            verify_ssl=bool(cfg.verify_ssl),
+            timeout=float(cfg.timeout_segundos or 30),
+            adapter=adapter,
+        ))
+    return objetivos, fallidos
+
+
+def guardar_resultados(db: Session, resultados: List[ResultadoSondeo]) -> None:
+    """Vuelca los resultados en stg_wsprime_config y stg_concentrador y hace commit."""
+    if not resultados:
+        return
+    ahora = _ahora_madrid_naive()
+    db.execute(update(StgWsPrimeConfig), [
+        {
+            "id": r.config_id,
+            "ultima_conexion_at": ahora,
+            "ultima_conexion_ok": r.ok,
+            "ultima_conexion_error": None if r.ok else r.mensaje[:2000],
+            "updated_at": ahora,
+        }
+        for r in resultados
+    ])
+
+    con_info = {r.concentrador_id: r.info for r in resultados if r.ok and r.info}
+    if con_info:
+        concentradores = (
+            db.query(StgConcentrador)
+            .filter(StgConcentrador.id.in_(list(con_info)))
+            .all()
+        )
+        for c in concentradores:
+            info = con_info[c.id]
+            # El firmware cambia con las actualizaciones; modelo y número de
+            # serie solo se rellenan si el inventario no los tiene.
+            if info.get("firmware"):
+                c.firmware = str(info["firmware"])[:50]
+            if info.get("modelo") and not c.modelo:
+                c.modelo = str(info["modelo"])[:100]
+            if info.get("numero_serie") and not c.numero_serie:
+                c.numero_serie = str(info["numero_serie"])[:50]
+    db.commit()
+
+
+def sondear_concentradores(
+    db: Session, *, empresa_ids: Optional[List[int]] = None
+) -> Dict[str, Any]:
+    """
+    Sondea las configs WS-PRIME activas y guarda el resultado.
+
+    Se llama desde el scheduler y desde POST /stg/wsprime/sondeo (rutas
+    síncronas, que FastAPI ejecuta en un hilo sin event loop).
+    """
+    settings = get_settings()
+    inicio = time.perf_counter()
+    objetivos, resultados = cargar_objetivos(db, empresa_ids=empresa_ids)
+    if objetivos:
+        resultados += asyncio.run(sondear_objetivos(
+            objetivos,
+            concurrencia=max(1, settings.WSPRIME_SONDEO_CONCURRENCIA),
+            reintentos=max(0, settings.WSPRIME_SONDEO_REINTENTOS),
+            backoff=settings.WSPRIME_SONDEO_BACKOFF_SEGUNDOS,
+        ))
+    guardar_resultados(db, resultados)
+
+    ok = sum(1 for r in resultados if r.ok)
+    resumen = {
+        "total": len(resultados),
+        "ok": ok,
+        "fallidos": len(resultados) - ok,
+        "duracion_ms": int((time.perf_counter() - inicio) * 1000),
+        "resultados": [
+            {
+                "concentrador_id": r.concentrador_id,
+                "fabricante": r.fabricante,
+                "ok": r.ok,
+                "mensaje": r.mensaje,
+                "intentos": r.intentos,
+                "duracion_ms": r.duracion_ms,
+            }
+            for r in sorted(resultados, key=lambda r: r.concentrador_id)
+        ],
+    }
+    if resultados:
+        logger.info(
+            "[wsprime_sondeo] %s concentradores: %s ok, %s fallidos en %s ms",
+            resumen["total"], resumen["ok"], resumen["fallidos"], resumen["duracion_ms"],
+        )
+    return resumen
@@ -10,6 +10,7 @@ Rutas:
   DELETE /stg/wsprime/config/{concentrador_id}    -> borrar
   POST   /stg/wsprime/test/{concentrador_id}      -> test conexion
   GET    /stg/wsprime/info/{concentrador_id}      -> info general
+  POST   /stg/wsprime/sondeo                      -> sondeo concurrente
 """
 from __future__ import annotations
 
@@ -18,12 +19,14 @@ from sqlalchemy.orm import Session
 
 from app.core.auth import get_current_user
 from app.core.db import get_db
-from app.stg.wsprime import services
+from app.core.permissions import assert_empresa_access, get_allowed_empresa_ids
+from app.stg.wsprime import polling, services
 from app.stg.wsprime.schemas import (
     WsPrimeConfigCreate,
     WsPrimeConfigOut,
     WsPrimeConfigUpdate,
     WsPrimeInfoGeneral,
+    WsPrimeSondeoResumen,
     WsPrimeTestResult,
 )
 from app.tenants.models import User
@@ -153,4 +156,24 @@ def info_general_endpoint(
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail=str(e)
         ) from e
-    return WsPrimeInfoGeneral(**resultado)
\ No newline at end of file
+    return WsPrimeInfoGeneral(**resultado)
+
+
+@router.post(
+    "/sondeo",
+    response_model=WsPrimeSondeoResumen,
+)
+def sondeo_endpoint(
+    empresa_id: int | None = Query(default=None),
+    db: Session = Depends(get_db),
+    user: User = Depends(get_current_user),
+):
+    """Sondea ya los concentradores con WS-PRIME activo de las empresas visibles."""
+    if empresa_id is not None:
+        assert_empresa_access(db, user, empresa_id)
+        empresa_ids = [empresa_id]
+    else:
+        empresa_ids = get_allowed_empresa_ids(db, user)
+    return WsPrimeSondeoResumen(
+        **polling.sondear_concentradores(db, empresa_ids=empresa_ids)
+    )
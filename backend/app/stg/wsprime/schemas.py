@@ -102,4 +102,26 @@ class WsPrimeInfoGeneral(BaseModel):
 
     ok: bool
     mensaje: str
-    info: dict[str, Any] | None = None
\ No newline at end of file
+    info: dict[str, Any] | None = None
+
+
+# ============================================================
+# Salida: sondeo concurrente (app/stg/wsprime/polling.py)
+# ============================================================
+class WsPrimeSondeoItem(BaseModel):
+    concentrador_id: int
+    fabricante: str
+    ok: bool
+    mensaje: str
+    intentos: int
+    duracion_ms: int
+
+
+class WsPrimeSondeoResumen(BaseModel):
+    """Respuesta de POST /stg/wsprime/sondeo."""
+
+    total: int
+    ok: int
+    fallidos: int
+    duracion_ms: int
+    resultados: list[WsPrimeSondeoItem]
@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session, joinedload
 from app.core.db import get_db
 from app.core.security import get_password_hash
 from app.core.auth import get_current_active_superuser
+from app.core.response_cache import cache_stats
 from app.tenants.models import User, Tenant
 from app.tenants.schemas import (
     UserRead,
@@ -262,4 +263,15 @@ def delete_tenant_as_superuser(
         raise HTTPException(status_code=status.HTTP_404_NOT_FOUND, detail="Tenant no encontrado")
     db.delete(tenant)
     db.commit()
-    return None
\ No newline at end of file
+    return None
+
+@router.get("/admin/response-cache")
+def get_response_cache_stats(
+    current_user: User = Depends(get_current_active_superuser),
+):
+    """
+    Métricas de la caché de respuestas (hits/misses, tamaño del LRU) del
+    worker que atiende la petición. Solo para superusuarios.
+    """
+    _ = current_user
+    return cache_stats()
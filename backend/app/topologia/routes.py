@@ -9,6 +9,7 @@ from sqlalchemy.orm import Session
 
 from app.core.auth import get_current_user
 from app.core.db import get_db
+from app.core.perf import perf_budget
 from app.core.permissions import assert_empresa_access
 from app.tenants.models import User
 from app.topologia import services
@@ -611,6 +612,7 @@ def get_cuadro_bt(
 
 
 @router.get("/mapa/cts", response_model=List[CtMapaRead])
+@perf_budget(queries=8)
 def get_cts_mapa(
     empresa_id:   int     = Query(...),
     db:           Session = Depends(get_db),
@@ -3,7 +3,7 @@
 from __future__ import annotations
 
 from datetime import date, datetime
-from typing import List, Optional
+from typing import Any, Dict, List, Optional
 
 from pydantic import BaseModel
 
@@ -177,6 +177,8 @@ class ImportarTopologiaResponse(BaseModel):
     tramos_actualizados: int = 0
     tramos_errores:      int = 0
     ficheros:            List[str]
+    # Tiempos por etapa (ver app/core/pipeline_timing.py)
+    tiempos:             Optional[Dict[str, Any]] = None
 
 
 # ── Asociación CT — request y response ───────────────────────────────────────
@@ -12,6 +12,7 @@ from sqlalchemy.orm import Session
 from sqlalchemy import cast, String as SAString
 
 from app.core.datetime_utils import ahora_madrid
+from app.core.pipeline_timing import etapa, medir_pipeline
 from app.topologia.models import (
     CtCelda,
     CtCuadroBT,
@@ -1143,6 +1144,44 @@ def importar_topologia(
     encoding:         str = "latin-1",
     utm_zone:         int = 30,
 ) -> Dict[str, Any]:
+    """
+    Importa los ficheros CNMC 8/2021 (ver `_importar_topologia`) midiendo
+    sus etapas; los tiempos se devuelven en `tiempos`
+    (ver app/core/pipeline_timing.py).
+    """
+    with medir_pipeline("topologia") as tiempos:
+        resultado = _importar_topologia(
+            db=db,
+            tenant_id=tenant_id,
+            empresa_id=empresa_id,
+            anio_declaracion=anio_declaracion,
+            contenido_b2=contenido_b2,
+            contenido_b21=contenido_b21,
+            contenido_b22=contenido_b22,
+            contenido_a1=contenido_a1,
+            contenido_b1=contenido_b1,
+            contenido_b11=contenido_b11,
+            encoding=encoding,
+            utm_zone=utm_zone,
+        )
+    resultado["tiempos"] = tiempos.as_dict()
+    return resultado
+
+
+def _importar_topologia(
+    db:               Session,
+    tenant_id:        int,
+    empresa_id:       int,
+    anio_declaracion: int,
+    contenido_b2:     Optional[bytes] = None,
+    contenido_b21:    Optional[bytes] = None,
+    contenido_b22:    Optional[bytes] = None,
+    contenido_a1:     Optional[bytes] = None,
+    contenido_b1:     Optional[bytes] = None,
+    contenido_b11:    Optional[bytes] = None,
+    encoding:         str = "latin-1",
+    utm_zone:         int = 30,
+) -> Dict[str, Any]:
 
     resultado: Dict[str, Any] = {
         "cts_insertados":       0,
@@ -1167,112 +1206,128 @@ def importar_topologia(
     }
 
     if contenido_b2:
-        registros, errores = parsear_b2(contenido_b2, encoding=encoding, utm_zone=utm_zone)
+        with etapa("parseo_b2", bytes=len(contenido_b2)):
+            registros, errores = parsear_b2(contenido_b2, encoding=encoding, utm_zone=utm_zone)
         resultado["cts_errores"] += len(errores)
-        for reg in registros:
-            try:
-                accion = _upsert_ct(db, tenant_id, empresa_id, anio_declaracion, reg)
-                if accion == "insertado":
-                    resultado["cts_insertados"] += 1
-                else:
-                    resultado["cts_actualizados"] += 1
-            except Exception:
-                db.rollback()
-                resultado["cts_errores"] += 1
-        db.commit()
+        with etapa("escritura_b2", filas=len(registros)):
+            for reg in registros:
+                try:
+                    accion = _upsert_ct(db, tenant_id, empresa_id, anio_declaracion, reg)
+                    if accion == "insertado":
+                        resultado["cts_insertados"] += 1
+                    else:
+                        resultado["cts_actualizados"] += 1
+                except Exception:
+                    db.rollback()
+                    resultado["cts_errores"] += 1
+            db.commit()
         resultado["ficheros"].append("B2")
 
     if contenido_b21:
-        registros, errores = _parsear_b21(contenido_b21, encoding=encoding)
+        with etapa("parseo_b21", bytes=len(contenido_b21)):
+            registros, errores = _parsear_b21(contenido_b21, encoding=encoding)
         resultado["trfs_errores"] += len(errores)
-        for reg in registros:
-            try:
-                accion = _upsert_transformador(db, tenant_id, empresa_id, reg)
-                if accion == "insertado":
-                    resultado["trfs_insertados"] += 1
-                else:
-                    resultado["trfs_actualizados"] += 1
-            except Exception:
-                db.rollback()
-                resultado["trfs_errores"] += 1
-        db.commit()
+        with etapa("escritura_b21", filas=len(registros)):
+            for reg in registros:
+                try:
+                    accion = _upsert_transformador(db, tenant_id, empresa_id, reg)
+                    if accion == "insertado":
+                        resultado["trfs_insertados"] += 1
+                    else:
+                        resultado["trfs_actualizados"] += 1
+                except Exception:
+                    db.rollback()
+                    resultado["trfs_errores"] += 1
+            db.commit()
         resultado["ficheros"].append("B21")
 
     if contenido_b22:
-        registros, errores = parsear_b22(contenido_b22, encoding=encoding)
+        with etapa("parseo_b22", bytes=len(contenido_b22)):
+            registros, errores = parsear_b22(contenido_b22, encoding=encoding)
         resultado["celdas_errores"] += len(errores)
-        for reg in registros:
-            try:
-                accion = _upsert_celda(db, tenant_id, empresa_id, reg)
-                if accion == "insertado":
-                    resultado["celdas_insertadas"] += 1
-                else:
-                    resultado["celdas_actualizadas"] += 1
-            except Exception:
-                db.rollback()
-                resultado["celdas_errores"] += 1
-        db.commit()
+        with etapa("escritura_b22", filas=len(registros)):
+            for reg in registros:
+                try:
+                    accion = _upsert_celda(db, tenant_id, empresa_id, reg)
+                    if accion == "insertado":
+                        resultado["celdas_insertadas"] += 1
+                    else:
+                        resultado["celdas_actualizadas"] += 1
+                except Exception:
+                    db.rollback()
+                    resultado["celdas_errores"] += 1
+            db.commit()
         resultado["ficheros"].append("B22")
 
     if contenido_a1:
-        registros, errores = parsear_a1(contenido_a1, encoding=encoding, utm_zone=utm_zone)
+        with etapa("parseo_a1", bytes=len(contenido_a1)):
+            registros, errores = parsear_a1(contenido_a1, encoding=encoding, utm_zone=utm_zone)
         resultado["cups_errores"] += len(errores)
-        for reg in registros:
-            try:
-                accion = _upsert_cups(db, tenant_id, empresa_id, anio_declaracion, reg)
-                if accion == "insertado":
-                    resultado["cups_insertados"] += 1
-                else:
-                    resultado["cups_actualizados"] += 1
-            except Exception:
-                db.rollback()
-                resultado["cups_errores"] += 1
-        db.commit()
+        with etapa("escritura_a1", filas=len(registros)):
+            for reg in registros:
+                try:
+                    accion = _upsert_cups(db, tenant_id, empresa_id, anio_declaracion, reg)
+                    if accion == "insertado":
+                        resultado["cups_insertados"] += 1
+                    else:
+                        resultado["cups_actualizados"] += 1
+                except Exception:
+                    db.rollback()
+                    resultado["cups_errores"] += 1
+            db.commit()
         resultado["ficheros"].append("A1")
 
     if contenido_b1:
-        texto = contenido_b1.decode(encoding, errors="replace")
-        for reg in parsear_b1(texto):
-            try:
-                accion = _upsert_linea(db, tenant_id, empresa_id, anio_declaracion, reg)
-                if accion == "insertado":
-                    resultado["lineas_insertadas"] += 1
-                elif accion == "actualizado":
-                    resultado["lineas_actualizadas"] += 1
-                else:
+        with etapa("parseo_b1", bytes=len(contenido_b1)):
+            texto = contenido_b1.decode(encoding, errors="replace")
+            registros_b1 = parsear_b1(texto)
+        with etapa("escritura_b1", filas=len(registros_b1)):
+            for reg in registros_b1:
+                try:
+                    accion = _upsert_linea(db, tenant_id, empresa_id, anio_declaracion, reg)
+                    if accion == "insertado":
+                        resultado["lineas_insertadas"] += 1
+                    elif accion == "actualizado":
+                        resultado["lineas_actualizadas"] += 1
+                    else:
+                        resultado["lineas_errores"] += 1
+                except Exception:
+                    db.rollback()
                     resultado["lineas_errores"] += 1
-            except Exception:
-                db.rollback()
-                resultado["lineas_errores"] += 1
-        db.commit()
+            db.commit()
         resultado["ficheros"].append("B1")
 
     if contenido_b11:
-        texto = contenido_b11.decode(encoding, errors="replace")
-        for reg in parsear_b11(texto):
-            try:
-                accion = _upsert_tramo(db, tenant_id, empresa_id, anio_declaracion, reg)
-                if accion == "insertado":
-                    resultado["tramos_insertados"] += 1
-                elif accion == "actualizado":
-                    resultado["tramos_actualizados"] += 1
-                else:
+        with etapa("parseo_b11", bytes=len(contenido_b11)):
+            texto = contenido_b11.decode(encoding, errors="replace")
+            registros_b11 = parsear_b11(texto)
+        with etapa("escritura_b11", filas=len(registros_b11)):
+            for reg in registros_b11:
+                try:
+                    accion = _upsert_tramo(db, tenant_id, empresa_id, anio_declaracion, reg)
+                    if accion == "insertado":
+                        resultado["tramos_insertados"] += 1
+                    elif accion == "actualizado":
+                        resultado["tramos_actualizados"] += 1
+                    else:
+                        resultado["tramos_errores"] += 1
+                except Exception:
+                    db.rollback()
                     resultado["tramos_errores"] += 1
-            except Exception:
-                db.rollback()
-                resultado["tramos_errores"] += 1
-        db.commit()
+            db.commit()
         resultado["ficheros"].append("B11")
 
     if contenido_b1 or contenido_b2 or contenido_b11:
-        try:
-            calcular_asociacion_ct(db, tenant_id, empresa_id)
-        except Exception:
-            pass
-        try:
-            calcular_asociacion_ct_mt(db, tenant_id, empresa_id)
-        except Exception:
-            pass
+        with etapa("asociacion_ct_bt"):
+            try:
+                calcular_asociacion_ct(db, tenant_id, empresa_id)
+            except Exception:
+                pass
+        with etapa("asociacion_ct_mt"):
+            try:
+                calcular_asociacion_ct_mt(db, tenant_id, empresa_id)
+            except Exception:
+                pass
 
     return resultado
 
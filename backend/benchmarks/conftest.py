@@ -0,0 +1,242 @@
+# benchmarks/conftest.py
+"""
+Entorno de los benchmarks: PostgreSQL local dedicada + juego de datos
+sintético de `benchmarks.generador`.
+
+Solo se recogen si hay BENCH_DATABASE_URL y pytest-benchmark instalado; así
+`pytest` a secas en backend/ no los ejecuta nunca. La BD se BORRA entera al
+empezar (DROP SCHEMA public + `alembic upgrade head`), por eso su nombre
+tiene que contener "bench".
+
+    pip install pytest-benchmark
+    export BENCH_DATABASE_URL=postgresql://localhost/app_medidas_bench
+    python -m pytest benchmarks --benchmark-autosave          # línea base
+    python -m pytest benchmarks --benchmark-autosave \\
+        --benchmark-compare --benchmark-compare-fail=median:15%
+
+`--benchmark-autosave` guarda cada ejecución como JSON en .benchmarks/
+(`--benchmark-json=fichero.json` para una ruta concreta) y
+`--benchmark-compare` compara con la última guardada.
+
+Escala (variables de entorno, por defecto entre paréntesis):
+BENCH_EMPRESAS (1), BENCH_CUPS (5000, por empresa), BENCH_CTS (50),
+BENCH_MESES (12), BENCH_SEMILLA (2024) y BENCH_RONDAS (5).
+
+Carga: todos los meses menos el último se ingieren al preparar la sesión,
+con la topología, un día de S02/S24 y el calendario REE. El último mes es
+el que ingieren los benchmarks de ingestión (cada ronda borra la anterior).
+"""
+from __future__ import annotations
+
+import importlib.util
+import os
+import shutil
+from collections.abc import Generator
+from dataclasses import dataclass, field
+from pathlib import Path
+from typing import Any, Dict, List, Tuple
+
+import pytest
+
+
+BENCH_DATABASE_URL = os.environ.get("BENCH_DATABASE_URL", "").strip()
+
+if not BENCH_DATABASE_URL or importlib.util.find_spec("pytest_benchmark") is None:
+    collect_ignore_glob = ["test_*.py"]
+else:
+    # Antes de importar la app: get_settings() se cachea y app.core.db crea
+    # el engine al importarse.
+    os.environ["DATABASE_URL"] = BENCH_DATABASE_URL
+    # Sin caché de respuestas ni borrado de ficheros: se mide el cálculo real
+    # y el mismo fichero se puede procesar en varias rondas.
+    os.environ["RESPONSE_CACHE_ENABLED"] = "false"
+    os.environ["INGESTION_DELETE_AFTER_OK"] = "false"
+
+
+BACKEND_DIR = Path(__file__).resolve().parent.parent
+
+
+def _entero_env(nombre: str, defecto: int) -> int:
+    return int(os.environ.get(nombre, "") or defecto)
+
+
+@dataclass
+class Dataset:
+    """Lo que los benchmarks necesitan del juego de datos ya cargado."""
+    generador: Any
+    directorio: Path
+    tenant_id: int
+    user_id: int
+    empresa_ids: Dict[int, int]                     # nº de empresa del generador → empresas.id
+    ultimo_periodo: Tuple[int, int]
+    rondas: int
+    ficheros_stg: Dict[Tuple[int, str], List[int]] = field(default_factory=dict)
+
+    def empresa_id(self, empresa: int = 1) -> int:
+        return self.empresa_ids[empresa]
+
+
+def _recrear_esquema() -> None:
+    from alembic import command
+    from alembic.config import Config
+    from sqlalchemy import text
+    from sqlalchemy.engine import make_url
+
+    from app.core.db import engine
+
+    nombre_bd = make_url(BENCH_DATABASE_URL).database or ""
+    if "bench" not in nombre_bd:
+        pytest.exit(f"BENCH_DATABASE_URL debe apuntar a una BD de benchmarks (contiene 'bench'): {nombre_bd!r}")
+
+    with engine.begin() as conn:
+        conn.execute(text("DROP SCHEMA IF EXISTS public CASCADE"))
+        conn.execute(text("CREATE SCHEMA public"))
+    engine.dispose()
+
+    cfg = Config(str(BACKEND_DIR / "alembic.ini"))
+    cfg.set_main_option("script_location", str(BACKEND_DIR / "alembic"))
+    command.upgrade(cfg, "head")
+
+
+def _cargar(generador: Any, directorio: Path) -> Dataset:
+    from app.calendario_ree.models import ReeCalendarEvent, ReeCalendarFile
+    from app.core.db import SessionLocal, engine
+    from app.core.security import get_password_hash
+    from app.empresas.models import Empresa
+    from app.ingestion.models import IngestionFile
+    from app.ingestion.services import process_ingestion_file
+    from app.stg.models import FicheroRecibido
+    from app.stg.particiones import asegurar_particiones
+    from app.stg.services import parsear_fichero
+    from app.tenants.models import Tenant, User
+    from app.topologia.services import importar_topologia
+
+    db = SessionLocal()
+    try:
+        tenant = Tenant(nombre="Bench", plan="starter")
+        db.add(tenant)
+        db.flush()
+        user = User(tenant_id=tenant.id, email="bench@example.com",
+                    password_hash=get_password_hash("bench"), rol="owner", is_active=True)
+        db.add(user)
+        empresa_ids = {}
+        for n in generador.empresas():
+            empresa = Empresa(tenant_id=tenant.id, nombre=f"Empresa bench {n}",
+                              codigo_ree=generador.codigo_distribuidor(n), activo=True)
+            db.add(empresa)
+            db.flush()
+            empresa_ids[n] = int(empresa.id)
+        db.commit()
+
+        dataset = Dataset(
+            generador=generador, directorio=directorio, tenant_id=int(tenant.id), user_id=int(user.id),
+            empresa_ids=empresa_ids, ultimo_periodo=generador.periodos()[-1],
+            rondas=_entero_env("BENCH_RONDAS", 5),
+        )
+        # Como el job diario: particiones de stg_medida creadas de antemano.
+        asegurar_particiones(engine, hoy=generador.dias_stg()[0])
+
+        for n, empresa_id in empresa_ids.items():
+            for tipo, anio, mes, fichero in generador.ficheros_ingestion(n):
+                if (anio, mes) == dataset.ultimo_periodo:
+                    continue
+                ruta = directorio / f"empresa_{n:02d}" / "ingestion" / fichero.nombre
+                ruta.parent.mkdir(parents=True, exist_ok=True)
+                ruta.write_bytes(fichero.contenido)
+                ingestion = IngestionFile(
+                    tenant_id=tenant.id, empresa_id=empresa_id, tipo=tipo, anio=anio, mes=mes,
+                    filename=fichero.nombre, storage_key=str(ruta), uploaded_by=user.id,
+                    status=IngestionFile.STATUS_PENDING,
+                )
+                db.add(ingestion)
+                db.commit()
+                resultado = process_ingestion_file(db=db, ingestion=ingestion, tenant_id=int(tenant.id))
+                if resultado.status != IngestionFile.STATUS_OK:
+                    raise RuntimeError(f"{fichero.nombre}: {resultado.error_message}")
+
+            topologia = generador.ficheros_topologia(n)
+            importar_topologia(
+                db, int(tenant.id), empresa_id, dataset.ultimo_periodo[0],
+                contenido_b2=topologia["b2"].contenido, contenido_a1=topologia["a1"].contenido,
+                contenido_b1=topologia["b1"].contenido, contenido_b11=topologia["b11"].contenido,
+            )
+
+            for tipo, fichero in generador.ficheros_stg(n):
+                ruta = directorio / f"empresa_{n:02d}" / "stg" / fichero.nombre
+                ruta.parent.mkdir(parents=True, exist_ok=True)
+                ruta.write_bytes(fichero.contenido)
+                recibido = FicheroRecibido(
+                    tenant_id=tenant.id, empresa_id=empresa_id, tipo_fichero=tipo, tipo_mensaje=tipo,
+                    path=str(ruta), nombre_original=fichero.nombre, tamano_bytes=len(fichero.contenido),
+                )
+                db.add(recibido)
+                db.commit()
+                parseo = parsear_fichero(db, user, int(recibido.id))
+                if parseo.get("error"):
+                    raise RuntimeError(f"{fichero.nombre}: {parseo['error']}")
+                dataset.ficheros_stg.setdefault((n, tipo), []).append(int(recibido.id))
+
+        archivos: Dict[int, int] = {}
+        eventos = generador.eventos_ree()
+        for anio in sorted({ev["anio"] for ev in eventos}):
+            archivo = ReeCalendarFile(tenant_id=tenant.id, anio=anio, filename=f"calendario_ree_{anio}.xlsx",
+                                      status=ReeCalendarFile.STATUS_ACTIVE, is_active=True, uploaded_by=user.id)
+            db.add(archivo)
+            db.flush()
+            archivos[anio] = int(archivo.id)
+        db.add_all([ReeCalendarEvent(tenant_id=tenant.id, calendar_file_id=archivos[ev["anio"]], **ev)
+                    for ev in eventos])
+        db.commit()
+        return dataset
+    finally:
+        db.close()
+
+
+@pytest.fixture(scope="session")
+def dataset(tmp_path_factory: pytest.TempPathFactory) -> Generator[Dataset, None, None]:
+    from benchmarks.generador import Escala, Generador
+
+    escala = Escala(
+        empresas=_entero_env("BENCH_EMPRESAS", 1),
+        cups=_entero_env("BENCH_CUPS", 5_000),
+        cts=_entero_env("BENCH_CTS", 50),
+        meses=_entero_env("BENCH_MESES", 12),
+        semilla=_entero_env("BENCH_SEMILLA", 2024),
+    )
+    directorio = tmp_path_factory.mktemp("bench_dataset")
+    _recrear_esquema()
+    yield _cargar(Generador(escala), directorio)
+    shutil.rmtree(directorio, ignore_errors=True)
+
+
+@pytest.fixture
+def db(dataset: Dataset):
+    from app.core.db import SessionLocal
+
+    session = SessionLocal()
+    try:
+        yield session
+    finally:
+        session.rollback()
+        session.close()
+
+
+@pytest.fixture
+def usuario(db, dataset: Dataset):
+    from app.tenants.models import User
+
+    return db.get(User, dataset.user_id)
+
+
+@pytest.fixture(scope="session")
+def cliente(dataset: Dataset):
+    """TestClient autenticado contra la app real (sin lifespan: sin scheduler)."""
+    from fastapi.testclient import TestClient
+
+    from app.core.auth import create_access_token
+    from app.main import app
+
+    token = create_access_token({"sub": str(dataset.user_id), "tenant_id": dataset.tenant_id})
+    client = TestClient(app)
+    client.headers["Authorization"] = f"Bearer {token}"
+    return client
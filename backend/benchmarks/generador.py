@@ -0,0 +1,658 @@
+# benchmarks/generador.py
+"""
+Generador determinista de datos sintéticos para los benchmarks.
+
+Produce, a partir de una `Escala` (empresas, CUPS y CTs por empresa, meses),
+los mismos ficheros que llegan en producción y que leen los procesadores
+reales:
+
+  - Ingestión (app/ingestion/services.py): M1 y PS (CSV ';' con cabecera),
+    BALD, ACUMCIL y ACUM H2 GRD/GEN/RDD (CSV ';' sin cabecera, columnas
+    BALD_COLUMNS, ACUMCIL_H2_COLUMNS y ACUM_H2_*_COLUMNS). Los nombres
+    siguen los patrones de los que se infiere el periodo.
+  - STG (app/stg/services.py): S02 (curva horaria por contador) y S24
+    (estado de los contadores) por concentrador y día, en el XML que
+    entiende primestg.
+  - Topología CNMC 8/2021 (app/topologia/parsers): B2 (CTs), A1 (CUPS),
+    B1 (tramos) y B11 (segmentos), latin-1 sin cabecera. La red es
+    coherente: anillo MT desde una subestación por los `nudo_alta` de los
+    CTs, salidas BT desde cada `nudo_baja` y cada CUPS colgado de su nudo,
+    así que `calcular_asociacion_ct` recorre la red completa.
+  - Calendario REE: los eventos que persiste la subida del calendario
+    (`ree_calendar_events`) para los meses de la escala, con los textos
+    que clasifica `app.calendario_ree.services_indice`.
+
+Cada fichero usa su propio `random.Random` sembrado con (semilla, tipo,
+empresa, periodo): la misma escala da siempre los mismos bytes, y generar
+un fichero no depende de qué otros se hayan generado antes.
+
+Uso:
+
+    python -m benchmarks.generador --empresas 2 --cups 5000 --cts 40 \\
+        --meses 12 --salida /tmp/bench_dataset
+"""
+from __future__ import annotations
+
+import argparse
+import calendar
+import json
+import random
+from dataclasses import dataclass
+from datetime import date, timedelta
+from functools import cached_property
+from pathlib import Path
+from typing import Any, Dict, Iterator, List, Optional, Tuple
+
+
+# ── Catálogos ────────────────────────────────────────────────────────────────
+
+# (tarifa, peso en el parque, tipo de punto / póliza, consumo anual kWh min-max)
+_TARIFAS: Tuple[Tuple[str, float, str, Tuple[int, int]], ...] = (
+    ("2.0TD", 0.85, "5", (1_500, 6_000)),
+    ("3.0TD", 0.12, "4", (15_000, 90_000)),
+    ("6.1TD", 0.03, "3", (250_000, 1_200_000)),
+)
+_COD_TFA = {"2.0TD": "2T", "3.0TD": "3T", "6.1TD": "6T"}
+
+# Reparto mensual del consumo (suma 12): picos en invierno y julio-agosto.
+_ESTACIONALIDAD = (1.22, 1.10, 0.98, 0.88, 0.86, 0.94, 1.08, 1.06, 0.92, 0.88, 0.98, 1.10)
+
+# Perfil horario de un día laborable (suma 1).
+_PERFIL_HORARIO = tuple(p / 100 for p in (
+    2.6, 2.2, 2.0, 1.9, 1.9, 2.1, 3.0, 4.2, 4.8, 4.6, 4.5, 4.6,
+    4.7, 4.8, 4.5, 4.1, 4.0, 4.3, 5.0, 5.8, 6.2, 6.0, 5.0, 3.2,
+))
+
+_FABRICANTES = ("ZIV", "SAG", "ORB", "CIR")
+_LETRAS_CUPS = "TRWAGMYFPDXBNJZSQVHLCKE"
+
+# Centro de la malla UTM ETRS89 huso 30 (zona de Madrid).
+_UTM_X0 = 440_000.0
+_UTM_Y0 = 4_474_000.0
+
+_MESES_ES = (
+    "Enero", "Febrero", "Marzo", "Abril", "Mayo", "Junio", "Julio",
+    "Agosto", "Septiembre", "Octubre", "Noviembre", "Diciembre",
+)
+
+# Ventana BALD → meses entre el periodo y la publicación (ver
+# `_clasificar_bald_periodo`).
+VENTANAS_BALD = {"M2": 2, "M7": 7, "M11": 11, "ART15": 15}
+
+# Tipos de `IngestionFile` que genera `ficheros_ingestion`, en orden de carga.
+TIPOS_INGESTION = ("M1", "PS", "BALD", "ACUMCIL", "ACUM_H2_GRD", "ACUM_H2_GEN", "ACUM_H2_RDD_P1")
+
+
+# ── Escala y entidades ───────────────────────────────────────────────────────
+
+@dataclass(frozen=True)
+class Escala:
+    """Tamaño del juego de datos. `cups` y `cts` son por empresa."""
+    empresas: int = 1
+    cups: int = 1_000
+    cts: int = 20
+    meses: int = 12
+    anio_inicio: int = 2025
+    mes_inicio: int = 1
+    salidas_bt: int = 4
+    dias_stg: int = 1
+    semilla: int = 2024
+
+    def __post_init__(self) -> None:
+        if min(self.empresas, self.cups, self.cts, self.meses, self.salidas_bt, self.dias_stg) < 1:
+            raise ValueError("Todos los tamaños de la escala deben ser >= 1")
+        if not 1 <= self.mes_inicio <= 12:
+            raise ValueError(f"mes_inicio fuera de rango: {self.mes_inicio}")
+
+
+@dataclass(frozen=True)
+class Fichero:
+    nombre: str
+    contenido: bytes
+
+
+@dataclass(frozen=True)
+class CentroTransformacion:
+    indice: int
+    id_ct: str
+    nudo_alta: str
+    nudo_baja: str
+    concentrador: str
+    potencia_kva: int
+    utm_x: float
+    utm_y: float
+
+
+@dataclass(frozen=True)
+class Suministro:
+    indice: int
+    cups: str
+    contador: str
+    tarifa: str
+    poliza: str
+    consumo_anual_kwh: float
+    ct: int
+    salida: int
+    nudo: str
+    utm_x: float
+    utm_y: float
+
+    @property
+    def es_mt(self) -> bool:
+        return self.tarifa == "6.1TD"
+
+
+@dataclass(frozen=True)
+class Tramo:
+    id_tramo: str
+    nudo_inicio: str
+    nudo_fin: str
+    tension_kv: float
+    longitud_km: float
+    utm_ini: Tuple[float, float]
+    utm_fin: Tuple[float, float]
+
+
+# ── Utilidades de formato ────────────────────────────────────────────────────
+
+def cups_valido(codigo_distribuidor: str, numero: int) -> str:
+    """CUPS de 20 caracteres con las letras de control correctas."""
+    digitos = f"{codigo_distribuidor}{numero:012d}"
+    resto = int(digitos) % 529
+    return f"ES{digitos}{_LETRAS_CUPS[resto // 23]}{_LETRAS_CUPS[resto % 23]}"
+
+
+def _dec(valor: float, decimales: int = 3) -> str:
+    """Decimal con coma, como en los ficheros CNMC."""
+    return f"{valor:.{decimales}f}".replace(".", ",")
+
+
+def _ddmmaaaa(d: date) -> str:
+    return d.strftime("%d/%m/%Y")
+
+
+def _sumar_meses(anio: int, mes: int, n: int) -> Tuple[int, int]:
+    total = anio * 12 + (mes - 1) + n
+    return total // 12, total % 12 + 1
+
+
+def _ultimo_dia(anio: int, mes: int) -> date:
+    return date(anio, mes, calendar.monthrange(anio, mes)[1])
+
+
+def _csv(filas: List[List[str]], cabecera: Optional[List[str]] = None, encoding: str = "utf-8") -> bytes:
+    lineas = [";".join(cabecera)] if cabecera else []
+    lineas.extend(";".join(f) for f in filas)
+    return ("\n".join(lineas) + "\n").encode(encoding)
+
+
+def _temporada(d: date) -> str:
+    """Sufijo de temporada de primestg: S (verano, abr-oct) o W (invierno)."""
+    return "S" if 4 <= d.month <= 10 else "W"
+
+
+# ── Generador ────────────────────────────────────────────────────────────────
+
+class Generador:
+    """Genera los ficheros de una `Escala`. Las entidades se calculan una vez."""
+
+    def __init__(self, escala: Escala) -> None:
+        self.escala = escala
+
+    def _rng(self, *clave: Any) -> random.Random:
+        return random.Random(":".join(str(p) for p in (self.escala.semilla, *clave)))
+
+    # ── Entidades ────────────────────────────────────────────────────────────
+
+    def empresas(self) -> range:
+        return range(1, self.escala.empresas + 1)
+
+    @staticmethod
+    def codigo_distribuidor(empresa: int) -> str:
+        return f"{276 + empresa:04d}"
+
+    def periodos(self) -> List[Tuple[int, int]]:
+        e = self.escala
+        return [_sumar_meses(e.anio_inicio, e.mes_inicio, i) for i in range(e.meses)]
+
+    @property
+    def hoy(self) -> date:
+        """Fecha de referencia (estado de los hitos REE): el mes siguiente al último."""
+        anio, mes = _sumar_meses(*self.periodos()[-1], 1)
+        return date(anio, mes, 1)
+
+    @cached_property
+    def _cts(self) -> Dict[int, List[CentroTransformacion]]:
+        return {e: self._generar_cts(e) for e in self.empresas()}
+
+    @cached_property
+    def _suministros(self) -> Dict[int, List[Suministro]]:
+        return {e: self._generar_suministros(e) for e in self.empresas()}
+
+    def cts(self, empresa: int) -> List[CentroTransformacion]:
+        return self._cts[empresa]
+
+    def suministros(self, empresa: int) -> List[Suministro]:
+        return self._suministros[empresa]
+
+    def _origen(self, empresa: int) -> Tuple[float, float]:
+        # Cada empresa en su propia zona, separadas 30 km.
+        return _UTM_X0 + (empresa - 1) * 30_000.0, _UTM_Y0
+
+    def _generar_cts(self, empresa: int) -> List[CentroTransformacion]:
+        rng = self._rng("cts", empresa)
+        x0, y0 = self._origen(empresa)
+        lado = max(1, round(self.escala.cts ** 0.5))
+        cts = []
+        for i in range(self.escala.cts):
+            fila, col = divmod(i, lado)
+            cts.append(CentroTransformacion(
+                indice=i,
+                id_ct=f"CT{empresa:02d}{i + 1:06d}",
+                nudo_alta=f"NA{empresa:02d}{i + 1:06d}",
+                nudo_baja=f"NB{empresa:02d}{i + 1:06d}",
+                concentrador=f"CIR{empresa:02d}{i + 1:08d}",
+                potencia_kva=rng.choice((250, 400, 630, 1000)),
+                utm_x=round(x0 + col * 600.0 + rng.uniform(-50, 50), 3),
+                utm_y=round(y0 + fila * 600.0 + rng.uniform(-50, 50), 3),
+            ))
+        return cts
+
+    def _generar_suministros(self, empresa: int) -> List[Suministro]:
+        rng = self._rng("suministros", empresa)
+        dist = self.codigo_distribuidor(empresa)
+        cts = self.cts(empresa)
+        pesos = [t[1] for t in _TARIFAS]
+        suministros = []
+        for n in range(self.escala.cups):
+            tarifa, _, poliza, (cmin, cmax) = rng.choices(_TARIFAS, weights=pesos)[0]
+            ct = cts[n % len(cts)]
+            salida = (n // len(cts)) % self.escala.salidas_bt
+            # Las acometidas de cada salida se alejan del CT en una dirección.
+            paso = n // (len(cts) * self.escala.salidas_bt) + 1
+            dx, dy = ((1, 0), (0, 1), (-1, 0), (0, -1))[salida % 4]
+            suministros.append(Suministro(
+                indice=n,
+                cups=cups_valido(dist, empresa * 10_000_000 + n + 1),
+                contador=f"{_FABRICANTES[n % len(_FABRICANTES)]}{empresa:02d}{n + 1:08d}",
+                tarifa=tarifa,
+                poliza=poliza,
+                consumo_anual_kwh=round(rng.uniform(cmin, cmax), 1),
+                ct=ct.indice,
+                salida=salida,
+                nudo=f"N{empresa:02d}{n + 1:08d}",
+                utm_x=round(ct.utm_x + dx * paso * 25.0 + rng.uniform(-5, 5), 3),
+                utm_y=round(ct.utm_y + dy * paso * 25.0 + rng.uniform(-5, 5), 3),
+            ))
+        return suministros
+
+    def consumo_mensual(self, s: Suministro, anio: int, mes: int) -> float:
+        rng = self._rng("consumo", s.cups, anio, mes)
+        return round(s.consumo_anual_kwh / 12 * _ESTACIONALIDAD[mes - 1] * rng.uniform(0.85, 1.15), 3)
+
+    # ── Ingestión: M1 y PS ───────────────────────────────────────────────────
+
+    def m1(self, empresa: int, anio: int, mes: int) -> Fichero:
+        """M1 del periodo. ~2 % de filas son refacturas del mes anterior."""
+        rng = self._rng("m1", empresa, anio, mes)
+        anio_ant, mes_ant = _sumar_meses(anio, mes, -1)
+        filas = []
+        for s in self.suministros(empresa):
+            filas.append([s.cups, date(anio, mes, 1).isoformat(), _ultimo_dia(anio, mes).isoformat(),
+                          f"{self.consumo_mensual(s, anio, mes):.3f}"])
+            if rng.random() < 0.02:
+                filas.append([s.cups, date(anio_ant, mes_ant, 1).isoformat(),
+                              _ultimo_dia(anio_ant, mes_ant).isoformat(), f"{rng.uniform(-40, 60):.3f}"])
+        publicacion = _sumar_meses(anio, mes, 1)
+        nombre = f"M1_{self.codigo_distribuidor(empresa)}_{anio}{mes:02d}_{publicacion[0]}{publicacion[1]:02d}05.txt"
+        return Fichero(nombre, _csv(filas, ["CUPS", "Fecha_inicio", "Fecha_final", "Energia_Kwh"]))
+
+    def ps(self, empresa: int, anio: int, mes: int) -> Fichero:
+        """Plantilla PS: energía facturada, importe, tarifa y póliza por CUPS."""
+        rng = self._rng("ps", empresa, anio, mes)
+        fecha_final = _ultimo_dia(anio, mes).isoformat()
+        filas = []
+        for s in self.suministros(empresa):
+            energia = self.consumo_mensual(s, anio, mes)
+            total = energia * rng.uniform(0.12, 0.21) + rng.uniform(8, 40)
+            filas.append([s.cups, s.poliza, s.tarifa, f"{energia:.3f}", f"{total:.2f}", fecha_final])
+        nombre = f"PS_{self.codigo_distribuidor(empresa)}_{anio}{mes:02d}.csv"
+        return Fichero(nombre, _csv(filas, ["CUPS", "Poliza", "Tarifa_acceso", "Energia_facturada", "Total", "Fecha_final"]))
+
+    # ── Ingestión: BALD y ACUM (sin cabecera) ────────────────────────────────
+
+    def bald(self, empresa: int, anio: int, mes: int, ventana: str = "M2") -> Fichero:
+        """BALD del periodo publicado en la ventana indicada (M2/M7/M11/ART15)."""
+        rng = self._rng("bald", empresa, anio, mes, ventana)
+        demanda = sum(self.consumo_mensual(s, anio, mes) for s in self.suministros(empresa))
+        perdidas = demanda * rng.uniform(0.06, 0.10)
+        vertida = demanda * rng.uniform(0.01, 0.03)
+        ed = demanda + perdidas - vertida
+        reparto = [rng.uniform(0.5, 1.5) for _ in range(7)]
+        suministrada = [demanda * r / sum(reparto) for r in reparto]
+        valores = [
+            f"UP{self.codigo_distribuidor(empresa)}", "0", f"{ed:.3f}", f"{vertida * 0.4:.3f}",
+            "0", f"{demanda * 0.003:.3f}", f"{demanda * 0.002:.3f}", f"{demanda * 0.001:.3f}",
+            *(f"{v:.3f}" for v in suministrada),
+            *(f"{vertida / 7:.3f}" for _ in range(7)),
+            f"{demanda:.3f}", f"{vertida:.3f}", f"{demanda - vertida:.3f}", f"{ed:.3f}",
+            f"{perdidas:.3f}", f"{perdidas / ed * 100:.4f}", "",
+        ]
+        pub_anio, pub_mes = _sumar_meses(anio, mes, VENTANAS_BALD[ventana])
+        nombre = f"BALD_{self.codigo_distribuidor(empresa)}_{anio}{mes:02d}_{pub_anio}{pub_mes:02d}10.0"
+        return Fichero(nombre, _csv([valores]))
+
+    def _generadores(self, empresa: int) -> List[Suministro]:
+        # Uno de cada 100 suministros tiene autoconsumo con CIL.
+        return self.suministros(empresa)[::100]
+
+    def acumcil(self, empresa: int, anio: int, mes: int) -> Fichero:
+        rng = self._rng("acumcil", empresa, anio, mes)
+        dist = self.codigo_distribuidor(empresa)
+        horas = calendar.monthrange(anio, mes)[1] * 24
+        sig_anio, sig_mes = _sumar_meses(anio, mes, 1)
+        filas = []
+        for s in self._generadores(empresa):
+            generada = s.consumo_anual_kwh / 12 * rng.uniform(0.3, 0.9)
+            for magnitud, valor in (("AS", generada), ("AE", generada * 0.01)):
+                filas.append([
+                    f"{s.cups}1F001", dist, f"UP{dist}", "5", "28",
+                    f"{anio}/{mes:02d}/01 01", f"{sig_anio}/{sig_mes:02d}/01 00", magnitud,
+                    "0", "0", "0", "0", f"{valor:.3f}", str(horas), "",
+                ])
+        pub = date(sig_anio, sig_mes, 7).strftime("%Y%m%d")
+        return Fichero(f"ACUMCIL_H2_{dist}_{anio}{mes:02d}_{pub}.0", _csv(filas))
+
+    def acum_h2(self, empresa: int, anio: int, mes: int, subtipo: str = "GRD") -> Fichero:
+        """ACUM H2 GRD/GEN/RDD: acumulados AE y AS por punto frontera."""
+        rng = self._rng("acum_h2", subtipo, empresa, anio, mes)
+        dist = self.codigo_distribuidor(empresa)
+        horas = calendar.monthrange(anio, mes)[1] * 24
+        fronteras = max(1, self.escala.cts // 5)
+        base = sum(self.consumo_mensual(s, anio, mes) for s in self.suministros(empresa)) / fronteras
+        filas = []
+        for f in range(fronteras):
+            for magnitud, factor in (("AE", 1.05), ("AS", 0.02)):
+                valor = base * factor * rng.uniform(0.9, 1.1)
+                filas.append([
+                    f"PF{dist}{subtipo}{f + 1:05d}", magnitud, "0", "0", "0", "0",
+                    f"{valor:.3f}", str(horas), f"{valor:.3f}", str(horas), "",
+                ])
+        sig_anio, sig_mes = _sumar_meses(anio, mes, 1)
+        pub = date(sig_anio, sig_mes, 7).strftime("%Y%m%d")
+        return Fichero(f"ACUM_H2_{subtipo}_{dist}_{anio}{mes:02d}_{pub}.0", _csv(filas))
+
+    def fichero_ingestion(self, empresa: int, tipo: str, anio: int, mes: int) -> Fichero:
+        """Fichero del periodo para un tipo de `IngestionFile` (ver TIPOS_INGESTION)."""
+        if tipo == "M1":
+            return self.m1(empresa, anio, mes)
+        if tipo == "PS":
+            return self.ps(empresa, anio, mes)
+        if tipo == "BALD":
+            return self.bald(empresa, anio, mes)
+        if tipo == "ACUMCIL":
+            return self.acumcil(empresa, anio, mes)
+        if tipo.startswith("ACUM_H2_"):
+            return self.acum_h2(empresa, anio, mes, tipo.split("_")[2])
+        raise ValueError(f"Tipo de ingestión no soportado por el generador: {tipo}")
+
+    def ficheros_ingestion(self, empresa: int) -> Iterator[Tuple[str, int, int, Fichero]]:
+        """(tipo de IngestionFile, anio, mes, fichero) de todos los periodos."""
+        for anio, mes in self.periodos():
+            for tipo in TIPOS_INGESTION:
+                yield tipo, anio, mes, self.fichero_ingestion(empresa, tipo, anio, mes)
+
+    # ── STG: S02 y S24 ───────────────────────────────────────────────────────
+
+    def _contadores_ct(self, empresa: int, ct: int) -> List[Suministro]:
+        return [s for s in self.suministros(empresa) if s.ct == ct]
+
+    def s02(self, empresa: int, ct: int, dia: date) -> Fichero:
+        """Curva horaria (Wh) de todos los contadores del concentrador del CT."""
+        rng = self._rng("s02", empresa, ct, dia)
+        cnc = self.cts(empresa)[ct].concentrador
+        temporada = _temporada(dia)
+        partes = [f'<Report IdRpt="S02" IdPet="0" Version="3.4.c"><Cnc Id="{cnc}">']
+        for s in self._contadores_ct(empresa, ct):
+            diario_wh = self.consumo_mensual(s, dia.year, dia.month) / 30 * 1000
+            partes.append(f'<Cnt Id="{s.contador}" Magn="1">')
+            for hora, peso in enumerate(_PERFIL_HORARIO):
+                ai = int(diario_wh * peso * rng.uniform(0.7, 1.3))
+                partes.append(
+                    f'<S02 Fh="{dia:%Y%m%d}{hora:02d}0000000{temporada}" Bc="00" AI="{ai}" AE="0" '
+                    f'R1="{ai // 5}" R2="0" R3="0" R4="{ai // 40}"/>'
+                )
+            partes.append("</Cnt>")
+        partes.append("</Cnc></Report>")
+        return Fichero(f"{cnc}_0_S02_0_{dia:%Y%m%d}010000", "".join(partes).encode("utf-8"))
+
+    def s24(self, empresa: int, ct: int, dia: date) -> Fichero:
+        """Estado de comunicación de los contadores del concentrador del CT."""
+        rng = self._rng("s24", empresa, ct, dia)
+        cnc = self.cts(empresa)[ct].concentrador
+        temporada = _temporada(dia)
+        partes = [
+            f'<Report IdRpt="S24" IdPet="0" Version="3.4.c"><Cnc Id="{cnc}">'
+            f'<S24 Fh="{dia:%Y%m%d}010000000{temporada}">'
+        ]
+        for s in self._contadores_ct(empresa, ct):
+            estado = "1" if rng.random() < 0.95 else "0"
+            activo = "Y" if rng.random() < 0.98 else "N"
+            partes.append(
+                f'<Meter MeterId="{s.contador}" ComStatus="{estado}" '
+                f'Date="{dia:%Y%m%d}000000000{temporada}" Active="{activo}"/>'
+            )
+        partes.append("</S24></Cnc></Report>")
+        return Fichero(f"{cnc}_0_S24_0_{dia:%Y%m%d}010000", "".join(partes).encode("utf-8"))
+
+    def dias_stg(self) -> List[date]:
+        anio, mes = self.periodos()[-1]
+        return [date(anio, mes, 1) + timedelta(days=d) for d in range(self.escala.dias_stg)]
+
+    def ficheros_stg(self, empresa: int) -> Iterator[Tuple[str, Fichero]]:
+        """(tipo, fichero) de S02 y S24 de cada concentrador en `dias_stg` días."""
+        for dia in self.dias_stg():
+            for ct in self.cts(empresa):
+                yield "S02", self.s02(empresa, ct.indice, dia)
+                yield "S24", self.s24(empresa, ct.indice, dia)
+
+    # ── Topología CNMC 8/2021 ────────────────────────────────────────────────
+
+    def subestacion(self, empresa: int) -> str:
+        return f"SE{empresa:02d}"
+
+    def tramos(self, empresa: int) -> List[Tramo]:
+        """Anillo MT por los CTs, acometidas MT de 6.1TD y salidas BT en cadena."""
+        rng = self._rng("tramos", empresa)
+        cts = self.cts(empresa)
+        x0, y0 = self._origen(empresa)
+        tramos: List[Tramo] = []
+
+        def _tramo(prefijo: str, ini: str, fin: str, kv: float,
+                   p_ini: Tuple[float, float], p_fin: Tuple[float, float]) -> None:
+            dist_m = ((p_fin[0] - p_ini[0]) ** 2 + (p_fin[1] - p_ini[1]) ** 2) ** 0.5
+            tramos.append(Tramo(
+                id_tramo=f"{prefijo}{empresa:02d}{len(tramos) + 1:08d}",
+                nudo_inicio=ini, nudo_fin=fin, tension_kv=kv,
+                longitud_km=round(max(dist_m, 5.0) * rng.uniform(1.05, 1.25) / 1000, 3),
+                utm_ini=p_ini, utm_fin=p_fin,
+            ))
+
+        anterior, p_anterior = self.subestacion(empresa), (x0 - 1_000.0, y0 - 1_000.0)
+        for ct in cts:
+            _tramo("LMT", anterior, ct.nudo_alta, 20.0, p_anterior, (ct.utm_x, ct.utm_y))
+            anterior, p_anterior = ct.nudo_alta, (ct.utm_x, ct.utm_y)
+
+        ultimo_nudo: Dict[Tuple[int, int], Tuple[str, Tuple[float, float]]] = {}
+        for s in self.suministros(empresa):
+            ct = cts[s.ct]
+            if s.es_mt:
+                _tramo("LMT", ct.nudo_alta, s.nudo, 20.0, (ct.utm_x, ct.utm_y), (s.utm_x, s.utm_y))
+                continue
+            ini, p_ini = ultimo_nudo.get((s.ct, s.salida), (ct.nudo_baja, (ct.utm_x, ct.utm_y)))
+            _tramo("LBT", ini, s.nudo, 0.4, p_ini, (s.utm_x, s.utm_y))
+            ultimo_nudo[(s.ct, s.salida)] = (s.nudo, (s.utm_x, s.utm_y))
+        return tramos
+
+    def topologia_b2(self, empresa: int, anio_declaracion: int) -> Fichero:
+        rng = self._rng("b2", empresa)
+        filas = []
+        for ct in self.cts(empresa):
+            aps = date(rng.randint(1975, anio_declaracion - 1), rng.randint(1, 12), rng.randint(1, 28))
+            filas.append([
+                ct.id_ct, "I28C2B2M", f"CT {ct.id_ct}", "TI-23U", ct.nudo_alta, ct.nudo_baja,
+                _dec(20.0), _dec(20.0), _dec(ct.potencia_kva), _dec(ct.utm_x), _dec(ct.utm_y), "0",
+                "0796", "28", "13", "U", "0", "I", "0", _ddmmaaaa(aps), "0", "", "", "0",
+                *(_dec(0.0, 2) for _ in range(7)), _dec(0.0, 2), "", "", "0", "",
+            ])
+        return Fichero(f"CIR8_2021_B2_R1-{self.codigo_distribuidor(empresa)}_{anio_declaracion}.txt",
+                       _csv(filas, encoding="latin-1"))
+
+    def topologia_a1(self, empresa: int, anio_declaracion: int) -> Fichero:
+        rng = self._rng("a1", empresa)
+        filas = []
+        for s in self.suministros(empresa):
+            potencia = {"2.0TD": 4.6, "3.0TD": 30.0, "6.1TD": 450.0}[s.tarifa]
+            alta = date(rng.randint(2015, anio_declaracion - 1), rng.randint(1, 12), rng.randint(1, 28))
+            filas.append([
+                s.nudo, _dec(s.utm_x), _dec(s.utm_y), "0", "9820", _COD_TFA[s.tarifa], s.cups,
+                "0796", "28", "U", "S" if s.es_mt else "A", _dec(20.0 if s.es_mt else 0.4), "0",
+                _dec(potencia), _dec(potencia), _dec(s.consumo_anual_kwh), _dec(s.consumo_anual_kwh * 0.1),
+                "0", "I28A2L2M", _ddmmaaaa(alta), "12", "0", "0", "0", "12", "", "", "", "0",
+                _dec(0.0), _dec(0.0),
+            ])
+        return Fichero(f"CIR8_2021_A1_R1-{self.codigo_distribuidor(empresa)}_{anio_declaracion}.txt",
+                       _csv(filas, encoding="latin-1"))
+
+    def topologia_b1(self, empresa: int, anio_declaracion: int) -> Fichero:
+        filas = []
+        for t in self.tramos(empresa):
+            mt = t.tension_kv > 1.0
+            filas.append([
+                t.id_tramo, "I20A2D2M" if mt else "I20B1C2M", "TI-1UX" if mt else "TI-3UX",
+                t.nudo_inicio, t.nudo_fin, "13", "13", "1", _dec(t.tension_kv), _dec(t.tension_kv),
+                _dec(t.longitud_km), _dec(t.longitud_km * (0.32 if mt else 0.21)),
+                _dec(t.longitud_km * 0.1), _dec(400.0 if mt else 260.0), "", "0", "I", "1",
+                "01/01/2010", "0", "",
+            ])
+        return Fichero(f"CIR8_2021_B1_R1-{self.codigo_distribuidor(empresa)}_{anio_declaracion}.txt",
+                       _csv(filas, encoding="latin-1"))
+
+    def topologia_b11(self, empresa: int, anio_declaracion: int) -> Fichero:
+        filas = [
+            [f"S{t.id_tramo}", t.id_tramo, "1", "1", _dec(t.utm_ini[0]), _dec(t.utm_ini[1]), "0",
+             _dec(t.utm_fin[0]), _dec(t.utm_fin[1]), "0"]
+            for t in self.tramos(empresa)
+        ]
+        return Fichero(f"CIR8_2021_B11_R1-{self.codigo_distribuidor(empresa)}_{anio_declaracion}.txt",
+                       _csv(filas, encoding="latin-1"))
+
+    def ficheros_topologia(self, empresa: int, anio_declaracion: Optional[int] = None) -> Dict[str, Fichero]:
+        """Ficheros por formulario, en las claves de `importar_topologia`."""
+        anio = anio_declaracion or self.periodos()[-1][0]
+        return {
+            "b2": self.topologia_b2(empresa, anio),
+            "a1": self.topologia_a1(empresa, anio),
+            "b1": self.topologia_b1(empresa, anio),
+            "b11": self.topologia_b11(empresa, anio),
+        }
+
+    # ── Calendario REE ───────────────────────────────────────────────────────
+
+    def eventos_ree(self) -> List[Dict[str, Any]]:
+        """
+        Filas de `ree_calendar_events` de los meses de la escala: cierres
+        M+1, M+2, provisional (M+7), definitivo (M+11) y art. 15, más el fin
+        de recepción y resolución de objeciones de los dos últimos.
+        """
+        hitos = (
+            (1, "M+1", "Publicación del cierre M+1"),
+            (2, "M+2", "Publicación del cierre M+2"),
+            (7, "Provisional", "Publicación cierre provisional"),
+            (8, "Provisional", "FIN RECEPCIÓN OBJECIONES"),
+            (8, "Provisional", "FIN RESOLUCIÓN OBJECIONES"),
+            (11, "Definitivo", "Publicación cierre definitivo"),
+            (12, "Definitivo", "FIN RECEPCIÓN OBJECIONES"),
+            (12, "Definitivo", "FIN RESOLUCIÓN OBJECIONES"),
+            (15, "Art. 15", "Publicación nuevo cierre art. 15"),
+        )
+        hoy = self.hoy
+        eventos = []
+        for anio, mes in self.periodos():
+            for desfase, categoria, evento in hitos:
+                rng = self._rng("ree", anio, mes, desfase, evento)
+                f_anio, f_mes = _sumar_meses(anio, mes, desfase)
+                fecha = date(f_anio, f_mes, rng.randint(5, 20))
+                if fecha < hoy:
+                    estado = "cerrado"
+                elif fecha == hoy:
+                    estado = "hoy"
+                else:
+                    estado = "proximo" if (fecha - hoy).days <= 15 else "pendiente"
+                eventos.append({
+                    "anio": fecha.year,
+                    "fecha": fecha,
+                    "mes_visual": f"{_MESES_ES[fecha.month - 1]} {fecha.year}",
+                    "categoria": categoria,
+                    "evento": evento,
+                    "mes_afectado": f"{_MESES_ES[mes - 1]} {anio}",
+                    "estado": estado,
+                })
+        eventos.sort(key=lambda ev: (ev["fecha"], ev["categoria"], ev["evento"]))
+        for i, ev in enumerate(eventos):
+            ev["sort_order"] = (i + 1) * 10
+        return eventos
+
+    # ── Volcado a disco ──────────────────────────────────────────────────────
+
+    def escribir(self, salida: Path) -> List[Path]:
+        """
+        Escribe todo el juego de datos bajo `salida`:
+        empresa_NN/{ingestion,stg,topologia}/... y ree_calendar_events.json.
+        """
+        escritos: List[Path] = []
+
+        def _guardar(ruta: Path, contenido: bytes) -> None:
+            ruta.parent.mkdir(parents=True, exist_ok=True)
+            ruta.write_bytes(contenido)
+            escritos.append(ruta)
+
+        for empresa in self.empresas():
+            base = salida / f"empresa_{empresa:02d}"
+            for tipo, _, _, fichero in self.ficheros_ingestion(empresa):
+                _guardar(base / "ingestion" / tipo / fichero.nombre, fichero.contenido)
+            for tipo, fichero in self.ficheros_stg(empresa):
+                _guardar(base / "stg" / tipo / fichero.nombre, fichero.contenido)
+            for fichero in self.ficheros_topologia(empresa).values():
+                _guardar(base / "topologia" / fichero.nombre, fichero.contenido)
+
+        eventos = json.dumps(self.eventos_ree(), default=str, ensure_ascii=False, indent=1)
+        _guardar(salida / "ree_calendar_events.json", eventos.encode("utf-8"))
+        return escritos
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--empresas", type=int, default=1)
+    parser.add_argument("--cups", type=int, default=1_000, help="CUPS por empresa")
+    parser.add_argument("--cts", type=int, default=20, help="CTs (y concentradores) por empresa")
+    parser.add_argument("--meses", type=int, default=12)
+    parser.add_argument("--desde", default="2025-01", help="primer periodo AAAA-MM")
+    parser.add_argument("--dias-stg", type=int, default=1, help="días de S02/S24 (último mes)")
+    parser.add_argument("--semilla", type=int, default=2024)
+    parser.add_argument("--salida", type=Path, required=True)
+    args = parser.parse_args()
+
+    anio, mes = (int(p) for p in args.desde.split("-"))
+    escala = Escala(
+        empresas=args.empresas, cups=args.cups, cts=args.cts, meses=args.meses,
+        anio_inicio=anio, mes_inicio=mes, dias_stg=args.dias_stg, semilla=args.semilla,
+    )
+    escritos = Generador(escala).escribir(args.salida)
+    total = sum(p.stat().st_size for p in escritos)
+    print(f"{len(escritos)} ficheros, {total / 1_048_576:.1f} MB en {args.salida}")
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -0,0 +1,35 @@
+# benchmarks/test_bench_calendario_ree.py
+"""
+Calendario REE: reconstrucción del índice en memoria del tenant y consultas
+típicas del dashboard contra el índice ya cargado.
+"""
+from __future__ import annotations
+
+
+def test_recargar_indice(benchmark, db, dataset):
+    from app.calendario_ree import services_indice
+
+    indice = benchmark.pedantic(
+        services_indice.recargar, args=(db,), kwargs={"tenant_id": dataset.tenant_id}, rounds=dataset.rondas,
+    )
+
+    anio, mes = dataset.ultimo_periodo
+    assert indice.en_mes(anio, mes)
+
+
+def test_consultas_indice(benchmark, db, dataset):
+    from app.calendario_ree import services_indice
+
+    indice = services_indice.obtener_indice(db, tenant_id=dataset.tenant_id)
+    periodos = dataset.generador.periodos()
+
+    def _consultar():
+        encontrados = 0
+        for anio, mes in periodos:
+            encontrados += len(indice.en_mes(anio, mes))
+            for tipo in ("M2", "M7", "M11", "ART15"):
+                encontrados += indice.mes_publicado_en(tipo, anio, mes) is not None
+                encontrados += indice.hito_de(tipo, anio, mes) is not None
+        return encontrados
+
+    assert benchmark(_consultar) > 0
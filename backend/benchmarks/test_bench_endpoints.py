@@ -0,0 +1,48 @@
+# benchmarks/test_bench_endpoints.py
+"""
+Endpoints de lectura más usados (dashboard, tablas, mapa de topología,
+calendario REE y agregados STG) contra el juego de datos completo, a través
+de la app real: auth, dependencias y serialización incluidas.
+"""
+from __future__ import annotations
+
+import pytest
+
+
+def _urls(dataset) -> dict:
+    empresa_id = dataset.empresa_id()
+    anio, mes = dataset.ultimo_periodo
+    contador = dataset.generador.suministros(1)[0].contador
+    dia = dataset.generador.dias_stg()[0].isoformat()
+    return {
+        "dashboard_summary": f"/dashboard/summary?empresa_id={empresa_id}&anio={anio}&mes={mes}",
+        "dashboard_energy_trend": f"/dashboard/energy-trend-chart?empresa_id={empresa_id}",
+        "tablas_mensual": f"/dashboard/tablas/mensual?carga_anio={anio}&carga_mes={mes}",
+        "tablas_historico": "/dashboard/tablas/historico",
+        "mapa_cts": f"/topologia/mapa/cts?empresa_id={empresa_id}",
+        "mapa_cups": f"/topologia/mapa/cups?empresa_id={empresa_id}",
+        "tabla_lineas": f"/topologia/tabla/lineas?empresa_id={empresa_id}&limit=500",
+        "calendario_hitos": f"/calendario-ree/dashboard-hitos?anio={anio}&mes={mes}",
+        "calendario_operativo": f"/calendario-ree/operativo?anio={anio}",
+        "stg_diario_contador": (
+            f"/stg/agregados/contador/{contador}/diario?empresa_id={empresa_id}"
+            f"&fecha_desde={dia}&fecha_hasta={dia}"
+        ),
+    }
+
+
+ENDPOINTS = [
+    "dashboard_summary", "dashboard_energy_trend", "tablas_mensual", "tablas_historico",
+    "mapa_cts", "mapa_cups", "tabla_lineas", "calendario_hitos", "calendario_operativo",
+    "stg_diario_contador",
+]
+
+
+@pytest.mark.parametrize("endpoint", ENDPOINTS)
+def test_endpoint(benchmark, cliente, dataset, endpoint):
+    url = _urls(dataset)[endpoint]
+
+    respuesta = benchmark.pedantic(cliente.get, args=(url,), rounds=dataset.rondas, warmup_rounds=1)
+
+    assert respuesta.status_code == 200, respuesta.text[:500]
+    benchmark.extra_info["bytes"] = len(respuesta.content)
@@ -0,0 +1,41 @@
+# benchmarks/test_bench_ingestion.py
+"""
+Ingestión de un mes completo por tipo de fichero (M1, PS, BALD, ACUMCIL y
+ACUM H2). Cada ronda borra la ingestión anterior del mismo tipo y periodo
+(fuera del tiempo medido) y vuelve a procesar el fichero.
+"""
+from __future__ import annotations
+
+import pytest
+
+from benchmarks.generador import TIPOS_INGESTION
+
+
+@pytest.mark.parametrize("tipo", TIPOS_INGESTION)
+def test_process_ingestion_file(benchmark, db, dataset, tipo):
+    from app.ingestion.delete_services import execute_delete
+    from app.ingestion.models import IngestionFile
+    from app.ingestion.services import process_ingestion_file
+
+    anio, mes = dataset.ultimo_periodo
+    empresa_id = dataset.empresa_id()
+    fichero = dataset.generador.fichero_ingestion(1, tipo, anio, mes)
+    ruta = dataset.directorio / "bench_ingestion" / fichero.nombre
+    ruta.parent.mkdir(parents=True, exist_ok=True)
+    ruta.write_bytes(fichero.contenido)
+
+    def _preparar():
+        execute_delete(db, tenant_id=dataset.tenant_id, empresa_id=empresa_id, tipo=tipo, anio=anio, mes=mes)
+        ingestion = IngestionFile(
+            tenant_id=dataset.tenant_id, empresa_id=empresa_id, tipo=tipo, anio=anio, mes=mes,
+            filename=fichero.nombre, storage_key=str(ruta), uploaded_by=dataset.user_id,
+            status=IngestionFile.STATUS_PENDING,
+        )
+        db.add(ingestion)
+        db.commit()
+        return (), {"db": db, "ingestion": ingestion, "tenant_id": dataset.tenant_id}
+
+    resultado = benchmark.pedantic(process_ingestion_file, setup=_preparar, rounds=dataset.rondas)
+
+    assert resultado.status == IngestionFile.STATUS_OK, resultado.error_message
+    benchmark.extra_info["bytes"] = len(fichero.contenido)
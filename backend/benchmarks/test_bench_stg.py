@@ -0,0 +1,21 @@
+# benchmarks/test_bench_stg.py
+"""
+Parseo de ficheros STG (S02 horario y S24 de eventos) de un concentrador
+con todos sus contadores. El re-parseo sustituye las medidas del fichero,
+así que cada ronda hace el trabajo completo.
+"""
+from __future__ import annotations
+
+import pytest
+
+
+@pytest.mark.parametrize("tipo", ["S02", "S24"])
+def test_parsear_fichero(benchmark, db, usuario, dataset, tipo):
+    from app.stg.services import parsear_fichero
+
+    fichero_id = dataset.ficheros_stg[(1, tipo)][0]
+
+    resultado = benchmark.pedantic(parsear_fichero, args=(db, usuario, fichero_id), rounds=dataset.rondas)
+
+    assert not resultado.get("error"), resultado.get("error")
+    benchmark.extra_info["medidas_insertadas"] = resultado.get("medidas_insertadas", 0)
@@ -0,0 +1,43 @@
+# benchmarks/test_bench_topologia.py
+"""
+Importación de topología CNMC 8/2021 (B2, A1, B1 y B11, con la asociación
+CT → CUPS que lanza) en una empresa vacía, y recálculo de la asociación BT
+sobre la topología ya cargada.
+"""
+from __future__ import annotations
+
+
+def test_importar_topologia(benchmark, db, dataset):
+    from app.empresas.models import Empresa
+    from app.topologia.services import importar_topologia
+
+    generador = dataset.generador
+    topologia = generador.ficheros_topologia(1)
+    anio_declaracion = dataset.ultimo_periodo[0]
+    rondas = iter(range(dataset.rondas))
+
+    def _preparar():
+        empresa = Empresa(tenant_id=dataset.tenant_id, nombre=f"Bench topología {next(rondas)}", activo=True)
+        db.add(empresa)
+        db.commit()
+        return (db, dataset.tenant_id, int(empresa.id), anio_declaracion), {
+            "contenido_b2": topologia["b2"].contenido, "contenido_a1": topologia["a1"].contenido,
+            "contenido_b1": topologia["b1"].contenido, "contenido_b11": topologia["b11"].contenido,
+        }
+
+    resultado = benchmark.pedantic(importar_topologia, setup=_preparar, rounds=dataset.rondas)
+
+    assert resultado["cts_insertados"] == len(generador.cts(1))
+    assert resultado["cups_insertados"] == len(generador.suministros(1))
+    benchmark.extra_info["bytes"] = sum(len(f.contenido) for f in topologia.values())
+
+
+def test_calcular_asociacion_ct(benchmark, db, dataset):
+    from app.topologia.services import calcular_asociacion_ct
+
+    resultado = benchmark.pedantic(
+        calcular_asociacion_ct, args=(db, dataset.tenant_id, dataset.empresa_id()), rounds=dataset.rondas,
+    )
+
+    assert resultado["cups_total"] > 0
+    assert resultado["cups_sin_asoc"] == 0
@@ -0,0 +1,119 @@
+"""
+Benchmark: latencia de otros endpoints mientras se sube un fichero grande.
+
+Arranca un "ping" continuo contra un endpoint ligero (por defecto /health)
+y, a mitad de la medición, lanza una subida de N MB a /ingestion/files/upload.
+Compara p50/p95/max del ping antes y durante la subida. Con el upload en el
+event loop (versión antigua, `async def` + copia bloqueante) el p95 durante
+la subida se disparaba; ahora debe quedarse en el mismo orden que en reposo.
+
+Uso (con la API levantada):
+
+    python scripts/bench_upload_concurrency.py \\
+        --base-url http://localhost:8000 \\
+        --email superadmin@plataforma.com --password '...' \\
+        --empresa-id 1 --tipo M1 --filename M1_0277_202501_bench.txt \\
+        --size-mb 200
+"""
+from __future__ import annotations
+
+import argparse
+import os
+import statistics
+import tempfile
+import threading
+import time
+from pathlib import Path
+
+import httpx
+
+
+def _percentil(values: list[float], pct: float) -> float:
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    idx = min(len(ordered) - 1, int(round(pct / 100.0 * (len(ordered) - 1))))
+    return ordered[idx]
+
+
+def _resumen(nombre: str, values: list[float]) -> str:
+    if not values:
+        return f"{nombre:<18} sin muestras"
+    return (
+        f"{nombre:<18} n={len(values):<5} "
+        f"p50={statistics.median(values) * 1000:7.1f} ms  "
+        f"p95={_percentil(values, 95) * 1000:7.1f} ms  "
+        f"max={max(values) * 1000:7.1f} ms"
+    )
+
+
+def _crear_fichero(size_mb: int) -> Path:
+    fd, name = tempfile.mkstemp(prefix="bench_upload_", suffix=".bin")
+    bloque = os.urandom(1024 * 1024)
+    with os.fdopen(fd, "wb") as fh:
+        for _ in range(size_mb):
+            fh.write(bloque)
+    return Path(name)
+
+
+def main() -> int:
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--base-url", default="http://localhost:8000")
+    parser.add_argument("--email", required=True)
+    parser.add_argument("--password", required=True)
+    parser.add_argument("--empresa-id", type=int, required=True)
+    parser.add_argument("--tipo", default="M1")
+    parser.add_argument("--filename", required=True, help="Nombre con periodo AAAAMM inferible")
+    parser.add_argument("--size-mb", type=int, default=200)
+    parser.add_argument("--ping-path", default="/health")
+    parser.add_argument("--baseline-seconds", type=float, default=5.0)
+    args = parser.parse_args()
+
+    with httpx.Client(base_url=args.base_url, timeout=60.0) as client:
+        resp = client.post("/auth/login", data={"username": args.email, "password": args.password})
+        resp.raise_for_status()
+        headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    print(f"Generando fichero de {args.size_mb} MB...")
+    fichero = _crear_fichero(args.size_mb)
+
+    muestras: dict[str, list[float]] = {"reposo": [], "durante_subida": []}
+    fase = {"actual": "reposo"}
+    parar = threading.Event()
+
+    def _ping() -> None:
+        with httpx.Client(base_url=args.base_url, timeout=60.0) as c:
+            while not parar.is_set():
+                t0 = time.perf_counter()
+                c.get(args.ping_path, headers=headers)
+                muestras[fase["actual"]].append(time.perf_counter() - t0)
+                time.sleep(0.02)
+
+    hilo = threading.Thread(target=_ping, daemon=True)
+    hilo.start()
+    try:
+        time.sleep(args.baseline_seconds)
+        fase["actual"] = "durante_subida"
+        t0 = time.perf_counter()
+        with httpx.Client(base_url=args.base_url, timeout=None) as c, fichero.open("rb") as fh:
+            r = c.post(
+                "/ingestion/files/upload",
+                headers=headers,
+                data={"empresa_id": str(args.empresa_id), "tipo": args.tipo},
+                files={"file": (args.filename, fh, "application/octet-stream")},
+            )
+        duracion = time.perf_counter() - t0
+    finally:
+        parar.set()
+        hilo.join(timeout=5)
+        fichero.unlink(missing_ok=True)
+
+    print(f"Subida: HTTP {r.status_code} en {duracion:.1f} s "
+          f"({args.size_mb / duracion:.1f} MB/s), duplicado={r.headers.get('X-Ingestion-Duplicate', 'false')}")
+    print(_resumen("ping en reposo", muestras["reposo"]))
+    print(_resumen("ping con subida", muestras["durante_subida"]))
+    return 0
+
+
+if __name__ == "__main__":
+    raise SystemExit(main())
@@ -4,17 +4,33 @@ from collections.abc import Generator
 
 import pytest
 from fastapi.testclient import TestClient
-from sqlalchemy import create_engine
+from sqlalchemy import BigInteger, create_engine, event
+from sqlalchemy.dialects.postgresql import JSONB
+from sqlalchemy.engine import Engine
+from sqlalchemy.ext.compiler import compiles
 from sqlalchemy.orm import sessionmaker, Session
 
 from app.main import app
 from app.core.db import get_db
+from app.core.perf import budget_violations, instrument_engine, reset_budget_violations
 from app.core.models_base import Base
 from app.tenants.models import Tenant, User
 from app.empresas.models import Empresa
 from app.core.security import get_password_hash
 
 
+# Tipos de PostgreSQL al crear las tablas en SQLite: JSONB como JSON y
+# BIGINT como INTEGER (alias de rowid, para que el id se autogenere).
+@compiles(JSONB, "sqlite")
+def _jsonb_sqlite(type_, compiler, **kw):
+    return "JSON"
+
+
+@compiles(BigInteger, "sqlite")
+def _bigint_sqlite(type_, compiler, **kw):
+    return "INTEGER"
+
+
 # BD de tests: SQLite local
 SQLALCHEMY_DATABASE_URL = "sqlite:///./test_app_medidas.db"
 
@@ -23,6 +39,7 @@ engine = create_engine(
     connect_args={"check_same_thread": False},
 )
 TestingSessionLocal = sessionmaker(autocommit=False, autoflush=False, bind=engine)
+instrument_engine(engine)
 
 
 def override_get_db() -> Generator[Session, None, None]:
@@ -55,6 +72,20 @@ def reset_db() -> Generator[None, None, None]:
     # No hace falta nada al terminar
 
 
+# ⏱ Presupuestos de rendimiento por endpoint (@perf_budget, app/core/perf.py)
+@pytest.fixture(autouse=True)
+def perf_budgets() -> Generator[None, None, None]:
+    """
+    Falla el test si alguna request que haya hecho supera el presupuesto
+    de consultas / tiempo de BD declarado en su endpoint.
+    """
+    reset_budget_violations()
+    yield
+    violaciones = budget_violations()
+    if violaciones:
+        pytest.fail(f"Presupuesto de rendimiento superado: {violaciones}", pytrace=False)
+
+
 @pytest.fixture
 def db_session() -> Generator[Session, None, None]:
     """
@@ -109,4 +140,45 @@ def client(db_session: Session) -> Generator[TestClient, None, None]:
     db_session.commit()
 
     with TestClient(app) as c:
-        yield c
\ No newline at end of file
+        yield c
+
+
+# 🧪 SQLite en memoria por test (tests de servicios, sin TestClient)
+@pytest.fixture
+def memory_engine() -> Generator[Engine, None, None]:
+    """
+    Engine SQLite en memoria con todas las tablas, vacío. Independiente de
+    la BD de fichero de reset_db(): cada test tiene la suya.
+    """
+    eng = create_engine("sqlite://")
+
+    # pysqlite no abre la transacción hasta el primer DML y rompe los
+    # SAVEPOINT; receta de la documentación de SQLAlchemy. El BEGIN va por la
+    # conexión DBAPI para que no aparezca en los tests que cuentan consultas.
+    @event.listens_for(eng, "connect")
+    def _connect(dbapi_connection, connection_record):
+        dbapi_connection.isolation_level = None
+
+    @event.listens_for(eng, "begin")
+    def _begin(conn):
+        conn.connection.dbapi_connection.execute("BEGIN")
+
+    Base.metadata.create_all(eng)
+    yield eng
+    eng.dispose()
+
+
+@pytest.fixture
+def memory_db(memory_engine: Engine) -> Generator[Session, None, None]:
+    """
+    Sesión sobre memory_engine con autoflush=False, como SessionLocal, y:
+    - tenant 1
+    - empresa 1 del tenant 1
+    - usuario 1 superusuario del tenant 1
+    """
+    with Session(memory_engine, autoflush=False) as s:
+        s.add(Tenant(id=1, nombre="t1"))  # type: ignore[arg-type]
+        s.add(Empresa(id=1, tenant_id=1, nombre="E1"))  # type: ignore[arg-type]
+        s.add(User(id=1, tenant_id=1, email="a@a", password_hash="x", is_superuser=True))  # type: ignore[arg-type]
+        s.commit()
+        yield s
@@ -0,0 +1,115 @@
+"""
+Tests del motor vectorizado de alertas (`app.alerts.engine`).
+
+SQLite en memoria (`memory_db` de conftest). Se compara el resultado
+con las alertas esperadas de una serie pequeña y se comprueba la
+reconciliación con AlertResult (gestionadas intactas, "nueva" obsoletas
+borradas, "nueva" vigentes actualizadas sin cambiar de id).
+"""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.alerts.engine import run_alert_engine
+from app.alerts.models import AlertResult, AlertRuleCatalog, EmpresaAlertRuleConfig
+from app.measures.models import MedidaGeneral
+
+
+_RULES = [
+    # code, metric_field, comparison_type, diff_unit, threshold
+    ("perd_mes_pct", "perdidas_e_facturada_pct", "vs_prev_month", "%", 10.0),
+    ("perd_anio_pp", "perdidas_e_facturada_pct", "vs_prev_year", "pp", 1.0),
+    ("perd_max", "perdidas_e_facturada_pct", "absolute_above", "%", 8.0),
+    ("perd_neg", "perdidas_e_facturada_pct", "absolute_below", "%", 0.0),
+]
+
+# (empresa_id, anio, mes) -> pérdidas %
+_SERIE = {
+    (1, 2024, 12): 5.0,
+    (1, 2025, 1): 6.0,   # +20 % vs mes anterior
+    (1, 2025, 2): 6.1,
+    (2, 2024, 1): 2.0,
+    (2, 2025, 1): 9.5,   # > máximo y +7.5 pp vs año anterior
+    (2, 2025, 2): -0.5,  # negativo
+}
+
+
+@pytest.fixture
+def session(memory_db):
+    for code, field, ct, unit, thr in _RULES:
+        memory_db.add(AlertRuleCatalog(
+            code=code, nombre=code, metric_field=field, diff_unit=unit,
+            default_threshold=thr, default_severity="warning",
+            active_by_default=True, category="x", comparison_type=ct,
+        ))
+    for (empresa_id, anio, mes), valor in _SERIE.items():
+        memory_db.add(MedidaGeneral(
+            tenant_id=1, empresa_id=empresa_id, punto_id="P", anio=anio, mes=mes,
+            file_id=1, perdidas_e_facturada_pct=valor,
+        ))
+    memory_db.commit()
+    return memory_db
+
+
+# Disparadas con _RULES sobre _SERIE.
+_ESPERADAS = {
+    (1, 2025, 1, "perd_mes_pct"),   # 6.0 vs 5.0: +20 % > 10 %
+    (2, 2025, 1, "perd_anio_pp"),   # 9.5 vs 2.0: +7.5 pp > 1 pp
+    (2, 2025, 1, "perd_max"),       # 9.5 > 8
+    (2, 2025, 2, "perd_mes_pct"),   # -0.5 vs 9.5: -105 %
+    (2, 2025, 2, "perd_neg"),       # -0.5 < 0
+}
+
+
+def _actuales(s: Session) -> set[tuple[int, int, int, str]]:
+    return {
+        (r.empresa_id, r.anio, r.mes, r.alert_code)
+        for r in s.query(AlertResult).all()
+    }
+
+
+def test_historico_dispara_las_esperadas(session):
+    res = run_alert_engine(session)
+    assert _actuales(session) == _ESPERADAS
+    assert res.insertadas == len(_ESPERADAS)
+    assert res.empresas_procesadas == 2
+
+
+def test_override_de_empresa_desactiva_regla(session):
+    session.add(EmpresaAlertRuleConfig(
+        tenant_id=1, empresa_id=2, alert_code="perd_max", is_enabled=False,
+    ))
+    session.commit()
+    run_alert_engine(session)
+    assert (2, 2025, 1, "perd_max") not in _actuales(session)
+    assert (2, 2025, 1, "perd_anio_pp") in _actuales(session)
+
+
+def test_reconciliacion_respeta_gestionadas(session):
+    run_alert_engine(session)
+    gestionada = session.query(AlertResult).filter_by(empresa_id=2, anio=2025, mes=1, alert_code="perd_max").one()
+    gestionada.lifecycle_status = "en_revision"
+    vigente = session.query(AlertResult).filter_by(empresa_id=1, anio=2025, mes=1, alert_code="perd_mes_pct").one()
+    vigente_id = vigente.id
+    session.add(AlertResult(
+        tenant_id=1, empresa_id=1, alert_code="perd_max", anio=2025, mes=2,
+        status="triggered", severity="warning", diff_unit="%", threshold_value=8.0,
+        lifecycle_status="nueva",
+    ))
+    session.commit()
+
+    # Sube el umbral de la regla mensual: la alerta sigue disparada pero cambia el umbral.
+    session.add(EmpresaAlertRuleConfig(
+        tenant_id=1, empresa_id=1, alert_code="perd_mes_pct", is_enabled=True, threshold_value=15.0,
+    ))
+    session.commit()
+
+    res = run_alert_engine(session, tenant_ids=[1], periodos=[(2025, 1), (2025, 2)])
+
+    assert res.borradas == 1  # la "nueva" obsoleta de (1, 2025-02, perd_max)
+    assert session.get(AlertResult, gestionada.id).lifecycle_status == "en_revision"
+    actualizada = session.get(AlertResult, vigente_id)
+    assert actualizada is not None and actualizada.threshold_value == 15.0
+    assert (1, 2025, 2, "perd_max") not in _actuales(session)
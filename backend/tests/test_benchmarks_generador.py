@@ -0,0 +1,91 @@
+"""
+Tests del generador de datos sintéticos de los benchmarks
+(`benchmarks.generador`): determinista por semilla y aceptado por los
+parsers e importadores reales (ingestión, topología y STG).
+"""
+
+from __future__ import annotations
+
+import pytest
+from primestg.report import Report
+
+from app.ingestion.models import IngestionFile
+from app.ingestion.services import process_ingestion_file
+from app.topologia import services as topo
+from benchmarks.generador import TIPOS_INGESTION, Escala, Generador, cups_valido
+
+
+ESCALA = Escala(cups=120, cts=4, meses=2)
+
+
+def test_determinista_por_semilla(tmp_path):
+    a = Generador(ESCALA).escribir(tmp_path / "a")
+    b = Generador(ESCALA).escribir(tmp_path / "b")
+
+    assert [p.relative_to(tmp_path / "a") for p in a] == [p.relative_to(tmp_path / "b") for p in b]
+    assert all(x.read_bytes() == y.read_bytes() for x, y in zip(a, b))
+    otra = Generador(Escala(cups=120, cts=4, meses=2, semilla=7)).m1(1, 2025, 1)
+    assert otra.contenido != Generador(ESCALA).m1(1, 2025, 1).contenido
+
+
+def test_escala():
+    g = Generador(ESCALA)
+    assert len(g.cts(1)) == 4
+    assert len(g.suministros(1)) == 120
+    assert len({s.cups for s in g.suministros(1)}) == 120
+    assert g.periodos() == [(2025, 1), (2025, 2)]
+    assert cups_valido("0277", 1).startswith("ES0277")
+    with pytest.raises(ValueError):
+        Escala(cups=0)
+
+
+def test_ingestion_real_acepta_todos_los_tipos(memory_db, tmp_path):
+    g = Generador(ESCALA)
+    tipos = set()
+    for tipo, anio, mes, fichero in g.ficheros_ingestion(1):
+        ruta = tmp_path / fichero.nombre
+        ruta.write_bytes(fichero.contenido)
+        ingestion = IngestionFile(tenant_id=1, empresa_id=1, tipo=tipo, anio=anio, mes=mes,
+                                  filename=fichero.nombre, storage_key=str(ruta), uploaded_by=1,
+                                  status=IngestionFile.STATUS_PENDING)
+        memory_db.add(ingestion)
+        memory_db.commit()
+        resultado = process_ingestion_file(db=memory_db, ingestion=ingestion, tenant_id=1)
+        assert resultado.status == IngestionFile.STATUS_OK, (fichero.nombre, resultado.error_message)
+        tipos.add(tipo)
+
+    assert tipos == set(TIPOS_INGESTION)
+
+
+def test_topologia_real_importa_y_asocia(memory_db):
+    g = Generador(ESCALA)
+    ficheros = g.ficheros_topologia(1)
+
+    resultado = topo.importar_topologia(
+        memory_db, 1, 1, 2025,
+        contenido_b2=ficheros["b2"].contenido, contenido_a1=ficheros["a1"].contenido,
+        contenido_b1=ficheros["b1"].contenido, contenido_b11=ficheros["b11"].contenido,
+    )
+
+    assert (resultado["cts_insertados"], resultado["cups_insertados"]) == (4, 120)
+    assert resultado["lineas_insertadas"] > 0
+    assert resultado["cts_errores"] == resultado["cups_errores"] == resultado["lineas_errores"] == 0
+    asociacion = topo.calcular_asociacion_ct(memory_db, 1, 1)
+    assert asociacion["cups_sin_asoc"] == 0
+
+
+def test_stg_lo_lee_primestg(tmp_path):
+    g = Generador(ESCALA)
+    por_tipo = {}
+    for tipo, fichero in g.ficheros_stg(1):
+        ruta = tmp_path / fichero.nombre
+        ruta.write_bytes(fichero.contenido)
+        with open(ruta, "rb") as f:
+            (cnc,) = Report(f).concentrators
+        por_tipo.setdefault(tipo, []).append(cnc)
+
+    assert len(por_tipo["S02"]) == len(por_tipo["S24"]) == 4
+    contadores_s02 = sum(len(c.meters) for c in por_tipo["S02"])
+    assert contadores_s02 == len(g.suministros(1))
+    assert all(len(m.values) == 24 for c in por_tipo["S02"] for m in c.meters)
+    assert sum(len(c.values[0]["meters"]) for c in por_tipo["S24"]) == len(g.suministros(1))
@@ -0,0 +1,83 @@
+"""
+Tests del calendario laboral precalculado
+(`app.calendario_laboral.services_calendario`).
+"""
+
+from __future__ import annotations
+
+from datetime import date, timedelta
+
+import pytest
+from sqlalchemy.orm import Session
+
+from app.calendario_laboral import services_calendario as cal
+from app.calendario_laboral.models import DiaFestivoMadrid
+from app.calendario_laboral.services_db import cargar_festivos_anio
+from app.calendario_laboral.services_festivos import (
+    calcular_festivos_madrid,
+    es_dia_habil_madrid,
+    nth_dia_habil_madrid,
+)
+
+
+@pytest.fixture
+def db(memory_engine):
+    cal.invalidar()
+    with Session(memory_engine) as s:
+        yield s
+
+
+def test_indice_coincide_con_el_calculo_dia_a_dia():
+    calendario = cal.CalendarioLaboral({})
+    for anio in (2024, 2025, 2026, 2027):
+        festivos = {f.fecha for f in calcular_festivos_madrid(anio)}
+        for mes in range(1, 13):
+            for n in (1, 4, 11, 23, 30):
+                assert calendario.nth_dia_habil(anio, mes, n) == nth_dia_habil_madrid(anio, mes, n, festivos)
+
+
+def test_habiles_entre_y_ordinal():
+    calendario = cal.CalendarioLaboral({})
+    festivos = {f.fecha for anio in (2025, 2026) for f in calcular_festivos_madrid(anio)}
+
+    desde, hasta = date(2025, 12, 20), date(2026, 1, 15)
+    esperado = sum(
+        1 for i in range(1, (hasta - desde).days + 1)
+        if es_dia_habil_madrid(desde + timedelta(days=i), festivos)
+    )
+    assert calendario.habiles_entre(desde, hasta) == esperado
+    assert calendario.habiles_entre(hasta, desde) == -esperado
+    # 2026-01-01 festivo, 02 viernes hábil, 05 lunes, 06 Reyes, 07 miércoles.
+    assert calendario.ordinal(date(2026, 1, 2)) == 1
+    assert calendario.ordinal(date(2026, 1, 7)) == 3
+    assert calendario.ordinal(date(2026, 1, 6)) is None
+
+
+def test_cache_se_invalida_al_cambiar_festivos(db):
+    cargar_festivos_anio(db, tenant_id=1, anio=2026)
+
+    c1 = cal.obtener_calendario(db, tenant_id=1)
+    assert cal.obtener_calendario(db, tenant_id=1) is c1
+    # Mayo 2026: 1 (Trabajo) viernes, 4 lunes, 5, 6, 7 → 4º hábil = 7.
+    assert c1.nth_dia_habil(2026, 5, 4) == date(2026, 5, 7)
+
+    db.add(DiaFestivoMadrid(
+        tenant_id=1, anio=2026, fecha=date(2026, 5, 5), nombre="Excepcional",
+        ambito="LOCAL", origen=DiaFestivoMadrid.ORIGEN_MANUAL, activo=True,
+    ))
+    db.commit()
+    c2 = cal.obtener_calendario(db, tenant_id=1)
+    assert c2 is not c1
+    assert c2.nth_dia_habil(2026, 5, 4) == date(2026, 5, 8)
+
+    trabajo = db.query(DiaFestivoMadrid).filter_by(tenant_id=1, fecha=date(2026, 5, 1)).one()
+    trabajo.activo = False
+    db.commit()
+    c3 = cal.obtener_calendario(db, tenant_id=1)
+    assert c3.es_habil(date(2026, 5, 1))
+    assert c3.nth_dia_habil(2026, 5, 4) == date(2026, 5, 7)
+
+    # Otro tenant sin filas: festivos calculados, sin escribir en BD.
+    otro = cal.obtener_calendario(db, tenant_id=2)
+    assert not otro.es_habil(date(2026, 5, 1))
+    assert db.query(DiaFestivoMadrid).filter_by(tenant_id=2).count() == 0
@@ -0,0 +1,119 @@
+"""
+Tests del índice en memoria del calendario REE
+(`app.calendario_ree.services_indice`) y de sus consumidores.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.calendario_ree import services_indice as si
+from app.calendario_ree.models import ReeCalendarEvent, ReeCalendarFile
+from app.dashboard_tablas.routes import (
+    _fecha_publicacion_por_grupo,
+    _meses_objetivo_por_calendario_ree,
+)
+
+
+_EVENTOS = [
+    # fecha, categoria, evento, mes_afectado
+    (date(2026, 5, 6), "M+1", "Publicación del cierre M+1", "Abril 2026"),
+    (date(2026, 5, 12), "M+2", "Publicación del cierre M+2", "Marzo 2026"),
+    (date(2026, 5, 8), "Provisional", "FIN RECEPCIÓN OBJECIONES", "Octubre 2025"),
+    (date(2026, 5, 8), "Provisional", "FIN RECEPCIÓN AUTO-OBJECIONES", "Octubre 2025"),
+    (date(2026, 5, 20), "Provisional", "FIN RESOLUCIÓN OBJECIONES", "Octubre 2025"),
+    (date(2026, 5, 27), "Provisional", "PUBLICACIÓN CIERRE PROVISIONAL", "Octubre 2025"),
+    (date(2026, 5, 29), "Definitivo", "PUBLICACIÓN CIERRE DEFINITIVO", "Diciembre 2024"),
+    (date(2026, 5, 15), "Art. 15", "PUBLICACION NUEVO CIERRE DE ENERGÍA", "Ene 24"),
+    (date(2026, 6, 4), "M+1", "Publicación del cierre M+1", "Mayo 2026"),
+]
+
+
+@pytest.fixture
+def engine(memory_engine):
+    si.invalidar()
+    with Session(memory_engine) as s:
+        s.add(ReeCalendarFile(id=1, tenant_id=1, anio=2025, filename="2025.xlsx", uploaded_by=1,
+                              status="archived", is_active=False))
+        s.add(ReeCalendarFile(id=2, tenant_id=1, anio=2026, filename="2026.xlsx", uploaded_by=1,
+                              status="active", is_active=True))
+        for i, (fecha, categoria, evento, mes_afectado) in enumerate(_EVENTOS):
+            s.add(ReeCalendarEvent(
+                tenant_id=1, calendar_file_id=2, anio=2026, fecha=fecha, mes_visual="",
+                categoria=categoria, evento=evento, mes_afectado=mes_afectado,
+                estado="pendiente", sort_order=i * 10,
+            ))
+        s.commit()
+    return memory_engine
+
+
+def test_clasificacion_y_mes_afectado():
+    assert si.clasificar_evento("M+1", "Publicación del cierre M+1") == si.HITO_PUBLICACION_M1
+    assert si.clasificar_evento("Provisional", "FIN RECEPCIÓN OBJECIONES") == si.HITO_FIN_RECEPCION_OBJECIONES
+    assert si.clasificar_evento("Provisional", "FIN RECEPCIÓN AUTO-OBJECIONES") is None
+    assert si.clasificar_evento("Art. 15", "PUBLICACION NUEVO CIERRE DE ENERGÍA") == si.HITO_PUBLICACION_ART15
+    assert si.clasificar_evento("Definitivo", "PUBLICACIÓN CIERRE DEFINITIVO") == si.HITO_PUBLICACION_M11
+    assert si.parsear_mes_afectado("Junio 2025") == (2025, 6)
+    assert si.parsear_mes_afectado("Sep 25") == (2025, 9)
+    assert si.parsear_mes_afectado("2025") is None
+
+
+def test_busquedas_por_fecha_y_por_mes_afectado(engine):
+    with Session(engine) as s:
+        indice = si.obtener_indice(s, tenant_id=1)
+
+    assert indice.archivo_activo_id == 2
+    assert indice.mes_publicado_en(si.HITO_PUBLICACION_M7, 2026, 5) == (2025, 10)
+    assert indice.mes_publicado_en(si.HITO_PUBLICACION_M7, 2026, 6) is None
+    assert indice.hito_de(si.HITO_PUBLICACION_M1, 2026, 5).fecha == date(2026, 6, 4)
+    assert indice.hito_de(si.HITO_PUBLICACION_ART15, 2024, 1).periodo_yyyymm == "202401"
+
+    assert [h.fecha for h in indice.en_fecha(date(2026, 5, 8))] == [date(2026, 5, 8)] * 2
+    assert len(indice.en_fecha(date(2026, 5, 8), tipo=si.HITO_FIN_RECEPCION_OBJECIONES)) == 1
+    proximos = indice.proximos(10, desde=date(2026, 5, 12))
+    assert [h.fecha for h in proximos] == [date(2026, 5, 12), date(2026, 5, 15), date(2026, 5, 20)]
+    assert indice.proximos(3, desde=date(2026, 5, 18), tipo=si.HITO_FIN_RESOLUCION_OBJECIONES)[0].id == 5
+    assert [h.fecha for h in indice.en_mes(2026, 6)] == [date(2026, 6, 4)]
+
+
+def test_cache_por_huella(engine):
+    consultas = []
+    event.listen(engine, "before_cursor_execute", lambda *a: consultas.append(a[2]))
+
+    with Session(engine) as s:
+        i1 = si.obtener_indice(s, tenant_id=1)
+        antes = len(consultas)
+        assert si.obtener_indice(s, tenant_id=1) is i1
+        # Solo la consulta de huella.
+        assert len(consultas) - antes == 2
+
+        s.add(ReeCalendarEvent(
+            tenant_id=1, calendar_file_id=2, anio=2026, fecha=date(2026, 7, 3), mes_visual="",
+            categoria="M+2", evento="Publicación del cierre M+2", mes_afectado="Abril 2026",
+            estado="pendiente", sort_order=999,
+        ))
+        s.commit()
+        i2 = si.obtener_indice(s, tenant_id=1)
+
+    assert i2 is not i1
+    assert i2.mes_publicado_en(si.HITO_PUBLICACION_M2, 2026, 7) == (2026, 4)
+
+
+def test_consumidores_del_dashboard(engine):
+    with Session(engine) as s:
+        objetivo = _meses_objetivo_por_calendario_ree(s, 1, (2026, 5))
+        assert objetivo == {
+            "m1": (2026, 4), "m2": (2026, 3), "m7": (2025, 10),
+            "m11": (2024, 12), "art15": (2024, 1),
+        }
+        fechas = _fecha_publicacion_por_grupo(s, 1, [("m7", 2025, 10, []), ("m2", 2026, 1, [])])
+        assert fechas == {("m7", 2025, 10): "27 may 2026", ("m2", 2026, 1): None}
+
+        # Sin calendario activo, todo a None aunque haya eventos.
+        s.query(ReeCalendarFile).update({"is_active": False})
+        s.commit()
+        assert set(_meses_objetivo_por_calendario_ree(s, 1, (2026, 5)).values()) == {None}
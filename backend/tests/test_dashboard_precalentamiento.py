@@ -0,0 +1,139 @@
+"""
+Tests del precalentamiento de la caché del dashboard
+(`app.dashboard.precalentamiento`).
+"""
+
+from __future__ import annotations
+
+import time
+from datetime import date, datetime
+
+import pytest
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.pool import StaticPool
+
+import app.main as main
+from app.core.auth import get_current_user
+from app.core.db import get_db
+from app.core.models_base import Base
+from app.core.config import get_settings
+from app.core.response_cache import clear_response_cache
+from app.dashboard import precalentamiento
+from app.empresas.models import Empresa
+from app.envios.models import EnvioM
+from app.tenants.models import Tenant, User
+
+
+_TABLES = [
+    Base.metadata.tables[n]
+    for n in (
+        "tenants", "users", "empresas", "user_empresas", "ftp_sync_log", "envios_m",
+        "dias_festivos_madrid", "ree_calendar_files", "ree_calendar_events",
+        "medidas_general", "medidas_ps",
+    )
+]
+
+
+@pytest.fixture
+def entorno():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool,
+    )
+    Base.metadata.create_all(engine, tables=_TABLES)
+    SessionLocal = sessionmaker(bind=engine, autoflush=False)
+    with SessionLocal() as s:
+        s.add(Tenant(id=1, nombre="t1"))
+        s.add_all([Empresa(id=1, tenant_id=1, nombre="E1"), Empresa(id=2, tenant_id=1, nombre="E2")])
+        s.add(User(id=1, tenant_id=1, email="owner@x", password_hash="x", rol="owner"))
+        s.commit()
+    clear_response_cache()
+
+    def _db():
+        with SessionLocal() as s:
+            yield s
+
+    def _user():
+        with SessionLocal() as s:
+            return s.get(User, 1)
+
+    # Se restauran al salir: conftest deja su propio override de get_db.
+    previos = dict(main.app.dependency_overrides)
+    main.app.dependency_overrides[get_db] = _db
+    main.app.dependency_overrides[get_current_user] = _user
+    try:
+        yield SessionLocal, TestClient(main.app)
+    finally:
+        main.app.dependency_overrides.clear()
+        main.app.dependency_overrides.update(previos)
+        clear_response_cache()
+
+
+def _url_envios_resumen() -> str:
+    hoy = precalentamiento.ahora_madrid()
+    return f"/dashboard/envios-resumen?anio={hoy.year}&mes={hoy.month}&modo=mensual"
+
+
+def _url_tablas_mensual() -> str:
+    anio, mes = precalentamiento._mes_anterior(precalentamiento.ahora_madrid().date())
+    return f"/dashboard/tablas/mensual?carga_anio={anio}&carga_mes={mes}"
+
+
+def test_primera_carga_tras_precalentar_es_hit(entorno):
+    SessionLocal, client = entorno
+    res = precalentamiento.precalentar_todos(SessionLocal)
+    assert [r["tenant_id"] for r in res] == [1]
+    assert res[0]["conjuntos_empresas"] == 1
+
+    for url in (_url_envios_resumen(), _url_tablas_mensual()):
+        r = client.get(url)
+        assert r.status_code == 200, r.text
+        assert r.headers["X-Cache"] == "HIT", url
+
+
+def test_cambio_en_envios_deja_obsoleto_y_se_rehace(entorno):
+    SessionLocal, client = entorno
+    precalentamiento.precalentar_todos(SessionLocal)
+    with SessionLocal() as s:
+        assert [e["obsoleto"] for e in precalentamiento.estado_precalentamiento(s)] == [False]
+        s.add(EnvioM(
+            tenant_id=1, empresa_id=1, codigo_ree_empresa="0277", tipo="AGRECL",
+            periodo_anio=2025, periodo_mes=1, fecha_generacion=date(2025, 2, 1),
+            m_clasificacion="M1", nombre_fichero="AGRECL_nuevo",
+        ))
+        s.commit()
+        estado = precalentamiento.estado_precalentamiento(s)
+        assert estado[0]["obsoleto"] and "envios_resumen" in estado[0]["motivo"]
+
+    # La entrada vieja ya no es alcanzable: la request recalcula.
+    assert client.get(_url_envios_resumen()).headers["X-Cache"] == "MISS"
+
+    res = precalentamiento.precalentar_todos(SessionLocal, solo_obsoletos=True)
+    assert [r["tenant_id"] for r in res] == [1]
+    assert precalentamiento.precalentar_todos(SessionLocal, solo_obsoletos=True) == []
+
+
+def test_lo_precalentado_no_caduca_antes_de_la_siguiente_pasada(entorno, monkeypatch):
+    SessionLocal, client = entorno
+    monkeypatch.setattr(precalentamiento, "ahora_madrid", lambda: datetime(2026, 10, 19, 0, 15))
+    precalentamiento.precalentar_todos(SessionLocal)
+
+    monotonic = time.monotonic
+    desfase = [0.0]
+    monkeypatch.setattr(time, "monotonic", lambda: monotonic() + desfase[0])
+
+    # Pasado el TTL normal (la 01:15 y más) sigue caliente hasta las 08:05.
+    desfase[0] = get_settings().RESPONSE_CACHE_TTL_SECONDS + 3600
+    with SessionLocal() as s:
+        assert [e["obsoleto"] for e in precalentamiento.estado_precalentamiento(s)] == [False]
+    assert client.get(_url_tablas_mensual()).headers["X-Cache"] == "HIT"
+
+    # Si la pasada de las 08:05 no llega, caduca, sale como obsoleto y el
+    # job de cada 15 min lo rehace.
+    desfase[0] = 9 * 3600
+    with SessionLocal() as s:
+        estado = precalentamiento.estado_precalentamiento(s)
+    assert estado[0]["obsoleto"] and estado[0]["motivo"] == "entradas caducadas"
+    assert [r["tenant_id"] for r in precalentamiento.precalentar_todos(SessionLocal, solo_obsoletos=True)] == [1]
+    assert client.get(_url_envios_resumen()).headers["X-Cache"] == "HIT"
@@ -0,0 +1,106 @@
+"""
+Tests del resolutor de nombres de empresa (`app.empresas.services`): los
+listados hacen un número de consultas constante, sin una por fila.
+"""
+
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.comunicaciones import services as com_services
+from app.comunicaciones.models import FtpConfig, FtpSyncRule
+from app.empresas import services as empresas_services
+from app.empresas.models import Empresa
+from app.envios.models import EnvioM
+from app.envios.services import list_envios
+from app.perdidas.models import Concentrador
+from app.perdidas.services import list_concentradores
+from app.tenants.models import Tenant
+
+
+_N_EMPRESAS = 5
+
+
+@pytest.fixture
+def engine(memory_engine):
+    with Session(memory_engine) as s:
+        s.add(Tenant(id=1, nombre="t1"))
+        s.add_all([Empresa(id=i, tenant_id=1, nombre=f"Distribuidora {i}") for i in range(1, _N_EMPRESAS + 1)])
+        s.commit()
+    empresas_services.invalidar_nombres_empresa()
+    return memory_engine
+
+
+def _poblar(eng, n: int) -> None:
+    with Session(eng) as s:
+        for i in range(n):
+            empresa_id = 1 + i % _N_EMPRESAS
+            s.add(EnvioM(
+                tenant_id=1, empresa_id=empresa_id, codigo_ree_empresa="0277", tipo="AGRECL",
+                periodo_anio=2025, periodo_mes=1, fecha_generacion=date(2025, 2, 1), version=i,
+                m_clasificacion="M1", nombre_fichero=f"AGRECL_{i}",
+            ))
+            cfg = FtpConfig(tenant_id=1, empresa_id=empresa_id, host="h", usuario="u",
+                            password_cifrada="x")
+            s.add(cfg)
+            s.flush()
+            s.add(FtpSyncRule(tenant_id=1, config_id=cfg.id, directorio="/"))
+            s.add(Concentrador(tenant_id=1, empresa_id=empresa_id, nombre_ct=f"CT{i}",
+                               id_concentrador=f"C{i}"))
+        s.commit()
+
+
+def _contar_consultas(eng, fn) -> int:
+    consultas = []
+
+    def _antes(conn, cursor, statement, *args):
+        consultas.append(statement)
+
+    event.listen(eng, "before_cursor_execute", _antes)
+    try:
+        with Session(eng) as s:
+            fn(s)
+    finally:
+        event.remove(eng, "before_cursor_execute", _antes)
+    return len(consultas)
+
+
+_LISTADOS = {
+    "envios": lambda s: list_envios(s, tenant_id=1),
+    "configs": lambda s: com_services.list_configs(s, tenant_id=1),
+    "rules": lambda s: com_services.list_rules(s, tenant_id=1),
+    "concentradores": lambda s: list_concentradores(
+        s, tenant_id=1, allowed_empresa_ids=list(range(1, _N_EMPRESAS + 1))),
+}
+
+
+@pytest.mark.parametrize("listado", sorted(_LISTADOS))
+def test_listado_con_consultas_constantes(engine, listado):
+    fn = _LISTADOS[listado]
+    _poblar(engine, 5)
+    pocas = _contar_consultas(engine, fn)
+    _poblar(engine, 45)
+    empresas_services.invalidar_nombres_empresa()
+    muchas = _contar_consultas(engine, fn)
+    assert muchas == pocas
+
+
+def test_nombres_cacheados_e_invalidacion(engine):
+    _poblar(engine, 3)
+    with Session(engine) as s:
+        assert {e["empresa_nombre"] for e in list_envios(s, tenant_id=1)} == {
+            "Distribuidora 1", "Distribuidora 2", "Distribuidora 3"}
+
+    # Con la caché caliente no se consulta la tabla empresas.
+    assert _contar_consultas(engine, lambda s: list_envios(s, tenant_id=1)) == 1
+
+    with Session(engine) as s:
+        s.query(Empresa).filter(Empresa.id == 1).update({"nombre": "Renombrada"})
+        s.commit()
+    empresas_services.invalidar_nombres_empresa(1)
+    with Session(engine) as s:
+        assert "Renombrada" in {e["empresa_nombre"] for e in list_envios(s, tenant_id=1)}
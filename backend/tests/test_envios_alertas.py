@@ -0,0 +1,152 @@
+"""
+Tests de la detección de alertas de plazos de envíos
+(`app.envios.automatizacion.services_alertas`): en bloque para todas las
+empresas del tenant, con un nº de consultas que no depende de cuántas haya.
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime
+from zoneinfo import ZoneInfo
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.calendario_laboral import services_calendario
+from app.empresas.models import Empresa
+from app.envios.automatizacion import services_alertas as sa
+from app.envios.automatizacion.models import EnvioAlerta
+from app.envios.models import EnvioM
+from app.tenants.models import Tenant
+
+
+# Sábado: M1 (7-may) y M2 (12-may) vencidos; M7 (11º hábil) a ≤3 días.
+_AHORA = datetime(2026, 5, 16, 10, 0, tzinfo=ZoneInfo("Europe/Madrid"))
+
+
+@pytest.fixture
+def engine(monkeypatch, memory_engine):
+    monkeypatch.setattr(sa, "_madrid_now", lambda: _AHORA)
+    services_calendario.invalidar()
+    with Session(memory_engine) as s:
+        s.add(Tenant(id=1, nombre="t1"))
+        s.commit()
+    return memory_engine
+
+
+def _poblar(eng, n_empresas: int) -> None:
+    """
+    Envíos por empresa i:
+      - i % 4 == 0: M1 correcto;  i % 4 == 1: M1 con .bad;  resto sin M1.
+      - i % 5 == 0: M7 enviado.   Nadie ha enviado M2.
+    """
+    with Session(eng) as s:
+        s.add_all([Empresa(id=i, tenant_id=1, nombre=f"Distribuidora {i:03d}") for i in range(n_empresas)])
+        for i in range(n_empresas):
+            envios = []
+            if i % 4 == 0:
+                envios.append(("M1", 2026, 4, "ok"))
+            if i % 4 == 1:
+                envios.append(("M1", 2026, 4, "bad"))
+            if i % 5 == 0:
+                envios.append(("M7", 2025, 10, None))
+            for n, (m_clas, anio, mes, estado) in enumerate(envios):
+                s.add(EnvioM(
+                    tenant_id=1, empresa_id=i, codigo_ree_empresa="0277", tipo="AGRECL",
+                    periodo_anio=anio, periodo_mes=mes, fecha_generacion=date(2026, 5, 4),
+                    version=n, m_clasificacion=m_clas, nombre_fichero=f"AGRECL_{i}_{n}",
+                    estado_ree=estado,
+                ))
+        s.commit()
+
+
+def _recalcular(eng) -> tuple[dict, int]:
+    consultas = []
+
+    def _antes(conn, cursor, statement, *args):
+        consultas.append(statement)
+
+    event.listen(eng, "before_cursor_execute", _antes)
+    try:
+        with Session(eng) as s:
+            r = sa.recalcular_alertas_envios_tenant(s, tenant_id=1)
+    finally:
+        event.remove(eng, "before_cursor_execute", _antes)
+    return r, len(consultas)
+
+
+def _alertas(eng) -> dict[tuple[int, str, str], EnvioAlerta]:
+    with Session(eng) as s:
+        return {(a.empresa_id, a.tipo, a.m_clas): a for a in s.query(EnvioAlerta).all()}
+
+
+def test_plazos_del_mes():
+    calendario = services_calendario.CalendarioLaboral({})
+    plazos = {p.m_clas: p for p in sa.calcular_plazos_mes(2026, 5, calendario=calendario, ahora=_AHORA)}
+
+    assert plazos["M1"].plazo.date() == date(2026, 5, 7)
+    assert plazos["M2"].plazo.date() == date(2026, 5, 12)
+    assert 0 <= plazos["M7"].dias_restantes <= sa.DIAS_AVISO_PROXIMO
+    assert (plazos["M7"].periodo_dato, plazos["M1"].periodo_dato) == ("2025-10", "2026-04")
+
+
+def test_escala_200_empresas_con_consultas_constantes(engine):
+    _poblar(engine, 200)
+    with Session(engine) as s:
+        # Alerta previa de plazo_proximo de una empresa que ya ha enviado M7
+        # (se auto-resuelve) y una descartada que no se reactiva.
+        s.add(EnvioAlerta(tenant_id=1, empresa_id=0, tipo=sa.TIPO_PLAZO_PROXIMO, m_clas="M7",
+                          periodo="2026-05", num_pendientes=1, severidad="warning", estado="activa"))
+        s.add(EnvioAlerta(tenant_id=1, empresa_id=2, tipo=sa.TIPO_PLAZO_VENCIDO_PENDIENTE, m_clas="M2",
+                          periodo="2026-05", num_pendientes=7, severidad="critical", estado="descartada"))
+        s.commit()
+
+    r, consultas = _recalcular(engine)
+
+    # M1: 50 con .bad, 100 sin enviar; M2: 200 sin enviar; M7: 160 sin enviar.
+    assert r["detalle"] == {
+        sa.TIPO_PLAZO_VENCIDO_BAD: 50,
+        sa.TIPO_PLAZO_VENCIDO_PENDIENTE: 300,
+        sa.TIPO_PLAZO_PROXIMO: 160,
+    }
+    assert (r["creadas"], r["actualizadas"], r["auto_resueltas"]) == (509, 1, 1)
+    assert consultas <= 10
+
+    alertas = _alertas(engine)
+    assert len(alertas) == 511
+    assert alertas[(0, sa.TIPO_PLAZO_PROXIMO, "M7")].estado == "resuelta"
+    assert alertas[(0, sa.TIPO_PLAZO_PROXIMO, "M7")].resuelta_at is not None
+    descartada = alertas[(2, sa.TIPO_PLAZO_VENCIDO_PENDIENTE, "M2")]
+    assert (descartada.estado, descartada.num_pendientes) == ("descartada", 7)
+    bad = alertas[(1, sa.TIPO_PLAZO_VENCIDO_BAD, "M1")]
+    assert (bad.num_pendientes, bad.severidad, bad.plazo_fecha) == (1, "critical", datetime(2026, 5, 7, 8, 0))
+    assert '"periodo_dato": "2026-04"' in bad.detalle_json
+    assert (1, sa.TIPO_PLAZO_PROXIMO, "M7") in alertas
+    assert (5, sa.TIPO_PLAZO_PROXIMO, "M7") not in alertas
+
+    # Segunda pasada: todo existe, nada se crea y el coste no cambia.
+    r2, consultas2 = _recalcular(engine)
+    assert (r2["creadas"], r2["actualizadas"], r2["auto_resueltas"]) == (0, 510, 0)
+    assert consultas2 <= consultas
+
+
+def test_refresca_activas_y_no_depende_del_numero_de_empresas(engine):
+    _poblar(engine, 20)
+    _, consultas_20 = _recalcular(engine)
+
+    with Session(engine) as s:
+        # Llega un segundo .bad de la empresa 1.
+        s.add(EnvioM(
+            tenant_id=1, empresa_id=1, codigo_ree_empresa="0277", tipo="INMECL",
+            periodo_anio=2026, periodo_mes=4, fecha_generacion=date(2026, 5, 4),
+            version=0, m_clasificacion="M1", nombre_fichero="INMECL_1", estado_ree="bad",
+        ))
+        s.add_all([Empresa(id=i, tenant_id=1, nombre=f"Distribuidora {i:03d}") for i in range(20, 200)])
+        s.commit()
+
+    r, consultas_200 = _recalcular(engine)
+
+    assert consultas_200 == consultas_20
+    assert r["creadas"] == 180 * 3
+    assert _alertas(engine)[(1, sa.TIPO_PLAZO_VENCIDO_BAD, "M1")].num_pendientes == 2
@@ -0,0 +1,112 @@
+"""
+Tests de la búsqueda ERP (`app.erp.services_busqueda`): ranking, paginado,
+búsqueda unificada y aislamiento por empresa.
+"""
+
+from __future__ import annotations
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import event
+
+from app.empresas.models import Empresa
+from app.erp import services_busqueda as sb
+from app.erp.models import ErpContrato, ErpEquipoMedida, ErpSuministro, ErpTitular
+from app.tenants.models import Tenant, User
+
+
+_SUMINISTRO = dict(
+    dir_tipo_via="CL", dir_via="Mayor", dir_numero="1", dir_cp="28001", dir_municipio="Madrid",
+    dir_poblacion="Madrid", dir_provincia="Madrid", municipio_codigo_ine="28079",
+    pot_max_admisible_cie_kw=10.0, potencia_adscrita_kw=10.0,
+)
+
+
+@pytest.fixture
+def db(memory_db):
+    memory_db.add(Empresa(id=2, tenant_id=1, nombre="E2"))
+    titulares = [
+        ("Garcia Lopez", "12345678Z", None),
+        ("Ferreteria Garcia SL", "B12345678", "GAR-01"),
+        ("Garcia", "X1234567L", None),
+        ("Lopez Garcia", "00000001R", None),
+    ] + [(f"Cliente {i:03d}", f"{i:08d}T", None) for i in range(30)]
+    for i, (nombre, ident, codigo) in enumerate(titulares):
+        memory_db.add(ErpTitular(tenant_id=1, empresa_id=1, nombre=nombre, tipo_identificador="NI",
+                             identificador=ident, codigo_interno=codigo, activo=nombre != "Lopez Garcia"))
+    memory_db.add(ErpTitular(tenant_id=1, empresa_id=2, nombre="Garcia Otra Empresa",
+                         tipo_identificador="NI", identificador="99999999R"))
+    memory_db.add(ErpSuministro(tenant_id=1, empresa_id=1, cups="ES0277000000000001AB", **_SUMINISTRO))
+    memory_db.add(ErpContrato(tenant_id=1, empresa_id=1, numero_contrato="GAR-2026-1", tipo_contrato_atr="01",
+                          titular_id=1, suministro_id=1, tarifa_id=1))
+    memory_db.add(ErpEquipoMedida(tenant_id=1, empresa_id=1, numero_serie="GARX100", fabricante="ZIV"))
+    memory_db.commit()
+    return memory_db
+
+
+def _user(db) -> User:
+    return db.get(User, 1)
+
+
+def test_ranking_exacta_prefijo_contiene(db):
+    items, has_more = sb.buscar_entidad(db, _user(db), 1, "titular", "  garcia ")
+
+    assert not has_more
+    assert [i.etiqueta for i in items] == ["Garcia", "Garcia Lopez", "Ferreteria Garcia SL", "Lopez Garcia"]
+    assert [int(i.score) for i in items] == [3, 2, 1, 1]
+    # codigo_interno también puntúa como prefijo.
+    items, _ = sb.buscar_entidad(db, _user(db), 1, "titular", "gar-")
+    assert [(i.etiqueta, i.detalle) for i in items] == [("Ferreteria Garcia SL", "B12345678 · GAR-01")]
+
+    solo_activos, _ = sb.buscar_entidad(db, _user(db), 1, "titular", "garcia", solo_activos=True)
+    assert "Lopez Garcia" not in {i.etiqueta for i in solo_activos}
+
+
+def test_paginado_y_terminos_cortos_o_comodines(db):
+    p1, more1 = sb.buscar_entidad(db, _user(db), 1, "titular", "cliente", page=1, page_size=20)
+    p2, more2 = sb.buscar_entidad(db, _user(db), 1, "titular", "cliente", page=2, page_size=20)
+
+    assert (len(p1), more1, len(p2), more2) == (20, True, 10, False)
+    assert p1[0].etiqueta == "Cliente 000" and p2[-1].etiqueta == "Cliente 029"
+    assert not {i.id for i in p1} & {i.id for i in p2}
+
+    assert sb.buscar_entidad(db, _user(db), 1, "titular", "ga") == ([], False)
+    # '%' y '_' se buscan literalmente, no como comodines.
+    assert sb.buscar_entidad(db, _user(db), 1, "titular", "%%%") == ([], False)
+    assert sb.buscar_entidad(db, _user(db), 1, "titular", "___") == ([], False)
+
+    with pytest.raises(ValueError):
+        sb.buscar_entidad(db, _user(db), 1, "factura", "garcia")
+
+
+def test_busqueda_unificada_por_empresa(db):
+    user = _user(db)
+    consultas = []
+    event.listen(db.get_bind(), "before_cursor_execute", lambda *a: consultas.append(a[2]))
+
+    grupos = sb.buscar(db, user, 1, "gar", limite=2)
+
+    assert list(grupos) == ["titular", "suministro", "contrato", "equipo"]
+    titulares, hay_mas = grupos["titular"]
+    assert (len(titulares), hay_mas) == (2, True)
+    assert grupos["suministro"] == ([], False)
+    assert [i.etiqueta for i in grupos["contrato"][0]] == ["GAR-2026-1"]
+    assert [(i.etiqueta, i.detalle) for i in grupos["equipo"][0]] == [("GARX100", "ZIV · en_almacen")]
+    # Una consulta por entidad (más las de la comprobación de acceso).
+    assert sum(1 for c in consultas if "FROM erp_" in c) == 4
+    # Nunca devuelve filas de otra empresa.
+    assert "Garcia Otra Empresa" not in {i.etiqueta for i in titulares}
+
+    cups = sb.buscar(db, user, 1, "0277000", entidades=["suministro"])
+    assert [i.etiqueta for i in cups["suministro"][0]] == ["ES0277000000000001AB"]
+
+
+def test_sin_acceso_a_la_empresa(db):
+    db.add(Tenant(id=2, nombre="t2"))
+    db.add(Empresa(id=3, tenant_id=2, nombre="Ajena"))
+    db.add(User(id=2, tenant_id=1, email="b@b", password_hash="x", rol="admin"))
+    db.commit()
+
+    with pytest.raises(HTTPException) as exc:
+        sb.buscar(db, db.get(User, 2), 3, "garcia")
+    assert exc.value.status_code == 403
@@ -0,0 +1,134 @@
+"""
+Tests del modelo de lectura del contrato ERP (`app.erp.services_contrato`):
+listado y fotos por lotes con un nº de consultas que no depende del nº de
+contratos, y foto posterior correcta al actualizar.
+"""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.erp import models as m
+from app.erp import services_contrato as sc
+from app.erp.schemas import ErpContratoUpdate
+from app.tenants.models import User
+
+
+_SUMINISTRO = dict(
+    dir_tipo_via="CL", dir_via="Mayor", dir_numero="1", dir_cp="28001", dir_municipio="Madrid",
+    dir_poblacion="Madrid", dir_provincia="Madrid", municipio_codigo_ine="28079",
+    pot_max_admisible_cie_kw=10.0, potencia_adscrita_kw=10.0,
+)
+
+
+@pytest.fixture
+def engine(memory_engine, memory_db):
+    with Session(memory_engine) as s:
+        s.add(m.ErpTarifa(id=1, codigo="2.0TD", descripcion="2.0TD", nivel_tension="BT",
+                          num_periodos_energia=3, num_periodos_potencia=2))
+        s.add_all([m.ErpTarifaPeriodo(tarifa_id=1, periodo=p, tipo="potencia", orden=i)
+                   for i, p in enumerate(("P1", "P2"))])
+        s.add(m.ErpComercializadora(id=1, nombre="Comer S.A.", cif="A00000000", codigo_ree="0999",
+                                    codigo_cnmc="R2-999", codigo_liquidacion_cnmc="L999"))
+        s.add(m.ErpComercializadoraEmpresa(id=1, tenant_id=1, empresa_id=1, comercializadora_id=1))
+        s.commit()
+    return memory_engine
+
+
+def _crear_contratos(eng, desde: int, hasta: int) -> None:
+    with Session(eng) as s:
+        for n in range(desde, hasta):
+            s.add(m.ErpTitular(id=n, tenant_id=1, empresa_id=1, nombre=f"Cliente {n}",
+                               tipo_identificador="NI", identificador=f"{n:08d}T"))
+            s.add(m.ErpSuministro(id=n, tenant_id=1, empresa_id=1, cups=f"ES{n:016d}AB", **_SUMINISTRO))
+            s.add(m.ErpContrato(id=n, tenant_id=1, empresa_id=1, numero_contrato=f"C{n:05d}",
+                                tipo_contrato_atr="anual", titular_id=n, suministro_id=n, tarifa_id=1, tipo_punto_medida=5,
+                                comercializadora_empresa_id=1 if n % 2 else None))
+            s.add_all([
+                m.ErpContratoPotencia(tenant_id=1, empresa_id=1, contrato_id=n, periodo="P2", potencia_kw=5.7),
+                m.ErpContratoPotencia(tenant_id=1, empresa_id=1, contrato_id=n, periodo="P1", potencia_kw=4.6),
+            ])
+        s.commit()
+
+
+def _contar(eng, fn):
+    consultas = []
+
+    def _antes(conn, cursor, statement, *args):
+        consultas.append(statement)
+
+    event.listen(eng, "before_cursor_execute", _antes)
+    try:
+        with Session(eng) as s:
+            user = s.get(User, 1)
+            consultas.clear()
+            resultado = fn(s, user)
+    finally:
+        event.remove(eng, "before_cursor_execute", _antes)
+    return resultado, sum(1 for c in consultas if "FROM erp_" in c)
+
+
+def test_listado_con_consultas_fijas(engine):
+    _crear_contratos(engine, 1, 6)
+    pocos, consultas_5 = _contar(engine, lambda s, u: sc.listar_contratos(s, u, 1))
+    _crear_contratos(engine, 6, 51)
+    muchos, consultas_50 = _contar(engine, lambda s, u: sc.listar_contratos(s, u, 1))
+
+    assert (len(pocos), len(muchos)) == (5, 50)
+    # Contratos (con joins) + potencias (selectin), sin consultas por fila.
+    assert consultas_5 == consultas_50 == 2
+
+    c7 = next(c for c in muchos if c.numero_contrato == "C00007")
+    assert (c7.titular_nombre, c7.cups, c7.tarifa_codigo, c7.comercializadora_nombre) == (
+        "Cliente 7", f"ES{7:016d}AB", "2.0TD", "Comer S.A.",
+    )
+    assert [(p.periodo, p.potencia_kw) for p in c7.potencias] == [("P1", 4.6), ("P2", 5.7)]
+    assert next(c for c in muchos if c.numero_contrato == "C00008").comercializadora_nombre is None
+
+
+def test_fotos_por_lotes_iguales_a_la_individual(engine):
+    _crear_contratos(engine, 1, 41)
+    fotos, consultas = _contar(engine, lambda s, u: sc.componer_snapshots(s, range(40, 0, -1)))
+
+    assert consultas == 2
+    assert list(fotos) == list(range(40, 0, -1))
+    with Session(engine) as s:
+        for cid in (1, 2, 40):
+            assert fotos[cid] == sc._componer_snapshot(s.get(m.ErpContrato, cid))
+    assert fotos[3]["potencias"] == {"P1": 4.6, "P2": 5.7}
+    assert fotos[3]["comercializadora_nombre"] == "Comer S.A."
+
+
+def test_actualizar_versiona_con_la_foto_posterior(engine):
+    _crear_contratos(engine, 1, 3)
+    with Session(engine) as s:
+        sc.actualizar_contrato(s, s.get(User, 1), 1, ErpContratoUpdate(
+            titular_id=2, potencias=[{"periodo": "P1", "potencia_kw": 4.6},
+                                     {"periodo": "P2", "potencia_kw": 6.9}],
+        ))
+        v2 = s.query(m.ErpContratoVersion).filter_by(contrato_id=1, version=2).one()
+
+    assert v2.snapshot["titular_nombre"] == "Cliente 2"
+    assert v2.snapshot["potencias"] == {"P1": 4.6, "P2": 6.9}
+    assert {c["campo"] for c in v2.cambios} == {"titular_nombre", "potencia_p2"}
+
+
+def test_sembrar_versiones_sin_historico(engine):
+    _crear_contratos(engine, 1, 31)
+    with Session(engine) as s:
+        s.add(m.ErpContratoVersion(tenant_id=1, empresa_id=1, contrato_id=1, suministro_id=1,
+                                   version=1, tipo_atr="A3", snapshot={}))
+        s.commit()
+
+    creadas, consultas = _contar(engine, lambda s, u: sc.sembrar_versiones(s, u, 1))
+
+    assert creadas == 29
+    # Ids sin histórico + contratos (con joins) + potencias; luego un INSERT.
+    assert consultas == 3
+    with Session(engine) as s:
+        assert s.query(m.ErpContratoVersion).count() == 30
+        v = s.query(m.ErpContratoVersion).filter_by(contrato_id=5).one()
+        assert (v.version, v.tipo_atr, v.snapshot["titular_nombre"]) == (1, "A3", "Cliente 5")
+    assert _contar(engine, lambda s, u: sc.sembrar_versiones(s, u, 1))[0] == 0
@@ -0,0 +1,175 @@
+"""
+Tests del importador de migración ERP por lotes
+(`app.erp.migraciones.importer`): mismas reglas e informe que el alta fila a
+fila, con un nº de consultas que no depende del nº de filas.
+"""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+
+from app.erp import models as m
+from app.erp.migraciones import importer
+from app.erp.migraciones.lectura import FilaLeida
+from app.tenants.models import User
+
+
+_LETRAS = "TRWAGMYFPDXBNJZSQVHLCKE"
+
+
+def _nif(n: int) -> str:
+    return f"{n:08d}{_LETRAS[n % 23]}"
+
+
+def _cups(n: int) -> str:
+    d = f"0277{n:012d}"
+    r = int(d) % 529
+    return f"ES{d}{_LETRAS[r // 23]}{_LETRAS[r % 23]}"
+
+
+@pytest.fixture
+def engine(memory_engine, memory_db):
+    # memory_engine ya trae la receta de SAVEPOINT que usa el importador.
+    with Session(memory_engine) as s:
+        s.add(m.ErpCnmcTipoVia(codigo="CL", descripcion="Calle", activo=True))
+        s.add(m.ErpCnmcTipoVia(codigo="XX", descripcion="Baja", activo=False))
+        s.add(m.ErpTarifa(id=1, codigo="2.0TD", descripcion="2.0TD", nivel_tension="BT",
+                          num_periodos_energia=3, num_periodos_potencia=2))
+        s.add_all([m.ErpTarifaPeriodo(tarifa_id=1, periodo=p, tipo="potencia", orden=i) for i, p in enumerate(("P1", "P2"))])
+        s.add(m.ErpComercializadora(id=1, nombre="Comer S.A.", cif="A00000000", codigo_ree="0999",
+                                    codigo_cnmc="R2-999", codigo_liquidacion_cnmc="L999"))
+        s.add(m.ErpComercializadoraEmpresa(id=1, tenant_id=1, empresa_id=1, comercializadora_id=1))
+        s.commit()
+    return memory_engine
+
+
+def _filas(valores: list[dict]) -> list[FilaLeida]:
+    return [FilaLeida(fila_excel=i + 2, valores=v) for i, v in enumerate(valores)]
+
+
+def _titular(n: int, **extra) -> dict:
+    return {"tipo_persona": "juridica", "tipo_identificador": "NI", "identificador": _nif(n),
+            "razon_social": f"Cliente {n}", "dir_tipo_via": "CL", **extra}
+
+
+def _suministro(n: int, **extra) -> dict:
+    return {"cups": _cups(n), "dir_tipo_via": "CL", "dir_via": "Mayor", "dir_numero": "1",
+            "dir_cp": "28001", "dir_municipio": "Madrid", "dir_poblacion": "Madrid",
+            "dir_provincia": "Madrid", "dir_pais": "España", "municipio_codigo_ine": "28079",
+            "pot_max_admisible_cie_kw": 10.0, "potencia_adscrita_kw": 10.0, **extra}
+
+
+def _contrato(n: int, **extra) -> dict:
+    return {"numero_contrato": f"C{n:05d}", "tipo_contrato_atr": "anual",
+            "titular_identificador": _nif(n), "suministro_cups": _cups(n), "tarifa_codigo": "2.0TD",
+            "comercializadora_codigo_ree": "0999", "P1": 4.6, "P2": 5.7, **extra}
+
+
+def _importar(eng, handler, valores, *, correccion=False) -> tuple[importer.ResultadoImport, int]:
+    consultas = []
+
+    def _antes(conn, cursor, statement, *args):
+        consultas.append(statement)
+
+    event.listen(eng, "before_cursor_execute", _antes)
+    try:
+        with Session(eng) as s:
+            res = importer.ResultadoImport(entidad="x", hoja="x")
+            handler(s, s.get(User, 1), 1, _filas(valores), res, correccion)
+    finally:
+        event.remove(eng, "before_cursor_execute", _antes)
+    res.errores.sort(key=lambda e: e.fila_excel)
+    return res, sum(1 for c in consultas if c.lstrip().upper().startswith(("SELECT", "INSERT", "UPDATE")))
+
+
+def test_titulares_por_lotes_con_el_mismo_informe(engine):
+    valores = [_titular(n) for n in range(1, 301)]
+    valores += [
+        _titular(1),                                        # repetido en el propio Excel
+        _titular(999, identificador="12345678A"),           # letra de control mala
+        _titular(998, dir_tipo_via="XX"),                   # código CNMC dado de baja
+    ]
+    res, consultas = _importar(engine, importer._importar_titulares, valores)
+
+    assert (res.total, res.creadas, res.omitidas) == (303, 300, 1)
+    assert [(e.fila_excel, e.columna) for e in res.errores] == [(303, None), (304, "identificador")]
+    assert "dado de baja" in res.errores[1].motivo
+    # Usuario (2) + mapa de titulares + 2 catálogos CNMC + INSERT y SELECT de ids del lote.
+    assert consultas == 7
+
+    with Session(engine) as s:
+        t = s.query(m.ErpTitular).filter_by(identificador=_nif(7)).one()
+        assert (t.nombre, t.tenant_id, t.activo) == ("Cliente 7", 1, True)
+
+    # Segunda pasada: todo existe → omitidas; en corrección, actualizadas.
+    res2, _ = _importar(engine, importer._importar_titulares, valores[:3])
+    assert (res2.creadas, res2.omitidas) == (0, 3)
+    res3, _ = _importar(engine, importer._importar_titulares,
+                        [_titular(5, razon_social="Cliente 5 Renombrado")], correccion=True)
+    assert (res3.creadas, res3.actualizadas) == (0, 1)
+    with Session(engine) as s:
+        assert s.query(m.ErpTitular).filter_by(identificador=_nif(5)).one().nombre == "Cliente 5 Renombrado"
+
+
+def test_contratos_con_enlaces_potencias_y_version(engine):
+    _importar(engine, importer._importar_titulares, [_titular(n) for n in range(1, 51)])
+    res_s, _ = _importar(engine, importer._importar_suministros, [_suministro(n) for n in range(1, 51)])
+    assert res_s.creadas == 50
+
+    valores = [_contrato(n) for n in range(1, 41)]
+    valores += [
+        _contrato(41, titular_identificador=_nif(9999)),          # titular inexistente
+        _contrato(42, P2=None),                                   # activo sin todas las potencias
+        _contrato(43, P1=9.0),                                    # potencias decrecientes
+        _contrato(44, numero_contrato="C90000", suministro_cups=_cups(1)),  # 2º activo del CUPS 1
+        _contrato(45, estado="baja", suministro_cups=_cups(1), numero_contrato="C90001"),
+        _contrato(1),                                             # nº repetido → omitida
+    ]
+    res, consultas = _importar(engine, importer._importar_contratos, valores)
+
+    assert (res.total, res.creadas, res.omitidas) == (46, 41, 1)
+    assert [(e.fila_excel, e.columna) for e in res.errores] == [
+        (42, "titular_identificador"), (43, "numero_contrato"),
+        (44, "numero_contrato"), (45, "numero_contrato"),
+    ]
+    assert "Faltan potencias" in res.errores[1].motivo
+    assert "contrato activo" in res.errores[3].motivo
+    # Usuario (2) + 8 mapas (titulares, suministros, tarifas, periodos,
+    # comercializadoras, relación, contratos, activos) + INSERT de contratos,
+    # SELECT de sus ids e INSERT de potencias y versiones.
+    assert consultas == 14
+
+    with Session(engine) as s:
+        c = s.query(m.ErpContrato).filter_by(numero_contrato="C00007").one()
+        assert (c.tipo_punto_medida, c.comercializadora_empresa_id) == (5, 1)
+        pots = {p.periodo: p.potencia_kw for p in s.query(m.ErpContratoPotencia).filter_by(contrato_id=c.id)}
+        assert pots == {"P1": 4.6, "P2": 5.7}
+        v = s.query(m.ErpContratoVersion).filter_by(contrato_id=c.id).one()
+        assert (v.version, v.tipo_atr, v.fecha_baja) == (1, "A3", None)
+        assert v.snapshot["titular_nombre"] == "Cliente 7"
+        assert v.snapshot["cups"] == _cups(7)
+        assert v.snapshot["tarifa_codigo"] == "2.0TD"
+        assert v.snapshot["comercializadora_nombre"] == "Comer S.A."
+        assert v.snapshot["potencias"] == {"P1": 4.6, "P2": 5.7}
+        assert s.query(m.ErpContratoVersion).count() == 41
+
+
+def test_consultas_no_dependen_del_numero_de_filas(engine):
+    _, consultas_10 = _importar(engine, importer._importar_suministros, [_suministro(n) for n in range(10)])
+    _, consultas_400 = _importar(engine, importer._importar_suministros, [_suministro(n) for n in range(10, 410)])
+    assert consultas_400 == consultas_10
+
+
+def test_conflicto_en_bd_se_aisla_fila_a_fila(engine, monkeypatch):
+    _importar(engine, importer._importar_suministros, [_suministro(3)])
+    # Como si otro proceso hubiera dado de alta el CUPS 3 tras cargar el mapa.
+    monkeypatch.setattr(importer._Mapas, "suministros", property(lambda self: self.__dict__.setdefault("_s", {})))
+
+    res, _ = _importar(engine, importer._importar_suministros, [_suministro(n) for n in range(1, 6)])
+
+    assert (res.creadas, [(e.fila_excel, e.valor) for e in res.errores]) == (4, [(4, _cups(3))])
+    assert res.errores[0].motivo.startswith("Conflicto de integridad en BD")
+    with Session(engine) as s:
+        assert s.query(m.ErpSuministro).count() == 5
@@ -0,0 +1,55 @@
+"""
+Tests de `app.core.exports` (sin BD de la app).
+
+Comprueban que los generadores CSV/XLSX consumen las filas de forma
+perezosa y que el XLSX reparte en varias hojas al pasar del límite.
+"""
+
+from __future__ import annotations
+
+import csv
+import io
+from datetime import datetime
+from decimal import Decimal
+
+from openpyxl import load_workbook
+
+from app.core import exports
+from app.core.exports import csv_chunks, xlsx_chunks
+
+
+def test_csv_cede_bloques_mientras_lee():
+    consumidas: list[int] = []
+
+    def _rows():
+        for i in range(25):
+            consumidas.append(i)
+            yield (i, Decimal("1.50"), datetime(2025, 1, 1, 0, i), None)
+
+    gen = csv_chunks(["id", "valor", "ts", "vacio"], _rows(), flush_rows=10)
+    primero = next(gen)
+    # El primer bloque sale tras 10 filas, sin haber leído todo el iterable.
+    assert len(consumidas) == 10
+
+    body = (primero + b"".join(gen)).decode("utf-8")
+    assert body.startswith("\ufeff")
+    filas = list(csv.reader(io.StringIO(body.lstrip("\ufeff"))))
+    assert filas[0] == ["id", "valor", "ts", "vacio"]
+    assert len(filas) == 26
+    assert filas[1] == ["0", "1.50", "2025-01-01 00:00:00", ""]
+
+
+def test_xlsx_reparte_en_hojas(monkeypatch):
+    monkeypatch.setattr(exports, "XLSX_MAX_ROWS", 4)
+    rows = ((i, float(i)) for i in range(7))
+
+    data = b"".join(xlsx_chunks(["id", "valor"], rows, sheet_title="Curva S02"))
+    wb = load_workbook(io.BytesIO(data), read_only=True)
+
+    assert wb.sheetnames == ["Curva S02", "Curva S02 (2)", "Curva S02 (3)"]
+    total = 0
+    for ws in wb.worksheets:
+        valores = list(ws.iter_rows(values_only=True))
+        assert valores[0] == ("id", "valor")
+        total += len(valores) - 1
+    assert total == 7
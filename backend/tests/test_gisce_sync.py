@@ -0,0 +1,238 @@
+"""
+Tests de la sincronización GISCE por trozos e incremental
+(`app.stg.gisce.sync` + `services.execute_import`) contra un servidor
+XML-RPC local que imita el /xmlrpc/common y /xmlrpc/object de OpenERP 5/6.
+"""
+
+from __future__ import annotations
+
+import socketserver
+import threading
+from xmlrpc.server import (
+    MultiPathXMLRPCServer,
+    SimpleXMLRPCDispatcher,
+    SimpleXMLRPCRequestHandler,
+)
+
+import pytest
+
+from app.stg.gisce import services, sync
+from app.stg.gisce.client import GisceClient
+from app.stg.models import (
+    Contador,
+    Cups,
+    StgConcentrador,
+    StgGisceConfig,
+    StgGisceSyncMarca,
+)
+
+
+# ── Servidor GISCE de pruebas ────────────────────────────────────────────────
+
+class _Rutas(SimpleXMLRPCRequestHandler):
+    rpc_paths = ("/xmlrpc/common", "/xmlrpc/object")
+
+
+class _Servidor(socketserver.ThreadingMixIn, MultiPathXMLRPCServer):
+    daemon_threads = True
+
+
+def _cumple(registro: dict, domain: list) -> bool:
+    """Dominio OpenERP en notación polaca: '|', '&' y tuplas (campo, op, valor)."""
+    def evaluar(pos):
+        item = domain[pos]
+        if item in ("|", "&"):
+            a, pos = evaluar(pos + 1)
+            b, pos = evaluar(pos)
+            return (a or b) if item == "|" else (a and b), pos
+        campo, op, valor = item
+        v = registro.get(campo)
+        if op == "=":
+            return v == valor, pos + 1
+        if op == "in":
+            return v in valor, pos + 1
+        if v is False or v is None:
+            return False, pos + 1
+        return {">=": v >= valor, ">": v > valor, "<": v < valor}[op], pos + 1
+
+    pos, ok = 0, True
+    while pos < len(domain):
+        r, pos = evaluar(pos)
+        ok = ok and r
+    return ok
+
+
+class GisceFalso:
+    """Datos en memoria por modelo y registro de las llamadas read()."""
+
+    def __init__(self):
+        self.datos: dict[str, dict[int, dict]] = {}
+        self.lecturas: list[tuple[str, int]] = []
+        self._lock = threading.Lock()
+
+    def poner(self, modelo: str, registro: dict) -> None:
+        registro.setdefault("create_date", "2026-01-01 00:00:00")
+        registro.setdefault("write_date", False)
+        self.datos.setdefault(modelo, {})[registro["id"]] = registro
+
+    def login(self, database, usuario, password):
+        return 7 if password == "secreto" else False
+
+    def execute(self, database, uid, password, modelo, metodo, *args):
+        registros = self.datos.get(modelo, {})
+        if metodo in ("search", "search_count"):
+            ids = sorted(i for i, r in registros.items() if _cumple(r, args[0] if args else []))
+            return len(ids) if metodo == "search_count" else ids
+        if metodo == "read":
+            ids, campos = args[0], (args[1] if len(args) > 1 else None)
+            with self._lock:
+                self.lecturas.append((modelo, len(ids)))
+            return [
+                {k: v for k, v in registros[i].items() if campos is None or k in campos or k == "id"}
+                for i in ids
+            ]
+        raise ValueError(f"metodo no soportado: {metodo}")
+
+
+@pytest.fixture
+def gisce():
+    falso = GisceFalso()
+    srv = _Servidor(("127.0.0.1", 0), requestHandler=_Rutas, logRequests=False, allow_none=True)
+    for ruta, nombre in (("/xmlrpc/common", "login"), ("/xmlrpc/object", "execute")):
+        d = SimpleXMLRPCDispatcher(allow_none=True, encoding=None)
+        d.register_function(getattr(falso, nombre), nombre)
+        srv.add_dispatcher(ruta, d)
+    threading.Thread(target=srv.serve_forever, daemon=True).start()
+    falso.puerto = srv.server_address[1]
+    yield falso
+    srv.shutdown()
+    srv.server_close()
+
+
+def _creado(i: int) -> str:
+    return "2026-01-01 00:%02d:%02d" % divmod(i, 60)
+
+
+def _poblar(gisce: GisceFalso, n_cups: int) -> None:
+    for i in (1, 2, 3):
+        gisce.poner("giscedata.cts", {
+            "id": i, "name": f"CT.{i}", "active": True, "adreca": f"Calle {i}", "create_date": _creado(i),
+        })
+    for i in range(1, n_cups + 1):
+        gisce.poner("giscedata.cups.ps", {
+            "create_date": _creado(i),
+            "id": i, "name": f"ES{i:016d}XX", "et": f"CT.{i % 3 + 1}",
+            "titular": f"Titular {i}", "active": True, "direccio": False, "dp": "28001",
+            "data_baixa": False, "polissa_comptador": f"CIR{i}", "meter_technology": "telegestio",
+        })
+        gisce.poner("giscedata.lectures.comptador", {
+            "id": i, "meter": f"CIR{i}", "meter_tg_name": f"CIR{i}",
+            "cups_id": [i, f"ES{i:016d}XX"], "active": True, "create_date": _creado(i),
+        })
+
+
+@pytest.fixture
+def db(monkeypatch, gisce, memory_db):
+    monkeypatch.setattr(services, "descifrar_password", lambda token: token)
+    memory_db.add(StgGisceConfig(
+        tenant_id=1, empresa_id=1, host="127.0.0.1", puerto=gisce.puerto,
+        database="erp", usuario="u", password_cifrado="secreto",
+    ))
+    for i in (1, 2, 3):
+        memory_db.add(StgConcentrador(id=i, tenant_id=1, empresa_id=1, codigo_ct=f"CIR{i}", id_ct=f"CT.{i}"))
+    for i in range(1, 41):
+        memory_db.add(Contador(tenant_id=1, empresa_id=1, meter_id=f"CIR{i}"))
+    memory_db.commit()
+    return memory_db
+
+
+def test_lector_lee_por_trozos_en_paralelo(gisce):
+    _poblar(gisce, 1050)
+    cli = GisceClient(f"http://127.0.0.1:{gisce.puerto}", "erp", "u", "secreto")
+    lector = sync.LectorGisce(cli, trozo=100, hilos=4)
+
+    registros = lector.leer("giscedata.cups.ps", fields=["id", "name"])
+
+    assert [r["id"] for r in registros] == list(range(1, 1051))
+    assert set(registros[0]) == {"id", "name"}
+    tamanos = [n for modelo, n in gisce.lecturas]
+    assert len(tamanos) == 11 and max(tamanos) == 100
+
+
+def test_import_completo_y_despues_incremental(gisce, db):
+    _poblar(gisce, 50)
+
+    r = services.execute_import(db, 1)
+    assert r.ok, r.error
+    assert (r.cups_remoto_total, r.cups_leidos, r.cups_creados) == (50, 50, 50)
+    assert r.contadores_enlazados == 40 and r.contadores_sin_match_meter == 10
+    assert db.query(Cups).count() == 50
+    marcas = sync.leer_marcas(db, 1)
+    assert marcas["giscedata.cups.ps"] == "2026-01-01 00:00:50"
+
+    # En GISCE cambian dos CUPS y aparece uno nuevo.
+    gisce.datos["giscedata.cups.ps"][3].update(titular="Nuevo titular", write_date="2026-03-01 10:00:00")
+    gisce.datos["giscedata.cups.ps"][4].update(active=False, write_date="2026-03-02 09:30:00")
+    gisce.poner("giscedata.cups.ps", {
+        "id": 51, "name": "ES0000000000000051XX", "et": "CT.1", "titular": "Alta",
+        "active": True, "direccio": False, "dp": False, "data_baixa": False,
+        "polissa_comptador": False, "meter_technology": False,
+        "create_date": "2026-03-02 12:00:00",
+    })
+    gisce.lecturas.clear()
+
+    r = services.execute_import(db, 1, incremental=True)
+    assert r.ok, r.error
+    assert r.incremental
+    # Los 3 cambiados + el de la marca anterior (se pide con >=).
+    assert (r.cups_remoto_total, r.cups_leidos) == (51, 4)
+    assert (r.cups_creados, r.cups_actualizados, r.cups_sin_cambios) == (1, 2, 1)
+    assert r.cts_leidos == 1 and r.contadores_leidos == 1
+    assert r.cups_huerfanos == 0
+    assert sum(n for modelo, n in gisce.lecturas if modelo == "giscedata.cups.ps") == 4
+
+    titular, activo = db.query(Cups.titular, Cups.activo).filter(Cups.id_externo_gisce == 3).one()
+    assert titular == "Nuevo titular"
+    assert activo is True
+    assert db.query(Cups.activo).filter(Cups.id_externo_gisce == 4).scalar() is False
+    assert sync.leer_marcas(db, 1)["giscedata.cups.ps"] == "2026-03-02 12:00:00"
+    assert db.query(StgGisceSyncMarca).filter_by(modelo="giscedata.cups.ps").one().registros_ultima_sync == 4
+
+    # Sin cambios nuevos: solo se releen los de la marca (>=), sin efecto.
+    r = services.execute_import(db, 1, incremental=True)
+    assert (r.cups_leidos, r.cups_creados, r.cups_actualizados, r.cups_sin_cambios) == (1, 0, 0, 1)
+
+
+def test_incremental_reintenta_los_cups_sin_ct(gisce, db):
+    _poblar(gisce, 10)
+    gisce.datos["giscedata.cups.ps"][5]["et"] = "CT.9"
+
+    r = services.execute_import(db, 1)
+    assert (r.cups_creados, r.cups_skipped_sin_ct, r.contadores_sin_cups_local) == (9, 1, 1)
+
+    # El CT se da de alta en local después; en GISCE el CUPS no cambia y la
+    # marca ya está por encima de su create_date.
+    db.add(StgConcentrador(id=9, tenant_id=1, empresa_id=1, codigo_ct="CIR99", id_ct="CT.9"))
+    db.commit()
+    r = services.execute_import(db, 1, incremental=True)
+    assert r.ok, r.error
+    assert (r.cups_leidos, r.cups_creados, r.cups_skipped_sin_ct) == (2, 1, 0)
+    assert r.contadores_enlazados == 1
+    assert db.query(Cups).filter(Cups.id_externo_gisce == 5).count() == 1
+
+    # Ya aplicados: no quedan pendientes y no se vuelven a pedir.
+    assert sync.leer_pendientes(db, 1) == {m: [] for m in services._MODELOS_IMPORT}
+    r = services.execute_import(db, 1, incremental=True)
+    assert (r.cups_leidos, r.contadores_leidos) == (1, 1)
+
+
+def test_credenciales_rechazadas(gisce, db):
+    cfg = db.query(StgGisceConfig).one()
+    cfg.password_cifrado = "otra"
+    db.commit()
+
+    r = services.execute_import(db, 1, incremental=True)
+
+    assert not r.ok
+    assert "Credenciales rechazadas" in r.error
+    assert db.query(StgGisceSyncMarca).count() == 0
@@ -0,0 +1,147 @@
+"""
+Tests del borrado de ficheros de ingestión por conjuntos
+(`app.ingestion.delete_services`): recuentos, periodos afectados, huérfanos
+y refacturas del preview, el borrado real y nº de consultas fijo.
+"""
+
+from __future__ import annotations
+
+import pytest
+from sqlalchemy import event
+
+from app.ingestion import delete_services as ds
+from app.ingestion.models import IngestionFile
+from app.measures.bald_contrib_models import BaldPeriodContribution
+from app.measures.general_contrib_models import GeneralPeriodContribution
+from app.measures.m1_models import M1PeriodContribution
+from app.measures.models import MedidaGeneral, MedidaPS
+from app.measures.ps_detail_models import PSPeriodDetail
+from app.measures.ps_models import PSPeriodContribution
+
+
+def _fichero(db, fid: int, tipo: str, anio: int, mes: int) -> None:
+    db.add(IngestionFile(id=fid, tenant_id=1, empresa_id=1, tipo=tipo, anio=anio, mes=mes,
+                         filename=f"{tipo}_{anio}{mes:02d}_{fid}.xlsx", uploaded_by=1, status="ok"))
+
+
+def _m1(db, fid: int, anio: int, mes: int, kwh: float) -> None:
+    db.add(M1PeriodContribution(tenant_id=1, empresa_id=1, ingestion_file_id=fid,
+                                anio=anio, mes=mes, energia_kwh=kwh))
+
+
+def _medida_general(db, fid: int, anio: int, mes: int) -> None:
+    db.add(MedidaGeneral(tenant_id=1, empresa_id=1, punto_id="GENERAL", anio=anio, mes=mes, file_id=fid))
+
+
+@pytest.fixture
+def general(memory_db):
+    # F10 (2025-12) aporta a 2025-12; F11 (2026-01) aporta a 2026-01 y
+    # refactura 2025-12. La medida de 2026-01 la creó F10 (no se borra directa).
+    _fichero(memory_db, 10, "M1", 2025, 12)
+    _fichero(memory_db, 11, "M1", 2026, 1)
+    _fichero(memory_db, 12, "BALD", 2026, 2)
+    memory_db.flush()
+    _m1(memory_db, 10, 2025, 12, 100.0)
+    _m1(memory_db, 11, 2026, 1, 200.0)
+    _m1(memory_db, 11, 2025, 12, 7.5)
+    memory_db.add(GeneralPeriodContribution(tenant_id=1, empresa_id=1, ingestion_file_id=11,
+                                            anio=2026, mes=1, source_tipo="M1"))
+    memory_db.add(BaldPeriodContribution(tenant_id=1, empresa_id=1, ingestion_file_id=12,
+                                         anio=2026, mes=2, ventana_publicacion="M2"))
+    _medida_general(memory_db, 10, 2025, 12)
+    _medida_general(memory_db, 10, 2026, 1)
+    _medida_general(memory_db, 12, 2026, 2)
+    memory_db.commit()
+    return memory_db
+
+
+def test_preview_general_por_conjuntos(general):
+    data = ds.build_delete_preview(general, empresa_id=1, tipo="M1", anio=2026, mes=1)
+
+    assert [f["id"] for f in data["ingestion_files"]] == [11]
+    s = data["summary"]
+    assert (s["m1_period_contributions_count"], s["general_period_contributions_count"],
+            s["bald_period_contributions_count"], s["medidas_general_direct_count"]) == (2, 1, 0, 0)
+    assert [(p["anio"], p["mes"]) for p in data["affected_general_periods"]] == [(2025, 12), (2026, 1)]
+    # 2025-12 conserva la M1 de F10; 2026-01 se queda sin contribuciones.
+    assert [(p["anio"], p["mes"]) for p in data["orphan_medidas_general_candidates"]] == [(2026, 1)]
+    assert data["refacturas_m1"] == [{
+        "source_period": {"anio": 2026, "mes": 1},
+        "affected_period": {"anio": 2025, "mes": 12},
+        "energia_kwh": 7.5,
+        "filename": "M1_202601_11.xlsx",
+        "ingestion_file_id": 11,
+    }]
+    assert s["refacturas_m1_count"] == 1
+    # El preview no borra nada ni deja tablas temporales.
+    assert general.query(M1PeriodContribution).count() == 3
+    data_otra_vez = ds.build_delete_preview(general, empresa_id=1, tipo="M1", anio=2026, mes=1)
+    assert data_otra_vez == data
+
+
+def test_execute_general_borra_y_limpia_huerfanas(general):
+    res = ds.execute_delete(general, empresa_id=1, tipo="M1", anio=2026, mes=1)
+
+    assert res["deleted_ingestion_files"] == 1
+    assert res["deleted_m1_period_contributions"] == 2
+    assert res["deleted_general_period_contributions"] == 1
+    assert (res["deleted_medidas_general_direct"], res["deleted_medidas_general_orphan"]) == (0, 1)
+
+    general.expire_all()
+    assert {(m.anio, m.mes) for m in general.query(MedidaGeneral)} == {(2025, 12), (2026, 2)}
+    assert [(m.ingestion_file_id, m.energia_kwh) for m in general.query(M1PeriodContribution)] == [(10, 100.0)]
+    assert general.get(IngestionFile, 11) is None
+
+
+def test_ps_por_conjuntos(memory_db):
+    _fichero(memory_db, 20, "PS", 2026, 3)
+    _fichero(memory_db, 21, "PS", 2026, 4)
+    memory_db.flush()
+    for fid, mes in ((20, 3), (21, 4)):
+        memory_db.add_all([PSPeriodDetail(tenant_id=1, empresa_id=1, ingestion_file_id=fid, anio=2026,
+                                          mes=mes, cups=f"ES{fid}{i:04d}") for i in range(5)])
+        memory_db.add(PSPeriodContribution(tenant_id=1, empresa_id=1, ingestion_file_id=fid,
+                                           anio=2026, mes=mes))
+        memory_db.add(MedidaPS(tenant_id=1, empresa_id=1, punto_id="PS", anio=2026, mes=mes, file_id=fid))
+    memory_db.commit()
+
+    data = ds.build_delete_preview(memory_db, empresa_id=1, tipo="PS", anio=2026, mes=3)
+    s = data["summary"]
+    assert (s["ps_period_detail_count"], s["ps_period_contributions_count"],
+            s["medidas_ps_direct_count"], s["orphan_medidas_ps_candidate_count"]) == (5, 1, 1, 1)
+    assert s["m1_period_contributions_count"] == 0
+
+    res = ds.execute_delete(memory_db, empresa_id=1, tipo="PS", anio=2026, mes=3)
+    assert (res["deleted_ps_period_detail"], res["deleted_ps_period_contributions"],
+            res["deleted_medidas_ps_direct"], res["deleted_ingestion_files"]) == (5, 1, 1, 1)
+    assert memory_db.query(PSPeriodDetail).count() == 5
+    assert memory_db.query(MedidaPS).one().mes == 4
+
+
+def _consultas_preview(db, **filtros) -> int:
+    consultas = []
+    oyente = lambda *a: consultas.append(a[2])  # noqa: E731
+    event.listen(db.get_bind(), "before_cursor_execute", oyente)
+    try:
+        ds.build_delete_preview(db, **filtros)
+    finally:
+        event.remove(db.get_bind(), "before_cursor_execute", oyente)
+    return len(consultas)
+
+
+def test_consultas_no_dependen_del_volumen(memory_db):
+    _fichero(memory_db, 1, "PS", 2025, 1)
+    memory_db.flush()
+    memory_db.add(PSPeriodDetail(tenant_id=1, empresa_id=1, ingestion_file_id=1, anio=2025, mes=1, cups="ES0"))
+    memory_db.commit()
+    pocas = _consultas_preview(memory_db, empresa_id=1, tipo="PS", anio=2025)
+
+    for mes in range(2, 13):
+        _fichero(memory_db, 100 + mes, "PS", 2025, mes)
+    memory_db.flush()
+    for mes in range(2, 13):
+        memory_db.add_all([PSPeriodDetail(tenant_id=1, empresa_id=1, ingestion_file_id=100 + mes,
+                                          anio=2025, mes=mes, cups=f"ES{mes}{i:05d}") for i in range(200)])
+    memory_db.commit()
+
+    assert _consultas_preview(memory_db, empresa_id=1, tipo="PS", anio=2025) == pocas
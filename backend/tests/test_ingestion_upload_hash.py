@@ -0,0 +1,98 @@
+"""
+Tests de `stream_to_disk_with_hash` y de la detección de re-subidas
+idénticas en POST /ingestion/files/upload.
+"""
+
+from __future__ import annotations
+
+import hashlib
+import io
+
+import pytest
+from fastapi import status
+
+from app.ingestion import routes as ingestion_routes
+from app.ingestion.models import IngestionFile
+from app.ingestion.utils import stream_to_disk_with_hash
+
+
+def test_stream_escribe_y_hashea_a_la_vez(tmp_path):
+    contenido = b"0123456789" * 1000 + b"fin"
+    tmp, sha, size = stream_to_disk_with_hash(io.BytesIO(contenido), tmp_path, chunk_size=64)
+
+    assert tmp.parent == tmp_path
+    assert tmp.read_bytes() == contenido
+    assert sha == hashlib.sha256(contenido).hexdigest()
+    assert size == len(contenido)
+
+
+# ── Endpoint de subida ───────────────────────────────────────────────────────
+
+_NOMBRE = "REE123_202602.xlsx"  # código REE de la empresa demo de conftest
+_CONTENIDO = b"contenido M1 de prueba"
+
+
+@pytest.fixture
+def subir(client, tmp_path, monkeypatch):
+    monkeypatch.setattr(ingestion_routes, "UPLOAD_BASE_PATH", tmp_path)
+    resp = client.post(
+        "/auth/login",
+        data={"username": "carlos@example.com", "password": "changeme123"},
+    )
+    assert resp.status_code == status.HTTP_200_OK, resp.text
+    headers = {"Authorization": f"Bearer {resp.json()['access_token']}"}
+
+    def _subir(contenido: bytes = _CONTENIDO):
+        return client.post(
+            "/ingestion/files/upload",
+            headers=headers,
+            data={"empresa_id": "1", "tipo": "M1"},
+            files={"file": (_NOMBRE, contenido, "application/octet-stream")},
+        )
+
+    return _subir
+
+
+def _marcar(db_session, file_id: int, **valores) -> None:
+    db_session.query(IngestionFile).filter(IngestionFile.id == file_id).update(valores)
+    db_session.commit()
+
+
+def test_resubida_identica_devuelve_el_existente_sin_tocarlo(subir, db_session, tmp_path):
+    primera = subir()
+    assert primera.status_code == status.HTTP_201_CREATED, primera.text
+    assert "X-Ingestion-Duplicate" not in primera.headers
+    file_id = primera.json()["id"]
+    _marcar(db_session, file_id, status=IngestionFile.STATUS_OK, rows_ok=10)
+
+    segunda = subir()
+
+    assert segunda.status_code == status.HTTP_200_OK, segunda.text
+    assert segunda.headers["X-Ingestion-Duplicate"] == "true"
+    assert segunda.json()["id"] == file_id
+    db_session.expire_all()
+    fichero = db_session.get(IngestionFile, file_id)
+    assert (fichero.status, fichero.rows_ok) == (IngestionFile.STATUS_OK, 10)
+    assert db_session.query(IngestionFile).count() == 1
+    # Ni .part huérfanos ni copias: solo el fichero de la primera subida.
+    assert [p.name for p in tmp_path.rglob("*") if p.is_file()] == [_NOMBRE]
+
+
+def test_contenido_distinto_no_es_duplicado(subir):
+    assert subir().status_code == status.HTTP_201_CREATED
+    otra = subir(_CONTENIDO + b" v2")
+    assert otra.status_code == status.HTTP_201_CREATED
+    assert "X-Ingestion-Duplicate" not in otra.headers
+
+
+def test_fichero_en_error_no_cuenta_como_duplicado(subir, db_session):
+    file_id = subir().json()["id"]
+    _marcar(db_session, file_id, status=IngestionFile.STATUS_ERROR, error_message="roto")
+
+    otra = subir()
+
+    assert otra.status_code == status.HTTP_201_CREATED, otra.text
+    assert "X-Ingestion-Duplicate" not in otra.headers
+    # Mismo fichero lógico: se reutiliza el registro y vuelve a pending.
+    assert otra.json()["id"] == file_id
+    assert otra.json()["status"] == IngestionFile.STATUS_PENDING
@@ -0,0 +1,59 @@
+"""
+Tests del import masivo de objeciones (`services_importacion`) y del
+reemplazo atómico de versiones.
+"""
+
+from __future__ import annotations
+
+from decimal import Decimal
+
+import pytest
+
+from app.objeciones import services
+from app.objeciones.models import ObjecionAGRECL, ObjecionFicheroResumen
+from app.objeciones.services_importacion import parsear_objeciones
+
+
+def test_parseo_por_columnas():
+    contenido = (
+        "ES0001 ; 20250701 01;20250731 24;100;1,5;2.25;abc;;coment;N\n"
+        " ; ; \n"
+        "ES0002;;;101;;-3e2\n"
+    ).encode("latin-1")
+    df = parsear_objeciones(contenido, services._LAYOUT_INCL)
+
+    assert len(df) == 2  # la fila en blanco se descarta
+    assert list(df["cups"]) == ["ES0001", "ES0002"]
+    assert list(df["periodo"]) == ["20250701 01 - 20250731 24", None]
+    assert list(df["ae_publicada"]) == ["1.5", None]
+    assert list(df["ae_propuesta"]) == ["2.25", "-3e2"]
+    assert list(df["as_publicada"]) == [None, None]  # "abc" no es decimal
+    assert list(df["autoobjecion"]) == ["N", None]   # fila corta → NULL
+
+
+def test_import_y_reemplazo_atomico(memory_db, monkeypatch):
+    v0 = "AOBAGRECL_0277_202501_20250301.0"
+    v1 = "AOBAGRECL_0277_202501_20250301.1"
+    fila = "ID{n};0277;1234;E0;2.0TD;E3;5;28;1;2025/01;100;AE;10,5;12;;N;;;"
+
+    n = services.import_agrecl(memory_db, tenant_id=1, empresa_id=1, nombre_fichero=v0,
+                               content="\n".join(fila.format(n=i) for i in range(3)).encode())
+    assert n == 3
+    obj = memory_db.query(ObjecionAGRECL).filter_by(id_objecion="ID0").one()
+    assert obj.e_publicada == Decimal("10.5") and obj.respuesta_publicada == 0
+
+    # Un fallo a mitad de la carga deja la versión anterior intacta.
+    def _falla(*args, **kwargs):
+        raise RuntimeError("COPY interrumpido")
+
+    monkeypatch.setattr(services, "cargar_objeciones", _falla)
+    with pytest.raises(RuntimeError):
+        services.import_agrecl(memory_db, tenant_id=1, empresa_id=1, nombre_fichero=v1,
+                               content=fila.format(n=9).encode(), reemplazar=v0)
+    assert memory_db.query(ObjecionAGRECL).filter_by(nombre_fichero=v0).count() == 3
+    monkeypatch.undo()
+
+    services.import_agrecl(memory_db, tenant_id=1, empresa_id=1, nombre_fichero=v1,
+                           content=fila.format(n=9).encode(), reemplazar=v0)
+    assert {o.nombre_fichero for o in memory_db.query(ObjecionAGRECL).all()} == {v1}
+    assert [r.nombre_fichero for r in memory_db.query(ObjecionFicheroResumen).all()] == [v1]
@@ -0,0 +1,132 @@
+"""
+Tests de la generación REOB en streaming (`reob_stream` + services).
+"""
+
+from __future__ import annotations
+
+import bz2
+import io
+import zipfile
+
+import pytest
+
+from app.objeciones import services
+from app.comunicaciones import services as comunicaciones
+from app.objeciones.models import ObjecionAGRECL, ReobGenerado
+from app.objeciones.reob_stream import iter_bz2_csv
+
+
+_AOB = "AOBAGRECL_0277_202501_20250301.0"
+
+
+@pytest.fixture
+def session(memory_db):
+    filas = [
+        f"AG_{cccc}_0277_202501_{n};0277;{cccc};E0;2.0TD;E3;5;28;1;2025/01;100;AE;10;12;;N;{acept};;"
+        for n, (cccc, acept) in enumerate([("0921", "S"), ("0100", "N"), ("0921", "N"), ("0100", "")])
+    ]
+    services.import_agrecl(memory_db, tenant_id=1, empresa_id=1, nombre_fichero=_AOB,
+                           content="\n".join(filas).encode("latin-1"))
+    return memory_db
+
+
+def test_bz2_incremental_cede_antes_de_la_ultima_fila():
+    leidas: list[int] = []
+
+    def _rows():
+        for i in range(20000):
+            leidas.append(i)
+            yield [str(i), f"{i:08d}" * 20]
+
+    gen = iter_bz2_csv(_rows(), flush_rows=100)
+    primero = next(gen)
+    # bz2 trabaja por bloques de 900 kB: el primero sale mucho antes del final.
+    assert len(leidas) < 20000
+    datos = bz2.decompress(primero + b"".join(gen))
+    assert datos.count(b"\n") == 20000
+
+
+def test_zip_agrecl_un_bz2_por_comercializadora(session):
+    chunks, nombre_zip = services.stream_reobagrecl_zip(
+        session, tenant_id=1, empresa_id=1, nombre_fichero=_AOB,
+    )
+    assert nombre_zip.startswith("REOBAGRECL_0277_202501_")
+
+    zf = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    miembros = {n.split("_")[2]: bz2.decompress(zf.read(n)).decode("latin-1") for n in zf.namelist()}
+    assert set(miembros) == {"0921", "0100"}
+    # Solo las respondidas S/N: dos de 0921 y una de 0100.
+    assert miembros["0921"].count("\n") == 2
+    assert miembros["0100"].count("\n") == 1
+    assert miembros["0100"].startswith("0277;0100;E0;2.0TD;E3;5;28;1;2025/01;100;AE;10;12;;N;N;;")
+
+
+def test_zip_agrecl_ids_raros_van_al_mismo_bz2(memory_db):
+    # Sin comercializadora o con el token vacío: todas a "0000", contiguas
+    # aunque por orden de ID queden a ambos lados de las de 0921.
+    ids = ["AG", "AG_0921_0277_202501_1", "AG__x", "AG~1"]
+    filas = [f"{i};0277;0921;E0;2.0TD;E3;5;28;1;2025/01;100;AE;10;12;;N;S;;" for i in ids]
+    services.import_agrecl(memory_db, tenant_id=1, empresa_id=1, nombre_fichero=_AOB,
+                           content="\n".join(filas).encode("latin-1"))
+
+    chunks, _ = services.stream_reobagrecl_zip(memory_db, tenant_id=1, empresa_id=1, nombre_fichero=_AOB)
+    zf = zipfile.ZipFile(io.BytesIO(b"".join(chunks)))
+    nombres = zf.namelist()
+    assert len(nombres) == len(set(nombres)) == 2
+    filas_por_cccc = {n.split("_")[2]: bz2.decompress(zf.read(n)).count(b"\n") for n in nombres}
+    assert filas_por_cccc == {"0000": 3, "0921": 1}
+
+
+class _FtpFalso:
+    def __init__(self) -> None:
+        self.subidos: dict[str, bytes] = {}
+
+    def storbinary(self, cmd: str, fp, blocksize: int = 8192) -> None:
+        # Como un STOR real: lo leído llega al servidor aunque luego falle.
+        nombre = cmd.removeprefix("STOR ")
+        self.subidos[nombre] = b""
+        while bloque := fp.read(blocksize):
+            self.subidos[nombre] += bloque
+
+    def quit(self) -> None:
+        pass
+
+
+@pytest.fixture
+def ftp(monkeypatch):
+    falso = _FtpFalso()
+    monkeypatch.setattr(comunicaciones, "_get_config_by_id_activa", lambda db, **kw: object())
+    monkeypatch.setattr(comunicaciones, "_conectar_en_path", lambda config, directorio: falso)
+    return falso
+
+
+def _enviar(session):
+    return services.enviar_al_sftp(session, tipo="agrecl", tenant_id=1, empresa_id=1,
+                                   nombre_fichero=_AOB, config_id=1, directorio_destino="/")
+
+
+def test_enviar_al_sftp_sube_un_bz2_completo_por_comercializadora(session, ftp):
+    _enviar(session)
+
+    assert len(ftp.subidos) == 2
+    lineas = sorted(bz2.decompress(d).decode("latin-1").count("\n") for d in ftp.subidos.values())
+    assert lineas == [1, 2]
+    assert session.query(ReobGenerado).count() == 2
+
+
+def test_enviar_al_sftp_no_sube_nada_si_falla_la_generacion(session, ftp, monkeypatch):
+    miembros = services._reob_miembros_agrecl
+
+    def _falla_a_mitad(db, **kw):
+        for nombre, chunks, contador in miembros(db, **kw):
+            def _cortado(chunks=chunks):
+                yield next(iter(chunks))
+                raise RuntimeError("conexión perdida")
+            yield nombre, _cortado(), contador
+
+    monkeypatch.setattr(services, "_reob_miembros_agrecl", _falla_a_mitad)
+    with pytest.raises(RuntimeError):
+        _enviar(session)
+
+    assert ftp.subidos == {}
+    assert session.query(ObjecionAGRECL).filter(ObjecionAGRECL.enviado_sftp_at.isnot(None)).count() == 0
@@ -0,0 +1,88 @@
+"""
+Tests de las estadísticas por fichero de objeciones (GROUP BY en SQL) y del
+mantenimiento de la tabla resumen `objeciones_ficheros_resumen`.
+
+SQLite en memoria (`memory_db` de conftest).
+"""
+
+from __future__ import annotations
+
+import pytest
+
+from app.core.config import get_settings
+from app.objeciones import services
+from app.objeciones.models import ObjecionAGRECL, ObjecionFicheroResumen
+
+
+_F1 = "AOBAGRECL_0277_202501_20250301.0"
+_F2 = "AOBAGRECL_0277_202502_20250401.0"
+
+
+def _fila(id_obj: str, aceptacion: str = "") -> str:
+    cols = [id_obj, "0277", "1234", "E0", "2.0TD", "E3", "5", "28", "1", "2025/01",
+            "100", "AE", "10", "12", "", "N", aceptacion, "", ""]
+    return ";".join(cols)
+
+
+@pytest.fixture
+def session(memory_db):
+    contenido = "\n".join([_fila("A1", "S"), _fila("A2", "N"), _fila("A3"), _fila("A4")]).encode("latin-1")
+    services.import_agrecl(memory_db, tenant_id=1, empresa_id=1, nombre_fichero=_F1, content=contenido)
+    services.import_agrecl(memory_db, tenant_id=1, empresa_id=2, nombre_fichero=_F1, content=_fila("B1", "S").encode())
+    services.import_agrecl(memory_db, tenant_id=1, empresa_id=1, nombre_fichero=_F2, content=_fila("C1").encode())
+    return memory_db
+
+
+@pytest.fixture(params=[False, True], ids=["agregado", "resumen"])
+def modo_resumen(request, monkeypatch):
+    monkeypatch.setattr(get_settings(), "OBJECIONES_RESUMEN_FICHEROS", request.param)
+    return request.param
+
+
+def _por_nombre(stats: list[dict]) -> dict[str, dict]:
+    return {f["nombre_fichero"]: f for f in stats}
+
+
+def test_stats_por_empresa_y_tenant(session, modo_resumen):
+    f = _por_nombre(services.ficheros_agrecl(session, tenant_id=1, empresa_id=1))
+    assert set(f) == {_F1, _F2}
+    assert (f[_F1]["total"], f[_F1]["aceptadas"], f[_F1]["rechazadas"], f[_F1]["pendientes"]) == (4, 1, 1, 2)
+    assert f[_F1]["aaaamm"] == "202501"
+
+    # Sin empresa se suman las de todas las empresas del tenant.
+    todas = _por_nombre(services.ficheros_agrecl(session, tenant_id=1))
+    assert todas[_F1]["total"] == 5 and todas[_F1]["aceptadas"] == 2
+    assert services.ficheros_agrecl(session, tenant_id=2) == []
+
+
+def test_resumen_se_mantiene_en_respuesta_borrado_y_envio(session, modo_resumen):
+    pendiente = session.query(ObjecionAGRECL).filter_by(empresa_id=1, id_objecion="A3").one()
+    services.update_agrecl_respuesta(
+        session, id=pendiente.id, tenant_id=1, empresa_id=1,
+        aceptacion="S", motivo_no_aceptacion=None, comentario_respuesta=None,
+    )
+    f = _por_nombre(services.ficheros_agrecl(session, tenant_id=1, empresa_id=1))
+    assert (f[_F1]["aceptadas"], f[_F1]["pendientes"]) == (2, 1)
+
+    rechazada = session.query(ObjecionAGRECL).filter_by(empresa_id=1, id_objecion="A2").one()
+    services.delete_agrecl(session, ids=[rechazada.id], tenant_id=1, empresa_id=1)
+    services.toggle_enviado_sftp(session, tipo="agrecl", tenant_id=1, empresa_id=1, nombre_fichero=_F1)
+    services.delete_agrecl_fichero(session, nombre_fichero=_F2, tenant_id=1, empresa_id=1)
+
+    f = _por_nombre(services.ficheros_agrecl(session, tenant_id=1, empresa_id=1))
+    assert set(f) == {_F1}
+    assert (f[_F1]["total"], f[_F1]["aceptadas"], f[_F1]["rechazadas"], f[_F1]["pendientes"]) == (3, 2, 0, 1)
+    assert f[_F1]["enviado_sftp_at"] is not None
+
+
+def test_reconstruir_resumen_coincide_con_incremental(session):
+    antes = {
+        (r.empresa_id, r.nombre_fichero, r.total, r.aceptadas, r.rechazadas, r.pendientes)
+        for r in session.query(ObjecionFicheroResumen).all()
+    }
+    assert services.reconstruir_resumen_ficheros(session) == 3
+    despues = {
+        (r.empresa_id, r.nombre_fichero, r.total, r.aceptadas, r.rechazadas, r.pendientes)
+        for r in session.query(ObjecionFicheroResumen).all()
+    }
+    assert antes == despues
@@ -0,0 +1,129 @@
+"""
+Tests de la conciliación de pérdidas S02 / BALD
+(`app.perdidas.conciliacion`).
+"""
+
+from __future__ import annotations
+
+from datetime import date
+
+import pytest
+
+from app.ingestion import delete_services
+from app.ingestion.models import IngestionFile
+from app.measures.models import MedidaGeneral
+from app.perdidas import conciliacion
+from app.perdidas.models import (
+    Concentrador,
+    ConciliacionPerdidas,
+    ConciliacionPerdidasCT,
+    PerdidaDiaria,
+)
+
+
+@pytest.fixture
+def db(memory_db):
+    for i in (1, 2, 3):
+        memory_db.add(Concentrador(
+            id=i, tenant_id=1, empresa_id=1, nombre_ct=f"CT{i}",
+            id_concentrador=f"CIR{i}", id_supervisor=f"SUP{i}",
+        ))
+    memory_db.commit()
+    return memory_db
+
+
+def _dia(db, concentrador_id, fecha, energia_wh, perdida_wh):
+    db.add(PerdidaDiaria(
+        tenant_id=1, empresa_id=1, concentrador_id=concentrador_id, fecha=fecha,
+        energia_neta_wh=energia_wh, perdida_wh=perdida_wh, estado="ok",
+    ))
+
+
+def _bald(db, *, m2_pct=None, art15_pct=None):
+    mg = MedidaGeneral(tenant_id=1, empresa_id=1, punto_id="BALD", anio=2026, mes=3, file_id=1)
+    # pct = perdidas / (neta + frontera) × 100, con denominador 1000 kWh.
+    for v, pct in (("m2", m2_pct), ("art15", art15_pct)):
+        if pct is not None:
+            setattr(mg, f"energia_neta_facturada_{v}_kwh", 1000.0)
+            setattr(mg, f"energia_frontera_dd_{v}_kwh", 0.0)
+            setattr(mg, f"perdidas_e_facturada_{v}_kwh", pct * 10)
+            setattr(mg, f"perdidas_e_facturada_{v}_pct", pct)
+    db.add(mg)
+
+
+def test_calcular_marca_los_cts_que_explican_la_divergencia():
+    cts = [
+        {"concentrador_id": 1, "dias_procesados": 30, "dias_completos": 30, "energia_kwh": 1000.0, "perdida_kwh": 50.0},
+        {"concentrador_id": 2, "dias_procesados": 30, "dias_completos": 30, "energia_kwh": 1000.0, "perdida_kwh": 250.0},
+        {"concentrador_id": 3, "dias_procesados": 30, "dias_completos": 28, "energia_kwh": 1000.0, "perdida_kwh": 60.0},
+    ]
+    cabecera, filas = conciliacion.calcular(cts, {"m2": (50.0, 5.0), "art15": (None, None)})
+
+    assert cabecera["ventana_referencia"] == "M2"
+    assert cabecera["perdida_s02_pct"] == pytest.approx(12.0)
+    assert cabecera["divergencia_pp"] == pytest.approx(7.0)
+    assert cabecera["estado"] == "divergente"
+    por_ct = {f["concentrador_id"]: f for f in filas}
+    assert por_ct[2]["exceso_kwh"] == pytest.approx(200.0)
+    assert [f["concentrador_id"] for f in filas if f["marcado"]] == [2]
+
+
+def test_calcular_sin_bald_o_sin_s02():
+    ct = {"concentrador_id": 1, "dias_procesados": 1, "dias_completos": 1, "energia_kwh": 10.0, "perdida_kwh": 1.0}
+    assert conciliacion.calcular([ct], {})[0]["estado"] == "sin_bald"
+    assert conciliacion.calcular([], {"m2": (5.0, 5.0)})[0]["estado"] == "sin_s02"
+
+
+def test_recalcular_periodo_usa_la_ventana_mas_reciente(db):
+    _dia(db, 1, date(2026, 3, 1), 500_000, 25_000)
+    _dia(db, 1, date(2026, 3, 2), 500_000, 25_000)
+    _dia(db, 2, date(2026, 3, 1), 1_000_000, 200_000)
+    _dia(db, 2, date(2026, 4, 1), 1_000_000, 999_000)  # otro mes
+    _bald(db, m2_pct=4.0, art15_pct=5.0)
+    db.commit()
+
+    conciliacion.recalcular_tras_s02(db, tenant_id=1, procesados=[(1, date(2026, 3, 1))])
+
+    conc = db.query(ConciliacionPerdidas).filter_by(anio=2026, mes=3).one()
+    assert (conc.num_cts, conc.dias_procesados) == (2, 3)
+    assert conc.energia_s02_kwh == pytest.approx(2000.0)
+    assert conc.perdida_s02_pct == pytest.approx(12.5)
+    assert conc.ventana_referencia == "ART15"
+    assert conc.perdidas_art15_pct == pytest.approx(5.0)
+    assert conc.perdidas_m7_pct is None
+    assert conc.divergencia_pp == pytest.approx(7.5)
+
+    cts = conciliacion.list_cts_conciliacion(db, tenant_id=1, allowed_empresa_ids=[1], conciliacion_id=conc.id)
+    assert [(c["nombre_ct"], c["marcado"]) for c in cts] == [("CT2", True), ("CT1", False)]
+    assert conciliacion.list_cts_conciliacion(db, tenant_id=1, allowed_empresa_ids=[2], conciliacion_id=conc.id) is None
+
+
+def test_recalcular_sin_datos_borra_la_conciliacion(db):
+    _dia(db, 1, date(2026, 3, 1), 500_000, 25_000)
+    db.commit()
+    conciliacion.recalcular_periodos(db, tenant_id=1, periodos=[(1, 2026, 3)])
+    assert db.query(ConciliacionPerdidas).one().estado == "sin_bald"
+
+    db.query(PerdidaDiaria).delete()
+    db.commit()
+    periodos = conciliacion.periodos_pendientes(db, tenant_id=1, empresa_ids=[1])
+    assert periodos == {(1, 2026, 3)}
+    conciliacion.recalcular_periodos(db, tenant_id=1, periodos=periodos)
+    assert db.query(ConciliacionPerdidas).count() == 0
+    assert db.query(ConciliacionPerdidasCT).count() == 0
+
+
+def test_borrar_el_bald_recalcula_la_conciliacion(db):
+    _dia(db, 1, date(2026, 3, 1), 500_000, 25_000)
+    db.add(IngestionFile(id=1, tenant_id=1, empresa_id=1, tipo="BALD", anio=2026, mes=3,
+                         filename="BALD_0277_202603_20260401.0", uploaded_by=1, status="ok"))
+    _bald(db, m2_pct=4.0)
+    db.commit()
+    conciliacion.recalcular_periodos(db, tenant_id=1, periodos=[(1, 2026, 3)])
+    assert db.query(ConciliacionPerdidas).one().perdidas_m2_pct == pytest.approx(4.0)
+
+    delete_services.execute_delete(db, empresa_id=1, tipo="BALD", anio=2026, mes=3)
+
+    db.expire_all()
+    conc = db.query(ConciliacionPerdidas).one()
+    assert (conc.estado, conc.perdidas_m2_pct) == ("sin_bald", None)
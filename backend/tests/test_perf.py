@@ -0,0 +1,96 @@
+"""
+Tests de la instrumentación por request (`app.core.perf`).
+"""
+
+from __future__ import annotations
+
+import pytest
+from fastapi import Depends, FastAPI
+from fastapi.responses import StreamingResponse
+from fastapi.testclient import TestClient
+from sqlalchemy import create_engine, text
+from sqlalchemy.orm import Session
+from sqlalchemy.pool import StaticPool
+
+from app.core import perf
+from app.core.responses import MadridJSONResponse
+
+
+@pytest.fixture
+def entorno():
+    engine = create_engine(
+        "sqlite://", connect_args={"check_same_thread": False}, poolclass=StaticPool,
+    )
+    perf.instrument_engine(engine)
+    perf.instrument_engine(engine)  # idempotente
+    registro = perf.PerfRegistry()
+
+    def get_db():
+        with Session(engine) as s:
+            yield s
+
+    app = FastAPI(default_response_class=MadridJSONResponse)
+    app.add_middleware(perf.PerfMiddleware, perf_registry=registro)
+
+    @app.get("/items/{item_id}")
+    @perf.perf_budget(queries=3)
+    def get_item(item_id: int, n: int = 1, db: Session = Depends(get_db)):
+        for _ in range(n):
+            db.execute(text("SELECT 1 UNION ALL SELECT 2")).all()
+        return {"id": item_id}
+
+    @app.get("/stream")
+    def get_stream(db: Session = Depends(get_db)):
+        def _gen():
+            for i in range(3):
+                yield str(db.execute(text("SELECT :i"), {"i": i}).scalar()).encode()
+        return StreamingResponse(_gen())
+
+    return TestClient(app), registro
+
+
+def _ruta(registro, route):
+    return next(r for r in registro.snapshot() if r["route"] == route)
+
+
+def test_cuenta_consultas_por_plantilla_de_ruta(entorno):
+    client, registro = entorno
+    assert client.get("/items/1?n=2").status_code == 200
+    assert client.get("/items/2?n=2").status_code == 200
+
+    r = _ruta(registro, "/items/{item_id}")
+    assert r["requests"] == 2
+    assert r["avg_queries"] == 2 and r["max_queries"] == 2
+    assert r["avg_serialization_ms"] > 0
+    assert registro.violations() == []
+
+
+def test_streaming_cuenta_consultas_del_generador(entorno):
+    client, registro = entorno
+    assert client.get("/stream").content == b"012"
+    assert _ruta(registro, "/stream")["max_queries"] == 3
+
+
+def test_presupuesto_superado(entorno):
+    client, registro = entorno
+    client.get("/items/1?n=5")
+
+    violaciones = registro.violations()
+    assert len(violaciones) == 1
+    assert violaciones[0]["route"] == "/items/{item_id}"
+    assert violaciones[0]["excesos"] == ["queries=5>3"]
+
+    metricas = registro.prometheus()
+    assert 'app_db_queries_total{method="GET",route="/items/{item_id}"} 5' in metricas
+    assert 'app_perf_budget_exceeded_total{method="GET",route="/items/{item_id}"} 1' in metricas
+    assert 'app_http_request_duration_seconds_count{method="GET",route="/items/{item_id}"} 1' in metricas
+
+
+def test_fuera_de_request_no_se_cuenta(entorno):
+    _, registro = entorno
+    engine = create_engine("sqlite://")
+    perf.instrument_engine(engine)
+    with engine.connect() as conn:
+        conn.execute(text("SELECT 1"))
+    assert perf.current_stats() is None
+    assert registro.snapshot() == []
@@ -0,0 +1,159 @@
+"""
+Tests de los tiempos por etapa de los pipelines
+(`app.core.pipeline_timing`): etapas anidadas y acumuladas, consultas por
+etapa, perfil cProfile opt-in y tiempos guardados con el fichero de
+ingestión y devueltos por la importación de topología.
+"""
+
+from __future__ import annotations
+
+import pstats
+from types import SimpleNamespace
+
+import pytest
+from fastapi import HTTPException
+from sqlalchemy import text
+
+from app.core import pipeline_timing as pt
+from app.ingestion.models import IngestionFile
+from app.ingestion.services import process_ingestion_file
+from app.stg import routes as stg_routes
+from app.topologia import services as topo
+from benchmarks.generador import Escala, Generador
+
+
+def _etapas(tiempos: pt.TiemposPipeline) -> dict:
+    return {e["etapa"]: e for e in tiempos.as_dict()["etapas"]}
+
+
+def test_etapas_anidadas_y_acumuladas():
+    with pt.medir_pipeline("prueba") as tiempos:
+        with pt.etapa("lectura", bytes=100) as e:
+            e.filas = 3
+        for _ in range(4):
+            with pt.etapa("escritura", filas=2):
+                with pt.etapa("flush"):
+                    pass
+
+    data = tiempos.as_dict()
+    assert data["pipeline"] == "prueba"
+    assert [e["etapa"] for e in data["etapas"]] == ["lectura", "escritura", "escritura/flush"]
+    etapas = _etapas(tiempos)
+    assert (etapas["lectura"]["veces"], etapas["lectura"]["filas"], etapas["lectura"]["bytes"]) == (1, 3, 100)
+    assert (etapas["escritura"]["veces"], etapas["escritura"]["filas"]) == (4, 8)
+    assert (etapas["escritura/flush"]["nivel"], etapas["escritura/flush"]["veces"]) == (1, 4)
+    assert data["total_ms"] >= etapas["escritura"]["ms"] >= etapas["escritura/flush"]["ms"]
+    assert data["perfil"] is None
+
+
+def test_sin_pipeline_no_mide_y_la_excepcion_cierra_la_etapa():
+    with pt.etapa("suelta") as e:
+        e.filas = 1
+    assert pt.pipeline_actual() is None
+
+    with pytest.raises(ValueError):
+        with pt.medir_pipeline("prueba") as tiempos:
+            with pt.etapa("falla"):
+                raise ValueError("x")
+    assert _etapas(tiempos)["falla"]["veces"] == 1
+    assert pt.pipeline_actual() is None
+
+
+def test_consultas_por_etapa(memory_engine):
+    pt.instrumentar_engine(memory_engine)
+    pt.instrumentar_engine(memory_engine)  # idempotente
+    with memory_engine.connect() as conn:
+        conn.execute(text("SELECT 1"))  # fuera de pipeline: no cuenta
+        with pt.medir_pipeline("prueba") as tiempos:
+            with pt.etapa("externa"):
+                conn.execute(text("SELECT 1"))
+                with pt.etapa("interna"):
+                    conn.execute(text("SELECT 1"))
+                    conn.execute(text("SELECT 1"))
+
+    etapas = _etapas(tiempos)
+    assert tiempos.consultas == 3
+    assert (etapas["externa"]["consultas"], etapas["externa/interna"]["consultas"]) == (3, 2)
+
+
+def test_perfil_opt_in(tmp_path, monkeypatch):
+    monkeypatch.setattr(pt, "get_settings", lambda: SimpleNamespace(PIPELINE_PROFILE_DIR=str(tmp_path)))
+
+    with pt.medir_pipeline("ingestion.M1", perfil_id=42) as tiempos:
+        sum(range(1000))
+
+    assert tiempos.perfil is not None
+    (fichero,) = tmp_path.glob("ingestion.M1_42_*.prof")
+    assert str(fichero) == tiempos.perfil
+    assert pstats.Stats(str(fichero)).total_calls > 0
+
+    with pt.medir_pipeline("ingestion.M1") as sin_perfil:
+        pass
+    assert sin_perfil.perfil is None
+    assert len(list(tmp_path.iterdir())) == 1
+
+
+def test_perfil_del_parseo_solo_superusuario():
+    with pytest.raises(HTTPException) as exc:
+        stg_routes.parsear_fichero(fichero_id=1, perfil=True, db=None,
+                                   user=SimpleNamespace(is_superuser=False))
+    assert exc.value.status_code == 403
+
+
+@pytest.fixture
+def db(memory_engine, memory_db):
+    pt.instrumentar_engine(memory_engine)
+    return memory_db
+
+
+def test_ingestion_guarda_tiempos_por_etapa(db, tmp_path):
+    fichero = Generador(Escala(cups=50, cts=2, meses=1)).m1(1, 2025, 1)
+    ruta = tmp_path / fichero.nombre
+    ruta.write_bytes(fichero.contenido)
+    ingestion = IngestionFile(tenant_id=1, empresa_id=1, tipo="M1", anio=2025, mes=1,
+                              filename=fichero.nombre, storage_key=str(ruta), uploaded_by=1,
+                              status=IngestionFile.STATUS_PENDING)
+    db.add(ingestion)
+    db.commit()
+
+    resultado = process_ingestion_file(db=db, ingestion=ingestion, tenant_id=1)
+
+    assert resultado.status == IngestionFile.STATUS_OK
+    tiempos = resultado.timings
+    assert tiempos["pipeline"] == "ingestion.M1"
+    etapas = {e["etapa"]: e for e in tiempos["etapas"]}
+    assert {"lectura", "mapeo_periodos", "contribuciones", "medida_general", "commit"} <= set(etapas)
+    assert etapas["lectura"]["bytes"] == len(fichero.contenido)
+    assert etapas["lectura"]["filas"] == etapas["mapeo_periodos"]["filas"] > 0
+    assert etapas["medida_general"]["consultas"] > 0
+    assert tiempos["consultas"] >= sum(e["consultas"] for e in tiempos["etapas"] if e["nivel"] == 0)
+
+
+def test_ingestion_con_error_tambien_guarda_tiempos(db, tmp_path):
+    ruta = tmp_path / "M1_0277_202501_20250201.csv"
+    ruta.write_text("Fecha_final;Energia_Kwh\n", encoding="utf-8")
+    ingestion = IngestionFile(tenant_id=1, empresa_id=1, tipo="M1", anio=2025, mes=1,
+                              filename=ruta.name, storage_key=str(ruta), uploaded_by=1,
+                              status=IngestionFile.STATUS_PENDING)
+    db.add(ingestion)
+    db.commit()
+
+    resultado = process_ingestion_file(db=db, ingestion=ingestion, tenant_id=1)
+
+    assert resultado.status == IngestionFile.STATUS_ERROR
+    assert [e["etapa"] for e in resultado.timings["etapas"]] == ["lectura"]
+
+
+def test_topologia_devuelve_tiempos(db):
+    ficheros = Generador(Escala(cups=40, cts=2, meses=1)).ficheros_topologia(1)
+
+    resultado = topo.importar_topologia(
+        db, 1, 1, 2025,
+        contenido_b2=ficheros["b2"].contenido, contenido_a1=ficheros["a1"].contenido,
+    )
+
+    etapas = {e["etapa"]: e for e in resultado["tiempos"]["etapas"]}
+    assert list(etapas) == ["parseo_b2", "escritura_b2", "parseo_a1", "escritura_a1",
+                            "asociacion_ct_bt", "asociacion_ct_mt"]
+    assert etapas["parseo_a1"]["bytes"] == len(ficheros["a1"].contenido)
+    assert etapas["escritura_a1"]["filas"] == resultado["cups_insertados"] == 40
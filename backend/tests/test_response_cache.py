@@ -0,0 +1,111 @@
+"""
+Tests de `app.core.response_cache`.
+
+Usa una mini-app FastAPI propia (sin BD) para comprobar el ciclo
+MISS → HIT → 304 y la invalidación por versión de datos.
+"""
+
+from __future__ import annotations
+
+import pytest
+from fastapi import FastAPI, Request
+from fastapi.testclient import TestClient
+
+from app.core.response_cache import (
+    MemoryCacheBackend,
+    bump_data_version,
+    cache_stats,
+    cached_json_response,
+    clear_response_cache,
+    configure_shared_backend,
+)
+
+
+_calls: list[int] = []
+
+
+def _build_app() -> FastAPI:
+    mini = FastAPI()
+
+    @mini.get("/datos")
+    def datos(request: Request, tenant: int = 1, empresas: str = "1"):
+        allowed = [int(x) for x in empresas.split(",")]
+
+        def _build():
+            _calls.append(1)
+            return {"tenant": tenant, "total": len(_calls)}
+
+        return cached_json_response(
+            request,
+            namespace="test.datos",
+            tenant_id=tenant,
+            allowed_empresa_ids=allowed,
+            build=_build,
+        )
+
+    return mini
+
+
+@pytest.fixture
+def mini_client():
+    clear_response_cache()
+    configure_shared_backend(None)
+    _calls.clear()
+    with TestClient(_build_app()) as c:
+        yield c
+    configure_shared_backend(None)
+    clear_response_cache()
+
+
+def test_miss_luego_hit_y_304(mini_client):
+    r1 = mini_client.get("/datos")
+    assert r1.status_code == 200
+    assert r1.headers["X-Cache"] == "MISS"
+    etag = r1.headers["ETag"]
+
+    r2 = mini_client.get("/datos")
+    assert r2.headers["X-Cache"] == "HIT"
+    assert r2.json() == r1.json()
+    assert len(_calls) == 1
+
+    r3 = mini_client.get("/datos", headers={"If-None-Match": etag})
+    assert r3.status_code == 304
+    assert r3.content == b""
+
+    stats = cache_stats()
+    assert stats["misses"] == 1
+    assert stats["hits_local"] == 2
+    assert stats["not_modified"] == 1
+
+
+def test_bump_invalida_solo_el_tenant(mini_client):
+    mini_client.get("/datos?tenant=1")
+    mini_client.get("/datos?tenant=2")
+    assert len(_calls) == 2
+
+    bump_data_version(1)
+
+    assert mini_client.get("/datos?tenant=1").headers["X-Cache"] == "MISS"
+    assert mini_client.get("/datos?tenant=2").headers["X-Cache"] == "HIT"
+
+
+def test_conjunto_de_empresas_forma_parte_de_la_clave(mini_client):
+    mini_client.get("/datos?empresas=1,2")
+    r = mini_client.get("/datos?empresas=2,1")
+    # Mismos params en distinto orden → distinta query string, pero el
+    # conjunto de empresas es el mismo; la clave incluye ambos.
+    assert r.headers["X-Cache"] == "MISS"
+    assert mini_client.get("/datos?empresas=1,2").headers["X-Cache"] == "HIT"
+
+
+def test_backend_compartido_sirve_a_otro_worker(mini_client):
+    backend = MemoryCacheBackend()
+    configure_shared_backend(backend)
+
+    mini_client.get("/datos")
+    # Simulamos otro worker: LRU local vacío, mismo backend compartido.
+    configure_shared_backend(backend)
+    r = mini_client.get("/datos")
+    assert r.headers["X-Cache"] == "HIT"
+    assert cache_stats()["hits_shared"] == 1
+    assert len(_calls) == 1
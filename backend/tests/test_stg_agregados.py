@@ -0,0 +1,75 @@
+"""
+Tests de los agregados diarios/mensuales de la curva S02
+(`app.stg.agregados`).
+"""
+
+from __future__ import annotations
+
+from datetime import date, datetime, timedelta
+
+from app.stg import agregados
+from app.stg.models import Medida, MedidaDiaria, MedidaMensual
+
+
+def _curva(db, *, fichero_id, meter_id, dia, ai=1.0, horas=24, bc=0):
+    """Lecturas horarias de un día: de 01:00 a 00:00 del siguiente."""
+    for h in range(1, horas + 1):
+        db.add(Medida(
+            tenant_id=1, empresa_id=1, fichero_id=fichero_id, tipo_fichero="S02",
+            meter_id=meter_id, concentrador_id=7,
+            timestamp_dato=datetime.combine(dia, datetime.min.time()) + timedelta(hours=h),
+            datos={"ai": ai, "ae": 0, "r1": 0.5, "bc": bc, "season": "W"},
+        ))
+    db.flush()
+
+
+def test_horas_del_dia_con_cambio_de_hora():
+    assert agregados.horas_del_dia(date(2026, 3, 29)) == 23
+    assert agregados.horas_del_dia(date(2026, 10, 25)) == 25
+    assert agregados.horas_del_dia(date(2026, 10, 19)) == 24
+    assert agregados.horas_del_mes(2026, 10) == 31 * 24 + 1
+
+
+def test_recalcular_diario_y_mensual(memory_db):
+    _curva(memory_db, fichero_id=1, meter_id="CIR1", dia=date(2026, 1, 1))
+    _curva(memory_db, fichero_id=1, meter_id="CIR1", dia=date(2026, 1, 2), horas=20, bc=128)
+    claves = agregados.claves_de_fichero(memory_db, 1)
+    assert claves == {("CIR1", date(2026, 1, 1)), ("CIR1", date(2026, 1, 2))}
+
+    assert agregados.recalcular(memory_db, tenant_id=1, empresa_id=1, claves=claves) == {
+        "agregados_dias": 2, "agregados_meses": 1,
+    }
+    d1, d2 = memory_db.query(MedidaDiaria).order_by(MedidaDiaria.fecha).all()
+    assert (d1.ai, d1.r1, d1.horas_con_dato, d1.lecturas_bc_ok) == (24.0, 12.0, 24, 24)
+    assert (d2.ai, d2.horas_con_dato, d2.lecturas_bc_incidencia) == (20.0, 20, 20)
+    assert d1.concentrador_id == 7
+
+    m = memory_db.query(MedidaMensual).one()
+    assert (m.anio, m.mes, m.ai, m.dias_con_dato, m.horas_con_dato) == (2026, 1, 44.0, 2, 44)
+    assert m.horas_esperadas == 31 * 24
+
+
+def test_reenvio_cuenta_la_lectura_mas_reciente(memory_db):
+    dia = date(2026, 1, 1)
+    _curva(memory_db, fichero_id=1, meter_id="CIR1", dia=dia, ai=1.0)
+    agregados.recalcular(memory_db, tenant_id=1, empresa_id=1,
+                         claves=agregados.claves_de_fichero(memory_db, 1))
+    _curva(memory_db, fichero_id=2, meter_id="CIR1", dia=dia, ai=2.0)
+    agregados.recalcular(memory_db, tenant_id=1, empresa_id=1,
+                         claves=agregados.claves_de_fichero(memory_db, 2))
+
+    d = memory_db.query(MedidaDiaria).one()
+    assert (d.ai, d.horas_con_dato) == (48.0, 24)
+    assert memory_db.query(MedidaMensual).one().ai == 48.0
+
+
+def test_reproceso_sin_datos_borra_el_dia(memory_db):
+    dia = date(2026, 1, 1)
+    _curva(memory_db, fichero_id=1, meter_id="CIR1", dia=dia)
+    claves = agregados.claves_de_fichero(memory_db, 1)
+    agregados.recalcular(memory_db, tenant_id=1, empresa_id=1, claves=claves)
+
+    memory_db.query(Medida).filter(Medida.fichero_id == 1).delete()
+    agregados.recalcular(memory_db, tenant_id=1, empresa_id=1, claves=claves)
+    assert memory_db.query(MedidaDiaria).count() == 0
+    assert memory_db.query(MedidaMensual).count() == 0
@@ -0,0 +1,36 @@
+"""
+Tests del calendario de particiones de stg_medida (`app.stg.particiones`).
+"""
+
+from __future__ import annotations
+
+from datetime import date
+
+from app.stg import particiones
+
+
+def test_nombre_y_mes_de_particion():
+    assert particiones.nombre_particion(date(2026, 1, 1)) == "stg_medida_p202601"
+    assert particiones.mes_de_particion("stg_medida_p202601") == date(2026, 1, 1)
+    assert particiones.mes_de_particion("stg_medida_default") is None
+
+
+def test_sumar_meses_cruza_anios():
+    assert particiones.sumar_meses(date(2026, 11, 1), 3) == date(2027, 2, 1)
+    assert particiones.sumar_meses(date(2026, 1, 1), -1) == date(2025, 12, 1)
+
+
+def test_meses_a_crear_solo_los_que_faltan():
+    existentes = [date(2026, 10, 1), date(2026, 12, 1)]
+    assert particiones.meses_a_crear(existentes, hoy=date(2026, 10, 19), adelante=3) == [
+        date(2026, 11, 1), date(2027, 1, 1),
+    ]
+
+
+def test_meses_a_archivar_respeta_retencion():
+    existentes = [date(2025, m, 1) for m in range(8, 13)] + [date(2026, 10, 1)]
+    hoy = date(2026, 10, 19)
+    assert particiones.meses_a_archivar(existentes, hoy=hoy, retencion_meses=0) == []
+    assert particiones.meses_a_archivar(existentes, hoy=hoy, retencion_meses=12) == [
+        date(2025, 8, 1), date(2025, 9, 1),
+    ]
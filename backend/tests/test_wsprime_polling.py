@@ -0,0 +1,156 @@
+"""
+Tests del sondeo concurrente WS-PRIME (`app.stg.wsprime.polling`) con el
+MockAdapter simulando latencia y fallos.
+"""
+
+from __future__ import annotations
+
+import asyncio
+import time
+
+import httpx
+from sqlalchemy.orm import Session
+
+from app.stg.models import StgConcentrador
+from app.stg.wsprime import polling, services
+from app.stg.wsprime.adapters.mock import MockAdapter
+from app.stg.wsprime.models import StgWsPrimeConfig
+
+
+class _MockContado(MockAdapter):
+    """MockAdapter que registra cuántas llamadas hay en curso por fabricante."""
+
+    en_curso: dict = {}
+    maximo: dict = {}
+
+    def __init__(self, fabricante, *args, **kwargs):
+        super().__init__(*args, **kwargs)
+        self.fabricante = fabricante
+
+    async def sondear(self, http):
+        n = _MockContado.en_curso.get(self.fabricante, 0) + 1
+        _MockContado.en_curso[self.fabricante] = n
+        _MockContado.maximo[self.fabricante] = max(n, _MockContado.maximo.get(self.fabricante, 0))
+        try:
+            return await super().sondear(http)
+        finally:
+            _MockContado.en_curso[self.fabricante] -= 1
+
+
+def _objetivo(i, url, *, fabricante="mock", timeout=5.0, adapter=None):
+    return polling.Objetivo(
+        config_id=i, concentrador_id=i, fabricante=fabricante, verify_ssl=True,
+        timeout=timeout, adapter=adapter or MockAdapter(url, "u", "p"),
+    )
+
+
+def _sondear(objetivos, *, concurrencia=4, reintentos=2, backoff=0.01):
+    return asyncio.run(polling.sondear_objetivos(
+        objetivos, concurrencia=concurrencia, reintentos=reintentos, backoff=backoff,
+    ))
+
+
+def test_concurrencia_acotada_por_fabricante():
+    _MockContado.en_curso.clear()
+    _MockContado.maximo.clear()
+    url = "https://mock.local/ct?latencia_ms=100"
+    objetivos = [
+        _objetivo(i, url, fabricante=fab, adapter=_MockContado(fab, url, "u", "p"))
+        for i, fab in enumerate(["circutor"] * 8 + ["ziv"] * 8)
+    ]
+
+    inicio = time.perf_counter()
+    resultados = _sondear(objetivos, concurrencia=4)
+    duracion = time.perf_counter() - inicio
+
+    assert all(r.ok for r in resultados)
+    assert [r.config_id for r in resultados] == list(range(16))
+    assert _MockContado.maximo == {"circutor": 4, "ziv": 4}
+    # 16 × 100 ms en serie = 1,6 s; con 4 por fabricante son 2 tandas.
+    assert duracion < 0.8
+
+
+def test_reintenta_errores_de_red_con_backoff():
+    resultados = _sondear([
+        _objetivo(1, "https://mock.local/ct1?fallos=2"),
+        _objetivo(2, "https://mock.local/ct2?fallos=5"),
+    ], reintentos=2)
+
+    recuperado, perdido = resultados
+    assert recuperado.ok and recuperado.intentos == 3
+    assert recuperado.info["fabricante"] == "MockCorp"
+    assert not perdido.ok and perdido.intentos == 3
+    assert perdido.mensaje.startswith("ConnectionError")
+    assert polling.espera_backoff(1, 2.0) == 2.0
+    assert polling.espera_backoff(3, 2.0) == 8.0
+    assert polling.espera_backoff(20, 2.0) == 60.0
+
+
+def test_timeout_por_concentrador_y_error_sin_reintento():
+    lento, rechazado = _sondear([
+        _objetivo(1, "https://mock.local/ct1?latencia_ms=1000", timeout=0.05),
+        _objetivo(2, "https://mock.local/ct2?error=1"),
+    ], reintentos=1)
+
+    assert not lento.ok and lento.intentos == 2
+    assert lento.mensaje.startswith("Timeout")
+    assert not rechazado.ok and rechazado.intentos == 1
+    assert "rechazadas" in rechazado.mensaje
+
+
+def test_sondear_concentradores_guarda_resultados(monkeypatch, memory_engine):
+    monkeypatch.setattr(services, "descifrar_password", lambda token: token)
+    with Session(memory_engine) as db:
+        for i, url, activo in (
+            (1, "https://mock.local/ct1", True),
+            (2, "https://mock.local/ct2?error=1", True),
+            (3, "https://mock.local/ct3", False),
+            (4, "https://mock.local/ct4", True),
+        ):
+            db.add(StgConcentrador(
+                id=i, tenant_id=1, empresa_id=1 if i < 4 else 2, codigo_ct=f"CT{i}",
+                modelo="CIRWATT-B" if i == 1 else None,
+            ))
+            db.add(StgWsPrimeConfig(
+                id=i, tenant_id=1, empresa_id=1 if i < 4 else 2, concentrador_id=i,
+                fabricante="mock", url=url, usuario="u", password_cifrado="p",
+                timeout_segundos=5, verify_ssl=True, activo=activo,
+            ))
+        db.commit()
+
+        resumen = polling.sondear_concentradores(db, empresa_ids=[1])
+
+        assert (resumen["total"], resumen["ok"], resumen["fallidos"]) == (2, 1, 1)
+        cfgs = {c.id: c for c in db.query(StgWsPrimeConfig).all()}
+        assert cfgs[1].ultima_conexion_ok is True and cfgs[1].ultima_conexion_error is None
+        assert cfgs[2].ultima_conexion_ok is False
+        assert "rechazadas" in cfgs[2].ultima_conexion_error
+        assert cfgs[3].ultima_conexion_at is None
+        assert cfgs[4].ultima_conexion_at is None
+
+        ct1 = db.get(StgConcentrador, 1)
+        assert ct1.firmware == "1.0.0-mock"
+        assert ct1.modelo == "CIRWATT-B"
+        assert ct1.numero_serie == "MOCK0000001"
+
+
+def test_sondeo_por_defecto_lee_el_wsdl_con_el_cliente_compartido():
+    from app.stg.wsprime.adapters.ziv import ZivAdapter
+
+    wsdl = (
+        b'<definitions xmlns="http://schemas.xmlsoap.org/wsdl/">'
+        b'<service name="PrimeMeterDataExchange"/></definitions>'
+    )
+
+    def responder(request):
+        if request.headers.get("authorization") is None:
+            return httpx.Response(401)
+        return httpx.Response(200, content=wsdl)
+
+    async def sondear():
+        async with httpx.AsyncClient(transport=httpx.MockTransport(responder)) as http:
+            return await ZivAdapter("https://ct.local/ws?wsdl", "u", "p").sondear(http)
+
+    r = asyncio.run(sondear())
+    assert r["ok"] is True
+    assert r["info"]["servicios_disponibles"] == ["PrimeMeterDataExchange"]